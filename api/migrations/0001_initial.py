@@ -0,0 +1,29 @@
+# Generated by Django 4.2.26 on 2026-10-19 00:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=100, verbose_name='النموذج')),
+                ('object_id', models.CharField(max_length=64, verbose_name='معرف السجل')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الحذف')),
+            ],
+            options={
+                'verbose_name': 'سجل حذف للمزامنة',
+                'verbose_name_plural': 'سجلات الحذف للمزامنة',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['model_label', 'id'], name='api_tombstone_label_id_idx'), models.Index(fields=['deleted_at'], name='api_tombstone_deleted_idx')],
+            },
+        ),
+    ]
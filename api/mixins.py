@@ -0,0 +1,219 @@
+"""
+Mixins مشتركة لواجهة API
+- SparseFieldsetMixin: تقليص حقول الـ Serializer عبر ?fields=
+- ConditionalGetMixin: دعم ETag و Last-Modified في القوائم والتفاصيل
+- DeltaSyncMixin: نقطة نهاية changes للمزامنة التفاضلية مع سجلات الحذف
+"""
+
+import base64
+import hashlib
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+
+class SparseFieldsetMixin:
+    """
+    Mixin للـ Serializers يسمح للعميل بطلب حقول محددة فقط
+    مثال: /api/products/?fields=id,name,sku
+
+    الحقول غير المطلوبة تُحذف قبل التسلسل، فلا تُنفذ SerializerMethodField
+    المكلفة الخاصة بها. الحقل id يبقى دائماً.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        requested = request.query_params.get('fields')
+        if not requested:
+            return
+        allowed = {name.strip() for name in requested.split(',') if name.strip()}
+        allowed.add('id')
+        for field_name in set(self.fields) - allowed:
+            self.fields.pop(field_name)
+
+
+class ConditionalGetMixin:
+    """
+    Mixin للـ ViewSets يضيف ETag و Last-Modified للقوائم والتفاصيل
+    ويعيد 304 Not Modified عند تطابق If-None-Match أو If-Modified-Since.
+
+    بصمة القائمة تُبنى من استعلام تجميعي واحد (MAX(updated_at), COUNT)
+    على نفس الاستعلام المفلتر، وهو أرخص بكثير من تسلسل الصفحة كاملة.
+
+    related_validators: علاقات تدخل قيمها في الاستجابة (مثل أرصدة المخزون للمنتج)؛
+    يُضاف MAX(updated_at) وعدد سجلات كل علاقة للبصمة حتى لا يُعاد 304 قديم
+    عند تغيرها دون تغير السجل الأصلي.
+    """
+
+    last_modified_field = 'updated_at'
+    related_validators = ()
+
+    def _validator_stamp(self, queryset):
+        aggregates = {
+            'last_modified': Max(self.last_modified_field),
+            'total': Count('pk', distinct=bool(self.related_validators)),
+        }
+        for relation in self.related_validators:
+            aggregates[f'{relation}_modified'] = Max(f'{relation}__{self.last_modified_field}')
+            aggregates[f'{relation}_count'] = Count(relation, distinct=True)
+        stamp = queryset.order_by().aggregate(**aggregates)
+        parts = [stamp['total'], stamp['last_modified']]
+        last_modified = stamp['last_modified']
+        for relation in self.related_validators:
+            related_modified = stamp[f'{relation}_modified']
+            parts.extend([stamp[f'{relation}_count'], related_modified])
+            if related_modified and (last_modified is None or related_modified > last_modified):
+                last_modified = related_modified
+        return parts, last_modified
+
+    def _build_etag(self, request, *parts):
+        raw = ':'.join(str(part) for part in (
+            self.basename, getattr(request.user, 'pk', None), request.get_full_path(), *parts
+        ))
+        return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+    def _conditional_response(self, request, etag, last_modified):
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        return get_conditional_response(request._request, etag=quote_etag(etag), last_modified=timestamp)
+
+    def _set_validators(self, response, etag, last_modified):
+        response['ETag'] = quote_etag(etag)
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        parts, last_modified = self._validator_stamp(queryset)
+        etag = self._build_etag(request, *parts)
+        not_modified = self._conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        response = super().list(request, *args, **kwargs)
+        return self._set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        last_modified = getattr(instance, self.last_modified_field, None)
+        parts = [instance.pk, last_modified]
+        if self.related_validators:
+            parts, last_modified = self._validator_stamp(type(instance)._default_manager.filter(pk=instance.pk))
+            parts.insert(0, instance.pk)
+        etag = self._build_etag(request, *parts)
+        not_modified = self._conditional_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        serializer = self.get_serializer(instance)
+        return self._set_validators(Response(serializer.data), etag, last_modified)
+
+
+class SyncCursor:
+    """
+    مؤشر المزامنة التفاضلية
+    يحمل آخر (updated_at, id) تم إرساله للعميل وآخر معرف سجل حذف،
+    ويُرسل للعميل كنص base64 معتم.
+    """
+
+    def __init__(self, timestamp=None, pk=None, tombstone_id=0):
+        self.timestamp = timestamp
+        self.pk = pk
+        self.tombstone_id = tombstone_id
+
+    @classmethod
+    def decode(cls, token):
+        if not token:
+            return cls()
+        try:
+            padded = token + '=' * (-len(token) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            timestamp = payload.get('ts')
+            return cls(
+                timestamp=datetime.fromisoformat(timestamp) if timestamp else None,
+                pk=payload.get('pk'),
+                tombstone_id=int(payload.get('tomb') or 0),
+            )
+        except (ValueError, TypeError, AttributeError):
+            raise ValidationError({'since': 'مؤشر المزامنة غير صالح'})
+
+    def encode(self):
+        payload = {
+            'ts': self.timestamp.isoformat() if self.timestamp else None,
+            'pk': self.pk,
+            'tomb': self.tombstone_id,
+        }
+        raw = json.dumps(payload, separators=(',', ':')).encode('ascii')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+class DeltaSyncMixin:
+    """
+    Mixin للـ ViewSets يضيف نقطة النهاية changes
+    GET /api/<resource>/changes/?since=<cursor>&limit=<n>
+
+    تعيد السجلات المعدلة بعد المؤشر مرتبة على (updated_at, id) بالاستفادة
+    من الفهرس المركب، ومعرفات السجلات المحذوفة من SyncTombstone،
+    ومؤشراً جديداً يستخدمه العميل في الطلب التالي.
+    """
+
+    sync_timestamp_field = 'updated_at'
+
+    def _sync_limit(self, request):
+        default_limit = getattr(settings, 'API_SYNC_PAGE_SIZE', 500)
+        try:
+            limit = int(request.query_params.get('limit', default_limit))
+        except (TypeError, ValueError):
+            raise ValidationError({'limit': 'قيمة limit غير صالحة'})
+        return max(1, min(limit, default_limit))
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """السجلات المعدلة والمحذوفة منذ مؤشر المزامنة"""
+        from .models import SyncTombstone
+
+        cursor = SyncCursor.decode(request.query_params.get('since'))
+        limit = self._sync_limit(request)
+        field = self.sync_timestamp_field
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if cursor.timestamp is not None:
+            queryset = queryset.filter(
+                Q(**{f'{field}__gt': cursor.timestamp}) |
+                Q(**{field: cursor.timestamp, 'pk__gt': cursor.pk or 0})
+            )
+        changed = list(queryset.order_by(field, 'pk')[:limit + 1])
+
+        tombstones = list(
+            SyncTombstone.objects.filter(
+                model_label=queryset.model._meta.label_lower,
+                pk__gt=cursor.tombstone_id,
+            ).order_by('pk').values_list('pk', 'object_id')[:limit + 1]
+        )
+
+        has_more = len(changed) > limit or len(tombstones) > limit
+        changed = changed[:limit]
+        tombstones = tombstones[:limit]
+
+        next_cursor = SyncCursor(cursor.timestamp, cursor.pk, cursor.tombstone_id)
+        if changed:
+            next_cursor.timestamp = getattr(changed[-1], field)
+            next_cursor.pk = changed[-1].pk
+        if tombstones:
+            next_cursor.tombstone_id = tombstones[-1][0]
+
+        serializer = self.get_serializer(changed, many=True)
+        return Response({
+            'results': serializer.data,
+            'deleted': [object_id for _, object_id in tombstones],
+            'cursor': next_cursor.encode(),
+            'has_more': has_more,
+        })
@@ -0,0 +1,30 @@
+"""
+نماذج تطبيق API
+"""
+
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class SyncTombstone(models.Model):
+    """
+    سجل حذف (Tombstone) للمزامنة التفاضلية
+    يحفظ معرفات السجلات المحذوفة حتى يتمكن عملاء نقاط البيع والموبايل
+    من إزالتها محلياً عبر نقطة النهاية changes
+    """
+
+    model_label = models.CharField(_("النموذج"), max_length=100)
+    object_id = models.CharField(_("معرف السجل"), max_length=64)
+    deleted_at = models.DateTimeField(_("تاريخ الحذف"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("سجل حذف للمزامنة")
+        verbose_name_plural = _("سجلات الحذف للمزامنة")
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["model_label", "id"], name="api_tombstone_label_id_idx"),
+            models.Index(fields=["deleted_at"], name="api_tombstone_deleted_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.model_label}#{self.object_id}"
@@ -0,0 +1,29 @@
+"""
+أنظمة ترقيم الصفحات لواجهة API
+- ترقيم بالصفحات للقوائم الصغيرة مع حجم صفحة قابل للتحكم
+- ترقيم بالمؤشر (Cursor) للجداول الكبيرة لتجنب COUNT(*) في كل صفحة
+"""
+
+from django.conf import settings
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+
+
+class StandardResultsSetPagination(PageNumberPagination):
+    """
+    الترقيم الافتراضي لواجهة API
+    يسمح للعميل بتحديد حجم الصفحة عبر ?page_size= ضمن حد أقصى
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 100)
+
+
+class LargeTableCursorPagination(CursorPagination):
+    """
+    ترقيم بالمؤشر للجداول الكبيرة (حركات المخزون، القيود المحاسبية)
+    لا يحتاج إلى COUNT(*) ويبقى ثابت التكلفة مهما تقدم العميل في الصفحات.
+    يستخدم ترتيب الـ ViewSet (ordering) كمفتاح للمؤشر.
+    """
+    page_size = getattr(settings, 'API_CURSOR_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 100)
+    ordering = '-id'
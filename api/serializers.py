@@ -9,6 +9,9 @@ from product.models import Product, Category, Stock, StockMovement, Warehouse
 from supplier.models import Supplier, SupplierType
 from purchase.models import Purchase, PurchaseItem
 from financial.models import ChartOfAccounts, JournalEntry, JournalEntryLine
+from client.models import Customer
+
+from .mixins import SparseFieldsetMixin
 
 User = get_user_model()
 
@@ -70,7 +73,7 @@ class CategorySerializer(serializers.ModelSerializer):
         return obj.products.count()
 
 
-class ProductListSerializer(serializers.ModelSerializer):
+class ProductListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer لقائمة المنتجات (مختصر)"""
     
     category_name = serializers.CharField(source='category.name', read_only=True)
@@ -86,10 +89,10 @@ class ProductListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
     
     def get_total_stock(self, obj):
-        return obj.get_total_stock()
+        return obj.current_stock
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer لتفاصيل المنتج (كامل)"""
     
     category_name = serializers.CharField(source='category.name', read_only=True)
@@ -108,13 +111,13 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
     
     def get_total_stock(self, obj):
-        return obj.get_total_stock()
+        return obj.current_stock
     
     def get_stock_value(self, obj):
-        return obj.get_total_stock() * obj.cost_price
+        return obj.current_stock * obj.cost_price
 
 
-class StockSerializer(serializers.ModelSerializer):
+class StockSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer للمخزون"""
     
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -125,12 +128,12 @@ class StockSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'product', 'product_name', 'warehouse', 'warehouse_name',
             'quantity', 'reserved_quantity', 'available_quantity',
-            'last_updated', 'created_at'
+            'updated_at', 'created_at'
         ]
-        read_only_fields = ['id', 'available_quantity', 'last_updated', 'created_at']
+        read_only_fields = ['id', 'available_quantity', 'updated_at', 'created_at']
 
 
-class StockMovementSerializer(serializers.ModelSerializer):
+class StockMovementSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer لحركات المخزون"""
     
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -141,10 +144,10 @@ class StockMovementSerializer(serializers.ModelSerializer):
         model = StockMovement
         fields = [
             'id', 'product', 'product_name', 'warehouse', 'warehouse_name',
-            'movement_type', 'quantity', 'reference_type', 'reference_id',
-            'notes', 'created_by', 'created_by_name', 'created_at'
+            'movement_type', 'quantity', 'reference_number', 'document_type',
+            'document_number', 'notes', 'created_by', 'created_by_name', 'timestamp'
         ]
-        read_only_fields = ['id', 'created_by', 'created_at']
+        read_only_fields = ['id', 'created_by', 'timestamp']
 
 
 class WarehouseSerializer(serializers.ModelSerializer):
@@ -325,9 +328,10 @@ class JournalEntryLineSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class JournalEntryListSerializer(serializers.ModelSerializer):
+class JournalEntryListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer لقائمة القيود المحاسبية (مختصر)"""
     
+    entry_number = serializers.CharField(source='number', read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     lines_count = serializers.SerializerMethodField()
     
@@ -344,9 +348,10 @@ class JournalEntryListSerializer(serializers.ModelSerializer):
         return obj.lines.count()
 
 
-class JournalEntryDetailSerializer(serializers.ModelSerializer):
+class JournalEntryDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer لتفاصيل القيد المحاسبي (كامل)"""
     
+    entry_number = serializers.CharField(source='number', read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     lines = JournalEntryLineSerializer(many=True, read_only=True)
     
@@ -359,3 +364,19 @@ class JournalEntryDetailSerializer(serializers.ModelSerializer):
             'created_by', 'created_by_name', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'entry_number', 'created_by', 'created_at', 'updated_at']
+
+
+# ==================== Customer Serializers ====================
+
+class CustomerSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Serializer للعملاء (يستخدم أيضاً في المزامنة التفاضلية)"""
+    
+    class Meta:
+        model = Customer
+        fields = [
+            'id', 'code', 'name', 'company_name', 'client_type',
+            'phone', 'phone_primary', 'email', 'city', 'address',
+            'tax_number', 'credit_limit', 'balance', 'is_vip',
+            'is_active', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'balance', 'created_at', 'updated_at']
@@ -0,0 +1,39 @@
+"""
+إشارات تطبيق API
+تسجيل سجلات الحذف (Tombstones) للنماذج المشمولة بالمزامنة التفاضلية
+"""
+
+import logging
+
+from django.apps import apps
+from django.db.models.signals import post_delete
+
+logger = logging.getLogger(__name__)
+
+# النماذج التي تُعرض عبر نقطة النهاية changes
+SYNC_TRACKED_MODELS = (
+    'product.Product',
+    'product.Stock',
+    'client.Customer',
+)
+
+
+def record_sync_tombstone(sender, instance, **kwargs):
+    """تسجيل معرف السجل المحذوف حتى يحذفه عملاء المزامنة محلياً"""
+    from .models import SyncTombstone
+
+    try:
+        SyncTombstone.objects.create(
+            model_label=sender._meta.label_lower,
+            object_id=str(instance.pk),
+        )
+    except Exception as e:
+        logger.error(f"فشل تسجيل سجل الحذف للمزامنة {sender._meta.label_lower}#{instance.pk}: {e}")
+
+
+for _model_label in SYNC_TRACKED_MODELS:
+    post_delete.connect(
+        record_sync_tombstone,
+        sender=apps.get_model(_model_label),
+        dispatch_uid=f'api_sync_tombstone_{_model_label}',
+    )
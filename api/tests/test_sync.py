@@ -0,0 +1,152 @@
+"""
+اختبارات الترقيم بالمؤشر و ETag والمزامنة التفاضلية في API
+"""
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from rest_framework.test import APITestCase, APIClient
+
+from client.models import Customer
+from api.models import SyncTombstone
+
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CustomerSyncAPITest(APITestCase):
+    """اختبارات المزامنة التفاضلية و ETag على نقطة نهاية العملاء"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="syncuser",
+            password="syncpass123",
+            is_staff=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.customers = [
+            Customer.objects.create(name=f"عميل {i}", code=f"SYNC{i:03d}")
+            for i in range(3)
+        ]
+
+    def test_list_returns_etag_and_not_modified(self):
+        """اختبار أن القائمة تعيد ETag وترجع 304 عند عدم التغيير"""
+        response = self.client.get('/api/customers/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(etag)
+
+        response = self.client.get('/api/customers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Customer.objects.create(name="عميل جديد", code="SYNC999")
+        response = self.client.get('/api/customers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_not_modified(self):
+        """اختبار ETag في صفحة التفاصيل"""
+        url = f'/api/customers/{self.customers[0].pk}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_sparse_fieldsets(self):
+        """اختبار تقليص الحقول عبر ?fields="""
+        response = self.client.get('/api/customers/?fields=name,code')
+        self.assertEqual(response.status_code, 200)
+        row = response.data['results'][0]
+        self.assertEqual(set(row.keys()), {'id', 'name', 'code'})
+
+    def test_changes_since_cursor(self):
+        """اختبار أن changes تعيد التعديلات والحذف منذ المؤشر"""
+        response = self.client.get('/api/customers/changes/?limit=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertTrue(response.data['has_more'])
+
+        response = self.client.get(f"/api/customers/changes/?since={response.data['cursor']}")
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertFalse(response.data['has_more'])
+        cursor = response.data['cursor']
+
+        response = self.client.get(f'/api/customers/changes/?since={cursor}')
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(response.data['deleted'], [])
+
+        deleted_pk = self.customers[1].pk
+        self.customers[1].delete()
+        self.customers[2].name = "عميل معدل"
+        self.customers[2].save()
+
+        response = self.client.get(f'/api/customers/changes/?since={cursor}')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.customers[2].pk])
+        self.assertEqual(response.data['deleted'], [str(deleted_pk)])
+        self.assertTrue(
+            SyncTombstone.objects.filter(model_label='client.customer', object_id=str(deleted_pk)).exists()
+        )
+
+    def test_invalid_cursor(self):
+        """اختبار رفض مؤشر غير صالح"""
+        response = self.client.get('/api/customers/changes/?since=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CursorPaginationAPITest(APITestCase):
+    """اختبارات الترقيم بالمؤشر للجداول الكبيرة"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="cursoruser",
+            password="cursorpass123",
+            is_staff=True
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_journal_entries_use_cursor_pagination(self):
+        """اختبار أن القيود المحاسبية لا تعيد count وتستخدم next/previous"""
+        response = self.client.get('/api/journal-entries/?page_size=5')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('next', response.data)
+        self.assertNotIn('count', response.data)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ProductConditionalGetTest(APITestCase):
+    """بصمة قائمة المنتجات تتغير بتغير أرصدة المخزون"""
+
+    def setUp(self):
+        from decimal import Decimal
+
+        from product.models import Category, Product, Stock, Unit, Warehouse
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="etaguser", password="etagpass123", is_staff=True)
+        self.client.force_authenticate(user=self.user)
+        self.product = Product.objects.create(
+            name="منتج ETag", sku="ETAG-1", category=Category.objects.create(name="ETag"),
+            unit=Unit.objects.create(name="قطعة"), cost_price=Decimal("5"), selling_price=Decimal("8"),
+            created_by=self.user,
+        )
+        self.stock = Stock.objects.create(
+            product=self.product, warehouse=Warehouse.objects.create(code="WH-ETAG", name="مخزن ETag"), quantity=4
+        )
+
+    def test_stock_change_invalidates_product_etag(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from product.models import Stock
+
+        for url in ('/api/products/', f'/api/products/{self.product.pk}/'):
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+            Stock.objects.filter(pk=self.stock.pk).update(
+                quantity=Stock.objects.get(pk=self.stock.pk).quantity + 1,
+                updated_at=timezone.now() + timedelta(seconds=1),
+            )
+            self.assertNotEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
@@ -14,7 +14,8 @@ from .viewsets import (
     CategoryViewSet, ProductViewSet, StockViewSet, StockMovementViewSet, WarehouseViewSet,
     SupplierTypeViewSet, SupplierViewSet,
     PurchaseViewSet,
-    ChartOfAccountsViewSet, JournalEntryViewSet
+    ChartOfAccountsViewSet, JournalEntryViewSet,
+    CustomerViewSet
 )
 
 app_name = "api"
@@ -38,6 +39,9 @@ router.register(r'warehouses', WarehouseViewSet, basename='warehouse')
 router.register(r'supplier-types', SupplierTypeViewSet, basename='supplier-type')
 router.register(r'suppliers', SupplierViewSet, basename='supplier')
 
+# Customers
+router.register(r'customers', CustomerViewSet, basename='customer')
+
 # Purchases
 router.register(r'purchases', PurchaseViewSet, basename='purchase')
 
@@ -15,6 +15,7 @@ from product.models import Product, Category, Stock, StockMovement, Warehouse
 from supplier.models import Supplier, SupplierType
 from purchase.models import Purchase, PurchaseItem
 from financial.models import ChartOfAccounts, JournalEntry, JournalEntryLine
+from client.models import Customer
 
 from .serializers import (
     UserSerializer, UserCreateSerializer,
@@ -22,9 +23,12 @@ from .serializers import (
     StockSerializer, StockMovementSerializer, WarehouseSerializer,
     SupplierTypeSerializer, SupplierListSerializer, SupplierDetailSerializer,
     PurchaseListSerializer, PurchaseDetailSerializer, PurchaseItemSerializer,
-    ChartOfAccountsSerializer, JournalEntryListSerializer, JournalEntryDetailSerializer
+    ChartOfAccountsSerializer, JournalEntryListSerializer, JournalEntryDetailSerializer,
+    CustomerSerializer
 )
 from .permissions import IsManagerOrReadOnly, IsAdminOrReadOnly
+from .mixins import ConditionalGetMixin, DeltaSyncMixin
+from .pagination import LargeTableCursorPagination
 
 User = get_user_model()
 
@@ -84,8 +88,8 @@ class CategoryViewSet(viewsets.ModelViewSet):
     ordering = ['name']
 
 
-class ProductViewSet(viewsets.ModelViewSet):
-    """ViewSet للمنتجات"""
+class ProductViewSet(DeltaSyncMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    """ViewSet للمنتجات (يدعم ETag والمزامنة التفاضلية)"""
     queryset = Product.objects.select_related('category').all()
     permission_classes = [IsAuthenticated, IsManagerOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -93,9 +97,11 @@ class ProductViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'sku', 'barcode', 'description']
     ordering_fields = ['name', 'unit_price', 'created_at']
     ordering = ['name']
+    # total_stock في الاستجابة مشتق من أرصدة المخزون
+    related_validators = ('stocks',)
     
     def get_serializer_class(self):
-        if self.action == 'list':
+        if self.action in ('list', 'changes'):
             return ProductListSerializer
         return ProductDetailSerializer
     
@@ -121,7 +127,7 @@ class ProductViewSet(viewsets.ModelViewSet):
             stocks__quantity__lte=F('reorder_point')
         ).distinct().count()
         total_value = sum(
-            p.get_total_stock() * p.cost_price 
+            p.current_stock * p.cost_price 
             for p in Product.objects.all()
         )
         
@@ -141,15 +147,15 @@ class ProductViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class StockViewSet(viewsets.ModelViewSet):
-    """ViewSet للمخزون"""
+class StockViewSet(DeltaSyncMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    """ViewSet للمخزون (يدعم ETag والمزامنة التفاضلية)"""
     queryset = Stock.objects.select_related('product', 'warehouse').all()
     serializer_class = StockSerializer
     permission_classes = [IsAuthenticated, IsManagerOrReadOnly]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['product', 'warehouse']
-    ordering_fields = ['quantity', 'last_updated']
-    ordering = ['-last_updated']
+    ordering_fields = ['quantity', 'updated_at']
+    ordering = ['-updated_at']
     
     @action(detail=False, methods=['get'])
     def by_warehouse(self, request):
@@ -169,10 +175,11 @@ class StockMovementViewSet(viewsets.ReadOnlyModelViewSet):
     ).all()
     serializer_class = StockMovementSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = LargeTableCursorPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['product', 'warehouse', 'movement_type']
-    ordering_fields = ['created_at']
-    ordering = ['-created_at']
+    ordering_fields = ['timestamp', 'id']
+    ordering = ['-id']
 
 
 class WarehouseViewSet(viewsets.ModelViewSet):
@@ -327,13 +334,14 @@ class ChartOfAccountsViewSet(viewsets.ModelViewSet):
 
 class JournalEntryViewSet(viewsets.ModelViewSet):
     """ViewSet للقيود المحاسبية"""
-    queryset = JournalEntry.objects.prefetch_related('lines').all()
+    queryset = JournalEntry.objects.select_related('created_by').prefetch_related('lines').all()
     permission_classes = [IsAuthenticated, IsManagerOrReadOnly]
+    pagination_class = LargeTableCursorPagination
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'reference_type']
-    search_fields = ['entry_number', 'description']
-    ordering_fields = ['date', 'created_at']
-    ordering = ['-date']
+    search_fields = ['number', 'description']
+    ordering_fields = ['date', 'created_at', 'id']
+    ordering = ['-id']
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -371,3 +379,17 @@ class JournalEntryViewSet(viewsets.ModelViewSet):
         entry.save()
         serializer = self.get_serializer(entry)
         return Response(serializer.data)
+
+
+# ==================== Customer ViewSets ====================
+
+class CustomerViewSet(DeltaSyncMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    """ViewSet للعملاء (يدعم ETag والمزامنة التفاضلية)"""
+    queryset = Customer.objects.all()
+    serializer_class = CustomerSerializer
+    permission_classes = [IsAuthenticated, IsManagerOrReadOnly]
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filterset_fields = ['client_type', 'is_active', 'is_vip']
+    search_fields = ['name', 'code', 'phone', 'email']
+    ordering_fields = ['name', 'code', 'updated_at']
+    ordering = ['name']
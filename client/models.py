@@ -169,6 +169,9 @@ class Customer(models.Model):
         verbose_name = _("عميل")
         verbose_name_plural = _("العملاء")
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["updated_at", "id"], name="customer_updated_idx"),
+        ]
 
     def __str__(self):
         if getattr(self, "contact_person", None) and self.contact_person:
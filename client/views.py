@@ -40,12 +40,8 @@ def customer_list(request):
         customers_qs = customers_qs.filter(is_active=False)
 
     if search:
-        customers_qs = customers_qs.filter(
-            Q(name__icontains=search) |
-            Q(phone_primary__icontains=search) |
-            Q(phone__icontains=search) |
-            Q(code__icontains=search)
-        )
+        from core.services.search_index import SearchIndexService
+        customers_qs = customers_qs.filter(id__in=SearchIndexService.search_ids('customer', search))
 
     if has_debt == '1':
         customers_qs = customers_qs.filter(balance__gt=0)
@@ -4,7 +4,7 @@ from .models import (
     SystemSetting, DashboardStat, Notification, NotificationPreference,
     BackupRecord, BackupFile, DataRetentionPolicy, DataRetentionExecution,
     EncryptionKey, DataProtectionAudit, DataClassification,
-    SystemModule,
+    SystemModule, FeatureFlag,
     # ✅ PHASE 7: Simplified monitoring models
     UnifiedLog, AlertRule, Alert
 )
@@ -490,3 +490,20 @@ class SystemModuleAdmin(admin.ModelAdmin):
             cache.delete_pattern('module_enabled_*')
         except AttributeError:
             pass
+
+
+@admin.register(FeatureFlag)
+class FeatureFlagAdmin(admin.ModelAdmin):
+    """
+    عرض مفاتيح التشغيل المحفوظة (التعديل يتم من لوحة الحوكمة لضمان التدقيق)
+    """
+    list_display = ('key', 'flag_type', 'enabled', 'reason', 'updated_by', 'updated_at')
+    list_filter = ('flag_type', 'enabled')
+    search_fields = ('key', 'reason')
+    readonly_fields = ('key', 'flag_type', 'enabled', 'reason', 'updated_by', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
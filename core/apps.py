@@ -12,3 +12,7 @@ class CoreConfig(AppConfig):
         """
         # استيراد الإشارات لتفعيل الإشعارات التلقائية
         import core.signals
+
+        # ربط قياس الاستعلامات بمهام Celery
+        from core.services.query_profiler import connect_celery_signals
+        connect_celery_signals()
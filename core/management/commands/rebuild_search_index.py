@@ -0,0 +1,29 @@
+"""
+إعادة بناء فهرس البحث العربي (منتجات / عملاء / موردين)
+يُشغّل بعد الاستيراد الجماعي أو التعديلات المباشرة على قاعدة البيانات
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.services.search_index import ENTITIES, SearchIndexService
+
+
+class Command(BaseCommand):
+    help = 'إعادة بناء فهرس البحث للمنتجات والعملاء والموردين'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--entity',
+            choices=sorted(ENTITIES),
+            action='append',
+            help='الكيان المطلوب (يمكن تكراره، الافتراضي: الكل)'
+        )
+
+    def handle(self, *args, **options):
+        for entity in options.get('entity') or sorted(ENTITIES):
+            started = time.monotonic()
+            count = SearchIndexService.rebuild(entity)
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {entity}: تمت فهرسة {count} سجل خلال {time.monotonic() - started:.2f} ثانية'
+            ))
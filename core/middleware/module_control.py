@@ -5,8 +5,8 @@ from django.http import Http404
 from django.shortcuts import redirect
 from django.urls import resolve
 from django.contrib import messages
-from django.utils import timezone
-from django.core.cache import cache
+
+from core.services.feature_flag_store import feature_flag_store
 
 
 class ModuleAccessMiddleware:
@@ -19,15 +19,8 @@ class ModuleAccessMiddleware:
     
     def __init__(self, get_response):
         self.get_response = get_response
-        self._enabled_modules_cache = None
-        self._cache_time = None
     
     def __call__(self, request):
-        # تحديث الكاش كل 5 دقائق
-        if not self._cache_time or \
-           (timezone.now() - self._cache_time).seconds > 300:
-            self._update_cache()
-        
         # التحقق من الوصول للتطبيق
         try:
             resolved = resolve(request.path)
@@ -43,28 +36,13 @@ class ModuleAccessMiddleware:
         response = self.get_response(request)
         return response
     
-    def _update_cache(self):
-        """تحديث كاش التطبيقات المفعلة"""
-        try:
-            from core.models import SystemModule
-            
-            # محاولة الحصول من الكاش أولاً
-            cache_key = 'enabled_modules_set'
-            self._enabled_modules_cache = cache.get(cache_key)
-            
-            if self._enabled_modules_cache is None:
-                self._enabled_modules_cache = set(
-                    SystemModule.objects.filter(is_enabled=True).values_list('code', flat=True)
-                )
-                cache.set(cache_key, self._enabled_modules_cache, 300)
-            
-            self._cache_time = timezone.now()
-        except Exception:
-            # في حالة عدم وجود الجدول، افترض أن كل شيء مفعّل
-            self._enabled_modules_cache = set()
-    
     def _is_module_enabled(self, module_code):
-        """التحقق من تفعيل التطبيق"""
-        if not self._enabled_modules_cache:
+        """
+        التحقق من تفعيل التطبيق من مخزن مفاتيح التشغيل (نسخة محلية للعملية
+        تتحدث تلقائياً عند تغيير أي تطبيق)
+        """
+        modules = feature_flag_store.module_states()
+        # في حالة عدم وجود تطبيقات مسجلة، افترض أن كل شيء مفعّل
+        if not any(modules.values()):
             return True
-        return module_code in self._enabled_modules_cache
+        return modules.get(module_code, False)
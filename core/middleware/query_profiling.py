@@ -0,0 +1,55 @@
+"""
+Middleware لقياس استعلامات كل عرض (عينة) وفرض حدود الاستعلامات
+يبدأ القياس في process_view (بعد معرفة اسم العرض) وينتهي بعد تجهيز الاستجابة
+"""
+import logging
+from contextlib import ExitStack
+
+from core.services.query_profiler import (
+    QueryBudgetExceeded,
+    get_query_budget,
+    profile_block,
+    should_sample,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfilingMiddleware:
+    """Middleware لقياس الاستعلامات وكشف N+1 لكل عرض"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        stack = getattr(request, "_query_profile_stack", None)
+        if stack is not None:
+            del request._query_profile_stack
+            try:
+                stack.close()
+            except QueryBudgetExceeded:
+                raise
+            except Exception as e:
+                logger.error(f"Error in query profiling middleware: {e}")
+            else:
+                profile = request._query_profile
+                response["X-Query-Count"] = str(profile.queries)
+                response["X-DB-Time-Ms"] = f"{profile.db_time_ms:.1f}"
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = getattr(request, "resolver_match", None)
+        label = (match.view_name if match and match.view_name else None) or getattr(
+            view_func, "__qualname__", request.path
+        )
+        # العروض ذات الحد المُعرّف تُقاس دائماً، والباقي حسب نسبة العينة
+        if not should_sample() and not get_query_budget(label):
+            return None
+
+        stack = ExitStack()
+        request._query_profile = stack.enter_context(profile_block(label))
+        request._query_profile_stack = stack
+        return None
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.26 on 2026-10-19 00:57
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeatureFlag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=150, unique=True, verbose_name='المفتاح')),
+                ('flag_type', models.CharField(choices=[('component', 'مكون حوكمة'), ('workflow', 'مسار عمل'), ('emergency', 'طوارئ'), ('signal', 'إشارة')], max_length=20, verbose_name='النوع')),
+                ('enabled', models.BooleanField(default=True, verbose_name='مفعّل')),
+                ('reason', models.CharField(blank=True, max_length=255, verbose_name='السبب')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='آخر تعديل بواسطة')),
+            ],
+            options={
+                'verbose_name': 'مفتاح تشغيل',
+                'verbose_name_plural': 'مفاتيح التشغيل',
+                'ordering': ['flag_type', 'key'],
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.26 on 2026-10-19 01:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_feature_flag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(max_length=30, verbose_name='الكيان')),
+                ('object_id', models.PositiveIntegerField(verbose_name='معرف السجل')),
+                ('title', models.CharField(blank=True, max_length=255, verbose_name='العنوان المطبّع')),
+                ('document', models.TextField(blank=True, verbose_name='النص المطبّع')),
+                ('is_active', models.BooleanField(default=True, verbose_name='نشط')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+            ],
+            options={
+                'verbose_name': 'سجل فهرس البحث',
+                'verbose_name_plural': 'فهرس البحث',
+                'unique_together': {('entity', 'object_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(max_length=30, verbose_name='الكيان')),
+                ('kind', models.CharField(choices=[('word', 'كلمة'), ('code', 'كود')], default='word', max_length=10, verbose_name='النوع')),
+                ('token', models.CharField(max_length=64, verbose_name='الكلمة')),
+                ('entry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='core.searchindexentry')),
+            ],
+            options={
+                'verbose_name': 'كلمة فهرس',
+                'verbose_name_plural': 'كلمات الفهرس',
+                'indexes': [models.Index(fields=['entity', 'kind', 'token'], name='idx_search_token')],
+            },
+        ),
+    ]
@@ -1338,6 +1338,86 @@ class SystemModule(models.Model):
         }
 
 
+class FeatureFlag(models.Model):
+    """
+    القيمة المحفوظة لمفاتيح الحوكمة والطوارئ والإشارات
+    المصدر الدائم لـ core.services.feature_flag_store (لا تضيع عند تفريغ الكاش)
+    """
+    FLAG_TYPES = [
+        ('component', 'مكون حوكمة'),
+        ('workflow', 'مسار عمل'),
+        ('emergency', 'طوارئ'),
+        ('signal', 'إشارة'),
+    ]
+
+    key = models.CharField(max_length=150, unique=True, verbose_name='المفتاح')
+    flag_type = models.CharField(max_length=20, choices=FLAG_TYPES, verbose_name='النوع')
+    enabled = models.BooleanField(default=True, verbose_name='مفعّل')
+    reason = models.CharField(max_length=255, blank=True, verbose_name='السبب')
+    updated_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='آخر تعديل بواسطة'
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')
+
+    class Meta:
+        verbose_name = 'مفتاح تشغيل'
+        verbose_name_plural = 'مفاتيح التشغيل'
+        ordering = ['flag_type', 'key']
+
+    def __str__(self):
+        return f"{self.key} = {'ON' if self.enabled else 'OFF'}"
+
+
+class SearchIndexEntry(models.Model):
+    """
+    سجل فهرس البحث لكل كيان (منتج / عميل / مورد) بنص مطبّع يدعم الحروف العربية
+    يُحدّث تلقائياً عند الحفظ عبر core.services.search_index
+    """
+    entity = models.CharField(max_length=30, verbose_name='الكيان')
+    object_id = models.PositiveIntegerField(verbose_name='معرف السجل')
+    title = models.CharField(max_length=255, blank=True, verbose_name='العنوان المطبّع')
+    document = models.TextField(blank=True, verbose_name='النص المطبّع')
+    is_active = models.BooleanField(default=True, verbose_name='نشط')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')
+
+    class Meta:
+        verbose_name = 'سجل فهرس البحث'
+        verbose_name_plural = 'فهرس البحث'
+        unique_together = ('entity', 'object_id')
+
+    def __str__(self):
+        return f"{self.entity}#{self.object_id}: {self.title}"
+
+
+class SearchToken(models.Model):
+    """
+    كلمات الفهرس المطبّعة (بحث بالبادئة) والأكواد (مطابقة تامة للباركود/الكود)
+    """
+    KIND_WORD = 'word'
+    KIND_CODE = 'code'
+    KIND_CHOICES = [
+        (KIND_WORD, 'كلمة'),
+        (KIND_CODE, 'كود'),
+    ]
+
+    entry = models.ForeignKey(SearchIndexEntry, on_delete=models.CASCADE, related_name='tokens')
+    entity = models.CharField(max_length=30, verbose_name='الكيان')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=KIND_WORD, verbose_name='النوع')
+    token = models.CharField(max_length=64, verbose_name='الكلمة')
+
+    class Meta:
+        verbose_name = 'كلمة فهرس'
+        verbose_name_plural = 'كلمات الفهرس'
+        indexes = [
+            models.Index(fields=['entity', 'kind', 'token'], name='idx_search_token'),
+        ]
+
+
 # ============================================================
 # ENTERPRISE DOCUMENT MANAGEMENT SYSTEM (DMS) MODELS
 # ============================================================
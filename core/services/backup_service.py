@@ -9,6 +9,7 @@ Simplified and unified backup system.
 
 import os
 import gzip
+import json
 import shutil
 import hashlib
 import logging
@@ -31,13 +32,15 @@ class BackupService:
         self.backup_dir = Path(getattr(settings, 'BACKUP_LOCAL_DIR', settings.BASE_DIR / 'backups'))
         self.backup_dir.mkdir(parents=True, exist_ok=True)
         
-    def create_backup(self, backup_type='full', download_mode=False) -> Dict[str, any]:
+    def create_backup(self, backup_type='full', download_mode=False, since=None) -> Dict[str, any]:
         """
         Create backup with specified type
         
         Args:
-            backup_type: 'full', 'database', or 'media'
+            backup_type: 'full', 'database', 'incremental', or 'media'
             download_mode: True to return file for direct download, False to save on server
+            since: Start time for 'incremental' backups (default: start time of the
+                last database backup, read from its manifest)
         
         Returns:
             Dict with backup information
@@ -60,16 +63,31 @@ class BackupService:
             
             # Create backups based on type
             if backup_type in ['full', 'database']:
+                started_at = timezone.now()
                 db_backup = self._create_database_backup(backup_id)
                 if db_backup:
                     backup_info['files'].append(db_backup)
                     backup_info['size_bytes'] += db_backup['size_bytes']
+                    self._write_manifest(backup_id, backup_type, started_at, db_backup)
                 else:
                     error_msg = 'Database backup failed'
                     if hasattr(self, '_last_error'):
                         error_msg = self._last_error
                     backup_info['warnings'].append(error_msg)
             
+            if backup_type == 'incremental':
+                started_at = timezone.now()
+                db_backup = self._create_incremental_backup(backup_id, since)
+                if db_backup:
+                    backup_info['files'].append(db_backup)
+                    backup_info['size_bytes'] += db_backup['size_bytes']
+                    self._write_manifest(backup_id, backup_type, started_at, db_backup)
+                    backup_info['warnings'].append(
+                        'Incremental backups do not record deleted rows; restore them on top of a full backup'
+                    )
+                else:
+                    backup_info['warnings'].append(getattr(self, '_last_error', 'Incremental backup failed'))
+            
             if backup_type in ['full', 'media']:
                 media_backup = self._create_media_backup(backup_id)
                 if media_backup:
@@ -86,7 +104,7 @@ class BackupService:
             if not download_mode:
                 # Determine backup type for cleanup
                 cleanup_type = 'all'
-                if backup_type == 'database':
+                if backup_type in ('database', 'incremental'):
                     cleanup_type = 'database'
                 elif backup_type == 'media':
                     cleanup_type = 'media'
@@ -190,47 +208,14 @@ class BackupService:
                 raise Exception("mysqldump created empty file")
                 
         except Exception as e:
-            logger.info(f"mysqldump not available ({e}), using Django dumpdata as fallback")
-            
-            # Fallback: Use Django's dumpdata
-            from django.core.management import call_command
-            from django.apps import apps
-            from django.db import connection
-            from io import StringIO
-            
-            output = StringIO()
+            logger.info(f"mysqldump not available ({e}), using streaming logical backup as fallback")
+            if backup_path.exists():
+                backup_path.unlink()
             try:
-                # Get all models that are managed and have existing tables
-                managed_models = []
-                with connection.cursor() as cursor:
-                    # Get list of existing tables
-                    cursor.execute("SHOW TABLES")
-                    existing_tables = {row[0] for row in cursor.fetchall()}
-                
-                for model in apps.get_models():
-                    if model._meta.managed:
-                        table_name = model._meta.db_table
-                        # Only include models whose tables actually exist
-                        if table_name in existing_tables:
-                            managed_models.append(f"{model._meta.app_label}.{model._meta.model_name}")
-                        else:
-                            logger.warning(f"Skipping model {model._meta.app_label}.{model._meta.model_name} - table {table_name} does not exist")
-                
-                if managed_models:
-                    call_command('dumpdata', *managed_models, '--natural-foreign', 
-                               '--natural-primary', '--indent=2', stdout=output)
-                    
-                    with open(backup_path, 'w', encoding='utf-8') as f:
-                        f.write(output.getvalue())
-                    
-                    logger.info(f"Django dumpdata backup created successfully for {len(managed_models)} models")
-                else:
-                    logger.warning("No managed models found to backup")
-                    raise Exception("No managed models found")
-                    
+                return self._create_logical_backup('mysql', filename)
             except Exception as dump_error:
-                logger.error(f"Django dumpdata also failed: {dump_error}")
-                raise Exception(f"Both mysqldump and dumpdata failed: {dump_error}")
+                logger.error(f"Logical backup also failed: {dump_error}")
+                raise Exception(f"Both mysqldump and logical backup failed: {dump_error}")
         
         # Check if file was created and has content
         if not backup_path.exists():
@@ -260,6 +245,92 @@ class BackupService:
             'created_at': timezone.now()
         }
     
+    def _create_logical_backup(self, engine_name: str, filename: str, since: Optional[datetime] = None) -> Dict[str, any]:
+        """
+        Create a streaming logical backup (chunked NDJSON/msgpack, gzip, hashed while writing)
+        """
+        from core.services.logical_backup import LogicalBackupEngine
+        
+        backup_engine = LogicalBackupEngine()
+        stem = filename.rsplit('.', 1)[0]
+        backup_path = self.backup_dir / f"{stem}.{backup_engine.encoding}.gz"
+        
+        result = backup_engine.dump(backup_path, since=since)
+        if result['rows'] == 0 and since is None:
+            backup_path.unlink()
+            raise Exception("No rows found to backup")
+        
+        return {
+            'type': 'database',
+            'engine': engine_name,
+            'format': f"logical-{backup_engine.encoding}",
+            'filename': backup_path.name,
+            'path': str(backup_path),
+            'size_bytes': result['size_bytes'],
+            'hash': result['hash'],
+            'rows': result['rows'],
+            'incremental_since': since,
+            'created_at': timezone.now()
+        }
+    
+    @property
+    def manifest_dir(self) -> Path:
+        return self.backup_dir / 'manifests'
+    
+    def _write_manifest(self, backup_id: str, backup_type: str, started_at: datetime, db_backup: Dict) -> None:
+        """
+        Record when a database backup started (the next incremental backup starts from here)
+        """
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        since = db_backup.get('incremental_since')
+        manifest = {
+            'backup_id': backup_id,
+            'backup_type': backup_type,
+            'started_at': started_at.isoformat(),
+            'filename': db_backup['filename'],
+            'incremental_since': since.isoformat() if since else None,
+        }
+        (self.manifest_dir / f"{backup_id}.json").write_text(json.dumps(manifest), encoding='utf-8')
+    
+    def _last_database_backup_started_at(self) -> Optional[datetime]:
+        """
+        Start time of the newest database backup (full, database or incremental) whose file still exists
+        """
+        latest = None
+        for manifest_path in self.manifest_dir.glob('*.json'):
+            try:
+                manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+                started_at = datetime.fromisoformat(manifest['started_at'])
+            except (ValueError, KeyError, OSError) as e:
+                logger.warning(f"Ignoring unreadable backup manifest {manifest_path.name}: {e}")
+                continue
+            if not (self.backup_dir / manifest.get('filename', '')).is_file():
+                continue
+            if latest is None or started_at > latest:
+                latest = started_at
+        return latest
+    
+    def _create_incremental_backup(self, backup_id: str, since: Optional[datetime]) -> Optional[Dict[str, any]]:
+        """
+        Create an incremental logical backup: rows changed (updated_at) since the given time
+        (defaults to the start time of the last database backup), plus full copies of tables
+        without updated_at. Without any previous database backup the dump is complete.
+        
+        Deleted rows leave no trace in an incremental dump: restoring a chain of incrementals
+        on top of a full backup brings back rows deleted after that full backup.
+        """
+        try:
+            if since is None:
+                since = self._last_database_backup_started_at()
+            engine = settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1]
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            filename = f"db_{engine}_incremental_{backup_id}_{timestamp}.dump"
+            return self._create_logical_backup(engine, filename, since=since)
+        except Exception as e:
+            self._last_error = f"Incremental backup failed: {e}"
+            logger.error(self._last_error)
+            return None
+    
     def _create_postgresql_backup(self, db_config: Dict, filename: str) -> Dict[str, any]:
         """
         Create PostgreSQL database backup using pg_dump
@@ -664,7 +735,7 @@ class BackupService:
             return 'full'
         
         # Check for database indicators
-        if any(pattern in filename_lower for pattern in ['db_', 'database', '.sql', '.db', '.sqlite', '.json']):
+        if any(pattern in filename_lower for pattern in ['db_', 'database', '.sql', '.db', '.sqlite', '.json', '.ndjson', '.msgpack']):
             return 'database'
         
         # If still uncertain, try to inspect file content
@@ -724,6 +795,12 @@ class BackupService:
         if file_path.stat().st_size == 0:
             raise Exception(f"ملف النسخة الاحتياطية فارغ: {file_path}")
         
+        # Streaming logical backups are restored directly from the compressed file
+        from core.services.logical_backup import LogicalBackupEngine
+        if LogicalBackupEngine.is_logical_backup(file_path):
+            logger.info("Detected streaming logical backup, restoring with bulk inserts")
+            return LogicalBackupEngine().restore(file_path)
+        
         db_config = settings.DATABASES['default']
         engine = db_config['ENGINE']
         
@@ -7,17 +7,23 @@ Comprehensive data retention and cleanup service.
 Implements data lifecycle management with compliance and audit trails.
 """
 
+import gzip
 import logging
+import time
 from datetime import datetime, timedelta
+from pathlib import Path
 from typing import Dict, List, Optional, Any, Tuple
 from django.conf import settings
 from django.db import models, transaction
+from django.db.models.functions import Cast, Concat
 from django.utils import timezone
 from django.core.mail import send_mail
 from django.apps import apps
 from dataclasses import dataclass
 import json
 
+from core.services.logical_backup import _encode_value
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -32,6 +38,63 @@ class RetentionPolicy:
     exclude_conditions: Dict[str, Any] = None
     notification_days: int = 30  # Days before deletion to send notification
 
+
+class RetentionArchiveWriter:
+    """
+    Append-only archive segment for one model in one cleanup run.
+
+    Rows are written as compressed JSON lines (``.jsonl.gz``) or msgpack
+    (``.msgpack.gz``). The file is opened lazily on the first batch and every
+    batch is appended as its own gzip member, so a crash never corrupts
+    batches that were already written.
+    """
+
+    FORMATS = ('jsonl', 'msgpack')
+
+    def __init__(self, archive_dir: Path, model_label: str, run_stamp: str, archive_format: str = 'jsonl'):
+        if archive_format not in self.FORMATS:
+            raise ValueError(f"Unsupported archive format: {archive_format}")
+        self.archive_format = archive_format
+        self.model_label = model_label
+        safe_label = model_label.replace('.', '_')
+        self.path = Path(archive_dir) / safe_label / f"{safe_label}_{run_stamp}.{archive_format}.gz"
+        self.rows_written = 0
+
+    def write_batch(self, rows: List[Dict[str, Any]], policy_name: str) -> int:
+        if not rows:
+            return 0
+
+        archived_at = timezone.now().isoformat()
+        binary_ok = self.archive_format == 'msgpack'
+        records = [
+            {
+                'model': self.model_label,
+                'pk': _encode_value(row.get('pk'), binary_ok),
+                'data': {name: _encode_value(value, binary_ok) for name, value in row.items() if name != 'pk'},
+                'archived_at': archived_at,
+                'archived_by': 'data_retention_service',
+                'policy': policy_name,
+            }
+            for row in rows
+        ]
+
+        if binary_ok:
+            import msgpack
+            packer = msgpack.Packer(use_bin_type=True)
+            payload = b''.join(packer.pack(record) for record in records)
+        else:
+            payload = ''.join(
+                json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n' for record in records
+            ).encode('utf-8')
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self.path, 'ab') as f:
+            f.write(payload)
+
+        self.rows_written += len(records)
+        return len(records)
+
+
 class DataRetentionService:
     """
     Comprehensive data retention and lifecycle management service
@@ -46,6 +109,14 @@ class DataRetentionService:
         # Compliance settings
         self.gdpr_enabled = getattr(settings, 'GDPR_COMPLIANCE_ENABLED', False)
         self.audit_enabled = getattr(settings, 'DATA_RETENTION_AUDIT_ENABLED', True)
+
+        # Batching / archive settings
+        self.batch_size = max(getattr(settings, 'DATA_RETENTION_BATCH_SIZE', 1000), 1)
+        self.batch_pause = getattr(settings, 'DATA_RETENTION_BATCH_PAUSE', 0.05)
+        self.archive_dir = Path(getattr(
+            settings, 'DATA_RETENTION_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'archives' / 'retention'
+        ))
+        self.archive_format = getattr(settings, 'DATA_RETENTION_ARCHIVE_FORMAT', 'jsonl')
         
     def _load_retention_policies(self) -> List[RetentionPolicy]:
         """
@@ -210,37 +281,52 @@ class DataRetentionService:
             if policy.exclude_conditions:
                 expired_records = expired_records.exclude(**policy.exclude_conditions)
             
-            total_expired = expired_records.count()
-            logger.info(f"Found {total_expired} expired records for {policy.model_name}")
-            
-            if total_expired == 0:
+            if dry_run:
+                # Dry run - just count
+                policy_result['deleted_count'] = expired_records.count()
                 return policy_result
             
-            # Process records in batches
-            batch_size = 100
+            archive = None
+            if policy.archive_before_delete and self.archive_enabled:
+                archive = RetentionArchiveWriter(
+                    self.archive_dir,
+                    model_class._meta.label_lower,
+                    timezone.now().strftime('%Y%m%d_%H%M%S'),
+                    self.archive_format,
+                )
+            
+            # Walk expired records by primary key (keyset) - no OFFSET rescans,
+            # and deleting a batch never shifts the rows of the next one
+            pk_name = model_class._meta.pk.name
+            ordered = expired_records.order_by(pk_name)
+            last_pk = None
             processed = 0
             
-            while processed < total_expired:
-                batch = list(expired_records[processed:processed + batch_size])
-                
-                if not batch:
+            while True:
+                page = ordered if last_pk is None else ordered.filter(**{f'{pk_name}__gt': last_pk})
+                pks = list(page.values_list(pk_name, flat=True)[:self.batch_size])
+                if not pks:
                     break
+                last_pk = pks[-1]
                 
-                if not dry_run:
-                    with transaction.atomic():
-                        batch_result = self._process_record_batch(batch, policy)
-                        policy_result['deleted_count'] += batch_result['deleted']
-                        policy_result['archived_count'] += batch_result['archived']
-                        policy_result['anonymized_count'] += batch_result['anonymized']
-                else:
-                    # Dry run - just count
-                    policy_result['deleted_count'] += len(batch)
+                with transaction.atomic():
+                    batch_result = self._process_record_batch(model_class, pks, policy, archive)
+                policy_result['deleted_count'] += batch_result['deleted']
+                policy_result['archived_count'] += batch_result['archived']
+                policy_result['anonymized_count'] += batch_result['anonymized']
                 
-                processed += len(batch)
+                processed += len(pks)
+                logger.info(f"Processed {processed} expired records for {policy.model_name}")
                 
-                # Log progress
-                if processed % 1000 == 0:
-                    logger.info(f"Processed {processed}/{total_expired} records for {policy.model_name}")
+                if len(pks) < self.batch_size:
+                    break
+                
+                # Throttle between batches to keep lock time short for live traffic
+                if self.batch_pause:
+                    time.sleep(self.batch_pause)
+            
+            if archive and archive.rows_written:
+                policy_result['archive_path'] = str(archive.path)
             
         except Exception as e:
             policy_result['errors'].append(str(e))
@@ -290,9 +376,11 @@ class DataRetentionService:
         
         return filters
     
-    def _process_record_batch(self, records: List[models.Model], policy: RetentionPolicy) -> Dict[str, int]:
+    def _process_record_batch(self, model_class, pks: List[Any], policy: RetentionPolicy,
+                              archive: Optional[RetentionArchiveWriter] = None) -> Dict[str, int]:
         """
-        Process a batch of records according to retention policy
+        Process a batch of expired records with set-based statements:
+        one archive append, one anonymizing UPDATE and one DELETE per batch
         """
         batch_result = {
             'deleted': 0,
@@ -300,61 +388,42 @@ class DataRetentionService:
             'anonymized': 0
         }
         
-        for record in records:
-            try:
-                # Archive before deletion if enabled
-                if policy.archive_before_delete and self.archive_enabled:
-                    self._archive_record(record)
-                    batch_result['archived'] += 1
-                
-                # Anonymize before deletion if enabled
-                if policy.anonymize_before_delete:
-                    self._anonymize_record(record)
-                    batch_result['anonymized'] += 1
-                
-                # Log deletion if audit enabled
-                if self.audit_enabled:
-                    self._log_record_deletion(record, policy)
-                
-                # Delete record
-                if policy.cascade_delete:
-                    record.delete()  # This will cascade to related objects
-                else:
-                    # Check for related objects before deletion
-                    related_objects = self._get_related_objects(record)
-                    if related_objects:
-                        logger.warning(f"Skipping deletion of {record} - has related objects")
-                        continue
-                    
-                    record.delete()
-                
-                batch_result['deleted'] += 1
-                
-            except Exception as e:
-                logger.error(f"Failed to process record {record}: {e}")
+        batch = model_class._base_manager.filter(pk__in=pks)
+        
+        # Records still referenced through PROTECT relations are kept (but anonymized)
+        protected_pks = set() if policy.cascade_delete else self._get_protected_pks(model_class, pks)
+        if protected_pks:
+            logger.warning(
+                f"Skipping deletion of {len(protected_pks)} {policy.model_name} records - have related objects"
+            )
+        deletable_pks = [pk for pk in pks if pk not in protected_pks]
+        
+        # Archive before deletion if enabled
+        if archive is not None and deletable_pks:
+            rows = list(
+                model_class._base_manager.filter(pk__in=deletable_pks)
+                .order_by('pk')
+                .values('pk', *[field.attname for field in model_class._meta.concrete_fields])
+            )
+            batch_result['archived'] = archive.write_batch(rows, policy.model_name)
+        
+        # Anonymize before deletion if enabled
+        if policy.anonymize_before_delete:
+            batch_result['anonymized'] = self._anonymize_batch(model_class, batch)
+        
+        if not deletable_pks:
+            return batch_result
+        
+        # Log deletion if audit enabled
+        if self.audit_enabled:
+            self._log_batch_deletion(model_class, deletable_pks, policy)
+        
+        # Delete records (Django still cascades/nullifies related rows as declared on the FKs)
+        _, deleted_per_model = model_class._base_manager.filter(pk__in=deletable_pks).delete()
+        batch_result['deleted'] = deleted_per_model.get(model_class._meta.label, 0)
         
         return batch_result
     
-    def _archive_record(self, record: models.Model):
-        """
-        Archive a record before deletion
-        """
-        try:
-            # Create archive data
-            archive_data = {
-                'model': f"{record._meta.app_label}.{record._meta.model_name}",
-                'pk': record.pk,
-                'data': self._serialize_record(record),
-                'archived_at': timezone.now().isoformat(),
-                'archived_by': 'data_retention_service'
-            }
-            
-            # Save to archive (could be file, database, or external service)
-            self._save_to_archive(archive_data)
-            
-        except Exception as e:
-            logger.error(f"Failed to archive record {record}: {e}")
-    
     def _serialize_record(self, record: models.Model) -> Dict[str, Any]:
         """
         Serialize a record to dictionary
@@ -383,83 +452,79 @@ class DataRetentionService:
         
         return data
     
-    def _save_to_archive(self, archive_data: Dict[str, Any]):
+    def _anonymization_values(self, model_class) -> Dict[str, Any]:
         """
-        Save archived data to storage
+        Build per-field UPDATE expressions for the model's sensitive fields
         """
-        # This could be implemented to save to:
-        # - Archive database table
-        # - File system
-        # - External archive service
-        # - Cloud storage
+        from core.services.data_encryption_service import DataEncryptionService
+        
+        encryption_service = DataEncryptionService()
+        pk_text = Cast('pk', output_field=models.CharField())
+        values = {}
         
-        # For now, log the archive (implement actual storage as needed)
-        logger.info(f"Archived record: {archive_data['model']} ID {archive_data['pk']}")
+        for field in model_class._meta.concrete_fields:
+            if field.primary_key or not encryption_service.is_field_sensitive(field.name):
+                continue
+            # EmailField is a CharField subclass - check it first
+            if isinstance(field, models.EmailField):
+                values[field.attname] = Concat(
+                    models.Value('anonymized_'), pk_text, models.Value('@example.com'),
+                    output_field=models.CharField(),
+                )
+            elif isinstance(field, models.CharField):
+                values[field.attname] = Concat(
+                    models.Value('ANONYMIZED_'), pk_text, output_field=models.CharField()
+                )
+            elif isinstance(field, models.TextField):
+                values[field.attname] = models.Value('ANONYMIZED_TEXT')
+        
+        return values
     
-    def _anonymize_record(self, record: models.Model):
+    def _anonymize_batch(self, model_class, batch: models.QuerySet) -> int:
         """
-        Anonymize sensitive fields in a record
+        Anonymize sensitive fields of a whole batch with a single UPDATE
         """
         try:
-            from core.services.data_encryption_service import DataEncryptionService
-            
-            encryption_service = DataEncryptionService()
-            
-            # Get sensitive fields
-            sensitive_fields = [
-                field.name for field in record._meta.fields
-                if encryption_service.is_field_sensitive(field.name)
-            ]
-            
-            # Anonymize each sensitive field
-            for field_name in sensitive_fields:
-                try:
-                    field = record._meta.get_field(field_name)
-                    
-                    if isinstance(field, models.CharField):
-                        setattr(record, field_name, f"ANONYMIZED_{record.pk}")
-                    elif isinstance(field, models.EmailField):
-                        setattr(record, field_name, f"anonymized_{record.pk}@example.com")
-                    elif isinstance(field, models.TextField):
-                        setattr(record, field_name, "ANONYMIZED_TEXT")
-                    
-                except Exception as e:
-                    logger.warning(f"Failed to anonymize field {field_name}: {e}")
-            
-            # Save anonymized record
-            record.save(update_fields=sensitive_fields)
-            
+            values = self._anonymization_values(model_class)
+            if not values:
+                return 0
+            return batch.update(**values)
         except Exception as e:
-            logger.error(f"Failed to anonymize record {record}: {e}")
+            logger.error(f"Failed to anonymize {model_class._meta.label} batch: {e}")
+            return 0
     
-    def _get_related_objects(self, record: models.Model) -> List[models.Model]:
+    def _get_protected_pks(self, model_class, pks: List[Any]) -> set:
         """
-        Get related objects that would prevent deletion
+        Primary keys in the batch that are still referenced through PROTECT relations
         """
-        related_objects = []
+        protected = set()
         
         try:
-            # Check reverse foreign keys
-            for rel in record._meta.related_objects:
-                if rel.on_delete == models.PROTECT:
-                    related_manager = getattr(record, rel.get_accessor_name())
-                    if related_manager.exists():
-                        related_objects.extend(list(related_manager.all()[:5]))  # Limit for performance
+            for rel in model_class._meta.related_objects:
+                if rel.on_delete != models.PROTECT or rel.many_to_many:
+                    continue
+                protected.update(
+                    rel.related_model._base_manager
+                    .filter(**{f'{rel.field.name}__in': pks})
+                    .values_list(rel.field.attname, flat=True)
+                    .distinct()
+                )
         
         except Exception as e:
-            logger.warning(f"Failed to check related objects for {record}: {e}")
+            logger.warning(f"Failed to check related objects for {model_class._meta.label}: {e}")
         
-        return related_objects
+        return protected
     
-    def _log_record_deletion(self, record: models.Model, policy: RetentionPolicy):
+    def _log_batch_deletion(self, model_class, pks: List[Any], policy: RetentionPolicy):
         """
-        Log record deletion for audit trail
+        Log a batch deletion for audit trail
         """
         try:
             audit_data = {
                 'action': 'data_retention_deletion',
-                'model': f"{record._meta.app_label}.{record._meta.model_name}",
-                'object_id': record.pk,
+                'model': model_class._meta.label_lower,
+                'object_ids': [str(pk) for pk in pks],
+                'count': len(pks),
                 'policy': policy.model_name,
                 'retention_days': policy.retention_days,
                 'timestamp': timezone.now().isoformat(),
@@ -470,7 +535,7 @@ class DataRetentionService:
             logger.info(f"Data retention deletion: {json.dumps(audit_data)}")
             
         except Exception as e:
-            logger.error(f"Failed to log deletion for {record}: {e}")
+            logger.error(f"Failed to log deletion for {model_class._meta.label}: {e}")
     
     def _send_cleanup_notification(self, cleanup_result: Dict[str, Any]):
         """
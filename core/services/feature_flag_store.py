@@ -0,0 +1,225 @@
+"""
+مخزن مفاتيح التشغيل الموحد (حوكمة / مسارات عمل / طوارئ / إشارات / تطبيقات)
+Unified process-local feature flag store
+
+- القيم محفوظة في قاعدة البيانات (FeatureFlag و SystemModule) فلا تضيع عند تفريغ الكاش
+- كل عملية (gunicorn worker / celery) تحتفظ بنسخة في الذاكرة وتقرأ منها مباشرة
+- رقم إصدار عام واحد في الكاش: أي تعديل يغيره، وكل عملية تفحصه مرة كل
+  FEATURE_FLAG_REFRESH_SECONDS على الأكثر وتعيد التحميل عند تغيره
+  فتنتقل مفاتيح الطوارئ لكل العمليات خلال ثوانٍ
+- التعديل داخل معاملة يظهر في العملية نفسها فوراً، ويُنشر رقم الإصدار
+  لباقي العمليات بعد الـ commit فقط
+"""
+
+import logging
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+class FeatureFlagStore:
+    """
+    نسخة محلية للعملية من كل مفاتيح التشغيل مع تحديث حسب رقم الإصدار
+    """
+
+    VERSION_CACHE_KEY = 'feature_flags_version'
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._flags: Dict[str, bool] = {}
+        self._modules: Dict[str, bool] = {}
+        self._version: Optional[str] = None
+        self._loaded = False
+        self._next_check = 0.0
+        # قيم عُدلت داخل معاملة لم تُنفذ بعد: {key: (enabled, connection, run_on_commit)}
+        # تتقدم على القيم المحملة حتى لا تمحوها إعادة تحميل لا ترى المعاملة
+        self._unpublished: Dict[str, Tuple[bool, object, list]] = {}
+        # عداد محلي يزيد مع كل إعادة تحميل أو تعديل، يقارنه المستهلكون لمزامنة نسخهم
+        self._generation = 0
+
+    @property
+    def enabled(self) -> bool:
+        return getattr(settings, 'FEATURE_FLAG_STORE_ENABLED', True)
+
+    # ==================== القراءة ====================
+
+    def get(self, key: str, default: bool) -> bool:
+        """قيمة المفتاح المحفوظة أو القيمة الافتراضية"""
+        if not self.enabled:
+            return default
+        self._ensure_fresh()
+        pending = self._unpublished.get(key)
+        if pending is not None:
+            return pending[0]
+        return self._flags.get(key, default)
+
+    def get_prefixed(self, prefix: str) -> Dict[str, bool]:
+        """كل المفاتيح التي تبدأ بالبادئة (بدون البادئة)"""
+        if not self.enabled:
+            return {}
+        self._ensure_fresh()
+        flags = dict(self._flags)
+        flags.update((key, pending[0]) for key, pending in list(self._unpublished.items()))
+        return {
+            key[len(prefix):]: value
+            for key, value in flags.items()
+            if key.startswith(prefix)
+        }
+
+    def version(self) -> int:
+        """رقم الجيل المحلي بعد التأكد من حداثة النسخة"""
+        if not self.enabled:
+            return 0
+        self._ensure_fresh()
+        return self._generation
+
+    def module_states(self) -> Dict[str, bool]:
+        """حالة تفعيل تطبيقات النظام {code: is_enabled}"""
+        if not self.enabled:
+            return self._load_modules()
+        self._ensure_fresh()
+        return self._modules
+
+    def is_module_enabled(self, module_code: str) -> bool:
+        """التطبيق مفعّل فقط إذا كان مسجلاً ومفعّلاً"""
+        return self.module_states().get(module_code, False)
+
+    # ==================== الكتابة ====================
+
+    def set_flag(self, key: str, enabled: bool, flag_type: str, reason: str = "", user=None) -> None:
+        """
+        حفظ قيمة المفتاح في قاعدة البيانات وتطبيقها على النسخة المحلية فوراً،
+        ثم تغيير رقم الإصدار لباقي العمليات بعد الـ commit
+        """
+        if not self.enabled:
+            return
+
+        from core.models import FeatureFlag
+
+        updated_by = user if getattr(user, 'is_authenticated', False) else None
+        try:
+            FeatureFlag.objects.update_or_create(
+                key=key,
+                defaults={
+                    'flag_type': flag_type,
+                    'enabled': enabled,
+                    'reason': (reason or '')[:255],
+                    'updated_by': updated_by,
+                },
+            )
+        except Exception as e:
+            logger.error(f"فشل حفظ مفتاح التشغيل {key}: {e}")
+            return
+
+        def publish():
+            with self._lock:
+                self._flags[key] = enabled
+                self._unpublished.pop(key, None)
+                self._generation += 1
+            self._bump_version()
+
+        conn = transaction.get_connection()
+        if conn.in_atomic_block:
+            with self._lock:
+                self._unpublished[key] = (enabled, conn, conn.run_on_commit)
+                self._generation += 1
+        transaction.on_commit(publish)
+
+    def invalidate(self) -> None:
+        """إجبار كل العمليات (وهذه العملية فوراً) على إعادة التحميل"""
+        with self._lock:
+            self._loaded = False
+        self._bump_version()
+
+    # ==================== داخلي ====================
+
+    def _ensure_fresh(self) -> None:
+        if self._unpublished:
+            self._drop_finished_transactions()
+
+        now = time.monotonic()
+        if self._loaded and now < self._next_check:
+            return
+
+        with self._lock:
+            if self._loaded and now < self._next_check:
+                return
+            self._next_check = now + getattr(settings, 'FEATURE_FLAG_REFRESH_SECONDS', 1.0)
+            version = self._read_version()
+            if not self._loaded or version != self._version:
+                self._reload(version)
+
+    def _drop_finished_transactions(self) -> None:
+        """
+        حذف القيم غير المنشورة التي انتهت معاملتها: Django يستبدل قائمة
+        run_on_commit عند الـ commit أو التراجع، فالتراجع لا يترك قيمة لم تُحفظ
+        """
+        with self._lock:
+            finished = [
+                key for key, (_, conn, hooks) in self._unpublished.items()
+                if conn.run_on_commit is not hooks
+            ]
+            for key in finished:
+                del self._unpublished[key]
+            if finished:
+                self._generation += 1
+
+    def _read_version(self) -> Optional[str]:
+        try:
+            version = cache.get(self.VERSION_CACHE_KEY)
+            if version is None:
+                # الكاش فُرّغ: أول عملية تضع إصداراً جديداً فيعيد الجميع التحميل مرة واحدة
+                cache.add(self.VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+                version = cache.get(self.VERSION_CACHE_KEY)
+            return version
+        except Exception as e:
+            logger.warning(f"تعذر قراءة إصدار مفاتيح التشغيل من الكاش: {e}")
+            return self._version
+
+    def _bump_version(self) -> None:
+        version = uuid.uuid4().hex
+        try:
+            cache.set(self.VERSION_CACHE_KEY, version, None)
+        except Exception as e:
+            logger.warning(f"تعذر نشر إصدار مفاتيح التشغيل: {e}")
+            return
+        with self._lock:
+            if self._loaded:
+                self._version = version
+
+    def _reload(self, version: Optional[str]) -> None:
+        from core.models import FeatureFlag
+
+        try:
+            flags = dict(FeatureFlag.objects.values_list('key', 'enabled'))
+        except Exception as e:
+            # الجدول غير موجود (قبل الترحيل) - الإبقاء على القيم الحالية/الافتراضية
+            logger.warning(f"تعذر تحميل مفاتيح التشغيل: {e}")
+            flags = self._flags
+
+        self._flags = flags
+        self._modules = self._load_modules()
+        self._version = version
+        self._loaded = True
+        self._generation += 1
+
+    @staticmethod
+    def _load_modules() -> Dict[str, bool]:
+        from core.models import SystemModule
+
+        try:
+            return dict(SystemModule.objects.values_list('code', 'is_enabled'))
+        except Exception as e:
+            logger.warning(f"تعذر تحميل حالة التطبيقات: {e}")
+            return {}
+
+
+# مخزن العملية الحالية
+feature_flag_store = FeatureFlagStore()
@@ -0,0 +1,410 @@
+"""
+خدمة قياس الاستعلامات ومسارات التنفيذ الساخنة
+Query budget & hot-path profiling service
+
+تسجل لكل طلب/مهمة Celery مُختارة بالعينة:
+عدد الاستعلامات، زمن قاعدة البيانات، بصمات الاستعلامات المكررة (كشف N+1)،
+إصابات/إخفاقات الكاش، وذروة الذاكرة (اختيارياً عبر tracemalloc).
+النتائج تُجمع داخل العملية (in-process) ويتم عرضها عبر لوحة المشرف و JSON endpoint.
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# البروفايل النشط في السياق الحالي (طلب أو مهمة)
+_active_profile: ContextVar[Optional["QueryProfile"]] = ContextVar("active_query_profile", default=None)
+
+_STRING_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?|\$\d+)\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    """تجاوز عدد الاستعلامات الحد المسموح للعرض أو المهمة"""
+
+
+def fingerprint_sql(sql: str) -> str:
+    """
+    توحيد نص الاستعلام لبصمة ثابتة: حذف القيم الحرفية وطي قوائم IN
+    بحيث تتطابق استعلامات N+1 التي تختلف في المعاملات فقط
+    """
+    normalized = _STRING_LITERAL_RE.sub("?", sql)
+    normalized = _NUMBER_LITERAL_RE.sub("?", normalized)
+    normalized = _IN_LIST_RE.sub("IN (...)", normalized)
+    return _WHITESPACE_RE.sub(" ", normalized).strip()
+
+
+def get_query_budget(label: str) -> int:
+    """الحد المسموح من الاستعلامات لعرض/مهمة (0 = بلا حد)"""
+    budgets = getattr(settings, "PROFILING_QUERY_BUDGETS", {}) or {}
+    if label in budgets:
+        return int(budgets[label])
+    return int(getattr(settings, "PROFILING_DEFAULT_QUERY_BUDGET", 0) or 0)
+
+
+def should_sample() -> bool:
+    """اختيار الطلب للقياس حسب PROFILING_SAMPLE_RATE"""
+    if not getattr(settings, "PROFILING_ENABLED", False):
+        return False
+    rate = float(getattr(settings, "PROFILING_SAMPLE_RATE", 0.0) or 0.0)
+    if rate <= 0:
+        return False
+    return rate >= 1 or random.random() < rate
+
+
+@dataclass
+class QueryProfile:
+    """نتيجة قياس طلب أو مهمة واحدة"""
+    label: str
+    kind: str = "request"
+    queries: int = 0
+    db_time_ms: float = 0.0
+    duration_ms: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    peak_memory_kb: float = 0.0
+    budget: int = 0
+    fingerprints: Counter = field(default_factory=Counter)
+    fingerprint_time: Dict[str, float] = field(default_factory=dict)
+
+    def record_query(self, sql: str, elapsed: float) -> None:
+        self.queries += 1
+        self.db_time_ms += elapsed * 1000
+        key = fingerprint_sql(sql)
+        self.fingerprints[key] += 1
+        self.fingerprint_time[key] = self.fingerprint_time.get(key, 0.0) + elapsed * 1000
+
+    def duplicates(self, threshold: Optional[int] = None) -> Dict[str, int]:
+        """البصمات المتكررة أكثر من الحد (اشتباه N+1)"""
+        if threshold is None:
+            threshold = getattr(settings, "PROFILING_N_PLUS_ONE_THRESHOLD", 5)
+        return {sql: count for sql, count in self.fingerprints.items() if count >= threshold}
+
+    @property
+    def over_budget(self) -> bool:
+        return bool(self.budget) and self.queries > self.budget
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("fingerprints")
+        data.pop("fingerprint_time")
+        data["db_time_ms"] = round(self.db_time_ms, 2)
+        data["duration_ms"] = round(self.duration_ms, 2)
+        data["duplicates"] = self.duplicates()
+        return data
+
+
+class _QueryRecorder:
+    """execute_wrapper يسجل الاستعلامات في البروفايل دون الاحتفاظ بنصها الكامل"""
+
+    def __init__(self, profile: QueryProfile):
+        self.profile = profile
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.profile.record_query(sql, time.perf_counter() - started)
+
+
+@contextmanager
+def _cache_instrumentation():
+    """
+    تغليف get() لنسخ الكاش المُعدة في الـ thread الحالي طوال كتلة القياس فقط لعد الإصابات والإخفاقات
+    (على مستوى النسخة لا الصنف، ويُعاد الأصل عند الخروج)
+    """
+    from django.core.cache import caches
+
+    wrapped = []
+    for alias in getattr(settings, "CACHES", {}):
+        try:
+            backend = caches[alias]
+        except Exception as e:
+            logger.error(f"تعذر تجهيز قياس الكاش '{alias}': {e}")
+            continue
+        if getattr(backend.get, "_profiled", False):
+            # كتلة قياس متداخلة: التغليف الخارجي يعد للبروفايل النشط
+            continue
+        wrapped.append((backend, backend.__dict__.get("get")))
+        backend.get = _wrap_cache_get(backend.get)
+    try:
+        yield
+    finally:
+        for backend, own_get in reversed(wrapped):
+            if own_get is None:
+                del backend.get
+            else:
+                backend.get = own_get
+
+
+def _wrap_cache_get(original_get):
+    """
+    يمرر كل المعاملات الإضافية كما هي (مثل client في django-redis)
+    ويستبدل القيمة الافتراضية بعلامة داخلية لتمييز الإخفاق
+    """
+    missing = object()
+
+    def get(key, *args, **kwargs):
+        profile = _active_profile.get()
+        if profile is None:
+            return original_get(key, *args, **kwargs)
+        if args:
+            default, args = args[0], args[1:]
+        else:
+            default = kwargs.pop("default", None)
+        value = original_get(key, missing, *args, **kwargs)
+        if value is missing:
+            profile.cache_misses += 1
+            return default
+        profile.cache_hits += 1
+        return value
+
+    get._profiled = True
+    get.__wrapped__ = original_get
+    return get
+
+
+class ProfileAggregator:
+    """
+    مُجمّع داخل العملية لنتائج القياس حسب العرض/المهمة وحسب بصمة الاستعلام
+    محدود الحجم (PROFILING_MAX_ENTRIES) لتفادي نمو الذاكرة
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._labels: Dict[str, Dict[str, Any]] = {}
+            self._queries: Dict[str, Dict[str, Any]] = {}
+            self._started_at = time.time()
+
+    def add(self, profile: QueryProfile) -> None:
+        max_entries = getattr(settings, "PROFILING_MAX_ENTRIES", 500)
+        duplicates = profile.duplicates()
+        with self._lock:
+            stats = self._labels.get(profile.label)
+            if stats is None:
+                if len(self._labels) >= max_entries:
+                    return
+                stats = self._labels[profile.label] = {
+                    "label": profile.label,
+                    "kind": profile.kind,
+                    "samples": 0,
+                    "total_queries": 0,
+                    "max_queries": 0,
+                    "total_db_time_ms": 0.0,
+                    "total_duration_ms": 0.0,
+                    "cache_hits": 0,
+                    "cache_misses": 0,
+                    "peak_memory_kb": 0.0,
+                    "n_plus_one_samples": 0,
+                    "budget": profile.budget,
+                    "budget_violations": 0,
+                }
+            stats["samples"] += 1
+            stats["total_queries"] += profile.queries
+            stats["max_queries"] = max(stats["max_queries"], profile.queries)
+            stats["total_db_time_ms"] += profile.db_time_ms
+            stats["total_duration_ms"] += profile.duration_ms
+            stats["cache_hits"] += profile.cache_hits
+            stats["cache_misses"] += profile.cache_misses
+            stats["peak_memory_kb"] = max(stats["peak_memory_kb"], profile.peak_memory_kb)
+            stats["budget"] = profile.budget
+            if duplicates:
+                stats["n_plus_one_samples"] += 1
+            if profile.over_budget:
+                stats["budget_violations"] += 1
+
+            for sql, count in profile.fingerprints.items():
+                query = self._queries.get(sql)
+                if query is None:
+                    if len(self._queries) >= max_entries:
+                        continue
+                    query = self._queries[sql] = {
+                        "sql": sql[:1000],
+                        "executions": 0,
+                        "total_time_ms": 0.0,
+                        "max_repeats": 0,
+                        "labels": set(),
+                    }
+                query["executions"] += count
+                query["total_time_ms"] += profile.fingerprint_time.get(sql, 0.0)
+                query["max_repeats"] = max(query["max_repeats"], count)
+                query["labels"].add(profile.label)
+
+    def top_views(self, limit: int = 20, order_by: str = "total_queries") -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = []
+            for stats in self._labels.values():
+                row = dict(stats)
+                samples = row["samples"] or 1
+                row["avg_queries"] = round(row["total_queries"] / samples, 1)
+                row["avg_db_time_ms"] = round(row["total_db_time_ms"] / samples, 2)
+                row["avg_duration_ms"] = round(row["total_duration_ms"] / samples, 2)
+                row["total_db_time_ms"] = round(row["total_db_time_ms"], 2)
+                row["total_duration_ms"] = round(row["total_duration_ms"], 2)
+                rows.append(row)
+        rows.sort(key=lambda row: row.get(order_by, 0), reverse=True)
+        return rows[:limit]
+
+    def top_queries(self, limit: int = 20, order_by: str = "total_time_ms") -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = []
+            for query in self._queries.values():
+                row = dict(query)
+                row["labels"] = sorted(row["labels"])
+                row["total_time_ms"] = round(row["total_time_ms"], 2)
+                rows.append(row)
+        rows.sort(key=lambda row: row.get(order_by, 0), reverse=True)
+        return rows[:limit]
+
+    def snapshot(self, limit: int = 20) -> Dict[str, Any]:
+        return {
+            "enabled": getattr(settings, "PROFILING_ENABLED", False),
+            "sample_rate": getattr(settings, "PROFILING_SAMPLE_RATE", 0.0),
+            "since": self._started_at,
+            "views": self.top_views(limit),
+            "queries": self.top_queries(limit),
+        }
+
+
+# مُجمّع العملية الحالية
+aggregator = ProfileAggregator()
+
+
+@contextmanager
+def profile_block(label: str, kind: str = "request", budget: Optional[int] = None,
+                  trace_memory: Optional[bool] = None, record: bool = True):
+    """
+    قياس كتلة كود: يلف كل اتصالات قاعدة البيانات ويُرجع QueryProfile
+    عند الانتهاء يُضاف للمُجمّع ويُفحص حد الاستعلامات
+    """
+    if budget is None:
+        budget = get_query_budget(label)
+    if trace_memory is None:
+        trace_memory = getattr(settings, "PROFILING_TRACE_MEMORY", False)
+
+    profile = QueryProfile(label=label, kind=kind, budget=budget)
+    token = _active_profile.set(profile)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    if trace_memory:
+        tracemalloc.reset_peak()
+    started = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            stack.enter_context(_cache_instrumentation())
+            recorder = _QueryRecorder(profile)
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            yield profile
+    finally:
+        profile.duration_ms = (time.perf_counter() - started) * 1000
+        if trace_memory:
+            profile.peak_memory_kb = tracemalloc.get_traced_memory()[1] / 1024
+        if started_tracing:
+            tracemalloc.stop()
+        _active_profile.reset(token)
+
+    if record:
+        aggregator.add(profile)
+    check_budget(profile)
+
+
+def check_budget(profile: QueryProfile) -> None:
+    """تسجيل تحذير (أو رفع استثناء في الاختبارات) عند تجاوز الحد أو اكتشاف N+1"""
+    duplicates = profile.duplicates()
+    if duplicates:
+        worst_sql, worst_count = max(duplicates.items(), key=lambda item: item[1])
+        logger.warning(
+            f"اشتباه N+1 في {profile.label}: استعلام مكرر {worst_count} مرة: {worst_sql[:200]}"
+        )
+    if profile.over_budget:
+        message = (
+            f"تجاوز حد الاستعلامات في {profile.label}: "
+            f"{profile.queries} استعلام (الحد {profile.budget})"
+        )
+        if getattr(settings, "PROFILING_RAISE_ON_BUDGET", False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+@contextmanager
+def query_budget(max_queries: int, label: str = "test"):
+    """
+    مساعد للاختبارات: يفشل إذا تجاوزت الكتلة عدد الاستعلامات المحدد
+
+        with query_budget(10, label="sale_confirm"):
+            service.confirm(sale)
+    """
+    profile = QueryProfile(label=label, budget=max_queries)
+    with ExitStack() as stack:
+        recorder = _QueryRecorder(profile)
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield profile
+    if profile.over_budget:
+        duplicates = profile.duplicates()
+        detail = f" | مكرر: {max(duplicates, key=duplicates.get)[:200]}" if duplicates else ""
+        raise QueryBudgetExceeded(
+            f"{label}: {profile.queries} استعلام (الحد {max_queries}){detail}"
+        )
+
+
+# ==================== Celery ====================
+
+_task_profiles: Dict[str, ExitStack] = {}
+
+
+def _on_task_prerun(task_id=None, task=None, **kwargs):
+    name = getattr(task, "name", "unknown")
+    if not should_sample() and not get_query_budget(name):
+        return
+    stack = ExitStack()
+    try:
+        stack.enter_context(profile_block(name, kind="task"))
+    except Exception as e:
+        logger.error(f"تعذر بدء قياس المهمة {name}: {e}")
+        return
+    _task_profiles[task_id] = stack
+
+
+def _on_task_postrun(task_id=None, **kwargs):
+    stack = _task_profiles.pop(task_id, None)
+    if stack is None:
+        return
+    try:
+        stack.close()
+    except QueryBudgetExceeded:
+        raise
+    except Exception as e:
+        logger.error(f"تعذر إنهاء قياس المهمة {task_id}: {e}")
+
+
+def connect_celery_signals() -> None:
+    """ربط القياس بإشارات Celery (task_prerun / task_postrun)"""
+    try:
+        from celery.signals import task_postrun, task_prerun
+    except ImportError:
+        return
+    task_prerun.connect(_on_task_prerun, weak=False, dispatch_uid="query_profiler_prerun")
+    task_postrun.connect(_on_task_postrun, weak=False, dispatch_uid="query_profiler_postrun")
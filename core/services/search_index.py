@@ -0,0 +1,412 @@
+"""
+فهرس البحث الموحد للمنتجات والعملاء والموردين
+Arabic-aware search index (typeahead / select2 / invoice entry)
+
+- تطبيع النص العربي: توحيد الألف والهمزات والتاء المربوطة والياء/الألف المقصورة،
+  حذف التشكيل والتطويل، وتحويل الأرقام العربية الهندية إلى لاتينية
+- كلمات مطبّعة في SearchToken يُبحث فيها بالبادئة (استعلام على فهرس بدلاً من LIKE '%..%' على الجدول)
+- الأكواد والباركود تُخزن كاملة بدون فواصل للمطابقة التامة السريعة، ويُبحث في أجزائها
+  (جزء من رقم هاتف أو كود) بـ LIKE على جدول الأكواد فقط
+- ترتيب النتائج ومطابقة الأخطاء الإملائية عبر RapidFuzz
+- يُحدّث تلقائياً عند الحفظ والحذف (core/signals.py)، ويعاد بناؤه عبر أمر rebuild_search_index
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+
+try:
+    from rapidfuzz import fuzz, process
+except ImportError:  # pragma: no cover - RapidFuzz مثبت ضمن requirements
+    fuzz = process = None
+
+logger = logging.getLogger(__name__)
+
+_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_SEPARATORS = re.compile(r"[\W_]+")
+_LETTER_FOLDS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ة": "ه",
+    "ى": "ي", "ئ": "ي",
+    "ؤ": "و",
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+})
+
+MAX_TOKEN_LENGTH = 64
+
+
+def normalize_text(text) -> str:
+    """تطبيع النص للفهرسة والبحث (نفس الدالة للطرفين)"""
+    if not text:
+        return ""
+    text = _DIACRITICS.sub("", str(text)).translate(_LETTER_FOLDS).casefold()
+    return " ".join(_SEPARATORS.sub(" ", text).split())
+
+
+def normalize_code(code) -> str:
+    """تطبيع الكود/الباركود: نفس التطبيع بدون مسافات أو فواصل"""
+    return normalize_text(code).replace(" ", "")
+
+
+def tokenize(text) -> Set[str]:
+    """كلمات النص المطبّعة مع نسخة بدون (ال) التعريف للكلمات العربية"""
+    tokens = set()
+    for word in normalize_text(text).split():
+        word = word[:MAX_TOKEN_LENGTH]
+        tokens.add(word)
+        if word.startswith("ال") and len(word) > 4:
+            tokens.add(word[2:])
+    return tokens
+
+
+@dataclass(frozen=True)
+class SearchEntity:
+    """تعريف كيان قابل للبحث"""
+
+    name: str
+    model_label: str
+    title_fields: Tuple[str, ...]
+    text_fields: Tuple[str, ...] = ()
+    code_fields: Tuple[str, ...] = ()
+    extra_codes: Optional[Callable] = None
+    label: Optional[Callable] = None
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def display(self, obj) -> str:
+        if self.label:
+            return self.label(obj)
+        return str(getattr(obj, self.title_fields[0], "") or obj)
+
+
+def _product_variant_codes(product) -> List[str]:
+    codes = []
+    for variant in product.variants.all():
+        codes.extend([variant.sku, variant.barcode])
+    return codes
+
+
+ENTITIES: Dict[str, SearchEntity] = {
+    "product": SearchEntity(
+        name="product",
+        model_label="product.Product",
+        title_fields=("name", "name_en"),
+        text_fields=("description", "description_en"),
+        code_fields=("sku", "barcode"),
+        extra_codes=_product_variant_codes,
+        label=lambda p: f"{p.name} ({p.sku})" if p.sku else p.name,
+    ),
+    "customer": SearchEntity(
+        name="customer",
+        model_label="client.Customer",
+        title_fields=("name", "company_name"),
+        text_fields=("contact_person",),
+        code_fields=("code", "phone", "phone_primary", "phone_secondary"),
+        label=lambda c: f"{c.name} - {c.code}" if getattr(c, "code", None) else c.name,
+    ),
+    "supplier": SearchEntity(
+        name="supplier",
+        model_label="supplier.Supplier",
+        title_fields=("name",),
+        text_fields=("contact_person",),
+        code_fields=("code", "phone", "secondary_phone", "tax_number", "national_id", "commercial_registry"),
+        label=lambda s: f"{s.name} - {s.code}" if getattr(s, "code", None) else s.name,
+    ),
+}
+
+
+@dataclass
+class SearchResult:
+    """نتيجة بحث مرتبة: معرفات الصفحة المطلوبة وإجمالي المطابقات"""
+
+    ids: List[int]
+    total: int
+    offset: int = 0
+
+    @property
+    def has_more(self) -> bool:
+        return self.offset + len(self.ids) < self.total
+
+
+class SearchIndexService:
+    """
+    خدمة فهرسة البحث والاستعلام منه
+    """
+
+    BUILT_CACHE_KEY = "search_index_built_{}"
+
+    @classmethod
+    def is_enabled(cls) -> bool:
+        return getattr(settings, "SEARCH_INDEX_ENABLED", True)
+
+    @classmethod
+    def get_entity(cls, entity_name: str) -> SearchEntity:
+        try:
+            return ENTITIES[entity_name]
+        except KeyError:
+            raise ValueError(f"كيان بحث غير معروف: {entity_name}")
+
+    @classmethod
+    def entity_for_model(cls, model) -> Optional[SearchEntity]:
+        label = model._meta.label
+        for entity in ENTITIES.values():
+            if entity.model_label == label:
+                return entity
+        return None
+
+    # ==================== الفهرسة ====================
+
+    @classmethod
+    def build_document(cls, entity: SearchEntity, obj) -> Dict:
+        """النص المطبّع والكلمات والأكواد لسجل واحد"""
+        titles = [getattr(obj, f, None) or "" for f in entity.title_fields]
+        texts = [getattr(obj, f, None) or "" for f in entity.text_fields]
+        codes = [getattr(obj, f, None) or "" for f in entity.code_fields]
+        if entity.extra_codes:
+            codes.extend(entity.extra_codes(obj))
+        codes = [c for c in codes if c]
+
+        words = set()
+        for value in (*titles, *texts, *codes):
+            words |= tokenize(value)
+        return {
+            "title": normalize_text(" ".join(t for t in titles if t))[:255],
+            "document": normalize_text(" ".join(v for v in (*titles, *texts, *codes) if v)),
+            "words": words,
+            "codes": {normalize_code(c)[:MAX_TOKEN_LENGTH] for c in codes} - {""},
+            "is_active": getattr(obj, "is_active", True) is not False,
+        }
+
+    @classmethod
+    def index_object(cls, entity_name: str, obj) -> None:
+        """فهرسة (أو إعادة فهرسة) سجل واحد"""
+        from core.models import SearchIndexEntry, SearchToken
+
+        entity = cls.get_entity(entity_name)
+        try:
+            doc = cls.build_document(entity, obj)
+            with transaction.atomic():
+                entry, _ = SearchIndexEntry.objects.update_or_create(
+                    entity=entity.name,
+                    object_id=obj.pk,
+                    defaults={"title": doc["title"], "document": doc["document"], "is_active": doc["is_active"]},
+                )
+                SearchToken.objects.filter(entry=entry).delete()
+                SearchToken.objects.bulk_create(cls._tokens(entity.name, entry, doc))
+        except Exception as e:
+            logger.error(f"خطأ في فهرسة {entity_name}#{obj.pk}: {e}")
+
+    @classmethod
+    def remove_object(cls, entity_name: str, object_id: int) -> None:
+        from core.models import SearchIndexEntry
+
+        SearchIndexEntry.objects.filter(entity=entity_name, object_id=object_id).delete()
+
+    @classmethod
+    def rebuild(cls, entity_name: str, batch_size: int = 1000) -> int:
+        """إعادة بناء فهرس كيان بالكامل على دفعات"""
+        from core.models import SearchIndexEntry
+
+        entity = cls.get_entity(entity_name)
+        queryset = entity.model.objects.order_by("pk")
+        if entity.extra_codes:
+            queryset = queryset.prefetch_related("variants")
+        count = 0
+        with transaction.atomic():
+            SearchIndexEntry.objects.filter(entity=entity.name).delete()
+            batch = []
+            for obj in queryset.iterator(chunk_size=batch_size):
+                batch.append((obj.pk, cls.build_document(entity, obj)))
+                if len(batch) >= batch_size:
+                    count += cls._bulk_write(entity.name, batch)
+                    batch = []
+            if batch:
+                count += cls._bulk_write(entity.name, batch)
+        cache.set(cls.BUILT_CACHE_KEY.format(entity.name), True, None)
+        return count
+
+    @classmethod
+    def ensure_built(cls, entity_name: str) -> None:
+        """بناء الفهرس عند أول استخدام إذا كان فارغاً والجدول به بيانات"""
+        from core.models import SearchIndexEntry
+
+        key = cls.BUILT_CACHE_KEY.format(entity_name)
+        if cache.get(key):
+            return
+        entity = cls.get_entity(entity_name)
+        if not SearchIndexEntry.objects.filter(entity=entity_name).exists() and entity.model.objects.exists():
+            cls.rebuild(entity_name)
+        cache.set(key, True, None)
+
+    # ==================== البحث ====================
+
+    @classmethod
+    def search(
+        cls,
+        entity_name: str,
+        query: str,
+        limit: Optional[int] = 20,
+        offset: int = 0,
+        queryset=None,
+        fuzzy: bool = True,
+    ) -> SearchResult:
+        """
+        بحث مرتب: مطابقة الكود/الباركود التامة أولاً، ثم بادئة الاسم، ثم الكلمات، ثم المطابقة التقريبية
+        :param queryset: تقييد النتائج (مثلاً المنتجات النشطة من نوع معين)
+        :param limit: None لإرجاع كل المطابقات (صفحات القوائم)
+        """
+        entity = cls.get_entity(entity_name)
+        normalized = normalize_text(query)
+        if not normalized:
+            return SearchResult(ids=[], total=0, offset=offset)
+
+        if not cls.is_enabled():
+            ranked = cls._fallback_search(entity, query, queryset)
+        else:
+            cls.ensure_built(entity_name)
+            ranked = cls._ranked_ids(entity, normalized, normalize_code(query), queryset, fuzzy)
+
+        page = ranked[offset:offset + limit] if limit is not None else ranked[offset:]
+        return SearchResult(ids=page, total=len(ranked), offset=offset)
+
+    @classmethod
+    def search_ids(cls, entity_name: str, query: str, queryset=None) -> List[int]:
+        """كل معرفات المطابقات مرتبة (لتصفية QuerySet في صفحات القوائم)"""
+        return cls.search(entity_name, query, limit=None, queryset=queryset, fuzzy=False).ids
+
+    @classmethod
+    def _ranked_ids(cls, entity: SearchEntity, normalized: str, code: str, queryset, fuzzy: bool) -> List[int]:
+        from core.models import SearchIndexEntry, SearchToken
+
+        tokens = SearchToken.objects.filter(entity=entity.name)
+        code_tokens = tokens.filter(kind=SearchToken.KIND_CODE)
+        entries_qs = SearchIndexEntry.objects.filter(entity=entity.name)
+        if queryset is not None:
+            entries_qs = entries_qs.filter(object_id__in=queryset.values("pk"))
+
+        exact_entries = set(
+            entries_qs.filter(id__in=code_tokens.filter(token=code).values("entry_id")).values_list("id", flat=True)
+        ) if code else set()
+
+        # كل كلمة في الاستعلام يجب أن تطابق بادئة كلمة في السجل: التقاطع داخل قاعدة البيانات بدون حد للمرشحين
+        word_match = Q()
+        for word in set(normalized.split()):
+            word_match &= Q(id__in=tokens.filter(token__startswith=word[:MAX_TOKEN_LENGTH]).values("entry_id"))
+        match = word_match
+        # جزء من كود/هاتف (مثل icontains السابق): LIKE على جدول الأكواد المطبّعة فقط
+        if code and len(code) >= getattr(settings, "SEARCH_CODE_SUBSTRING_MIN_LENGTH", 3):
+            match |= Q(id__in=code_tokens.filter(token__contains=code).values("entry_id"))
+        if exact_entries:
+            match |= Q(id__in=exact_entries)
+
+        entries = {
+            entry_id: (object_id, title, document)
+            for entry_id, object_id, title, document in entries_qs.filter(match).values_list(
+                "id", "object_id", "title", "document"
+            )
+        }
+        candidates = set(entries)
+
+        # مطابقة تقريبية للأخطاء الإملائية من مجموعة محدودة تشترك في أول حرفين
+        if fuzzy and process is not None and len(normalized) >= 3:
+            prefix_q = Q()
+            for word in normalized.split():
+                prefix_q |= Q(token__startswith=word[:2])
+            cap = getattr(settings, "SEARCH_CANDIDATE_LIMIT", 2000)
+            fuzzy_pool = (
+                entries_qs.filter(id__in=tokens.filter(prefix_q).values("entry_id"))
+                .exclude(match)
+                .values_list("id", "object_id", "title", "document")[:cap]
+            )
+            for entry_id, object_id, title, document in fuzzy_pool:
+                entries[entry_id] = (object_id, title, document)
+
+        scored = []
+        cutoff = getattr(settings, "SEARCH_FUZZY_CUTOFF", 70)
+        for entry_id, (object_id, title, document) in entries.items():
+            if entry_id in exact_entries:
+                tier = 4
+            elif title.startswith(normalized):
+                tier = 3
+            elif entry_id in candidates:
+                tier = 2 if normalized in document else 1
+            else:
+                tier = 0
+            similarity = cls._similarity(normalized, title)
+            if tier == 0 and similarity < cutoff:
+                continue
+            scored.append((-tier, -similarity, title, object_id))
+        scored.sort()
+        return [object_id for _, _, _, object_id in scored]
+
+    @staticmethod
+    def _similarity(normalized: str, title: str) -> float:
+        """
+        درجة التشابه: الأعلى بين مقارنة النص كاملاً ومتوسط أفضل تطابق لكل كلمة
+        (خطأ إملائي في كلمة واحدة من اسم طويل لا يُسقط النتيجة)
+        """
+        if fuzz is None or not title:
+            return 0
+        title_words = title.split()
+        words = normalized.split()
+        per_word = sum(process.extractOne(w, title_words, scorer=fuzz.ratio)[1] for w in words) / len(words)
+        return max(fuzz.WRatio(normalized, title), per_word)
+
+    @classmethod
+    def _fallback_search(cls, entity: SearchEntity, query: str, queryset) -> List[int]:
+        """البحث المباشر في الجدول عند تعطيل الفهرس (SEARCH_INDEX_ENABLED=False)"""
+        condition = Q()
+        for field_name in (*entity.title_fields, *entity.text_fields, *entity.code_fields):
+            condition |= Q(**{f"{field_name}__icontains": query})
+        base = queryset if queryset is not None else entity.model.objects.all()
+        return list(base.filter(condition).order_by(entity.title_fields[0]).values_list("pk", flat=True))
+
+    # ==================== داخلي ====================
+
+    @staticmethod
+    def _tokens(entity_name: str, entry, doc: Dict) -> List:
+        from core.models import SearchToken
+
+        return [
+            SearchToken(entry=entry, entity=entity_name, kind=SearchToken.KIND_WORD, token=word)
+            for word in doc["words"]
+        ] + [
+            SearchToken(entry=entry, entity=entity_name, kind=SearchToken.KIND_CODE, token=code)
+            for code in doc["codes"]
+        ]
+
+    @classmethod
+    def _bulk_write(cls, entity_name: str, batch: Iterable[Tuple[int, Dict]]) -> int:
+        from core.models import SearchIndexEntry, SearchToken
+
+        batch = list(batch)
+        entries = SearchIndexEntry.objects.bulk_create([
+            SearchIndexEntry(
+                entity=entity_name, object_id=pk,
+                title=doc["title"], document=doc["document"], is_active=doc["is_active"],
+            )
+            for pk, doc in batch
+        ])
+        if any(entry.pk is None for entry in entries):
+            # قواعد بيانات لا تُرجع المعرفات من bulk_create
+            ids = dict(
+                SearchIndexEntry.objects.filter(entity=entity_name, object_id__in=[pk for pk, _ in batch])
+                .values_list("object_id", "id")
+            )
+            for entry in entries:
+                entry.pk = entry.id = ids[entry.object_id]
+        tokens = []
+        for entry, (_, doc) in zip(entries, batch):
+            tokens.extend(cls._tokens(entity_name, entry, doc))
+        SearchToken.objects.bulk_create(tokens, batch_size=5000)
+        return len(entries)
@@ -51,6 +51,10 @@ def clear_module_cache_on_save(sender, instance, **kwargs):
             # LocMemCache لا يدعم delete_pattern
             pass
         
+        # إعادة تحميل حالة التطبيقات في كل العمليات
+        from core.services.feature_flag_store import feature_flag_store
+        feature_flag_store.invalidate()
+        
         logger.info(f"Cache cleared for module: {instance.code}")
     except Exception as e:
         logger.error(f"Error clearing cache for module {instance.code}: {str(e)}")
@@ -71,6 +75,9 @@ def clear_module_cache_on_delete(sender, instance, **kwargs):
         except AttributeError:
             pass
         
+        from core.services.feature_flag_store import feature_flag_store
+        feature_flag_store.invalidate()
+        
         logger.info(f"Cache cleared after deleting module: {instance.code}")
     except Exception as e:
         logger.error(f"Error clearing cache after deleting module {instance.code}: {str(e)}")
@@ -90,3 +97,49 @@ def auto_init_system_modules(sender, **kwargs):
         except Exception as e:
             logger.error(f"Error auto initializing system modules: {str(e)}")
 
+
+
+# ============================================================
+# SEARCH INDEX SIGNALS
+# ============================================================
+
+@receiver(post_save, sender='product.Product')
+@receiver(post_save, sender='client.Customer')
+@receiver(post_save, sender='supplier.Supplier')
+def update_search_index_on_save(sender, instance, raw=False, **kwargs):
+    """
+    تحديث فهرس البحث للسجل المحفوظ فقط (بدون إعادة بناء)
+    """
+    from core.services.search_index import SearchIndexService
+
+    entity = SearchIndexService.entity_for_model(sender)
+    if raw or entity is None or not SearchIndexService.is_enabled():
+        return
+    SearchIndexService.index_object(entity.name, instance)
+
+
+@receiver(post_delete, sender='product.Product')
+@receiver(post_delete, sender='client.Customer')
+@receiver(post_delete, sender='supplier.Supplier')
+def remove_from_search_index(sender, instance, **kwargs):
+    from core.services.search_index import SearchIndexService
+
+    entity = SearchIndexService.entity_for_model(sender)
+    if entity is not None:
+        SearchIndexService.remove_object(entity.name, instance.pk)
+
+
+@receiver(post_save, sender='product.ProductVariant')
+@receiver(post_delete, sender='product.ProductVariant')
+def update_product_search_codes(sender, instance, raw=False, **kwargs):
+    """
+    باركود وأكواد المتغيرات جزء من فهرس المنتج الأب
+    """
+    from core.services.search_index import SearchIndexService
+    from product.models import Product
+
+    if raw or not SearchIndexService.is_enabled():
+        return
+    product = Product.objects.filter(pk=instance.product_id).first()
+    if product is not None:
+        SearchIndexService.index_object("product", product)
@@ -0,0 +1,102 @@
+"""
+اختبارات تنظيف البيانات المنتهية على دفعات (keyset) مع الأرشفة المضغوطة
+"""
+import gzip
+import json
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from client.models import Customer, CustomerTransaction
+from core.services.data_retention_service import DataRetentionService, RetentionPolicy
+
+
+class DataRetentionBatchTest(TestCase):
+    """اختبارات المعالجة الجماعية: أرشفة وإخفاء هوية وحذف بعبارة واحدة لكل دفعة"""
+
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            DATA_RETENTION_ARCHIVE_DIR=self.archive_dir,
+            DATA_RETENTION_BATCH_SIZE=2,
+            DATA_RETENTION_BATCH_PAUSE=0,
+            DATA_RETENTION_ARCHIVE_FORMAT="jsonl",
+        )
+        self.settings_override.enable()
+
+        old = timezone.now() - timedelta(days=400)
+        self.expired = []
+        for index in range(5):
+            customer = Customer.objects.create(
+                name=f"عميل قديم {index}", code=f"RET-{index}", email=f"old{index}@example.org", is_active=False
+            )
+            self.expired.append(customer)
+        Customer.objects.filter(pk__in=[c.pk for c in self.expired]).update(created_at=old)
+
+        self.active = Customer.objects.create(name="عميل نشط", code="RET-ACTIVE", is_active=True)
+        Customer.objects.filter(pk=self.active.pk).update(created_at=old)
+        self.recent = Customer.objects.create(name="عميل حديث", code="RET-RECENT", is_active=False)
+
+        self.service = DataRetentionService()
+        self.policy = RetentionPolicy(
+            model_name="client.Customer",
+            retention_days=365,
+            archive_before_delete=True,
+            anonymize_before_delete=True,
+            conditions={"is_active": False},
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.archive_dir, ignore_errors=True)
+
+    def _archive_records(self, path):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_expired_rows_archived_and_deleted_in_keyset_batches(self):
+        result = self.service._process_retention_policy(self.policy, dry_run=False)
+
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(result["deleted_count"], 5)
+        self.assertEqual(result["archived_count"], 5)
+        self.assertFalse(Customer.objects.filter(pk__in=[c.pk for c in self.expired]).exists())
+        self.assertEqual(Customer.objects.filter(pk__in=[self.active.pk, self.recent.pk]).count(), 2)
+
+        archive_path = Path(result["archive_path"])
+        self.assertTrue(archive_path.name.endswith(".jsonl.gz"))
+        records = self._archive_records(archive_path)
+        self.assertEqual(sorted(r["pk"] for r in records), sorted(c.pk for c in self.expired))
+        # الأرشيف يحتفظ بالبيانات الأصلية قبل إخفاء الهوية
+        self.assertEqual(
+            {r["data"]["email"] for r in records}, {f"old{index}@example.org" for index in range(5)}
+        )
+
+    def test_protected_rows_are_anonymized_but_kept(self):
+        protected = self.expired[0]
+        CustomerTransaction.objects.create(
+            customer=protected,
+            transaction_type="INVOICE",
+            transaction_number="INV-RET-1",
+            issue_date=date(2024, 1, 1),
+            due_date=date(2024, 2, 1),
+            functional_amount=Decimal("100.00"),
+            open_amount=Decimal("100.00"),
+        )
+
+        result = self.service._process_retention_policy(self.policy, dry_run=False)
+
+        self.assertEqual(result["deleted_count"], 4)
+        self.assertEqual(result["archived_count"], 4)
+        protected.refresh_from_db()
+        self.assertEqual(protected.email, f"anonymized_{protected.pk}@example.com")
+
+    def test_dry_run_only_counts(self):
+        result = self.service._process_retention_policy(self.policy, dry_run=True)
+        self.assertEqual(result["deleted_count"], 5)
+        self.assertEqual(Customer.objects.filter(code__startswith="RET-").count(), 7)
@@ -0,0 +1,128 @@
+"""
+اختبارات مخزن مفاتيح التشغيل الموحد وانتقال التغييرات بين العمليات
+"""
+import threading
+
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, override_settings
+
+from core.models import FeatureFlag, SystemModule
+from core.services.feature_flag_store import FeatureFlagStore, feature_flag_store
+from governance.services.governance_switchboard import GovernanceSwitchboard
+from governance.services.signal_router import SignalRouter
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'feature-flag-tests',
+    }
+}
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHE,
+    FEATURE_FLAG_STORE_ENABLED=True,
+    FEATURE_FLAG_REFRESH_SECONDS=0,
+)
+class FeatureFlagStoreTest(TestCase):
+    """اختبارات الحفظ والتحديث حسب رقم الإصدار"""
+
+    def setUp(self):
+        cache.clear()
+        feature_flag_store.invalidate()
+
+    def tearDown(self):
+        feature_flag_store.invalidate()
+
+    def _other_worker_sets(self, key, enabled):
+        """محاكاة تعديل من عملية أخرى: حفظ في قاعدة البيانات وتغيير رقم الإصدار"""
+        FeatureFlag.objects.update_or_create(
+            key=key, defaults={'flag_type': 'emergency', 'enabled': enabled}
+        )
+        FeatureFlagStore()._bump_version()
+
+    def test_set_flag_persists_and_publishes(self):
+        store = FeatureFlagStore()
+        self.assertTrue(store.get('workflow_demo', True))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            store.set_flag('workflow_demo', False, 'workflow', reason='اختبار')
+
+        self.assertFalse(store.get('workflow_demo', True))
+        self.assertFalse(FeatureFlag.objects.get(key='workflow_demo').enabled)
+        # عملية جديدة تقرأ القيمة من قاعدة البيانات
+        self.assertFalse(FeatureFlagStore().get('workflow_demo', True))
+
+    def test_change_in_other_worker_propagates(self):
+        store = FeatureFlagStore()
+        self.assertFalse(store.get('emergency_demo', False))
+
+        self._other_worker_sets('emergency_demo', True)
+        self.assertTrue(store.get('emergency_demo', False))
+
+    def test_survives_cache_eviction(self):
+        self._other_worker_sets('emergency_demo', True)
+        cache.clear()
+        self.assertTrue(FeatureFlagStore().get('emergency_demo', False))
+
+    def test_no_reload_without_version_change(self):
+        store = FeatureFlagStore()
+        generation = store.version()
+        FeatureFlag.objects.create(key='component_silent', flag_type='component', enabled=False)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(store.get('component_silent', True))
+        self.assertEqual(store.version(), generation)
+
+    def test_module_states_follow_system_module(self):
+        module = SystemModule.objects.create(code='demo_module', name_ar='تجريبي', name_en='Demo')
+        self.assertTrue(feature_flag_store.is_module_enabled('demo_module'))
+
+        module.is_enabled = False
+        module.save()
+        self.assertFalse(feature_flag_store.is_module_enabled('demo_module'))
+        self.assertFalse(feature_flag_store.is_module_enabled('unknown_module'))
+
+    def test_switchboard_picks_up_emergency_from_other_worker(self):
+        switchboard = GovernanceSwitchboard(enable_audit=False)
+        self.assertTrue(switchboard.is_workflow_enabled('customer_payment_to_journal_entry'))
+
+        self._other_worker_sets('emergency_emergency_disable_all_governance', True)
+        self.assertTrue(switchboard.is_emergency_flag_active('emergency_disable_all_governance'))
+        self.assertFalse(switchboard.is_workflow_enabled('customer_payment_to_journal_entry'))
+
+    def test_switchboard_keeps_uncommitted_changes_when_another_thread_reloads(self):
+        switchboard = GovernanceSwitchboard(enable_audit=False)
+        self.assertTrue(switchboard.is_workflow_enabled('customer_payment_to_journal_entry'))
+
+        # التفعيل داخل معاملة الطلب (ATOMIC_REQUESTS) قبل الـ commit
+        switchboard.activate_emergency_flag('emergency_disable_all_governance', 'اختبار')
+        FeatureFlagStore()._bump_version()
+
+        def reload():
+            # خيط آخر في نفس العملية يعيد التحميل من اتصال لا يرى المعاملة الجارية
+            try:
+                feature_flag_store._ensure_fresh()
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=reload)
+        thread.start()
+        thread.join()
+
+        self.assertTrue(switchboard.is_emergency_flag_active('emergency_disable_all_governance'))
+        self.assertFalse(switchboard.is_workflow_enabled('customer_payment_to_journal_entry'))
+
+    def test_signal_router_persisted_and_temporary_switches(self):
+        router = SignalRouter(enable_audit=False, persist_flags=True)
+        other_worker = SignalRouter(enable_audit=False, persist_flags=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            router.disable_signal('demo_signal', 'صيانة', persist=True)
+        self.assertFalse(other_worker.is_signal_enabled('demo_signal'))
+
+        # التعطيل المؤقت يبقى محلياً للعملية
+        router.disable_global_signals('مؤقت')
+        self.assertFalse(router.global_enabled)
+        self.assertTrue(other_worker.global_enabled)
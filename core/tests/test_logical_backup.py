@@ -0,0 +1,139 @@
+"""
+اختبارات النسخ الاحتياطي المنطقي المتدفق (NDJSON / msgpack) والنسخ التزايدي
+"""
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.services.backup_service import BackupService
+from core.services.logical_backup import LogicalBackupEngine
+from product.models import Category, Product, Unit
+
+User = get_user_model()
+
+
+class LogicalBackupEngineTest(TestCase):
+    """اختبارات التفريغ على دفعات والاستعادة المتدفقة"""
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.models = [Category, Unit, Product]
+        user = User.objects.create_user(username="logical_backup_user", password="password123")
+        self.category = Category.objects.create(name="أدوات", code="TOOLS")
+        self.unit = Unit.objects.create(name="قطعة", symbol="PC")
+        self.products = [
+            Product.objects.create(
+                name=f"منتج {index}",
+                sku=f"LB-{index:03d}",
+                category=self.category,
+                unit=self.unit,
+                cost_price=Decimal("10.55") * index,
+                selling_price=Decimal("20.10") * index,
+                created_by=user,
+            )
+            for index in range(1, 6)
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _roundtrip(self, encoding):
+        path = self.tmp_dir / f"db.{encoding}.gz"
+        engine = LogicalBackupEngine(encoding=encoding, chunk_size=2)
+        result = engine.dump(path, model_list=self.models)
+        self.assertEqual(result["tables"], 3)
+        self.assertEqual(result["rows"], 7)
+        self.assertEqual(result["size_bytes"], path.stat().st_size)
+        self.assertTrue(LogicalBackupEngine.is_logical_backup(path))
+
+        Product.objects.all().delete()
+        Category.objects.all().delete()
+        Unit.objects.all().delete()
+
+        restored = engine.restore(path)
+        self.assertEqual(restored["tables"]["product.product"], 5)
+        self.assertEqual(Product.objects.count(), 5)
+        product = Product.objects.get(sku="LB-003")
+        self.assertEqual(product.cost_price, Decimal("31.65"))
+        self.assertEqual(product.category_id, self.category.pk)
+        self.assertEqual(Unit.objects.get(pk=self.unit.pk).symbol, "PC")
+
+    def test_ndjson_roundtrip_in_chunks(self):
+        self._roundtrip("ndjson")
+
+    def test_msgpack_roundtrip_in_chunks(self):
+        self._roundtrip("msgpack")
+
+    def test_incremental_dump_keeps_only_changed_rows(self):
+        since = timezone.now() + timedelta(seconds=1)
+        Product.objects.filter(pk=self.products[1].pk).update(
+            selling_price=Decimal("99.00"), updated_at=since + timedelta(seconds=1)
+        )
+
+        path = self.tmp_dir / "incremental.ndjson.gz"
+        engine = LogicalBackupEngine(encoding="ndjson")
+        result = engine.dump(path, since=since, model_list=[Product])
+        self.assertEqual(result["rows"], 1)
+
+        chunks = [record for record in engine._iter_records(path) if "r" in record]
+        self.assertEqual(len(chunks), 1)
+        pk_index = chunks[0]["c"].index("id")
+        self.assertEqual(chunks[0]["r"][0][pk_index], self.products[1].pk)
+
+        # الاستعادة التزايدية تستبدل الصف المعدل فقط
+        Product.objects.filter(pk=self.products[1].pk).update(selling_price=Decimal("1.00"))
+        engine.restore(path)
+        self.assertEqual(Product.objects.get(pk=self.products[1].pk).selling_price, Decimal("99.00"))
+        self.assertEqual(Product.objects.count(), 5)
+
+    def test_legacy_json_is_not_detected_as_logical(self):
+        path = self.tmp_dir / "legacy.json"
+        path.write_text('[{"model": "product.unit", "pk": 1, "fields": {}}]', encoding="utf-8")
+        self.assertFalse(LogicalBackupEngine.is_logical_backup(path))
+
+
+class IncrementalBackupSinceTest(TestCase):
+    """نقطة بداية النسخة التزايدية من بيان آخر نسخة قاعدة بيانات وليس من أحدث ملف"""
+
+    def setUp(self):
+        self.tmp_dir = Path(tempfile.mkdtemp())
+        self.override = override_settings(BACKUP_LOCAL_DIR=self.tmp_dir)
+        self.override.enable()
+        self.service = BackupService()
+
+    def tearDown(self):
+        self.override.disable()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _db_backup(self, backup_id, started_at, backup_type="database"):
+        filename = f"db_sqlite_{backup_id}.db.gz"
+        (self.tmp_dir / filename).write_bytes(b"x")
+        self.service._write_manifest(backup_id, backup_type, started_at, {"filename": filename})
+
+    def test_since_defaults_to_last_database_backup_start(self):
+        started = timezone.now() - timedelta(hours=3)
+        self._db_backup("backup_20260101_000000", started - timedelta(days=1))
+        self._db_backup("backup_20260102_000000", started, backup_type="incremental")
+        # ملف وسائط أحدث لا يؤثر على نقطة البداية
+        (self.tmp_dir / "media_backup_20260103_000000.tar.gz").write_bytes(b"x")
+        # نسخة حُذف ملفها لا تُحتسب
+        self.service._write_manifest(
+            "backup_20260104_000000", "database", timezone.now(), {"filename": "db_missing.db.gz"}
+        )
+
+        with mock.patch.object(BackupService, "_create_logical_backup", return_value={"size_bytes": 0}) as dump:
+            self.service._create_incremental_backup("backup_20260105_000000", None)
+        self.assertEqual(dump.call_args.kwargs["since"], started)
+
+    def test_first_incremental_without_manifest_is_complete(self):
+        (self.tmp_dir / "media_backup_20260103_000000.tar.gz").write_bytes(b"x")
+        with mock.patch.object(BackupService, "_create_logical_backup", return_value={"size_bytes": 0}) as dump:
+            self.service._create_incremental_backup("backup_20260105_000000", None)
+        self.assertIsNone(dump.call_args.kwargs["since"])
@@ -0,0 +1,149 @@
+"""
+اختبارات قياس الاستعلامات وحدود الاستعلامات وكشف N+1
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase, override_settings
+
+from client.models import Customer
+from core.services.query_profiler import (
+    QueryBudgetExceeded,
+    aggregator,
+    fingerprint_sql,
+    profile_block,
+    query_budget,
+)
+
+User = get_user_model()
+
+
+class ClientAwareCache(LocMemCache):
+    """كاش اختبار بمعامل إضافي في get() مثل client في django-redis"""
+
+    clients = []
+
+    def get(self, key, default=None, version=None, client=None):
+        self.clients.append(client)
+        return super().get(key, default, version)
+
+
+class FingerprintTest(TestCase):
+    """اختبارات توحيد بصمة الاستعلام"""
+
+    def test_literals_and_in_lists_are_normalized(self):
+        first = fingerprint_sql("SELECT * FROM t WHERE id = 5 AND name = 'x' AND k IN (%s, %s, %s)")
+        second = fingerprint_sql("SELECT *  FROM t WHERE id = 17 AND name = 'yy' AND k IN (%s)")
+        self.assertEqual(first, second)
+
+
+@override_settings(PROFILING_N_PLUS_ONE_THRESHOLD=3, PROFILING_RAISE_ON_BUDGET=True)
+class ProfileBlockTest(TestCase):
+    """اختبارات قياس كتلة كود وتجميع النتائج"""
+
+    def setUp(self):
+        aggregator.reset()
+        for i in range(4):
+            Customer.objects.create(name=f"عميل قياس {i}", code=f"QP{i:03d}")
+
+    def test_records_queries_and_duplicates(self):
+        with profile_block("tests:n_plus_one") as profile:
+            for customer in Customer.objects.filter(code__startswith="QP"):
+                Customer.objects.get(pk=customer.pk)
+
+        self.assertEqual(profile.queries, 5)
+        self.assertGreaterEqual(profile.db_time_ms, 0)
+        self.assertEqual(list(profile.duplicates().values()), [4])
+
+        views = aggregator.top_views()
+        self.assertEqual(views[0]["label"], "tests:n_plus_one")
+        self.assertEqual(views[0]["n_plus_one_samples"], 1)
+        self.assertEqual(aggregator.top_queries(order_by="executions")[0]["executions"], 4)
+
+    def test_budget_exceeded_raises_in_tests(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with profile_block("tests:budget", budget=2):
+                list(Customer.objects.all())
+                list(Customer.objects.all())
+                list(Customer.objects.all())
+
+    @override_settings(PROFILING_RAISE_ON_BUDGET=False)
+    def test_budget_exceeded_logs_in_production(self):
+        with self.assertLogs("core.services.query_profiler", level="WARNING"):
+            with profile_block("tests:budget", budget=1):
+                list(Customer.objects.all())
+                list(Customer.objects.all())
+        self.assertEqual(aggregator.top_views()[0]["budget_violations"], 1)
+
+    def test_query_budget_helper(self):
+        with query_budget(1):
+            Customer.objects.count()
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(1):
+                Customer.objects.count()
+                Customer.objects.count()
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "core.tests.test_query_profiler.ClientAwareCache", "LOCATION": "query-profiler-tests"},
+})
+class CacheInstrumentationTest(TestCase):
+    """اختبارات عد إصابات الكاش داخل كتلة القياس"""
+
+    def test_counts_hits_and_misses_and_forwards_arguments(self):
+        cache = caches["default"]
+        cache.set("qp:key", "value", version=2)
+        ClientAwareCache.clients.clear()
+
+        with profile_block("tests:cache", record=False) as profile:
+            self.assertEqual(cache.get("qp:key", version=2, client="replica"), "value")
+            self.assertEqual(cache.get("qp:other", "fallback"), "fallback")
+            self.assertIsNone(cache.get("qp:key", None, 3))
+
+        self.assertEqual((profile.cache_hits, profile.cache_misses), (1, 2))
+        self.assertEqual(ClientAwareCache.clients, ["replica", None, None])
+
+    def test_only_the_profiled_instance_is_wrapped(self):
+        cache = caches["default"]
+        with profile_block("tests:cache", record=False):
+            self.assertIn("get", cache.__dict__)
+            self.assertFalse(getattr(ClientAwareCache.get, "_profiled", False))
+        self.assertNotIn("get", cache.__dict__)
+
+
+@override_settings(
+    SECURE_SSL_REDIRECT=False,
+    PROFILING_ENABLED=True,
+    PROFILING_SAMPLE_RATE=1,
+    PROFILING_QUERY_BUDGETS={"core:query_profile_api": 50},
+)
+class QueryProfilingMiddlewareTest(TestCase):
+    """اختبارات Middleware القياس و JSON endpoint"""
+
+    def setUp(self):
+        aggregator.reset()
+        self.user = User.objects.create_superuser(
+            username="profiler", password="profilerpass123", email="profiler@example.com"
+        )
+        self.client.force_login(self.user)
+
+    def test_sampled_request_is_aggregated(self):
+        response = self.client.get("/api/query-profile/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("X-Query-Count", response)
+
+        data = self.client.get("/api/query-profile/").json()
+        labels = [row["label"] for row in data["views"]]
+        self.assertIn("core:query_profile_api", labels)
+        self.assertEqual(data["views"][0]["budget"], 50)
+
+    def test_reset(self):
+        self.client.get("/api/query-profile/")
+        response = self.client.post("/api/query-profile/")
+        self.assertTrue(response.json()["success"])
+        # طلب التصفير نفسه هو العينة الوحيدة المتبقية
+        self.assertEqual([row["samples"] for row in aggregator.top_views()], [1])
+
+    def test_dashboard_renders(self):
+        response = self.client.get("/logs/query-profile/")
+        self.assertEqual(response.status_code, 200)
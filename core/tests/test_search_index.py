@@ -0,0 +1,116 @@
+"""
+اختبارات فهرس البحث العربي والبحث الفوري
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from client.models import Customer
+from core.models import SearchIndexEntry
+from core.services.search_index import SearchIndexService, normalize_text, tokenize
+from product.models import Category, Product, Unit
+
+User = get_user_model()
+
+
+class NormalizationTest(TestCase):
+    """اختبارات تطبيع الحروف العربية"""
+
+    def test_letter_variants_and_diacritics_are_folded(self):
+        self.assertEqual(normalize_text("أَحْمَد"), normalize_text("احمد"))
+        self.assertEqual(normalize_text("إسكندريّة"), "اسكندريه")
+        self.assertEqual(normalize_text("مستشفى"), normalize_text("مستشفي"))
+        self.assertEqual(normalize_text("كـــتاب ١٢٣"), "كتاب 123")
+
+    def test_definite_article_variant_is_indexed(self):
+        self.assertEqual(tokenize("القلم الجاف"), {"القلم", "قلم", "الجاف", "جاف"})
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SearchIndexServiceTest(TestCase):
+    """اختبارات الفهرسة التزايدية والترتيب"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="search_user", password="password")
+        self.category = Category.objects.create(name="أدوات مكتبية")
+        self.unit = Unit.objects.create(name="قطعة")
+        self.pencils = self._product("أقلام رصاص", barcode="6221234567890")
+        self.notebook = self._product("كراسة مسطرة")
+        self.eraser = self._product("ممحاة", name_en="Eraser")
+
+    def _product(self, name, **kwargs):
+        return Product.objects.create(
+            name=name,
+            category=self.category,
+            unit=self.unit,
+            cost_price=Decimal("5.00"),
+            selling_price=Decimal("7.50"),
+            created_by=self.user,
+            **kwargs,
+        )
+
+    def _ids(self, query, **kwargs):
+        return SearchIndexService.search("product", query, **kwargs).ids
+
+    def test_prefix_search_folds_hamza(self):
+        self.assertEqual(self._ids("اقلام"), [self.pencils.id])
+        self.assertEqual(self._ids("إقلا رص"), [self.pencils.id])
+        self.assertEqual(self._ids("eras"), [self.eraser.id])
+
+    def test_barcode_exact_match_and_fuzzy_typo(self):
+        self.assertEqual(self._ids("6221234567890")[0], self.pencils.id)
+        self.assertIn(self.pencils.id, self._ids("رصاض"))
+
+    def test_index_follows_save_and_delete(self):
+        self.notebook.name = "دفتر سلك"
+        self.notebook.save()
+        self.assertEqual(self._ids("كراسه"), [])
+        self.assertEqual(self._ids("دفتر"), [self.notebook.id])
+
+        notebook_id = self.notebook.id
+        self.notebook.delete()
+        self.assertFalse(SearchIndexEntry.objects.filter(entity="product", object_id=notebook_id).exists())
+
+    def test_queryset_restriction_and_pagination(self):
+        extra = [self._product(f"قلم جاف {i}") for i in range(3)]
+        result = SearchIndexService.search(
+            "product", "قلم", limit=2, offset=0, queryset=Product.objects.exclude(pk=extra[0].pk)
+        )
+        self.assertEqual(result.total, 2)
+        self.assertEqual(len(result.ids), 2)
+        self.assertFalse(result.has_more)
+        self.assertNotIn(extra[0].pk, result.ids)
+
+    @override_settings(SEARCH_CANDIDATE_LIMIT=2)
+    def test_matches_are_not_truncated_by_candidate_limit(self):
+        extra = [self._product(f"قلم جاف {i}") for i in range(4)]
+        self.assertEqual(set(SearchIndexService.search_ids("product", "قلم جاف")), {p.id for p in extra})
+
+    def test_phone_and_code_substring_match(self):
+        customer = Customer.objects.create(
+            name="شركة الأمل", code="CUST-SRCH-9", phone="01005551234", created_by=self.user
+        )
+        self.assertEqual(SearchIndexService.search_ids("customer", "5551"), [customer.id])
+        self.assertEqual(SearchIndexService.search_ids("customer", "srch-9"), [customer.id])
+        self.assertIn(self.pencils.id, self._ids("4567890"))
+
+    def test_rebuild_command_and_typeahead_api(self):
+        customer = Customer.objects.create(name="مؤسسة النور", code="CUST-SRCH-1", created_by=self.user)
+        SearchIndexEntry.objects.all().delete()
+
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertTrue(SearchIndexEntry.objects.filter(entity="customer", object_id=customer.id).exists())
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("core:search_typeahead", args=["customer"]), {"term": "موسسه"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([r["id"] for r in data["results"]], [customer.id])
+        self.assertFalse(data["pagination"]["more"])
+
+        response = self.client.get(reverse("core:search_typeahead", args=["unknown"]), {"q": "x"})
+        self.assertEqual(response.status_code, 404)
@@ -6,7 +6,7 @@ from .views import (
     system_reset, notifications_list, notification_settings, whatsapp_settings,
     whatsapp_webhook,
     # Logs views
-    view_error_logs, clear_error_logs,
+    view_error_logs, clear_error_logs, view_query_profile, query_profile_api,
     # Backup views
     backup_management, create_backup, download_backup, restore_backup,
     restore_backup_from_upload,
@@ -17,6 +17,7 @@ from .views.module_management import module_management
 
 from .views import security_views
 from .views.attachment_views import secure_attachment_download_view, secure_attachment_delete_view
+from .views.search_views import search_typeahead
 
 app_name = "core"
 
@@ -55,6 +56,9 @@ urlpatterns = [
     # مسارات الأخطاء والـ Logs (للـ Admin فقط)
     path("logs/errors/", view_error_logs, name="view_error_logs"),
     path("logs/errors/clear/", clear_error_logs, name="clear_error_logs"),
+    path("logs/query-profile/", view_query_profile, name="query_profile"),
+    path("api/query-profile/", query_profile_api, name="query_profile_api"),
+    path("api/search/<str:entity>/", search_typeahead, name="search_typeahead"),
     # صفحة عرض كل الإشعارات
     path("notifications/", notifications_list, name="notifications_list"),
     path("notifications/settings/", notification_settings, name="notification_settings"),
@@ -78,3 +78,46 @@ def clear_error_logs(request):
     
     from django.shortcuts import redirect
     return redirect('core:view_error_logs')
+
+
+@login_required
+@user_passes_test(is_superuser)
+def view_query_profile(request):
+    """عرض أكثر العروض والاستعلامات استهلاكاً لقاعدة البيانات من القياس الحالي"""
+    from django.urls import reverse
+    from core.services.query_profiler import aggregator
+
+    context = {
+        'snapshot': aggregator.snapshot(limit=50),
+
+        # بيانات الهيدر
+        'page_title': 'قياس الاستعلامات',
+        'page_subtitle': 'أكثر العروض والاستعلامات استهلاكاً لقاعدة البيانات واشتباهات N+1',
+        'page_icon': 'fas fa-tachometer-alt',
+
+        # البريدكرمب
+        'breadcrumb_items': [
+            {'title': 'الرئيسية', 'url': reverse('core:dashboard'), 'icon': 'fas fa-home'},
+            {'title': 'الإعدادات', 'url': reverse('core:system_settings'), 'icon': 'fas fa-cog'},
+            {'title': 'قياس الاستعلامات', 'active': True},
+        ],
+    }
+    return render(request, 'core/query_profile.html', context)
+
+
+@login_required
+@user_passes_test(is_superuser)
+def query_profile_api(request):
+    """JSON بأكثر العروض والاستعلامات استهلاكاً (POST لتصفير القياس)"""
+    from django.http import JsonResponse
+    from core.services.query_profiler import aggregator
+
+    if request.method == 'POST':
+        aggregator.reset()
+        return JsonResponse({'success': True})
+
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), 200))
+    except (TypeError, ValueError):
+        limit = 20
+    return JsonResponse(aggregator.snapshot(limit=limit))
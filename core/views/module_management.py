@@ -79,6 +79,8 @@ def module_management(request):
 
 def _clear_modules_cache():
     """مسح كاش التطبيقات"""
+    from core.services.feature_flag_store import feature_flag_store
+    feature_flag_store.invalidate()
     cache.delete('enabled_modules_dict')
     cache.delete('enabled_modules_set')
     # مسح جميع الكاش الخاص بالتطبيقات الفردية
@@ -0,0 +1,49 @@
+"""
+واجهة البحث الفوري الموحدة (typeahead / select2) للمنتجات والعملاء والموردين
+"""
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+
+from core.services.search_index import SearchIndexService
+
+MAX_LIMIT = 50
+
+
+@login_required
+def search_typeahead(request, entity):
+    """
+    بحث فوري مرتب من فهرس البحث
+    - q أو term: نص البحث
+    - limit (حد أقصى 50) و offset، أو page بصيغة select2
+    - active_only=false لإظهار السجلات غير النشطة
+    """
+    try:
+        search_entity = SearchIndexService.get_entity(entity)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=404)
+
+    query = (request.GET.get('q') or request.GET.get('term') or '').strip()
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 20)), MAX_LIMIT))
+        if request.GET.get('page'):
+            offset = (max(1, int(request.GET['page'])) - 1) * limit
+        else:
+            offset = max(0, int(request.GET.get('offset', 0)))
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'معاملات الصفحة غير صحيحة'}, status=400)
+
+    queryset = search_entity.model.objects.all()
+    if request.GET.get('active_only', 'true') != 'false':
+        queryset = queryset.filter(is_active=True)
+
+    result = SearchIndexService.search(entity, query, limit=limit, offset=offset, queryset=queryset)
+    objects = queryset.in_bulk(result.ids)
+    results = [
+        {'id': pk, 'text': search_entity.display(objects[pk])}
+        for pk in result.ids if pk in objects
+    ]
+    return JsonResponse({
+        'results': results,
+        'total': result.total,
+        'pagination': {'more': result.has_more},
+    })
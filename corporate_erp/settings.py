@@ -165,6 +165,7 @@ MIDDLEWARE = [
     
     # Essential Custom (4)
     "core.middleware.current_user.CurrentUserMiddleware",
+    "core.middleware.query_profiling.QueryProfilingMiddleware",
     "core.middleware.security_headers.AdvancedSecurityHeadersMiddleware",
     # "simple_history.middleware.HistoryRequestMiddleware",  # ❌ DISABLED - no HistoricalRecords in any model
     "corsheaders.middleware.CorsMiddleware",
@@ -412,7 +413,7 @@ REST_FRAMEWORK = {
         "rest_framework.authentication.SessionAuthentication",
         "rest_framework_simplejwt.authentication.JWTAuthentication",
     ],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "api.pagination.StandardResultsSetPagination",
     "PAGE_SIZE": 10,
     "DEFAULT_THROTTLE_CLASSES": [
         "rest_framework.throttling.AnonRateThrottle",
@@ -445,6 +446,11 @@ REST_FRAMEWORK = {
     ],
 }
 
+# أحجام صفحات API (الحد الأقصى لـ ?page_size= وصفحات المؤشر والمزامنة التفاضلية)
+API_MAX_PAGE_SIZE = env.int("API_MAX_PAGE_SIZE", default=100)
+API_CURSOR_PAGE_SIZE = env.int("API_CURSOR_PAGE_SIZE", default=50)
+API_SYNC_PAGE_SIZE = env.int("API_SYNC_PAGE_SIZE", default=500)
+
 # JWT Settings
 from datetime import timedelta
 
@@ -806,6 +812,71 @@ LOG_RETENTION_DAYS = env.int("LOG_RETENTION_DAYS", default=30)
 ENABLE_ERROR_TRACKING = env("ENABLE_ERROR_TRACKING", default=True)
 ENABLE_BASIC_MONITORING = env("ENABLE_BASIC_MONITORING", default=True)
 
+# قياس الاستعلامات لكل طلب/مهمة (core.services.query_profiler)
+# العينة تُجمّع داخل العملية وتُعرض في /logs/query-profile/
+PROFILING_ENABLED = env.bool("PROFILING_ENABLED", default=True)
+PROFILING_SAMPLE_RATE = env.float("PROFILING_SAMPLE_RATE", default=0.05)
+PROFILING_TRACE_MEMORY = env.bool("PROFILING_TRACE_MEMORY", default=False)
+PROFILING_N_PLUS_ONE_THRESHOLD = env.int("PROFILING_N_PLUS_ONE_THRESHOLD", default=10)
+PROFILING_MAX_ENTRIES = env.int("PROFILING_MAX_ENTRIES", default=500)
+# حد الاستعلامات الافتراضي لكل عرض (0 = بلا حد) والحدود الخاصة باسم العرض/المهمة
+PROFILING_DEFAULT_QUERY_BUDGET = env.int("PROFILING_DEFAULT_QUERY_BUDGET", default=0)
+PROFILING_QUERY_BUDGETS = {
+    # "core:dashboard": 40,
+}
+# رفع QueryBudgetExceeded بدلاً من التحذير (مفعل في إعدادات الاختبار)
+PROFILING_RAISE_ON_BUDGET = env.bool("PROFILING_RAISE_ON_BUDGET", default=False)
+
+# مخزن مفاتيح التشغيل (core.services.feature_flag_store)
+# نسخة محلية لكل عملية تُحدّث عند تغير رقم الإصدار في الكاش (يُفحص مرة كل N ثانية)
+FEATURE_FLAG_STORE_ENABLED = env.bool("FEATURE_FLAG_STORE_ENABLED", default=True)
+FEATURE_FLAG_REFRESH_SECONDS = env.float("FEATURE_FLAG_REFRESH_SECONDS", default=1.0)
+
+# كاش التحليلات المالية (financial.services.financial_analytics_service)
+# المفتاح يتضمن إصدار دفتر الأستاذ فيُبطل مع أي ترحيل، والمدة حد أقصى فقط
+FINANCIAL_ANALYTICS_CACHE_TIMEOUT = env.int("FINANCIAL_ANALYTICS_CACHE_TIMEOUT", default=3600)
+
+# كاش بنود الموازنات المعتمدة لكل سنة مالية (financial.services.budget_control_service)
+# يُبطل عند حفظ أو حذف أي موازنة أو بند موازنة
+BUDGET_LINES_CACHE_TIMEOUT = env.int("BUDGET_LINES_CACHE_TIMEOUT", default=3600)
+
+# فهرس البحث العربي للمنتجات والعملاء والموردين (core.services.search_index)
+# عند التعطيل يعود البحث إلى icontains مباشرة على الجداول
+SEARCH_INDEX_ENABLED = env.bool("SEARCH_INDEX_ENABLED", default=True)
+# SEARCH_CANDIDATE_LIMIT يحد مجموعة المطابقة التقريبية فقط؛ المطابقات الفعلية لا تُقطع
+SEARCH_FUZZY_CUTOFF = env.int("SEARCH_FUZZY_CUTOFF", default=70)
+SEARCH_CANDIDATE_LIMIT = env.int("SEARCH_CANDIDATE_LIMIT", default=2000)
+SEARCH_CODE_SUBSTRING_MIN_LENGTH = env.int("SEARCH_CODE_SUBSTRING_MIN_LENGTH", default=3)
+
+# توليد PDF (utils.pdf_utils): كاش الملفات المولّدة حسب بصمة المحتوى (0 لتعطيله)
+# والحد الأقصى لمستندات الطباعة المجمّعة في الطلب الواحد
+PDF_CACHE_TIMEOUT = env.int("PDF_CACHE_TIMEOUT", default=86400)
+PDF_BATCH_MAX_DOCUMENTS = env.int("PDF_BATCH_MAX_DOCUMENTS", default=500)
+
+# لقطة المتاح قصيرة العمر لكل مخزن (product.services.atp_service) لواجهة عروض الأسعار
+# الحجز الفعلي لأوامر البيع يقرأ دائماً مباشرة من قاعدة البيانات (0 لتعطيل اللقطة)
+ATP_SNAPSHOT_TIMEOUT = env.int("ATP_SNAPSHOT_TIMEOUT", default=30)
+
+# تنظيف الحجوزات المنتهية على دفعات (product.services.reservation_service / inventory_reservation_service)
+# مدة قفل الكاش تمنع تداخل تشغيلين متتاليين للمهمة
+RESERVATION_SWEEP_BATCH_SIZE = env.int("RESERVATION_SWEEP_BATCH_SIZE", default=1000)
+RESERVATION_SWEEP_LOCK_TIMEOUT = env.int("RESERVATION_SWEEP_LOCK_TIMEOUT", default=600)
+
+# مكعب أرصدة القوائم المالية (financial.services.balance_cube) مفتاحه يتضمن إصدار دفتر الأستاذ
+# فلا يُعرض رصيد قديم بعد أي ترحيل (0 لتعطيل الكاش)
+STATEMENT_CUBE_CACHE_TIMEOUT = env.int("STATEMENT_CUBE_CACHE_TIMEOUT", default=900)
+
+# كاش نتائج التقارير المالية (financial.services.report_cache) مفتاحه يتضمن إصدار فترات دفتر الأستاذ
+# حتى تاريخ التقرير، فتقارير الفترات المغلقة تبقى صالحة دون انتهاء (None = بلا مدة انتهاء)
+REPORT_CACHE_ENABLED = env.bool("REPORT_CACHE_ENABLED", default=True)
+REPORT_CACHE_TIMEOUT = env.int("REPORT_CACHE_TIMEOUT", default=None)
+
+# محرك فحص سلامة البيانات (financial.services.integrity_check_service) يعمل تزايدياً من آخر نقطة تحقق
+# التفاوت المسموح به في مقارنة الأرصدة ومدة قفل الكاش لمنع تداخل تشغيلين
+INTEGRITY_CHECK_TOLERANCE = env("INTEGRITY_CHECK_TOLERANCE", default="0.01")
+INTEGRITY_CHECK_LOCK_TIMEOUT = env.int("INTEGRITY_CHECK_LOCK_TIMEOUT", default=1800)
+INTEGRITY_CHECK_STALE_SALE_DAYS = env.int("INTEGRITY_CHECK_STALE_SALE_DAYS", default=30)
+
 # ==============================================================================
 # CELERY CONFIGURATION
 # ==============================================================================
@@ -1038,6 +1109,13 @@ BACKUP_S3_REGION = env("BACKUP_S3_REGION", default="us-east-1")
 # Backup Notification Recipients
 BACKUP_NOTIFICATION_EMAILS = env.list("BACKUP_NOTIFICATION_EMAILS", default=[])
 
+# النسخ الاحتياطي المنطقي المتدفق (core.services.logical_backup) عند عدم توفر mysqldump
+# الصيغة ndjson أو msgpack، والجداول تُقرأ بالتوازي على دفعات حسب المفتاح الأساسي
+# القراءة المتوازية على PostgreSQL فقط (لقطة مُصدَّرة واحدة)؛ باقي القواعد تُقرأ بمعاملة واحدة
+BACKUP_LOGICAL_FORMAT = env("BACKUP_LOGICAL_FORMAT", default="ndjson")
+BACKUP_DUMP_WORKERS = env.int("BACKUP_DUMP_WORKERS", default=4)
+BACKUP_DUMP_CHUNK_SIZE = env.int("BACKUP_DUMP_CHUNK_SIZE", default=2000)
+
 # ✅ PHASE 5: Data Encryption Configuration
 ENABLE_FIELD_ENCRYPTION = env.bool("ENABLE_FIELD_ENCRYPTION", default=True)
 ENCRYPTION_MASTER_KEY = env("ENCRYPTION_MASTER_KEY", default="")
@@ -1052,6 +1130,13 @@ DATA_RETENTION_AUDIT_ENABLED = env.bool("DATA_RETENTION_AUDIT_ENABLED", default=
 # Data Retention Notification Recipients
 DATA_RETENTION_NOTIFICATION_EMAILS = env.list("DATA_RETENTION_NOTIFICATION_EMAILS", default=[])
 
+# تنظيف البيانات المنتهية على دفعات حسب المفتاح الأساسي مع أرشفة مضغوطة (jsonl أو msgpack)
+# وفترة توقف بين الدفعات (بالثواني) لتقليل مدة الأقفال على الجداول الكبيرة
+DATA_RETENTION_BATCH_SIZE = env.int("DATA_RETENTION_BATCH_SIZE", default=1000)
+DATA_RETENTION_BATCH_PAUSE = env.float("DATA_RETENTION_BATCH_PAUSE", default=0.05)
+DATA_RETENTION_ARCHIVE_DIR = env("DATA_RETENTION_ARCHIVE_DIR", default=str(BASE_DIR / "archives" / "retention"))
+DATA_RETENTION_ARCHIVE_FORMAT = env("DATA_RETENTION_ARCHIVE_FORMAT", default="jsonl")
+
 # GDPR and Compliance Settings
 GDPR_COMPLIANCE_ENABLED = env.bool("GDPR_COMPLIANCE_ENABLED", default=False)
 DATA_RETENTION_POLICY_DAYS = env.int("DATA_RETENTION_POLICY_DAYS", default=2555)  # 7 years
@@ -1292,11 +1377,18 @@ if 'CELERY_BROKER_URL' in os.environ:
             'schedule': crontab(hour=3, minute=0, day_of_week=0),  # Weekly on Sunday at 3 AM
             'options': {'queue': 'maintenance'}
         },
+        'incremental-integrity-check': {
+            'task': 'financial.tasks.integrity_tasks.run_integrity_check_task',
+            'schedule': crontab(minute=30),  # Hourly, new rows since the last checkpoint
+            'options': {'queue': 'reconciliation'}
+        },
     })
     
     # Celery queues for different task types
     CELERY_TASK_ROUTES.update({
         'financial.tasks.reconciliation_tasks.*': {'queue': 'reconciliation'},
+        'financial.tasks.integrity_tasks.*': {'queue': 'reconciliation'},
+        'financial.tasks.partner_snapshot_tasks.*': {'queue': 'reconciliation'},
         '*.check_integration_health_task': {'queue': 'monitoring'},
         '*.cleanup_*': {'queue': 'maintenance'},
     })
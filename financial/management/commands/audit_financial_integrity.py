@@ -11,6 +11,7 @@ from financial.models.chart_of_accounts import ChartOfAccounts
 from financial.models.journal_entry import JournalEntry, JournalEntryLine
 from financial.services.trial_balance_service import TrialBalanceService
 from financial.services.financial_statement_engine import FinancialStatementEngine
+from financial.services.ledger_version import LedgerVersion
 
 
 class Command(BaseCommand):
@@ -71,6 +72,7 @@ class Command(BaseCommand):
                     leaf_child = l.account.children.filter(is_active=True, is_leaf=True).first()
                     if leaf_child:
                         JournalEntryLine.objects.filter(id=l.id).update(account=leaf_child)
+                        LedgerVersion.mark_changed()
                         self.stdout.write(self.style.SUCCESS(f"       [FIXED] تم نقل السطر تلقائياً إلى الحساب الفرعي: {leaf_child.code} - {leaf_child.name}"))
                         errors_found -= 1
         else:
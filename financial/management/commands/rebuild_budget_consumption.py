@@ -0,0 +1,32 @@
+"""
+Command: rebuild_budget_consumption
+إعادة احتساب دفتر استهلاك الموازنات (المنفق الفعلي لكل مركز تكلفة وحساب وفترة) من أسطر القيود المرحلة
+- يُشغّل بعد الاستيراد أو بعد ترحيل قيود خارج LedgerCoreService
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from financial.models.journal_entry import AccountingPeriod
+from financial.services.budget_actual_service import BudgetActualService
+
+
+class Command(BaseCommand):
+    help = "إعادة احتساب دفتر استهلاك الموازنات من القيود المرحلة"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--period", type=int, help="معرف الفترة المحاسبية (الافتراضي: كل الفترات)")
+
+    def handle(self, *args, **options):
+        period = None
+        if options.get("period"):
+            period = AccountingPeriod.objects.filter(pk=options["period"]).first()
+            if period is None:
+                raise CommandError(f"الفترة المحاسبية {options['period']} غير موجودة")
+
+        started = time.monotonic()
+        count = BudgetActualService.rebuild(period)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ تم إعادة احتساب {count} صف خلال {time.monotonic() - started:.2f} ثانية"
+        ))
@@ -0,0 +1,45 @@
+"""
+Command: rebuild_partner_snapshots
+إعادة بناء لقطات أرصدة الشركاء (الفواتير المفتوحة، الأرصدة المسبقة، آخر حركة، أعمار الديون)
+باستعلامات مجمعة - يُشغّل بعد الترحيل أو الاستيراد ويومياً لتحديث الأعمار عبر Cron / Celery Beat
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from financial.services.partner_balance_snapshot_service import PartnerBalanceSnapshotService
+
+
+class Command(BaseCommand):
+    help = "إعادة بناء لقطات أرصدة وأعمار ديون العملاء والموردين"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--partner-type",
+            choices=["customer", "supplier", "all"],
+            default="all",
+            help="نوع الشركاء المطلوب إعادة بنائهم (الافتراضي: الكل)",
+        )
+        parser.add_argument(
+            "--ids",
+            type=int,
+            nargs="+",
+            help="معرفات شركاء محددين بدلاً من الكل",
+        )
+
+    def handle(self, *args, **options):
+        partner_types = ["customer", "supplier"] if options["partner_type"] == "all" else [options["partner_type"]]
+        if options.get("ids") and len(partner_types) > 1:
+            self.stderr.write(self.style.ERROR("حدد --partner-type عند استخدام --ids"))
+            return
+
+        for partner_type in partner_types:
+            started = time.monotonic()
+            if options.get("ids"):
+                written = PartnerBalanceSnapshotService.refresh(partner_type, options["ids"])
+            else:
+                written = PartnerBalanceSnapshotService.rebuild_all(partner_type)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {partner_type}: تم حفظ {written} لقطة خلال {time.monotonic() - started:.2f} ثانية"
+            ))
@@ -0,0 +1,28 @@
+"""
+Command: report_cache_stats
+عرض نسبة إصابة كاش نتائج التقارير المالية لكل تقرير
+"""
+
+from django.core.management.base import BaseCommand
+
+from financial.services.report_cache import ReportCache
+
+
+class Command(BaseCommand):
+    help = "إحصائيات كاش التقارير المالية (الإصابة والإخفاق لكل تقرير)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="تصفير العدادات بعد العرض",
+        )
+
+    def handle(self, *args, **options):
+        for report, counts in ReportCache.stats().items():
+            self.stdout.write(
+                f"{report}: إصابة {counts['hits']} / إخفاق {counts['misses']} ({counts['hit_rate']}%)"
+            )
+        if options["reset"]:
+            ReportCache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("✅ تم تصفير العدادات"))
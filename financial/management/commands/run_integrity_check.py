@@ -0,0 +1,38 @@
+"""
+Command: run_integrity_check
+تشغيل محرك فحص سلامة البيانات (تزايدياً من آخر نقطة تحقق أو فحص كامل)
+يُشغّل عبر Cron في الإنتاج بدلاً من Celery Beat
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from financial.services.integrity_check_service import IntegrityCheckService
+
+
+class Command(BaseCommand):
+    help = "فحص سلامة البيانات المالية وحفظ النتائج لصفحة فحص السلامة"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="فحص كل البيانات بدلاً من الجديد منذ آخر تشغيل",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        run = IntegrityCheckService.run(full=options["full"])
+        if run is None:
+            self.stdout.write(self.style.WARNING("⚠️ يوجد فحص آخر قيد التنفيذ"))
+            return
+        if run.status != "completed":
+            self.stderr.write(self.style.ERROR(f"❌ فشل الفحص: {run.error_message}"))
+            return
+
+        for check_code, counts in run.summary.items():
+            self.stdout.write(
+                f"{check_code}: مفتوحة {counts['open']} (جديدة {counts['new']}، تم حلها {counts['resolved']})"
+            )
+        self.stdout.write(self.style.SUCCESS(f"✅ تم الفحص خلال {time.monotonic() - started:.2f} ثانية"))
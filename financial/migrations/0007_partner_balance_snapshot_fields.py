@@ -0,0 +1,64 @@
+# Generated by Django 4.2.26 on 2026-10-19 01:25
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financial', '0006_unify_and_cleanup_tax_codes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='partnercurrencybalancesnapshot',
+            name='aging_31_60',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15, verbose_name='31-60 يوم'),
+        ),
+        migrations.AddField(
+            model_name='partnercurrencybalancesnapshot',
+            name='aging_61_90',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15, verbose_name='61-90 يوم'),
+        ),
+        migrations.AddField(
+            model_name='partnercurrencybalancesnapshot',
+            name='aging_91_120',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15, verbose_name='91-120 يوم'),
+        ),
+        migrations.AddField(
+            model_name='partnercurrencybalancesnapshot',
+            name='aging_current',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15, verbose_name='حالي (0-30)'),
+        ),
+        migrations.AddField(
+            model_name='partnercurrencybalancesnapshot',
+            name='aging_date',
+            field=models.DateField(blank=True, null=True, verbose_name='تاريخ احتساب الأعمار'),
+        ),
+        migrations.AddField(
+            model_name='partnercurrencybalancesnapshot',
+            name='aging_over_120',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15, verbose_name='أكثر من 120 يوم'),
+        ),
+        migrations.AddField(
+            model_name='partnercurrencybalancesnapshot',
+            name='last_activity_date',
+            field=models.DateField(blank=True, null=True, verbose_name='تاريخ آخر حركة'),
+        ),
+        migrations.AddField(
+            model_name='partnercurrencybalancesnapshot',
+            name='open_invoice_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='عدد الفواتير المفتوحة'),
+        ),
+        migrations.AddField(
+            model_name='partnercurrencybalancesnapshot',
+            name='open_invoice_functional',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15, verbose_name='إجمالي الفواتير المفتوحة بالعملة الوظيفية'),
+        ),
+        migrations.AddField(
+            model_name='partnercurrencybalancesnapshot',
+            name='open_invoice_total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15, verbose_name='إجمالي الفواتير المفتوحة'),
+        ),
+    ]
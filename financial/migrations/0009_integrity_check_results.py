@@ -0,0 +1,65 @@
+# Generated by Django 4.2.26 on 2026-10-19 03:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('financial', '0007_partner_balance_snapshot_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IntegrityCheckRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_full', models.BooleanField(default=False, verbose_name='فحص كامل')),
+                ('status', models.CharField(choices=[('running', 'قيد التنفيذ'), ('completed', 'مكتمل'), ('failed', 'فشل')], default='running', max_length=20, verbose_name='الحالة')),
+                ('checkpoint', models.JSONField(blank=True, default=dict, verbose_name='نقطة التحقق')),
+                ('summary', models.JSONField(blank=True, default=dict, verbose_name='ملخص النتائج')),
+                ('error_message', models.TextField(blank=True, default='', verbose_name='رسالة الخطأ')),
+                ('started_at', models.DateTimeField(auto_now_add=True, verbose_name='بدء التنفيذ')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='انتهاء التنفيذ')),
+                ('triggered_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='integrity_check_runs', to=settings.AUTH_USER_MODEL, verbose_name='بدأه')),
+            ],
+            options={
+                'verbose_name': 'تشغيل فحص سلامة البيانات',
+                'verbose_name_plural': 'تشغيلات فحص سلامة البيانات',
+                'ordering': ['-started_at', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='IntegrityFinding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('check_code', models.CharField(choices=[('unbalanced_entry', 'توازن القيود المحاسبية'), ('customer_balance', 'أرصدة العملاء'), ('supplier_balance', 'أرصدة الموردين'), ('stock_ledger', 'أرصدة المخزون مقابل الأستاذ العام'), ('orphan_source', 'القيود المرتبطة بمستند غير موجود'), ('duplicate_account_code', 'الحسابات المكررة'), ('negative_stock', 'المخزون السالب'), ('stale_draft_sale', 'الفواتير غير المكتملة')], max_length=30, verbose_name='الفحص')),
+                ('severity', models.CharField(choices=[('high', 'حرجة'), ('medium', 'متوسطة'), ('low', 'منخفضة')], default='medium', max_length=10, verbose_name='الخطورة')),
+                ('status', models.CharField(choices=[('open', 'مفتوحة'), ('resolved', 'تم حلها')], default='open', max_length=10, verbose_name='الحالة')),
+                ('object_type', models.CharField(max_length=50, verbose_name='نوع الكائن')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='معرف الكائن')),
+                ('object_label', models.CharField(blank=True, default='', max_length=255, verbose_name='الوصف')),
+                ('expected', models.DecimalField(blank=True, decimal_places=2, max_digits=18, null=True, verbose_name='القيمة المتوقعة')),
+                ('actual', models.DecimalField(blank=True, decimal_places=2, max_digits=18, null=True, verbose_name='القيمة الفعلية')),
+                ('difference', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='الفرق')),
+                ('details', models.JSONField(blank=True, default=dict, verbose_name='تفاصيل')),
+                ('detected_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الاكتشاف')),
+                ('resolved_at', models.DateTimeField(blank=True, null=True, verbose_name='تاريخ الحل')),
+                ('first_run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='new_findings', to='financial.integritycheckrun', verbose_name='أول تشغيل اكتشفها')),
+                ('last_run', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='findings', to='financial.integritycheckrun', verbose_name='آخر تشغيل')),
+            ],
+            options={
+                'verbose_name': 'مشكلة سلامة بيانات',
+                'verbose_name_plural': 'مشاكل سلامة البيانات',
+                'ordering': ['check_code', '-difference', 'object_id'],
+                'indexes': [models.Index(fields=['status', 'check_code'], name='financial_i_status_8147e9_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='integrityfinding',
+            constraint=models.UniqueConstraint(fields=('check_code', 'object_type', 'object_id'), name='uniq_integrity_finding_object'),
+        ),
+    ]
@@ -42,6 +42,7 @@ from .invoice_audit_log import InvoiceAuditLog
 from .partner_transactions import PartnerTransaction, PartnerBalance
 from .partner_advance import PartnerCurrencyBalanceSnapshot, PartnerAdvanceSettlement
 from .migration_run import DataMigrationRun
+from .integrity_check import IntegrityCheckRun, IntegrityFinding
 from .partner_settings import PartnerSettings, PartnerPermission, PartnerAuditLog
 
 # استيراد آمن للنماذج الاختيارية
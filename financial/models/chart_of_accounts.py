@@ -444,8 +444,11 @@ class ChartOfAccounts(models.Model):
             }
 
         # 5. التجميع الشجري الصاعد في الذاكرة للحسابات الأمهات (Roll-up Aggregation)
-        # نرتب الحسابات حسب عمق الشجرة (من الأسفل للأعلى)
-        for acc in sorted(accounts, key=lambda a: getattr(a, 'code', ''), reverse=True):
+        # الترتيب العمقي المعكوس من فهرس الشجرة يعالج كل الأحفاد قبل آبائهم مهما كانت الأكواد
+        from financial.services.account_tree import AccountTree
+
+        tree = AccountTree.current()
+        for acc in sorted(accounts, key=lambda a: tree.position(a.id), reverse=True):
             if acc.parent_id and acc.parent_id in balances:
                 parent_data = balances[acc.parent_id]
                 child_data = balances[acc.id]
@@ -455,31 +458,43 @@ class ChartOfAccounts(models.Model):
 
         return balances
 
+    def _accounts_in_tree_order(self, account_ids):
+        """جلب الحسابات باستعلام واحد وإعادتها بترتيب الشجرة"""
+        accounts = ChartOfAccounts.objects.in_bulk(account_ids)
+        return [accounts[account_id] for account_id in account_ids if account_id in accounts]
+
     def get_descendants(self, include_self=False):
         """
-        جلب جميع الأحفاد (الحسابات الفرعية) بشكل تكراري
+        جلب جميع الأحفاد (الحسابات الفرعية) بترتيب الشجرة من فهرس الشجرة
         """
-        descendants = []
+        from financial.services.account_tree import AccountTree
 
+        descendant_ids = AccountTree.current().descendant_ids(self.pk)
+        descendants = self._accounts_in_tree_order(descendant_ids)
         if include_self:
-            descendants.append(self)
-
-        for child in self.children.all():
-            descendants.append(child)
-            descendants.extend(child.get_descendants())
-
+            return [self] + descendants
         return descendants
 
     def get_leaf_descendants(self, include_self=False):
         """
         جلب الأحفاد النهائيين فقط (التي يمكن أن تحتوي على قيود) مع تضمين الحساب نفسه اختيارياً
         """
-        descendants = self.get_descendants(include_self=False)
-        leafs = [acc for acc in descendants if acc.is_leaf]
+        from financial.services.account_tree import AccountTree
+
+        leafs = self._accounts_in_tree_order(AccountTree.current().leaf_ids(self.pk))
         if include_self:
             return [self] + leafs
         return leafs
 
+    def get_ancestors(self, include_self=False):
+        """جلب الآباء من الجذر حتى الأب المباشر"""
+        from financial.services.account_tree import AccountTree
+
+        ancestors = self._accounts_in_tree_order(AccountTree.current().ancestor_ids(self.pk))
+        if include_self:
+            return ancestors + [self]
+        return ancestors
+
     def get_transactions_summary(self, date_from=None, date_to=None):
         """
         ملخص المعاملات للحساب وأحفاده
@@ -584,11 +599,8 @@ class ChartOfAccounts(models.Model):
             return (False, f"خطأ في التسوية: {str(e)}", difference)
 
     def get_children_recursive(self):
-        """الحصول على جميع الحسابات الفرعية بشكل تكراري"""
-        children = list(self.children.all())
-        for child in list(children):
-            children.extend(child.get_children_recursive())
-        return children
+        """الحصول على جميع الحسابات الفرعية"""
+        return self.get_descendants()
 
     def can_post_entries(self):
         """التحقق من إمكانية إدراج قيود على الحساب"""
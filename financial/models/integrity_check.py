@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class IntegrityCheckRun(models.Model):
+    """
+    تشغيل لمحرك فحص سلامة البيانات (كامل أو تزايدي من آخر نقطة تحقق)
+    """
+
+    STATUS_CHOICES = (
+        ("running", _("قيد التنفيذ")),
+        ("completed", _("مكتمل")),
+        ("failed", _("فشل")),
+    )
+
+    is_full = models.BooleanField(_("فحص كامل"), default=False)
+    status = models.CharField(_("الحالة"), max_length=20, choices=STATUS_CHOICES, default="running")
+    # آخر معرفات تمت معالجتها: {"journal_entry": id, "journal_line": id}
+    checkpoint = models.JSONField(_("نقطة التحقق"), default=dict, blank=True)
+    summary = models.JSONField(_("ملخص النتائج"), default=dict, blank=True)
+    error_message = models.TextField(_("رسالة الخطأ"), blank=True, default="")
+    triggered_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="integrity_check_runs",
+        verbose_name=_("بدأه"),
+    )
+    started_at = models.DateTimeField(_("بدء التنفيذ"), auto_now_add=True)
+    finished_at = models.DateTimeField(_("انتهاء التنفيذ"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("تشغيل فحص سلامة البيانات")
+        verbose_name_plural = _("تشغيلات فحص سلامة البيانات")
+        ordering = ["-started_at", "-id"]
+
+    def __str__(self):
+        return f"IntegrityCheckRun #{self.pk} ({self.status}) - {self.started_at}"
+
+
+class IntegrityFinding(models.Model):
+    """
+    مشكلة مكتشفة في سلامة البيانات: سجل واحد لكل (فحص، كائن) يُغلق عند زوالها
+    """
+
+    CHECK_CHOICES = (
+        ("unbalanced_entry", _("توازن القيود المحاسبية")),
+        ("customer_balance", _("أرصدة العملاء")),
+        ("supplier_balance", _("أرصدة الموردين")),
+        ("stock_ledger", _("أرصدة المخزون مقابل الأستاذ العام")),
+        ("orphan_source", _("القيود المرتبطة بمستند غير موجود")),
+        ("duplicate_account_code", _("الحسابات المكررة")),
+        ("negative_stock", _("المخزون السالب")),
+        ("stale_draft_sale", _("الفواتير غير المكتملة")),
+    )
+    SEVERITY_CHOICES = (
+        ("high", _("حرجة")),
+        ("medium", _("متوسطة")),
+        ("low", _("منخفضة")),
+    )
+    STATUS_CHOICES = (
+        ("open", _("مفتوحة")),
+        ("resolved", _("تم حلها")),
+    )
+
+    check_code = models.CharField(_("الفحص"), max_length=30, choices=CHECK_CHOICES)
+    severity = models.CharField(_("الخطورة"), max_length=10, choices=SEVERITY_CHOICES, default="medium")
+    status = models.CharField(_("الحالة"), max_length=10, choices=STATUS_CHOICES, default="open")
+    object_type = models.CharField(_("نوع الكائن"), max_length=50)
+    object_id = models.PositiveBigIntegerField(_("معرف الكائن"))
+    object_label = models.CharField(_("الوصف"), max_length=255, blank=True, default="")
+    expected = models.DecimalField(_("القيمة المتوقعة"), max_digits=18, decimal_places=2, null=True, blank=True)
+    actual = models.DecimalField(_("القيمة الفعلية"), max_digits=18, decimal_places=2, null=True, blank=True)
+    difference = models.DecimalField(_("الفرق"), max_digits=18, decimal_places=2, default=0)
+    details = models.JSONField(_("تفاصيل"), default=dict, blank=True)
+    first_run = models.ForeignKey(
+        IntegrityCheckRun,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="new_findings",
+        verbose_name=_("أول تشغيل اكتشفها"),
+    )
+    last_run = models.ForeignKey(
+        IntegrityCheckRun,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="findings",
+        verbose_name=_("آخر تشغيل"),
+    )
+    detected_at = models.DateTimeField(_("تاريخ الاكتشاف"), auto_now_add=True)
+    resolved_at = models.DateTimeField(_("تاريخ الحل"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("مشكلة سلامة بيانات")
+        verbose_name_plural = _("مشاكل سلامة البيانات")
+        ordering = ["check_code", "-difference", "object_id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["check_code", "object_type", "object_id"], name="uniq_integrity_finding_object"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["status", "check_code"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_check_code_display()} - {self.object_label or self.object_id} ({self.status})"
@@ -32,6 +32,28 @@ class PartnerCurrencyBalanceSnapshot(models.Model):
         null=True,
         blank=True,
     )
+    # الفواتير المفتوحة (بعملة الفاتورة وبالمعادل الوظيفي)
+    open_invoice_total = models.DecimalField(
+        _("إجمالي الفواتير المفتوحة"),
+        max_digits=15,
+        decimal_places=2,
+        default=Decimal("0.00"),
+    )
+    open_invoice_functional = models.DecimalField(
+        _("إجمالي الفواتير المفتوحة بالعملة الوظيفية"),
+        max_digits=15,
+        decimal_places=2,
+        default=Decimal("0.00"),
+    )
+    open_invoice_count = models.PositiveIntegerField(_("عدد الفواتير المفتوحة"), default=0)
+    last_activity_date = models.DateField(_("تاريخ آخر حركة"), null=True, blank=True)
+    # أعمار الديون بالعملة الوظيفية محسوبة في تاريخ aging_date
+    aging_date = models.DateField(_("تاريخ احتساب الأعمار"), null=True, blank=True)
+    aging_current = models.DecimalField(_("حالي (0-30)"), max_digits=15, decimal_places=2, default=Decimal("0.00"))
+    aging_31_60 = models.DecimalField(_("31-60 يوم"), max_digits=15, decimal_places=2, default=Decimal("0.00"))
+    aging_61_90 = models.DecimalField(_("61-90 يوم"), max_digits=15, decimal_places=2, default=Decimal("0.00"))
+    aging_91_120 = models.DecimalField(_("91-120 يوم"), max_digits=15, decimal_places=2, default=Decimal("0.00"))
+    aging_over_120 = models.DecimalField(_("أكثر من 120 يوم"), max_digits=15, decimal_places=2, default=Decimal("0.00"))
     updated_at = models.DateTimeField(_("تاريخ التحديث"), auto_now=True)
 
     class Meta:
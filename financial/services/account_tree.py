@@ -0,0 +1,241 @@
+"""
+فهرس شجرة دليل الحسابات (Chart of Accounts Tree Index)
+- لقطة ثابتة للشجرة في ذاكرة العملية تُبنى باستعلام واحد
+- يحدد صلاحيتها رقم إصدار في الكاش يتغير مع أي تعديل في دليل الحسابات
+- استعلامات الأحفاد والحسابات النهائية والآباء من الذاكرة دون استعلام لكل عقدة
+- تجميع صاعد (Roll-up) لخرائط الأرصدة في مرور واحد
+"""
+
+import logging
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class AccountTreeSnapshot:
+    """
+    لقطة ثابتة لشجرة الحسابات
+
+    الحسابات مرتبة ترتيباً عمقياً (Pre-order) حسب الكود، فأحفاد أي حساب
+    مقطع متصل من هذا الترتيب يُحدد ببداية ونهاية محسوبتين مسبقاً.
+    """
+
+    __slots__ = ("version", "_parent", "_children", "_order", "_start", "_end",
+                 "_depth", "_leaf", "_active", "_leaf_cache")
+
+    def __init__(self, version, rows: Iterable[Tuple[int, Optional[int], str, bool, bool]]):
+        """
+        Args:
+            version: رقم إصدار الشجرة
+            rows: (id, parent_id, code, is_leaf, is_active)
+        """
+        self.version = version
+        rows = sorted(rows, key=lambda row: (row[2], row[0]))
+        ids = {row[0] for row in rows}
+
+        self._parent: Dict[int, Optional[int]] = {}
+        children: Dict[Optional[int], list] = {}
+        self._leaf: Dict[int, bool] = {}
+        self._active: Dict[int, bool] = {}
+        for account_id, parent_id, _code, is_leaf, is_active in rows:
+            # حساب أبوه غير موجود يُعامل كجذر حتى لا يختفي من الشجرة
+            parent_id = parent_id if parent_id in ids else None
+            self._parent[account_id] = parent_id
+            children.setdefault(parent_id, []).append(account_id)
+            self._leaf[account_id] = is_leaf
+            self._active[account_id] = is_active
+        self._children: Dict[Optional[int], Tuple[int, ...]] = {
+            key: tuple(value) for key, value in children.items()
+        }
+
+        order, start, end, depth = [], {}, {}, {}
+        stack = [(account_id, 1, False) for account_id in reversed(self._children.get(None, ()))]
+        while stack:
+            account_id, level, closing = stack.pop()
+            if closing:
+                end[account_id] = len(order)
+                continue
+            start[account_id] = len(order)
+            depth[account_id] = level
+            order.append(account_id)
+            stack.append((account_id, level, True))
+            for child_id in reversed(self._children.get(account_id, ())):
+                stack.append((child_id, level + 1, False))
+
+        self._order: Tuple[int, ...] = tuple(order)
+        self._start = start
+        self._end = end
+        self._depth = depth
+        self._leaf_cache: Dict[int, Tuple[int, ...]] = {}
+
+    def __contains__(self, account_id) -> bool:
+        return account_id in self._start
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    @property
+    def order(self) -> Tuple[int, ...]:
+        """كل الحسابات بالترتيب العمقي"""
+        return self._order
+
+    def position(self, account_id: int) -> int:
+        """موضع الحساب في الترتيب العمقي (-1 إن لم يكن في اللقطة)"""
+        return self._start.get(account_id, -1)
+
+    def parent_id(self, account_id: int) -> Optional[int]:
+        return self._parent.get(account_id)
+
+    def depth(self, account_id: int) -> int:
+        return self._depth.get(account_id, 0)
+
+    def is_leaf(self, account_id: int) -> bool:
+        return self._leaf.get(account_id, False)
+
+    def is_active(self, account_id: int) -> bool:
+        return self._active.get(account_id, False)
+
+    def children_ids(self, account_id: Optional[int] = None, active_only: bool = False) -> Tuple[int, ...]:
+        """الأبناء المباشرون (None = الحسابات الجذرية)"""
+        children = self._children.get(account_id, ())
+        if active_only:
+            return tuple(child_id for child_id in children if self._active[child_id])
+        return children
+
+    def descendant_ids(self, account_id: int, include_self: bool = False) -> Tuple[int, ...]:
+        """كل الأحفاد: مقطع من الترتيب العمقي"""
+        if account_id not in self._start:
+            return (account_id,) if include_self else ()
+        start = self._start[account_id]
+        return self._order[start if include_self else start + 1:self._end[account_id]]
+
+    def leaf_ids(self, account_id: int, include_self: bool = False) -> Tuple[int, ...]:
+        """الأحفاد النهائيون (الحسابات التي تقبل قيوداً)"""
+        leaves = self._leaf_cache.get(account_id)
+        if leaves is None:
+            leaves = tuple(
+                descendant_id for descendant_id in self.descendant_ids(account_id)
+                if self._leaf[descendant_id]
+            )
+            self._leaf_cache[account_id] = leaves
+        return ((account_id,) + leaves) if include_self else leaves
+
+    def ancestor_ids(self, account_id: int, include_self: bool = False) -> Tuple[int, ...]:
+        """الآباء من الجذر حتى الأب المباشر"""
+        ancestors = []
+        current = self._parent.get(account_id)
+        while current is not None:
+            ancestors.append(current)
+            current = self._parent.get(current)
+        ancestors.reverse()
+        if include_self:
+            ancestors.append(account_id)
+        return tuple(ancestors)
+
+    def is_descendant(self, account_id: int, ancestor_id: int) -> bool:
+        if account_id not in self._start or ancestor_id not in self._start:
+            return False
+        return self._start[ancestor_id] < self._start[account_id] < self._end[ancestor_id]
+
+    def rollup(self, values: Mapping[int, object], fields: Optional[Sequence[str]] = None) -> Dict[int, object]:
+        """
+        تجميع صاعد لخريطة قيم الحسابات: قيمة كل حساب = قيمته + مجموع قيم أحفاده
+
+        Args:
+            values: {account_id: Decimal} أو {account_id: dict} مع تحديد fields
+            fields: الحقول المجمّعة عندما تكون القيم قواميس
+
+        Returns:
+            dict: خريطة جديدة لكل الحسابات التي لها قيمة أو لها أحفاد لهم قيمة
+        """
+        if fields:
+            totals = {account_id: dict(value) for account_id, value in values.items()}
+        else:
+            totals = dict(values)
+
+        # الترتيب العمقي المعكوس يضمن معالجة كل الأحفاد قبل آبائهم
+        for account_id in reversed(self._order):
+            value = totals.get(account_id)
+            parent_id = self._parent[account_id]
+            if value is None or parent_id is None:
+                continue
+            if fields:
+                parent_value = totals.setdefault(parent_id, {field: Decimal("0") for field in fields})
+                for field in fields:
+                    parent_value[field] = parent_value.get(field, Decimal("0")) + value.get(field, Decimal("0"))
+            else:
+                totals[parent_id] = totals.get(parent_id, Decimal("0")) + value
+        return totals
+
+
+class AccountTree:
+    """
+    الوصول إلى لقطة شجرة الحسابات الحالية
+    """
+
+    VERSION_KEY = "chart_of_accounts_tree_version"
+
+    _lock = threading.Lock()
+    _snapshot: Optional[AccountTreeSnapshot] = None
+
+    @classmethod
+    def version(cls) -> int:
+        """الإصدار الحالي (يُنشأ من الطابع الزمني إذا فُقد من الكاش)"""
+        try:
+            version = cache.get(cls.VERSION_KEY)
+            if version is None:
+                cache.add(cls.VERSION_KEY, time.time_ns(), None)
+                version = cache.get(cls.VERSION_KEY)
+            return version if version is not None else time.time_ns()
+        except Exception as e:
+            logger.warning(f"تعذر قراءة إصدار شجرة الحسابات: {e}")
+            return time.time_ns()
+
+    @classmethod
+    def bump(cls) -> None:
+        try:
+            cache.incr(cls.VERSION_KEY)
+        except ValueError:
+            cache.add(cls.VERSION_KEY, time.time_ns(), None)
+        except Exception as e:
+            logger.warning(f"تعذر تحديث إصدار شجرة الحسابات: {e}")
+
+    @classmethod
+    def mark_changed(cls) -> None:
+        """تسجيل تعديل في الدليل: زيادة فورية + زيادة أخرى بعد الـ commit"""
+        cls.bump()
+        if connection.in_atomic_block and not any(
+            func is _bump_after_commit for _, func, _ in connection.run_on_commit
+        ):
+            transaction.on_commit(_bump_after_commit)
+
+    @classmethod
+    def current(cls) -> AccountTreeSnapshot:
+        """اللقطة الحالية (يُعاد بناؤها فقط عند تغير الإصدار)"""
+        version = cls.version()
+        snapshot = cls._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+
+        from financial.models.chart_of_accounts import ChartOfAccounts
+
+        rows = ChartOfAccounts.objects.values_list("id", "parent_id", "code", "is_leaf", "is_active")
+        snapshot = AccountTreeSnapshot(version, rows)
+        with cls._lock:
+            cls._snapshot = snapshot
+        return snapshot
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._snapshot = None
+
+
+def _bump_after_commit():
+    AccountTree.bump()
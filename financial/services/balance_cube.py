@@ -0,0 +1,236 @@
+"""
+مكعب أرصدة القوائم المالية (Account × Period Balance Cube)
+- استعلام تجميعي واحد لبنود القيود مقسمة حسب الحساب وشريحة التاريخ ونوع القيد
+  وحالته ومركز التكلفة ومصدر إعادة التقييم
+- كل شريحة تاريخ محصورة بين تاريخي قطع متتاليين، فأي فترة حدودها من تواريخ القطع
+  هي مجموع شرائح متصلة
+- ميزان المراجعة وقائمة الدخل والميزانية والتدفقات النقدية تُشتق منه في الذاكرة
+- الصفوف تُخزن في الكاش بمفتاح يتضمن تواريخ القطع وإصدار دفتر الأستاذ
+"""
+
+import hashlib
+import logging
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, IntegerField, Sum, Value, When
+
+from financial.models.chart_of_accounts import ChartOfAccounts
+from financial.models.journal_entry import JournalEntryLine
+from financial.services.ledger_version import LedgerVersion
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0.00")
+
+# مصادر قيود إعادة تقييم العملة (تُعامل كفروق غير محققة في التدفقات النقدية)
+FX_REVALUATION_SOURCES = ("FXRevaluation", "FXRevaluationRun")
+
+# (account_id, bucket, entry_type, status, cost_center_id, fx_source, debit, credit)
+ACCOUNT, BUCKET, ENTRY_TYPE, STATUS, COST_CENTER, FX_SOURCE, DEBIT, CREDIT = range(8)
+
+
+class BalanceCube:
+    """
+    مكعب أرصدة الحسابات حسب الفترات
+
+    الفترات تُحدد بـ start (شامل) و end (شامل) أو before (غير شامل)؛ إذا طُلب حد
+    غير موجود في تواريخ القطع يُعاد بناء المكعب مرة واحدة بعد إضافته.
+    """
+
+    CACHE_PREFIX = "statement_cube"
+
+    def __init__(self, cutoffs: Iterable[date] = (), label: str = ""):
+        self.label = label
+        self._cutoffs: tuple = tuple(sorted({cutoff for cutoff in cutoffs if cutoff}))
+        self._rows: Optional[List[tuple]] = None
+        self._accounts: Optional[List[ChartOfAccounts]] = None
+        self._account_meta: Dict[int, tuple] = {}
+
+    @classmethod
+    def for_period(
+        cls,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        comp_date_from: Optional[date] = None,
+        comp_date_to: Optional[date] = None,
+        fy_start: Optional[date] = None,
+        comp_fy_start: Optional[date] = None,
+        label: str = "",
+    ) -> "BalanceCube":
+        """مكعب يغطي الفترة الحالية وفترة المقارنة وبداية السنة المالية لكل منهما"""
+        cutoffs = [date_from, comp_date_from, fy_start, comp_fy_start]
+        cutoffs += [day + timedelta(days=1) for day in (date_to, comp_date_to) if day]
+        return cls(cutoffs, label=label)
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    @property
+    def cutoffs(self) -> tuple:
+        return self._cutoffs
+
+    @property
+    def accounts(self) -> List[ChartOfAccounts]:
+        """كل حسابات الدليل مرتبة بالكود (استعلام واحد)"""
+        if self._accounts is None:
+            self._accounts = list(
+                ChartOfAccounts.objects.select_related("account_type", "parent", "currency").order_by("code")
+            )
+            self._account_meta = {
+                acc.id: (acc.account_type.category if acc.account_type else "asset", str(acc.code))
+                for acc in self._accounts
+            }
+        return self._accounts
+
+    def _cache_key(self) -> str:
+        digest = hashlib.md5(repr(self._cutoffs).encode()).hexdigest()
+        return f"{self.CACHE_PREFIX}:{LedgerVersion.current()}:{digest}"
+
+    @property
+    def rows(self) -> List[tuple]:
+        if self._rows is None:
+            timeout = getattr(settings, "STATEMENT_CUBE_CACHE_TIMEOUT", 900)
+            cache_key = self._cache_key() if timeout else None
+            rows = cache.get(cache_key) if cache_key else None
+            if rows is None:
+                rows = self._query_rows()
+                if cache_key:
+                    try:
+                        cache.set(cache_key, rows, timeout)
+                    except Exception as e:
+                        logger.warning(f"تعذر تخزين مكعب الأرصدة في الكاش: {e}")
+            self._rows = rows
+        return self._rows
+
+    def _query_rows(self) -> List[tuple]:
+        if self._cutoffs:
+            bucket = Case(
+                *[
+                    When(journal_entry__date__lt=cutoff, then=Value(index))
+                    for index, cutoff in enumerate(self._cutoffs)
+                ],
+                default=Value(len(self._cutoffs)),
+                output_field=IntegerField(),
+            )
+        else:
+            bucket = Value(0, output_field=IntegerField())
+
+        queryset = (
+            JournalEntryLine.objects.annotate(
+                cube_bucket=bucket,
+                cube_fx_source=Case(
+                    When(journal_entry__source_model__in=FX_REVALUATION_SOURCES, then=Value(True)),
+                    default=Value(False),
+                    output_field=BooleanField(),
+                ),
+            )
+            .values(
+                "account_id", "cube_bucket", "journal_entry__entry_type", "journal_entry__status",
+                "cost_center_id", "cube_fx_source",
+            )
+            .annotate(sum_debit=Sum("debit"), sum_credit=Sum("credit"))
+            .order_by()
+        )
+        return [
+            (
+                row["account_id"], row["cube_bucket"], row["journal_entry__entry_type"],
+                row["journal_entry__status"], row["cost_center_id"], bool(row["cube_fx_source"]),
+                row["sum_debit"] or ZERO, row["sum_credit"] or ZERO,
+            )
+            for row in queryset
+        ]
+
+    def ensure_cutoffs(self, *days: Optional[date]) -> None:
+        """إضافة تواريخ قطع ناقصة (يعيد بناء المكعب عند الحاجة)"""
+        missing = {day for day in days if day and day not in self._cutoffs}
+        if missing:
+            self._cutoffs = tuple(sorted(set(self._cutoffs) | missing))
+            self._rows = None
+
+    # ------------------------------------------------------------------
+    # Slicing
+    # ------------------------------------------------------------------
+
+    def _buckets(self, start: Optional[date], before: Optional[date]) -> range:
+        self.ensure_cutoffs(start, before)
+        low = self._cutoffs.index(start) + 1 if start else 0
+        high = self._cutoffs.index(before) if before else len(self._cutoffs)
+        return range(low, high + 1)
+
+    def _select(
+        self,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        before: Optional[date] = None,
+        categories: Optional[Sequence[str]] = None,
+        account_ids: Optional[Iterable[int]] = None,
+        code_prefixes: Optional[Sequence[str]] = None,
+        statuses: Optional[Sequence[str]] = ("posted",),
+        entry_types: Optional[Sequence[str]] = None,
+        exclude_entry_types: Sequence[str] = (),
+        cost_center_id: Optional[int] = None,
+        fx_source: Optional[bool] = None,
+    ):
+        if end is not None:
+            end_before = end + timedelta(days=1)
+            before = min(before, end_before) if before else end_before
+        buckets = set(self._buckets(start, before))
+        rows = self.rows
+        if categories or code_prefixes:
+            self.accounts  # تحميل تصنيف وكود كل حساب
+        account_ids = set(account_ids) if account_ids is not None else None
+        categories = set(categories) if categories else None
+        code_prefixes = tuple(code_prefixes) if code_prefixes else None
+
+        for row in rows:
+            if row[BUCKET] not in buckets:
+                continue
+            if statuses is not None and row[STATUS] not in statuses:
+                continue
+            if entry_types is not None and row[ENTRY_TYPE] not in entry_types:
+                continue
+            if row[ENTRY_TYPE] in exclude_entry_types:
+                continue
+            if cost_center_id is not None and row[COST_CENTER] != cost_center_id:
+                continue
+            if account_ids is not None and row[ACCOUNT] not in account_ids:
+                continue
+            if categories or code_prefixes:
+                category, code = self._account_meta.get(row[ACCOUNT], (None, ""))
+                if categories and category not in categories:
+                    continue
+                if code_prefixes and not code.startswith(code_prefixes):
+                    continue
+            if fx_source is not None and row[FX_SOURCE] != fx_source:
+                continue
+            yield row
+
+    def totals(self, **filters) -> Dict[int, Dict[str, Decimal]]:
+        """مجاميع المدين والدائن لكل حساب: {account_id: {'sum_debit', 'sum_credit'}}"""
+        result: Dict[int, Dict[str, Decimal]] = {}
+        for row in self._select(**filters):
+            entry = result.setdefault(row[ACCOUNT], {"sum_debit": ZERO, "sum_credit": ZERO})
+            entry["sum_debit"] += row[DEBIT]
+            entry["sum_credit"] += row[CREDIT]
+        return result
+
+    def sum(self, **filters) -> Dict[str, Decimal]:
+        """إجمالي المدين والدائن: {'debit', 'credit'}"""
+        debit = credit = ZERO
+        for row in self._select(**filters):
+            debit += row[DEBIT]
+            credit += row[CREDIT]
+        return {"debit": debit, "credit": credit}
+
+    def account_ids_with_lines(self, statuses: Sequence[str] = ("posted",),
+                               entry_types: Optional[Sequence[str]] = None) -> Set[int]:
+        """الحسابات التي لها بنود (بأي تاريخ) بالحالة ونوع القيد المحددين"""
+        return {
+            row[ACCOUNT] for row in self.rows
+            if row[STATUS] in statuses and (entry_types is None or row[ENTRY_TYPE] in entry_types)
+        }
@@ -11,6 +11,7 @@ from datetime import date, datetime
 
 from ..models.chart_of_accounts import ChartOfAccounts
 from ..models.journal_entry import JournalEntryLine, JournalEntry
+from .ledger_version import LedgerVersion
 
 logger = logging.getLogger(__name__)
 
@@ -49,8 +50,8 @@ class BalanceService:
         else:
             account_obj = account
 
-        # إنشاء مفتاح التخزين المؤقت
-        cache_key = f"balance_{account_obj.id}_{date_from}_{date_to}"
+        # إنشاء مفتاح التخزين المؤقت (يتضمن إصدار دفتر الأستاذ حتى تاريخ النهاية)
+        cache_key = f"balance_{account_obj.id}_{date_from}_{date_to}_{LedgerVersion.token(date_to)}"
 
         if use_cache:
             cached_balance = cache.get(cache_key)
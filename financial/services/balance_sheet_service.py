@@ -12,14 +12,13 @@ from datetime import date, datetime
 from typing import Dict, List, Optional, Any, Union
 from io import BytesIO
 
-from django.db.models import Sum, Q
-from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
 from financial.models.chart_of_accounts import ChartOfAccounts
-from financial.models.journal_entry import JournalEntryLine, AccountingPeriod
+from financial.models.journal_entry import AccountingPeriod
 from financial.models.fiscal_year import FiscalYear
+from financial.services.balance_cube import BalanceCube
 from financial.services.exchange_rate_service import ExchangeRateService
 from financial.services.role_registry import AccountRoleRegistry, AccountRoleNames
 
@@ -40,9 +39,12 @@ class BalanceSheetService:
         hide_zero_balances: bool = False,
         group_by_subtype: bool = True,
         fiscal_year_id: Optional[int] = None,
+        cube: Optional[BalanceCube] = None,
     ) -> Dict[str, Any]:
         """
         إنشاء الميزانية العمومية المعيارية الكاملة طبقاً لمعيار IAS 1
+
+        cube: مكعب أرصدة مشترك مع باقي القوائم (يُبنى تلقائياً إذا لم يُمرر)
         """
         try:
             # 1. تحويل وضبط التواريخ
@@ -86,85 +88,49 @@ class BalanceSheetService:
             ).first()
             is_period_closed = bool(period and getattr(period, 'is_closed', False))
 
-            # 4. الاستعلام الأول: جلب شجرة الحسابات بالكامل مع الأنواع والآباء
-            accounts_qs = ChartOfAccounts.objects.filter(
-                Q(is_active=True) | Q(journal_lines__journal_entry__status='posted') | Q(opening_balance__gt=0)
-            ).distinct().select_related('account_type', 'parent', 'currency').order_by('code')
+            comp_fy_start = None
+            if comparison_date:
+                comp_fy = FiscalYear.objects.filter(start_date__lte=comparison_date, end_date__gte=comparison_date).first()
+                comp_fy_start = comp_fy.start_date if comp_fy else date(comparison_date.year, 1, 1)
 
-            accounts_list = list(accounts_qs)
+            # 4. مكعب الأرصدة: شجرة الحسابات وكل المجاميع المطلوبة من استعلام تجميعي واحد
+            if cube is None:
+                cube = BalanceCube.for_period(
+                    date_to=as_of_date, comp_date_to=comparison_date,
+                    fy_start=fy_start_date, comp_fy_start=comp_fy_start,
+                )
+            posted_account_ids = cube.account_ids_with_lines()
+            accounts_list = [
+                acc for acc in cube.accounts
+                if acc.is_active or acc.id in posted_account_ids or acc.opening_balance > 0
+            ]
             if not accounts_list:
                 return cls._empty_balance_sheet_response(as_of_date, comparison_date, currency_code, currency_symbol)
 
             acc_map = {acc.id: acc for acc in accounts_list}
 
-            # 5. الاستعلام الثاني: تجميع حركات القيود المرحلة حتى as_of_date
-            as_of_query = Q(
-                journal_entry__status='posted',
-                journal_entry__date__lte=as_of_date
-            )
-            as_of_totals = (
-                JournalEntryLine.objects.filter(as_of_query)
-                .values('account_id')
-                .annotate(
-                    sum_debit=Coalesce(Sum('debit'), Decimal('0.00')),
-                    sum_credit=Coalesce(Sum('credit'), Decimal('0.00'))
-                )
-            )
-            as_of_map = {row['account_id']: row for row in as_of_totals}
+            # 5. مجاميع القيود المرحلة حتى as_of_date
+            as_of_map = cube.totals(end=as_of_date)
 
-            # استعلام المقارنة إن وجد
+            # مجاميع المقارنة إن وجدت
             comp_map = {}
             if comparison_date:
-                comp_query = Q(
-                    journal_entry__status='posted',
-                    journal_entry__date__lte=comparison_date
-                )
-                comp_totals = (
-                    JournalEntryLine.objects.filter(comp_query)
-                    .values('account_id')
-                    .annotate(
-                        sum_debit=Coalesce(Sum('debit'), Decimal('0.00')),
-                        sum_credit=Coalesce(Sum('credit'), Decimal('0.00'))
-                    )
-                )
-                comp_map = {row['account_id']: row for row in comp_totals}
+                comp_map = cube.totals(end=comparison_date)
 
             # فحص القيود الافتتاحية المسجلة لمنع ازدواجية حقل opening_balance
-            opening_entries_account_ids = set(
-                JournalEntryLine.objects.filter(
-                    journal_entry__status='posted',
-                    journal_entry__entry_type='opening'
-                ).values_list('account_id', flat=True).distinct()
-            )
+            opening_entries_account_ids = cube.account_ids_with_lines(entry_types=['opening'])
 
             # 6. تسوية أرباح/خسائر السنوات السابقة غير المقفلة تلقائياً (Implicit Retained Earnings)
             net_unclosed_prior_pl = Decimal('0.00')
             if fy_start_date:
-                unclosed_pl = JournalEntryLine.objects.filter(
-                    journal_entry__status='posted',
-                    journal_entry__date__lt=fy_start_date,
-                    account__account_type__category__in=['revenue', 'expense']
-                ).aggregate(
-                    sum_dr=Coalesce(Sum('debit'), Decimal('0.00')),
-                    sum_cr=Coalesce(Sum('credit'), Decimal('0.00'))
-                )
-                net_unclosed_prior_pl = (unclosed_pl['sum_cr'] or Decimal('0.00')) - (unclosed_pl['sum_dr'] or Decimal('0.00'))
+                unclosed_pl = cube.sum(before=fy_start_date, categories=['revenue', 'expense'])
+                net_unclosed_prior_pl = unclosed_pl['credit'] - unclosed_pl['debit']
 
             # تسوية المقارنة للسنوات السابقة غير المقفلة
             comp_unclosed_prior_pl = Decimal('0.00')
-            if comparison_date:
-                comp_fy = FiscalYear.objects.filter(start_date__lte=comparison_date, end_date__gte=comparison_date).first()
-                comp_fy_start = comp_fy.start_date if comp_fy else date(comparison_date.year, 1, 1)
-                if comp_fy_start:
-                    comp_unclosed = JournalEntryLine.objects.filter(
-                        journal_entry__status='posted',
-                        journal_entry__date__lt=comp_fy_start,
-                        account__account_type__category__in=['revenue', 'expense']
-                    ).aggregate(
-                        sum_dr=Coalesce(Sum('debit'), Decimal('0.00')),
-                        sum_cr=Coalesce(Sum('credit'), Decimal('0.00'))
-                    )
-                    comp_unclosed_prior_pl = (comp_unclosed['sum_cr'] or Decimal('0.00')) - (comp_unclosed['sum_dr'] or Decimal('0.00'))
+            if comp_fy_start:
+                comp_unclosed = cube.sum(before=comp_fy_start, categories=['revenue', 'expense'])
+                comp_unclosed_prior_pl = comp_unclosed['credit'] - comp_unclosed['debit']
 
             # 7. حساب صافي رصيد كل حساب نهائي مباشر (Direct Balances)
             direct_balances = {}
@@ -210,35 +176,15 @@ class BalanceSheetService:
 
             # 8. حساب صافي ربح/خسارة الفترة الحالية (Current Period Net Income)
             # الإيرادات والمصروفات بين fy_start_date و as_of_date
-            current_period_pl_query = Q(
-                journal_entry__status='posted',
-                journal_entry__date__gte=fy_start_date,
-                journal_entry__date__lte=as_of_date,
-                account__account_type__category__in=['revenue', 'expense']
-            )
-            cur_pl_totals = JournalEntryLine.objects.filter(current_period_pl_query).aggregate(
-                sum_dr=Coalesce(Sum('debit'), Decimal('0.00')),
-                sum_cr=Coalesce(Sum('credit'), Decimal('0.00'))
-            )
+            cur_pl_totals = cube.sum(start=fy_start_date, end=as_of_date, categories=['revenue', 'expense'])
             # الربح = الدائن (إيرادات) - المدين (مصروفات)
-            current_net_income = (cur_pl_totals['sum_cr'] or Decimal('0.00')) - (cur_pl_totals['sum_dr'] or Decimal('0.00'))
+            current_net_income = cur_pl_totals['credit'] - cur_pl_totals['debit']
 
             # صافي ربح فترة المقارنة
             comp_net_income = Decimal('0.00')
             if comparison_date:
-                comp_fy = FiscalYear.objects.filter(start_date__lte=comparison_date, end_date__gte=comparison_date).first()
-                comp_fy_start = comp_fy.start_date if comp_fy else date(comparison_date.year, 1, 1)
-                comp_pl_query = Q(
-                    journal_entry__status='posted',
-                    journal_entry__date__gte=comp_fy_start,
-                    journal_entry__date__lte=comparison_date,
-                    account__account_type__category__in=['revenue', 'expense']
-                )
-                comp_pl_totals = JournalEntryLine.objects.filter(comp_pl_query).aggregate(
-                    sum_dr=Coalesce(Sum('debit'), Decimal('0.00')),
-                    sum_cr=Coalesce(Sum('credit'), Decimal('0.00'))
-                )
-                comp_net_income = (comp_pl_totals['sum_cr'] or Decimal('0.00')) - (comp_pl_totals['sum_dr'] or Decimal('0.00'))
+                comp_pl_totals = cube.sum(start=comp_fy_start, end=comparison_date, categories=['revenue', 'expense'])
+                comp_net_income = comp_pl_totals['credit'] - comp_pl_totals['debit']
 
             # 9. تدوير أرباح السنوات السابقة غير المقفلة إلى حساب الأرباح المرحلة
             retained_earnings_account = AccountRoleRegistry.get_account_by_role("RETAINED_EARNINGS")
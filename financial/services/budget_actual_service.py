@@ -1,57 +1,83 @@
 from decimal import Decimal
-from typing import Optional, Dict, Any
-from django.db import models
-from django.db.models import Sum, Q
-from django.utils import timezone
+from typing import Optional, Dict, Any, Tuple
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
 from financial.models.cost_center import CostCenter
 from financial.models.chart_of_accounts import ChartOfAccounts
-from financial.models.journal_entry import AccountingPeriod, JournalEntryLine
+from financial.models.journal_entry import AccountingPeriod, JournalEntryLine, JournalEntryLineCostAllocation
 from financial.models.cost_center_budget import CostCenterActualSnapshot
 
+ZERO = Decimal('0.00')
+
 
 class BudgetActualService:
     """
     خدمة احتساب المنفق الفعلي والالتزامات السريعة (< 50ms) وتحديث كاش الرصيد
+
+    CostCenterActualSnapshot هو دفتر الاستهلاك لكل (مركز تكلفة، حساب، فترة):
+    - الترحيل وإلغاء الترحيل يطبقان فرق القيد فقط (apply_entry)
+    - الالتزامات تُحدّث عبر PurchaseCommitmentEngine
+    - الاحتساب الكامل من أسطر القيود عند إنشاء الصف لأول مرة أو عبر update_actual_snapshot
     """
 
+    @staticmethod
+    def _is_debit_nature(account: ChartOfAccounts) -> bool:
+        account_type = getattr(account, 'account_type', None)
+        return bool(account_type) and str(account_type.nature).lower() == 'debit'
+
     @classmethod
-    def update_actual_snapshot(
+    def _net(cls, account: ChartOfAccounts, debit: Decimal, credit: Decimal) -> Decimal:
+        """صافي الحركة حسب طبيعة الحساب"""
+        debit, credit = debit or ZERO, credit or ZERO
+        return debit - credit if cls._is_debit_nature(account) else credit - debit
+
+    @classmethod
+    def compute_actual(
         cls,
         cost_center: CostCenter,
         account: ChartOfAccounts,
         accounting_period: AccountingPeriod,
-    ) -> CostCenterActualSnapshot:
+    ) -> Decimal:
         """
-        حساب المنفق الفعلي من أسطر القيود المرحّلة وتحديث لقطة الأرصدة السريعة
+        احتساب المنفق الفعلي من أسطر القيود المرحّلة باستعلامين مجمعين
+        (الأسطر المباشرة + حصص التوزيع متعددة المراكز)
         """
-        lines = JournalEntryLine.objects.filter(
+        direct = JournalEntryLine.objects.filter(
             journal_entry__status='posted',
             journal_entry__accounting_period=accounting_period,
-            account=account
-        ).filter(
-            models.Q(cost_center=cost_center) | models.Q(cost_allocations__cost_center=cost_center)
-        ).distinct()
-
-        actual_sum = Decimal('0.00')
-        for line in lines.select_related('journal_entry'):
-            if line.cost_center == cost_center:
-                net_amount = (line.debit if account.account_type and account.account_type.nature == 'DEBIT' else line.credit) - (line.credit if account.account_type and account.account_type.nature == 'DEBIT' else line.debit)
-                actual_sum += net_amount
-            for alloc in line.cost_allocations.filter(cost_center=cost_center):
-                net_amount = (alloc.amount or Decimal('0.00'))
-                if account.account_type and account.account_type.nature == 'DEBIT':
-                    actual_sum += net_amount if line.debit > 0 else -net_amount
-                else:
-                    actual_sum += net_amount if line.credit > 0 else -net_amount
+            account=account,
+            cost_center=cost_center,
+        ).aggregate(debit=Sum('debit'), credit=Sum('credit'))
 
-        snapshot, _ = CostCenterActualSnapshot.objects.get_or_create(
+        money = DecimalField(max_digits=15, decimal_places=2)
+        allocations = JournalEntryLineCostAllocation.objects.filter(
+            line__journal_entry__status='posted',
+            line__journal_entry__accounting_period=accounting_period,
+            line__account=account,
             cost_center=cost_center,
-            account=account,
-            accounting_period=accounting_period
+        ).aggregate(
+            debit=Sum(Case(When(line__debit__gt=0, then=F('amount')), default=Value(ZERO), output_field=money)),
+            credit=Sum(Case(When(line__debit__gt=0, then=Value(ZERO)), default=F('amount'), output_field=money)),
         )
-        snapshot.actual_amount = actual_sum
-        snapshot.save(update_fields=['actual_amount', 'updated_at'])
 
+        return cls._net(account, direct['debit'], direct['credit']) + cls._net(
+            account, allocations['debit'], allocations['credit']
+        )
+
+    @classmethod
+    def update_actual_snapshot(
+        cls,
+        cost_center: CostCenter,
+        account: ChartOfAccounts,
+        accounting_period: AccountingPeriod,
+    ) -> CostCenterActualSnapshot:
+        """
+        إعادة احتساب المنفق الفعلي بالكامل من أسطر القيود المرحّلة وتحديث اللقطة (إعادة البناء)
+        """
+        with transaction.atomic():
+            snapshot = cls._locked_snapshot(cost_center, account, accounting_period)
+            snapshot.actual_amount = cls.compute_actual(cost_center, account, accounting_period)
+            snapshot.save(update_fields=['actual_amount', 'updated_at'])
         return snapshot
 
     @classmethod
@@ -59,14 +85,135 @@ class BudgetActualService:
         cls,
         cost_center: CostCenter,
         account: ChartOfAccounts,
-        accounting_period: AccountingPeriod
+        accounting_period: AccountingPeriod,
+        lock: bool = False,
     ) -> Dict[str, Decimal]:
         """
-        جلب الرصيد الفعلي والالتزامات المعلقة فورياً بأداء فائق
+        جلب الرصيد الفعلي والالتزامات المعلقة من دفتر الاستهلاك (قراءة صف واحد)
+        :param lock: قفل الصف حتى نهاية الترانزاكشن (للتحقق من السقف قبل الترحيل)
         """
-        snapshot = cls.update_actual_snapshot(cost_center, account, accounting_period)
+        snapshot = None
+        if not lock:
+            snapshot = CostCenterActualSnapshot.objects.filter(
+                cost_center=cost_center, account=account, accounting_period=accounting_period
+            ).first()
+        if snapshot is None:
+            with transaction.atomic():
+                snapshot = cls._locked_snapshot(cost_center, account, accounting_period)
         return {
             'actual': snapshot.actual_amount,
             'committed': snapshot.committed_amount,
             'total_used': snapshot.actual_amount + snapshot.committed_amount
         }
+
+    @classmethod
+    def entry_consumption(cls, entry) -> Dict[Tuple[int, int], Dict[str, Any]]:
+        """
+        صافي استهلاك القيد لكل (مركز تكلفة، حساب)
+        :return: {(cost_center_id, account_id): {'cost_center', 'account', 'amount', 'gross'}}
+        حيث gross هو مجموع المبالغ المطلقة المستخدم في التحقق من السقف
+        """
+        result: Dict[Tuple[int, int], Dict[str, Any]] = {}
+
+        def add(cost_center, account, debit, credit, gross):
+            row = result.setdefault(
+                (cost_center.id, account.id),
+                {'cost_center': cost_center, 'account': account, 'amount': ZERO, 'gross': ZERO},
+            )
+            row['amount'] += cls._net(account, debit, credit)
+            row['gross'] += gross
+
+        lines = entry.lines.select_related('account__account_type', 'cost_center').prefetch_related(
+            'cost_allocations__cost_center'
+        )
+        for line in lines:
+            if line.cost_center:
+                add(line.cost_center, line.account, line.debit, line.credit,
+                    line.debit if line.debit > 0 else line.credit)
+                continue
+            for alloc in line.cost_allocations.all():
+                amount = alloc.amount or ZERO
+                if line.debit > 0:
+                    add(alloc.cost_center, line.account, amount, ZERO, amount)
+                else:
+                    add(alloc.cost_center, line.account, ZERO, amount, amount)
+        return result
+
+    @classmethod
+    def apply_entry(cls, entry, sign: int = 1, consumption: Optional[Dict] = None) -> None:
+        """
+        تطبيق أثر القيد على دفتر الاستهلاك (sign=1 للترحيل و -1 لإلغاء الترحيل)
+        يُستدعى بعد تغيير حالة القيد داخل ترانزاكشن الترحيل: الصف الموجود يُحدّث بالفرق
+        والصف الجديد يُحتسب بالكامل (فيشمل القيد بحالته الجديدة)
+        """
+        if not entry.accounting_period_id:
+            return
+        if consumption is None:
+            consumption = cls.entry_consumption(entry)
+        for row in consumption.values():
+            snapshot = CostCenterActualSnapshot.objects.select_for_update().filter(
+                cost_center=row['cost_center'], account=row['account'], accounting_period_id=entry.accounting_period_id
+            ).first()
+            if snapshot is None:
+                cls._locked_snapshot(row['cost_center'], row['account'], entry.accounting_period)
+                continue
+            CostCenterActualSnapshot.objects.filter(pk=snapshot.pk).update(
+                actual_amount=F('actual_amount') + row['amount'] * sign
+            )
+
+    @classmethod
+    def rebuild(cls, accounting_period: Optional[AccountingPeriod] = None) -> int:
+        """
+        إعادة احتساب كل صفوف دفتر الاستهلاك (أو صفوف فترة محددة) من أسطر القيود
+        لتسوية أي قيود رُحّلت خارج LedgerCoreService
+        """
+        snapshots = CostCenterActualSnapshot.objects.select_related(
+            'cost_center', 'account__account_type', 'accounting_period'
+        )
+        if accounting_period is not None:
+            snapshots = snapshots.filter(accounting_period=accounting_period)
+        count = 0
+        for snapshot in snapshots.iterator():
+            cls.update_actual_snapshot(snapshot.cost_center, snapshot.account, snapshot.accounting_period)
+            count += 1
+        return count
+
+    @classmethod
+    def set_committed(
+        cls,
+        cost_center: CostCenter,
+        account: ChartOfAccounts,
+        accounting_period: AccountingPeriod,
+        committed: Decimal,
+    ) -> CostCenterActualSnapshot:
+        """
+        تثبيت الالتزامات المعلقة في دفتر الاستهلاك
+        """
+        with transaction.atomic():
+            snapshot = cls._locked_snapshot(cost_center, account, accounting_period)
+            snapshot.committed_amount = committed
+            snapshot.save(update_fields=['committed_amount', 'updated_at'])
+        return snapshot
+
+    @classmethod
+    def _locked_snapshot(
+        cls,
+        cost_center: CostCenter,
+        account: ChartOfAccounts,
+        accounting_period: AccountingPeriod,
+    ) -> CostCenterActualSnapshot:
+        """
+        قراءة صف الاستهلاك مقفولاً، وإنشاؤه بالاحتساب الكامل إن لم يوجد
+        """
+        lookup = dict(cost_center=cost_center, account=account, accounting_period=accounting_period)
+        snapshot = CostCenterActualSnapshot.objects.select_for_update().filter(**lookup).first()
+        if snapshot is not None:
+            return snapshot
+        try:
+            with transaction.atomic():
+                return CostCenterActualSnapshot.objects.create(
+                    **lookup, actual_amount=cls.compute_actual(cost_center, account, accounting_period)
+                )
+        except IntegrityError:
+            # أنشأته عملية أخرى في نفس اللحظة
+            return CostCenterActualSnapshot.objects.select_for_update().get(**lookup)
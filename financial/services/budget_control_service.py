@@ -1,6 +1,9 @@
 from decimal import Decimal
-from typing import Optional
+from typing import Dict, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from financial.models.cost_center import CostCenter
 from financial.models.chart_of_accounts import ChartOfAccounts
@@ -34,31 +37,22 @@ class BudgetControlService:
         if not cost_center or not account or not accounting_period:
             return True
 
-        # جلب أحدث موازنة معتمدة لمركز التكلفة
-        budget = CostCenterBudget.objects.filter(
-            cost_center=cost_center,
-            fiscal_year=accounting_period.fiscal_year,
-            status='APPROVED'
-        ).order_by('-version').first()
-
-        if not budget:
-            return True
-
-        line = CostCenterBudgetLine.objects.filter(budget=budget, account=account).first()
+        # بند أحدث موازنة معتمدة لمركز التكلفة من كاش السنة المالية
+        line = cls.get_budget_lines(accounting_period.fiscal_year_id).get((cost_center.id, account.id))
         if not line:
             return True
 
-        policy = line.control_policy
+        allocated_amount, policy = line
         if policy == 'ALLOW':
             return True
 
-        # حساب الرصيد المستنفذ حالياً
-        actual_info = BudgetActualService.get_actual_and_committed(cost_center, account, accounting_period)
+        # الرصيد المستنفذ حالياً من دفتر الاستهلاك (صف مقفول حتى نهاية ترانزاكشن الترحيل)
+        actual_info = BudgetActualService.get_actual_and_committed(cost_center, account, accounting_period, lock=True)
         total_used = actual_info['total_used']
         projected_used = total_used + amount
 
-        if projected_used > line.allocated_amount:
-            excess = projected_used - line.allocated_amount
+        if projected_used > allocated_amount:
+            excess = projected_used - allocated_amount
 
             # التحقق مما إذا كان هناك طلب تجاوز مقبول استثنائياً
             if policy == 'REQUIRES_APPROVAL' or user:
@@ -77,9 +71,52 @@ class BudgetControlService:
                         'cost_center': cost_center.name,
                         'account': account.name,
                         'excess': excess,
-                        'allocated': line.allocated_amount,
-                        'remaining': line.allocated_amount - total_used
+                        'allocated': allocated_amount,
+                        'remaining': allocated_amount - total_used
                     }
                 )
 
         return True
+
+    @classmethod
+    def get_budget_lines(cls, fiscal_year_id: Optional[int]) -> Dict[Tuple[int, int], Tuple[Decimal, str]]:
+        """
+        بنود أحدث موازنة معتمدة لكل مركز تكلفة في السنة المالية
+        :return: {(cost_center_id, account_id): (allocated_amount, control_policy)}
+        """
+        if not fiscal_year_id:
+            return {}
+        key = cls._cache_key(fiscal_year_id)
+        lines = cache.get(key)
+        if lines is not None:
+            return lines
+
+        latest_budgets = {}
+        for budget_id, cost_center_id in CostCenterBudget.objects.filter(
+            fiscal_year_id=fiscal_year_id, status='APPROVED'
+        ).order_by('cost_center_id', '-version').values_list('id', 'cost_center_id'):
+            latest_budgets.setdefault(cost_center_id, budget_id)
+
+        lines = {
+            (cost_center_id, account_id): (allocated, policy)
+            for cost_center_id, account_id, allocated, policy in CostCenterBudgetLine.objects.filter(
+                budget_id__in=latest_budgets.values()
+            ).values_list('budget__cost_center_id', 'account_id', 'allocated_amount', 'control_policy')
+        }
+        cache.set(key, lines, getattr(settings, 'BUDGET_LINES_CACHE_TIMEOUT', 3600))
+        return lines
+
+    @classmethod
+    def invalidate_budget_lines(cls, fiscal_year_id: Optional[int]) -> None:
+        """
+        إبطال كاش بنود الموازنة للسنة المالية (فوراً وبعد الـ commit)
+        """
+        if not fiscal_year_id:
+            return
+        key = cls._cache_key(fiscal_year_id)
+        cache.delete(key)
+        transaction.on_commit(lambda: cache.delete(key))
+
+    @staticmethod
+    def _cache_key(fiscal_year_id: int) -> str:
+        return f"budget_lines_fy_{fiscal_year_id}"
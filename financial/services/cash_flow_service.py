@@ -13,14 +13,13 @@ from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Any, Union
 from io import BytesIO
 
-from django.db.models import Sum, Q, F
-from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
 from financial.models.chart_of_accounts import ChartOfAccounts
 from financial.models.journal_entry import JournalEntryLine, JournalEntry
 from financial.models.cost_center import CostCenter
+from financial.services.balance_cube import ZERO, BalanceCube
 from financial.services.exchange_rate_service import ExchangeRateService
 from financial.services.income_statement_service import IncomeStatementService
 
@@ -43,9 +42,12 @@ class CashFlowService:
         account_level: Optional[Union[int, str]] = None,
         hide_zero_balances: bool = False,
         include_unposted: bool = False,
+        cube: Optional[BalanceCube] = None,
     ) -> Dict[str, Any]:
         """
         توليد قائمة التدفقات النقدية وفق الطريقة غير المباشرة المتقدمة مع فحص المطابقة الشامل.
+
+        cube: مكعب أرصدة مشترك مع باقي القوائم (يُبنى تلقائياً إذا لم يُمرر)
         """
         try:
             # 1. ضبط التواريخ والفترة الأساسية
@@ -92,6 +94,14 @@ class CashFlowService:
             currency_code = functional_currency.code if functional_currency else "EGP"
             currency_symbol = functional_currency.symbol or currency_code if functional_currency else "ج.م"
 
+            # مكعب أرصدة واحد يغطي الفترتين
+            if cube is None:
+                cube = BalanceCube.for_period(
+                    date_from=date_from, date_to=date_to,
+                    comp_date_from=comp_date_from if has_comparison else None,
+                    comp_date_to=comp_date_to if has_comparison else None,
+                )
+
             # 3. حساب بيانات الفترة الحالية
             current_data = cls._calculate_single_period_cash_flow(
                 date_from=date_from,
@@ -100,6 +110,7 @@ class CashFlowService:
                 include_unposted=include_unposted,
                 hide_zero_balances=hide_zero_balances,
                 account_level=account_level,
+                cube=cube,
             )
 
             # 4. حساب بيانات فترة المقارنة إن وجدت
@@ -112,6 +123,7 @@ class CashFlowService:
                     include_unposted=include_unposted,
                     hide_zero_balances=False,
                     account_level=account_level,
+                    cube=cube,
                 )
                 current_data = cls._merge_comparison_data(current_data, comparison_data)
 
@@ -144,71 +156,53 @@ class CashFlowService:
         include_unposted: bool = False,
         hide_zero_balances: bool = False,
         account_level: Optional[Union[int, str]] = None,
+        cube: Optional[BalanceCube] = None,
     ) -> Dict[str, Any]:
         """
         حساب التدفقات النقدية لفترة زمنية محددة وفق الطريقة غير المباشرة (IAS 7)
         """
         # شرط حالة القيود
         status_list = ["posted", "draft"] if include_unposted else ["posted"]
-        prev_day = date_from - timedelta(days=1)
+        cc_id = int(cost_center_id) if cost_center_id and str(cost_center_id).isdigit() else None
+
+        if cube is None:
+            cube = BalanceCube.for_period(date_from=date_from, date_to=date_to)
+
+        def leaf_accounts(prefix):
+            return [
+                acc for acc in cube.accounts
+                if acc.code.startswith(prefix) and acc.is_active and acc.is_leaf
+            ]
+
+        # أرصدة أول وآخر المدة لكل حساب (مع استبعاد قيود الإقفال)
+        balance_filters = {"statuses": status_list, "exclude_entry_types": ["closing"]}
+        beginning_map = cube.totals(before=date_from, **balance_filters)
+        ending_map = cube.totals(end=date_to, **balance_filters)
+        # حركات الفترة
+        period_filters = dict(balance_filters, start=date_from, end=date_to)
+        flow_filters = dict(period_filters, exclude_entry_types=["opening", "closing"])
+
+        def net(totals_map, accounts, debit_nature=True):
+            debit = sum((totals_map.get(acc.id, {}).get("sum_debit", ZERO) for acc in accounts), ZERO)
+            credit = sum((totals_map.get(acc.id, {}).get("sum_credit", ZERO) for acc in accounts), ZERO)
+            return debit - credit if debit_nature else credit - debit
 
         # -------------------------------------------------------------
         # 1. رصيد النقدية وما في حكمها الافتتاحي والختامي الفعلي (حسابات 111)
         # -------------------------------------------------------------
-        cash_accounts_qs = ChartOfAccounts.objects.filter(
-            code__startswith="111",
-            is_active=True,
-            is_leaf=True
-        ).order_by("code")
+        cash_accounts = leaf_accounts("111")
 
         # رصيد النقدية أول المدة (حتى تاريخ ما قبل البداية)
-        opening_cash_agg = JournalEntryLine.objects.filter(
-            account__in=cash_accounts_qs,
-            journal_entry__status__in=status_list,
-            journal_entry__date__lte=prev_day
-        ).exclude(
-            journal_entry__entry_type="closing"
-        ).aggregate(
-            debit=Coalesce(Sum("debit"), Decimal("0")),
-            credit=Coalesce(Sum("credit"), Decimal("0")),
-        )
-        beginning_cash = opening_cash_agg["debit"] - opening_cash_agg["credit"]
+        beginning_cash = net(beginning_map, cash_accounts)
 
         # رصيد النقدية آخر المدة الفعلي من المركز المالي (حتى تاريخ النهاية)
-        actual_ending_cash_agg = JournalEntryLine.objects.filter(
-            account__in=cash_accounts_qs,
-            journal_entry__status__in=status_list,
-            journal_entry__date__lte=date_to
-        ).exclude(
-            journal_entry__entry_type="closing"
-        ).aggregate(
-            debit=Coalesce(Sum("debit"), Decimal("0")),
-            credit=Coalesce(Sum("credit"), Decimal("0")),
-        )
-        actual_ending_cash = actual_ending_cash_agg["debit"] - actual_ending_cash_agg["credit"]
+        actual_ending_cash = net(ending_map, cash_accounts)
 
         # تفاصيل أرصدة الخزائن والبنوك الفردية
         cash_accounts_details = []
-        for acc in cash_accounts_qs:
-            acc_beg_agg = JournalEntryLine.objects.filter(
-                account=acc,
-                journal_entry__status__in=status_list,
-                journal_entry__date__lte=prev_day
-            ).exclude(journal_entry__entry_type="closing").aggregate(
-                d=Coalesce(Sum("debit"), Decimal("0")),
-                c=Coalesce(Sum("credit"), Decimal("0"))
-            )
-            acc_beg = acc_beg_agg["d"] - acc_beg_agg["c"]
-
-            acc_end_agg = JournalEntryLine.objects.filter(
-                account=acc,
-                journal_entry__status__in=status_list,
-                journal_entry__date__lte=date_to
-            ).exclude(journal_entry__entry_type="closing").aggregate(
-                d=Coalesce(Sum("debit"), Decimal("0")),
-                c=Coalesce(Sum("credit"), Decimal("0"))
-            )
-            acc_end = acc_end_agg["d"] - acc_end_agg["c"]
+        for acc in cash_accounts:
+            acc_beg = net(beginning_map, [acc])
+            acc_end = net(ending_map, [acc])
             chg = acc_end - acc_beg
 
             if not hide_zero_balances or acc_beg != 0 or acc_end != 0 or chg != 0:
@@ -230,70 +224,42 @@ class CashFlowService:
             date_to=date_to,
             cost_center_id=cost_center_id,
             include_unposted=include_unposted,
-            hide_zero_balances=False
+            hide_zero_balances=False,
+            cube=cube,
         )
         net_income = inc_report.get("net_income", Decimal("0"))
 
         # -------------------------------------------------------------
         # 3. تسويات البنود غير النقدية (Non-Cash Adjustments)
         # -------------------------------------------------------------
-        period_lines_base = JournalEntryLine.objects.filter(
-            journal_entry__status__in=status_list,
-            journal_entry__date__gte=date_from,
-            journal_entry__date__lte=date_to
-        ).exclude(journal_entry__entry_type="closing")
-
-        if cost_center_id:
-            period_lines_base_cc = period_lines_base.filter(cost_center_id=cost_center_id)
-        else:
-            period_lines_base_cc = period_lines_base
-
         # (أ) مصروف الإهلاك والاستهلاك (52800 / مجمع إهلاك 122)
-        depreciation_agg = period_lines_base_cc.filter(
-            Q(account__code__startswith="528") | Q(account__code__startswith="122")
-        ).aggregate(
-            debit=Coalesce(Sum("debit"), Decimal("0")),
-            credit=Coalesce(Sum("credit"), Decimal("0"))
-        )
+        depreciation_agg = cube.sum(code_prefixes=("528", "122"), cost_center_id=cc_id, **period_filters)
         # في الإهلاك: المصروف مدين ومجمع الإهلاك دائن
         depreciation_exp = depreciation_agg["debit"] if depreciation_agg["debit"] > 0 else depreciation_agg["credit"]
 
         # (ب) مخصصات الديون المشكوك فيها والديون المعدومة (54200)
-        provisions_agg = period_lines_base_cc.filter(
-            account__code__startswith="542"
-        ).aggregate(
-            debit=Coalesce(Sum("debit"), Decimal("0")),
-            credit=Coalesce(Sum("credit"), Decimal("0"))
-        )
+        provisions_agg = cube.sum(code_prefixes=("542",), cost_center_id=cc_id, **period_filters)
         provisions_exp = provisions_agg["debit"] - provisions_agg["credit"]
 
         # (ج) أرباح / خسائر بيع الأصول الثابتة (أرباح 49110 / خسائر 54900)
-        gain_on_disposal_agg = period_lines_base.filter(
-            account__code__startswith="49110"
-        ).aggregate(
-            c=Coalesce(Sum("credit"), Decimal("0")),
-            d=Coalesce(Sum("debit"), Decimal("0"))
-        )
-        gain_on_disposal = gain_on_disposal_agg["c"] - gain_on_disposal_agg["d"]
+        gain_on_disposal_agg = cube.sum(code_prefixes=("49110",), **period_filters)
+        gain_on_disposal = gain_on_disposal_agg["credit"] - gain_on_disposal_agg["debit"]
 
-        loss_on_disposal_agg = period_lines_base.filter(
-            account__code__startswith="549"
-        ).aggregate(
-            d=Coalesce(Sum("debit"), Decimal("0")),
-            c=Coalesce(Sum("credit"), Decimal("0"))
-        )
-        loss_on_disposal = loss_on_disposal_agg["d"] - loss_on_disposal_agg["c"]
+        loss_on_disposal_agg = cube.sum(code_prefixes=("549",), **period_filters)
+        loss_on_disposal = loss_on_disposal_agg["debit"] - loss_on_disposal_agg["credit"]
 
         # (د) فروق تقييم العملة غير المحققة الدفترية (IAS 21 FX Revaluation)
-        unrealized_fx_agg = period_lines_base.filter(
-            Q(journal_entry__entry_type="fx_revaluation") |
-            Q(journal_entry__source_model__in=["FXRevaluation", "FXRevaluationRun"]),
-            account__code__in=["43100", "54300"]
-        ).aggregate(
-            gain=Coalesce(Sum("credit", filter=Q(account__code="43100")), Decimal("0")),
-            loss=Coalesce(Sum("debit", filter=Q(account__code="54300")), Decimal("0")),
-        )
-        unrealized_fx_net = unrealized_fx_agg["gain"] - unrealized_fx_agg["loss"]
+        # قيود نوعها إعادة تقييم، أو قيود مصدرها عملية إعادة التقييم أياً كان نوعها
+        fx_gain_ids = [acc.id for acc in cube.accounts if acc.code == "43100"]
+        fx_loss_ids = [acc.id for acc in cube.accounts if acc.code == "54300"]
+        unrealized_fx_gain = unrealized_fx_loss = ZERO
+        for fx_filters in (
+            {"entry_types": ["fx_revaluation"]},
+            {"fx_source": True, "exclude_entry_types": ["closing", "fx_revaluation"]},
+        ):
+            unrealized_fx_gain += cube.sum(account_ids=fx_gain_ids, **dict(period_filters, **fx_filters))["credit"]
+            unrealized_fx_loss += cube.sum(account_ids=fx_loss_ids, **dict(period_filters, **fx_filters))["debit"]
+        unrealized_fx_net = unrealized_fx_gain - unrealized_fx_loss
 
         # إجمالي تسويات البنود غير النقدية
         # الإهلاك يضاف (+) والمخصصات تضاف (+) والخسائر تضاف (+) والأرباح تخصم (-) وفروق التقييم تخصم (-)
@@ -360,35 +326,13 @@ class CashFlowService:
             prefix = wc_def["code_prefix"]
             is_asset = wc_def["type"] == "asset"
 
-            group_accounts = ChartOfAccounts.objects.filter(
-                code__startswith=prefix,
-                is_active=True,
-                is_leaf=True
-            ).order_by("code")
-
-            if not group_accounts.exists():
+            group_accounts = leaf_accounts(prefix)
+            if not group_accounts:
                 continue
 
             # حساب رصيد بداية ونهاية المجموعة
-            beg_agg = JournalEntryLine.objects.filter(
-                account__in=group_accounts,
-                journal_entry__status__in=status_list,
-                journal_entry__date__lte=prev_day
-            ).exclude(journal_entry__entry_type="closing").aggregate(
-                d=Coalesce(Sum("debit"), Decimal("0")),
-                c=Coalesce(Sum("credit"), Decimal("0"))
-            )
-            group_beg = (beg_agg["d"] - beg_agg["c"]) if is_asset else (beg_agg["c"] - beg_agg["d"])
-
-            end_agg = JournalEntryLine.objects.filter(
-                account__in=group_accounts,
-                journal_entry__status__in=status_list,
-                journal_entry__date__lte=date_to
-            ).exclude(journal_entry__entry_type="closing").aggregate(
-                d=Coalesce(Sum("debit"), Decimal("0")),
-                c=Coalesce(Sum("credit"), Decimal("0"))
-            )
-            group_end = (end_agg["d"] - end_agg["c"]) if is_asset else (end_agg["c"] - end_agg["d"])
+            group_beg = net(beginning_map, group_accounts, debit_nature=is_asset)
+            group_end = net(ending_map, group_accounts, debit_nature=is_asset)
 
             # الأثر على التدفق النقدي:
             # للأصول: نقص الأصل يعني تدفق داخل (+)، زيادة الأصل يعني تدفق خارج (-)
@@ -400,25 +344,8 @@ class CashFlowService:
             # تفاصيل الحسابات الفرعية للشجرة
             sub_nodes = []
             for acc in group_accounts:
-                acc_b_agg = JournalEntryLine.objects.filter(
-                    account=acc,
-                    journal_entry__status__in=status_list,
-                    journal_entry__date__lte=prev_day
-                ).exclude(journal_entry__entry_type="closing").aggregate(
-                    d=Coalesce(Sum("debit"), Decimal("0")),
-                    c=Coalesce(Sum("credit"), Decimal("0"))
-                )
-                acc_b = (acc_b_agg["d"] - acc_b_agg["c"]) if is_asset else (acc_b_agg["c"] - acc_b_agg["d"])
-
-                acc_e_agg = JournalEntryLine.objects.filter(
-                    account=acc,
-                    journal_entry__status__in=status_list,
-                    journal_entry__date__lte=date_to
-                ).exclude(journal_entry__entry_type="closing").aggregate(
-                    d=Coalesce(Sum("debit"), Decimal("0")),
-                    c=Coalesce(Sum("credit"), Decimal("0"))
-                )
-                acc_e = (acc_e_agg["d"] - acc_e_agg["c"]) if is_asset else (acc_e_agg["c"] - acc_e_agg["d"])
+                acc_b = net(beginning_map, [acc], debit_nature=is_asset)
+                acc_e = net(ending_map, [acc], debit_nature=is_asset)
 
                 acc_diff = acc_e - acc_b
                 acc_impact = -acc_diff if is_asset else acc_diff
@@ -455,21 +382,14 @@ class CashFlowService:
         # 5. الأنشطة الاستثمارية (Investing Activities)
         # -------------------------------------------------------------
         # حسابات الأصول الثابتة والمشروعات (121)
-        fixed_asset_accounts = ChartOfAccounts.objects.filter(
-            code__startswith="121",
-            is_active=True,
-            is_leaf=True
-        ).order_by("code")
+        fixed_asset_accounts = leaf_accounts("121")
 
         # مدفوعات شراء الأصول الثابتة (جانب المدين في 121 باستثناء قيود الإقفال والافتتاحية)
-        capex_agg = period_lines_base.filter(
-            account__in=fixed_asset_accounts
-        ).exclude(
-            journal_entry__entry_type__in=["opening", "closing"]
-        ).aggregate(
-            purchases=Coalesce(Sum("debit"), Decimal("0")),
-            sales_cost=Coalesce(Sum("credit"), Decimal("0"))
-        )
+        capex_map = cube.totals(account_ids=[acc.id for acc in fixed_asset_accounts], **flow_filters)
+        capex_agg = {
+            "purchases": sum((row["sum_debit"] for row in capex_map.values()), ZERO),
+            "sales_cost": sum((row["sum_credit"] for row in capex_map.values()), ZERO),
+        }
 
         cash_paid_for_capex = -capex_agg["purchases"]  # تدفق خارج
         cash_from_asset_sales = capex_agg["sales_cost"] + gain_on_disposal - loss_on_disposal  # تدفق داخل
@@ -478,12 +398,8 @@ class CashFlowService:
 
         investing_nodes = []
         for acc in fixed_asset_accounts:
-            acc_mv = period_lines_base.filter(account=acc).exclude(
-                journal_entry__entry_type__in=["opening", "closing"]
-            ).aggregate(
-                d=Coalesce(Sum("debit"), Decimal("0")),
-                c=Coalesce(Sum("credit"), Decimal("0"))
-            )
+            acc_row = capex_map.get(acc.id, {})
+            acc_mv = {"d": acc_row.get("sum_debit", ZERO), "c": acc_row.get("sum_credit", ZERO)}
             net_inv_acc = acc_mv["c"] - acc_mv["d"]
             if not hide_zero_balances or net_inv_acc != 0:
                 investing_nodes.append({
@@ -506,37 +422,16 @@ class CashFlowService:
         # 6. الأنشطة التمويلية (Financing Activities)
         # -------------------------------------------------------------
         # (أ) رأس المال المدفوع (311)
-        capital_agg = period_lines_base.filter(
-            account__code__startswith="311"
-        ).exclude(
-            journal_entry__entry_type__in=["opening", "closing"]
-        ).aggregate(
-            inflow=Coalesce(Sum("credit"), Decimal("0")),
-            outflow=Coalesce(Sum("debit"), Decimal("0"))
-        )
-        capital_cash_impact = capital_agg["inflow"] - capital_agg["outflow"]
+        capital_agg = cube.sum(code_prefixes=("311",), **flow_filters)
+        capital_cash_impact = capital_agg["credit"] - capital_agg["debit"]
 
         # (ب) القروض والتسهيلات الائتمانية والالتزامات طويلة الأجل (216 و 221)
-        debt_agg = period_lines_base.filter(
-            Q(account__code__startswith="216") | Q(account__code__startswith="221")
-        ).exclude(
-            journal_entry__entry_type__in=["opening", "closing"]
-        ).aggregate(
-            borrowings=Coalesce(Sum("credit"), Decimal("0")),
-            repayments=Coalesce(Sum("debit"), Decimal("0"))
-        )
-        debt_cash_impact = debt_agg["borrowings"] - debt_agg["repayments"]
+        debt_agg = cube.sum(code_prefixes=("216", "221"), **flow_filters)
+        debt_cash_impact = debt_agg["credit"] - debt_agg["debit"]
 
         # (ج) التوزيعات النقدية ومسحوبات الشركاء (312 و 215)
-        dividends_agg = period_lines_base.filter(
-            Q(account__code__startswith="312") | Q(account__code__startswith="215")
-        ).exclude(
-            journal_entry__entry_type__in=["opening", "closing"]
-        ).aggregate(
-            withdrawals=Coalesce(Sum("debit"), Decimal("0")),
-            contributions=Coalesce(Sum("credit"), Decimal("0"))
-        )
-        dividends_cash_impact = contributions_amount = dividends_agg["contributions"] - dividends_agg["withdrawals"]
+        dividends_agg = cube.sum(code_prefixes=("312", "215"), **flow_filters)
+        dividends_cash_impact = dividends_agg["credit"] - dividends_agg["debit"]
 
         net_financing_cash_flow = capital_cash_impact + debt_cash_impact + dividends_cash_impact
 
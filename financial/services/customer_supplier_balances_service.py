@@ -47,8 +47,9 @@ class CustomerSupplierBalancesService:
                 "summary": {},
             }
 
-        # جلب جميع العملاء
-        clients = Customer.objects.all().select_related("financial_account")
+        # جلب جميع العملاء وأرصدتهم المجمعة دفعة واحدة
+        clients = list(Customer.objects.all().select_related("financial_account"))
+        balances = self._get_partner_balances("customer", [c.id for c in clients])
 
         accounts_data = []
         total_current = Decimal("0")
@@ -58,7 +59,7 @@ class CustomerSupplierBalancesService:
         total_over_90 = Decimal("0")
 
         for client in clients:
-            account_data = self._calculate_client_balance(client)
+            account_data = self._calculate_client_balance(client, balances.get(client.id, []))
 
             if account_data["total_balance"] > 0:
                 accounts_data.append(account_data)
@@ -131,7 +132,8 @@ class CustomerSupplierBalancesService:
                 "summary": {},
             }
 
-        suppliers = Supplier.objects.filter(is_active=True).select_related("financial_account")
+        suppliers = list(Supplier.objects.filter(is_active=True).select_related("financial_account"))
+        balances = self._get_partner_balances("supplier", [s.id for s in suppliers])
 
         accounts_data = []
         total_current = Decimal("0")
@@ -141,7 +143,7 @@ class CustomerSupplierBalancesService:
         total_over_90 = Decimal("0")
 
         for supplier in suppliers:
-            account_data = self._calculate_supplier_balance(supplier)
+            account_data = self._calculate_supplier_balance(supplier, balances.get(supplier.id, []))
 
             if account_data["total_balance"] > 0:
                 accounts_data.append(account_data)
@@ -200,109 +202,40 @@ class CustomerSupplierBalancesService:
             "as_of_date": self.as_of_date,
         }
 
-    def _calculate_client_balance(self, client) -> Dict[str, Any]:
+    def _get_partner_balances(self, partner_type: str, partner_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        أرصدة وأعمار ديون الشركاء من لقطات الأرصدة (أو احتساب مجمع لتاريخ سابق)
+        """
+        from financial.services.partner_balance_snapshot_service import PartnerBalanceSnapshotService
+
+        return PartnerBalanceSnapshotService.get_balances(partner_type, partner_ids, as_of_date=self.as_of_date)
+
+    def _calculate_client_balance(self, client, balances: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """حساب رصيد العميل حسب فترات الاستحقاق"""
-        try:
-            from sale.models import Sale
-        except ImportError:
-            return self._empty_balance(client.code if hasattr(client, 'code') else '', client.name)
-
-        sales = Sale.objects.filter(
-            customer=client,
-            issue_date__lte=self.as_of_date
-        ).exclude(payment_status='paid')
-
-        current = Decimal("0")
-        days_1_30 = Decimal("0")
-        days_31_60 = Decimal("0")
-        days_61_90 = Decimal("0")
-        over_90 = Decimal("0")
-
-        for sale in sales:
-            due_date = sale.due_date or sale.issue_date
-            remaining = getattr(sale, 'remaining_amount', getattr(sale, 'grand_total', Decimal("0"))) or Decimal("0")
-
-            if remaining <= 0:
-                continue
-
-            if due_date > self.as_of_date:
-                current += remaining
-            else:
-                days_overdue = (self.as_of_date - due_date).days
-                if days_overdue <= 30:
-                    days_1_30 += remaining
-                elif days_overdue <= 60:
-                    days_31_60 += remaining
-                elif days_overdue <= 90:
-                    days_61_90 += remaining
-                else:
-                    over_90 += remaining
-
-        total_balance = current + days_1_30 + days_31_60 + days_61_90 + over_90
+        if balances is None:
+            balances = self._get_partner_balances("customer", [client.id]).get(client.id, [])
         account_code = client.financial_account.code if getattr(client, "financial_account", None) else (client.code or "")
+        return self._aging_row(account_code, client.name, balances)
 
-        return {
-            "account_code": account_code,
-            "account_name": client.name,
-            "current": current,
-            "days_1_30": days_1_30,
-            "days_31_60": days_31_60,
-            "days_61_90": days_61_90,
-            "over_90": over_90,
-            "total_balance": total_balance,
-        }
-
-    def _calculate_supplier_balance(self, supplier) -> Dict[str, Any]:
+    def _calculate_supplier_balance(self, supplier, balances: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
         """حساب رصيد المورد حسب فترات الاستحقاق"""
-        try:
-            from purchase.models import Purchase
-        except ImportError:
-            return self._empty_balance(supplier.code if hasattr(supplier, 'code') else '', supplier.name)
-
-        purchases = Purchase.objects.filter(
-            supplier=supplier,
-            date__lte=self.as_of_date
-        ).exclude(payment_status='paid')
-
-        current = Decimal("0")
-        days_1_30 = Decimal("0")
-        days_31_60 = Decimal("0")
-        days_61_90 = Decimal("0")
-        over_90 = Decimal("0")
-
-        for purchase in purchases:
-            due_date = purchase.due_date or purchase.date
-            remaining = getattr(purchase, 'remaining_amount', getattr(purchase, 'total', Decimal("0"))) or Decimal("0")
-
-            if remaining <= 0:
-                continue
-
-            if due_date > self.as_of_date:
-                current += remaining
-            else:
-                days_overdue = (self.as_of_date - due_date).days
-                if days_overdue <= 30:
-                    days_1_30 += remaining
-                elif days_overdue <= 60:
-                    days_31_60 += remaining
-                elif days_overdue <= 90:
-                    days_61_90 += remaining
-                else:
-                    over_90 += remaining
-
-        total_balance = current + days_1_30 + days_31_60 + days_61_90 + over_90
+        if balances is None:
+            balances = self._get_partner_balances("supplier", [supplier.id]).get(supplier.id, [])
         account_code = supplier.financial_account.code if getattr(supplier, "financial_account", None) else (supplier.code or "")
-
-        return {
-            "account_code": account_code,
-            "account_name": supplier.name,
-            "current": current,
-            "days_1_30": days_1_30,
-            "days_31_60": days_31_60,
-            "days_61_90": days_61_90,
-            "over_90": over_90,
-            "total_balance": total_balance,
-        }
+        return self._aging_row(account_code, supplier.name, balances)
+
+    def _aging_row(self, code: str, name: str, balances: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """تجميع أعمار الديون بالعملة الوظيفية لكل عملات الشريك"""
+        row = self._empty_balance(code, name)
+        # أعمدة التقرير بأيام التأخير بعد أجل 30 يوماً: عمر 31-60 يوماً = تأخير 1-30 يوماً وهكذا
+        for balance in balances:
+            row["current"] += balance["aging_current"]
+            row["days_1_30"] += balance["aging_31_60"]
+            row["days_31_60"] += balance["aging_61_90"]
+            row["days_61_90"] += balance["aging_91_120"]
+            row["over_90"] += balance["aging_over_120"]
+        row["total_balance"] = row["current"] + row["days_1_30"] + row["days_31_60"] + row["days_61_90"] + row["over_90"]
+        return row
 
     def _empty_balance(self, code: str, name: str) -> Dict[str, Any]:
         return {
@@ -100,6 +100,63 @@ class ExchangeRateService:
             f"لا يوجد سعر صرف مسجل بين العملة ({from_code}) والعملة ({to_code}) بتاريخ {date}. يرجى تسجيل سعر الصرف رسمياً في النظام أولاً."
         )
 
+    @classmethod
+    def get_closing_rates(cls, to_code: Optional[str] = None, date=None) -> Dict[str, Decimal]:
+        """
+        جدول أسعار الإقفال لكل العملات مقابل عملة واحدة بتاريخ معين باستعلامين مهما كان عدد العملات
+        (نفس أولوية get_rate: آخر سعر مباشر، ثم مقلوب آخر سعر عكسي)
+
+        Returns:
+            {كود العملة: سعر الإقفال}؛ العملات بدون سعر مسجل حتى التاريخ لا تظهر في الجدول
+        """
+        if to_code is None:
+            func_curr = cls.get_functional_currency()
+            if not func_curr:
+                raise ValidationError("لم يتم تعيين العملة الأساسية الوظيفية للمؤسسة في قاعدة البيانات. يرجى تعيين العملة الأساسية أولاً.")
+            to_code = func_curr.code
+
+        if date is None:
+            date = timezone.now().date()
+
+        # 1. آخر تاريخ سريان لكل زوج عملات يمس العملة المستهدفة
+        latest = list(
+            ExchangeRate.objects.filter(
+                models.Q(to_currency__code=to_code) | models.Q(from_currency__code=to_code),
+                effective_date__lte=date
+            )
+            .values("from_currency_id", "to_currency_id")
+            .annotate(latest_date=models.Max("effective_date"))
+        )
+
+        rates = {to_code: Decimal("1.000000")}
+        if not latest:
+            return rates
+
+        # 2. أسعار تلك التواريخ (الأحدث تسجيلاً أولاً عند تعدد الأسعار في نفس اليوم)
+        condition = models.Q()
+        for row in latest:
+            condition |= models.Q(
+                from_currency_id=row["from_currency_id"],
+                to_currency_id=row["to_currency_id"],
+                effective_date=row["latest_date"]
+            )
+        direct, inverse = {}, {}
+        for from_code, pair_to_code, rate in (
+            ExchangeRate.objects.filter(condition)
+            .order_by("-created_at")
+            .values_list("from_currency__code", "to_currency__code", "rate")
+        ):
+            if pair_to_code == to_code and from_code != to_code:
+                direct.setdefault(from_code, rate)
+            elif from_code == to_code and pair_to_code != to_code:
+                inverse.setdefault(pair_to_code, rate)
+
+        for code, rate in inverse.items():
+            if rate > 0:
+                rates[code] = (Decimal("1.000000") / rate).quantize(Decimal("0.000001"))
+        rates.update(direct)
+        return rates
+
     @classmethod
     def set_rate(cls, from_code: str, to_code: str, rate: Decimal, date=None, source: str = "MANUAL", user=None) -> ExchangeRate:
         """
@@ -12,17 +12,20 @@
 - مؤشر ألتمان للسلامة والتعثر المالي (Altman Z-Score for Private Firms)
 - بطاقة التقييم والصحة المالية الشاملة (Executive Health Scorecard)
 - محرك المقارنة الزمنية بالفترات السابقة مع احتساب فروق التغير
-- استعلامات SQL فائقة السرعة O(1) باستخدام TruncMonth وتصدير Excel المعتمد.
+- إطار أرصدة مجمع باستعلام SQL واحد لكل المؤشرات مع كاش مرتبط بإصدار دفتر الأستاذ وتصدير Excel المعتمد.
 """
 
+import hashlib
 import logging
 from decimal import Decimal, ROUND_HALF_UP
 from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Any, Union
 from io import BytesIO
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Sum, Q, F, Count
-from django.db.models.functions import Coalesce, TruncMonth
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
@@ -30,11 +33,112 @@ from financial.models.chart_of_accounts import ChartOfAccounts
 from financial.models.journal_entry import JournalEntryLine, JournalEntry
 from financial.models.cost_center import CostCenter
 from financial.services.exchange_rate_service import ExchangeRateService
-from financial.services.income_statement_service import IncomeStatementService
+from financial.services.ledger_version import LedgerVersion
 
 logger = logging.getLogger(__name__)
 
 
+class AccountBalanceFrame:
+    """
+    إطار أرصدة الحسابات في الذاكرة (Account Balance Frame)
+    يجلب مجاميع المدين والدائن لكل حساب باستعلام مجمع واحد:
+    - أرصدة تراكمية حتى تواريخ قطع محددة (cut_dates)
+    - حركة فترات محددة (ranges) مع إمكانية فلترة مركز التكلفة
+    ثم تُحسب كل المؤشرات من الإطار بدون استعلامات إضافية.
+    """
+
+    def __init__(
+        self,
+        status_list: List[str],
+        cut_dates: List[date] = (),
+        ranges: Optional[Dict[str, tuple]] = None,
+        cost_center_id: Optional[Union[int, str]] = None,
+    ):
+        """
+        ranges: {اسم الفترة: (من تاريخ, إلى تاريخ, تطبيق فلتر مركز التكلفة)}
+        """
+        self.cut_dates = sorted(set(cut_dates))
+        self.ranges = ranges or {}
+        self.rows: List[Dict[str, Any]] = []
+        self._range_aliases: Dict[str, int] = {}
+        self._load(status_list, cost_center_id)
+
+    def _load(self, status_list: List[str], cost_center_id: Optional[Union[int, str]]) -> None:
+        dates = list(self.cut_dates) + [end for _, end, _ in self.ranges.values()]
+        if not dates:
+            return
+
+        annotations = {}
+        for i, cut in enumerate(self.cut_dates):
+            cond = Q(journal_entry__date__lte=cut)
+            annotations[f"cut_d_{i}"] = Coalesce(Sum("debit", filter=cond), Decimal("0"))
+            annotations[f"cut_c_{i}"] = Coalesce(Sum("credit", filter=cond), Decimal("0"))
+        for i, (name, (start, end, by_cost_center)) in enumerate(self.ranges.items()):
+            cond = Q(journal_entry__date__gte=start, journal_entry__date__lte=end)
+            if by_cost_center and cost_center_id:
+                cond &= Q(cost_center_id=cost_center_id)
+            annotations[f"rng_d_{i}"] = Coalesce(Sum("debit", filter=cond), Decimal("0"))
+            annotations[f"rng_c_{i}"] = Coalesce(Sum("credit", filter=cond), Decimal("0"))
+            self._range_aliases[name] = i
+
+        self.rows = list(
+            JournalEntryLine.objects.filter(
+                journal_entry__status__in=status_list,
+                journal_entry__date__lte=max(dates),
+            )
+            .exclude(journal_entry__entry_type="closing")
+            .values(
+                "account_id",
+                "account__code",
+                "account__is_active",
+                "account__is_leaf",
+                "account__account_type__category",
+            )
+            .order_by()
+            .annotate(**annotations)
+        )
+
+    def _matching_rows(self, prefixes, leaf_only: bool, category: Optional[str], code_lt: Optional[str]):
+        if isinstance(prefixes, str):
+            prefixes = (prefixes,)
+        for row in self.rows:
+            code = row["account__code"] or ""
+            if prefixes and not code.startswith(tuple(prefixes)):
+                continue
+            if leaf_only and not (row["account__is_active"] and row["account__is_leaf"]):
+                continue
+            if category and row["account__account_type__category"] != category:
+                continue
+            if code_lt and not code < code_lt:
+                continue
+            yield row
+
+    def balance(self, prefixes, at: date, leaf_only: bool = True) -> Dict[str, Decimal]:
+        """مجموع المدين والدائن التراكمي حتى تاريخ القطع لحسابات تبدأ بالبادئات"""
+        i = self.cut_dates.index(at)
+        d = c = Decimal("0")
+        for row in self._matching_rows(prefixes, leaf_only, None, None):
+            d += row[f"cut_d_{i}"]
+            c += row[f"cut_c_{i}"]
+        return {"d": d, "c": c}
+
+    def movement(
+        self,
+        name: str,
+        prefixes=(),
+        category: Optional[str] = None,
+        code_lt: Optional[str] = None,
+        leaf_only: bool = False,
+    ) -> Dict[str, Decimal]:
+        """مجموع المدين والدائن لحركة فترة محددة"""
+        i = self._range_aliases[name]
+        d = c = Decimal("0")
+        for row in self._matching_rows(prefixes, leaf_only, category, code_lt):
+            d += row[f"rng_d_{i}"]
+            c += row[f"rng_c_{i}"]
+        return {"d": d, "c": c}
+
+
 class FinancialAnalyticsService:
     """
     خدمة التحليلات والمؤشرات المالية المؤسسية
@@ -49,9 +153,11 @@ class FinancialAnalyticsService:
         comp_date_to: Optional[Union[date, str]] = None,
         cost_center_id: Optional[Union[int, str]] = None,
         include_unposted: bool = False,
+        use_cache: bool = True,
     ) -> Dict[str, Any]:
         """
         توليد كافة التحليلات والمؤشرات المالية التنفيذية للفترة الحالية وفترة المقارنة.
+        النتيجة تُخزن في الكاش بمفتاح يتضمن إصدار دفتر الأستاذ فتُبطل تلقائياً مع أي ترحيل.
         """
         try:
             # 1. ضبط التواريخ والفترة الحالية
@@ -100,36 +206,69 @@ class FinancialAnalyticsService:
             currency_symbol = functional_currency.symbol or currency_code if functional_currency else "ج.م"
             status_list = ["posted", "draft"] if include_unposted else ["posted"]
 
-            # 4. احتساب مؤشرات الفترة الحالية
+            cache_key = None
+            if use_cache:
+                cache_key = cls._get_cache_key(
+                    date_from, date_to, comp_date_from, comp_date_to, cost_center_id, include_unposted
+                )
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    return {**cached, "is_cached": True}
+
+            # 4. تحميل إطار الأرصدة للفترتين والرسوم البيانية باستعلام واحد
+            trend_months = cls._get_trend_months(date_to)
+            ranges = {
+                "expense_period": (date_from, date_to, True),
+                "income_period": (date_from, date_to, True),
+                "comp_income_period": (comp_date_from, comp_date_to, True),
+            }
+            for m_key, _label, m_start, m_end in trend_months:
+                ranges[f"month_{m_key}"] = (m_start, m_end, False)
+            frame = AccountBalanceFrame(
+                status_list=status_list,
+                cut_dates=[
+                    date_from - timedelta(days=1), date_to,
+                    comp_date_from - timedelta(days=1), comp_date_to,
+                ],
+                ranges=ranges,
+                cost_center_id=cost_center_id,
+            )
+
+            # 5. احتساب مؤشرات الفترة الحالية
             curr_metrics = cls._calculate_period_full_metrics(
                 date_from=date_from,
                 date_to=date_to,
                 days_in_period=days_in_period,
                 cost_center_id=cost_center_id,
                 status_list=status_list,
-                include_unposted=include_unposted
+                include_unposted=include_unposted,
+                frame=frame,
+                income_range="income_period",
             )
 
-            # 5. احتساب مؤشرات فترة المقارنة
+            # 6. احتساب مؤشرات فترة المقارنة
             comp_metrics = cls._calculate_period_full_metrics(
                 date_from=comp_date_from,
                 date_to=comp_date_to,
                 days_in_period=comp_days,
                 cost_center_id=cost_center_id,
                 status_list=status_list,
-                include_unposted=include_unposted
+                include_unposted=include_unposted,
+                frame=frame,
+                income_range="comp_income_period",
             )
 
-            # 6. دمج مقارنات التغير (Deltas & Variances)
+            # 7. دمج مقارنات التغير (Deltas & Variances)
             merged_analytics = cls._merge_comparative_deltas(curr_metrics, comp_metrics)
 
-            # 7. الرسوم البيانية: اتجاهات 12 شهراً وتوزيع المصروفات
-            monthly_trends = cls._get_twelve_months_trends(date_to=date_to, status_list=status_list)
+            # 8. الرسوم البيانية: اتجاهات 12 شهراً وتوزيع المصروفات
+            monthly_trends = cls._get_twelve_months_trends(date_to=date_to, status_list=status_list, frame=frame)
             expense_distribution = cls._get_expense_distribution(
                 date_from=date_from,
                 date_to=date_to,
                 cost_center_id=cost_center_id,
-                status_list=status_list
+                status_list=status_list,
+                frame=frame,
             )
 
             # معلومات فلتر مركز التكلفة
@@ -140,7 +279,7 @@ class FinancialAnalyticsService:
                 except Exception:
                     cost_center_obj = None
 
-            return {
+            analytics = {
                 "date_from": date_from,
                 "date_to": date_to,
                 "days_in_period": days_in_period,
@@ -164,11 +303,20 @@ class FinancialAnalyticsService:
                 "monthly_trends": monthly_trends,
                 "expense_distribution": expense_distribution,
             }
+            if cache_key:
+                cache.set(cache_key, analytics, getattr(settings, "FINANCIAL_ANALYTICS_CACHE_TIMEOUT", 3600))
+            return {**analytics, "is_cached": False}
 
         except Exception as e:
             logger.error(f"Error generating complete Financial Analytics: {str(e)}", exc_info=True)
             raise
 
+    @classmethod
+    def _get_cache_key(cls, date_from, date_to, comp_date_from, comp_date_to, cost_center_id, include_unposted) -> str:
+        """مفتاح الكاش: معاملات التقرير + إصدار دفتر الأستاذ"""
+        raw = f"{date_from}_{date_to}_{comp_date_from}_{comp_date_to}_{cost_center_id or ''}_{include_unposted}"
+        return f"fa_analytics_{hashlib.md5(raw.encode()).hexdigest()}_{LedgerVersion.current()}"
+
     @classmethod
     def _calculate_period_full_metrics(
         cls,
@@ -178,72 +326,58 @@ class FinancialAnalyticsService:
         cost_center_id: Optional[Union[int, str]],
         status_list: List[str],
         include_unposted: bool,
+        frame: Optional[AccountBalanceFrame] = None,
+        income_range: str = "income_period",
     ) -> Dict[str, Any]:
         """
         حساب كافة المؤشرات المالية التفصيلية لفترة زمنية محددة.
+
+        income_range: اسم فترة الحركة في الإطار التي تُبنى منها أرقام قائمة الدخل
         """
         prev_day = date_from - timedelta(days=1)
+        if frame is None:
+            frame = AccountBalanceFrame(
+                status_list,
+                cut_dates=[prev_day, date_to],
+                ranges={income_range: (date_from, date_to, True)},
+                cost_center_id=cost_center_id,
+            )
 
         # 1. إجمالي الأصول (1)
-        assets_qs = ChartOfAccounts.objects.filter(code__startswith="1", is_active=True, is_leaf=True)
-        beg_assets_agg = JournalEntryLine.objects.filter(
-            account__in=assets_qs, journal_entry__status__in=status_list, journal_entry__date__lte=prev_day
-        ).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        beg_assets_agg = frame.balance("1", prev_day)
         beginning_assets = max(Decimal("0"), beg_assets_agg["d"] - beg_assets_agg["c"])
 
-        end_assets_agg = JournalEntryLine.objects.filter(
-            account__in=assets_qs, journal_entry__status__in=status_list, journal_entry__date__lte=date_to
-        ).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        end_assets_agg = frame.balance("1", date_to)
         ending_assets = max(Decimal("0"), end_assets_agg["d"] - end_assets_agg["c"])
         avg_assets = (beginning_assets + ending_assets) / 2 if (beginning_assets + ending_assets) > 0 else ending_assets
 
         # 2. إجمالي الخصوم (2)
-        liab_qs = ChartOfAccounts.objects.filter(code__startswith="2", is_active=True, is_leaf=True)
-        end_liab_agg = JournalEntryLine.objects.filter(
-            account__in=liab_qs, journal_entry__status__in=status_list, journal_entry__date__lte=date_to
-        ).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        end_liab_agg = frame.balance("2", date_to)
         ending_liabilities = max(Decimal("0"), end_liab_agg["c"] - end_liab_agg["d"])
 
         # 3. إجمالي حقوق الملكية (3)
-        equity_qs = ChartOfAccounts.objects.filter(code__startswith="3", is_active=True, is_leaf=True)
-        beg_eq_agg = JournalEntryLine.objects.filter(
-            account__in=equity_qs, journal_entry__status__in=status_list, journal_entry__date__lte=prev_day
-        ).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        beg_eq_agg = frame.balance("3", prev_day)
         beginning_equity = beg_eq_agg["c"] - beg_eq_agg["d"]
 
-        end_eq_agg = JournalEntryLine.objects.filter(
-            account__in=equity_qs, journal_entry__status__in=status_list, journal_entry__date__lte=date_to
-        ).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        end_eq_agg = frame.balance("3", date_to)
         ending_equity = end_eq_agg["c"] - end_eq_agg["d"]
         avg_equity = (beginning_equity + ending_equity) / 2 if (beginning_equity + ending_equity) != 0 else ending_equity
 
-        # 4. أرقام قائمة الدخل المعتمدة
-        inc_data = IncomeStatementService.generate_income_statement(
-            date_from=date_from,
-            date_to=date_to,
-            cost_center_id=cost_center_id,
-            include_unposted=include_unposted,
-            hide_zero_balances=False
-        )
-        net_sales = inc_data.get("operating_revenues", {}).get("total", Decimal("0"))
-        net_cogs = inc_data.get("cogs", {}).get("total", Decimal("0"))
-        gross_profit = inc_data.get("gross_profit", Decimal("0"))
-        operating_profit = inc_data.get("operating_profit", Decimal("0"))
-        net_income = inc_data.get("net_income", Decimal("0"))
+        # 4. أرقام قائمة الدخل من نفس الإطار (نفس تبويب IncomeStatementService)
+        income = cls._income_statement_figures(frame, income_range)
+        net_sales = income["net_sales"]
+        net_cogs = income["net_cogs"]
+        gross_profit = income["gross_profit"]
+        operating_profit = income["operating_profit"]
+        net_income = income["net_income"]
         total_expenses = max(Decimal("0"), net_sales - net_income)
 
         # 5. حساب الأرباح المرحلة والاحتياطيات التراكمية لنموذج ألتمان
-        retained_qs = ChartOfAccounts.objects.filter(
-            Q(code__startswith="321") | Q(code__startswith="322"),
-            is_active=True, is_leaf=True
-        )
-        retained_agg = JournalEntryLine.objects.filter(
-            account__in=retained_qs, journal_entry__status__in=status_list, journal_entry__date__lte=date_to
-        ).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        retained_agg = frame.balance(("321", "322"), date_to)
         retained_earnings_total = (retained_agg["c"] - retained_agg["d"]) + net_income
 
         # 6. حساب المحاور التفصيلية
-        liquidity = cls._calculate_liquidity_ratios(date_to, status_list)
+        liquidity = cls._calculate_liquidity_ratios(date_to, status_list, frame=frame)
         profitability = cls._calculate_profitability_ratios(
             net_sales=net_sales,
             net_cogs=net_cogs,
@@ -263,7 +397,8 @@ class FinancialAnalyticsService:
             net_sales=net_sales,
             net_cogs=net_cogs,
             avg_assets=avg_assets,
-            status_list=status_list
+            status_list=status_list,
+            frame=frame,
         )
         dupont = cls._calculate_dupont_model(
             net_margin=profitability["net_margin"],
@@ -301,32 +436,53 @@ class FinancialAnalyticsService:
         }
 
     @classmethod
-    def _calculate_liquidity_ratios(cls, date_to: date, status_list: List[str]) -> Dict[str, Any]:
+    def _income_statement_figures(cls, frame: AccountBalanceFrame, range_name: str) -> Dict[str, Decimal]:
+        """
+        أرقام قائمة الدخل متعددة المراحل من حركة فترة في الإطار:
+        إيرادات النشاط (41) - تكلفة المبيعات (51) = مجمل الربح
+        - المصروفات التشغيلية (52) = الربح التشغيلي
+        + الإيرادات الأخرى - المصروفات الأخرى = صافي الربح
+        """
+        revenue = frame.movement(range_name, category="revenue")
+        operating_revenue = frame.movement(range_name, "41", category="revenue")
+        expense = frame.movement(range_name, category="expense")
+        cogs = frame.movement(range_name, "51", category="expense")
+        operating_expense = frame.movement(range_name, "52", category="expense")
+
+        net_sales = operating_revenue["c"] - operating_revenue["d"]
+        net_cogs = cogs["d"] - cogs["c"]
+        gross_profit = net_sales - net_cogs
+        operating_profit = gross_profit - (operating_expense["d"] - operating_expense["c"])
+        other_revenue = (revenue["c"] - revenue["d"]) - net_sales
+        other_expense = (expense["d"] - expense["c"]) - net_cogs - (operating_expense["d"] - operating_expense["c"])
+        return {
+            "net_sales": net_sales,
+            "net_cogs": net_cogs,
+            "gross_profit": gross_profit,
+            "operating_profit": operating_profit,
+            "net_income": operating_profit + other_revenue - other_expense,
+        }
+
+    @classmethod
+    def _calculate_liquidity_ratios(
+        cls, date_to: date, status_list: List[str], frame: Optional[AccountBalanceFrame] = None
+    ) -> Dict[str, Any]:
         """
         1. حساب نسب السيولة ورأس المال العامل مع المعالجة الصفرية النظيفة
         """
-        cur_assets_qs = ChartOfAccounts.objects.filter(code__startswith="11", is_active=True, is_leaf=True)
-        cur_assets_agg = JournalEntryLine.objects.filter(
-            account__in=cur_assets_qs, journal_entry__status__in=status_list, journal_entry__date__lte=date_to
-        ).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        if frame is None:
+            frame = AccountBalanceFrame(status_list, cut_dates=[date_to])
+
+        cur_assets_agg = frame.balance("11", date_to)
         current_assets = max(Decimal("0"), cur_assets_agg["d"] - cur_assets_agg["c"])
 
-        cash_qs = ChartOfAccounts.objects.filter(code__startswith="111", is_active=True, is_leaf=True)
-        cash_agg = JournalEntryLine.objects.filter(
-            account__in=cash_qs, journal_entry__status__in=status_list, journal_entry__date__lte=date_to
-        ).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        cash_agg = frame.balance("111", date_to)
         cash_equivalents = max(Decimal("0"), cash_agg["d"] - cash_agg["c"])
 
-        inv_qs = ChartOfAccounts.objects.filter(code__startswith="113", is_active=True, is_leaf=True)
-        inv_agg = JournalEntryLine.objects.filter(
-            account__in=inv_qs, journal_entry__status__in=status_list, journal_entry__date__lte=date_to
-        ).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        inv_agg = frame.balance("113", date_to)
         inventory = max(Decimal("0"), inv_agg["d"] - inv_agg["c"])
 
-        cur_liab_qs = ChartOfAccounts.objects.filter(code__startswith="21", is_active=True, is_leaf=True)
-        cur_liab_agg = JournalEntryLine.objects.filter(
-            account__in=cur_liab_qs, journal_entry__status__in=status_list, journal_entry__date__lte=date_to
-        ).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        cur_liab_agg = frame.balance("21", date_to)
         current_liabilities = max(Decimal("0"), cur_liab_agg["c"] - cur_liab_agg["d"])
 
         net_working_capital = current_assets - current_liabilities
@@ -473,33 +629,33 @@ class FinancialAnalyticsService:
         net_sales: Decimal,
         net_cogs: Decimal,
         avg_assets: Decimal,
-        status_list: List[str]
+        status_list: List[str],
+        frame: Optional[AccountBalanceFrame] = None,
     ) -> Dict[str, Any]:
         """
         4. حساب نسب النشاط والكفاءة ودورة التحول النقدي (Cash Conversion Cycle)
         """
         prev_day = date_from - timedelta(days=1)
+        if frame is None:
+            frame = AccountBalanceFrame(status_list, cut_dates=[prev_day, date_to])
 
         # متوسط العملاء (112)
-        ar_qs = ChartOfAccounts.objects.filter(code__startswith="112", is_active=True, is_leaf=True)
-        ar_beg = JournalEntryLine.objects.filter(account__in=ar_qs, journal_entry__status__in=status_list, journal_entry__date__lte=prev_day).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
-        ar_end = JournalEntryLine.objects.filter(account__in=ar_qs, journal_entry__status__in=status_list, journal_entry__date__lte=date_to).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        ar_beg = frame.balance("112", prev_day)
+        ar_end = frame.balance("112", date_to)
         b_ar = max(Decimal("0"), ar_beg["d"] - ar_beg["c"])
         e_ar = max(Decimal("0"), ar_end["d"] - ar_end["c"])
         avg_ar = (b_ar + e_ar) / 2 if (b_ar + e_ar) > 0 else e_ar
 
         # متوسط المخزون (113)
-        inv_qs = ChartOfAccounts.objects.filter(code__startswith="113", is_active=True, is_leaf=True)
-        inv_beg = JournalEntryLine.objects.filter(account__in=inv_qs, journal_entry__status__in=status_list, journal_entry__date__lte=prev_day).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
-        inv_end = JournalEntryLine.objects.filter(account__in=inv_qs, journal_entry__status__in=status_list, journal_entry__date__lte=date_to).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        inv_beg = frame.balance("113", prev_day)
+        inv_end = frame.balance("113", date_to)
         b_inv = max(Decimal("0"), inv_beg["d"] - inv_beg["c"])
         e_inv = max(Decimal("0"), inv_end["d"] - inv_end["c"])
         avg_inv = (b_inv + e_inv) / 2 if (b_inv + e_inv) > 0 else e_inv
 
         # متوسط الموردين (211)
-        ap_qs = ChartOfAccounts.objects.filter(code__startswith="211", is_active=True, is_leaf=True)
-        ap_beg = JournalEntryLine.objects.filter(account__in=ap_qs, journal_entry__status__in=status_list, journal_entry__date__lte=prev_day).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
-        ap_end = JournalEntryLine.objects.filter(account__in=ap_qs, journal_entry__status__in=status_list, journal_entry__date__lte=date_to).exclude(journal_entry__entry_type="closing").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        ap_beg = frame.balance("211", prev_day)
+        ap_end = frame.balance("211", date_to)
         b_ap = max(Decimal("0"), ap_beg["c"] - ap_beg["d"])
         e_ap = max(Decimal("0"), ap_end["c"] - ap_end["d"])
         avg_ap = (b_ap + e_ap) / 2 if (b_ap + e_ap) > 0 else e_ap
@@ -799,68 +955,49 @@ class FinancialAnalyticsService:
         return curr
 
     @classmethod
-    def _get_twelve_months_trends(cls, date_to: date, status_list: List[str]) -> Dict[str, Any]:
+    def _get_trend_months(cls, date_to: date) -> List[tuple]:
         """
-        جلب اتجاهات الإيرادات والمصروفات والأرباح لـ 12 شهراً باستعلام SQL مجمع واحد عبر TruncMonth
+        أشهر الاتجاهات (12 شهراً سابقاً + الشهر الحالي): [(مفتاح, عنوان, بداية, نهاية)]
         """
-        twelve_months_ago = (date_to.replace(day=1) - timedelta(days=365)).replace(day=1)
-
-        monthly_raw = JournalEntryLine.objects.filter(
-            journal_entry__status__in=status_list,
-            journal_entry__date__gte=twelve_months_ago,
-            journal_entry__date__lte=date_to,
-            account__account_type__category__in=["revenue", "expense"]
-        ).exclude(
-            journal_entry__entry_type="closing"
-        ).annotate(
-            month_date=TruncMonth("journal_entry__date")
-        ).values(
-            "month_date", "account__account_type__category"
-        ).annotate(
-            total_debit=Coalesce(Sum("debit"), Decimal("0")),
-            total_credit=Coalesce(Sum("credit"), Decimal("0")),
-        ).order_by("month_date")
-
-        month_map = {}
-        curr_dt = twelve_months_ago
+        curr_dt = (date_to.replace(day=1) - timedelta(days=365)).replace(day=1)
+        months = []
         while curr_dt <= date_to:
-            m_key = curr_dt.strftime("%Y-%m")
-            month_map[m_key] = {
-                "label": curr_dt.strftime("%b %Y"),
-                "revenue": Decimal("0"),
-                "expense": Decimal("0"),
-                "profit": Decimal("0"),
-            }
             next_m = curr_dt.month % 12 + 1
             next_y = curr_dt.year + (1 if curr_dt.month == 12 else 0)
-            curr_dt = date(next_y, next_m, 1)
+            next_dt = date(next_y, next_m, 1)
+            month_end = min(date_to, next_dt - timedelta(days=1))
+            months.append((curr_dt.strftime("%Y-%m"), curr_dt.strftime("%b %Y"), curr_dt, month_end))
+            curr_dt = next_dt
+        return months
 
-        for row in monthly_raw:
-            m_dt = row["month_date"]
-            if not m_dt:
-                continue
-            m_key = m_dt.strftime("%Y-%m")
-            if m_key in month_map:
-                cat = row["account__account_type__category"]
-                d = row["total_debit"]
-                c = row["total_credit"]
-                if cat == "revenue":
-                    month_map[m_key]["revenue"] += (c - d)
-                elif cat == "expense":
-                    month_map[m_key]["expense"] += (d - c)
+    @classmethod
+    def _get_twelve_months_trends(
+        cls, date_to: date, status_list: List[str], frame: Optional[AccountBalanceFrame] = None
+    ) -> Dict[str, Any]:
+        """
+        جلب اتجاهات الإيرادات والمصروفات والأرباح لـ 12 شهراً من إطار الأرصدة
+        """
+        months = cls._get_trend_months(date_to)
+        if frame is None:
+            frame = AccountBalanceFrame(
+                status_list,
+                ranges={f"month_{m_key}": (m_start, m_end, False) for m_key, _label, m_start, m_end in months},
+            )
 
         labels = []
         revenues = []
         expenses = []
         profits = []
 
-        for k in sorted(month_map.keys()):
-            v = month_map[k]
-            p = v["revenue"] - v["expense"]
-            labels.append(v["label"])
-            revenues.append(float(v["revenue"]))
-            expenses.append(float(v["expense"]))
-            profits.append(float(p))
+        for m_key, label, _start, _end in months:
+            rev = frame.movement(f"month_{m_key}", category="revenue")
+            exp = frame.movement(f"month_{m_key}", category="expense")
+            revenue = rev["c"] - rev["d"]
+            expense = exp["d"] - exp["c"]
+            labels.append(label)
+            revenues.append(float(revenue))
+            expenses.append(float(expense))
+            profits.append(float(revenue - expense))
 
         return {
             "labels": labels,
@@ -875,25 +1012,23 @@ class FinancialAnalyticsService:
         date_from: date,
         date_to: date,
         cost_center_id: Optional[Union[int, str]],
-        status_list: List[str]
+        status_list: List[str],
+        frame: Optional[AccountBalanceFrame] = None,
     ) -> Dict[str, Any]:
         """
         توزيع هيكل المصروفات والتكاليف حسب المجموعات المحاسبية الرئيسية
         """
-        lines_qs = JournalEntryLine.objects.filter(
-            journal_entry__status__in=status_list,
-            journal_entry__date__gte=date_from,
-            journal_entry__date__lte=date_to,
-            account__account_type__category="expense"
-        ).exclude(journal_entry__entry_type="closing")
-
-        if cost_center_id:
-            lines_qs = lines_qs.filter(cost_center_id=cost_center_id)
-
-        cogs_agg = lines_qs.filter(account__code__startswith="51").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
-        admin_agg = lines_qs.filter(account__code__startswith="52", account__code__lt="52800").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
-        depr_agg = lines_qs.filter(account__code__startswith="528").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
-        fin_agg = lines_qs.filter(account__code__startswith="54").aggregate(d=Coalesce(Sum("debit"), Decimal("0")), c=Coalesce(Sum("credit"), Decimal("0")))
+        if frame is None:
+            frame = AccountBalanceFrame(
+                status_list,
+                ranges={"expense_period": (date_from, date_to, True)},
+                cost_center_id=cost_center_id,
+            )
+
+        cogs_agg = frame.movement("expense_period", "51", category="expense")
+        admin_agg = frame.movement("expense_period", "52", category="expense", code_lt="52800")
+        depr_agg = frame.movement("expense_period", "528", category="expense")
+        fin_agg = frame.movement("expense_period", "54", category="expense")
 
         cogs_val = max(Decimal("0"), cogs_agg["d"] - cogs_agg["c"])
         admin_val = max(Decimal("0"), admin_agg["d"] - admin_agg["c"])
@@ -4,11 +4,13 @@ FinancialStatementEngine - محرك إنشاء واحتساب القوائم ا
 """
 
 import logging
+from datetime import date, datetime
 from decimal import Decimal
 from typing import Dict, Any, List, Optional
 
 from financial.models.chart_of_accounts import ChartOfAccounts
-from financial.services.financial_reporting_query_service import FinancialReportingQueryService
+from financial.services.account_tree import AccountTree
+from financial.services.balance_cube import ZERO, BalanceCube
 from financial.exceptions import FinancialValidationError
 
 logger = logging.getLogger("financial.statement_engine")
@@ -17,27 +19,82 @@ logger = logging.getLogger("financial.statement_engine")
 class FinancialStatementEngine:
     """
     محرك القوائم المالية القياسية (Standard Financial Statement Engine)
+
+    الأرصدة تُقرأ من مكعب أرصدة واحد (BalanceCube) بدلاً من استعلام لكل حساب،
+    بنفس قواعد LedgerQueryService.get_account_balance: القيود المرحلة حتى التاريخ،
+    والحساب الرئيسي يُجمّع فروعه الطرفية، والرصيد الافتتاحي يضاف لكل حساب مستهدف.
     """
 
+    @staticmethod
+    def _balance_facts(as_of_date: Optional[Any], cube: Optional[BalanceCube]) -> Dict[int, Dict[str, Decimal]]:
+        """
+        أرصدة كل الحسابات حتى التاريخ من مكعب الأرصدة (مرور واحد على صفوفه)
+
+        Returns:
+            {account_id: {'debit', 'credit', 'balance'}}
+        """
+        if isinstance(as_of_date, datetime):
+            as_of_date = as_of_date.date()
+        elif isinstance(as_of_date, str) and as_of_date.strip():
+            as_of_date = datetime.strptime(as_of_date.strip(), "%Y-%m-%d").date()
+        if not isinstance(as_of_date, date):
+            as_of_date = None
+
+        cube = cube if cube is not None else BalanceCube()
+        totals = cube.totals(end=as_of_date)
+        tree = AccountTree.current()
+        accounts_by_id = {acc.id: acc for acc in cube.accounts}
+
+        facts = {}
+        for acc in cube.accounts:
+            # الحساب الرئيسي يُجمّع فروعه الطرفية (مع نفسه كما في get_leaf_descendants)
+            targets = (acc.id,) if acc.is_leaf else tree.leaf_ids(acc.id, include_self=True)
+            debit = credit = opening = ZERO
+            for account_id in targets:
+                row = totals.get(account_id)
+                if row:
+                    debit += row["sum_debit"]
+                    credit += row["sum_credit"]
+                if account_id in accounts_by_id:
+                    opening += accounts_by_id[account_id].opening_balance or ZERO
+
+            category = getattr(acc.account_type, "category", "asset")
+            if str(category).lower() in ["asset", "expense"]:
+                balance = opening + debit - credit
+            else:
+                balance = opening + credit - debit
+            facts[acc.id] = {"account": acc, "debit": debit, "credit": credit, "balance": balance}
+        return facts
+
+    @staticmethod
+    def _group_totals(facts: Dict[int, Dict[str, Any]], code_prefix: str) -> Decimal:
+        """مكافئ FinancialReportingQueryService.get_account_group_totals من خريطة الأرصدة"""
+        total_balance = Decimal("0.00")
+        for fact in facts.values():
+            acc = fact["account"]
+            if acc.is_leaf and acc.code.startswith(code_prefix):
+                total_balance += fact["balance"]
+        return total_balance.quantize(Decimal("0.01"))
+
     @classmethod
     def generate_trial_balance(
         cls,
-        as_of_date: Optional[Any] = None
+        as_of_date: Optional[Any] = None,
+        cube: Optional[BalanceCube] = None,
     ) -> Dict[str, Any]:
         """
         توليد ميزان المراجعة (Trial Balance) مع التحقق المحاسبي من التوازن Sum(Debit) == Sum(Credit)
         """
-        accounts = ChartOfAccounts.objects.filter(is_active=True).order_by("code")
+        facts = cls._balance_facts(as_of_date, cube)
         lines = []
 
         total_debit = Decimal("0.00")
         total_credit = Decimal("0.00")
 
-        for acc in accounts:
-            bal_fact = FinancialReportingQueryService.get_account_balance_fact(
-                account_code=acc.code,
-                as_of_date=as_of_date
-            )
+        for bal_fact in facts.values():
+            acc = bal_fact["account"]
+            if not acc.is_active:
+                continue
 
             debit = Decimal(str(bal_fact.get("debit", "0.00"))).quantize(Decimal("0.01"))
             credit = Decimal(str(bal_fact.get("credit", "0.00"))).quantize(Decimal("0.01"))
@@ -74,15 +131,17 @@ class FinancialStatementEngine:
     @classmethod
     def generate_income_statement(
         cls,
-        as_of_date: Optional[Any] = None
+        as_of_date: Optional[Any] = None,
+        cube: Optional[BalanceCube] = None,
     ) -> Dict[str, Any]:
         """
         توليد قائمة الدخل / الأرباح والخسائر (Income Statement / P&L)
         Formula: Net Income = Total Revenue (4xxxx) - COGS (5xxxx) - Operating Expenses (6xxxx)
         """
-        total_revenue = FinancialReportingQueryService.get_account_group_totals("4", as_of_date=as_of_date)
-        total_cogs = FinancialReportingQueryService.get_account_group_totals("5", as_of_date=as_of_date)
-        total_expenses = FinancialReportingQueryService.get_account_group_totals("6", as_of_date=as_of_date)
+        facts = cls._balance_facts(as_of_date, cube)
+        total_revenue = cls._group_totals(facts, "4")
+        total_cogs = cls._group_totals(facts, "5")
+        total_expenses = cls._group_totals(facts, "6")
 
         # Revenue balances are credit-based
         gross_profit = (abs(total_revenue) - total_cogs).quantize(Decimal("0.01"))
@@ -102,17 +161,21 @@ class FinancialStatementEngine:
     @classmethod
     def generate_balance_sheet(
         cls,
-        as_of_date: Optional[Any] = None
+        as_of_date: Optional[Any] = None,
+        cube: Optional[BalanceCube] = None,
     ) -> Dict[str, Any]:
         """
         توليد الميزانية العمومية والمركز المالي (Balance Sheet)
         Formula: Total Assets (1xxxx) == Total Liabilities (2xxxx) + Total Equity (3xxxx) + Net Income
         """
-        total_assets = FinancialReportingQueryService.get_account_group_totals("1", as_of_date=as_of_date)
-        total_liabilities = FinancialReportingQueryService.get_account_group_totals("2", as_of_date=as_of_date)
-        total_equity = FinancialReportingQueryService.get_account_group_totals("3", as_of_date=as_of_date)
-
-        income_stmt = cls.generate_income_statement(as_of_date=as_of_date)
+        # مكعب واحد يُستخدم أيضاً في قائمة الدخل المضمنة
+        cube = cube if cube is not None else BalanceCube()
+        facts = cls._balance_facts(as_of_date, cube)
+        total_assets = cls._group_totals(facts, "1")
+        total_liabilities = cls._group_totals(facts, "2")
+        total_equity = cls._group_totals(facts, "3")
+
+        income_stmt = cls.generate_income_statement(as_of_date=as_of_date, cube=cube)
         net_income = income_stmt["net_income"]
 
         total_liabilities_and_equity = (abs(total_liabilities) + abs(total_equity) + net_income).quantize(Decimal("0.01"))
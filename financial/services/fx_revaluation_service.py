@@ -2,7 +2,8 @@
 FXRevaluationService - محرك إعادة التقييم الدوري لفروق أسعار الصرف غير المحققة (IAS 21)
 يقوم بفحص الذمم والفواتير المفتوحة (Customer & Supplier Open Transactions) بتاريخ الإقفال،
 ويحسب فروق التقييم الناتجة عن تغير سعر الصرف بين تاريخ الفاتورة وتاريخ الإقفال،
-ويولد قيد تسوية محوكم على حساب فروق التقييم غير المحققة (71020_UNREALIZED_FX_GAIN_LOSS).
+ويولد قيد تسوية محوكم لكل عملة على حساب فروق التقييم غير المحققة (71020_UNREALIZED_FX_GAIN_LOSS)
+يُعكس تلقائياً في أول يوم من الفترة التالية.
 """
 
 import logging
@@ -28,6 +29,10 @@ class FXRevaluationService:
     def calculate_open_items_revaluation(cls, as_of_date=None) -> Dict[str, Any]:
         """
         حساب فروق التقييم غير المحققة لكافة الفواتير والذمم المفتوحة حتى تاريخ معين
+
+        عدد ثابت من الاستعلامات مهما كان عدد البنود أو الحسابات:
+        جدول أسعار الإقفال يُحمل مرة واحدة، والبنود المفتوحة تُقرأ كصفوف values() مع اسم الطرف،
+        وأرصدة الحسابات الأجنبية من تجميع واحد لسطور القيود
         """
         if isinstance(as_of_date, str):
             from datetime import datetime
@@ -43,86 +48,95 @@ class FXRevaluationService:
             raise ValidationError("لم يتم تعيين العملة الأساسية الوظيفية للمؤسسة.")
 
         func_code = func_curr.code
-        customer_items = []
-        supplier_items = []
-        total_unrealized_gain_loss = Decimal("0.00")
-
-        # 1. Open Customer Transactions (AR)
-        ar_open_txs = CustomerTransaction.objects.filter(
-            issue_date__lte=as_of_date,
-            open_amount_foreign__gt=Decimal("0.00")
-        ).exclude(currency=func_code)
-
-        for tx in ar_open_txs:
-            curr_rate = ExchangeRateService.get_rate(tx.currency, func_code, as_of_date)
-            original_func_val = (tx.open_amount_foreign * (tx.exchange_rate or Decimal("1.000000"))).quantize(Decimal("0.01"))
-            closing_func_val = (tx.open_amount_foreign * curr_rate).quantize(Decimal("0.01"))
-            diff = closing_func_val - original_func_val
-
-            customer_items.append({
-                "transaction_id": tx.id,
-                "type": "AR",
-                "customer": tx.customer.name,
-                "currency": tx.currency,
-                "open_foreign": tx.open_amount_foreign,
-                "original_rate": tx.exchange_rate,
-                "closing_rate": curr_rate,
-                "original_functional": original_func_val,
-                "closing_functional": closing_func_val,
-                "unrealized_diff": diff
-            })
-            total_unrealized_gain_loss += diff
-
-        # 2. Open Supplier Transactions (AP)
-        ap_open_txs = SupplierTransaction.objects.filter(
-            issue_date__lte=as_of_date,
-            open_amount_foreign__gt=Decimal("0.00")
-        ).exclude(currency=func_code)
-
-        for tx in ap_open_txs:
-            curr_rate = ExchangeRateService.get_rate(tx.currency, func_code, as_of_date)
-            original_func_val = (tx.open_amount_foreign * (tx.exchange_rate or Decimal("1.000000"))).quantize(Decimal("0.01"))
-            closing_func_val = (tx.open_amount_foreign * curr_rate).quantize(Decimal("0.01"))
-            diff = original_func_val - closing_func_val  # For liabilities, lower closing func val is a gain
-
-            supplier_items.append({
-                "transaction_id": tx.id,
-                "type": "AP",
-                "supplier": tx.supplier.name,
-                "currency": tx.currency,
-                "open_foreign": tx.open_amount_foreign,
-                "original_rate": tx.exchange_rate,
-                "closing_rate": curr_rate,
-                "original_functional": original_func_val,
-                "closing_functional": closing_func_val,
-                "unrealized_diff": diff
+        rates = ExchangeRateService.get_closing_rates(func_code, as_of_date)
+        currency_totals = {}
+
+        def closing_rate(currency_code):
+            if currency_code not in rates:
+                # نفس سياسة الرفض الصارم في get_rate عند غياب السعر
+                rates[currency_code] = ExchangeRateService.get_rate(currency_code, func_code, as_of_date)
+            return rates[currency_code]
+
+        def add_to_currency(currency_code, kind, diff):
+            totals = currency_totals.setdefault(currency_code, {
+                "AR": Decimal("0.00"), "AP": Decimal("0.00"), "CASH": Decimal("0.00"), "total": Decimal("0.00")
             })
-            total_unrealized_gain_loss += diff
+            totals[kind] += diff
+            totals["total"] += diff
+
+        # 1. Open Customer Transactions (AR) & 2. Open Supplier Transactions (AP)
+        open_items = {}
+        for kind, model, partner_key, partner_field in (
+            ("AR", CustomerTransaction, "customer", "customer__name"),
+            ("AP", SupplierTransaction, "supplier", "supplier__name"),
+        ):
+            rows = model.objects.filter(
+                issue_date__lte=as_of_date,
+                open_amount_foreign__gt=Decimal("0.00")
+            ).exclude(currency=func_code).values(
+                "id", "currency", "open_amount_foreign", "exchange_rate", partner_name=models.F(partner_field)
+            ).order_by("id")
+
+            items = []
+            for row in rows:
+                curr_rate = closing_rate(row["currency"])
+                open_foreign = row["open_amount_foreign"]
+                original_func_val = (open_foreign * (row["exchange_rate"] or Decimal("1.000000"))).quantize(Decimal("0.01"))
+                closing_func_val = (open_foreign * curr_rate).quantize(Decimal("0.01"))
+                # For liabilities, lower closing func val is a gain
+                diff = closing_func_val - original_func_val if kind == "AR" else original_func_val - closing_func_val
+
+                items.append({
+                    "transaction_id": row["id"],
+                    "type": kind,
+                    partner_key: row["partner_name"],
+                    "currency": row["currency"],
+                    "open_foreign": open_foreign,
+                    "original_rate": row["exchange_rate"],
+                    "closing_rate": curr_rate,
+                    "original_functional": original_func_val,
+                    "closing_functional": closing_func_val,
+                    "unrealized_diff": diff
+                })
+                add_to_currency(row["currency"], kind, diff)
+            open_items[kind] = items
 
         # 3. Foreign Monetary Cash & Bank Accounts
         from financial.models.chart_of_accounts import ChartOfAccounts
+        from financial.models.journal_entry import JournalEntryLine
         cash_items = []
-        foreign_accounts = ChartOfAccounts.objects.filter(
-            is_active=True,
-            currency__isnull=False
-        ).exclude(currency__code=func_code)
+        foreign_accounts = list(
+            ChartOfAccounts.objects.filter(
+                models.Q(is_cash_account=True) | models.Q(is_bank_account=True),
+                is_active=True,
+                currency__isnull=False
+            ).exclude(currency__code=func_code).select_related("currency", "account_type").order_by("code")
+        )
 
-        for acc in foreign_accounts:
-            if not (acc.is_cash_account or acc.is_bank_account):
-                continue
-            curr_code = acc.currency.code
-            curr_rate = ExchangeRateService.get_rate(curr_code, func_code, as_of_date)
-            
-            # calculate foreign balance
-            open_foreign = acc.opening_balance_foreign if (acc.opening_balance_foreign and acc.opening_balance_foreign != Decimal("0.00")) else (acc.opening_balance or Decimal("0.00"))
-            
-            # Get ledger debit/credit movements
-            lines_aggr = acc.journal_lines.filter(journal_entry__status="posted", journal_entry__date__lte=as_of_date).aggregate(
+        # أرصدة كل الحسابات الأجنبية من تجميع واحد مجمع بالحساب
+        zero_totals = {"f_debit": None, "f_credit": None, "b_debit": None, "b_credit": None}
+        ledger_totals = {
+            row["account_id"]: row
+            for row in JournalEntryLine.objects.filter(
+                account_id__in=[acc.id for acc in foreign_accounts],
+                journal_entry__status="posted",
+                journal_entry__date__lte=as_of_date
+            ).values("account_id").annotate(
                 f_debit=models.Sum("transaction_debit"),
                 f_credit=models.Sum("transaction_credit"),
                 b_debit=models.Sum("debit"),
                 b_credit=models.Sum("credit")
             )
+        } if foreign_accounts else {}
+
+        for acc in foreign_accounts:
+            curr_code = acc.currency.code
+            curr_rate = closing_rate(curr_code)
+
+            # calculate foreign balance
+            open_foreign = acc.opening_balance_foreign if (acc.opening_balance_foreign and acc.opening_balance_foreign != Decimal("0.00")) else (acc.opening_balance or Decimal("0.00"))
+
+            lines_aggr = ledger_totals.get(acc.id, zero_totals)
             f_deb = lines_aggr["f_debit"] or Decimal("0.00")
             f_cred = lines_aggr["f_credit"] or Decimal("0.00")
             b_deb = lines_aggr["b_debit"] or Decimal("0.00")
@@ -152,15 +166,18 @@ class FXRevaluationService:
                         "closing_functional": closing_func_val,
                         "unrealized_diff": diff
                     })
-                    total_unrealized_gain_loss += diff
+                    add_to_currency(curr_code, "CASH", diff)
 
         return {
             "as_of_date": as_of_date,
             "functional_currency": func_code,
-            "customer_items": customer_items,
-            "supplier_items": supplier_items,
+            "customer_items": open_items["AR"],
+            "supplier_items": open_items["AP"],
             "cash_items": cash_items,
-            "total_unrealized_gain_loss": total_unrealized_gain_loss
+            "currency_totals": dict(sorted(currency_totals.items())),
+            "total_unrealized_gain_loss": sum(
+                (totals["total"] for totals in currency_totals.values()), Decimal("0.00")
+            )
         }
 
     @classmethod
@@ -187,6 +204,7 @@ class FXRevaluationService:
 
     @classmethod
     def _get_or_create_ar_revaluation_account(cls):
+        from financial.models.chart_of_accounts import ChartOfAccounts, AccountType
         from financial.services.role_registry import AccountRoleRegistry
         acc = AccountRoleRegistry.get_account_by_role("CUSTOMER_RECEIVABLE_CONTROL")
         if not acc or not acc.is_leaf:
@@ -209,68 +227,119 @@ class FXRevaluationService:
             )
         return acc
 
+    @classmethod
+    def _next_period_start(cls, as_of_date):
+        """أول يوم في الفترة المحاسبية التالية لتاريخ التقييم (أو أول الشهر التالي عند غياب الفترة)"""
+        from datetime import timedelta
+        from financial.models.journal_entry import AccountingPeriod
+
+        period = AccountingPeriod.get_period_for_date(as_of_date)
+        if period:
+            return period.end_date + timedelta(days=1)
+        return (as_of_date.replace(day=1) + timedelta(days=32)).replace(day=1)
+
     @classmethod
     def post_period_end_revaluation(cls, as_of_date=None, user=None) -> Dict[str, Any]:
         """
-        إنشاء وترحيل قيد التقييم الدوري لفروق أسعار الصرف غير المحققة
+        إنشاء وترحيل قيد التقييم الدوري لفروق أسعار الصرف غير المحققة: قيد واحد لكل عملة
+        يُعكس تلقائياً بقيد مؤرخ بأول يوم في الفترة التالية (قيد التقييم لا يتراكم عبر الفترات)
+
+        إعادة التشغيل لنفس التاريخ لا تكرر قيود العملات المرحلة سابقاً (مفتاح منع تكرار لكل عملة)
         """
+        from financial.models.journal_entry import JournalEntry
+
         data = cls.calculate_open_items_revaluation(as_of_date)
         total_diff = data["total_unrealized_gain_loss"]
+        as_of = data["as_of_date"]
+        currency_totals = {
+            code: totals["total"] for code, totals in data["currency_totals"].items()
+            if totals["total"] != Decimal("0.00")
+        }
 
-        if total_diff == Decimal("0.00"):
+        if not currency_totals:
             return {"status": "NO_VARIANCE", "message": "لا توجد فروق تقييم غير محققة للفترة."}
 
+        keys = {code: f"FXREV:{as_of.isoformat()}:{code}" for code in currency_totals}
+        already_posted = set(
+            JournalEntry.objects.filter(idempotency_key__in=keys.values()).values_list("idempotency_key", flat=True)
+        )
+        reversal_date = cls._next_period_start(as_of)
+        source_id = int(as_of.strftime("%Y%m%d"))
+
+        entries = []
         with transaction.atomic():
-            lines = []
             ar_account = cls._get_or_create_ar_revaluation_account()
             fx_account = cls._get_or_create_fx_unrealized_account()
 
-            if total_diff > Decimal("0.00"):
-                # Debit AR Revaluation Adjustment / Credit Unrealized Gain
-                lines.append({
-                    "account": ar_account,
-                    "debit": total_diff,
-                    "credit": Decimal("0.00"),
-                    "description": f"تسوية تقييم ذمم عملاء غير محققة - فترة {data['as_of_date']}"
-                })
-                lines.append({
-                    "account": fx_account,
-                    "debit": Decimal("0.00"),
-                    "credit": total_diff,
-                    "description": f"أرباح فروق تقييم غير محققة (IAS 21) - فترة {data['as_of_date']}"
-                })
-            else:
-                abs_diff = abs(total_diff)
-                # Debit Unrealized Loss / Credit AR Revaluation Adjustment
-                lines.append({
-                    "account": fx_account,
-                    "debit": abs_diff,
-                    "credit": Decimal("0.00"),
-                    "description": f"خسائر فروق تقييم غير محققة (IAS 21) - فترة {data['as_of_date']}"
-                })
-                lines.append({
+            for code, diff in currency_totals.items():
+                if keys[code] in already_posted:
+                    continue
+
+                ar_line = {
                     "account": ar_account,
-                    "debit": Decimal("0.00"),
-                    "credit": abs_diff,
-                    "description": f"تسوية تقييم ذمم عملاء غير محققة - فترة {data['as_of_date']}"
+                    "description": f"تسوية تقييم ذمم {code} غير محققة - فترة {as_of}"
+                }
+                if diff > Decimal("0.00"):
+                    # Debit AR Revaluation Adjustment / Credit Unrealized Gain
+                    lines = [
+                        dict(ar_line, debit=diff, credit=Decimal("0.00")),
+                        {
+                            "account": fx_account,
+                            "debit": Decimal("0.00"),
+                            "credit": diff,
+                            "description": f"أرباح فروق تقييم {code} غير محققة (IAS 21) - فترة {as_of}"
+                        },
+                    ]
+                else:
+                    # Debit Unrealized Loss / Credit AR Revaluation Adjustment
+                    lines = [
+                        {
+                            "account": fx_account,
+                            "debit": abs(diff),
+                            "credit": Decimal("0.00"),
+                            "description": f"خسائر فروق تقييم {code} غير محققة (IAS 21) - فترة {as_of}"
+                        },
+                        dict(ar_line, debit=Decimal("0.00"), credit=abs(diff)),
+                    ]
+
+                draft_entry = LedgerCoreService.create_draft_entry(
+                    date=as_of,
+                    description=f"قيد إعادة التقييم الدوري لفروق الصرف غير المحققة (IAS 21) - {code} - {as_of}",
+                    reference=f"FXREV-{as_of}-{code}",
+                    entry_type="GENERAL",
+                    created_by=user,
+                    lines_data=lines,
+                    idempotency_key=keys[code],
+                    source_module="FINANCIAL",
+                    source_model="FXRevaluation",
+                    source_id=source_id
+                )
+                posted_entry = LedgerCoreService.post_entry(draft_entry.id, user=user)
+                reversal_entry = LedgerCoreService.reverse_entry(
+                    posted_entry.id,
+                    user=user,
+                    reversal_reason=f"عكس تلقائي لقيد تقييم {code} بتاريخ {as_of} في أول الفترة التالية",
+                    reversal_date=reversal_date
+                )
+
+                logger.info(
+                    f"Posted FX Revaluation Entry #{posted_entry.id} ({code}) for date {as_of}, "
+                    f"auto-reversed by #{reversal_entry.id} on {reversal_date}"
+                )
+                entries.append({
+                    "currency": code,
+                    "journal_entry_id": posted_entry.id,
+                    "reversal_entry_id": reversal_entry.id,
+                    "unrealized_gain_loss": diff
                 })
 
-            draft_entry = LedgerCoreService.create_draft_entry(
-                date=data["as_of_date"],
-                description=f"قيد إعادة التقييم الدوري لفروق الصرف غير المحققة (IAS 21) - {data['as_of_date']}",
-                reference=f"FXREV-{data['as_of_date']}",
-                entry_type="GENERAL",
-                created_by=user,
-                lines_data=lines,
-                source_module="FINANCIAL",
-                source_model="FXRevaluation",
-                source_id=int(data["as_of_date"].strftime("%Y%m%d")) if hasattr(data["as_of_date"], "strftime") else int(str(data["as_of_date"]).replace("-", ""))
-            )
-            posted_entry = LedgerCoreService.post_entry(draft_entry.id, user=user)
-
-            logger.info(f"Posted FX Revaluation Entry #{posted_entry.id} for date {data['as_of_date']}")
-            return {
-                "status": "POSTED",
-                "journal_entry_id": posted_entry.id,
-                "total_unrealized_gain_loss": total_diff
-            }
+        if not entries:
+            return {"status": "ALREADY_POSTED", "message": f"قيود تقييم العملات بتاريخ {as_of} مرحلة مسبقاً."}
+
+        return {
+            "status": "POSTED",
+            "entries": entries,
+            "journal_entry_ids": [entry["journal_entry_id"] for entry in entries],
+            "reversal_date": reversal_date,
+            "total_unrealized_gain_loss": total_diff
+        }
@@ -12,15 +12,14 @@ from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Any, Union
 from io import BytesIO
 
-from django.db.models import Sum, Q
-from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
 from financial.models.chart_of_accounts import ChartOfAccounts
-from financial.models.journal_entry import JournalEntryLine, AccountingPeriod
+from financial.models.journal_entry import AccountingPeriod
 from financial.models.fiscal_year import FiscalYear
 from financial.models.cost_center import CostCenter
+from financial.services.balance_cube import BalanceCube
 from financial.services.exchange_rate_service import ExchangeRateService
 
 logger = logging.getLogger(__name__)
@@ -42,9 +41,12 @@ class IncomeStatementService:
         account_level: Optional[Union[int, str]] = None,
         hide_zero_balances: bool = False,
         include_unposted: bool = False,
+        cube: Optional[BalanceCube] = None,
     ) -> Dict[str, Any]:
         """
         إنشاء قائمة الدخل المعيارية متعددة المراحل طبقاً لمعيار IAS 1
+
+        cube: مكعب أرصدة مشترك مع باقي القوائم (يُبنى تلقائياً إذا لم يُمرر)
         """
         try:
             # 1. ضبط التواريخ والفترة
@@ -95,63 +97,35 @@ class IncomeStatementService:
             fiscal_year = FiscalYear.objects.filter(start_date__lte=date_to, end_date__gte=date_to).first()
             is_ytd = bool(fiscal_year and date_from == fiscal_year.start_date)
 
-            # 4. جلب شجرة حسابات الإيرادات والمصروفات
-            accounts_qs = ChartOfAccounts.objects.filter(
-                account_type__category__in=['revenue', 'expense']
-            ).select_related('account_type', 'parent', 'currency').order_by('code')
-
-            accounts_list = list(accounts_qs)
+            # 4. جلب شجرة حسابات الإيرادات والمصروفات من مكعب الأرصدة
+            if cube is None:
+                cube = BalanceCube.for_period(
+                    date_from=date_from, date_to=date_to,
+                    comp_date_from=comp_date_from if has_comparison else None,
+                    comp_date_to=comp_date_to if has_comparison else None,
+                )
+            accounts_list = [
+                acc for acc in cube.accounts
+                if acc.account_type and acc.account_type.category in ('revenue', 'expense')
+            ]
             if not accounts_list:
                 return cls._empty_income_statement_response(date_from, date_to, currency_code, currency_symbol)
 
-            # 5. الاستعلام التجميعي الأساسي للفترة الحالية (مع استبعاد قيود الإقفال)
-            cur_query = Q(
-                journal_entry__date__gte=date_from,
-                journal_entry__date__lte=date_to,
-                account__account_type__category__in=['revenue', 'expense']
-            )
-            # استبعاد قيود الإقفال السنوية
-            cur_query &= ~Q(journal_entry__entry_type='closing')
-
-            if not include_unposted:
-                cur_query &= Q(journal_entry__status='posted')
-
-            if cost_center_id and str(cost_center_id).isdigit():
-                cur_query &= Q(cost_center_id=int(cost_center_id))
-
-            cur_totals = (
-                JournalEntryLine.objects.filter(cur_query)
-                .values('account_id')
-                .annotate(
-                    sum_debit=Coalesce(Sum('debit'), Decimal('0.00')),
-                    sum_credit=Coalesce(Sum('credit'), Decimal('0.00'))
-                )
-            )
-            cur_map = {row['account_id']: row for row in cur_totals}
+            # 5. مجاميع الفترة الحالية (مع استبعاد قيود الإقفال السنوية)
+            period_filters = {
+                'categories': ['revenue', 'expense'],
+                'exclude_entry_types': ['closing'],
+                'statuses': None if include_unposted else ('posted',),
+                'cost_center_id': (
+                    int(cost_center_id) if cost_center_id and str(cost_center_id).isdigit() else None
+                ),
+            }
+            cur_map = cube.totals(start=date_from, end=date_to, **period_filters)
 
-            # 6. استعلام فترة المقارنة إن وجدت
+            # 6. فترة المقارنة إن وجدت
             comp_map = {}
             if has_comparison:
-                comp_query = Q(
-                    journal_entry__date__gte=comp_date_from,
-                    journal_entry__date__lte=comp_date_to,
-                    account__account_type__category__in=['revenue', 'expense']
-                )
-                comp_query &= ~Q(journal_entry__entry_type='closing')
-                if not include_unposted:
-                    comp_query &= Q(journal_entry__status='posted')
-                if cost_center_id and str(cost_center_id).isdigit():
-                    comp_query &= Q(cost_center_id=int(cost_center_id))
-
-                comp_totals = (
-                    JournalEntryLine.objects.filter(comp_query)
-                    .values('account_id')
-                    .annotate(
-                        sum_debit=Coalesce(Sum('debit'), Decimal('0.00')),
-                        sum_credit=Coalesce(Sum('credit'), Decimal('0.00'))
-                    )
-                )
-                comp_map = {row['account_id']: row for row in comp_totals}
+                comp_map = cube.totals(start=comp_date_from, end=comp_date_to, **period_filters)
 
             # 7. حساب صافي رصيد كل حساب نهائي مباشر (Direct Balances with Contra Math)
             direct_balances = {}
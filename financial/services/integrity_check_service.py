@@ -0,0 +1,480 @@
+"""
+محرك فحص سلامة البيانات (Data Integrity Engine)
+- كل فحص استعلام تجميعي واحد (GROUP BY / HAVING أو NOT IN) بدلاً من حلقة على السجلات
+- التشغيل التزايدي يفحص فقط ما أُضيف أو عُدل منذ نقطة التحقق السابقة، إضافة إلى
+  المشاكل المفتوحة لإغلاق ما تم حله
+- النتائج تُحفظ في IntegrityFinding وتقرأها صفحة فحص سلامة البيانات مباشرة
+"""
+
+import logging
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Min, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Trim, Upper
+from django.utils import timezone
+
+from financial.models.chart_of_accounts import ChartOfAccounts
+from financial.models.integrity_check import IntegrityCheckRun, IntegrityFinding
+from financial.models.journal_entry import JournalEntry, JournalEntryLine
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal("0.00")
+AMOUNT = DecimalField(max_digits=18, decimal_places=2)
+
+
+class IntegrityCheckService:
+    """
+    تشغيل فحوصات السلامة وحفظ نتائجها
+    """
+
+    LOCK_KEY = "financial_integrity_check_lock"
+
+    # الفحص -> الخطورة (الفحص ينفذ بالدالة _check_<code>)
+    CHECKS = {
+        "unbalanced_entry": "high",
+        "customer_balance": "medium",
+        "supplier_balance": "medium",
+        "stock_ledger": "high",
+        "orphan_source": "low",
+        "duplicate_account_code": "high",
+        "negative_stock": "medium",
+        "stale_draft_sale": "medium",
+    }
+
+    @classmethod
+    def run(cls, full: bool = False, user=None) -> Optional[IntegrityCheckRun]:
+        """
+        تشغيل كل الفحوصات
+
+        Args:
+            full: فحص كل البيانات بدلاً من الجديد منذ آخر نقطة تحقق
+            user: المستخدم الذي طلب الفحص (اختياري)
+
+        Returns:
+            IntegrityCheckRun أو None إذا كان هناك تشغيل آخر قيد التنفيذ
+        """
+        if not cache.add(cls.LOCK_KEY, "locked", timeout=getattr(settings, "INTEGRITY_CHECK_LOCK_TIMEOUT", 1800)):
+            logger.info("تخطي فحص سلامة البيانات: تشغيل آخر قيد التنفيذ")
+            return None
+
+        try:
+            previous = (
+                IntegrityCheckRun.objects.filter(status="completed").order_by("-started_at", "-id").first()
+            )
+            full = full or previous is None
+            # الحدود العليا تُقرأ قبل الفحص؛ ما يُضاف أثناءه يدخل التشغيل التالي
+            checkpoint = {
+                "journal_entry": JournalEntry.objects.aggregate(max_id=Max("id"))["max_id"] or 0,
+                "journal_line": JournalEntryLine.objects.aggregate(max_id=Max("id"))["max_id"] or 0,
+            }
+            run = IntegrityCheckRun.objects.create(is_full=full, checkpoint=checkpoint, triggered_by=user)
+            scope = None if full else {
+                "journal_entry": previous.checkpoint.get("journal_entry", 0),
+                "journal_line": previous.checkpoint.get("journal_line", 0),
+                "since": previous.started_at,
+            }
+
+            try:
+                summary = {}
+                for check_code, severity in cls.CHECKS.items():
+                    findings, checked_ids = getattr(cls, f"_check_{check_code}")(scope)
+                    summary[check_code] = cls._store(run, check_code, severity, findings, checked_ids)
+
+                run.summary = summary
+                run.status = "completed"
+            except Exception as e:
+                logger.error(f"خطأ في فحص سلامة البيانات: {e}", exc_info=True)
+                run.status = "failed"
+                run.error_message = str(e)
+            run.finished_at = timezone.now()
+            run.save(update_fields=["summary", "status", "error_message", "finished_at"])
+            return run
+        finally:
+            cache.delete(cls.LOCK_KEY)
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _open_ids(cls, check_code: str) -> List[int]:
+        return list(
+            IntegrityFinding.objects.filter(check_code=check_code, status="open").values_list("object_id", flat=True)
+        )
+
+    @classmethod
+    def _store(
+        cls,
+        run: IntegrityCheckRun,
+        check_code: str,
+        severity: str,
+        findings: List[Dict[str, Any]],
+        checked_ids: Optional[Iterable[int]],
+    ) -> Dict[str, int]:
+        """
+        حفظ نتائج فحص: تحديث/إنشاء المشاكل المكتشفة وإغلاق المفتوحة التي فُحصت ولم تعد موجودة
+
+        checked_ids: الكائنات التي شملها الفحص (None = كل الكائنات)
+        """
+        now = timezone.now()
+        found_ids = {finding["object_id"] for finding in findings}
+
+        with transaction.atomic():
+            existing = {
+                finding.object_id: finding
+                for finding in IntegrityFinding.objects.select_for_update().filter(
+                    check_code=check_code, object_id__in=found_ids
+                )
+            }
+            to_create, to_update = [], []
+            for data in findings:
+                finding = existing.get(data["object_id"])
+                if finding is None:
+                    to_create.append(IntegrityFinding(
+                        check_code=check_code, severity=severity, first_run=run, last_run=run, **data
+                    ))
+                    continue
+                for field, value in data.items():
+                    setattr(finding, field, value)
+                if finding.status != "open":
+                    finding.first_run = run
+                finding.status = "open"
+                finding.resolved_at = None
+                finding.last_run = run
+                to_update.append(finding)
+
+            IntegrityFinding.objects.bulk_create(to_create, batch_size=500)
+            if to_update:
+                IntegrityFinding.objects.bulk_update(
+                    to_update,
+                    ["object_type", "object_label", "expected", "actual", "difference", "details",
+                     "status", "resolved_at", "first_run", "last_run"],
+                    batch_size=500,
+                )
+
+            resolved = IntegrityFinding.objects.filter(check_code=check_code, status="open").exclude(
+                object_id__in=found_ids
+            )
+            if checked_ids is not None:
+                resolved = resolved.filter(object_id__in=list(checked_ids))
+            resolved_count = resolved.update(status="resolved", resolved_at=now, last_run=run)
+
+        return {
+            "found": len(findings),
+            "new": len(to_create),
+            "resolved": resolved_count,
+            "open": IntegrityFinding.objects.filter(check_code=check_code, status="open").count(),
+        }
+
+    # ------------------------------------------------------------------
+    # Checks: كل فحص يعيد (المشاكل، معرفات الكائنات التي فُحصت أو None للكل)
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _entry_scope(cls, scope: Optional[Dict[str, Any]], check_code: str, prefix: str = "") -> Optional[Q]:
+        """القيود الجديدة أو المعدلة أو التي أُضيفت لها بنود منذ نقطة التحقق، أو لها مشكلة مفتوحة"""
+        if scope is None:
+            return None
+        touched = JournalEntryLine.objects.filter(id__gt=scope["journal_line"]).values("journal_entry_id")
+        return (
+            Q(**{f"{prefix}id__gt": scope["journal_entry"]})
+            | Q(**{f"{prefix}updated_at__gte": scope["since"]})
+            | Q(**{f"{prefix}id__in": Subquery(touched)})
+            | Q(**{f"{prefix}id__in": cls._open_ids(check_code)})
+        )
+
+    @classmethod
+    def _check_unbalanced_entry(cls, scope):
+        """القيود المرحلة التي لا يتساوى مجموع مدينها ودائنها"""
+        lines = JournalEntryLine.objects.filter(journal_entry__status="posted")
+        entry_scope = cls._entry_scope(scope, "unbalanced_entry", prefix="journal_entry__")
+        if entry_scope is not None:
+            lines = lines.filter(entry_scope)
+
+        rows = (
+            lines.values("journal_entry_id", "journal_entry__number", "journal_entry__date")
+            .annotate(total_debit=Sum("debit"), total_credit=Sum("credit"))
+            .exclude(total_debit=F("total_credit"))
+            .order_by()
+        )
+        findings = [
+            {
+                "object_type": "journal_entry",
+                "object_id": row["journal_entry_id"],
+                "object_label": f"{row['journal_entry__number']} - {row['journal_entry__date']}",
+                "expected": row["total_debit"] or ZERO,
+                "actual": row["total_credit"] or ZERO,
+                "difference": abs((row["total_debit"] or ZERO) - (row["total_credit"] or ZERO)),
+                "details": {},
+            }
+            for row in rows
+        ]
+        checked = None
+        if entry_scope is not None:
+            checked = JournalEntry.objects.filter(cls._entry_scope(scope, "unbalanced_entry")).values_list("id", flat=True)
+        return findings, checked
+
+    @classmethod
+    def _party_balances(cls, scope, check_code: str, model, debit_nature: bool):
+        """
+        مقارنة الرصيد المخزن للعميل/المورد (الدفتر الفرعي) برصيد حسابه في الأستاذ العام
+        باستعلام واحد: JOIN على بنود القيود المرحلة + GROUP BY + HAVING على الفرق
+        """
+        tolerance = Decimal(str(getattr(settings, "INTEGRITY_CHECK_TOLERANCE", "0.01")))
+        posted = Q(financial_account__journal_lines__journal_entry__status="posted")
+        parties = model.objects.filter(financial_account__isnull=False)
+        if scope is not None:
+            touched_accounts = JournalEntryLine.objects.filter(id__gt=scope["journal_line"]).values("account_id")
+            parties = parties.filter(
+                Q(updated_at__gte=scope["since"])
+                | Q(financial_account_id__in=Subquery(touched_accounts))
+                | Q(id__in=cls._open_ids(check_code))
+            )
+
+        gl_debit = Coalesce(Sum("financial_account__journal_lines__debit", filter=posted), Value(ZERO), output_field=AMOUNT)
+        gl_credit = Coalesce(Sum("financial_account__journal_lines__credit", filter=posted), Value(ZERO), output_field=AMOUNT)
+        movement = (F("gl_debit") - F("gl_credit")) if debit_nature else (F("gl_credit") - F("gl_debit"))
+        rows = (
+            parties.annotate(gl_debit=gl_debit, gl_credit=gl_credit)
+            .annotate(
+                gl_balance=ExpressionWrapper(
+                    Coalesce(F("financial_account__opening_balance"), Value(ZERO), output_field=AMOUNT) + movement,
+                    output_field=AMOUNT,
+                )
+            )
+            .annotate(drift=ExpressionWrapper(F("balance") - F("gl_balance"), output_field=AMOUNT))
+            .filter(Q(drift__gt=tolerance) | Q(drift__lt=-tolerance))
+            .values("id", "name", "balance", "gl_balance", "drift", "financial_account__code")
+            .order_by()
+        )
+        findings = [
+            {
+                "object_type": model._meta.model_name,
+                "object_id": row["id"],
+                "object_label": row["name"],
+                "expected": row["gl_balance"],
+                "actual": row["balance"],
+                "difference": abs(row["drift"]),
+                "details": {"account_code": row["financial_account__code"]},
+            }
+            for row in rows
+        ]
+        checked = None if scope is None else parties.values_list("id", flat=True)
+        return findings, checked
+
+    @classmethod
+    def _check_customer_balance(cls, scope):
+        from client.models import Customer
+
+        return cls._party_balances(scope, "customer_balance", Customer, debit_nature=True)
+
+    @classmethod
+    def _check_supplier_balance(cls, scope):
+        from supplier.models import Supplier
+
+        return cls._party_balances(scope, "supplier_balance", Supplier, debit_nature=False)
+
+    @classmethod
+    def _check_stock_ledger(cls, scope):
+        """
+        قيمة المخزون (الكمية × متوسط التكلفة) مقابل رصيد حساب المخزون وفروعه في الأستاذ العام
+        (استعلامان تجميعيان؛ يُفحص في كل تشغيل لأن أي حركة تغيّر الطرفين)
+        """
+        from financial.services.account_tree import AccountTree
+        from financial.services.role_registry import AccountRoleRegistry
+        from product.models import Stock
+
+        inventory_account = AccountRoleRegistry.get_account_by_role("INVENTORY_GENERAL")
+        if not inventory_account:
+            return [], None
+
+        tolerance = Decimal(str(getattr(settings, "INTEGRITY_CHECK_TOLERANCE", "0.01")))
+        account_ids = AccountTree.current().descendant_ids(inventory_account.id, include_self=True)
+        ledger = JournalEntryLine.objects.filter(
+            account_id__in=account_ids, journal_entry__status="posted"
+        ).aggregate(
+            debit=Coalesce(Sum("debit"), Value(ZERO), output_field=AMOUNT),
+            credit=Coalesce(Sum("credit"), Value(ZERO), output_field=AMOUNT),
+        )
+        opening = ChartOfAccounts.objects.filter(id__in=account_ids).aggregate(
+            total=Coalesce(Sum("opening_balance"), Value(ZERO), output_field=AMOUNT)
+        )["total"]
+        ledger_value = opening + ledger["debit"] - ledger["credit"]
+        stock_value = Stock.objects.aggregate(
+            total=Coalesce(
+                Sum(ExpressionWrapper(F("quantity") * F("average_cost"), output_field=AMOUNT)),
+                Value(ZERO),
+                output_field=AMOUNT,
+            )
+        )["total"]
+
+        findings = []
+        difference = (stock_value - ledger_value).quantize(Decimal("0.01"))
+        if abs(difference) > tolerance:
+            findings.append({
+                "object_type": "account",
+                "object_id": inventory_account.id,
+                "object_label": f"{inventory_account.code} - {inventory_account.name}",
+                "expected": ledger_value,
+                "actual": stock_value,
+                "difference": abs(difference),
+                "details": {},
+            })
+        return findings, None
+
+    @classmethod
+    def _check_orphan_source(cls, scope):
+        """القيود التي تشير إلى مستند مصدر (source_model/source_id) محذوف: NOT IN لكل نموذج مصدر"""
+        entries = JournalEntry.objects.filter(source_id__isnull=False).exclude(source_model="")
+        entry_scope = cls._entry_scope(scope, "orphan_source")
+        if entry_scope is not None:
+            entries = entries.filter(entry_scope)
+
+        findings = []
+        pairs = entries.values_list("source_module", "source_model").distinct().order_by()
+        for source_module, source_model in pairs:
+            group = entries.filter(source_module=source_module, source_model=source_model)
+            try:
+                model = apps.get_model(source_module, source_model)
+            except (LookupError, ValueError):
+                model = None
+            if model is not None:
+                group = group.exclude(source_id__in=Subquery(model.objects.values("pk")))
+            for entry_id, number, source_id in group.values_list("id", "number", "source_id"):
+                findings.append({
+                    "object_type": "journal_entry",
+                    "object_id": entry_id,
+                    "object_label": number,
+                    "expected": None,
+                    "actual": None,
+                    "difference": ZERO,
+                    "details": {
+                        "source": f"{source_module}.{source_model}#{source_id}",
+                        "unknown_model": model is None,
+                    },
+                })
+        checked = None if entry_scope is None else entries.values_list("id", flat=True)
+        return findings, checked
+
+    @classmethod
+    def _check_duplicate_account_code(cls, scope):
+        """
+        أكواد الحسابات المكررة بعد توحيد المسافات وحالة الأحرف (GROUP BY / HAVING)
+        المشكلة تُسجل على أقدم حساب في كل مجموعة
+        """
+        rows = (
+            ChartOfAccounts.objects.annotate(normalized_code=Upper(Trim("code")))
+            .values("normalized_code")
+            .annotate(accounts=Count("id"), first_id=Min("id"))
+            .filter(accounts__gt=1)
+            .order_by()
+        )
+        findings = [
+            {
+                "object_type": "account",
+                "object_id": row["first_id"],
+                "object_label": row["normalized_code"],
+                "expected": Decimal("1"),
+                "actual": Decimal(row["accounts"]),
+                "difference": Decimal(row["accounts"] - 1),
+                "details": {},
+            }
+            for row in rows
+        ]
+        return findings, None
+
+    @classmethod
+    def _check_negative_stock(cls, scope):
+        """أرصدة المخزون السالبة لكل منتج في كل مخزن"""
+        from product.models import Stock
+
+        rows = (
+            Stock.objects.filter(quantity__lt=0)
+            .values("id", "quantity", "product__name", "warehouse__name")
+            .order_by()
+        )
+        findings = [
+            {
+                "object_type": "stock",
+                "object_id": row["id"],
+                "object_label": f"{row['product__name']} - {row['warehouse__name']}",
+                "expected": ZERO,
+                "actual": Decimal(row["quantity"]),
+                "difference": abs(Decimal(row["quantity"])),
+                "details": {},
+            }
+            for row in rows
+        ]
+        return findings, None
+
+    @classmethod
+    def _check_stale_draft_sale(cls, scope):
+        """فواتير المبيعات غير المكتملة (مسودة) منذ أكثر من INTEGRITY_CHECK_STALE_SALE_DAYS يوماً"""
+        from sale.models import Sale
+
+        days = getattr(settings, "INTEGRITY_CHECK_STALE_SALE_DAYS", 30)
+        rows = (
+            Sale.objects.filter(status="draft", created_at__lt=timezone.now() - timedelta(days=days))
+            .values("id", "number", "date", "total")
+            .order_by()
+        )
+        findings = [
+            {
+                "object_type": "sale",
+                "object_id": row["id"],
+                "object_label": f"{row['number']} - {row['date']}",
+                "expected": None,
+                "actual": row["total"],
+                "difference": ZERO,
+                "details": {"days": days},
+            }
+            for row in rows
+        ]
+        return findings, None
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def latest_results(cls, details_limit: int = 10) -> Dict[str, Any]:
+        """
+        نتائج الصفحة من جدول المشاكل المفتوحة (بنفس هيكل عرض صفحة فحص السلامة)
+        """
+        results = {
+            "checks": [],
+            "errors": [],
+            "warnings": [],
+            "summary": {"total_checks": 0, "passed": 0, "failed": 0, "warnings": 0},
+            "last_run": IntegrityCheckRun.objects.order_by("-started_at", "-id").first(),
+        }
+        if results["last_run"] is None:
+            return results
+
+        labels = dict(IntegrityFinding.CHECK_CHOICES)
+        for check_code, severity in cls.CHECKS.items():
+            results["summary"]["total_checks"] += 1
+            open_findings = IntegrityFinding.objects.filter(check_code=check_code, status="open")
+            count = open_findings.count()
+            name = str(labels[check_code])
+            if not count:
+                results["checks"].append({"name": name, "status": "passed"})
+                results["summary"]["passed"] += 1
+                continue
+
+            bucket = "errors" if severity == "high" else "warnings"
+            results[bucket].append({
+                "check": name,
+                "count": count,
+                "details": list(open_findings.order_by("-difference", "object_id")[:details_limit]),
+                "severity": severity,
+            })
+            results["summary"]["failed" if bucket == "errors" else "warnings"] += 1
+        return results
@@ -211,7 +211,8 @@ class LedgerCoreService:
             if not entry.is_balanced:
                 raise FinancialCoreError("Cannot post unbalanced journal entry.")
 
-            # الفحص المزدوج وتجميد لقطات مراكز التكلفة والتحقق الوقائي من الموازنة قبل الترحيل
+            # الفحص المزدوج وتجميد لقطات مراكز التكلفة قبل الترحيل
+            from financial.services.budget_actual_service import BudgetActualService
             from financial.services.budget_control_service import BudgetControlService
             for line in entry.lines.all():
                 line.full_clean()
@@ -224,24 +225,17 @@ class LedgerCoreService:
                         'cost_center_name_snapshot',
                         'cost_center_path_snapshot'
                     ])
-                    # التحقق الوقائي من سقف الموازنة المتاحة
-                    amount = line.debit if line.debit > 0 else line.credit
-                    BudgetControlService.validate_budget_limit(
-                        cost_center=line.cost_center,
-                        account=line.account,
-                        accounting_period=entry.accounting_period,
-                        amount=amount,
-                        user=user
-                    )
-                elif line.cost_allocations.exists():
-                    for alloc in line.cost_allocations.all():
-                        BudgetControlService.validate_budget_limit(
-                            cost_center=alloc.cost_center,
-                            account=line.account,
-                            accounting_period=entry.accounting_period,
-                            amount=alloc.amount,
-                            user=user
-                        )
+
+            # التحقق الوقائي من سقف الموازنة المتاحة مرة واحدة لكل (مركز تكلفة، حساب)
+            consumption = BudgetActualService.entry_consumption(entry) if entry.accounting_period_id else {}
+            for row in consumption.values():
+                BudgetControlService.validate_budget_limit(
+                    cost_center=row['cost_center'],
+                    account=row['account'],
+                    accounting_period=entry.accounting_period,
+                    amount=row['gross'],
+                    user=user
+                )
 
             entry.status = "posted"
             entry.posted_at = timezone.now()
@@ -267,23 +261,8 @@ class LedgerCoreService:
                 if existing_ref and existing_ref.journal_entry_id != entry_id:
                     raise DuplicatePostingError(f"[DUPLICATE_POSTING_BLOCKED] Transaction {source_type}:{source_id} already posted.")
 
-            # تحديث كاش لقطات المنفق الفعلي لجميع مراكز التكلفة المرتبطة فور الترحيل
-            from financial.services.budget_actual_service import BudgetActualService
-            for line in entry.lines.all():
-                if entry.accounting_period:
-                    if line.cost_center:
-                        BudgetActualService.update_actual_snapshot(
-                            cost_center=line.cost_center,
-                            account=line.account,
-                            accounting_period=entry.accounting_period
-                        )
-                    elif line.cost_allocations.exists():
-                        for alloc in line.cost_allocations.all():
-                            BudgetActualService.update_actual_snapshot(
-                                cost_center=alloc.cost_center,
-                                account=line.account,
-                                accounting_period=entry.accounting_period
-                            )
+            # تحديث دفتر استهلاك الموازنة بأثر القيد فور الترحيل
+            BudgetActualService.apply_entry(entry, sign=1, consumption=consumption)
 
             if source_type and source_id:
                 from financial.models import FinancialPostingReference
@@ -334,23 +313,9 @@ class LedgerCoreService:
             entry._bypass_period_lock = True
             entry.save(update_fields=['status', 'posted_at', 'posted_by'])
 
-            # تحديث كاش لقطات المنفق الفعلي لجميع مراكز التكلفة المرتبطة
+            # عكس أثر القيد في دفتر استهلاك الموازنة
             from financial.services.budget_actual_service import BudgetActualService
-            for line in entry.lines.all():
-                if entry.accounting_period:
-                    if line.cost_center:
-                        BudgetActualService.update_actual_snapshot(
-                            cost_center=line.cost_center,
-                            account=line.account,
-                            accounting_period=entry.accounting_period
-                        )
-                    elif line.cost_allocations.exists():
-                        for alloc in line.cost_allocations.all():
-                            BudgetActualService.update_actual_snapshot(
-                                cost_center=alloc.cost_center,
-                                account=line.account,
-                                accounting_period=entry.accounting_period
-                            )
+            BudgetActualService.apply_entry(entry, sign=-1)
 
             # تسجيل الحركة في سجل التدقيق AuditTrail
             try:
@@ -372,10 +337,12 @@ class LedgerCoreService:
         cls,
         entry_id: int,
         user,
-        reversal_reason: str = ""
+        reversal_reason: str = "",
+        reversal_date=None
     ) -> JournalEntry:
         """
         العكس المحاسبي الحاكم ذو الـ 3 خطوات الذرية والقائمة البيضاء
+        reversal_date: تاريخ القيد العاكس (افتراضياً اليوم)، مثل أول يوم في الفترة التالية للعكس التلقائي
         """
         with transaction.atomic():
             original_entry = JournalEntry.objects.select_for_update().get(pk=entry_id)
@@ -414,7 +381,7 @@ class LedgerCoreService:
 
             # الخطوة 2: إنشاء وترحيل القيد العاكس
             reversal_draft = cls.create_draft_entry(
-                date=timezone.now().date(),
+                date=reversal_date or timezone.now().date(),
                 description=f"قيد عكسي للقيد رقم {original_entry.number}",
                 reference=f"REV-{original_entry.number}",
                 entry_type=original_entry.entry_type,
@@ -317,7 +317,7 @@ class LedgerQueryService:
                 'account_code': line.account.code,
                 'account_name': line.account.name,
                 'description': effective_desc,
-                'reference': getattr(line.journal_entry, 'reference', None) or getattr(line.journal_entry, 'posting_references', None) or '-',
+                'reference': getattr(line.journal_entry, 'reference', None) or '-',
                 'debit': debit_val,
                 'credit': credit_val,
                 'balance': running_balance,
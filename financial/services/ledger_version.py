@@ -0,0 +1,197 @@
+"""
+رقم إصدار دفتر الأستاذ (Ledger Posting Version)
+رقم متزايد في الكاش يتغير مع أي ترحيل أو تعديل أو حذف لقيد أو بند قيد،
+تستخدمه التقارير والتحليلات كجزء من مفتاح الكاش فيستحيل عرض نتيجة قديمة.
+
+إضافة لذلك لكل فترة (شهر) إصدار خاص يزيد فقط عند تغيير قيد بتاريخ داخلها،
+فتقرير حتى تاريخ معين يعتمد على إصدارات الفترات حتى ذلك التاريخ فقط ويبقى
+صالحاً ما دامت الترحيلات الجديدة في فترات لاحقة.
+"""
+
+import logging
+import threading
+import time
+from datetime import date
+from typing import Iterable, List, Optional
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class LedgerVersion:
+    """
+    إدارة رقم إصدار دفتر الأستاذ
+    """
+
+    CACHE_KEY = "ledger_posting_version"
+    PERIOD_KEY_PREFIX = "ledger_period_version"
+    # تغيير لا يُعرف تاريخه (دليل الحسابات، الأرصدة الافتتاحية...) يُبطل كل الفترات
+    ALL_PERIODS_KEY = "ledger_period_version:all"
+    FIRST_PERIOD_KEY = "ledger_first_period"
+
+    @classmethod
+    def current(cls) -> int:
+        """الإصدار الحالي (يُنشأ من الطابع الزمني إذا فُقد من الكاش فلا يتكرر إصدار قديم)"""
+        try:
+            version = cache.get(cls.CACHE_KEY)
+            if version is None:
+                cache.add(cls.CACHE_KEY, time.time_ns(), None)
+                version = cache.get(cls.CACHE_KEY)
+            return version if version is not None else time.time_ns()
+        except Exception as e:
+            logger.warning(f"تعذر قراءة إصدار دفتر الأستاذ: {e}")
+            return time.time_ns()
+
+    @classmethod
+    def bump(cls) -> None:
+        """زيادة الإصدار"""
+        try:
+            cache.incr(cls.CACHE_KEY)
+        except ValueError:
+            cache.add(cls.CACHE_KEY, time.time_ns(), None)
+        except Exception as e:
+            logger.warning(f"تعذر تحديث إصدار دفتر الأستاذ: {e}")
+
+    @staticmethod
+    def period_of(day) -> str:
+        if isinstance(day, str):
+            day = date.fromisoformat(day[:10])
+        return f"{day.year:04d}-{day.month:02d}"
+
+    @classmethod
+    def _incr(cls, key: str) -> None:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+        except Exception as e:
+            logger.warning(f"تعذر تحديث إصدار دفتر الأستاذ: {e}")
+
+    @classmethod
+    def bump_periods(cls, days: Iterable[Optional[date]] = ()) -> None:
+        """زيادة إصدار الفترات التي تشمل التواريخ المحددة (بدون تواريخ = كل الفترات)"""
+        periods = {cls.period_of(day) for day in days if day}
+        if not periods:
+            cls._incr(cls.ALL_PERIODS_KEY)
+            return
+        for period in periods:
+            cls._incr(f"{cls.PERIOD_KEY_PREFIX}:{period}")
+        try:
+            first = cache.get(cls.FIRST_PERIOD_KEY)
+            if first is not None and min(periods) < first:
+                cache.set(cls.FIRST_PERIOD_KEY, min(periods), None)
+        except Exception as e:
+            logger.warning(f"تعذر تحديث أول فترة في دفتر الأستاذ: {e}")
+
+    @classmethod
+    def _first_period(cls) -> Optional[str]:
+        first = cache.get(cls.FIRST_PERIOD_KEY)
+        if first is None:
+            from django.db.models import Min
+
+            from financial.models.journal_entry import JournalEntry
+
+            first_day = JournalEntry.objects.aggregate(first=Min("date"))["first"]
+            if first_day is None:
+                return None
+            first = cls.period_of(first_day)
+            cache.add(cls.FIRST_PERIOD_KEY, first, None)
+        return first
+
+    @staticmethod
+    def _periods_between(first: str, last: str) -> List[str]:
+        year, month = map(int, first.split("-"))
+        periods = []
+        while f"{year:04d}-{month:02d}" <= last:
+            periods.append(f"{year:04d}-{month:02d}")
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return periods
+
+    @classmethod
+    def token(cls, as_of: Optional[date] = None) -> str:
+        """
+        إصدار البيانات حتى تاريخ معين (بدون تاريخ = الإصدار العام لكل الدفتر)
+
+        مجموع إصدارات الفترات من أول فترة حتى فترة التاريخ؛ كل إصدار لا يقل أبداً
+        (والمفقود من الكاش يُعاد إنشاؤه بالطابع الزمني) فيتغير المجموع مع أي تغيير
+        """
+        if as_of is None:
+            return f"g{cls.current()}"
+        try:
+            keys = [cls.ALL_PERIODS_KEY]
+            first = cls._first_period()
+            if first is not None:
+                keys += [
+                    f"{cls.PERIOD_KEY_PREFIX}:{period}"
+                    for period in cls._periods_between(first, cls.period_of(as_of))
+                ]
+            versions = cache.get_many(keys)
+            for key in keys:
+                if key not in versions:
+                    cache.add(key, time.time_ns(), None)
+                    versions[key] = cache.get(key)
+                    if versions[key] is None:
+                        return f"g{time.time_ns()}"
+            return f"p{sum(versions.values())}"
+        except Exception as e:
+            logger.warning(f"تعذر قراءة إصدارات فترات دفتر الأستاذ: {e}")
+            return f"g{time.time_ns()}"
+
+    @classmethod
+    def mark_changed(cls, *days: Optional[date], entry_ids: Iterable[int] = ()) -> None:
+        """
+        تسجيل تغيير في القيود: داخل الترانزاكشن تُجمع التواريخ وتُزاد الإصدارات مرة واحدة بعد الـ commit
+        (حتى لا تُخزن نتيجة محسوبة قبل ظهور البيانات الجديدة للعمليات الأخرى)، وخارجها فوراً
+
+        Args:
+            days: تواريخ القيود المتأثرة (بدون تواريخ ولا قيود = كل الفترات)
+            entry_ids: قيود لم يُحمّل تاريخها؛ تُقرأ تواريخها كلها باستعلام واحد عند زيادة الإصدارات
+        """
+        entry_ids = [pk for pk in entry_ids if pk]
+        pending_days = _pending_days()
+        pending_days.update(days)
+        if not days and not entry_ids:
+            pending_days.add(None)
+        _pending_entry_ids().update(entry_ids)
+
+        if not connection.in_atomic_block:
+            _bump_after_commit()
+            return
+        # Django يستبدل قائمة run_on_commit عند الـ commit أو الـ rollback، فتغيرها يعني أن التسجيل السابق انتهى
+        if getattr(_pending, "hooks", None) is not connection.run_on_commit:
+            transaction.on_commit(_bump_after_commit)
+            _pending.hooks = connection.run_on_commit
+
+
+_pending = threading.local()
+
+
+def _pending_days() -> set:
+    if not hasattr(_pending, "days"):
+        _pending.days = set()
+    return _pending.days
+
+
+def _pending_entry_ids() -> set:
+    if not hasattr(_pending, "entry_ids"):
+        _pending.entry_ids = set()
+    return _pending.entry_ids
+
+
+def _bump_after_commit():
+    days, entry_ids = _pending_days(), _pending_entry_ids()
+    _pending.days, _pending.entry_ids, _pending.hooks = set(), set(), None
+    if not days and not entry_ids:
+        return
+    if entry_ids:
+        from financial.models.journal_entry import JournalEntry
+
+        days.update(JournalEntry.objects.filter(pk__in=entry_ids).values_list("date", flat=True))
+    LedgerVersion.bump()
+    dated = [day for day in days if day]
+    if None in days or not dated:
+        LedgerVersion.bump_periods()
+    if dated:
+        LedgerVersion.bump_periods(dated)
@@ -10,6 +10,7 @@ from financial.models.opening_balance import OpeningBalanceBatch, OpeningBalance
 from financial.models.journal_entry import JournalEntry, JournalEntryLine
 from financial.exceptions import ImmutableLedgerError
 from core.services.sequence_service import SequenceService
+from financial.services.ledger_version import LedgerVersion
 from core.enums.document_types import DocumentType
 
 logger = logging.getLogger("financial.opening_balance_service")
@@ -175,6 +176,7 @@ class OpeningBalancePostingService:
                 ))
 
             JournalEntryLine.objects.bulk_create(line_objects)
+            LedgerVersion.mark_changed()
 
             batch.journal_entry = journal_entry
             batch.status = 'posted'
@@ -308,6 +310,7 @@ class OpeningBalancePostingService:
                     description=f"عكس رصيد افتتاحي: {ol.description}"
                 ))
             JournalEntryLine.objects.bulk_create(rev_lines)
+            LedgerVersion.mark_changed()
 
             lines = batch.lines.all()
             for line in lines:
@@ -1,33 +1,431 @@
 import logging
+import threading
+from datetime import date
 from decimal import Decimal
-from typing import List
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+# طلبات التحديث المعلقة حتى نهاية الترانزاكشن الحالية (لكل thread اتصال مستقل)
+_pending = threading.local()
+
+AGING_FIELDS = ("aging_current", "aging_31_60", "aging_61_90", "aging_91_120", "aging_over_120")
+
 
 class PartnerBalanceSnapshotService:
     """
     خدمة تحديث وبناء لقطات الانكشاف المالي للشركاء مع التزامن الآلي (Snapshot Service)
+
+    لقطة واحدة لكل (شريك، عملة) في PartnerCurrencyBalanceSnapshot تحتوي على:
+    - إجمالي الفواتير المفتوحة وعددها ومعادلها الوظيفي
+    - الرصيد المسبق غير المخصص
+    - تاريخ آخر حركة
+    - أعمار الديون (أجل 30 يوماً من تاريخ الفاتورة لعدم وجود تاريخ استحقاق على الفواتير)
+    تُحدّث عقب الـ commit لكل شريك تأثر بحدث مالي، ويعاد بناؤها بالكامل عبر
+    أمر rebuild_partner_snapshots باستعلامات مجمعة.
     """
 
+    CHUNK_SIZE = 500
+
+    # ==================== التحديث ====================
+
     @classmethod
     def update_snapshot(cls, partner_type: str, partner_id: int):
         """
-        تحديث لقطة الشريك لشخص واحد
+        تحديث لقطة الشريك لشخص واحد (يُنفذ مرة واحدة عقب الـ commit مهما تكرر الطلب)
         """
-        try:
-            from financial.models.partner_advance import PartnerCurrencyBalanceSnapshot
-            from financial.models import Currency
-
-            # تحديث اللقطة بأمان
-            pass
-        except Exception as e:
-            logger.warning(f"⚠️ فشل تحديث لقطة الشريك {partner_type} #{partner_id}: {e}")
+        if not partner_id:
+            return
+        cls.schedule_refresh(partner_type, [partner_id])
 
     @classmethod
     def update_bulk_snapshots(cls, partner_type: str, partner_ids: List[int]):
         """
         تحديث دفعة لقطات
         """
+        cls.schedule_refresh(partner_type, partner_ids)
+
+    @classmethod
+    def schedule_refresh(cls, partner_type: str, partner_ids: Iterable[int]):
+        """
+        تسجيل الشركاء المطلوب تحديثهم وتنفيذ التحديث مجمعاً عقب الـ commit
+        (خارج الترانزاكشن يُنفذ فوراً)
+        """
+        partner_type = cls._normalize_type(partner_type)
+        registered = connection.in_atomic_block and any(
+            func is _flush_pending for _, func, _ in connection.run_on_commit
+        )
+        if not registered:
+            _pending.keys = set()
+        _pending.keys.update((partner_type, pid) for pid in partner_ids if pid)
+        if not registered:
+            transaction.on_commit(_flush_pending)
+
+    @classmethod
+    def queue_refresh(cls, partner_type: str, partner_ids: Iterable[int]):
+        """
+        طلب تحديث اللقطات في الخلفية (مهمة Celery عقب الـ commit) دون أن ينتظرها القارئ
+        """
+        partner_type = cls._normalize_type(partner_type)
+        ids = sorted({int(pid) for pid in partner_ids if pid})
+        if not ids:
+            return
+
+        def enqueue():
+            from financial.tasks.partner_snapshot_tasks import refresh_partner_snapshots_task
+
+            try:
+                refresh_partner_snapshots_task.delay(partner_type, ids)
+            except Exception as e:
+                logger.warning(f"⚠️ تعذر جدولة تحديث لقطات {partner_type} ({len(ids)} شريك): {e}")
+
+        transaction.on_commit(enqueue)
+
+    @classmethod
+    def refresh(cls, partner_type: str, partner_ids: Iterable[int]) -> int:
+        """
+        إعادة احتساب وحفظ لقطات الشركاء المحددين فوراً
+        :return: عدد اللقطات المحفوظة
+        """
+        partner_type = cls._normalize_type(partner_type)
+        ids = sorted({int(pid) for pid in partner_ids if pid})
+        written = 0
+        for start in range(0, len(ids), cls.CHUNK_SIZE):
+            chunk = ids[start:start + cls.CHUNK_SIZE]
+            try:
+                with transaction.atomic():
+                    written += cls._save_chunk(partner_type, chunk, cls.compute_balances(partner_type, chunk))
+            except Exception as e:
+                logger.warning(f"⚠️ فشل تحديث لقطات {partner_type} ({len(chunk)} شريك): {e}")
+        return written
+
+    @classmethod
+    def rebuild_all(cls, partner_type: str) -> int:
+        """
+        إعادة بناء لقطات كل الشركاء من نوع محدد
+        """
+        partner_type = cls._normalize_type(partner_type)
+        if partner_type == "customer":
+            from client.models import Customer
+            ids = Customer.objects.values_list("id", flat=True)
+        else:
+            from supplier.models import Supplier
+            ids = Supplier.objects.values_list("id", flat=True)
+        return cls.refresh(partner_type, list(ids))
+
+    # ==================== القراءة ====================
+
+    @classmethod
+    def get_balances(
+        cls,
+        partner_type: str,
+        partner_ids: List[int],
+        as_of_date: Optional[date] = None,
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        أرصدة الشركاء لكل عملة {partner_id: [{currency_code, open_invoice_total, ...}]}
+        - بدون تاريخ (أو بتاريخ اليوم): قراءة اللقطات المخزنة وطلب تحديث الناقص أو قديم الأعمار في الخلفية
+        - بتاريخ سابق: احتساب مباشر باستعلامات مجمعة
+        """
+        partner_type = cls._normalize_type(partner_type)
+        today = timezone.now().date()
+        if as_of_date and as_of_date != today:
+            computed = cls.compute_balances(partner_type, partner_ids, as_of_date=as_of_date)
+            return {
+                pid: [dict(values, currency_code=code) for code, values in cls._by_code(rows).items()]
+                for pid, rows in computed.items()
+            }
+
+        from financial.models.partner_advance import PartnerCurrencyBalanceSnapshot
+
+        def read(ids):
+            result = {}
+            for start in range(0, len(ids), cls.CHUNK_SIZE):
+                snapshots = PartnerCurrencyBalanceSnapshot.objects.filter(
+                    partner_type=partner_type, partner_id__in=ids[start:start + cls.CHUNK_SIZE]
+                ).select_related("currency")
+                for snap in snapshots:
+                    result.setdefault(snap.partner_id, []).append(snap)
+            return result
+
+        ids = list(partner_ids)
+        snapshots = read(ids)
+        missing = [pid for pid in ids if pid not in snapshots]
+        stale = [
+            pid for pid in ids
+            if pid in snapshots and any(s.aging_date != today for s in snapshots[pid])
+        ]
+
+        result = {
+            pid: [cls._snapshot_values(snap) for snap in snapshots.get(pid, [])]
+            for pid in ids
+        }
+        # الناقص يُحتسب للعرض فقط (بدون قفل أو حفظ) والقديم يُعرض كما هو حتى يكتمل التحديث في الخلفية
+        if missing:
+            for pid, rows in cls.compute_balances(partner_type, missing).items():
+                result[pid] = [dict(values, currency_code=code) for code, values in cls._by_code(rows).items()]
+        if missing or stale:
+            cls.queue_refresh(partner_type, missing + stale)
+        return result
+
+    # ==================== الاحتساب ====================
+
+    @classmethod
+    def compute_balances(
+        cls,
+        partner_type: str,
+        partner_ids: List[int],
+        as_of_date: Optional[date] = None,
+    ) -> Dict[int, Dict[Optional[int], Dict[str, Any]]]:
+        """
+        احتساب أرصدة الشركاء لكل عملة باستعلامات مجمعة (بدون حلقات لكل فاتورة)
+        :return: {partner_id: {currency_id: {...}}} حيث currency_id=None للعملة الوظيفية غير المسجلة
+        """
+        partner_type = cls._normalize_type(partner_type)
+        as_of = as_of_date or timezone.now().date()
+        # الفلترة بالتاريخ للأرصدة التاريخية فقط (اللقطة الحالية تشمل المستندات مستقبلية التاريخ)
+        date_filter = {"date__lte": as_of_date} if as_of_date else {}
+        payment_date_filter = {"payment_date__lte": as_of_date} if as_of_date else {}
+        ids = list(partner_ids)
+        result: Dict[int, Dict[Optional[int], Dict[str, Any]]] = {pid: {} for pid in ids}
+        if not ids:
+            return result
+
+        from financial.services.exchange_rate_service import ExchangeRateService
+        functional_id = getattr(ExchangeRateService.get_functional_currency(), "id", None)
+
+        def bucket(pid, currency_id):
+            currency_id = currency_id or functional_id
+            rows = result.setdefault(pid, {})
+            if currency_id not in rows:
+                rows[currency_id] = cls._empty_values()
+            return rows[currency_id]
+
+        if partner_type == "customer":
+            from client.models import CustomerAllocationAudit, CustomerPayment
+            from sale.models import Sale, SalePayment, SaleReturn
+            invoice_model, payment_model, return_model = Sale, SalePayment, SaleReturn
+            partner_field, invoice_fk = "customer_id", "sale"
+            allocation_model, advance_prefix = CustomerAllocationAudit, "PAY-"
+            advances_qs = CustomerPayment.objects.filter(customer_id__in=ids).exclude(status="cancelled")
+        else:
+            from purchase.models import Purchase, PurchasePayment, PurchaseReturn
+            from supplier.models import SupplierAdvancePayment, SupplierAllocationAudit
+            invoice_model, payment_model, return_model = Purchase, PurchasePayment, PurchaseReturn
+            partner_field, invoice_fk = "supplier_id", "purchase"
+            allocation_model, advance_prefix = SupplierAllocationAudit, "ADV-"
+            advances_qs = SupplierAdvancePayment.objects.filter(supplier_id__in=ids)
+
+        invoices = invoice_model.objects.filter(
+            **{f"{partner_field}__in": ids}, **date_filter
+        ).exclude(status="cancelled")
+        partner_key = partner_field[:-3]
+
+        # 1. الفواتير المفتوحة: الإجمالي - الدفعات المرحلة - التخصيصات المطبقة - المرتجعات المؤكدة
+        open_invoices = list(
+            invoices.exclude(payment_status="paid").values(
+                "id", "number", partner_field, "currency_id", "date", "total", "exchange_rate"
+            )
+        )
+        paid = dict(
+            payment_model.objects.filter(
+                status="posted",
+                **{f"{invoice_fk}__{partner_field}__in": ids},
+                **payment_date_filter,
+            ).exclude(**{f"{invoice_fk}__payment_status": "paid"})
+            .values_list(f"{invoice_fk}_id").order_by().annotate(total=Sum("amount"))
+        )
+        allocated = dict(
+            allocation_model.objects.filter(
+                allocation_status="APPLIED", **{f"{partner_key}_id__in": ids}
+            ).exclude(target_document_number__isnull=True)
+            .values_list("target_document_number").order_by().annotate(total=Sum("allocated_amount"))
+        )
+        returned = dict(
+            return_model.objects.filter(
+                status="confirmed", **{f"{invoice_fk}__{partner_field}__in": ids}
+            ).values_list(f"{invoice_fk}_id").order_by().annotate(total=Sum("total"))
+        )
+
+        for inv in open_invoices:
+            due = (
+                (inv["total"] or Decimal("0.00"))
+                - paid.get(inv["id"], Decimal("0.00"))
+                - allocated.get(inv["number"], Decimal("0.00"))
+                - returned.get(inv["id"], Decimal("0.00"))
+            )
+            if due <= Decimal("0.00"):
+                continue
+            rate = inv["exchange_rate"] or Decimal("1.000000")
+            due_functional = (due * Decimal(str(rate))).quantize(Decimal("0.01"))
+            values = bucket(inv[partner_field], inv["currency_id"])
+            values["open_invoice_total"] += due
+            values["open_invoice_functional"] += due_functional
+            values["open_invoice_count"] += 1
+            values[cls._aging_field(inv["date"], as_of)] += due_functional
+
+        # 2. الرصيد المسبق غير المخصص (الدفعات - التخصيصات المطبقة من كل دفعة)
+        advances = list(
+            advances_qs.filter(**payment_date_filter).values(
+                "id", partner_field, "currency_id", "amount", "payment_date",
+                *(["transaction_amount"] if partner_type == "customer" else []),
+            )
+        )
+        settled = dict(
+            allocation_model.objects.filter(
+                allocation_status="APPLIED",
+                source_document_number__startswith=advance_prefix,
+                **{f"{partner_key}_id__in": ids},
+            ).values_list("source_document_number").order_by().annotate(total=Sum("allocated_amount"))
+        )
+        advance_totals: Dict[tuple, Decimal] = {}
+        for adv in advances:
+            key = (adv[partner_field], adv["currency_id"] or functional_id)
+            amount = adv.get("transaction_amount") or adv["amount"] or Decimal("0.00")
+            advance_totals[key] = (
+                advance_totals.get(key, Decimal("0.00"))
+                + amount
+                - settled.get(f"{advance_prefix}{adv['id']}", Decimal("0.00"))
+            )
+            cls._touch(bucket(*key), adv["payment_date"])
+        for (pid, currency_id), total in advance_totals.items():
+            bucket(pid, currency_id)["advance_balance"] = max(Decimal("0.00"), total)
+
+        # 3. تاريخ آخر حركة (فواتير + دفعات الفواتير)
+        for pid, currency_id, last in invoices.values_list(partner_field, "currency_id").order_by().annotate(
+            last=Max("date")
+        ):
+            cls._touch(bucket(pid, currency_id), last)
+        for pid, currency_id, last in payment_model.objects.filter(
+            status="posted",
+            **{f"{invoice_fk}__{partner_field}__in": ids},
+            **payment_date_filter,
+        ).values_list(f"{invoice_fk}__{partner_field}", f"{invoice_fk}__currency_id").order_by().annotate(
+            last=Max("payment_date")
+        ):
+            cls._touch(bucket(pid, currency_id), last)
+
+        for rows in result.values():
+            for values in rows.values():
+                values["aging_date"] = as_of
+        return result
+
+    # ==================== داخلي ====================
+
+    @classmethod
+    def _save_chunk(cls, partner_type: str, partner_ids: List[int], computed: Dict[int, Dict]) -> int:
+        """
+        حفظ نتائج الاحتساب: تحديث الموجود وإنشاء الجديد وتصفير العملات التي لم تعد لها حركة
+        (مع لقطة صفرية بالعملة الوظيفية للشريك بلا حركة حتى لا يعاد احتسابه عند كل قراءة)
+        """
+        from financial.models.partner_advance import PartnerCurrencyBalanceSnapshot
+        from financial.services.exchange_rate_service import ExchangeRateService
+
+        functional_id = getattr(ExchangeRateService.get_functional_currency(), "id", None)
+        today = timezone.now().date()
+        existing: Dict[int, Dict[int, Any]] = {}
+        for snap in PartnerCurrencyBalanceSnapshot.objects.select_for_update().filter(
+            partner_type=partner_type, partner_id__in=partner_ids
+        ):
+            existing.setdefault(snap.partner_id, {})[snap.currency_id] = snap
+
+        fields = ["advance_balance", "open_invoice_total", "open_invoice_functional", "open_invoice_count",
+                  "last_activity_date", "aging_date", *AGING_FIELDS]
+        to_create, to_update = [], []
         for pid in partner_ids:
-            cls.update_snapshot(partner_type, pid)
+            rows = {cid: v for cid, v in computed.get(pid, {}).items() if cid}
+            partner_snapshots = existing.get(pid, {})
+            for currency_id, snap in partner_snapshots.items():
+                if currency_id not in rows:
+                    rows[currency_id] = dict(cls._empty_values(), last_activity_date=snap.last_activity_date, aging_date=today)
+            if not rows and functional_id:
+                rows[functional_id] = dict(cls._empty_values(), aging_date=today)
+
+            for currency_id, values in rows.items():
+                snap = partner_snapshots.get(currency_id)
+                if snap is None:
+                    to_create.append(PartnerCurrencyBalanceSnapshot(
+                        partner_type=partner_type, partner_id=pid, currency_id=currency_id,
+                        **{f: values[f] for f in fields},
+                    ))
+                else:
+                    for f in fields:
+                        setattr(snap, f, values[f])
+                    snap.updated_at = timezone.now()
+                    to_update.append(snap)
+
+        if to_create:
+            PartnerCurrencyBalanceSnapshot.objects.bulk_create(to_create)
+        if to_update:
+            PartnerCurrencyBalanceSnapshot.objects.bulk_update(to_update, fields + ["updated_at"])
+        return len(to_create) + len(to_update)
+
+    @staticmethod
+    def _normalize_type(partner_type: str) -> str:
+        return "customer" if str(partner_type).lower() in ("customer", "client") else "supplier"
+
+    @staticmethod
+    def _empty_values() -> Dict[str, Any]:
+        values = {
+            "advance_balance": Decimal("0.00"),
+            "open_invoice_total": Decimal("0.00"),
+            "open_invoice_functional": Decimal("0.00"),
+            "open_invoice_count": 0,
+            "last_activity_date": None,
+            "aging_date": None,
+        }
+        values.update({f: Decimal("0.00") for f in AGING_FIELDS})
+        return values
+
+    @staticmethod
+    def _aging_field(invoice_date: date, as_of: date) -> str:
+        age = (as_of - invoice_date).days
+        if age <= 30:
+            return "aging_current"
+        if age <= 60:
+            return "aging_31_60"
+        if age <= 90:
+            return "aging_61_90"
+        if age <= 120:
+            return "aging_91_120"
+        return "aging_over_120"
+
+    @staticmethod
+    def _touch(values: Dict[str, Any], activity_date: Optional[date]) -> None:
+        if activity_date and (values["last_activity_date"] is None or activity_date > values["last_activity_date"]):
+            values["last_activity_date"] = activity_date
+
+    @staticmethod
+    def _by_code(rows: Dict[Optional[int], Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        from financial.models import Currency
+
+        codes = dict(Currency.objects.filter(id__in=[cid for cid in rows if cid]).values_list("id", "code"))
+        return {codes.get(cid, "EGP"): values for cid, values in rows.items()}
+
+    @staticmethod
+    def _snapshot_values(snap) -> Dict[str, Any]:
+        values = {
+            "currency_code": snap.currency.code if snap.currency else "EGP",
+            "advance_balance": snap.advance_balance,
+            "open_invoice_total": snap.open_invoice_total,
+            "open_invoice_functional": snap.open_invoice_functional,
+            "open_invoice_count": snap.open_invoice_count,
+            "last_activity_date": snap.last_activity_date,
+            "aging_date": snap.aging_date,
+        }
+        values.update({f: getattr(snap, f) for f in AGING_FIELDS})
+        return values
+
+
+def _flush_pending():
+    keys = getattr(_pending, "keys", set())
+    _pending.keys = set()
+    by_type: Dict[str, List[int]] = {}
+    for partner_type, pid in keys:
+        by_type.setdefault(partner_type, []).append(pid)
+    for partner_type, ids in by_type.items():
+        PartnerBalanceSnapshotService.refresh(partner_type, ids)
@@ -25,16 +25,8 @@ class PartnerCurrencySnapshotUpdater:
         تحديث لقطات الأرصدة المتاحة بالشريكة والمزامنة التلقائية مع محرك الأرصدة
         """
         try:
-            from financial.services.partner_advance_service import PartnerAdvanceService
-            if partner_type.lower() in ["customer", "client"]:
-                from client.models import Customer
-                partner = Customer.objects.filter(pk=partner_id).first()
-            else:
-                from supplier.models import Supplier
-                partner = Supplier.objects.filter(pk=partner_id).first()
-
-            if partner:
-                PartnerAdvanceService.rebuild_all_snapshots(partner)
+            from financial.services.partner_balance_snapshot_service import PartnerBalanceSnapshotService
+            if PartnerBalanceSnapshotService.refresh(partner_type, [partner_id]):
                 logger.info(f"CQRS Snapshot updated for {partner_type} #{partner_id} [{currency_code}] on event {event_type}.")
         except Exception as e:
             logger.error(f"Error updating Partner Currency Snapshot for {partner_type} #{partner_id}: {str(e)}")
@@ -81,31 +81,10 @@ class BusinessPartnerExposureService:
         # تحديد النماذج المناسبة
         if partner_type == "supplier":
             from supplier.models import Supplier, SupplierTransaction
-            from purchase.models import Purchase
             partners_map = {s.id: s for s in Supplier.objects.filter(id__in=partner_ids).select_related('default_currency')}
-            partner_currency_map: Dict[int, Dict[str, Dict[str, Decimal]]] = {}
 
-            # تجميع فواتير المشتريات غير المسددة بالكامل لكل عملة
-            purchases = Purchase.objects.filter(
-                supplier_id__in=partner_ids
-            ).exclude(payment_status="paid").select_related("currency")
-
-            for p in purchases:
-                pid = p.supplier_id
-                curr = p.currency.code if p.currency else "EGP"
-                due = p.amount_due if hasattr(p, "amount_due") and p.amount_due > Decimal("0.00") else (p.total - (p.amount_paid or Decimal("0.00")))
-                if due <= Decimal("0.00"):
-                    continue
-                rate = p.exchange_rate or Decimal("1.000000")
-                open_func = (due * rate).quantize(Decimal("0.01"))
-
-                if pid not in partner_currency_map:
-                    partner_currency_map[pid] = {}
-                if curr not in partner_currency_map[pid]:
-                    partner_currency_map[pid][curr] = {"foreign": Decimal("0.00"), "functional": Decimal("0.00")}
-
-                partner_currency_map[pid][curr]["foreign"] += due
-                partner_currency_map[pid][curr]["functional"] += open_func
+            # فواتير المشتريات المفتوحة لكل عملة من لقطات الأرصدة
+            partner_currency_map = cls._open_invoices_from_snapshots("supplier", partner_ids, as_of_date)
 
             # تجميع المعاملات المفتوحة المعتمدة من SupplierTransaction لمزيد من التغطية
             txns_qs = SupplierTransaction.objects.filter(
@@ -171,31 +150,10 @@ class BusinessPartnerExposureService:
 
         elif partner_type == "customer":
             from client.models import Customer, CustomerTransaction
-            from sale.models import Sale
             customers_map = {c.id: c for c in Customer.objects.filter(id__in=partner_ids).select_related('default_currency')}
-            partner_currency_map: Dict[int, Dict[str, Dict[str, Decimal]]] = {}
-
-            # تجميع فواتير المبيعات غير المسددة بالكامل لكل عملة
-            sales = Sale.objects.filter(
-                customer_id__in=partner_ids
-            ).exclude(payment_status="paid").select_related("currency")
-
-            for s in sales:
-                pid = s.customer_id
-                curr = s.currency.code if s.currency else "EGP"
-                due = s.amount_due if hasattr(s, "amount_due") and s.amount_due > Decimal("0.00") else (s.total - (s.amount_paid or Decimal("0.00")))
-                if due <= Decimal("0.00"):
-                    continue
-                rate = s.exchange_rate or Decimal("1.000000")
-                open_func = (due * rate).quantize(Decimal("0.01"))
-
-                if pid not in partner_currency_map:
-                    partner_currency_map[pid] = {}
-                if curr not in partner_currency_map[pid]:
-                    partner_currency_map[pid][curr] = {"foreign": Decimal("0.00"), "functional": Decimal("0.00")}
 
-                partner_currency_map[pid][curr]["foreign"] += due
-                partner_currency_map[pid][curr]["functional"] += open_func
+            # فواتير المبيعات المفتوحة لكل عملة من لقطات الأرصدة
+            partner_currency_map = cls._open_invoices_from_snapshots("customer", partner_ids, as_of_date)
 
             # تجميع المعاملات المفتوحة المعتمدة من CustomerTransaction
             txns_qs = CustomerTransaction.objects.filter(
@@ -260,6 +218,31 @@ class BusinessPartnerExposureService:
 
         return results
 
+    @classmethod
+    def _open_invoices_from_snapshots(
+        cls,
+        partner_type: str,
+        partner_ids: List[int],
+        as_of_date: Optional[Any] = None
+    ) -> Dict[int, Dict[str, Dict[str, Decimal]]]:
+        """
+        إجمالي الفواتير المفتوحة لكل شريك وعملة {pid: {currency: {"foreign", "functional"}}}
+        من لقطات PartnerBalanceSnapshotService بدلاً من احتساب المتبقي لكل فاتورة
+        """
+        from financial.services.partner_balance_snapshot_service import PartnerBalanceSnapshotService
+
+        partner_currency_map: Dict[int, Dict[str, Dict[str, Decimal]]] = {}
+        balances = PartnerBalanceSnapshotService.get_balances(partner_type, partner_ids, as_of_date=as_of_date)
+        for pid, rows in balances.items():
+            for row in rows:
+                if row["open_invoice_total"] <= Decimal("0.00"):
+                    continue
+                partner_currency_map.setdefault(pid, {})[row["currency_code"]] = {
+                    "foreign": row["open_invoice_total"],
+                    "functional": row["open_invoice_functional"],
+                }
+        return partner_currency_map
+
 
 # Explicit Aliases for Enterprise Compatibility
 PartnerExposureService = BusinessPartnerExposureService
@@ -9,6 +9,7 @@ from financial.models.chart_of_accounts import ChartOfAccounts
 from financial.models.journal_entry import JournalEntry, JournalEntryLine
 from financial.exceptions import FinancialCoreError
 from core.services.sequence_service import SequenceService
+from financial.services.ledger_version import LedgerVersion
 from core.enums.document_types import DocumentType
 
 logger = logging.getLogger(__name__)
@@ -152,6 +153,7 @@ class ProfitClosingService:
             ))
 
         JournalEntryLine.objects.bulk_create(lines_to_create)
+        LedgerVersion.mark_changed()
 
         # 7. تحديث السنة المالية بصافي الربح/الخسارة وقيد الإغلاق
         fiscal_year.net_profit_loss = net_profit
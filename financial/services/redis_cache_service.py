@@ -13,6 +13,8 @@ import logging
 import hashlib
 import pickle
 
+from financial.services.ledger_version import LedgerVersion
+
 logger = logging.getLogger(__name__)
 
 
@@ -363,8 +365,10 @@ class CachedBalanceService:
             )
 
         # محاولة الحصول من الكاش
+        ledger_version = LedgerVersion.token(date_to)
         cached_balance = financial_cache.get(
-            "balance", account_id=account_id, date_from=date_from, date_to=date_to
+            "balance", account_id=account_id, date_from=date_from, date_to=date_to,
+            ledger_version=ledger_version,
         )
 
         if cached_balance is not None:
@@ -399,6 +403,7 @@ class CachedBalanceService:
             account_id=account_id,
             date_from=date_from,
             date_to=date_to,
+            ledger_version=ledger_version,
         )
 
         logger.debug(f"تم حفظ رصيد الحساب {account_id} في الكاش")
@@ -421,8 +426,9 @@ class CachedBalanceService:
             )
 
         # محاولة الحصول من الكاش
+        ledger_version = LedgerVersion.token(date_to)
         cached_trial_balance = financial_cache.get(
-            "trial_balance", date_from=date_from, date_to=date_to
+            "trial_balance", date_from=date_from, date_to=date_to, ledger_version=ledger_version
         )
 
         if cached_trial_balance is not None:
@@ -443,6 +449,7 @@ class CachedBalanceService:
             timeout=1800,
             date_from=date_from,
             date_to=date_to,
+            ledger_version=ledger_version,
         )
 
         logger.debug("تم حفظ ميزان المراجعة في الكاش")
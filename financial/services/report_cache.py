@@ -0,0 +1,219 @@
+"""
+كاش نتائج التقارير المالية (Report Result Cache)
+- المفتاح = اسم التقرير + معاملاته + إصدار دفتر الأستاذ حتى تاريخ التقرير
+  (LedgerVersion.token) فلا تُعرض نتيجة قديمة، وتقارير الفترات التي لم تتغير
+  تبقى في الكاش مهما تجددت الترحيلات في فترات لاحقة
+- النتائج تُخزن بصيغة msgpack المدمجة مع دعم Decimal والتواريخ، وكائنات النماذج
+  تُخزن كمرجع (النموذج + المعرف) وتُحمّل باستعلام واحد لكل نموذج عند القراءة
+- عدادات إصابة/إخفاق لكل تقرير لقياس فعالية الكاش
+"""
+
+import datetime
+import hashlib
+import logging
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from django.utils.functional import Promise
+
+from financial.services.ledger_version import LedgerVersion
+
+logger = logging.getLogger(__name__)
+
+# أنواع msgpack الإضافية
+EXT_DECIMAL, EXT_DATE, EXT_DATETIME, EXT_MODEL = 1, 2, 3, 4
+
+
+class _ModelRef:
+    """مرجع لكائن نموذج داخل نتيجة مخزنة (يُستبدل بالكائن بعد فك الترميز)"""
+
+    __slots__ = ("label", "pk")
+
+    def __init__(self, label: str, pk: Any):
+        self.label = label
+        self.pk = pk
+
+
+def _default(value):
+    import msgpack
+
+    if isinstance(value, Decimal):
+        return msgpack.ExtType(EXT_DECIMAL, str(value).encode())
+    if isinstance(value, datetime.datetime):
+        return msgpack.ExtType(EXT_DATETIME, value.isoformat().encode())
+    if isinstance(value, datetime.date):
+        return msgpack.ExtType(EXT_DATE, value.isoformat().encode())
+    if isinstance(value, models.Model) and value.pk is not None:
+        return msgpack.ExtType(EXT_MODEL, msgpack.packb([value._meta.label, value.pk]))
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, Promise):
+        return str(value)
+    raise TypeError(f"نوع غير مدعوم في كاش التقارير: {type(value).__name__}")
+
+
+def pack(value: Any) -> bytes:
+    """ترميز نتيجة تقرير بصيغة msgpack"""
+    import msgpack
+
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+
+def unpack(data: bytes) -> Any:
+    """فك ترميز نتيجة مخزنة وإعادة تحميل كائنات النماذج المشار إليها"""
+    import msgpack
+
+    refs = []
+
+    def ext_hook(code, payload):
+        if code == EXT_DECIMAL:
+            return Decimal(payload.decode())
+        if code == EXT_DATE:
+            return datetime.date.fromisoformat(payload.decode())
+        if code == EXT_DATETIME:
+            return datetime.datetime.fromisoformat(payload.decode())
+        if code == EXT_MODEL:
+            ref = _ModelRef(*msgpack.unpackb(payload))
+            refs.append(ref)
+            return ref
+        return msgpack.ExtType(code, payload)
+
+    value = msgpack.unpackb(data, ext_hook=ext_hook, raw=False, strict_map_key=False)
+    if not refs:
+        return value
+
+    by_label: Dict[str, set] = {}
+    for ref in refs:
+        by_label.setdefault(ref.label, set()).add(ref.pk)
+    instances = {}
+    for label, pks in by_label.items():
+        model = apps.get_model(label)
+        for pk, instance in model._base_manager.select_related().in_bulk(list(pks)).items():
+            instances[(label, pk)] = instance
+    return _resolve(value, instances)
+
+
+def _resolve(value, instances):
+    if isinstance(value, _ModelRef):
+        return instances.get((value.label, value.pk))
+    if isinstance(value, dict):
+        return {key: _resolve(item, instances) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_resolve(item, instances) for item in value]
+    return value
+
+
+class ReportCache:
+    """
+    كاش موحد لنتائج التقارير المالية
+    """
+
+    KEY_PREFIX = "report_result"
+    STATS_PREFIX = "report_cache_stats"
+    REPORTS = (
+        "ledger_account",
+        "ledger_summary",
+        "trial_balance",
+        "income_statement",
+        "balance_sheet",
+        "cash_flow",
+    )
+
+    @staticmethod
+    def _enabled() -> bool:
+        return getattr(settings, "REPORT_CACHE_ENABLED", True)
+
+    @classmethod
+    def _key(cls, report: str, params: Dict[str, Any], as_of: Optional[datetime.date]) -> str:
+        raw = repr(sorted((key, str(value)) for key, value in params.items()))
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        return f"{cls.KEY_PREFIX}:{report}:{LedgerVersion.token(as_of)}:{digest}"
+
+    @classmethod
+    def get_or_compute(
+        cls,
+        report: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Any],
+        as_of: Optional[datetime.date] = None,
+        use_cache: bool = True,
+    ) -> Tuple[Any, bool]:
+        """
+        نتيجة التقرير من الكاش أو حسابها وتخزينها
+
+        Args:
+            report: اسم التقرير
+            params: معاملات التقرير (تدخل في المفتاح)
+            compute: دالة حساب التقرير
+            as_of: آخر تاريخ يعتمد عليه التقرير (None = كل الدفتر حتى اليوم)
+            use_cache: False لتجاوز الكاش وإعادة الحساب (ويُخزن الناتج الجديد)
+
+        Returns:
+            (النتيجة، هل جاءت من الكاش)
+        """
+        if not cls._enabled():
+            return compute(), False
+
+        key = None
+        try:
+            key = cls._key(report, params, as_of)
+            if use_cache:
+                data = cache.get(key)
+                if data is not None:
+                    result = unpack(data)
+                    cls._count(report, "hits")
+                    return result, True
+        except Exception as e:
+            logger.warning(f"تعذر قراءة تقرير {report} من الكاش: {e}")
+
+        result = compute()
+        cls._count(report, "misses")
+        if key is not None:
+            try:
+                cache.set(key, pack(result), getattr(settings, "REPORT_CACHE_TIMEOUT", None))
+            except Exception as e:
+                logger.warning(f"تعذر تخزين تقرير {report} في الكاش: {e}")
+        return result, False
+
+    @classmethod
+    def _count(cls, report: str, kind: str) -> None:
+        key = f"{cls.STATS_PREFIX}:{report}:{kind}"
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, 1, None):
+                try:
+                    cache.incr(key)
+                except Exception:
+                    pass
+        except Exception as e:
+            logger.debug(f"تعذر تحديث إحصائيات كاش التقارير: {e}")
+
+    @classmethod
+    def stats(cls, reports: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """نسبة الإصابة لكل تقرير: {report: {'hits', 'misses', 'hit_rate'}}"""
+        reports = tuple(reports or cls.REPORTS)
+        keys = [f"{cls.STATS_PREFIX}:{report}:{kind}" for report in reports for kind in ("hits", "misses")]
+        values = cache.get_many(keys)
+        result = {}
+        for report in reports:
+            hits = values.get(f"{cls.STATS_PREFIX}:{report}:hits", 0)
+            misses = values.get(f"{cls.STATS_PREFIX}:{report}:misses", 0)
+            total = hits + misses
+            result[report] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits * 100 / total, 2) if total else 0.0,
+            }
+        return result
+
+    @classmethod
+    def reset_stats(cls, reports: Optional[Iterable[str]] = None) -> None:
+        reports = tuple(reports or cls.REPORTS)
+        cache.delete_many(
+            [f"{cls.STATS_PREFIX}:{report}:{kind}" for report in reports for kind in ("hits", "misses")]
+        )
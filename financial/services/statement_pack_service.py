@@ -0,0 +1,113 @@
+# financial/services/statement_pack_service.py
+"""
+حزمة القوائم المالية الموحدة (Financial Statement Pack)
+- ميزان المراجعة وقائمة الدخل والميزانية العمومية والتدفقات النقدية من مكعب أرصدة واحد
+- تواريخ القطع (بداية ونهاية كل فترة وبداية كل سنة مالية) تُحدد مسبقاً
+  فيُقرأ دفتر الأستاذ بمرور تجميعي واحد بدلاً من استعلام لكل قائمة ولكل حساب
+"""
+
+import logging
+from datetime import date
+from typing import Any, Dict, Optional, Union
+
+from django.utils import timezone
+
+from financial.models.fiscal_year import FiscalYear
+from financial.services.balance_cube import BalanceCube
+from financial.services.balance_sheet_service import BalanceSheetService
+from financial.services.cash_flow_service import CashFlowService
+from financial.services.income_statement_service import IncomeStatementService
+from financial.services.trial_balance_service import TrialBalanceService
+
+logger = logging.getLogger(__name__)
+
+
+class StatementPackService:
+    """
+    توليد القوائم المالية الأربع لنفس الفترة من مكعب أرصدة مشترك
+    """
+
+    @staticmethod
+    def _fiscal_year_start(day: Optional[date], fiscal_year_id: Optional[int] = None) -> Optional[date]:
+        """بداية السنة المالية بنفس قاعدة خدمات القوائم (السنة المحددة أو السنة التي تشمل التاريخ)"""
+        if not day:
+            return None
+        fiscal_year = None
+        if fiscal_year_id:
+            fiscal_year = FiscalYear.objects.filter(id=fiscal_year_id).first()
+        if not fiscal_year:
+            fiscal_year = FiscalYear.objects.filter(start_date__lte=day, end_date__gte=day).first()
+        return fiscal_year.start_date if fiscal_year else date(day.year, 1, 1)
+
+    @classmethod
+    def build_pack(
+        cls,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        comp_date_from: Optional[date] = None,
+        comp_date_to: Optional[date] = None,
+        fiscal_year_id: Optional[int] = None,
+        cost_center_id: Optional[Union[int, str]] = None,
+        include_unposted: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        إنشاء حزمة القوائم المالية
+
+        Args:
+            date_from: بداية الفترة (الافتراضي: بداية السنة المالية)
+            date_to: نهاية الفترة وتاريخ الميزانية (الافتراضي: اليوم)
+            comp_date_from / comp_date_to: فترة المقارنة (اختياري)
+            fiscal_year_id: سنة مالية محددة (اختياري)
+            cost_center_id: مركز تكلفة لقائمتي الدخل والتدفقات النقدية
+            include_unposted: تضمين القيود غير المرحلة في قائمتي الدخل والتدفقات النقدية
+
+        Returns:
+            dict: trial_balance, income_statement, balance_sheet, cash_flow, cutoffs
+        """
+        date_to = date_to or timezone.now().date()
+        fy_start = cls._fiscal_year_start(date_to, fiscal_year_id)
+        date_from = date_from or fy_start
+        has_comparison = bool(comp_date_from and comp_date_to and comp_date_to >= comp_date_from)
+        if not has_comparison:
+            comp_date_from = comp_date_to = None
+
+        cube = BalanceCube.for_period(
+            date_from=date_from,
+            date_to=date_to,
+            comp_date_from=comp_date_from,
+            comp_date_to=comp_date_to,
+            fy_start=fy_start,
+            comp_fy_start=cls._fiscal_year_start(comp_date_to),
+            label="statement_pack",
+        )
+        # ميزان المراجعة يعزل الإيرادات والمصروفات من بداية السنة التي تشمل date_from
+        cube.ensure_cutoffs(cls._fiscal_year_start(date_from, fiscal_year_id))
+
+        trial_balance = TrialBalanceService.generate_trial_balance(
+            date_from=date_from, date_to=date_to, fiscal_year_id=fiscal_year_id, cube=cube,
+        )
+        income_statement = IncomeStatementService.generate_income_statement(
+            date_from=date_from, date_to=date_to,
+            comp_date_from=comp_date_from, comp_date_to=comp_date_to,
+            cost_center_id=cost_center_id, include_unposted=include_unposted, cube=cube,
+        )
+        balance_sheet = BalanceSheetService.generate_balance_sheet(
+            as_of_date=date_to, comparison_date=comp_date_to, fiscal_year_id=fiscal_year_id, cube=cube,
+        )
+        cash_flow = CashFlowService.generate_cash_flow_statement(
+            date_from=date_from, date_to=date_to,
+            comp_date_from=comp_date_from, comp_date_to=comp_date_to,
+            cost_center_id=cost_center_id, include_unposted=include_unposted, cube=cube,
+        )
+
+        return {
+            "date_from": date_from,
+            "date_to": date_to,
+            "comp_date_from": comp_date_from,
+            "comp_date_to": comp_date_to,
+            "trial_balance": trial_balance,
+            "income_statement": income_statement,
+            "balance_sheet": balance_sheet,
+            "cash_flow": cash_flow,
+            "cutoffs": cube.cutoffs,
+        }
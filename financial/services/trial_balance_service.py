@@ -9,14 +9,12 @@ import logging
 from decimal import Decimal
 from datetime import date, datetime
 from typing import Dict, List, Optional, Any, Union
-from django.db.models import Sum, Q
-from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
 from financial.models.chart_of_accounts import ChartOfAccounts
-from financial.models.journal_entry import JournalEntryLine
 from financial.models.fiscal_year import FiscalYear
+from financial.services.balance_cube import BalanceCube
 from financial.services.exchange_rate_service import ExchangeRateService
 
 logger = logging.getLogger(__name__)
@@ -37,6 +35,7 @@ class TrialBalanceService:
         hide_zero_balances: bool = False,
         group_by_type: bool = True,
         fiscal_year_id: Optional[int] = None,
+        cube: Optional[BalanceCube] = None,
     ) -> Dict[str, Any]:
         """
         إنشاء ميزان المراجعة الكامل والدقيق
@@ -49,6 +48,7 @@ class TrialBalanceService:
             hide_zero_balances: استبعاد الحسابات الصفرية غير النشطة؟
             group_by_type: تجميع الحسابات حسب التصنيف الرئيسي (أصول، خصوم، حقوق ملكية، إيرادات، مصروفات)؟
             fiscal_year_id: معرف سنة مالية محددة (اختياري)
+            cube: مكعب أرصدة مشترك مع باقي القوائم (يُبنى تلقائياً إذا لم يُمرر)
 
         Returns:
             Dict يحتوي على بيانات الميزان الكاملة مع كروت الإحصائيات وحالة التوازن
@@ -87,83 +87,63 @@ class TrialBalanceService:
             # تاريخ بداية السنة المالية لعزل حسابات الإيرادات والمصروفات
             fy_start_date = current_fiscal_year.start_date if current_fiscal_year else date(date_from.year, 1, 1)
 
-            # 3. الاستعلام الأول: جلب كافة حسابات الدليل النشطة أو التي لها حركات/أرصدة
-            accounts_qs = ChartOfAccounts.objects.filter(
-                Q(is_active=True) | Q(journal_lines__journal_entry__status='posted') | Q(opening_balance__gt=0)
-            ).distinct().select_related('account_type', 'parent', 'currency').order_by('code')
+            # 3. مكعب الأرصدة: استعلام تجميعي واحد لكل الفترات المطلوبة
+            if cube is None:
+                cube = BalanceCube.for_period(date_from=date_from, date_to=date_to, fy_start=fy_start_date)
 
-            accounts_list = list(accounts_qs)
+            # كافة حسابات الدليل النشطة أو التي لها حركات/أرصدة
+            posted_account_ids = cube.account_ids_with_lines()
+            accounts_list = [
+                acc for acc in cube.accounts
+                if acc.is_active or acc.id in posted_account_ids or acc.opening_balance > 0
+            ]
             if not accounts_list:
                 return cls._empty_trial_balance_response(date_from, date_to, display_mode, currency_code, currency_symbol)
 
             acc_map = {acc.id: acc for acc in accounts_list}
             leaf_ids = {acc.id for acc in accounts_list if acc.is_leaf}
 
-            # 4. الاستعلام الثاني: تجميع حركات ما قبل تاريخ البداية (لحساب رصيد أول المدة)
+            # 4. تجميع حركات ما قبل تاريخ البداية (لحساب رصيد أول المدة)
             # لحسابات الميزانية: كل الحركات قبل date_from
             # لحسابات قائمة الدخل (إيرادات ومصروفات): الحركات بين fy_start_date و date_from
             prior_balances = {}
             if date_from:
                 # أ. حسابات الميزانية (أصول، خصوم، حقوق ملكية)
-                bs_query = Q(
-                    journal_entry__status='posted',
-                    journal_entry__date__lt=date_from,
-                    account__account_type__category__in=['asset', 'liability', 'equity']
-                )
-                bs_totals = (
-                    JournalEntryLine.objects.filter(bs_query)
-                    .values('account_id')
-                    .annotate(
-                        sum_debit=Coalesce(Sum('debit'), Decimal('0.00')),
-                        sum_credit=Coalesce(Sum('credit'), Decimal('0.00'))
-                    )
-                )
-                for row in bs_totals:
-                    prior_balances[row['account_id']] = {
+                bs_totals = cube.totals(before=date_from, categories=['asset', 'liability', 'equity'])
+                for account_id, row in bs_totals.items():
+                    prior_balances[account_id] = {
                         'debit': row['sum_debit'],
                         'credit': row['sum_credit']
                     }
 
                 # ب. حسابات قائمة الدخل (إيرادات ومصروفات) محصورة بالسنة المالية الحالية
                 if date_from > fy_start_date:
-                    pl_query = Q(
-                        journal_entry__status='posted',
-                        journal_entry__date__gte=fy_start_date,
-                        journal_entry__date__lt=date_from,
-                        account__account_type__category__in=['revenue', 'expense']
-                    )
-                    pl_totals = (
-                        JournalEntryLine.objects.filter(pl_query)
-                        .values('account_id')
-                        .annotate(
-                            sum_debit=Coalesce(Sum('debit'), Decimal('0.00')),
-                            sum_credit=Coalesce(Sum('credit'), Decimal('0.00'))
-                        )
+                    pl_totals = cube.totals(
+                        start=fy_start_date, before=date_from, categories=['revenue', 'expense']
                     )
-                    for row in pl_totals:
-                        prior_balances[row['account_id']] = {
+                    for account_id, row in pl_totals.items():
+                        prior_balances[account_id] = {
                             'debit': row['sum_debit'],
                             'credit': row['sum_credit']
                         }
 
                 # ج. تسوية أرباح وخسائر السنوات السابقة غير المقفلة تلقائياً (Implicit Retained Earnings)
                 if fy_start_date:
-                    unclosed_pl_lines = JournalEntryLine.objects.filter(
-                        journal_entry__status='posted',
-                        journal_entry__date__lt=fy_start_date,
-                        account__account_type__category__in=['revenue', 'expense']
-                    ).aggregate(
-                        sum_dr=Coalesce(Sum('debit'), Decimal('0.00')),
-                        sum_cr=Coalesce(Sum('credit'), Decimal('0.00'))
-                    )
-                    net_unclosed_pl = (unclosed_pl_lines['sum_cr'] or Decimal('0.00')) - (unclosed_pl_lines['sum_dr'] or Decimal('0.00'))
+                    unclosed_pl_lines = cube.sum(before=fy_start_date, categories=['revenue', 'expense'])
+                    net_unclosed_pl = unclosed_pl_lines['credit'] - unclosed_pl_lines['debit']
                     if net_unclosed_pl != Decimal('0.00'):
                         from financial.services.role_registry import AccountRoleRegistry
                         retained_acc = AccountRoleRegistry.get_account_by_role("RETAINED_EARNINGS")
                         if not retained_acc:
-                            retained_acc = accounts_qs.filter(code__in=['30200', '3020', '30000', '31000'], is_active=True).first()
+                            retained_acc = next(
+                                (acc for acc in accounts_list
+                                 if acc.code in ['30200', '3020', '30000', '31000'] and acc.is_active),
+                                None
+                            )
                         if not retained_acc:
-                            retained_acc = accounts_qs.filter(account_type__category='equity').first()
+                            retained_acc = next(
+                                (acc for acc in accounts_list if acc.account_type.category == 'equity'), None
+                            )
 
                         if retained_acc:
                             cur_prior = prior_balances.get(retained_acc.id, {'debit': Decimal('0.00'), 'credit': Decimal('0.00')})
@@ -173,29 +153,11 @@ class TrialBalanceService:
                                 cur_prior['debit'] += abs(net_unclosed_pl)
                             prior_balances[retained_acc.id] = cur_prior
 
-            # 5. الاستعلام الثالث: تجميع حركات الفترة بين date_from و date_to
-            period_query = Q(
-                journal_entry__status='posted',
-                journal_entry__date__gte=date_from,
-                journal_entry__date__lte=date_to
-            )
-            period_totals = (
-                JournalEntryLine.objects.filter(period_query)
-                .values('account_id')
-                .annotate(
-                    sum_debit=Coalesce(Sum('debit'), Decimal('0.00')),
-                    sum_credit=Coalesce(Sum('credit'), Decimal('0.00'))
-                )
-            )
-            period_map = {row['account_id']: row for row in period_totals}
+            # 5. حركات الفترة بين date_from و date_to
+            period_map = cube.totals(start=date_from, end=date_to)
 
             # فحص الحسابات التي لها قيود افتتاحية مسجلة في الدفاتر لمنع التكرار المزدوج
-            opening_entries_account_ids = set(
-                JournalEntryLine.objects.filter(
-                    journal_entry__status='posted',
-                    journal_entry__entry_type='opening'
-                ).values_list('account_id', flat=True).distinct()
-            )
+            opening_entries_account_ids = cube.account_ids_with_lines(entry_types=['opening'])
 
             # 6. بناء بيانات الحسابات المباشرة (Direct Account Balances)
             account_nodes: Dict[int, Dict[str, Any]] = {}
@@ -5,4 +5,6 @@ from .validation_signals import (
     trigger_validation,
     connect_model_validation
 )
-from . import currency_signals
\ No newline at end of file
+from . import currency_signals
+from . import ledger_signals
+from . import budget_signals
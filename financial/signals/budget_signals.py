@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from financial.models.cost_center_budget import CostCenterBudget, CostCenterBudgetLine
+from financial.services.budget_control_service import BudgetControlService
+
+
+@receiver([post_save, post_delete], sender=CostCenterBudget)
+def invalidate_budget_cache(sender, instance, **kwargs):
+    """
+    اعتماد أو تعديل أو حذف موازنة يُبطل كاش بنود موازنات سنتها المالية
+    """
+    BudgetControlService.invalidate_budget_lines(instance.fiscal_year_id)
+
+
+@receiver([post_save, post_delete], sender=CostCenterBudgetLine)
+def invalidate_budget_line_cache(sender, instance, **kwargs):
+    """
+    تعديل أو حذف بند موازنة يُبطل كاش السنة المالية للموازنة الأم
+    """
+    fiscal_year_id = (
+        CostCenterBudget.objects.filter(pk=instance.budget_id).values_list('fiscal_year_id', flat=True).first()
+    )
+    BudgetControlService.invalidate_budget_lines(fiscal_year_id)
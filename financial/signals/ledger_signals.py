@@ -0,0 +1,50 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+
+from financial.models.chart_of_accounts import ChartOfAccounts
+from financial.models.journal_entry import JournalEntry, JournalEntryLine
+from financial.services.account_tree import AccountTree
+from financial.services.ledger_version import LedgerVersion
+
+_DEFERRED = object()
+
+
+@receiver(post_init, sender=JournalEntry)
+def remember_entry_date(sender, instance, **kwargs):
+    """تاريخ القيد كما حُمّل (بدون استعلام): نقل قيد لفترة أخرى يغير إصدار الفترتين"""
+    instance._ledger_loaded_date = instance.__dict__.get("date", _DEFERRED)
+
+
+@receiver([post_save, post_delete], sender=JournalEntry)
+@receiver([post_save, post_delete], sender=JournalEntryLine)
+@receiver([post_save, post_delete], sender=ChartOfAccounts)
+def bump_ledger_version(sender, instance, **kwargs):
+    """
+    أي ترحيل أو تعديل أو حذف لقيد (أو تعديل في شجرة الحسابات) يغير إصدار دفتر الأستاذ
+    فتُبطل نتائج التقارير والتحليلات المخزنة تلقائياً؛ القيود تغير إصدار فترتها فقط
+    (التغييرات تُجمع وتُطبق مرة واحدة لكل ترانزاكشن)
+    """
+    if sender is JournalEntry:
+        previous = getattr(instance, "_ledger_loaded_date", None)
+        current = instance.__dict__.get("date", _DEFERRED)
+        instance._ledger_loaded_date = current
+        if _DEFERRED in (previous, current):
+            # تاريخ غير محمل: لا يُعرف ما إذا كان القيد انتقل بين الفترات
+            LedgerVersion.mark_changed()
+        else:
+            LedgerVersion.mark_changed(*{day for day in (current, previous) if day})
+    elif sender is JournalEntryLine:
+        # تاريخ البند من القيد الأب المحمل لدى الكود المرحّل، وإلا يُقرأ مجمعاً عند الـ commit
+        if JournalEntryLine.journal_entry.field.is_cached(instance) and instance.journal_entry is not None:
+            LedgerVersion.mark_changed(instance.journal_entry.date)
+        else:
+            LedgerVersion.mark_changed(entry_ids=[instance.journal_entry_id])
+    else:
+        # بدون تاريخ معروف (دليل الحسابات) تُبطل كل الفترات
+        LedgerVersion.mark_changed()
+
+
+@receiver([post_save, post_delete], sender=ChartOfAccounts)
+def bump_account_tree_version(sender, instance, **kwargs):
+    """أي تعديل في دليل الحسابات يُبطل لقطة شجرة الحسابات في كل العمليات"""
+    AccountTree.mark_changed()
@@ -0,0 +1,37 @@
+"""
+مهام Celery لفحص سلامة البيانات المالية
+Celery tasks for the incremental data integrity checker
+"""
+
+import logging
+
+from celery import shared_task
+from django.contrib.auth import get_user_model
+
+from financial.services.integrity_check_service import IntegrityCheckService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3)
+def run_integrity_check_task(self, full=False, user_id=None):
+    """
+    مهمة فحص سلامة البيانات (تزايدياً من آخر نقطة تحقق)
+
+    Args:
+        full: فحص كل البيانات
+        user_id: معرف المستخدم الذي طلب الفحص
+    """
+    try:
+        user = get_user_model().objects.filter(id=user_id).first() if user_id else None
+        run = IntegrityCheckService.run(full=full, user=user)
+        if run is None:
+            return {'success': True, 'skipped': True}
+        return {
+            'success': run.status == 'completed',
+            'run_id': run.id,
+            'summary': run.summary,
+        }
+    except Exception as exc:
+        logger.error(f"خطأ في مهمة فحص سلامة البيانات: {str(exc)}")
+        raise self.retry(exc=exc, countdown=300)
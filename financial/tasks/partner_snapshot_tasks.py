@@ -0,0 +1,29 @@
+"""
+مهام Celery لتحديث لقطات أرصدة الشركاء
+Celery tasks for refreshing partner balance snapshots
+"""
+
+import logging
+
+from celery import shared_task
+
+from financial.services.partner_balance_snapshot_service import PartnerBalanceSnapshotService
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(bind=True, max_retries=3)
+def refresh_partner_snapshots_task(self, partner_type, partner_ids):
+    """
+    مهمة تحديث لقطات الشركاء الناقصة أو قديمة الأعمار (تطلبها شاشات التقارير عند القراءة)
+
+    Args:
+        partner_type: customer أو supplier
+        partner_ids: معرفات الشركاء المطلوب تحديثهم
+    """
+    try:
+        written = PartnerBalanceSnapshotService.refresh(partner_type, partner_ids)
+        return {'success': True, 'written': written}
+    except Exception as exc:
+        logger.error(f"خطأ في مهمة تحديث لقطات الشركاء: {str(exc)}")
+        raise self.retry(exc=exc, countdown=60)
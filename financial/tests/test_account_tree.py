@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات فهرس شجرة دليل الحسابات (اللقطة في الذاكرة)
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from financial.models import AccountType, ChartOfAccounts
+from financial.services.account_tree import AccountTree
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'account-tree-tests',
+    }
+}
+
+
+class AccountTreeIndexTest(TestCase):
+    """اختبارات استعلامات الشجرة والتجميع الصاعد"""
+
+    def setUp(self):
+        AccountTree.clear()
+        self.asset_type = AccountType.objects.create(
+            code="AST_TREE", name="أصول الشجرة", category="asset", nature="debit"
+        )
+
+        def make(code, parent=None, **extra):
+            return ChartOfAccounts.objects.create(
+                code=code, name=f"حساب {code}", account_type=self.asset_type, parent=parent, **extra
+            )
+
+        self.make = make
+        # أكواد الأبناء أصغر من أكواد الآباء عمداً (الترتيب بالكود لا يعكس العمق)
+        self.root = make("9000")
+        self.branch_a = make("5000", parent=self.root)
+        self.branch_b = make("6000", parent=self.root)
+        self.leaves = [
+            make(f"{1000 + index}", parent=self.branch_a, opening_balance=Decimal("100.00"))
+            for index in range(5)
+        ]
+        self.leaf_b = make("2000", parent=self.branch_b, opening_balance=Decimal("40.00"))
+
+    def test_descendants_and_leaves_use_constant_queries(self):
+        self.root.refresh_from_db()
+        with self.assertNumQueries(2):
+            leaves = self.root.get_leaf_descendants(include_self=True)
+        self.assertEqual(leaves[0], self.root)
+        self.assertCountEqual(leaves[1:], self.leaves + [self.leaf_b])
+
+        with self.assertNumQueries(2):
+            descendants = self.root.get_descendants()
+        self.assertEqual(len(descendants), 8)
+        # الترتيب العمقي: كل فرع يتبعه أحفاده
+        self.assertEqual(descendants[0], self.branch_a)
+        self.assertEqual(descendants[-2:], [self.branch_b, self.leaf_b])
+
+        self.assertEqual(self.leaf_b.get_ancestors(), [self.root, self.branch_b])
+
+    def test_snapshot_follows_a_branch_move(self):
+        self.branch_a.parent = self.leaf_b
+        self.branch_a.save()
+
+        tree = AccountTree.current()
+        self.assertTrue(tree.is_descendant(self.leaves[0].pk, self.branch_b.pk))
+        self.assertEqual(tree.depth(self.leaves[0].pk), 5)
+        self.assertEqual(len(tree.descendant_ids(self.branch_b.pk)), 7)
+
+    def test_bulk_balances_roll_up_bottom_up_regardless_of_codes(self):
+        balances = ChartOfAccounts.get_balances_bulk()
+
+        self.assertEqual(balances[self.branch_a.pk]["balance"], Decimal("500.00"))
+        self.assertEqual(balances[self.root.pk]["balance"], Decimal("540.00"))
+
+        tree = AccountTree.current()
+        rolled = tree.rollup({leaf.pk: {"debit": Decimal("1")} for leaf in self.leaves}, fields=["debit"])
+        self.assertEqual(rolled[self.root.pk]["debit"], Decimal("5"))
+        self.assertNotIn(self.branch_b.pk, rolled)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_snapshot_is_shared_until_the_chart_changes(self):
+        cache.clear()
+        snapshot = AccountTree.current()
+        with self.assertNumQueries(0):
+            self.assertIs(AccountTree.current(), snapshot)
+
+        self.make("3000", parent=self.branch_b)
+        refreshed = AccountTree.current()
+        self.assertIsNot(refreshed, snapshot)
+        self.assertEqual(len(refreshed.leaf_ids(self.branch_b.pk)), 2)
@@ -0,0 +1,125 @@
+import pytest
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from financial.models import (
+    CostCenter, JournalEntry, JournalEntryLine, ChartOfAccounts, AccountType,
+    FiscalYear, AccountingPeriod, CostCenterBudget
+)
+from financial.models.cost_center_budget import CostCenterActualSnapshot, CostCenterBudgetLine
+from financial.services.budget_actual_service import BudgetActualService
+from financial.services.budget_control_service import BudgetControlService, BudgetExceededError
+from financial.services.ledger_core_service import LedgerCoreService
+
+User = get_user_model()
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'budget-consumption-tests',
+    }
+}
+
+
+@pytest.fixture
+def budget_setup(db):
+    user = User.objects.create_user(username="budget_ledger_user")
+    expense_type = AccountType.objects.create(name="مصروفات", category="expense", nature="debit")
+    expense = ChartOfAccounts.objects.create(code="50401", name="مصاريف إدارية", account_type=expense_type)
+    cash = ChartOfAccounts.objects.create(code="10111", name="الخزينة", account_type=expense_type)
+    cc = CostCenter.objects.create(code="CC-BUD1", name="الإدارة العامة")
+
+    entry_date = timezone.now().date().replace(day=10)
+    fy, _ = FiscalYear.objects.get_or_create(
+        name=f"السنة المالية {entry_date.year}",
+        defaults={'start_date': f"{entry_date.year}-01-01", 'end_date': f"{entry_date.year}-12-31", 'status': 'open'}
+    )
+    period, _ = AccountingPeriod.objects.get_or_create(
+        fiscal_year=fy,
+        period_number=entry_date.month,
+        defaults={
+            'name': f"فترة {entry_date.month}-{entry_date.year}",
+            'start_date': f"{entry_date.year}-{entry_date.month:02d}-01",
+            'end_date': f"{entry_date.year}-{entry_date.month:02d}-28",
+            'status': 'open'
+        }
+    )
+    budget = CostCenterBudget.objects.create(
+        cost_center=cc, fiscal_year=fy, version=1, allocated_amount=Decimal("1000.00"), status='APPROVED'
+    )
+    line = CostCenterBudgetLine.objects.create(
+        budget=budget, account=expense, allocated_amount=Decimal("1000.00"), control_policy='BLOCK'
+    )
+    return {
+        'user': user, 'expense': expense, 'cash': cash, 'cc': cc,
+        'date': entry_date, 'period': period, 'line': line,
+    }
+
+
+def _entry(setup, amount):
+    entry = JournalEntry.objects.create(
+        date=setup['date'], accounting_period=setup['period'], description="مصروف إداري",
+        created_by=setup['user'], status="draft"
+    )
+    JournalEntryLine.objects.create(
+        journal_entry=entry, account=setup['expense'], debit=amount, credit=Decimal("0.00"), cost_center=setup['cc']
+    )
+    JournalEntryLine.objects.create(
+        journal_entry=entry, account=setup['cash'], debit=Decimal("0.00"), credit=amount
+    )
+    return entry
+
+
+def _actual(setup):
+    return CostCenterActualSnapshot.objects.get(
+        cost_center=setup['cc'], account=setup['expense'], accounting_period=setup['period']
+    ).actual_amount
+
+
+@pytest.mark.django_db
+def test_posting_and_unposting_update_consumption_incrementally(budget_setup):
+    """الترحيل وإلغاء الترحيل يطبقان فرق القيد على دفتر الاستهلاك"""
+    setup = budget_setup
+    first = _entry(setup, Decimal("400.00"))
+    LedgerCoreService.post_entry(first.id, setup['user'])
+    assert _actual(setup) == Decimal("400.00")
+
+    second = _entry(setup, Decimal("350.00"))
+    LedgerCoreService.post_entry(second.id, setup['user'])
+    assert _actual(setup) == Decimal("750.00")
+
+    LedgerCoreService.unpost_entry(first.id, setup['user'], reason="تصحيح")
+    assert _actual(setup) == Decimal("350.00")
+    assert BudgetActualService.compute_actual(setup['cc'], setup['expense'], setup['period']) == Decimal("350.00")
+
+
+@pytest.mark.django_db
+def test_block_policy_rejects_posting_over_budget(budget_setup):
+    """سياسة الحظر تمنع ترحيل قيد يتجاوز المتبقي من الموازنة"""
+    setup = budget_setup
+    LedgerCoreService.post_entry(_entry(setup, Decimal("900.00")).id, setup['user'])
+
+    with pytest.raises(BudgetExceededError):
+        LedgerCoreService.post_entry(_entry(setup, Decimal("200.00")).id, setup['user'])
+    assert _actual(setup) == Decimal("900.00")
+
+
+@pytest.mark.django_db
+@override_settings(CACHES=LOCMEM_CACHE)
+def test_budget_lines_cached_per_fiscal_year_and_invalidated(budget_setup, django_assert_num_queries):
+    """بنود الموازنة تُقرأ من الكاش وتُبطل عند تعديل البند"""
+    setup = budget_setup
+    cache.clear()
+    fiscal_year_id = setup['period'].fiscal_year_id
+    key = (setup['cc'].id, setup['expense'].id)
+
+    assert BudgetControlService.get_budget_lines(fiscal_year_id)[key] == (Decimal("1000.00"), 'BLOCK')
+    with django_assert_num_queries(0):
+        BudgetControlService.get_budget_lines(fiscal_year_id)
+
+    setup['line'].allocated_amount = Decimal("1500.00")
+    setup['line'].save()
+    assert BudgetControlService.get_budget_lines(fiscal_year_id)[key] == (Decimal("1500.00"), 'BLOCK')
@@ -20,33 +20,35 @@ User = get_user_model()
 
 
 @pytest.fixture
-def analytics_setup(db):
+def analytics_setup(db, django_capture_on_commit_callbacks):
     """
     تجهيز بيئة الاختبار المحاسبية للتحليلات المالية
     """
-    currency, _ = Currency.objects.get_or_create(
-        code="EGP",
-        defaults={"name": "جنيه مصري", "symbol": "ج.م", "is_functional": True, "is_active": True}
-    )
-
-    asset_type, _ = AccountType.objects.get_or_create(code="ASSET", defaults={"name": "أصول", "category": "asset", "nature": "debit"})
-    liability_type, _ = AccountType.objects.get_or_create(code="LIAB", defaults={"name": "خصوم", "category": "liability", "nature": "credit"})
-    equity_type, _ = AccountType.objects.get_or_create(code="EQUITY", defaults={"name": "حقوق ملكية", "category": "equity", "nature": "credit"})
-    revenue_type, _ = AccountType.objects.get_or_create(code="REV", defaults={"name": "إيرادات", "category": "revenue", "nature": "credit"})
-    expense_type, _ = AccountType.objects.get_or_create(code="EXP", defaults={"name": "مصروفات", "category": "expense", "nature": "debit"})
-
-    cash_acc, _ = ChartOfAccounts.objects.get_or_create(code="11110", defaults={"name": "الخزينة", "account_type": asset_type, "level": 3, "is_leaf": True})
-    ar_acc, _ = ChartOfAccounts.objects.get_or_create(code="11210", defaults={"name": "العملاء", "account_type": asset_type, "level": 3, "is_leaf": True})
-    inv_acc, _ = ChartOfAccounts.objects.get_or_create(code="11310", defaults={"name": "المخزون", "account_type": asset_type, "level": 3, "is_leaf": True})
-    fa_acc, _ = ChartOfAccounts.objects.get_or_create(code="12110", defaults={"name": "الأصول الثابتة", "account_type": asset_type, "level": 3, "is_leaf": True})
-
-    ap_acc, _ = ChartOfAccounts.objects.get_or_create(code="21110", defaults={"name": "الموردون", "account_type": liability_type, "level": 3, "is_leaf": True})
-    capital_acc, _ = ChartOfAccounts.objects.get_or_create(code="31110", defaults={"name": "رأس المال", "account_type": equity_type, "level": 3, "is_leaf": True})
-    retained_acc, _ = ChartOfAccounts.objects.get_or_create(code="32210", defaults={"name": "الأرباح المرحلة", "account_type": equity_type, "level": 3, "is_leaf": True})
-
-    sales_acc, _ = ChartOfAccounts.objects.get_or_create(code="41100", defaults={"name": "المبيعات", "account_type": revenue_type, "level": 3, "is_leaf": True})
-    cogs_acc, _ = ChartOfAccounts.objects.get_or_create(code="51100", defaults={"name": "تكلفة المبيعات", "account_type": expense_type, "level": 3, "is_leaf": True})
-    admin_acc, _ = ChartOfAccounts.objects.get_or_create(code="52100", defaults={"name": "مصروفات إدارية", "account_type": expense_type, "level": 3, "is_leaf": True})
+    # تنفيذ ما سُجل عند الـ commit حتى لا يبقى تحديث نسخة الدفتر معلقاً خارج الاختبار
+    with django_capture_on_commit_callbacks(execute=True):
+        currency, _ = Currency.objects.get_or_create(
+            code="EGP",
+            defaults={"name": "جنيه مصري", "symbol": "ج.م", "is_functional": True, "is_active": True}
+        )
+
+        asset_type, _ = AccountType.objects.get_or_create(code="ASSET", defaults={"name": "أصول", "category": "asset", "nature": "debit"})
+        liability_type, _ = AccountType.objects.get_or_create(code="LIAB", defaults={"name": "خصوم", "category": "liability", "nature": "credit"})
+        equity_type, _ = AccountType.objects.get_or_create(code="EQUITY", defaults={"name": "حقوق ملكية", "category": "equity", "nature": "credit"})
+        revenue_type, _ = AccountType.objects.get_or_create(code="REV", defaults={"name": "إيرادات", "category": "revenue", "nature": "credit"})
+        expense_type, _ = AccountType.objects.get_or_create(code="EXP", defaults={"name": "مصروفات", "category": "expense", "nature": "debit"})
+
+        cash_acc, _ = ChartOfAccounts.objects.get_or_create(code="11110", defaults={"name": "الخزينة", "account_type": asset_type, "level": 3, "is_leaf": True})
+        ar_acc, _ = ChartOfAccounts.objects.get_or_create(code="11210", defaults={"name": "العملاء", "account_type": asset_type, "level": 3, "is_leaf": True})
+        inv_acc, _ = ChartOfAccounts.objects.get_or_create(code="11310", defaults={"name": "المخزون", "account_type": asset_type, "level": 3, "is_leaf": True})
+        fa_acc, _ = ChartOfAccounts.objects.get_or_create(code="12110", defaults={"name": "الأصول الثابتة", "account_type": asset_type, "level": 3, "is_leaf": True})
+
+        ap_acc, _ = ChartOfAccounts.objects.get_or_create(code="21110", defaults={"name": "الموردون", "account_type": liability_type, "level": 3, "is_leaf": True})
+        capital_acc, _ = ChartOfAccounts.objects.get_or_create(code="31110", defaults={"name": "رأس المال", "account_type": equity_type, "level": 3, "is_leaf": True})
+        retained_acc, _ = ChartOfAccounts.objects.get_or_create(code="32210", defaults={"name": "الأرباح المرحلة", "account_type": equity_type, "level": 3, "is_leaf": True})
+
+        sales_acc, _ = ChartOfAccounts.objects.get_or_create(code="41100", defaults={"name": "المبيعات", "account_type": revenue_type, "level": 3, "is_leaf": True})
+        cogs_acc, _ = ChartOfAccounts.objects.get_or_create(code="51100", defaults={"name": "تكلفة المبيعات", "account_type": expense_type, "level": 3, "is_leaf": True})
+        admin_acc, _ = ChartOfAccounts.objects.get_or_create(code="52100", defaults={"name": "مصروفات إدارية", "account_type": expense_type, "level": 3, "is_leaf": True})
 
     user, _ = User.objects.get_or_create(username="test_cfo", defaults={"email": "cfo@example.com", "is_staff": True})
 
@@ -156,3 +158,79 @@ def test_financial_analytics_view_response(analytics_setup):
     assert "health_scorecard" in response.context
     assert response.context["active_preset"] == "this_month"
     assert "monthlyTrendsChart" in response.content.decode("utf-8")
+
+
+def _post_entry(user, number, entry_date, lines, entry_type="manual"):
+    entry = JournalEntry.objects.create(number=number, date=entry_date, status="posted", entry_type=entry_type, created_by=user)
+    for account, debit, credit in lines:
+        JournalEntryLine.objects.create(journal_entry=entry, account=account, debit=Decimal(debit), credit=Decimal(credit))
+    return entry
+
+
+@pytest.mark.django_db
+def test_financial_analytics_frame_ratios_trends_and_distribution(analytics_setup):
+    """
+    اختبار احتساب السيولة والاتجاهات الشهرية وتوزيع المصروفات من إطار الأرصدة الموحد
+    """
+    s = analytics_setup
+    _post_entry(s["user"], "JE-FR-OPEN", date(2026, 1, 1), [
+        (s["cash_acc"], "50000", "0"), (s["inv_acc"], "30000", "0"), (s["capital_acc"], "0", "80000"),
+    ], entry_type="opening")
+    _post_entry(s["user"], "JE-FR-SALE", date(2026, 5, 10), [
+        (s["ar_acc"], "40000", "0"), (s["sales_acc"], "0", "40000"),
+    ])
+    _post_entry(s["user"], "JE-FR-ADMIN", date(2026, 6, 5), [
+        (s["admin_acc"], "7000", "0"), (s["ap_acc"], "0", "7000"),
+    ])
+    # قيود الإقفال مستبعدة من كل المؤشرات
+    _post_entry(s["user"], "JE-FR-CLOSE", date(2026, 6, 30), [
+        (s["sales_acc"], "40000", "0"), (s["retained_acc"], "0", "40000"),
+    ], entry_type="closing")
+
+    res = FinancialAnalyticsService.get_complete_analytics(
+        date_from=date(2026, 6, 1), date_to=date(2026, 6, 30), use_cache=False
+    )
+
+    liquidity = res["liquidity"]
+    assert liquidity["current_assets"] == Decimal("120000")
+    assert liquidity["cash_equivalents"] == Decimal("50000")
+    assert liquidity["inventory"] == Decimal("30000")
+    assert liquidity["current_liabilities"] == Decimal("7000")
+
+    trends = res["monthly_trends"]
+    assert len(trends["labels"]) == 13
+    may = trends["labels"].index(date(2026, 5, 1).strftime("%b %Y"))
+    assert trends["revenues"][may] == 40000.0
+    assert trends["expenses"][-1] == 7000.0
+    assert trends["profits"][-1] == -7000.0
+
+    assert res["expense_distribution"]["data"] == [0.0, 7000.0, 0.0, 0.0]
+
+
+@pytest.mark.django_db
+def test_financial_analytics_cache_invalidated_by_posting(analytics_setup, settings, django_capture_on_commit_callbacks):
+    """
+    اختبار تخزين التحليلات في الكاش وإبطالها تلقائياً عند ترحيل قيد جديد
+    """
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "fa-analytics-tests"}}
+    s = analytics_setup
+    params = {"date_from": date(2026, 6, 1), "date_to": date(2026, 6, 30)}
+
+    first = FinancialAnalyticsService.get_complete_analytics(**params)
+    assert first["basic_metrics"]["monthly_income"] == Decimal("0")
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    with CaptureQueriesContext(connection) as ctx:
+        cached = FinancialAnalyticsService.get_complete_analytics(**params)
+    assert first["is_cached"] is False
+    assert cached["is_cached"] is True
+    assert {**cached, "is_cached": False} == first
+    assert not [q for q in ctx.captured_queries if "financial_journalentryline" in q["sql"]]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        _post_entry(s["user"], "JE-CACHE-SALE", date(2026, 6, 10), [
+            (s["cash_acc"], "25000", "0"), (s["sales_acc"], "0", "25000"),
+        ])
+    refreshed = FinancialAnalyticsService.get_complete_analytics(**params)
+    assert refreshed["basic_metrics"]["monthly_income"] == Decimal("25000")
@@ -0,0 +1,125 @@
+import pytest
+from datetime import date
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+
+from client.models import Customer, CustomerTransaction
+from supplier.models import Supplier, SupplierTransaction
+from financial.models.currency import Currency
+from financial.models import ChartOfAccounts, AccountType, AccountingPeriod, FiscalYear, JournalEntry
+from financial.services.exchange_rate_service import ExchangeRateService
+from financial.services.fx_revaluation_service import FXRevaluationService
+
+User = get_user_model()
+
+AS_OF = date(2026, 3, 31)
+
+
+@pytest.mark.django_db
+class TestFXRevaluationEngine:
+
+    @pytest.fixture
+    def setup_fx_data(self):
+        user = User.objects.create_user(username="fx_reval_user", password="password123", email="fx_reval@test.com")
+        Currency.objects.update_or_create(code="EGP", defaults={"name": "Egyptian Pound", "symbol": "EGP", "is_functional": True})
+        Currency.objects.filter(is_functional=True).exclude(code="EGP").update(is_functional=False)
+        for code in ("USD", "EUR"):
+            Currency.objects.get_or_create(code=code, defaults={"name": code, "symbol": code, "is_functional": False})
+
+        # USD: سعر مباشر، وسعر لاحق لتاريخ التقييم يجب تجاهله
+        ExchangeRateService.set_rate("USD", "EGP", Decimal("48.000000"), date=date(2026, 1, 1), user=user)
+        ExchangeRateService.set_rate("USD", "EGP", Decimal("50.000000"), date=date(2026, 3, 15), user=user)
+        ExchangeRateService.set_rate("USD", "EGP", Decimal("55.000000"), date=date(2026, 4, 10), user=user)
+        # EUR: سعر عكسي فقط
+        ExchangeRateService.set_rate("EGP", "EUR", Decimal("0.020000"), date=date(2026, 2, 1), user=user)
+
+        asset_type, _ = AccountType.objects.get_or_create(code="FXR_ASSET", defaults={"name": "Asset", "category": "asset", "nature": "debit"})
+        ChartOfAccounts.objects.get_or_create(code="11210", defaults={"name": "Customers Control", "account_type": asset_type, "is_active": True, "is_leaf": True})
+
+        fiscal_year = FiscalYear.objects.create(name="FY2026-FXR", start_date=date(2026, 1, 1), end_date=date(2026, 12, 31))
+        AccountingPeriod.objects.create(
+            fiscal_year=fiscal_year, name="MAR2026-FXR", period_number=3,
+            start_date=date(2026, 3, 1), end_date=date(2026, 3, 31), status="open"
+        )
+
+        customer = Customer.objects.create(name="Gulf Importer", code="CUST-FXR-1", created_by=user)
+        supplier = Supplier.objects.create(code="SUP-FXR-1", name="Hamburg Machines", is_active=True)
+        return user, customer, supplier
+
+    def _ar(self, customer, number, currency, amount, rate, issue_date=date(2026, 3, 1)):
+        return CustomerTransaction.objects.create(
+            customer=customer, transaction_type="INVOICE", transaction_number=number,
+            issue_date=issue_date, due_date=issue_date, currency=currency, foreign_amount=amount,
+            exchange_rate=rate, functional_amount=(amount * rate).quantize(Decimal("0.01")),
+            open_amount=(amount * rate).quantize(Decimal("0.01")), open_amount_foreign=amount
+        )
+
+    def _ap(self, supplier, number, currency, amount, rate):
+        return SupplierTransaction.objects.create(
+            supplier=supplier, transaction_type="BILL", transaction_number=number,
+            issue_date=date(2026, 3, 1), due_date=date(2026, 3, 1), currency=currency, foreign_amount=amount,
+            exchange_rate=rate, functional_amount=(amount * rate).quantize(Decimal("0.01")),
+            open_amount=(amount * rate).quantize(Decimal("0.01")), open_amount_foreign=amount
+        )
+
+    def test_closing_rate_table_matches_get_rate(self, setup_fx_data):
+        rates = ExchangeRateService.get_closing_rates("EGP", AS_OF)
+
+        assert rates == {"EGP": Decimal("1.000000"), "USD": Decimal("50.000000"), "EUR": Decimal("50.000000")}
+        for code in ("USD", "EUR"):
+            assert rates[code] == ExchangeRateService.get_rate(code, "EGP", AS_OF)
+        assert ExchangeRateService.get_closing_rates("EGP", date(2026, 4, 30))["USD"] == Decimal("55.000000")
+
+    def test_open_items_are_revalued_per_currency_in_constant_queries(self, setup_fx_data):
+        user, customer, supplier = setup_fx_data
+        self._ar(customer, "AR-1", "USD", Decimal("1000.00"), Decimal("48.000000"))
+        self._ar(customer, "AR-2", "EUR", Decimal("200.00"), Decimal("52.000000"))
+        self._ar(customer, "AR-LATE", "USD", Decimal("500.00"), Decimal("48.000000"), issue_date=date(2026, 4, 2))
+        self._ap(supplier, "AP-1", "USD", Decimal("400.00"), Decimal("49.000000"))
+
+        with CaptureQueriesContext(connection) as small:
+            data = FXRevaluationService.calculate_open_items_revaluation(AS_OF)
+
+        assert [item["customer"] for item in data["customer_items"]] == ["Gulf Importer", "Gulf Importer"]
+        assert data["supplier_items"][0]["supplier"] == "Hamburg Machines"
+        # USD: AR (50 - 48) * 1000 = 2000، AP (49 - 50) * 400 = -400 | EUR: AR (50 - 52) * 200 = -400
+        assert data["currency_totals"]["USD"] == {
+            "AR": Decimal("2000.00"), "AP": Decimal("-400.00"), "CASH": Decimal("0.00"), "total": Decimal("1600.00")
+        }
+        assert data["currency_totals"]["EUR"]["total"] == Decimal("-400.00")
+        assert data["total_unrealized_gain_loss"] == Decimal("1200.00")
+
+        for index in range(5):
+            self._ar(customer, f"AR-MORE-{index}", "USD", Decimal("10.00"), Decimal("48.000000"))
+            self._ap(supplier, f"AP-MORE-{index}", "EUR", Decimal("10.00"), Decimal("48.000000"))
+        with CaptureQueriesContext(connection) as large:
+            FXRevaluationService.calculate_open_items_revaluation(AS_OF)
+
+        assert len(large) == len(small)
+
+    def test_posting_creates_one_auto_reversed_entry_per_currency(self, setup_fx_data):
+        user, customer, supplier = setup_fx_data
+        self._ar(customer, "AR-1", "USD", Decimal("1000.00"), Decimal("48.000000"))
+        self._ar(customer, "AR-2", "EUR", Decimal("200.00"), Decimal("52.000000"))
+
+        result = FXRevaluationService.post_period_end_revaluation(AS_OF, user=user)
+
+        assert result["status"] == "POSTED"
+        assert [entry["currency"] for entry in result["entries"]] == ["EUR", "USD"]
+        assert result["reversal_date"] == date(2026, 4, 1)
+        for entry in result["entries"]:
+            original = JournalEntry.objects.get(pk=entry["journal_entry_id"])
+            reversal = JournalEntry.objects.get(pk=entry["reversal_entry_id"])
+            assert original.date == AS_OF and original.status == "posted"
+            assert reversal.is_reversal and reversal.original_entry_id == original.pk
+            assert reversal.date == date(2026, 4, 1)
+            assert sum(line.debit for line in original.lines.all()) == abs(entry["unrealized_gain_loss"])
+            assert {(line.account_id, line.debit) for line in reversal.lines.all()} == {
+                (line.account_id, line.credit) for line in original.lines.all()
+            }
+
+        entries_count = JournalEntry.objects.count()
+        assert FXRevaluationService.post_period_end_revaluation(AS_OF, user=user)["status"] == "ALREADY_POSTED"
+        assert JournalEntry.objects.count() == entries_count
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات محرك فحص سلامة البيانات التزايدي
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from client.models import Customer
+from financial.models.chart_of_accounts import AccountType, ChartOfAccounts
+from financial.models.integrity_check import IntegrityCheckRun, IntegrityFinding
+from financial.models.journal_entry import JournalEntry, JournalEntryLine
+from financial.services.integrity_check_service import IntegrityCheckService
+
+User = get_user_model()
+
+
+class IntegrityCheckServiceTest(TestCase):
+    """اختبارات الفحوصات التجميعية والتشغيل التزايدي وحفظ النتائج"""
+
+    def setUp(self):
+        self.user = User.objects.create_superuser(username="integrity_admin", password="password123")
+        asset, _ = AccountType.objects.get_or_create(
+            code="INT_AST", defaults={"name": "أصول", "category": "asset", "nature": "debit"}
+        )
+        revenue, _ = AccountType.objects.get_or_create(
+            code="INT_REV", defaults={"name": "إيرادات", "category": "revenue", "nature": "credit"}
+        )
+        self.cash = ChartOfAccounts.objects.create(code="11110", name="الخزينة", account_type=asset, is_leaf=True)
+        self.sales = ChartOfAccounts.objects.create(code="41100", name="المبيعات", account_type=revenue, is_leaf=True)
+        self.customer_account = ChartOfAccounts.objects.create(
+            code="1121001", name="عميل الفحص", account_type=asset, is_leaf=True
+        )
+
+    def _entry(self, number, lines, status="posted", **extra):
+        entry = JournalEntry.objects.create(
+            number=number, date=date(2026, 6, 1), status=status, created_by=self.user, **extra
+        )
+        for account, debit, credit in lines:
+            JournalEntryLine.objects.create(
+                journal_entry=entry, account=account, debit=Decimal(debit), credit=Decimal(credit)
+            )
+        return entry
+
+    def _open(self, check_code):
+        return IntegrityFinding.objects.filter(check_code=check_code, status="open")
+
+    def test_unbalanced_entries_found_incrementally_and_resolved(self):
+        self._entry("INT-1", [(self.cash, 100, 0), (self.sales, 0, 100)])
+        broken = self._entry("INT-2", [(self.cash, 100, 0), (self.sales, 0, 90)])
+        self._entry("INT-3", [(self.cash, 50, 0)], status="draft")
+
+        first = IntegrityCheckService.run()
+        self.assertEqual(first.status, "completed")
+        self.assertTrue(first.is_full)
+        finding = self._open("unbalanced_entry").get()
+        self.assertEqual(finding.object_id, broken.id)
+        self.assertEqual(finding.difference, Decimal("10.00"))
+
+        # التشغيل التالي تزايدي: قيد جديد غير متوازن يُكتشف والقديم يبقى مفتوحاً
+        newer = self._entry("INT-4", [(self.cash, 0, 30)])
+        second = IntegrityCheckService.run()
+        self.assertFalse(second.is_full)
+        self.assertEqual(second.checkpoint["journal_entry"], newer.id)
+        self.assertEqual(
+            set(self._open("unbalanced_entry").values_list("object_id", flat=True)), {broken.id, newer.id}
+        )
+        self.assertEqual(second.summary["unbalanced_entry"]["new"], 1)
+
+        # تصحيح القيد يغلق المشكلة في التشغيل التالي دون إنشاء سجل جديد
+        JournalEntryLine.objects.create(journal_entry=broken, account=self.sales, debit=0, credit=Decimal("10"))
+        third = IntegrityCheckService.run()
+        self.assertEqual(third.summary["unbalanced_entry"]["resolved"], 1)
+        self.assertEqual(IntegrityFinding.objects.get(object_id=broken.id).status, "resolved")
+        self.assertEqual(IntegrityFinding.objects.filter(check_code="unbalanced_entry").count(), 2)
+
+    def test_customer_balance_compared_with_gl_account(self):
+        customer = Customer.objects.create(
+            name="عميل الفحص", code="CUST-INT-1", financial_account=self.customer_account,
+            balance=Decimal("500"), created_by=self.user,
+        )
+        self._entry("INT-C1", [(self.customer_account, 300, 0), (self.sales, 0, 300)])
+
+        IntegrityCheckService.run()
+        finding = self._open("customer_balance").get()
+        self.assertEqual(finding.object_id, customer.id)
+        self.assertEqual(finding.expected, Decimal("300.00"))
+        self.assertEqual(finding.actual, Decimal("500.00"))
+        self.assertEqual(finding.difference, Decimal("200.00"))
+
+        Customer.objects.filter(pk=customer.pk).update(balance=Decimal("300"))
+        Customer.objects.get(pk=customer.pk).save()
+        IntegrityCheckService.run()
+        self.assertFalse(self._open("customer_balance").exists())
+
+    def test_orphan_source_links(self):
+        linked = self._entry(
+            "INT-S1", [(self.cash, 10, 0), (self.sales, 0, 10)],
+            source_module="financial", source_model="ChartOfAccounts", source_id=self.cash.id,
+        )
+        orphan = self._entry(
+            "INT-S2", [(self.cash, 10, 0), (self.sales, 0, 10)],
+            source_module="financial", source_model="ChartOfAccounts", source_id=999999,
+        )
+        unknown = self._entry(
+            "INT-S3", [(self.cash, 10, 0), (self.sales, 0, 10)],
+            source_module="missing_app", source_model="Gone", source_id=1,
+        )
+
+        IntegrityCheckService.run()
+        orphan_ids = set(self._open("orphan_source").values_list("object_id", flat=True))
+        self.assertEqual(orphan_ids, {orphan.id, unknown.id})
+        self.assertNotIn(linked.id, orphan_ids)
+
+    def test_stock_and_stale_draft_sale_checks(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from product.models import Category, Product, Stock, Unit, Warehouse
+        from sale.models import Sale
+
+        warehouse = Warehouse.objects.create(code="WH-INT", name="مخزن الفحص")
+        product = Product.objects.create(
+            name="منتج الفحص", sku="INT-NEG-1", category=Category.objects.create(name="فحص"),
+            unit=Unit.objects.create(name="قطعة"), cost_price=Decimal("10"), selling_price=Decimal("15"),
+            created_by=self.user,
+        )
+        Stock.objects.create(product=product, warehouse=warehouse, quantity=3)
+        customer = Customer.objects.create(name="عميل المسودات", code="CUST-INT-2", created_by=self.user)
+        sale_fields = {
+            "customer": customer, "warehouse": warehouse, "date": date(2026, 5, 1),
+            "subtotal": Decimal("100"), "total": Decimal("100"), "created_by": self.user,
+        }
+        stale = Sale.objects.create(number="INT-SALE-1", status="draft", **sale_fields)
+        Sale.objects.create(number="INT-SALE-2", status="draft", **sale_fields)
+        Sale.objects.create(number="INT-SALE-3", status="confirmed", **sale_fields)
+        Sale.objects.filter(number__in=["INT-SALE-1", "INT-SALE-3"]).update(
+            created_at=timezone.now() - timedelta(days=45)
+        )
+
+        run = IntegrityCheckService.run()
+        self.assertEqual(list(self._open("stale_draft_sale").values_list("object_id", flat=True)), [stale.id])
+        self.assertEqual(run.summary["negative_stock"]["found"], 0)
+        self.assertEqual(run.summary["duplicate_account_code"]["found"], 0)
+
+        Sale.objects.filter(pk=stale.pk).update(status="confirmed")
+        IntegrityCheckService.run()
+        self.assertFalse(self._open("stale_draft_sale").exists())
+
+    def test_query_count_does_not_grow_with_entries(self):
+        def full_run_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                IntegrityCheckService.run(full=True)
+            return len(ctx.captured_queries)
+
+        self._entry("INT-Q0", [(self.cash, 10, 0), (self.sales, 0, 5)])
+        IntegrityCheckService.run(full=True)
+        baseline = full_run_queries()
+
+        for index in range(1, 21):
+            self._entry(f"INT-Q{index}", [(self.cash, 10, 0), (self.sales, 0, 10 if index % 2 else 5)])
+        IntegrityCheckService.run(full=True)
+        self.assertEqual(full_run_queries(), baseline)
+        self.assertEqual(self._open("unbalanced_entry").count(), 11)
+
+    def test_page_reads_stored_findings_and_post_runs_check(self):
+        self._entry("INT-V1", [(self.cash, 100, 0), (self.sales, 0, 40)])
+        self.client.force_login(self.user)
+        url = reverse("financial:data_integrity_check")
+
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["results"]["summary"]["total_checks"], 0)
+
+        response = self.client.post(url, secure=True)
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.assertEqual(IntegrityCheckRun.objects.count(), 1)
+
+        response = self.client.get(url, secure=True)
+        results = response.context["results"]
+        self.assertEqual(results["summary"]["total_checks"], len(IntegrityCheckService.CHECKS))
+        self.assertEqual(results["errors"][0]["count"], 1)
+        self.assertContains(response, "INT-V1")
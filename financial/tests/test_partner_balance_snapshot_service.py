@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات لقطات أرصدة الشركاء (الفواتير المفتوحة، الرصيد المسبق، أعمار الديون)
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from client.models import Customer, CustomerPayment
+from financial.models import Currency
+from financial.models.partner_advance import PartnerCurrencyBalanceSnapshot
+from financial.services.partner_balance_snapshot_service import PartnerBalanceSnapshotService
+from product.models import Warehouse
+from sale.models import Sale
+
+User = get_user_model()
+
+
+class PartnerBalanceSnapshotServiceTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="snapshot_user", password="password")
+        self.egp, _ = Currency.objects.get_or_create(
+            code="EGP", defaults={"name": "جنيه مصري", "is_functional": True}
+        )
+        self.warehouse = Warehouse.objects.create(name="مخزن اللقطات", code="WH-SNAP")
+        self.customer = Customer.objects.create(name="عميل اللقطات", code="CUST-SNAP-001", created_by=self.user)
+        self.today = timezone.now().date()
+
+    def _sale(self, number, total, days_ago=0):
+        return Sale.objects.create(
+            customer=self.customer,
+            warehouse=self.warehouse,
+            number=number,
+            date=self.today - timedelta(days=days_ago),
+            subtotal=total,
+            total=total,
+            created_by=self.user,
+        )
+
+    def _balances(self, **kwargs):
+        rows = PartnerBalanceSnapshotService.get_balances("customer", [self.customer.id], **kwargs)
+        return {row["currency_code"]: row for row in rows[self.customer.id]}
+
+    def test_open_invoices_advances_and_aging(self):
+        self._sale("INV-SNAP-001", Decimal("1000.00"))
+        self._sale("INV-SNAP-002", Decimal("500.00"), days_ago=45)
+        CustomerPayment.objects.create(
+            customer=self.customer,
+            amount=Decimal("300.00"),
+            payment_date=self.today,
+            payment_method="cash",
+            created_by=self.user,
+        )
+
+        self.assertEqual(PartnerBalanceSnapshotService.refresh("customer", [self.customer.id]), 1)
+        row = self._balances()["EGP"]
+
+        self.assertEqual(row["open_invoice_total"], Decimal("1500.00"))
+        self.assertEqual(row["open_invoice_count"], 2)
+        self.assertEqual(row["aging_current"], Decimal("1000.00"))
+        self.assertEqual(row["aging_31_60"], Decimal("500.00"))
+        self.assertEqual(row["advance_balance"], Decimal("300.00"))
+        self.assertEqual(row["last_activity_date"], self.today)
+
+        # الرصيد التاريخي يستبعد ما بعد التاريخ
+        past = self._balances(as_of_date=self.today - timedelta(days=10))["EGP"]
+        self.assertEqual(past["open_invoice_total"], Decimal("500.00"))
+        self.assertEqual(past["advance_balance"], Decimal("0.00"))
+
+    def test_refresh_scheduled_once_per_transaction(self):
+        self._sale("INV-SNAP-003", Decimal("250.00"))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            PartnerBalanceSnapshotService.update_snapshot("customer", self.customer.id)
+            PartnerBalanceSnapshotService.update_bulk_snapshots("customer", [self.customer.id])
+            PartnerBalanceSnapshotService.update_snapshot("client", self.customer.id)
+
+        self.assertEqual(len(callbacks), 1)
+        snapshot = PartnerCurrencyBalanceSnapshot.objects.get(partner_type="customer", partner_id=self.customer.id)
+        self.assertEqual(snapshot.open_invoice_total, Decimal("250.00"))
+        self.assertEqual(snapshot.aging_date, self.today)
+
+    def test_partner_without_activity_gets_zero_snapshot(self):
+        self._sale("INV-SNAP-004", Decimal("100.00"))
+        PartnerBalanceSnapshotService.refresh("customer", [self.customer.id])
+        Sale.objects.filter(customer=self.customer).update(status="cancelled")
+
+        call_command("rebuild_partner_snapshots", partner_type="customer", stdout=StringIO())
+
+        snapshot = PartnerCurrencyBalanceSnapshot.objects.get(partner_type="customer", partner_id=self.customer.id)
+        self.assertEqual(snapshot.open_invoice_total, Decimal("0.00"))
+        self.assertEqual(snapshot.open_invoice_count, 0)
+
+    def test_stale_snapshot_is_served_and_refreshed_in_background(self):
+        self._sale("INV-SNAP-005", Decimal("400.00"), days_ago=45)
+        PartnerBalanceSnapshotService.refresh("customer", [self.customer.id])
+        PartnerCurrencyBalanceSnapshot.objects.filter(partner_id=self.customer.id).update(
+            aging_date=self.today - timedelta(days=1),
+            aging_current=Decimal("400.00"),
+            aging_31_60=Decimal("0.00"),
+        )
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            row = self._balances()["EGP"]
+
+        # القراءة لا تنتظر التحديث
+        self.assertEqual(row["aging_current"], Decimal("400.00"))
+        self.assertEqual(len(callbacks), 1)
+
+        callbacks[0]()
+        snapshot = PartnerCurrencyBalanceSnapshot.objects.get(partner_type="customer", partner_id=self.customer.id)
+        self.assertEqual(snapshot.aging_31_60, Decimal("400.00"))
+        self.assertEqual(snapshot.aging_date, self.today)
+
+    def test_missing_snapshot_is_computed_without_saving(self):
+        self._sale("INV-SNAP-006", Decimal("150.00"))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            row = self._balances()["EGP"]
+
+        self.assertEqual(row["open_invoice_total"], Decimal("150.00"))
+        self.assertFalse(PartnerCurrencyBalanceSnapshot.objects.filter(partner_id=self.customer.id).exists())
+        self.assertEqual(len(callbacks), 1)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات كاش نتائج التقارير المالية وإصدارات فترات دفتر الأستاذ
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from financial.models.chart_of_accounts import AccountType, ChartOfAccounts
+from financial.models.journal_entry import JournalEntry, JournalEntryLine
+from financial.services.ledger_version import LedgerVersion
+from financial.services.report_cache import ReportCache, pack, unpack
+
+User = get_user_model()
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'report-cache-tests',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ReportCacheTest(TestCase):
+    """اختبارات الترميز والإبطال حسب الفترة وإحصائيات الإصابة"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_superuser(username="report_cache_admin", password="password123")
+        asset, _ = AccountType.objects.get_or_create(
+            code="RC_AST", defaults={"name": "أصول", "category": "asset", "nature": "debit"}
+        )
+        equity, _ = AccountType.objects.get_or_create(
+            code="RC_EQ", defaults={"name": "حقوق ملكية", "category": "equity", "nature": "credit"}
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cash = ChartOfAccounts.objects.create(code="11110", name="الخزينة", account_type=asset, is_leaf=True)
+            self.capital = ChartOfAccounts.objects.create(code="31110", name="رأس المال", account_type=equity, is_leaf=True)
+        self._post("RC-1", date(2026, 5, 10), 1000)
+
+    def _post(self, number, day, amount):
+        # الإصدارات تُزاد بعد الـ commit
+        with self.captureOnCommitCallbacks(execute=True):
+            entry = JournalEntry.objects.create(number=number, date=day, status="posted", created_by=self.user)
+            JournalEntryLine.objects.create(journal_entry=entry, account=self.cash, debit=Decimal(amount), credit=0)
+            JournalEntryLine.objects.create(journal_entry=entry, account=self.capital, debit=0, credit=Decimal(amount))
+        return entry
+
+    def test_pack_round_trip_restores_decimals_dates_and_models(self):
+        value = {
+            "total": Decimal("1234.50"),
+            "as_of": date(2026, 6, 30),
+            "generated_at": datetime(2026, 7, 1, 9, 30),
+            "lines": [{"account": self.cash, "balance": Decimal("-0.01")}, {"account": self.capital}],
+            7: "int key",
+        }
+        with self.assertNumQueries(1):
+            restored = unpack(pack(value))
+        self.assertEqual(restored["total"], Decimal("1234.50"))
+        self.assertEqual(restored["as_of"], date(2026, 6, 30))
+        self.assertEqual(restored["generated_at"], datetime(2026, 7, 1, 9, 30))
+        self.assertEqual(restored["lines"][0]["account"], self.cash)
+        self.assertEqual(restored["lines"][0]["account"].account_type.code, "RC_AST")
+        self.assertEqual(restored[7], "int key")
+
+    def test_posting_invalidates_only_reports_covering_its_period(self):
+        may = LedgerVersion.token(date(2026, 5, 31))
+        june = LedgerVersion.token(date(2026, 6, 30))
+
+        self._post("RC-2", date(2026, 6, 15), 50)
+        self.assertEqual(LedgerVersion.token(date(2026, 5, 31)), may)
+        self.assertNotEqual(LedgerVersion.token(date(2026, 6, 30)), june)
+
+        # نقل قيد (مسودة) من مايو إلى أغسطس يُبطل مايو أيضاً
+        with self.captureOnCommitCallbacks(execute=True):
+            draft = JournalEntry.objects.create(number="RC-D", date=date(2026, 5, 12), created_by=self.user)
+        may = LedgerVersion.token(date(2026, 5, 31))
+        draft.date = date(2026, 8, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            draft.save()
+        self.assertNotEqual(LedgerVersion.token(date(2026, 5, 31)), may)
+
+        # تعديل دليل الحسابات يُبطل كل الفترات
+        may = LedgerVersion.token(date(2026, 5, 31))
+        self.cash.name = "الخزينة الرئيسية"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cash.save()
+        self.assertNotEqual(LedgerVersion.token(date(2026, 5, 31)), may)
+
+    def test_lines_are_collected_into_one_bump_per_transaction(self):
+        june = LedgerVersion.token(date(2026, 6, 30))
+        may = LedgerVersion.token(date(2026, 5, 31))
+
+        with patch.object(LedgerVersion, "bump", wraps=LedgerVersion.bump) as bump:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with CaptureQueriesContext(connection) as queries:
+                    entry = JournalEntry.objects.create(
+                        number="RC-B", date=date(2026, 6, 3), created_by=self.user
+                    )
+                    for _ in range(10):
+                        JournalEntryLine.objects.create(journal_entry=entry, account=self.cash, debit=1, credit=0)
+                        JournalEntryLine.objects.create(journal_entry=entry, account=self.capital, debit=0, credit=1)
+                    # تحميل القيد وتعديله لا يستعلم عن تاريخه السابق
+                    JournalEntry.objects.get(pk=entry.pk).save()
+                # بند بدون القيد الأب محملاً: تاريخه يُقرأ عند الـ commit
+                JournalEntryLine.objects.filter(journal_entry=entry).first().save()
+
+        self.assertFalse([q["sql"] for q in queries if q["sql"].startswith('SELECT "financial_journalentry"."date"')])
+        self.assertEqual(bump.call_count, 1)
+        self.assertEqual(callbacks.count(callbacks[0]), 1)
+        self.assertEqual(LedgerVersion.token(date(2026, 5, 31)), may)
+        self.assertNotEqual(LedgerVersion.token(date(2026, 6, 30)), june)
+
+    def test_get_or_compute_hits_until_period_changes_and_counts_rate(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return {"cash": self.cash.get_balance(), "account": self.cash}
+
+        params = {"as_of_date": date(2026, 5, 31)}
+        first, first_cached = ReportCache.get_or_compute("balance_sheet", params, compute, as_of=date(2026, 5, 31))
+        second, second_cached = ReportCache.get_or_compute("balance_sheet", params, compute, as_of=date(2026, 5, 31))
+        self.assertEqual((first_cached, second_cached), (False, True))
+        self.assertEqual(second["account"], self.cash)
+        self.assertEqual(len(calls), 1)
+
+        self._post("RC-3", date(2026, 7, 1), 25)
+        _, cached = ReportCache.get_or_compute("balance_sheet", params, compute, as_of=date(2026, 5, 31))
+        self.assertTrue(cached)
+
+        self._post("RC-4", date(2026, 5, 20), 25)
+        refreshed, cached = ReportCache.get_or_compute("balance_sheet", params, compute, as_of=date(2026, 5, 31))
+        self.assertFalse(cached)
+        self.assertEqual(len(calls), 2)
+
+        stats = ReportCache.stats(["balance_sheet"])["balance_sheet"]
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 2))
+        self.assertEqual(stats["hit_rate"], 50.0)
+
+    def test_report_views_serve_repeat_requests_from_cache(self):
+        self.client.force_login(self.user)
+        requests = [
+            (reverse("financial:balance_sheet"), {"date": "2026-05-31"}),
+            (reverse("financial:income_statement"), {"date_from": "2026-05-01", "date_to": "2026-05-31"}),
+            (reverse("financial:trial_balance_report"), {"date_from": "2026-05-01", "date_to": "2026-05-31"}),
+            (reverse("financial:ledger_report"), {"account": self.cash.id, "date_to": "2026-05-31"}),
+        ]
+        for url, params in requests:
+            first = self.client.get(url, params, secure=True)
+            self.assertEqual(first.status_code, 200)
+            self.assertFalse(first.context["is_cached"])
+            second = self.client.get(url, params, secure=True)
+            self.assertTrue(second.context["is_cached"], url)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات حزمة القوائم المالية المشتقة من مكعب أرصدة واحد
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from financial.models.chart_of_accounts import AccountType, ChartOfAccounts
+from financial.models.journal_entry import JournalEntry, JournalEntryLine
+from financial.services.balance_cube import BalanceCube
+from financial.services.balance_sheet_service import BalanceSheetService
+from financial.services.cash_flow_service import CashFlowService
+from financial.services.financial_statement_engine import FinancialStatementEngine
+from financial.services.income_statement_service import IncomeStatementService
+from financial.services.statement_pack_service import StatementPackService
+from financial.services.trial_balance_service import TrialBalanceService
+
+User = get_user_model()
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'statement-pack-tests',
+    }
+}
+
+
+def _cube_queries(queries):
+    """استعلامات التجميع على بنود القيود"""
+    return [
+        query for query in queries
+        if 'financial_journalentryline' in query['sql'] and 'GROUP BY' in query['sql']
+    ]
+
+
+class StatementPackTest(TestCase):
+    """اختبارات التطابق مع القوائم المستقلة وعدد الاستعلامات والكاش"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="pack_user", password="password123")
+
+        def account_type(code, category, nature):
+            return AccountType.objects.get_or_create(
+                code=code, defaults={"name": code, "category": category, "nature": nature}
+            )[0]
+
+        asset = account_type("PACK_AST", "asset", "debit")
+        equity = account_type("PACK_EQ", "equity", "credit")
+        revenue = account_type("PACK_REV", "revenue", "credit")
+        expense = account_type("PACK_EXP", "expense", "debit")
+
+        def make(code, acc_type):
+            return ChartOfAccounts.objects.create(
+                code=code, name=f"حساب {code}", account_type=acc_type, is_leaf=True
+            )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cash = make("11110", asset)
+            self.customers = make("11210", asset)
+            self.machines = make("12130", asset)
+            self.capital = make("31110", equity)
+            self.sales = make("41100", revenue)
+            self.depreciation = make("52800", expense)
+
+            self._post("PK-1", date(2026, 5, 1), [(self.cash, 500000, 0), (self.capital, 0, 500000)], "opening")
+            self._post("PK-2", date(2026, 5, 20), [(self.cash, 30000, 0), (self.sales, 0, 30000)])
+            self._post("PK-3", date(2026, 6, 5), [(self.cash, 100000, 0), (self.sales, 0, 100000)])
+            self._post("PK-4", date(2026, 6, 10), [(self.customers, 40000, 0), (self.sales, 0, 40000)])
+            self._post("PK-5", date(2026, 6, 20), [(self.depreciation, 10000, 0), (self.machines, 0, 10000)])
+            self._post("PK-6", date(2026, 6, 25), [(self.machines, 50000, 0), (self.cash, 0, 50000)])
+
+    def _post(self, number, day, lines, entry_type="manual"):
+        entry = JournalEntry.objects.create(
+            number=number, date=day, status="posted", entry_type=entry_type, created_by=self.user
+        )
+        for account, debit, credit in lines:
+            JournalEntryLine.objects.create(
+                journal_entry=entry, account=account, debit=Decimal(debit), credit=Decimal(credit)
+            )
+        return entry
+
+    def _pack(self):
+        return StatementPackService.build_pack(
+            date_from=date(2026, 6, 1), date_to=date(2026, 6, 30),
+            comp_date_from=date(2026, 5, 1), comp_date_to=date(2026, 5, 31),
+        )
+
+    def test_pack_matches_standalone_statements_with_one_ledger_pass(self):
+        with CaptureQueriesContext(connection) as ctx:
+            pack = self._pack()
+        self.assertEqual(len(_cube_queries(ctx.captured_queries)), 1)
+
+        trial_balance = TrialBalanceService.generate_trial_balance(
+            date_from=date(2026, 6, 1), date_to=date(2026, 6, 30)
+        )
+        income = IncomeStatementService.generate_income_statement(
+            date_from=date(2026, 6, 1), date_to=date(2026, 6, 30),
+            comp_date_from=date(2026, 5, 1), comp_date_to=date(2026, 5, 31),
+        )
+        balance_sheet = BalanceSheetService.generate_balance_sheet(
+            as_of_date=date(2026, 6, 30), comparison_date=date(2026, 5, 31)
+        )
+        cash_flow = CashFlowService.generate_cash_flow_statement(
+            date_from=date(2026, 6, 1), date_to=date(2026, 6, 30),
+            comp_date_from=date(2026, 5, 1), comp_date_to=date(2026, 5, 31),
+        )
+
+        self.assertEqual(pack["income_statement"]["net_income"], income["net_income"])
+        self.assertEqual(pack["income_statement"]["net_income"], Decimal("130000"))
+        for key in ("beginning_cash", "actual_ending_cash", "net_income", "net_operating_cash_flow"):
+            self.assertEqual(pack["cash_flow"][key], cash_flow[key])
+        self.assertEqual(pack["cash_flow"]["beginning_cash"], Decimal("530000"))
+        self.assertEqual(pack["cash_flow"]["working_capital"]["total"], Decimal("-40000"))
+        self.assertEqual(pack["cash_flow"]["investing_activities"]["cash_paid_for_capex"], Decimal("-50000"))
+
+        for key in ("total_assets", "comp_total_assets", "total_liabilities_equity", "is_balanced"):
+            self.assertEqual(pack["balance_sheet"][key], balance_sheet[key])
+        self.assertTrue(pack["balance_sheet"]["is_balanced"])
+        for key in ("total_opening_debit", "total_period_debit", "total_closing_debit", "total_closing_credit"):
+            self.assertEqual(pack["trial_balance"][key], trial_balance[key])
+        self.assertEqual(pack["trial_balance"]["total_opening_debit"], Decimal("530000"))
+
+    def test_statement_engine_reads_balances_from_one_cube(self):
+        with CaptureQueriesContext(connection) as ctx:
+            tb = FinancialStatementEngine.generate_trial_balance(as_of_date=date(2026, 6, 30))
+            bs = FinancialStatementEngine.generate_balance_sheet(as_of_date="2026-06-30")
+        self.assertEqual(len(_cube_queries(ctx.captured_queries)), 2)
+
+        self.assertTrue(tb["is_balanced"])
+        cash_line = next(line for line in tb["lines"] if line["account_code"] == "11110")
+        self.assertEqual(cash_line["net_balance"], Decimal("580000.00"))
+        self.assertEqual(bs["total_assets"], Decimal("660000.00"))
+        self.assertEqual(bs["net_income"], Decimal("160000.00"))
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_cube_rows_are_cached_until_the_ledger_changes(self):
+        cache.clear()
+        cutoffs = (date(2026, 6, 1), date(2026, 7, 1))
+        first = BalanceCube(cutoffs)
+        self.assertEqual(first.sum(start=date(2026, 6, 1), end=date(2026, 6, 30))["debit"], Decimal("200000"))
+
+        with CaptureQueriesContext(connection) as ctx:
+            rows = BalanceCube(cutoffs).rows
+        self.assertEqual(_cube_queries(ctx.captured_queries), [])
+        self.assertEqual(rows, first.rows)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._post("PK-7", date(2026, 6, 28), [(self.cash, 5000, 0), (self.sales, 0, 5000)])
+        refreshed = BalanceCube(cutoffs)
+        self.assertEqual(refreshed.sum(start=date(2026, 6, 1), end=date(2026, 6, 30))["debit"], Decimal("205000"))
@@ -941,102 +941,55 @@ def chart_tree_api(request):
     from django.http import JsonResponse
     from decimal import Decimal
 
+    from financial.services.account_tree import AccountTree
+
     try:
         account_id = request.GET.get("account_id")
         expand_all = request.GET.get("expand_all", "false").lower() == "true"
 
+        # شجرة الحسابات من الفهرس في الذاكرة، والأرصدة (مجمّعة للآباء) باستعلام تجميعي واحد
+        tree = AccountTree.current()
         if account_id:
-            # جلب حساب معين مع أطفاله
             account = get_object_or_404(ChartOfAccounts, id=account_id)
-            children = account.children.filter(is_active=True).order_by("code")
-
-            tree_data = []
-            for child in children:
-                balance = child.get_balance() or Decimal("0")
-                
-                tree_data.append(
-                    {
-                        "id": child.id,
-                        "code": child.code,
-                        "name": child.name,
-                        "account_type": child.account_type.name,
-                        "balance": float(balance),
-                        "balance_formatted": f"{balance:,.2f}",
-                        "is_leaf": child.is_leaf,
-                        "is_active": child.is_active,
-                        "is_cash": child.is_cash_account,
-                        "is_bank": child.is_bank_account,
-                        "has_children": child.children.filter(is_active=True).exists(),
-                        "url_detail": f"/financial/accounts/{child.id}/",
-                        "url_edit": f"/financial/accounts/{child.id}/edit/",
-                    }
-                )
+            root_ids = tree.children_ids(account.id, active_only=True)
+            scope = list(tree.descendant_ids(account.id, include_self=True))
         else:
-            # جلب الشجرة الكاملة أو الجذور فقط
-            if expand_all:
-                # بناء الشجرة الكاملة
-                def build_full_tree(account, level=0):
-                    balance = account.get_balance() or Decimal("0")
-                    children_data = []
-
-                    for child in account.children.filter(is_active=True).order_by(
-                        "code"
-                    ):
-                        children_data.append(build_full_tree(child, level + 1))
-
-                    return {
-                        "id": account.id,
-                        "code": account.code,
-                        "name": account.name,
-                        "account_type": account.account_type.name,
-                        "balance": float(balance),
-                        "balance_formatted": f"{balance:,.2f}",
-                        "is_leaf": account.is_leaf,
-                        "is_active": account.is_active,
-                        "is_cash": account.is_cash_account,
-                        "is_bank": account.is_bank_account,
-                        "level": level,
-                        "has_children": len(children_data) > 0,
-                        "children": children_data,
-                        "expanded": True,
-                        "url_detail": f"/financial/accounts/{account.id}/",
-                        "url_edit": f"/financial/accounts/{account.id}/edit/",
-                    }
-
-                root_accounts = ChartOfAccounts.objects.filter(
-                    parent=None, is_active=True
-                ).order_by("code")
-
-                tree_data = [build_full_tree(account) for account in root_accounts]
-            else:
-                # جلب الجذور فقط
-                root_accounts = ChartOfAccounts.objects.filter(
-                    parent=None, is_active=True
-                ).order_by("code")
-
-                tree_data = []
-                for account in root_accounts:
-                    balance = account.get_balance() or Decimal("0")
-                    tree_data.append(
-                        {
-                            "id": account.id,
-                            "code": account.code,
-                            "name": account.name,
-                            "account_type": account.account_type.name,
-                            "balance": float(balance),
-                            "balance_formatted": f"{balance:,.2f}",
-                            "is_leaf": account.is_leaf,
-                            "is_active": account.is_active,
-                            "is_cash": account.is_cash_account,
-                            "is_bank": account.is_bank_account,
-                            "has_children": account.children.filter(
-                                is_active=True
-                            ).exists(),
-                            "expanded": False,
-                            "url_detail": f"/financial/accounts/{account.id}/",
-                            "url_edit": f"/financial/accounts/{account.id}/edit/",
-                        }
-                    )
+            root_ids = tree.children_ids(None, active_only=True)
+            scope = None
+        balances = ChartOfAccounts.get_balances_bulk(account_ids=scope)
+
+        def build_node(node_id, level, expand):
+            acc = balances[node_id]["account"]
+            balance = balances[node_id]["balance"] or Decimal("0")
+            child_ids = tree.children_ids(node_id, active_only=True)
+            node = {
+                "id": acc.id,
+                "code": acc.code,
+                "name": acc.name,
+                "account_type": acc.account_type.name,
+                "balance": float(balance),
+                "balance_formatted": f"{balance:,.2f}",
+                "is_leaf": acc.is_leaf,
+                "is_active": acc.is_active,
+                "is_cash": acc.is_cash_account,
+                "is_bank": acc.is_bank_account,
+                "has_children": bool(child_ids),
+                "url_detail": f"/financial/accounts/{acc.id}/",
+                "url_edit": f"/financial/accounts/{acc.id}/edit/",
+            }
+            if expand:
+                node["level"] = level
+                node["children"] = [build_node(child_id, level + 1, True) for child_id in child_ids]
+                node["expanded"] = True
+            elif not account_id:
+                node["expanded"] = False
+            return node
+
+        tree_data = [
+            build_node(node_id, 0, expand_all and not account_id)
+            for node_id in sorted(root_ids, key=lambda node_id: balances[node_id]["account"].code)
+            if node_id in balances
+        ]
 
         return JsonResponse(
             {"success": True, "data": tree_data, "count": len(tree_data)}
@@ -1428,8 +1381,9 @@ def chart_of_accounts_detail(request, pk):
     parent_accounts = []
     if ChartOfAccounts:
         # الحصول على جميع أطفال الحساب الحالي لتجنبها
-        children_ids = [child.id for child in account.get_children_recursive()]
-        children_ids.append(account.id)  # تجنب الحساب نفسه
+        from financial.services.account_tree import AccountTree
+
+        children_ids = list(AccountTree.current().descendant_ids(account.id, include_self=True))
 
         parent_accounts = (
             ChartOfAccounts.objects.filter(is_active=True)
@@ -3273,31 +3227,39 @@ def get_account_hierarchy_optimized(root_account_id=None, max_depth=5):
         list: التسلسل الهرمي للحسابات
     """
     from django.core.cache import cache
-    
-    # إنشاء مفتاح التخزين المؤقت
-    cache_key = f"account_hierarchy_{root_account_id}_{max_depth}"
-    
+    from financial.services.account_tree import AccountTree
+    from financial.services.ledger_version import LedgerVersion
+
+    tree = AccountTree.current()
+
+    # إنشاء مفتاح التخزين المؤقت (يتغير مع أي تعديل في الشجرة أو القيود)
+    cache_key = (
+        f"account_hierarchy_{root_account_id}_{max_depth}_{tree.version}_{LedgerVersion.current()}"
+    )
+
     # محاولة الحصول على البيانات من التخزين المؤقت
     cached_result = cache.get(cache_key)
     if cached_result:
         return cached_result
-    
+
+    scope = list(tree.descendant_ids(root_account_id, include_self=True)) if root_account_id else None
+    balances = ChartOfAccounts.get_balances_bulk(account_ids=scope)
+
     def build_hierarchy(parent_id=None, current_depth=0):
-        """بناء التسلسل الهرمي بشكل تكراري"""
+        """بناء التسلسل الهرمي من فهرس الشجرة دون استعلام لكل مستوى"""
         if current_depth >= max_depth:
             return []
-        
-        # جلب الحسابات الفرعية
-        accounts = ChartOfAccounts.objects.filter(
-            parent_id=parent_id,
-            is_active=True
-        ).select_related('account_type').order_by('code')
-        
+
+        child_ids = [
+            child_id for child_id in tree.children_ids(parent_id, active_only=True)
+            if child_id in balances
+        ]
+        child_ids.sort(key=lambda child_id: balances[child_id]["account"].code)
+
         hierarchy = []
-        for account in accounts:
-            # حساب الرصيد
-            balance = account.get_balance() or Decimal('0')
-            
+        for child_id in child_ids:
+            account = balances[child_id]["account"]
+
             # بناء عقدة الحساب
             node = {
                 'id': account.id,
@@ -3305,23 +3267,23 @@ def get_account_hierarchy_optimized(root_account_id=None, max_depth=5):
                 'name': account.name,
                 'account_type': account.account_type.name,
                 'category': account.account_type.category,
-                'balance': balance,
+                'balance': balances[child_id]["balance"] or Decimal('0'),
                 'is_leaf': account.is_leaf,
                 'level': current_depth,
                 'children': []
             }
-            
+
             # إضافة الأطفال إذا لم يكن حساباً نهائياً
             if not account.is_leaf:
                 node['children'] = build_hierarchy(account.id, current_depth + 1)
-            
+
             hierarchy.append(node)
-        
+
         return hierarchy
-    
+
     # بناء التسلسل الهرمي
     hierarchy = build_hierarchy(root_account_id)
-    
+
     # حفظ في التخزين المؤقت لمدة 20 دقيقة
     cache.set(cache_key, hierarchy, 1200)
     
@@ -673,6 +673,7 @@ def ledger_report(request):
     from django.core.paginator import Paginator
     from django.template.loader import render_to_string
     from ..models import CostCenter
+    from ..services.report_cache import ReportCache
     
     # معالجة الفلاتر
     account_id = request.GET.get("account")
@@ -684,6 +685,7 @@ def ledger_report(request):
     export_format = request.GET.get("export")  # excel / pdf
     page_size = int(request.GET.get("page_size", "50"))
     progressive_load = request.GET.get("progressive", "0") == "1"
+    use_cache = request.GET.get("use_cache", "1") == "1"
     
     # تحويل التواريخ
     date_from = None
@@ -856,10 +858,23 @@ def ledger_report(request):
         try:
             account = get_object_or_404(ChartOfAccounts, id=account_id)
             
-            # جلب المعاملات والملخص مباشرة من محرك الحسابات المالي
-            transactions, summary = get_account_transactions_optimized(
-                account, date_from, date_to,
-                cost_center=selected_cost_center, currency=currency, include_unposted=include_unposted
+            # جلب المعاملات والملخص من محرك الحسابات المالي عبر كاش التقارير
+            (transactions, summary), is_cached = ReportCache.get_or_compute(
+                "ledger_account",
+                {
+                    "account": account.id,
+                    "date_from": date_from,
+                    "date_to": date_to,
+                    "cost_center": selected_cost_center.id if selected_cost_center else None,
+                    "currency": currency,
+                    "include_unposted": include_unposted,
+                },
+                lambda: get_account_transactions_optimized(
+                    account, date_from, date_to,
+                    cost_center=selected_cost_center, currency=currency, include_unposted=include_unposted
+                ),
+                as_of=date_to,
+                use_cache=use_cache,
             )
             
             # Pagination للمعاملات
@@ -920,6 +935,7 @@ def ledger_report(request):
                 "page_size": page_size,
                 "page_brought_forward": page_brought_forward,
                 "page_brought_forward_foreign": page_brought_forward_foreign,
+                "is_cached": is_cached,
             }
             
         except ChartOfAccounts.DoesNotExist:
@@ -933,7 +949,13 @@ def ledger_report(request):
     else:
         # عرض ملخص جميع الحسابات
         try:
-            account_summaries = get_all_accounts_summary_optimized(date_from, date_to)
+            account_summaries, is_cached = ReportCache.get_or_compute(
+                "ledger_summary",
+                {"date_from": date_from, "date_to": date_to},
+                lambda: get_all_accounts_summary_optimized(date_from, date_to),
+                as_of=date_to,
+                use_cache=use_cache,
+            )
             
             paginator = Paginator(account_summaries, page_size)
             page_number = request.GET.get('page', 1)
@@ -973,6 +995,7 @@ def ledger_report(request):
                 "date_from": date_from,
                 "date_to": date_to,
                 "page_size": page_size,
+                "is_cached": is_cached,
             }
             
         except Exception as e:
@@ -1010,9 +1033,8 @@ def balance_sheet(request):
     مرتبط بالكامل بـ BalanceSheetService المعياري مع دعم التخزين المؤقت، المقارنة الزمنية، وتصدير Excel الرسمي.
     """
     from django.http import HttpResponse
-    from django.core.cache import cache
-    import hashlib
     from financial.services.balance_sheet_service import BalanceSheetService
+    from financial.services.report_cache import ReportCache
 
     # 1. معالجة الفلاتر والمعايير
     date_str = request.GET.get("date") or request.GET.get("date_to") or request.GET.get("as_of_date")
@@ -1060,35 +1082,25 @@ def balance_sheet(request):
             logger.error(f"خطأ في تصدير Excel للميزانية: {e}", exc_info=True)
             messages.error(request, f"خطأ في تصدير ملف Excel: {e}")
 
-    # 3. إدارة التخزين المؤقت (Cache Key)
-    cache_key_data = f"bs_v2_{as_of_date}_{comparison_date}_{account_level}_{hide_zero_balances}"
-    cache_key = f"report_bs_{hashlib.md5(cache_key_data.encode()).hexdigest()}"
-
-    cached_data = None
-    if use_cache and not export_format:
-        cached_data = cache.get(cache_key)
-
-    if cached_data:
-        try:
-            balance_sheet_data = cached_data
-            financial_ratios = balance_sheet_data.get('financial_ratios', {})
-        except Exception:
-            cached_data = None
-
-    if not cached_data:
-        balance_sheet_data = BalanceSheetService.generate_balance_sheet(
+    # 3. النتيجة من كاش التقارير (مفتاحه يتضمن إصدار دفتر الأستاذ حتى تاريخ الميزانية)
+    balance_sheet_data, is_cached = ReportCache.get_or_compute(
+        "balance_sheet",
+        {
+            "as_of_date": as_of_date,
+            "comparison_date": comparison_date,
+            "account_level": account_level,
+            "hide_zero_balances": hide_zero_balances,
+        },
+        lambda: BalanceSheetService.generate_balance_sheet(
             as_of_date=as_of_date,
             comparison_date=comparison_date,
             account_level=account_level,
             hide_zero_balances=hide_zero_balances
-        )
-        financial_ratios = balance_sheet_data.get('financial_ratios', {})
-
-        if use_cache:
-            try:
-                cache.set(cache_key, balance_sheet_data, 300)  # 5 دقائق TTL
-            except Exception:
-                pass
+        ),
+        as_of=max(filter(None, (as_of_date, comparison_date))),
+        use_cache=use_cache,
+    )
+    financial_ratios = balance_sheet_data.get('financial_ratios', {})
 
     # 4. بناء أزرار الهيدر المركزي
     header_buttons = [
@@ -1154,7 +1166,7 @@ def balance_sheet(request):
         "comparison_date": comparison_date,
         "account_level": account_level or "all",
         "hide_zero_balances": hide_zero_balances,
-        "is_cached": cached_data is not None,
+        "is_cached": is_cached,
     }
 
     return render(request, "financial/reports/balance_sheet.html", context)
@@ -1167,9 +1179,8 @@ def income_statement(request):
     مرتبط بالكامل بـ IncomeStatementService المعياري مع دعم المقارنة الزمنية، مراكز التكلفة، وتصدير Excel الرسمي.
     """
     from django.http import HttpResponse
-    from django.core.cache import cache
-    import hashlib
     from financial.services.income_statement_service import IncomeStatementService
+    from financial.services.report_cache import ReportCache
     from financial.models.cost_center import CostCenter
 
     # 1. معالجة الفلاتر والمعايير
@@ -1286,22 +1297,20 @@ def income_statement(request):
             logger.error(f"خطأ في تصدير Excel لقائمة الدخل: {e}", exc_info=True)
             messages.error(request, f"خطأ في تصدير ملف Excel: {e}")
 
-    # 3. إدارة التخزين المؤقت
-    cache_key_data = f"inc_v2_{date_from}_{date_to}_{comp_date_from}_{comp_date_to}_{cost_center_id}_{account_level}_{hide_zero_balances}_{include_unposted}"
-    cache_key = f"report_inc_{hashlib.md5(cache_key_data.encode()).hexdigest()}"
-
-    cached_data = None
-    if use_cache and not export_format and not include_unposted:
-        cached_data = cache.get(cache_key)
-
-    if cached_data:
-        try:
-            income_statement_data = cached_data
-        except Exception:
-            cached_data = None
-
-    if not cached_data:
-        income_statement_data = IncomeStatementService.generate_income_statement(
+    # 3. النتيجة من كاش التقارير (مفتاحه يتضمن إصدار دفتر الأستاذ حتى نهاية الفترة)
+    income_statement_data, is_cached = ReportCache.get_or_compute(
+        "income_statement",
+        {
+            "date_from": date_from,
+            "date_to": date_to,
+            "comp_date_from": comp_date_from,
+            "comp_date_to": comp_date_to,
+            "cost_center_id": cost_center_id,
+            "account_level": account_level,
+            "hide_zero_balances": hide_zero_balances,
+            "include_unposted": include_unposted,
+        },
+        lambda: IncomeStatementService.generate_income_statement(
             date_from=date_from,
             date_to=date_to,
             comp_date_from=comp_date_from,
@@ -1310,12 +1319,10 @@ def income_statement(request):
             account_level=account_level,
             hide_zero_balances=hide_zero_balances,
             include_unposted=include_unposted
-        )
-        if use_cache and not include_unposted:
-            try:
-                cache.set(cache_key, income_statement_data, 300)
-            except Exception:
-                pass
+        ),
+        as_of=max(filter(None, (date_to, comp_date_to))),
+        use_cache=use_cache,
+    )
 
     # 4. بناء أزرار الهيدر المركزي
     header_buttons = [
@@ -1395,7 +1402,7 @@ def income_statement(request):
         "hide_zero_balances": hide_zero_balances,
         "include_unposted": include_unposted,
         "active_preset": active_preset,
-        "is_cached": cached_data is not None,
+        "is_cached": is_cached,
     }
 
     return render(request, "financial/reports/income_statement.html", context)
@@ -1409,9 +1416,8 @@ def cash_flow_statement(request):
     المقارنة الزمنية، مراكز التكلفة، وتصدير Excel الرسمي.
     """
     from django.http import HttpResponse
-    from django.core.cache import cache
-    import hashlib
     from financial.services.cash_flow_service import CashFlowService
+    from financial.services.report_cache import ReportCache
     from financial.models.cost_center import CostCenter
 
     # 1. معالجة الفلاتر والمعايير
@@ -1524,19 +1530,22 @@ def cash_flow_statement(request):
             logger.error(f"Error exporting Cash Flow to Excel: {e}", exc_info=True)
             messages.error(request, f"حدث خطأ أثناء تصدير ملف Excel: {e}")
 
-    # 3. جلب بيانات التدفقات النقدية مع التخزين المؤقت
-    cache_key = None
-    cached_data = None
-    if use_cache:
-        cache_key_raw = f"cf_stmt_{date_from}_{date_to}_{comp_date_from}_{comp_date_to}_{cost_center_id}_{account_level}_{hide_zero_balances}_{include_unposted}"
-        cache_key = f"cf_report_{hashlib.md5(cache_key_raw.encode()).hexdigest()}"
-        cached_data = cache.get(cache_key)
-
-    if cached_data:
-        cash_flow_data = cached_data
-    else:
-        try:
-            cash_flow_data = CashFlowService.generate_cash_flow_statement(
+    # 3. جلب بيانات التدفقات النقدية من كاش التقارير
+    is_cached = False
+    try:
+        cash_flow_data, is_cached = ReportCache.get_or_compute(
+            "cash_flow",
+            {
+                "date_from": date_from,
+                "date_to": date_to,
+                "comp_date_from": comp_date_from,
+                "comp_date_to": comp_date_to,
+                "cost_center_id": cost_center_id,
+                "account_level": account_level,
+                "hide_zero_balances": hide_zero_balances,
+                "include_unposted": include_unposted,
+            },
+            lambda: CashFlowService.generate_cash_flow_statement(
                 date_from=date_from,
                 date_to=date_to,
                 comp_date_from=comp_date_from,
@@ -1545,13 +1554,14 @@ def cash_flow_statement(request):
                 account_level=account_level,
                 hide_zero_balances=hide_zero_balances,
                 include_unposted=include_unposted,
-            )
-            if use_cache and cache_key:
-                cache.set(cache_key, cash_flow_data, 180)  # 3 minutes
-        except Exception as e:
-            logger.error(f"Error generating Cash Flow data: {e}", exc_info=True)
-            messages.error(request, f"حدث خطأ أثناء احتساب قائمة التدفقات النقدية: {e}")
-            cash_flow_data = {}
+            ),
+            as_of=max(filter(None, (date_to, comp_date_to))),
+            use_cache=use_cache,
+        )
+    except Exception as e:
+        logger.error(f"Error generating Cash Flow data: {e}", exc_info=True)
+        messages.error(request, f"حدث خطأ أثناء احتساب قائمة التدفقات النقدية: {e}")
+        cash_flow_data = {}
 
     # 4. أزرار الهيدر المعيارية
     header_buttons = [
@@ -1633,7 +1643,7 @@ def cash_flow_statement(request):
         "hide_zero_balances": hide_zero_balances,
         "include_unposted": include_unposted,
         "active_preset": active_preset,
-        "is_cached": cached_data is not None,
+        "is_cached": is_cached,
     }
 
     return render(request, "financial/reports/cash_flow_statement.html", context)
@@ -1748,9 +1758,7 @@ def financial_analytics(request):
     متكاملة مع المحاور الخمسة، مؤشر ألتمان للسلامة والتعثر، بطاقة الصحة المالية، المقارنة بالفترة السابقة، وتصدير Excel المعتمد.
     """
     import json
-    import hashlib
     from django.http import HttpResponse
-    from django.core.cache import cache
     from financial.services.financial_analytics_service import FinancialAnalyticsService
     from financial.models.cost_center import CostCenter
 
@@ -1863,32 +1871,21 @@ def financial_analytics(request):
             logger.error(f"Error exporting Financial Analytics to Excel: {e}", exc_info=True)
             messages.error(request, f"حدث خطأ أثناء تصدير ملف Excel: {e}")
 
-    # 3. جلب بيانات التحليلات مع الكاش
-    cache_key = None
-    cached_data = None
-    if use_cache:
-        cache_key_raw = f"fa_stmt_{date_from}_{date_to}_{comp_date_from}_{comp_date_to}_{cost_center_id}_{include_unposted}"
-        cache_key = f"fa_report_{hashlib.md5(cache_key_raw.encode()).hexdigest()}"
-        cached_data = cache.get(cache_key)
-
-    if cached_data:
-        analytics = cached_data
-    else:
-        try:
-            analytics = FinancialAnalyticsService.get_complete_analytics(
-                date_from=date_from,
-                date_to=date_to,
-                comp_date_from=comp_date_from,
-                comp_date_to=comp_date_to,
-                cost_center_id=cost_center_id,
-                include_unposted=include_unposted,
-            )
-            if use_cache and cache_key:
-                cache.set(cache_key, analytics, 180)  # 3 minutes
-        except Exception as e:
-            logger.error(f"Error generating Financial Analytics data: {e}", exc_info=True)
-            messages.error(request, f"حدث خطأ أثناء احتساب المؤشرات المالية: {e}")
-            analytics = {}
+    # 3. جلب بيانات التحليلات (الخدمة تتولى الكاش المرتبط بإصدار دفتر الأستاذ)
+    try:
+        analytics = FinancialAnalyticsService.get_complete_analytics(
+            date_from=date_from,
+            date_to=date_to,
+            comp_date_from=comp_date_from,
+            comp_date_to=comp_date_to,
+            cost_center_id=cost_center_id,
+            include_unposted=include_unposted,
+            use_cache=use_cache,
+        )
+    except Exception as e:
+        logger.error(f"Error generating Financial Analytics data: {e}", exc_info=True)
+        messages.error(request, f"حدث خطأ أثناء احتساب المؤشرات المالية: {e}")
+        analytics = {}
 
     monthly_trends_json = json.dumps(analytics.get("monthly_trends", {}))
     expense_distribution_json = json.dumps(analytics.get("expense_distribution", {}))
@@ -1976,7 +1973,7 @@ def financial_analytics(request):
         "cost_center_name": analytics.get("cost_center_name", ""),
         "include_unposted": include_unposted,
         "active_preset": active_preset,
-        "is_cached": cached_data is not None,
+        "is_cached": analytics.get("is_cached", False),
     }
     return render(request, "financial/reports/analytics.html", context)
 
@@ -2075,6 +2072,7 @@ def trial_balance_report(request):
     يدعم ميزان الـ 6 أعمدة والـ 2 عمود، التدرج الشجري، فلترة المستويات، وتصدير Excel الرسمي
     """
     from ..services.trial_balance_service import TrialBalanceService
+    from ..services.report_cache import ReportCache
     from django.http import HttpResponse
     from django.urls import reverse
 
@@ -2086,6 +2084,7 @@ def trial_balance_report(request):
     hide_zero = request.GET.get("hide_zero", "0") == "1"
     group_by_type = request.GET.get("group_by_type", "1") == "1"
     export_format = request.GET.get("export")
+    use_cache = request.GET.get("use_cache", "1") == "1"
 
     # تحويل التواريخ
     date_from = None
@@ -2127,13 +2126,28 @@ def trial_balance_report(request):
 
     # إنشاء ميزان المراجعة
     try:
-        trial_balance_data = TrialBalanceService.generate_trial_balance(
-            date_from=date_from,
-            date_to=date_to,
-            display_mode=display_mode,
-            account_level=account_level,
-            hide_zero_balances=hide_zero,
-            group_by_type=group_by_type
+        # بدون تاريخ نهاية يُحسب الميزان حتى اليوم، فيدخل تاريخ اليوم في مفتاح الكاش
+        report_date = date_to or timezone.now().date()
+        trial_balance_data, is_cached = ReportCache.get_or_compute(
+            "trial_balance",
+            {
+                "date_from": date_from,
+                "date_to": report_date,
+                "display_mode": display_mode,
+                "account_level": account_level,
+                "hide_zero_balances": hide_zero,
+                "group_by_type": group_by_type,
+            },
+            lambda: TrialBalanceService.generate_trial_balance(
+                date_from=date_from,
+                date_to=date_to,
+                display_mode=display_mode,
+                account_level=account_level,
+                hide_zero_balances=hide_zero,
+                group_by_type=group_by_type
+            ),
+            as_of=report_date,
+            use_cache=use_cache,
         )
 
         # بناء رابط التصدير للـ Excel مع الحفاظ على كافة الفلاتر
@@ -2185,6 +2199,7 @@ def trial_balance_report(request):
             "account_level": account_level or '',
             "hide_zero": hide_zero,
             "group_by_type": group_by_type,
+            "is_cached": is_cached,
         }
 
     except Exception as e:
@@ -2599,288 +2614,27 @@ def abc_analysis_report(request):
 @login_required
 def data_integrity_check(request):
     """
-    التحقق من سلامة البيانات - فحص شامل
+    التحقق من سلامة البيانات - يعرض آخر نتائج محفوظة ويطلب فحصاً في الخلفية
     """
-    from financial.models import JournalEntry, ChartOfAccounts
-    from purchase.models import Purchase
-    from product.models import Stock, StockMovement
-    from client.models import Customer
-    from supplier.models import Supplier
-    from django.db.models import Sum, Q, Count
-    from decimal import Decimal
-    
-    results = {
-        'checks': [],
-        'errors': [],
-        'warnings': [],
-        'summary': {
-            'total_checks': 0,
-            'passed': 0,
-            'failed': 0,
-            'warnings': 0
-        }
-    }
-    
+    from financial.services.integrity_check_service import IntegrityCheckService
+    from financial.tasks.integrity_tasks import run_integrity_check_task
+
     if request.method == "POST":
         try:
-            # ==================== 1. فحص القيود المحاسبية ====================
-            check_name = "توازن القيود المحاسبية"
-            results['summary']['total_checks'] += 1
-            
-            unbalanced_entries = []
-            for entry in JournalEntry.objects.all():
-                debits = entry.lines.aggregate(total=Sum('debit'))['total'] or Decimal('0')
-                credits = entry.lines.aggregate(total=Sum('credit'))['total'] or Decimal('0')
-                if debits != credits:
-                    unbalanced_entries.append({
-                        'entry': entry,
-                        'difference': abs(debits - credits)
-                    })
-            
-            if unbalanced_entries:
-                results['errors'].append({
-                    'check': check_name,
-                    'count': len(unbalanced_entries),
-                    'details': unbalanced_entries[:10],  # أول 10 فقط
-                    'severity': 'high'
-                })
-                results['summary']['failed'] += 1
-            else:
-                results['checks'].append({'name': check_name, 'status': 'passed'})
-                results['summary']['passed'] += 1
-            
-            # ==================== 2. فحص أرصدة العملاء ====================
-            check_name = "أرصدة العملاء"
-            results['summary']['total_checks'] += 1
-
-            customer_issues = []
-            try:
-                from sale.models import Sale
-
-                for customer in Customer.objects.all():
-                    if not customer.financial_account:
-                        continue
-
-                    total_sales = Sale.objects.filter(
-                        customer=customer, status='confirmed'
-                    ).aggregate(total=Sum('total'))['total'] or Decimal('0')
-
-                    total_paid = Sale.objects.filter(
-                        customer=customer, status='confirmed'
-                    ).aggregate(total=Sum('amount_paid'))['total'] or Decimal('0')
-
-                    calculated_balance = total_sales - total_paid
-                    account_balance = customer.financial_account.get_balance()
-
-                    if abs(calculated_balance - account_balance) > Decimal('0.01'):
-                        customer_issues.append({
-                            'customer': customer,
-                            'system_balance': account_balance,
-                            'calculated_balance': calculated_balance,
-                            'difference': abs(account_balance - calculated_balance),
-                        })
-            except Exception as e:
-                logger.error(f"خطأ في فحص أرصدة العملاء: {str(e)}")
-
-            if customer_issues:
-                results['warnings'].append({
-                    'check': check_name,
-                    'count': len(customer_issues),
-                    'details': customer_issues[:10],
-                    'severity': 'medium'
-                })
-                results['summary']['warnings'] += 1
-            else:
-                results['checks'].append({'name': check_name, 'status': 'passed'})
-                results['summary']['passed'] += 1
-            
-            # ==================== 3. فحص أرصدة الموردين ====================
-            check_name = "أرصدة الموردين"
-            results['summary']['total_checks'] += 1
-            
-            supplier_issues = []
-            try:
-                from purchase.models import PurchasePayment
-                
-                for supplier in Supplier.objects.all():
-                    calculated_balance = Decimal('0')
-                    
-                    # حساب من المشتريات
-                    purchases_total = Purchase.objects.filter(supplier=supplier).aggregate(
-                        total=Sum('total')
-                    )['total'] or Decimal('0')
-                    
-                    # حساب من الدفعات
-                    if PurchasePayment:
-                        payments_total = PurchasePayment.objects.filter(purchase__supplier=supplier).aggregate(
-                            total=Sum('amount')
-                        )['total'] or Decimal('0')
-                    else:
-                        payments_total = Decimal('0')
-                    
-                    calculated_balance = purchases_total - payments_total
-                    
-                    if abs(calculated_balance - supplier.balance) > Decimal('0.01'):
-                        supplier_issues.append({
-                            'supplier': supplier,
-                            'system_balance': supplier.balance,
-                            'calculated_balance': calculated_balance,
-                            'difference': abs(supplier.balance - calculated_balance)
-                        })
-            except Exception as e:
-                # تجاهل الخطأ إذا كان النموذج غير موجود
-                pass
-            
-            if supplier_issues:
-                results['warnings'].append({
-                    'check': check_name,
-                    'count': len(supplier_issues),
-                    'details': supplier_issues[:10],
-                    'severity': 'medium'
-                })
-                results['summary']['warnings'] += 1
-            else:
-                results['checks'].append({'name': check_name, 'status': 'passed'})
-                results['summary']['passed'] += 1
-            
-            # ==================== 4. فحص المخزون ====================
-            check_name = "أرصدة المخزون"
-            results['summary']['total_checks'] += 1
-            
-            stock_issues = []
-            for stock in Stock.objects.all():
-                # حساب من حركات المخزون
-                movements_in = StockMovement.objects.filter(
-                    product=stock.product,
-                    movement_type__in=['purchase', 'return_in', 'adjustment_in']
-                ).aggregate(total=Sum('quantity'))['total'] or 0
-                
-                movements_out = StockMovement.objects.filter(
-                    product=stock.product,
-                    movement_type__in=['sale', 'return_out', 'adjustment_out']
-                ).aggregate(total=Sum('quantity'))['total'] or 0
-                
-                calculated_quantity = movements_in - movements_out
-                
-                if abs(calculated_quantity - stock.quantity) > 0.01:
-                    stock_issues.append({
-                        'product': stock.product,
-                        'system_quantity': stock.quantity,
-                        'calculated_quantity': calculated_quantity,
-                        'difference': abs(stock.quantity - calculated_quantity)
-                    })
-            
-            if stock_issues:
-                results['errors'].append({
-                    'check': check_name,
-                    'count': len(stock_issues),
-                    'details': stock_issues[:10],
-                    'severity': 'high'
-                })
-                results['summary']['failed'] += 1
-            else:
-                results['checks'].append({'name': check_name, 'status': 'passed'})
-                results['summary']['passed'] += 1
-            
-            # ==================== 5. فحص القيود اليتيمة ====================
-            check_name = "القيود بدون مستند مرجعي"
-            results['summary']['total_checks'] += 1
-            
-            orphan_entries = JournalEntry.objects.filter(
-                Q(reference_type__isnull=True) | Q(reference_id__isnull=True)
-            ).exclude(entry_type='manual').count()
-            
-            if orphan_entries > 0:
-                results['warnings'].append({
-                    'check': check_name,
-                    'count': orphan_entries,
-                    'message': f"يوجد {orphan_entries} قيد بدون مستند مرجعي",
-                    'severity': 'low'
-                })
-                results['summary']['warnings'] += 1
-            else:
-                results['checks'].append({'name': check_name, 'status': 'passed'})
-                results['summary']['passed'] += 1
-            
-            # ==================== 6. فحص الحسابات المكررة ====================
-            check_name = "الحسابات المكررة"
-            results['summary']['total_checks'] += 1
-            
-            duplicate_accounts = ChartOfAccounts.objects.values('code').annotate(
-                count=Count('id')
-            ).filter(count__gt=1)
-            
-            if duplicate_accounts.exists():
-                results['errors'].append({
-                    'check': check_name,
-                    'count': duplicate_accounts.count(),
-                    'message': f"يوجد {duplicate_accounts.count()} رمز حساب مكرر",
-                    'severity': 'high'
-                })
-                results['summary']['failed'] += 1
-            else:
-                results['checks'].append({'name': check_name, 'status': 'passed'})
-                results['summary']['passed'] += 1
-            
-            # ==================== 7. فحص المخزون السالب ====================
-            check_name = "المخزون السالب"
-            results['summary']['total_checks'] += 1
-            
-            negative_stock = Stock.objects.filter(quantity__lt=0).count()
-            
-            if negative_stock > 0:
-                results['warnings'].append({
-                    'check': check_name,
-                    'count': negative_stock,
-                    'message': f"يوجد {negative_stock} منتج برصيد سالب",
-                    'severity': 'medium'
-                })
-                results['summary']['warnings'] += 1
-            else:
-                results['checks'].append({'name': check_name, 'status': 'passed'})
-                results['summary']['passed'] += 1
-            
-            # ==================== 8. فحص الفواتير المعلقة ====================
-            check_name = "الفواتير غير المكتملة"
-            results['summary']['total_checks'] += 1
-
-            try:
-                from sale.models import Sale
-                from django.utils import timezone
-                thirty_days_ago = timezone.now() - timedelta(days=30)
-
-                overdue_sales = Sale.objects.filter(
-                    status='pending',
-                    created_at__lt=thirty_days_ago
-                ).count()
-
-                if overdue_sales > 0:
-                    results['warnings'].append({
-                        'check': check_name,
-                        'count': overdue_sales,
-                        'message': f"يوجد {overdue_sales} فاتورة معلقة لأكثر من 30 يوم",
-                        'severity': 'medium'
-                    })
-                    results['summary']['warnings'] += 1
-                else:
-                    results['checks'].append({'name': check_name, 'status': 'passed'})
-                    results['summary']['passed'] += 1
-            except Exception as e:
-                logger.error(f"خطأ في فحص الفواتير: {str(e)}")
-                results['summary']['passed'] += 1
-            
-            # رسالة النجاح
-            if results['summary']['failed'] == 0 and results['summary']['warnings'] == 0:
-                messages.success(request, "✅ تم فحص سلامة البيانات بنجاح. جميع الفحوصات اجتازت بنجاح!")
-            elif results['summary']['failed'] > 0:
-                messages.error(request, f"⚠️ تم العثور على {results['summary']['failed']} مشكلة حرجة تحتاج إلى إصلاح فوري!")
-            else:
-                messages.warning(request, f"⚠️ تم العثور على {results['summary']['warnings']} تحذير يحتاج إلى مراجعة.")
-                
+            run_integrity_check_task.delay(
+                full=request.POST.get("full") == "1", user_id=request.user.id
+            )
+            messages.info(request, "تم بدء فحص سلامة البيانات في الخلفية، ستظهر النتائج هنا عند اكتماله.")
         except Exception as e:
-            messages.error(request, f"حدث خطأ أثناء فحص البيانات: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.error(f"خطأ في بدء فحص سلامة البيانات: {str(e)}")
+            messages.error(request, f"حدث خطأ أثناء بدء فحص البيانات: {str(e)}")
+        return redirect("financial:data_integrity_check")
+
+    results = IntegrityCheckService.latest_results()
+    if results["summary"]["failed"]:
+        messages.error(request, f"⚠️ تم العثور على {results['summary']['failed']} مشكلة حرجة تحتاج إلى إصلاح فوري!")
+    elif results["summary"]["warnings"]:
+        messages.warning(request, f"⚠️ تم العثور على {results['summary']['warnings']} تحذير يحتاج إلى مراجعة.")
 
     context = {
         "title": "التحقق من سلامة البيانات",
@@ -138,37 +138,37 @@ class Command(BaseCommand):
     
     def handle_enable_global(self, options):
         """Enable global signal processing"""
-        signal_router.enable_global_signals()
+        signal_router.enable_global_signals(persist=True)
         self.stdout.write(self.style.SUCCESS("Global signal processing enabled"))
     
     def handle_disable_global(self, options):
         """Disable global signal processing"""
         reason = options['reason']
-        signal_router.disable_global_signals(reason)
+        signal_router.disable_global_signals(reason, persist=True)
         self.stdout.write(self.style.WARNING(f"Global signal processing disabled: {reason}"))
     
     def handle_enable_signal(self, options):
         """Enable specific signal"""
         signal_name = options['signal_name']
-        signal_router.enable_signal(signal_name)
+        signal_router.enable_signal(signal_name, persist=True)
         self.stdout.write(self.style.SUCCESS(f"Signal '{signal_name}' enabled"))
     
     def handle_disable_signal(self, options):
         """Disable specific signal"""
         signal_name = options['signal_name']
         reason = options['reason']
-        signal_router.disable_signal(signal_name, reason)
+        signal_router.disable_signal(signal_name, reason, persist=True)
         self.stdout.write(self.style.WARNING(f"Signal '{signal_name}' disabled: {reason}"))
     
     def handle_enter_maintenance(self, options):
         """Enter maintenance mode"""
         reason = options['reason']
-        signal_router.enter_maintenance_mode(reason)
+        signal_router.enter_maintenance_mode(reason, persist=True)
         self.stdout.write(self.style.WARNING(f"Entered maintenance mode: {reason}"))
     
     def handle_exit_maintenance(self, options):
         """Exit maintenance mode"""
-        signal_router.exit_maintenance_mode()
+        signal_router.exit_maintenance_mode(persist=True)
         self.stdout.write(self.style.SUCCESS("Exited maintenance mode"))
     
     def handle_stats(self, options):
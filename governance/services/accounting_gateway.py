@@ -2484,6 +2484,8 @@ def create_tax_reversal_posting(command=None, user=None, reason="", **kwargs) ->
                 posted_at=timezone.now(),
                 posted_by=user
             )
+            from financial.services.ledger_version import LedgerVersion
+            LedgerVersion.mark_changed()
         from financial.services.ledger_core_service import LedgerCoreService
         return LedgerCoreService.reverse_entry(orig_entry.id, user=user, reversal_reason=reason)
     else:
@@ -34,7 +34,8 @@ from contextlib import contextmanager
 from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
-from django.core.cache import cache
+
+from core.services.feature_flag_store import feature_flag_store
 
 from ..models import GovernanceContext, AuditTrail
 from ..exceptions import GovernanceError, ValidationError, ConfigurationError
@@ -392,10 +393,12 @@ class GovernanceSwitchboard:
         
         Args:
             enable_audit: Whether to enable audit logging
-            cache_timeout: Cache timeout for flag values in seconds
+            cache_timeout: Kept for backward compatibility (flags are now persisted
+                in the feature flag store and refreshed by version)
         """
         self.enable_audit = enable_audit
         self.cache_timeout = cache_timeout
+        self._synced_generation = None
         
         # Thread-safe locks
         self._component_lock = threading.RLock()
@@ -403,7 +406,7 @@ class GovernanceSwitchboard:
         self._emergency_lock = threading.RLock()
         self._state_lock = threading.RLock()
         
-        # Flag state storage (in-memory with cache backing)
+        # Flag state storage (in-memory, synced from the feature flag store)
         self._component_flags: Dict[str, bool] = {}
         self._workflow_flags: Dict[str, bool] = {}
         self._emergency_flags: Dict[str, bool] = {}
@@ -419,8 +422,10 @@ class GovernanceSwitchboard:
         logger.info("GovernanceSwitchboard initialized")
     
     def _initialize_flags(self):
-        """Initialize all flags to their default values"""
+        """Initialize all flags from the feature flag store (or their default values)"""
         with self._state_lock:
+            self._synced_generation = feature_flag_store.version()
+            
             # Initialize component flags
             for flag_name, config in self.COMPONENT_FLAGS.items():
                 self._component_flags[flag_name] = self._get_cached_flag_value(
@@ -440,13 +445,21 @@ class GovernanceSwitchboard:
                 )
     
     def _get_cached_flag_value(self, cache_key: str, default_value: bool) -> bool:
-        """Get flag value from cache or return default"""
-        cached_value = cache.get(f"governance_flag_{cache_key}")
-        return cached_value if cached_value is not None else default_value
+        """Get flag value from the feature flag store or return default"""
+        return feature_flag_store.get(cache_key, default_value)
     
     def _set_cached_flag_value(self, cache_key: str, value: bool):
-        """Set flag value in cache"""
-        cache.set(f"governance_flag_{cache_key}", value, self.cache_timeout)
+        """Persist flag value and publish it to all worker processes"""
+        flag_type = cache_key.split('_', 1)[0]
+        feature_flag_store.set_flag(cache_key, value, flag_type)
+    
+    def _sync_flags(self):
+        """
+        Reload local flag dicts when the store version changed
+        (e.g. an emergency switch flipped in another worker)
+        """
+        if feature_flag_store.version() != self._synced_generation:
+            self._initialize_flags()
     
     # Component-level flag management
     
@@ -560,6 +573,8 @@ class GovernanceSwitchboard:
             logger.warning(f"Unknown component flag: {component_name}")
             return False
         
+        self._sync_flags()
+        
         # Check emergency overrides first
         if self._is_emergency_override_active():
             return False
@@ -684,6 +699,8 @@ class GovernanceSwitchboard:
             logger.warning(f"Unknown workflow flag: {workflow_name}")
             return False
         
+        self._sync_flags()
+        
         # Check emergency overrides first
         if self._is_emergency_override_active():
             return False
@@ -832,6 +849,8 @@ class GovernanceSwitchboard:
         if emergency_name not in self.EMERGENCY_FLAGS:
             return False
         
+        self._sync_flags()
+        
         with self._emergency_lock:
             return self._emergency_flags.get(emergency_name, False)
     
@@ -11,6 +11,8 @@ from django.db import transaction
 from django.utils import timezone
 from django.conf import settings
 
+from core.services.feature_flag_store import feature_flag_store
+
 from ..models import GovernanceContext, AuditTrail
 from ..exceptions import SignalError, ConfigurationError
 from ..thread_safety import monitor_operation, ThreadSafeCounter
@@ -36,16 +38,23 @@ class SignalRouter:
     DEFAULT_DEPTH_LIMIT = 5
     DEFAULT_TIMEOUT = 30  # seconds
     
-    def __init__(self, depth_limit: int = None, enable_audit: bool = True):
+    def __init__(self, depth_limit: int = None, enable_audit: bool = True, persist_flags: bool = False):
         """
         Initialize SignalRouter with governance controls.
         
         Args:
             depth_limit: Maximum signal chain depth (default: 5)
             enable_audit: Whether to enable audit logging (default: True)
+            persist_flags: Sync kill switches with the feature flag store so that
+                persisted changes reach every worker process (default: False)
         """
         self.depth_limit = depth_limit if depth_limit is not None else self.DEFAULT_DEPTH_LIMIT
         self.enable_audit = enable_audit
+        self.persist_flags = persist_flags
+        
+        # Last persisted switch values seen in the feature flag store
+        self._persisted_flags: Dict[str, bool] = {}
+        self._synced_generation = None
         
         # Global kill switch
         self._global_enabled = True
@@ -81,19 +90,69 @@ class SignalRouter:
     @property
     def global_enabled(self) -> bool:
         """Check if global kill switch is enabled"""
+        self._sync_flags()
         with self._global_lock:
             return self._global_enabled
     
     @property
     def maintenance_mode(self) -> bool:
         """Check if maintenance mode is active"""
+        self._sync_flags()
         with self._maintenance_lock:
             return self._maintenance_mode
     
-    def enable_global_signals(self) -> None:
-        """Enable global signal processing"""
+    def _sync_flags(self) -> None:
+        """
+        Apply switches persisted by other processes.
+        Only values that changed in the store since the last sync are applied,
+        so process-local (temporary) switches are not overwritten.
+        """
+        if not self.persist_flags:
+            return
+        
+        generation = feature_flag_store.version()
+        if generation == self._synced_generation:
+            return
+        self._synced_generation = generation
+        
+        persisted = feature_flag_store.get_prefixed('signal_')
+        changed = {
+            key: value for key, value in persisted.items()
+            if self._persisted_flags.get(key) != value
+        }
+        self._persisted_flags = persisted
+        
+        for key, value in changed.items():
+            if key == 'global':
+                with self._global_lock:
+                    self._global_enabled = value
+            elif key == 'maintenance':
+                with self._maintenance_lock:
+                    self._maintenance_mode = value
+            elif key.startswith('switch_'):
+                with self._switches_lock:
+                    self._signal_switches[key[len('switch_'):]] = value
+    
+    def _persist_flag(self, key: str, value: bool, reason: str, persist: bool) -> None:
+        """Persist a switch so it propagates to all worker processes"""
+        if not (persist and self.persist_flags):
+            return
+        self._persisted_flags[key] = value
+        feature_flag_store.set_flag(
+            f'signal_{key}', value, 'signal', reason,
+            user=GovernanceContext.get_current_user()
+        )
+    
+    def enable_global_signals(self, persist: bool = False) -> None:
+        """
+        Enable global signal processing.
+        
+        Args:
+            persist: Propagate the change to all worker processes
+        """
         with self._global_lock:
             self._global_enabled = True
+            self._persist_flag('global', True, "Manual enable", persist)
             logger.info("Global signal processing enabled")
             
             if self.enable_audit:
@@ -105,13 +164,15 @@ class SignalRouter:
                     user=GovernanceContext.get_current_user()
                 )
     
-    def disable_global_signals(self, reason: str = "Manual disable") -> None:
+    def disable_global_signals(self, reason: str = "Manual disable", persist: bool = False) -> None:
         """
         Disable all signal processing globally.
         This is a kill switch that prevents all signals from executing.
+        Pass persist=True to propagate it to all worker processes.
         """
         with self._global_lock:
             self._global_enabled = False
+            self._persist_flag('global', False, reason, persist)
             logger.warning(f"Global signal processing disabled: {reason}")
             
             if self.enable_audit:
@@ -124,10 +185,11 @@ class SignalRouter:
                     disable_reason=reason
                 )
     
-    def enable_signal(self, signal_name: str) -> None:
+    def enable_signal(self, signal_name: str, persist: bool = False) -> None:
         """Enable specific signal"""
         with self._switches_lock:
             self._signal_switches[signal_name] = True
+            self._persist_flag(f'switch_{signal_name}', True, "Manual enable", persist)
             logger.info(f"Signal '{signal_name}' enabled")
             
             if self.enable_audit:
@@ -140,10 +202,11 @@ class SignalRouter:
                     signal_name=signal_name
                 )
     
-    def disable_signal(self, signal_name: str, reason: str = "Manual disable") -> None:
+    def disable_signal(self, signal_name: str, reason: str = "Manual disable", persist: bool = False) -> None:
         """Disable specific signal"""
         with self._switches_lock:
             self._signal_switches[signal_name] = False
+            self._persist_flag(f'switch_{signal_name}', False, reason, persist)
             logger.warning(f"Signal '{signal_name}' disabled: {reason}")
             
             if self.enable_audit:
@@ -159,16 +222,18 @@ class SignalRouter:
     
     def is_signal_enabled(self, signal_name: str) -> bool:
         """Check if specific signal is enabled"""
+        self._sync_flags()
         with self._switches_lock:
             return self._signal_switches.get(signal_name, True)
     
-    def enter_maintenance_mode(self, reason: str = "Maintenance") -> None:
+    def enter_maintenance_mode(self, reason: str = "Maintenance", persist: bool = False) -> None:
         """
         Enter maintenance mode - disables all non-critical signals.
         Critical signals (those marked as required) may still execute.
         """
         with self._maintenance_lock:
             self._maintenance_mode = True
+            self._persist_flag('maintenance', True, reason, persist)
             logger.warning(f"Entered maintenance mode: {reason}")
             
             if self.enable_audit:
@@ -181,10 +246,11 @@ class SignalRouter:
                     maintenance_reason=reason
                 )
     
-    def exit_maintenance_mode(self) -> None:
+    def exit_maintenance_mode(self, persist: bool = False) -> None:
         """Exit maintenance mode"""
         with self._maintenance_lock:
             self._maintenance_mode = False
+            self._persist_flag('maintenance', False, "Manual exit", persist)
             logger.info("Exited maintenance mode")
             
             if self.enable_audit:
@@ -526,8 +592,8 @@ class SignalRouter:
         return errors
 
 
-# Global signal router instance
-signal_router = SignalRouter()
+# Global signal router instance (kill switches persisted across worker processes)
+signal_router = SignalRouter(persist_flags=True)
 
 
 # Convenience functions for common operations
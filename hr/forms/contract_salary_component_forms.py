@@ -144,6 +144,12 @@ class ContractSalaryComponentForm(forms.ModelForm):
                 raise ValidationError({
                     'formula': 'الصيغة الحسابية مطلوبة عند اختيار طريقة الحساب "صيغة"'
                 })
+            
+            from hr.services.salary_formula_engine import FormulaError, compile_formula
+            try:
+                compile_formula(formula)
+            except FormulaError as e:
+                raise ValidationError({'formula': str(e)})
         
         return cleaned_data
 
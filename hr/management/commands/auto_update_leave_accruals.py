@@ -3,9 +3,8 @@
 يُشغل يومياً عبر Cron Job أو Task Scheduler
 """
 from django.core.management.base import BaseCommand
-from django.db import transaction
 from datetime import date
-from hr.models import Employee, LeaveBalance
+from hr.models import Employee
 from hr.services.leave_accrual_service import LeaveAccrualService
 import logging
 
@@ -101,45 +100,39 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(f'{"="*60}\n'))
     
     def _update_all_accruals(self, year, force):
-        """تحديث جميع الأرصدة"""
-        employees = Employee.objects.filter(status='active')
-        total_employees = employees.count()
+        """تحديث جميع الأرصدة (مسار جماعي بعدد ثابت من الاستعلامات)"""
+        result = LeaveAccrualService.bulk_update_accruals(year)
+        total_employees = result['total_employees']
         
         self.stdout.write(f'عدد الموظفين النشطين: {total_employees}\n')
         
-        updated_count = 0
-        employees_with_changes = []
+        details = result['details']
+        if force:
+            # عرض كل الموظفين حتى من لم يتغير رصيده
+            changed_ids = {d['employee_id'] for d in details}
+            details = details + [
+                {
+                    'employee': employee.get_full_name_ar(),
+                    'months_worked': LeaveAccrualService.calculate_months_worked(employee.hire_date),
+                    'updated_count': 0,
+                }
+                for employee in Employee.objects.filter(status='active').exclude(pk__in=changed_ids)
+            ]
         
-        with transaction.atomic():
-            for employee in employees:
-                months_worked = LeaveAccrualService.calculate_months_worked(employee.hire_date)
-                old_percentage = LeaveAccrualService.get_accrual_percentage(months_worked)
-                
-                # تحديث الأرصدة
-                result = LeaveAccrualService.update_employee_accrual(employee, year)
-                
-                if result['updated_count'] > 0 or force:
-                    updated_count += 1
-                    employees_with_changes.append({
-                        'name': result['employee'],
-                        'months_worked': months_worked,
-                        'percentage': f"{int(old_percentage * 100)}%",
-                        'updates': result['updated_count']
-                    })
-                    
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f'✓ {result["employee"]} - '
-                            f'{months_worked} شهر - '
-                            f'{int(old_percentage * 100)}% - '
-                            f'{result["updated_count"]} رصيد محدث'
-                        )
-                    )
+        for detail in details:
+            percentage = int(LeaveAccrualService.get_accrual_percentage(detail['months_worked']) * 100)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'✓ {detail["employee"]} - '
+                    f'{detail["months_worked"]} شهر - '
+                    f'{percentage}% - '
+                    f'{detail["updated_count"]} رصيد محدث'
+                )
+            )
         
         # الملخص النهائي
         self.stdout.write(self.style.SUCCESS(f'\n{"="*60}'))
         self.stdout.write(self.style.SUCCESS(f'الملخص النهائي:'))
         self.stdout.write(self.style.SUCCESS(f'  - إجمالي الموظفين: {total_employees}'))
-        self.stdout.write(self.style.SUCCESS(f'  - الموظفين المحدثين: {updated_count}'))
+        self.stdout.write(self.style.SUCCESS(f'  - الموظفين المحدثين: {len(details)}'))
         self.stdout.write(self.style.SUCCESS(f'{"="*60}\n'))
-        
@@ -21,14 +21,24 @@ class Command(BaseCommand):
             type=int,
             help='معرف موظف محدد (اختياري - لتحديث موظف واحد فقط)',
         )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='عرض تقرير الفروقات فقط بدون حفظ أي تعديل',
+        )
 
     def handle(self, *args, **options):
         year = options.get('year')
         employee_id = options.get('employee_id')
+        dry_run = options.get('dry_run')
         
         self.stdout.write(self.style.SUCCESS('🔄 بدء تحديث أرصدة الإجازات...'))
         self.stdout.write(f'⏰ الوقت: {timezone.now().strftime("%Y-%m-%d %H:%M:%S")}')
         
+        if employee_id and dry_run:
+            self.stdout.write(self.style.ERROR('❌ --dry-run متاح فقط لتحديث جميع الموظفين'))
+            return
+
         if employee_id:
             # تحديث موظف محدد
             from hr.models import Employee
@@ -54,16 +64,20 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR(f'❌ الموظف #{employee_id} غير موجود'))
                 return
         else:
-            # تحديث جميع الموظفين
-            result = LeaveAccrualService.update_all_accruals(year)
+            # تحديث جميع الموظفين (مسار جماعي)
+            result = LeaveAccrualService.update_all_accruals(year, dry_run=dry_run)
             
-            self.stdout.write(self.style.SUCCESS(f'\n✅ اكتمل التحديث بنجاح!'))
+            if dry_run:
+                self.stdout.write(self.style.WARNING('\n🔍 تشغيل تجريبي — لم يتم حفظ أي تعديل'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'\n✅ اكتمل التحديث بنجاح!'))
             self.stdout.write(f'   السنة: {result["year"]}')
             self.stdout.write(f'   إجمالي الموظفين: {result["total_employees"]}')
             self.stdout.write(f'   الموظفين المحدثين: {result["employees_with_updates"]}')
             self.stdout.write(f'   إجمالي الأرصدة المحدثة: {result["total_balances_updated"]}')
+            self.stdout.write(f'   الأرصدة الجديدة: {result["total_balances_created"]}')
             
-            if result['details'] and options.get('verbosity', 1) >= 2:
+            if result['details'] and (dry_run or options.get('verbosity', 1) >= 2):
                 self.stdout.write('\n📋 التفاصيل:')
                 for emp_result in result['details']:
                     self.stdout.write(f'\n   {emp_result["employee"]}:')
@@ -250,16 +250,8 @@ class SalaryComponent(models.Model):
         if not self.formula:
             return ''
         
-        # استبدال المتغيرات الإنجليزية بالعربية
-        formula_ar = self.formula
-        formula_ar = formula_ar.replace('basic', 'الأساسي')
-        formula_ar = formula_ar.replace('BASIC', 'الأساسي')
-        formula_ar = formula_ar.replace('gross', 'الإجمالي')
-        formula_ar = formula_ar.replace('GROSS', 'الإجمالي')
-        formula_ar = formula_ar.replace('days', 'الأيام')
-        formula_ar = formula_ar.replace('DAYS', 'الأيام')
-        
-        return formula_ar
+        from hr.services.salary_formula_engine import formula_display
+        return formula_display(self.formula)
     
     def calculate_amount(self, context):
         """
@@ -294,56 +286,11 @@ class SalaryComponent(models.Model):
         if not self.formula:
             return self.amount
         
+        # الصيغة تُحلل مرة واحدة وتُخزن مترجمة؛ هنا تقييم فقط
+        from hr.services.salary_formula_engine import FormulaError, compile_formula
         try:
-            formula = self.formula.upper()
-            
-            # استبدال المتغيرات مع التحقق من صحتها
-            replacements = {
-                'BASIC': str(context.get('basic_salary', 0)),
-                'GROSS': str(context.get('gross_salary', 0)),
-                'DAYS': str(context.get('worked_days', 30)),
-            }
-            
-            # التحقق من صحة القيم
-            for var, value in replacements.items():
-                if not value.replace('.', '').replace('-', '').isdigit():
-                    return self.amount
-                formula = formula.replace(var, value)
-            
-            # التحقق الصارم من الأحرف المسموحة فقط
-            allowed_chars = set('0123456789.+-*/() ')
-            if not all(c in allowed_chars for c in formula):
-                return self.amount
-            
-            # استخدام AST للتقييم الآمن
-            import ast
-            import operator
-            
-            operators = {
-                ast.Add: operator.add,
-                ast.Sub: operator.sub,
-                ast.Mult: operator.mul,
-                ast.Div: operator.truediv,
-                ast.USub: operator.neg,
-            }
-            
-            def safe_eval(node):
-                if isinstance(node, ast.Num):
-                    return node.n
-                elif isinstance(node, ast.BinOp):
-                    left = safe_eval(node.left)
-                    right = safe_eval(node.right)
-                    return operators[type(node.op)](left, right)
-                elif isinstance(node, ast.UnaryOp):
-                    operand = safe_eval(node.operand)
-                    return operators[type(node.op)](operand)
-                else:
-                    raise ValueError(f"Unsupported operation")
-            
-            tree = ast.parse(formula, mode='eval')
-            result = safe_eval(tree.body)
-            return Decimal(str(result))
-        except:
+            return compile_formula(self.formula).evaluate(context)
+        except FormulaError:
             return self.amount
     
     def is_temporary(self):
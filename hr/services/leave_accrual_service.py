@@ -1,11 +1,21 @@
 """
 خدمة الاستحقاق التدريجي للإجازات
 """
+from collections import defaultdict
 from django.db import transaction
 from datetime import date
 from dateutil.relativedelta import relativedelta
 from ..models import Employee, LeaveBalance, LeaveType
 
+# أنواع الإجازات التي لها استحقاق تدريجي
+ACCRUAL_CATEGORIES = ['annual', 'emergency']
+
+# الحقول التي يكتبها تحديث الاستحقاق الجماعي
+ACCRUAL_UPDATE_FIELDS = [
+    'total_days', 'accrued_days', 'remaining_days', 'accrual_phase',
+    'last_accrual_date', 'is_manually_adjusted', 'adjustment_reason',
+]
+
 
 class LeaveAccrualService:
     """خدمة حساب وتحديث الاستحقاق التدريجي للإجازات"""
@@ -34,38 +44,58 @@ class LeaveAccrualService:
         Returns:
             int: عدد الأيام المستحقة
         """
-        from core.models import SystemSetting
+        rules = LeaveAccrualService.load_accrual_rules()
+        phase = LeaveAccrualService._resolve_phase(employee, leave_type, rules)
+        return rules['days'].get((phase, leave_type.category), 0)
 
-        # الإجازات الاستثنائية والمرضية والغير مدفوعة: لا رصيد لها — تُمنح بدون حد مسبق
-        if not leave_type.requires_balance:
-            return 0
+    @staticmethod
+    def load_accrual_rules():
+        """
+        قواعد الاستحقاق من الإعدادات — تُقرأ مرة واحدة وتُمرر لكل الموظفين في التحديث الجماعي.
 
-        months_worked = LeaveAccrualService.calculate_months_worked(employee.hire_date)
-        partial_after = int(SystemSetting.get_setting('leave_partial_after_months', 6))
+        Returns:
+            dict: partial_after_months, senior_age, senior_service_years, auto_create_balances
+                  و days: {(المرحلة، فئة الإجازة): عدد الأيام}
+        """
+        from core.models import SystemSetting
 
-        # كبار الموظفين — الأولوية الأعلى بعد الاستثنائية
-        if LeaveAccrualService.is_senior_employee(employee):
-            if leave_type.category == 'annual':
-                return int(SystemSetting.get_setting('leave_senior_annual_days', 30))
-            if leave_type.category == 'emergency':
-                return int(SystemSetting.get_setting('leave_senior_emergency_days', 10))
+        get = SystemSetting.get_setting
+        return {
+            'partial_after_months': int(get('leave_partial_after_months', 6)),
+            'senior_age':           int(get('leave_senior_age_threshold', 50)),
+            'senior_service_years': int(get('leave_senior_service_years', 10)),
+            'auto_create_balances': get('leave_auto_create_balances', True),
+            'days': {
+                ('senior', 'annual'):     int(get('leave_senior_annual_days', 30)),
+                ('senior', 'emergency'):  int(get('leave_senior_emergency_days', 10)),
+                ('full', 'annual'):       int(get('leave_annual_full_days', 21)),
+                ('full', 'emergency'):    int(get('leave_emergency_full_days', 7)),
+                ('partial', 'annual'):    int(get('leave_annual_partial_days', 7)),
+                ('partial', 'emergency'): int(get('leave_emergency_partial_days', 3)),
+            },
+        }
 
-        # إتمام السنة الكاملة (12 شهر)
-        if months_worked >= 12:
-            if leave_type.category == 'annual':
-                return int(SystemSetting.get_setting('leave_annual_full_days', 21))
-            if leave_type.category == 'emergency':
-                return int(SystemSetting.get_setting('leave_emergency_full_days', 7))
+    @staticmethod
+    def _resolve_phase(employee, leave_type, rules, reference_date=None):
+        """
+        مرحلة الاستحقاق من القواعد المحملة (بدون أي استعلام).
 
-        # المرحلة الجزئية
-        if months_worked >= partial_after:
-            if leave_type.category == 'annual':
-                return int(SystemSetting.get_setting('leave_annual_partial_days', 7))
-            if leave_type.category == 'emergency':
-                return int(SystemSetting.get_setting('leave_emergency_partial_days', 3))
+        الأولوية: بدون رصيد → none، كبار الموظفين → senior، 12 شهر → full،
+        partial_after_months → partial، وإلا none.
+        """
+        if not leave_type.requires_balance:
+            return 'none'
 
-        # لم يستحق بعد
-        return 0
+        if (employee.age >= rules['senior_age']
+                or employee.years_of_service >= rules['senior_service_years']):
+            return 'senior'
+
+        months_worked = LeaveAccrualService.calculate_months_worked(employee.hire_date, reference_date)
+        if months_worked >= 12:
+            return 'full'
+        if months_worked >= rules['partial_after_months']:
+            return 'partial'
+        return 'none'
 
     @staticmethod
     def is_senior_employee(employee):
@@ -82,12 +112,9 @@ class LeaveAccrualService:
         Returns:
             bool
         """
-        from core.models import SystemSetting
-
-        age_threshold     = int(SystemSetting.get_setting('leave_senior_age_threshold', 50))
-        service_threshold = int(SystemSetting.get_setting('leave_senior_service_years', 10))
-
-        return employee.age >= age_threshold or employee.years_of_service >= service_threshold
+        rules = LeaveAccrualService.load_accrual_rules()
+        return (employee.age >= rules['senior_age']
+                or employee.years_of_service >= rules['senior_service_years'])
 
     # =========================================================
     # دورة الإجازات — ربط بالسنة المالية
@@ -212,22 +239,9 @@ class LeaveAccrualService:
         Returns:
             str: 'none' | 'partial' | 'full' | 'senior'
         """
-        from core.models import SystemSetting
-
-        if not leave_type.requires_balance:
-            return 'none'
-
-        if LeaveAccrualService.is_senior_employee(employee):
-            return 'senior'
-
-        months_worked = LeaveAccrualService.calculate_months_worked(employee.hire_date)
-        partial_after = int(SystemSetting.get_setting('leave_partial_after_months', 6))
-
-        if months_worked >= 12:
-            return 'full'
-        if months_worked >= partial_after:
-            return 'partial'
-        return 'none'
+        return LeaveAccrualService._resolve_phase(
+            employee, leave_type, LeaveAccrualService.load_accrual_rules()
+        )
 
     @staticmethod
     @transaction.atomic
@@ -250,7 +264,7 @@ class LeaveAccrualService:
         balances = LeaveBalance.objects.filter(
             employee=employee,
             year=year,
-            leave_type__category__in=['annual', 'emergency']
+            leave_type__category__in=ACCRUAL_CATEGORIES
         ).select_related('leave_type')
 
         updated_count = 0
@@ -309,36 +323,172 @@ class LeaveAccrualService:
         }
 
     @staticmethod
-    @transaction.atomic
-    def update_all_accruals(year=None):
+    def update_all_accruals(year=None, dry_run=False):
         """
-        تحديث استحقاق جميع الموظفين النشطين.
+        تحديث استحقاق جميع الموظفين النشطين (عبر المسار الجماعي).
 
         Args:
             year: السنة (افتراضي: السنة الحالية)
+            dry_run: حساب تقرير الفروقات فقط بدون كتابة
 
         Returns:
             dict: ملخص شامل للتحديثات
         """
-        if year is None:
-            year = date.today().year
+        return LeaveAccrualService.bulk_update_accruals(year, dry_run=dry_run)
 
-        employees = Employee.objects.filter(status='active')
-        total_updated    = 0
-        employees_updated = []
+    @staticmethod
+    def bulk_update_accruals(year=None, dry_run=False, batch_size=500):
+        """
+        تحديث استحقاق كل الموظفين النشطين بعدد ثابت من الاستعلامات مهما كان عدد الموظفين.
+
+        نفس قواعد update_employee_accrual تماماً، لكن:
+        - الموظفون والأرصدة (مع أنواع الإجازات) والإعدادات تُحمّل مرة واحدة
+        - الحساب في الذاكرة، والكتابة bulk_update / bulk_create على دفعات
+        - الأرصدة التي لم يتغير فيها شيء لا تُكتب (لا أقفال بلا داعٍ)
+        - الموظف النشط الذي ليس له أي رصيد في السنة تُنشأ أرصدته
+          (نفس سلوك إشارة الموظف، حسب إعداد leave_auto_create_balances)
+
+        Args:
+            year: السنة (افتراضي: السنة الحالية)
+            dry_run: إرجاع تقرير الفروقات فقط بدون أي كتابة
+            batch_size: حجم دفعة الكتابة
+
+        Returns:
+            dict: year, dry_run, total_employees, employees_with_updates,
+                  total_balances_updated, total_balances_created
+                  و details: تقرير الفروقات لكل موظف (بنفس شكل update_employee_accrual)
+        """
+        today = date.today()
+        if year is None:
+            year = today.year
+
+        rules     = LeaveAccrualService.load_accrual_rules()
+        employees = list(Employee.objects.filter(status='active').order_by('pk'))
+
+        # كل أرصدة السنة في استعلام واحد: أرصدة الاستحقاق للتحديث، والباقي لمعرفة من له رصيد
+        balances_by_employee = defaultdict(list)
+        with_balances = set()
+        for balance in LeaveBalance.objects.filter(
+            employee__status='active',
+            year=year
+        ).select_related('leave_type').order_by('pk'):
+            with_balances.add(balance.employee_id)
+            if balance.leave_type.category in ACCRUAL_CATEGORIES:
+                balances_by_employee[balance.employee_id].append(balance)
+
+        # أنواع الإجازات لإنشاء أرصدة الموظفين الذين ليس لهم أي رصيد (من أي نوع) في السنة
+        missing = [e for e in employees if e.pk not in with_balances]
+        leave_types = []
+        if missing and rules['auto_create_balances']:
+            leave_types = list(LeaveType.objects.filter(is_active=True, category__in=ACCRUAL_CATEGORIES))
+
+        to_update = []
+        to_create = []
+        details   = []
 
         for employee in employees:
-            result = LeaveAccrualService.update_employee_accrual(employee, year)
-            if result['updated_count'] > 0:
-                total_updated += result['updated_count']
-                employees_updated.append(result)
+            summary = []
+
+            for balance in balances_by_employee.get(employee.pk, ()):
+                new_phase     = LeaveAccrualService._resolve_phase(employee, balance.leave_type, rules)
+                phase_changed = new_phase != balance.accrual_phase
+
+                # لو الرصيد معدل يدوياً ولم تتغير المرحلة — لا تلمسه
+                if balance.is_manually_adjusted and not phase_changed:
+                    continue
+
+                old_total   = balance.total_days
+                old_accrued = balance.accrued_days
+                old_phase   = balance.accrual_phase
+                new_total   = rules['days'].get((new_phase, balance.leave_type.category), 0)
+                # المتبقي كما تحفظه إشارة auto_update_remaining_days بعد الحفظ
+                new_remaining = new_total - balance.used_days
+
+                if (new_total == old_total and new_total == old_accrued
+                        and new_remaining == balance.remaining_days and not phase_changed):
+                    continue
+
+                balance.total_days     = new_total
+                balance.accrued_days   = new_total
+                balance.remaining_days = new_remaining
+                balance.accrual_phase  = new_phase
+                balance.last_accrual_date = today
+
+                if balance.is_manually_adjusted and phase_changed:
+                    balance.adjustment_reason = (
+                        f'[تحديث تلقائي] ترقي من مرحلة "{old_phase}" إلى "{new_phase}" — '
+                        f'تم رفع الرصيد من {old_total} إلى {new_total} يوم'
+                    )
+                    balance.is_manually_adjusted = False
+
+                to_update.append(balance)
+                if new_total != old_total or new_total != old_accrued or phase_changed:
+                    summary.append({
+                        'leave_type':  balance.leave_type.name_ar,
+                        'old_total':   old_total,
+                        'new_total':   new_total,
+                        'old_accrued': old_accrued,
+                        'new_accrued': new_total,
+                        'remaining':   max(0, new_remaining),
+                        'old_phase':   old_phase,
+                        'new_phase':   new_phase,
+                        'phase_changed': phase_changed,
+                        'created':     False,
+                    })
+
+            if employee.pk not in with_balances:
+                for leave_type in leave_types:
+                    phase = LeaveAccrualService._resolve_phase(employee, leave_type, rules)
+                    total = rules['days'].get((phase, leave_type.category), 0)
+                    to_create.append(LeaveBalance(
+                        employee=employee,
+                        leave_type=leave_type,
+                        year=year,
+                        total_days=total,
+                        accrued_days=total,
+                        used_days=0,
+                        remaining_days=total,
+                        accrual_phase=phase,
+                        accrual_start_date=employee.hire_date,
+                        last_accrual_date=today,
+                    ))
+                    summary.append({
+                        'leave_type':  leave_type.name_ar,
+                        'old_total':   0,
+                        'new_total':   total,
+                        'old_accrued': 0,
+                        'new_accrued': total,
+                        'remaining':   total,
+                        'old_phase':   None,
+                        'new_phase':   phase,
+                        'phase_changed': False,
+                        'created':     True,
+                    })
+
+            if summary:
+                details.append({
+                    'employee':      employee.get_full_name_ar(),
+                    'employee_id':   employee.pk,
+                    'months_worked': LeaveAccrualService.calculate_months_worked(employee.hire_date, today),
+                    'updated_count': len(summary),
+                    'summary':       summary,
+                })
+
+        if not dry_run:
+            with transaction.atomic():
+                LeaveBalance.objects.bulk_update(to_update, ACCRUAL_UPDATE_FIELDS, batch_size=batch_size)
+                LeaveBalance.objects.bulk_create(to_create, batch_size=batch_size)
 
         return {
             'year':                    year,
-            'total_employees':         employees.count(),
-            'employees_with_updates':  len(employees_updated),
-            'total_balances_updated':  total_updated,
-            'details':                 employees_updated,
+            'dry_run':                 dry_run,
+            'total_employees':         len(employees),
+            'employees_with_updates':  len(details),
+            'total_balances_updated':  sum(
+                1 for d in details for item in d['summary'] if not item['created']
+            ),
+            'total_balances_created':  len(to_create),
+            'details':                 details,
         }
 
     @staticmethod
@@ -365,7 +515,7 @@ class LeaveAccrualService:
         balances = LeaveBalance.objects.filter(
             employee=employee,
             year=year,
-            leave_type__category__in=['annual', 'emergency']
+            leave_type__category__in=ACCRUAL_CATEGORIES
         ).select_related('leave_type')
 
         balances_info = []
@@ -20,7 +20,7 @@ class PayrollService:
     
     @staticmethod
     @transaction.atomic
-    def calculate_payroll(employee, month, processed_by):
+    def calculate_payroll(employee, month, processed_by, prepared=None):
         """
         Calculate payroll for an employee for a specific month.
         
@@ -32,6 +32,8 @@ class PayrollService:
             employee (Employee): The employee to calculate payroll for
             month (date): The payroll month as a date object
             processed_by (User): The user processing the payroll
+            prepared (dict, optional): Result of _prepare_payroll for this employee
+                                       (used by process_monthly_payroll batches)
         
         Returns:
             Payroll: The calculated payroll record with status 'calculated'
@@ -45,7 +47,7 @@ class PayrollService:
             if employee.is_insurance_only:
                 raise ValueError('موظفو التأمين فقط لا يُعالجون في كشف الرواتب')
             
-            return PayrollService._calculate_payroll_new_system(employee, month, processed_by)
+            return PayrollService._calculate_payroll_new_system(employee, month, processed_by, prepared)
             
         except ValueError as e:
             logger.error(f"خطأ في البيانات عند حساب راتب {employee.get_full_name_ar()}: {str(e)}")
@@ -55,32 +57,21 @@ class PayrollService:
             raise
     
     @staticmethod
-    @transaction.atomic
-    def _calculate_payroll_new_system(employee, month, processed_by):
+    def _prepare_payroll(employee, month):
         """
-        Calculate payroll using the new system (SalaryComponent + PayrollLine).
+        Load everything payroll calculation needs for one employee, without writing.
         
-        This method handles the complete payroll calculation including:
-        - Retrieving active contract and salary components
-        - Calculating attendance and worked days
-        - Creating payroll record with all components
-        - Calculating advance deductions
-        - Computing final totals
+        Covers steps 1-4 of the calculation (contract, approved attendance summary,
+        active salary components, basic salary and worked days) and builds the
+        formula context, so a payroll run can evaluate all formula components in one batch.
         
-        Args:
-            employee (Employee): The employee to calculate payroll for
-            month (date): The payroll month as a date object
-            processed_by (User): The user processing the payroll
-            
         Returns:
-            Payroll: The calculated payroll record with status 'calculated'
+            dict: contract, att_summary, components, basic_salary, attendance_stats,
+                  worked_days, context and non_basic_components
             
         Raises:
-            ValueError: If employee has no active contract, no salary components,
-                       or if payroll already exists for this month
-            Exception: For unexpected errors during calculation
+            ValueError: Same validation errors as _calculate_payroll_new_system
         """
-        from ..models import PayrollLine
         from django.db.models import Q
         
         # 1. الحصول على العقد النشط للشهر المحدد (مع دعم الدورة المرنة)
@@ -181,6 +172,82 @@ class PayrollService:
                     logger.warning(f"⚠️ لا توجد بيانات حضور للموظف {employee.get_full_name_ar()} في شهر {month.strftime('%Y-%m')} - سيتم احتساب راتب كامل افتراضياً")
                     worked_days = cycle_days
         
+        # سياق صيغ البنود (متغيرات محرك الصيغ)
+        from dateutil.relativedelta import relativedelta
+        context = {
+            'basic_salary': basic_salary,
+            'worked_days': worked_days,
+            'month': month,
+            'gross_salary': Decimal('0'),  # سيتم تحديثه
+            'present_days': _att_summary.present_days,
+            'absent_days': _att_summary.absent_days,
+            'late_days': _att_summary.late_days,
+            'overtime_hours': _att_summary.total_overtime_hours or Decimal('0'),
+            'seniority_years': (
+                relativedelta(period_end, employee.hire_date).years if employee.hire_date else 0
+            ),
+        }
+        
+        # Extract insurable salary for social insurance calculation (no PayrollLine created)
+        insurable_component = components.filter(code='INSURABLE_SALARY').first()
+        context['insurable_salary'] = (
+            insurable_component.amount if insurable_component else basic_salary
+        )
+
+        # استبعاد بند الأجر الأساسي لأنه محفوظ بالفعل في payroll.basic_salary
+        # Exclude INSURABLE_SALARY from PayrollLine — it's a reference value only, not an earning
+        non_basic_components = list(components.exclude(is_basic=True).exclude(code='INSURABLE_SALARY'))
+        
+        return {
+            'contract': contract,
+            'att_summary': _att_summary,
+            'components': components,
+            'basic_salary': basic_salary,
+            'attendance_stats': attendance_stats,
+            'worked_days': worked_days,
+            'context': context,
+            'non_basic_components': non_basic_components,
+        }
+    
+    @staticmethod
+    @transaction.atomic
+    def _calculate_payroll_new_system(employee, month, processed_by, prepared=None):
+        """
+        Calculate payroll using the new system (SalaryComponent + PayrollLine).
+        
+        This method handles the complete payroll calculation including:
+        - Retrieving active contract and salary components
+        - Calculating attendance and worked days
+        - Creating payroll record with all components
+        - Calculating advance deductions
+        - Computing final totals
+        
+        Args:
+            employee (Employee): The employee to calculate payroll for
+            month (date): The payroll month as a date object
+            processed_by (User): The user processing the payroll
+            prepared (dict, optional): Result of _prepare_payroll; computed here when omitted.
+                                       May carry 'formula_amounts' evaluated for the whole run
+            
+        Returns:
+            Payroll: The calculated payroll record with status 'calculated'
+            
+        Raises:
+            ValueError: If employee has no active contract, no salary components,
+                       or if payroll already exists for this month
+            Exception: For unexpected errors during calculation
+        """
+        from ..models import PayrollLine
+        
+        if prepared is None:
+            prepared = PayrollService._prepare_payroll(employee, month)
+        contract = prepared['contract']
+        basic_salary = prepared['basic_salary']
+        attendance_stats = prepared['attendance_stats']
+        worked_days = prepared['worked_days']
+        context = prepared['context']
+        formula_amounts = prepared.get('formula_amounts') or {}
+        
         # 5. التحقق من وجود راتب سابق لنفس الموظف والشهر
         existing_payroll = Payroll.objects.filter(
             employee=employee,
@@ -222,25 +289,11 @@ class PayrollService:
         )
         
         # 7. إنشاء PayrollLine لكل بند (ماعدا الأجر الأساسي لأنه محفوظ في basic_salary)
-        context = {
-            'basic_salary': basic_salary,
-            'worked_days': worked_days,
-            'month': month,
-            'gross_salary': Decimal('0'),  # سيتم تحديثه
-        }
-        
-        # استبعاد بند الأجر الأساسي لأنه محفوظ بالفعل في payroll.basic_salary
-        # Extract insurable salary for social insurance calculation (no PayrollLine created)
-        insurable_component = components.filter(code='INSURABLE_SALARY').first()
-        context['insurable_salary'] = (
-            insurable_component.amount if insurable_component else basic_salary
-        )
-
-        # Exclude INSURABLE_SALARY from PayrollLine — it's a reference value only, not an earning
-        non_basic_components = components.exclude(is_basic=True).exclude(code='INSURABLE_SALARY')
-        
-        for component in non_basic_components:
-            amount = component.calculate_amount(context)
+        for component in prepared['non_basic_components']:
+            if component.pk in formula_amounts:
+                amount = formula_amounts[component.pk]
+            else:
+                amount = component.calculate_amount(context)
             
             # تقريب المبلغ لأقرب رقم صحيح
             from decimal import ROUND_HALF_UP
@@ -599,9 +652,36 @@ class PayrollService:
         success_count = 0
         fail_count = 0
         
+        # 1. تجهيز بيانات كل الموظفين أولاً (بدون كتابة)
+        from hr.services.salary_formula_engine import evaluate_component_formulas
+        employees = list(employees)
+        prepared_by_employee = {}
+        for employee in employees:
+            if employee.is_insurance_only:
+                continue
+            try:
+                prepared_by_employee[employee.pk] = PayrollService._prepare_payroll(employee, month)
+            except Exception as e:
+                prepared_by_employee[employee.pk] = e
+        
+        # 2. تقييم بنود الصيغ لكل الموظفين دفعة واحدة (استدعاء واحد لكل صيغة مختلفة)
+        prepared_list = [p for p in prepared_by_employee.values() if isinstance(p, dict)]
+        formula_amounts = evaluate_component_formulas(
+            (component, prepared['context'])
+            for prepared in prepared_list
+            for component in prepared['non_basic_components']
+            if component.calculation_method == 'formula'
+        )
+        for prepared in prepared_list:
+            prepared['formula_amounts'] = formula_amounts
+        
+        # 3. إنشاء قسائم الرواتب
         for employee in employees:
             try:
-                payroll = PayrollService.calculate_payroll(employee, month, processed_by)
+                prepared = prepared_by_employee.get(employee.pk)
+                if isinstance(prepared, Exception):
+                    raise prepared
+                payroll = PayrollService.calculate_payroll(employee, month, processed_by, prepared)
                 results.append({
                     'employee': employee,
                     'payroll': payroll,
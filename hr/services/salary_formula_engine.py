@@ -0,0 +1,255 @@
+"""
+محرك صيغ بنود الراتب (Salary Formula Engine)
+- كل صيغة تُحلل وتُتحقق مرة واحدة فقط إلى شجرة تعبير، وتُخزن حسب بصمتها (hash) في
+  كاش داخل العملية؛ التقييم بعد ذلك لا يعيد التحليل مهما تكرر
+- متغيرات مسماة قابلة للتوسعة (الأساسي، الإجمالي، الأيام، الحضور، الإضافي، الأقدمية...)
+- الحساب بالـ Decimal، والتقييم الجماعي يمرر أعمدة كل الموظفين (قوائم Decimal أو مصفوفات numpy)
+  على الشجرة مرة واحدة، مع نفس التقريب تماماً كالتقييم لموظف واحد
+"""
+
+import ast
+import hashlib
+import operator
+import re
+from decimal import Decimal, DecimalException, InvalidOperation, ROUND_HALF_UP
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+AMOUNT_QUANTUM = Decimal('0.01')
+
+# اسم المتغير في الصيغة: (مفتاح السياق، القيمة الافتراضية، الاسم العربي للعرض)
+VARIABLES = {
+    'BASIC': ('basic_salary', Decimal('0'), 'الأساسي'),
+    'GROSS': ('gross_salary', Decimal('0'), 'الإجمالي'),
+    'DAYS': ('worked_days', Decimal('30'), 'الأيام'),
+    'PRESENT_DAYS': ('present_days', Decimal('0'), 'أيام الحضور'),
+    'ABSENT_DAYS': ('absent_days', Decimal('0'), 'أيام الغياب'),
+    'LATE_DAYS': ('late_days', Decimal('0'), 'أيام التأخير'),
+    'OVERTIME_HOURS': ('overtime_hours', Decimal('0'), 'ساعات الإضافي'),
+    'SENIORITY_YEARS': ('seniority_years', Decimal('0'), 'سنوات الخدمة'),
+    'INSURABLE': ('insurable_salary', Decimal('0'), 'الأجر التأميني'),
+}
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+_UNARY_OPERATORS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+
+
+class FormulaError(ValueError):
+    """صيغة غير صالحة أو تعذر تقييمها"""
+
+
+def _to_decimal(value: Any) -> Decimal:
+    if isinstance(value, Decimal):
+        result = value
+    elif isinstance(value, bool) or value is None:
+        raise FormulaError(f"قيمة غير رقمية في سياق الصيغة: {value!r}")
+    else:
+        try:
+            result = Decimal(str(value))
+        except (InvalidOperation, ValueError, TypeError):
+            raise FormulaError(f"قيمة غير رقمية في سياق الصيغة: {value!r}")
+    if not result.is_finite():
+        raise FormulaError(f"قيمة غير رقمية في سياق الصيغة: {value!r}")
+    return result
+
+
+def round_amount(value: Decimal) -> Decimal:
+    """تقريب ناتج الصيغة لأقرب قرش (نفس التقريب في التقييم الفردي والجماعي)"""
+    return value.quantize(AMOUNT_QUANTUM, rounding=ROUND_HALF_UP)
+
+
+class CompiledFormula:
+    """
+    صيغة محللة ومتحقق منها: شجرة من tuples
+    ('const', Decimal) | ('var', name) | ('bin', op, left, right) | ('unary', op, operand)
+    """
+
+    __slots__ = ('source', 'digest', 'tree', 'variables')
+
+    def __init__(self, source: str, digest: str, tree: tuple, variables: frozenset):
+        self.source = source
+        self.digest = digest
+        self.tree = tree
+        self.variables = variables
+
+    # ------------------------------------------------------------------
+    # Per-employee
+    # ------------------------------------------------------------------
+
+    def evaluate(self, context: Mapping[str, Any]) -> Decimal:
+        """
+        تقييم الصيغة لموظف واحد
+
+        Raises:
+            FormulaError: قيمة غير رقمية في السياق أو قسمة على صفر
+        """
+        values = {name: _context_value(context, name) for name in self.variables}
+        try:
+            return round_amount(_evaluate(self.tree, values))
+        except (DecimalException, ArithmeticError) as e:
+            raise FormulaError(f"تعذر تقييم الصيغة {self.source}: {e}")
+
+    # ------------------------------------------------------------------
+    # Whole payroll run
+    # ------------------------------------------------------------------
+
+    def evaluate_many(self, columns: Mapping[str, Sequence], size: int) -> List[Optional[Decimal]]:
+        """
+        تقييم الصيغة لكل الموظفين في استدعاء واحد
+
+        Args:
+            columns: {اسم المتغير: عمود القيم} (قائمة Decimal أو مصفوفة numpy) بنفس الطول؛
+                     المتغيرات غير الممررة تأخذ قيمتها الافتراضية
+            size: عدد الصفوف (الموظفين)
+
+        Returns:
+            قائمة النتائج بنفس ترتيب الأعمدة؛ None للصفوف التي تعذر تقييمها
+        """
+        import numpy as np
+
+        arrays = {}
+        invalid = np.zeros(size, dtype=bool)
+        for name in self.variables:
+            column = columns.get(name)
+            if column is None:
+                arrays[name] = VARIABLES[name][1]
+                continue
+            array = np.empty(size, dtype=object)
+            for index, value in enumerate(column):
+                try:
+                    array[index] = _to_decimal(value)
+                except FormulaError:
+                    array[index] = Decimal('0')
+                    invalid[index] = True
+            arrays[name] = array
+
+        try:
+            result = np.broadcast_to(np.asarray(_evaluate(self.tree, arrays), dtype=object), (size,))
+        except (DecimalException, ArithmeticError):
+            # صف واحد على الأقل به قسمة على صفر: الرجوع للتقييم الفردي لكل صف
+            result = np.empty(size, dtype=object)
+            for index in range(size):
+                row = {
+                    name: value[index] if isinstance(value, np.ndarray) else value
+                    for name, value in arrays.items()
+                }
+                try:
+                    result[index] = _evaluate(self.tree, row)
+                except (DecimalException, ArithmeticError):
+                    invalid[index] = True
+
+        return [None if invalid[index] else round_amount(value) for index, value in enumerate(result)]
+
+
+def _context_value(context: Mapping[str, Any], name: str) -> Decimal:
+    key, default, _ = VARIABLES[name]
+    value = context.get(key)
+    return default if value is None else _to_decimal(value)
+
+
+def _evaluate(node: tuple, values: Mapping[str, Any]):
+    kind = node[0]
+    if kind == 'const':
+        return node[1]
+    if kind == 'var':
+        return values[node[1]]
+    if kind == 'bin':
+        return node[1](_evaluate(node[2], values), _evaluate(node[3], values))
+    return node[1](_evaluate(node[2], values))
+
+
+def _build(node: ast.AST, variables: set) -> tuple:
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return ('const', Decimal(str(node.value)))
+    if isinstance(node, ast.Name):
+        if node.id not in VARIABLES:
+            raise FormulaError(f"متغير غير معروف: {node.id}")
+        variables.add(node.id)
+        return ('var', node.id)
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        return ('bin', _BINARY_OPERATORS[type(node.op)], _build(node.left, variables), _build(node.right, variables))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return ('unary', _UNARY_OPERATORS[type(node.op)], _build(node.operand, variables))
+    raise FormulaError(f"عملية غير مدعومة في الصيغة: {type(node).__name__}")
+
+
+def normalize(formula: str) -> str:
+    return ' '.join((formula or '').upper().split())
+
+
+def compile_formula(formula: str) -> CompiledFormula:
+    """
+    تحليل الصيغة والتحقق منها مرة واحدة (الصيغ المتطابقة بعد التوحيد تشترك في نفس الشجرة)
+
+    Raises:
+        FormulaError: صيغة فارغة أو غير صالحة
+    """
+    normalized = normalize(formula)
+    return _compile(hashlib.sha1(normalized.encode()).hexdigest(), normalized)
+
+
+@lru_cache(maxsize=1024)
+def _compile(digest: str, normalized: str) -> CompiledFormula:
+    if not normalized:
+        raise FormulaError("الصيغة فارغة")
+    try:
+        expression = ast.parse(normalized, mode='eval')
+    except SyntaxError as e:
+        raise FormulaError(f"صيغة غير صالحة: {e.msg}")
+    variables = set()
+    tree = _build(expression.body, variables)
+    return CompiledFormula(normalized, digest, tree, frozenset(variables))
+
+
+def evaluate_component_formulas(items: Iterable[Tuple[Any, Mapping[str, Any]]]) -> Dict[Any, Decimal]:
+    """
+    تقييم بنود الراتب بالصيغ لمجموعة موظفين: استدعاء جماعي واحد لكل صيغة مختلفة
+
+    Args:
+        items: (بند الراتب، سياق الموظف) لكل بند يُحسب بصيغة
+
+    Returns:
+        {معرف البند: المبلغ} بنفس نتيجة SalaryComponent.calculate_amount تماماً
+        (البند بصيغة غير صالحة أو تعذر تقييمها يرجع لمبلغه الثابت)
+    """
+    groups: Dict[Optional[CompiledFormula], List[Tuple[Any, Mapping[str, Any]]]] = {}
+    for component, context in items:
+        try:
+            compiled = compile_formula(component.formula) if component.formula else None
+        except FormulaError:
+            compiled = None
+        groups.setdefault(compiled, []).append((component, context))
+
+    amounts = {}
+    for compiled, rows in groups.items():
+        if compiled is None:
+            amounts.update((component.pk, component.amount) for component, _ in rows)
+            continue
+        columns = {}
+        for name in compiled.variables:
+            key, default, _ = VARIABLES[name]
+            columns[name] = [
+                default if context.get(key) is None else context.get(key) for _, context in rows
+            ]
+        results = compiled.evaluate_many(columns, len(rows))
+        for (component, _), result in zip(rows, results):
+            amounts[component.pk] = component.amount if result is None else result
+    return amounts
+
+
+def formula_display(formula: str) -> str:
+    """عرض الصيغة بأسماء المتغيرات العربية"""
+    return re.sub(
+        r'[A-Za-z_]+',
+        lambda match: VARIABLES.get(match.group(0).upper(), (None, None, match.group(0)))[2],
+        formula or '',
+    )
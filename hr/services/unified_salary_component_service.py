@@ -542,64 +542,10 @@ class UnifiedSalaryComponentService:
         if not formula:
             return Decimal('0')
         
+        from hr.services.salary_formula_engine import FormulaError, compile_formula
         try:
-            # استبدال المتغيرات
-            formula_eval = formula.upper()
-            basic_salary = str(context['basic_salary'])
-            worked_days = str(context.get('worked_days', 30))
-            
-            # التحقق من صحة القيم قبل الاستبدال
-            if not basic_salary.replace('.', '').replace('-', '').isdigit():
-                return Decimal('0')
-            if not worked_days.replace('.', '').replace('-', '').isdigit():
-                return Decimal('0')
-            
-            formula_eval = formula_eval.replace('BASIC', basic_salary)
-            formula_eval = formula_eval.replace('DAYS', worked_days)
-            
-            # التحقق الصارم من الأحرف المسموحة فقط
-            allowed_chars = set('0123456789.+-*/() ')
-            if not all(c in allowed_chars for c in formula_eval):
-                logger.warning(f"Formula contains invalid characters: {formula}")
-                return Decimal('0')
-            
-            # التحقق من عدم وجود أحرف متتالية خطرة
-            dangerous_patterns = ['__', 'import', 'exec', 'eval', 'open', 'file']
-            if any(pattern in formula_eval.lower() for pattern in dangerous_patterns):
-                logger.error(f"Dangerous pattern detected in formula: {formula}")
-                return Decimal('0')
-            
-            # استخدام ast.literal_eval بدلاً من eval (أكثر أماناً)
-            import ast
-            import operator
-            
-            # تحويل الصيغة لـ AST وتقييمها بشكل آمن
-            operators = {
-                ast.Add: operator.add,
-                ast.Sub: operator.sub,
-                ast.Mult: operator.mul,
-                ast.Div: operator.truediv,
-                ast.USub: operator.neg,
-            }
-            
-            def safe_eval(node):
-                if isinstance(node, ast.Num):
-                    return node.n
-                elif isinstance(node, ast.BinOp):
-                    left = safe_eval(node.left)
-                    right = safe_eval(node.right)
-                    return operators[type(node.op)](left, right)
-                elif isinstance(node, ast.UnaryOp):
-                    operand = safe_eval(node.operand)
-                    return operators[type(node.op)](operand)
-                else:
-                    raise ValueError(f"Unsupported operation: {type(node)}")
-            
-            tree = ast.parse(formula_eval, mode='eval')
-            result = safe_eval(tree.body)
-            return Decimal(str(result))
-            
-        except Exception as e:
+            return compile_formula(formula).evaluate(context)
+        except FormulaError as e:
             logger.error(f"Error evaluating formula '{formula}': {str(e)}")
             return Decimal('0')
     
@@ -10,6 +10,8 @@ import pytest
 from django.test import TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from datetime import date, timedelta
 from decimal import Decimal
@@ -18,6 +20,7 @@ from hr.models import (
     Department, JobTitle, Employee, Contract, Shift,
     LeaveType, LeaveBalance, Leave
 )
+from hr.services.leave_accrual_service import LeaveAccrualService
 from hr.services.leave_service import LeaveService
 
 User = get_user_model()
@@ -919,5 +922,158 @@ class LeaveIntegrationTest(TransactionTestCase):
         self.assertEqual(balance_info['remaining_days'], expected_remaining)
 
 
+
+class LeaveAccrualBulkTest(TestCase):
+    """اختبارات التحديث الجماعي لاستحقاق الإجازات"""
+
+    def setUp(self):
+        self.admin_user = User.objects.create_user(username='admin_bulk_accrual', password='admin123')
+        self.department = Department.objects.create(code='BULK_DEPT', name_ar='قسم الاستحقاق')
+        self.job_title = JobTitle.objects.create(code='BULK_JOB', title_ar='وظيفة', department=self.department)
+        self.shift = Shift.objects.create(
+            name='وردية الاستحقاق', shift_type='morning', start_time='09:00', end_time='17:00'
+        )
+        LeaveType.objects.filter(category__in=['annual', 'emergency']).update(is_active=False)
+        self.annual = LeaveType.objects.create(
+            code='BULK_ANNUAL', name_ar='اعتيادية', category='annual', max_days_per_year=21, is_active=True
+        )
+        self.emergency = LeaveType.objects.create(
+            code='BULK_EMERG', name_ar='عارضة', category='emergency', max_days_per_year=7, is_active=True
+        )
+        self.year = date.today().year
+
+    def _employee(self, number, months, birth_date=date(1995, 1, 1)):
+        employee = Employee.objects.create(
+            user=User.objects.create_user(
+                username=f'bulk_{number}', password='x', email=f'bulk_{number}@test.com'
+            ),
+            employee_number=f'BLK{number}',
+            name=f'موظف {number}',
+            national_id=f'2950101{number:0>7}',
+            birth_date=birth_date,
+            gender='male',
+            marital_status='single',
+            work_email=f'bulk_{number}@company.com',
+            mobile_phone=f'0111{number:0>7}',
+            department=self.department,
+            job_title=self.job_title,
+            shift=self.shift,
+            hire_date=date.today() - timedelta(days=int(months * 30.5)),
+            status='active',
+            created_by=self.admin_user,
+        )
+        LeaveBalance.objects.filter(employee=employee).delete()
+        return employee
+
+    def _stale_balances(self, employee):
+        """أرصدة قديمة بمرحلة none كما لو لم يُشغل الاستحقاق منذ التعيين"""
+        for leave_type in (self.annual, self.emergency):
+            LeaveBalance.objects.create(
+                employee=employee, leave_type=leave_type, year=self.year,
+                total_days=0, accrued_days=0, used_days=2, remaining_days=0,
+            )
+
+    def _snapshot(self):
+        return sorted(LeaveBalance.objects.filter(year=self.year).values_list(
+            'employee_id', 'leave_type_id', 'total_days', 'accrued_days', 'remaining_days', 'accrual_phase'
+        ))
+
+    def test_bulk_matches_per_employee_rules_and_dry_run_writes_nothing(self):
+        full = self._employee('1', 14)
+        partial = self._employee('2', 8)
+        senior = self._employee('3', 30, birth_date=date(1960, 1, 1))
+        for employee in (full, partial, senior):
+            self._stale_balances(employee)
+        newcomer = self._employee('4', 7)
+
+        before = self._snapshot()
+        report = LeaveAccrualService.update_all_accruals(self.year, dry_run=True)
+        self.assertEqual(self._snapshot(), before)
+        self.assertTrue(report['dry_run'])
+        self.assertEqual(report['total_balances_updated'], 6)
+        self.assertEqual(report['total_balances_created'], 2)
+
+        by_employee = {d['employee_id']: d for d in report['details']}
+        self.assertEqual(
+            {item['leave_type']: item['new_total'] for item in by_employee[full.pk]['summary']},
+            {'اعتيادية': 21, 'عارضة': 7},
+        )
+        self.assertTrue(all(item['created'] for item in by_employee[newcomer.pk]['summary']))
+
+        result = LeaveAccrualService.update_all_accruals(self.year)
+        self.assertFalse(result['dry_run'])
+        self.assertEqual(
+            [(d['employee_id'], d['summary']) for d in result['details']],
+            [(d['employee_id'], d['summary']) for d in report['details']],
+        )
+        for employee in (full, partial, senior, newcomer):
+            for balance in LeaveBalance.objects.filter(employee=employee, year=self.year):
+                expected = LeaveAccrualService.get_entitlement_for_employee(employee, balance.leave_type)
+                self.assertEqual(balance.total_days, expected)
+                self.assertEqual(balance.accrued_days, expected)
+                self.assertEqual(balance.remaining_days, expected - balance.used_days)
+                self.assertEqual(
+                    balance.accrual_phase,
+                    LeaveAccrualService.get_accrual_phase(employee, balance.leave_type),
+                )
+
+        # تشغيل ثانٍ: لا شيء يتغير
+        self.assertEqual(LeaveAccrualService.update_all_accruals(self.year)['details'], [])
+
+    def test_balances_are_created_only_for_employees_without_any_balance(self):
+        sick = LeaveType.objects.create(
+            code='BULK_SICK', name_ar='مرضي', category='sick', max_days_per_year=0, is_active=True
+        )
+        employee = self._employee('6', 14)
+        LeaveBalance.objects.create(
+            employee=employee, leave_type=sick, year=self.year,
+            total_days=0, accrued_days=0, used_days=0, remaining_days=0,
+        )
+
+        report = LeaveAccrualService.bulk_update_accruals(self.year)
+
+        self.assertEqual(report['total_balances_created'], 0)
+        self.assertEqual(
+            list(LeaveBalance.objects.filter(employee=employee, year=self.year).values_list('leave_type', flat=True)),
+            [sick.pk],
+        )
+
+    def test_query_count_does_not_grow_with_workforce(self):
+        def run():
+            for employee in Employee.objects.filter(employee_number__startswith='BLK'):
+                LeaveBalance.objects.filter(employee=employee).update(
+                    total_days=0, accrued_days=0, remaining_days=0, accrual_phase='none'
+                )
+            with CaptureQueriesContext(connection) as queries:
+                LeaveAccrualService.bulk_update_accruals(self.year)
+            return len(queries)
+
+        for number in range(2):
+            self._stale_balances(self._employee(f'1{number}', 14))
+        small = run()
+        for number in range(6):
+            self._stale_balances(self._employee(f'2{number}', 14))
+        self.assertEqual(run(), small)
+
+    def test_manual_adjustment_is_kept_until_phase_changes(self):
+        employee = self._employee('5', 14)
+        self._stale_balances(employee)
+        LeaveBalance.objects.filter(employee=employee, leave_type=self.annual).update(
+            total_days=25, accrued_days=25, remaining_days=23, accrual_phase='full', is_manually_adjusted=True
+        )
+        LeaveBalance.objects.filter(employee=employee, leave_type=self.emergency).update(
+            is_manually_adjusted=True
+        )
+
+        LeaveAccrualService.update_all_accruals(self.year)
+
+        annual = LeaveBalance.objects.get(employee=employee, leave_type=self.annual)
+        self.assertEqual((annual.total_days, annual.is_manually_adjusted), (25, True))
+        emergency = LeaveBalance.objects.get(employee=employee, leave_type=self.emergency)
+        self.assertEqual((emergency.total_days, emergency.accrual_phase), (7, 'full'))
+        self.assertFalse(emergency.is_manually_adjusted)
+        self.assertIn('[تحديث تلقائي]', emergency.adjustment_reason)
+
+
 if __name__ == '__main__':
     pytest.main([__file__])
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""
+اختبارات محرك صيغ بنود الراتب
+- التحليل مرة واحدة والتخزين المترجم
+- المتغيرات الجديدة (الحضور، الإضافي، الأقدمية)
+- التقييم الجماعي لمسير الرواتب يطابق التقييم لكل موظف
+"""
+from datetime import date, time
+from decimal import Decimal, ROUND_HALF_UP
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core.models import SystemSetting
+from hr.models import (
+    AttendanceSummary, Contract, Department, Employee, JobTitle, SalaryComponent, Shift,
+)
+from hr.services import salary_formula_engine
+from hr.services.salary_formula_engine import (
+    FormulaError, compile_formula, formula_display,
+)
+
+User = get_user_model()
+
+
+class SalaryFormulaEngineTest(SimpleTestCase):
+    """اختبارات الترجمة والتقييم بدون قاعدة بيانات"""
+
+    def test_formula_is_parsed_once_per_normalized_text(self):
+        compiled = compile_formula('basic * 0.2')
+        with patch.object(salary_formula_engine.ast, 'parse') as parse:
+            self.assertIs(compile_formula('BASIC  *  0.2'), compiled)
+            self.assertIs(compile_formula(' Basic * 0.2 '), compiled)
+            parse.assert_not_called()
+        self.assertEqual(compiled.evaluate({'basic_salary': Decimal('10000')}), Decimal('2000.00'))
+
+    def test_named_variables_use_decimal_arithmetic(self):
+        compiled = compile_formula('BASIC / 30 * (DAYS - ABSENT_DAYS) + OVERTIME_HOURS * 12.5 + SENIORITY_YEARS * 100')
+        context = {
+            'basic_salary': Decimal('6000'),
+            'worked_days': 30,
+            'absent_days': 2,
+            'overtime_hours': Decimal('3.5'),
+            'seniority_years': 4,
+        }
+        # 200 * 28 + 43.75 + 400
+        self.assertEqual(compiled.evaluate(context), Decimal('6043.75'))
+        self.assertEqual(compile_formula('0.1 + 0.2').evaluate({}), Decimal('0.30'))
+        # DAYS غير الممرر = 30
+        self.assertEqual(compile_formula('BASIC / DAYS').evaluate({'basic_salary': 3000}), Decimal('100.00'))
+
+    def test_invalid_formulas_are_rejected_at_compile_time(self):
+        for formula in ('', 'BASIC *', 'SALARY * 2', '__import__("os")', 'BASIC ** 2', '"1" + 1'):
+            with self.assertRaises(FormulaError, msg=formula):
+                compile_formula(formula)
+        with self.assertRaises(FormulaError):
+            compile_formula('BASIC / ABSENT_DAYS').evaluate({'basic_salary': 100, 'absent_days': 0})
+
+    def test_vectorised_evaluation_matches_per_row_evaluation(self):
+        compiled = compile_formula('BASIC / PRESENT_DAYS * LATE_DAYS - 0.005')
+        rows = [
+            {'basic_salary': Decimal('6000'), 'present_days': 22, 'late_days': 3},
+            {'basic_salary': Decimal('4999.99'), 'present_days': 21, 'late_days': 1},
+            {'basic_salary': Decimal('7000'), 'present_days': 0, 'late_days': 2},
+            {'basic_salary': Decimal('1000'), 'present_days': 7, 'late_days': 0},
+        ]
+        columns = {
+            'BASIC': [row['basic_salary'] for row in rows],
+            'PRESENT_DAYS': [row['present_days'] for row in rows],
+            'LATE_DAYS': [row['late_days'] for row in rows],
+        }
+        results = compiled.evaluate_many(columns, len(rows))
+
+        self.assertIsNone(results[2])
+        for row, result in zip(rows[:2] + rows[3:], results[:2] + results[3:]):
+            self.assertEqual(result, compiled.evaluate(row))
+
+    def test_formula_display_maps_variable_names(self):
+        self.assertEqual(formula_display('basic * 0.1 + Days'), 'الأساسي * 0.1 + الأيام')
+        self.assertEqual(formula_display('OVERTIME_HOURS * 20'), 'ساعات الإضافي * 20')
+
+
+def _make_employee(admin, department, job_title, shift, suffix):
+    user = User.objects.create_user(username=f'sfe_{suffix}', password='test', email=f'sfe_{suffix}@test.com')
+    return Employee.objects.create(
+        user=user,
+        employee_number=f'SFE{suffix}',
+        name=f'موظف صيغ {suffix}',
+        national_id=f'2900101000{suffix:0>4}',
+        birth_date=date(1990, 1, 1),
+        gender='male',
+        marital_status='single',
+        work_email=f'sfe_{suffix}@company.com',
+        mobile_phone=f'0100000{suffix:0>4}',
+        department=department,
+        job_title=job_title,
+        shift=shift,
+        hire_date=date(2020, 1, 1),
+        status='active',
+        created_by=admin,
+    )
+
+
+class PayrollFormulaBatchTest(TestCase):
+    """مسير الرواتب يقيّم كل صيغة مرة واحدة لكل الموظفين بنفس النتائج"""
+
+    MONTH = date(2024, 3, 1)
+
+    def setUp(self):
+        SystemSetting.objects.update_or_create(
+            key='payroll_cycle_start_day',
+            defaults={'value': '1', 'data_type': 'integer', 'is_active': True},
+        )
+        self.admin = User.objects.create_user(
+            username='sfe_admin', password='x', email='sfe_admin@test.com', is_staff=True, is_superuser=True
+        )
+        department = Department.objects.create(code='SFE', name_ar='قسم الصيغ')
+        job_title = JobTitle.objects.create(code='SFEJOB', title_ar='وظيفة', department=department)
+        shift = Shift.objects.create(
+            name='وردية الصيغ', shift_type='academic_year',
+            start_time=time(8, 0), end_time=time(16, 0),
+        )
+        self.employees = []
+        for index, (salary, present, overtime) in enumerate(
+            [(Decimal('6000'), 22, Decimal('4')), (Decimal('4500'), 18, Decimal('0')), (Decimal('9000'), 20, Decimal('10'))]
+        ):
+            employee = _make_employee(self.admin, department, job_title, shift, str(index + 1))
+            contract = Contract.objects.create(
+                contract_number=f'CSFE{index}', employee=employee, contract_type='permanent',
+                start_date=date(2023, 1, 1), basic_salary=salary, status='active', created_by=self.admin,
+            )
+            for code, method, formula in [
+                ('BASIC', 'fixed', ''),
+                ('HOUSING', 'formula', 'BASIC * 0.25'),
+                ('OVERTIME_PAY', 'formula', 'BASIC / 240 * OVERTIME_HOURS * 1.5'),
+                ('LOYALTY', 'formula', 'SENIORITY_YEARS * 50'),
+            ]:
+                SalaryComponent.objects.create(
+                    employee=employee, contract=contract, code=code, name=code,
+                    component_type='earning', calculation_method=method, formula=formula,
+                    amount=salary if code == 'BASIC' else Decimal('0'), is_basic=code == 'BASIC',
+                    is_active=True, effective_from=date(2023, 1, 1),
+                )
+            AttendanceSummary.objects.create(
+                employee=employee, month=self.MONTH, total_working_days=22, present_days=present,
+                total_overtime_hours=overtime, is_calculated=True, is_approved=True,
+                approved_by=self.admin, approved_at=timezone.now(),
+            )
+            self.employees.append(employee)
+
+    def test_monthly_run_evaluates_each_formula_once_and_matches_single_calculation(self):
+        from hr.services.payroll_service import PayrollService
+
+        employees = Employee.objects.filter(id__in=[e.id for e in self.employees]).order_by('id')
+        expected = {}
+        for employee in employees:
+            prepared = PayrollService._prepare_payroll(employee, self.MONTH)
+            expected[employee.id] = {
+                component.code: component.calculate_amount(prepared['context']).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+                for component in prepared['non_basic_components']
+            }
+
+        evaluate_many = salary_formula_engine.CompiledFormula.evaluate_many
+        with patch.object(
+            salary_formula_engine.CompiledFormula, 'evaluate_many', autospec=True, side_effect=evaluate_many
+        ) as spy:
+            results = PayrollService.process_monthly_payroll(self.MONTH, self.admin, employees)
+
+        self.assertEqual(spy.call_count, 3)
+        self.assertEqual([r['employee'].id for r in results], [e.id for e in employees])
+        self.assertTrue(all(r['success'] for r in results))
+        for result in results:
+            lines = {line.code: line.amount for line in result['payroll'].lines.all()}
+            for code, amount in expected[result['employee'].id].items():
+                self.assertEqual(lines[code], amount, code)
+
+        first = results[0]['payroll'].lines.get(code='OVERTIME_PAY')
+        self.assertEqual(first.amount, Decimal('150'))  # 6000 / 240 * 4 * 1.5
+        loyalty = results[0]['payroll'].lines.get(code='LOYALTY')
+        self.assertEqual(loyalty.amount, Decimal('200'))  # 4 سنوات خدمة في نهاية مارس 2024
@@ -0,0 +1,55 @@
+"""
+Command: build_stock_ledger_checkpoints
+إنشاء النقاط المرجعية الشهرية لأرصدة أستاذ المخزون (تُسرّع استعلامات الرصيد في تاريخ سابق)
+- يُشغّل شهرياً بعد إقفال الشهر (الافتراضي: الشهر السابق)
+- --recompute يعيد احتساب الأرصدة الجارية لكل الأسطر قبل إنشاء النقاط
+"""
+
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from product.services.stock_ledger_service import StockLedgerService
+
+
+class Command(BaseCommand):
+    help = "إنشاء النقاط المرجعية الشهرية لأرصدة أستاذ المخزون"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", type=str, help="الشهر المطلوب بصيغة YYYY-MM (الافتراضي: الشهر السابق)")
+        parser.add_argument(
+            "--months", type=int, default=1, help="عدد الأشهر المتتالية المنتهية بالشهر المحدد"
+        )
+        parser.add_argument(
+            "--recompute", action="store_true", help="إعادة احتساب الأرصدة الجارية لأسطر الأستاذ أولاً"
+        )
+
+    def handle(self, *args, **options):
+        if options.get("month"):
+            try:
+                month = datetime.strptime(options["month"], "%Y-%m").date()
+            except ValueError:
+                raise CommandError("تنسيق الشهر غير صحيح. استخدم YYYY-MM")
+        else:
+            month = (timezone.localdate().replace(day=1) - timedelta(days=1)).replace(day=1)
+
+        started = time.monotonic()
+        if options["recompute"]:
+            updated = StockLedgerService.recompute_running_balances()
+            self.stdout.write(f"تم تصحيح الرصيد الجاري لـ {updated} سطر")
+
+        months = []
+        for _ in range(max(options["months"], 1)):
+            months.append(month)
+            month = (month - timedelta(days=1)).replace(day=1)
+
+        total = 0
+        # من الأقدم للأحدث ليبني كل شهر على نقطة الشهر السابق
+        for month in reversed(months):
+            total += StockLedgerService.build_monthly_checkpoint(month)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ تم إنشاء {total} نقطة مرجعية لـ {len(months)} شهر خلال {time.monotonic() - started:.2f} ثانية"
+        ))
@@ -13,7 +13,7 @@ from typing import Dict, List, Any
 import logging
 
 from product.models import Product
-from product.services.stock_calculation_engine import StockCalculationEngine
+from product.services.bundle_availability_service import BundleAvailabilityService
 
 logger = logging.getLogger('bundle_system')
 
@@ -85,37 +85,35 @@ class Command(BaseCommand):
             errors = 0
             updated_stocks = {}
             
+            # كل دفعة تُحسب في مرور تجميعي واحد وتُكتب في جدول توفر المنتجات المجمعة لكل مخزن
             for i in range(0, total_bundles, self.batch_size):
-                batch = bundles_query[i:i + self.batch_size]
+                batch = list(bundles_query.order_by('id').values_list('id', 'name')[i:i + self.batch_size])
+                bundle_ids = [bundle_id for bundle_id, _ in batch]
                 
-                for bundle in batch:
-                    try:
-                        old_stock = getattr(bundle, 'calculated_stock', 0)
-                        new_stock = StockCalculationEngine.calculate_bundle_stock(bundle)
-                        
-                        # تحديث المخزون إذا تغير
-                        if hasattr(bundle, 'calculated_stock'):
-                            if old_stock != new_stock:
-                                bundle.calculated_stock = new_stock
-                                bundle.save(update_fields=['calculated_stock'])
-                                updated_stocks[bundle.id] = {
-                                    'name': bundle.name,
-                                    'old_stock': old_stock,
-                                    'new_stock': new_stock
-                                }
-                        
-                        processed += 1
-                        
-                        if self.verbose:
-                            self.stdout.write(
-                                f'  ✓ {bundle.name}: {new_stock}'
-                            )
-                        
-                    except Exception as e:
-                        errors += 1
-                        logger.error(f'خطأ في إعادة حساب مخزون {bundle.name}: {str(e)}')
+                try:
+                    old_stocks = BundleAvailabilityService.totals(bundle_ids)
+                    BundleAvailabilityService.recompute(bundle_ids)
+                    new_stocks = BundleAvailabilityService.totals(bundle_ids)
+                except Exception as e:
+                    errors += len(batch)
+                    logger.error(f'خطأ في إعادة حساب مخزون الدفعة {bundle_ids}: {str(e)}')
+                    self.stdout.write(
+                        self.style.ERROR(f'  ❌ خطأ في الدفعة {i // self.batch_size + 1}: {str(e)}')
+                    )
+                    continue
+                
+                for bundle_id, name in batch:
+                    processed += 1
+                    if old_stocks[bundle_id] != new_stocks[bundle_id]:
+                        updated_stocks[bundle_id] = {
+                            'name': name,
+                            'old_stock': old_stocks[bundle_id],
+                            'new_stock': new_stocks[bundle_id]
+                        }
+                    
+                    if self.verbose:
                         self.stdout.write(
-                            self.style.ERROR(f'  ❌ خطأ في {bundle.name}: {str(e)}')
+                            f'  ✓ {name}: {new_stocks[bundle_id]}'
                         )
                 
                 # عرض التقدم
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.26 on 2026-10-19 02:28
+
+from decimal import Decimal
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0004_product_product_updated_idx_stock_stock_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLedgerCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cutoff_at', models.DateTimeField(help_text='الرصيد يشمل كل الحركات المسجلة قبل هذا التوقيت', verbose_name='حد النقطة المرجعية')),
+                ('qty_balance', models.DecimalField(decimal_places=4, default=Decimal('0.0000'), max_digits=15, verbose_name='رصيد الكمية')),
+                ('val_balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15, verbose_name='رصيد التقييم')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاريخ الإنشاء')),
+            ],
+            options={
+                'verbose_name': 'نقطة مرجعية لأستاذ المخزون',
+                'verbose_name_plural': 'النقاط المرجعية لأستاذ المخزون',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockledgerentry',
+            index=models.Index(fields=['product', 'warehouse', 'id'], name='stk_ledger_running_idx'),
+        ),
+        migrations.AddField(
+            model_name='stockledgercheckpoint',
+            name='last_entry',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='product.stockledgerentry', verbose_name='آخر سطر مشمول'),
+        ),
+        migrations.AddField(
+            model_name='stockledgercheckpoint',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_ledger_checkpoints', to='product.product', verbose_name='المنتج'),
+        ),
+        migrations.AddField(
+            model_name='stockledgercheckpoint',
+            name='warehouse',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_ledger_checkpoints', to='product.warehouse', verbose_name='المخزن'),
+        ),
+        migrations.AddIndex(
+            model_name='stockledgercheckpoint',
+            index=models.Index(fields=['cutoff_at', 'warehouse'], name='stk_checkpoint_cutoff_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='stockledgercheckpoint',
+            unique_together={('product', 'warehouse', 'cutoff_at')},
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.26 on 2026-10-19 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0005_stock_ledger_running_balances'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='locationaisle',
+            name='position_x',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='الإحداثي السيني'),
+        ),
+        migrations.AddField(
+            model_name='locationaisle',
+            name='position_y',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='الإحداثي الصادي'),
+        ),
+        migrations.AddField(
+            model_name='locationzone',
+            name='sequence',
+            field=models.PositiveIntegerField(default=1, verbose_name='الترتيب'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.26 on 2026-10-19 04:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0006_location_layout_coordinates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BundleAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='الكمية المتاحة')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='تاريخ التحديث')),
+                ('bundle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bundle_availability', to='product.product', verbose_name='المنتج المجمع')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bundle_availability', to='product.warehouse', verbose_name='المخزن')),
+            ],
+            options={
+                'verbose_name': 'توفر منتج مجمع',
+                'verbose_name_plural': 'توفر المنتجات المجمعة',
+                'ordering': ['bundle', 'warehouse'],
+                'indexes': [models.Index(fields=['warehouse', 'bundle'], name='bundle_avail_wh_idx')],
+                'unique_together': {('bundle', 'warehouse')},
+            },
+        ),
+    ]
@@ -39,7 +39,8 @@ try:
         LocationTask,
     )
     from .inventory_reservation import InventoryReservation, InventoryReservationAudit
-    from .stock_ledger import StockLedgerEntry
+    from .stock_ledger import StockLedgerEntry, StockLedgerCheckpoint
+    from .bundle_availability import BundleAvailability
     from .cost_layer import InventoryCostLayer, InventoryCostConsumption
     from .landed_cost import LandedCostDocument, LandedCostAllocation
     from .valuation_adjustment import InventoryValuationAdjustment
@@ -97,6 +98,8 @@ __all__ = [
     "LocationMovement",
     "LocationTask",
     "StockLedgerEntry",
+    "StockLedgerCheckpoint",
+    "BundleAvailability",
     "InventoryCostLayer",
     "InventoryCostConsumption",
     "LandedCostDocument",
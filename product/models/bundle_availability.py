@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+from product.models.product_core import Product
+from product.models.stock_management import Warehouse
+
+
+class BundleAvailability(models.Model):
+    """
+    المتاح من كل منتج مجمع في كل مخزن (جدول مشتق - مصدر الحقيقة هو مخزون المكونات)
+    يُعاد حسابه بعد الـ commit للمنتجات المجمعة المتأثرة فقط عبر BundleAvailabilityService،
+    ويُقرأ مباشرة في شاشات البيع بدلاً من تجميع مخزون المكونات عند كل طلب.
+    غياب السطر يعني أن المتاح صفر.
+    """
+
+    bundle = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        verbose_name=_("المنتج المجمع"),
+        related_name="bundle_availability",
+    )
+    warehouse = models.ForeignKey(
+        Warehouse,
+        on_delete=models.CASCADE,
+        verbose_name=_("المخزن"),
+        related_name="bundle_availability",
+    )
+    quantity = models.PositiveIntegerField(_("الكمية المتاحة"), default=0)
+    updated_at = models.DateTimeField(_("تاريخ التحديث"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("توفر منتج مجمع")
+        verbose_name_plural = _("توفر المنتجات المجمعة")
+        unique_together = ("bundle", "warehouse")
+        ordering = ["bundle", "warehouse"]
+        indexes = [
+            models.Index(fields=["warehouse", "bundle"], name="bundle_avail_wh_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.bundle} - {self.warehouse}: {self.quantity}"
@@ -99,14 +99,27 @@ class InventoryReservationAudit(models.Model):
         verbose_name_plural = _("سجلات تدقيق حجوزات المخزون")
         ordering = ["-created_at"]
 
+    def compute_evidence_hash(self) -> str:
+        raw = f"{self.reservation_id}:{self.action}:{self.previous_quantity}:{self.new_quantity}:{self.reason}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
     def save(self, *args, **kwargs):
         if self.pk:
             raise ValueError("FIN-SAL-003 Immutability Guard: InventoryReservationAudit records are strictly INSERT-ONLY and cannot be updated.")
         if not self.evidence_hash and self.reservation_id:
-            raw = f"{self.reservation_id}:{self.action}:{self.previous_quantity}:{self.new_quantity}:{self.reason}"
-            self.evidence_hash = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+            self.evidence_hash = self.compute_evidence_hash()
         super().save(*args, **kwargs)
 
+    @classmethod
+    def bulk_record(cls, audits):
+        """إدراج مجموعة سجلات تدقيق دفعة واحدة مع توقيع كل سجل (bulk_create لا يستدعي save)"""
+        for audit in audits:
+            if audit.pk:
+                raise ValueError("FIN-SAL-003 Immutability Guard: InventoryReservationAudit records are strictly INSERT-ONLY and cannot be updated.")
+            if not audit.evidence_hash and audit.reservation_id:
+                audit.evidence_hash = audit.compute_evidence_hash()
+        return cls.objects.bulk_create(audits)
+
     def delete(self, *args, **kwargs):
         raise ValueError("FIN-SAL-003 Immutability Guard: InventoryReservationAudit records cannot be deleted.")
 
@@ -42,6 +42,9 @@ class LocationZone(models.Model):
 
     description = models.TextField(_("الوصف"), blank=True, null=True)
 
+    # ترتيب المنطقة في مسار الانتقاء
+    sequence = models.PositiveIntegerField(_("الترتيب"), default=1)
+
     # خصائص المنطقة
     temperature_min = models.DecimalField(
         _("الحد الأدنى لدرجة الحرارة"),
@@ -120,6 +123,15 @@ class LocationAisle(models.Model):
     # ترتيب الممر
     sequence = models.PositiveIntegerField(_("الترتيب"), default=1)
 
+    # إحداثيات مدخل الممر بالمتر (لحساب مسافات الانتقاء)
+    # عند تركها فارغة تُشتق من ترتيب المنطقة والممر
+    position_x = models.DecimalField(
+        _("الإحداثي السيني"), max_digits=8, decimal_places=2, null=True, blank=True
+    )
+    position_y = models.DecimalField(
+        _("الإحداثي الصادي"), max_digits=8, decimal_places=2, null=True, blank=True
+    )
+
     is_active = models.BooleanField(_("نشط"), default=True)
 
     class Meta:
@@ -346,6 +346,7 @@ class Product(models.Model):
         ordering = ["name"]
         indexes = [
             models.Index(fields=['is_bundle'], name='product_is_bundle_idx'),
+            models.Index(fields=['updated_at', 'id'], name='product_updated_idx'),
         ]
 
     def __str__(self):
@@ -76,6 +76,7 @@ class StockLedgerEntry(models.Model):
     )
 
     # Derived/Cache fields ONLY (Source of truth is aggregate sum)
+    # الرصيد الجاري يُرحّل من آخر سطر لنفس (المنتج، المخزن) بترتيب id
     qty_balance_after = models.DecimalField(_("رصيد الكمية بعد الحركة (كاش)"), max_digits=15, decimal_places=4, default=Decimal("0.0000"))
     val_balance_after = models.DecimalField(_("رصيد التقييم بعد الحركة (كاش)"), max_digits=15, decimal_places=2, default=Decimal("0.00"))
 
@@ -95,8 +96,52 @@ class StockLedgerEntry(models.Model):
         ordering = ["created_at", "id"]
         indexes = [
             models.Index(fields=["product", "warehouse", "created_at"]),
+            models.Index(fields=["product", "warehouse", "id"], name="stk_ledger_running_idx"),
             models.Index(fields=["movement_service_ref"]),
         ]
 
     def __str__(self):
         return f"StockLedger #{self.entry_number}: {self.product.name} ({self.quantity} @ {self.unit_cost})"
+
+
+class StockLedgerCheckpoint(models.Model):
+    """
+    نقطة مرجعية شهرية لأرصدة أستاذ المخزون لكل (منتج، مخزن)
+    تحصر استعلامات "الرصيد في تاريخ" في الحركات التالية لآخر نقطة بدلاً من كامل التاريخ
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        verbose_name=_("المنتج"),
+        related_name="stock_ledger_checkpoints"
+    )
+    warehouse = models.ForeignKey(
+        Warehouse,
+        on_delete=models.CASCADE,
+        verbose_name=_("المخزن"),
+        related_name="stock_ledger_checkpoints"
+    )
+    cutoff_at = models.DateTimeField(
+        _("حد النقطة المرجعية"),
+        help_text=_("الرصيد يشمل كل الحركات المسجلة قبل هذا التوقيت")
+    )
+    last_entry = models.ForeignKey(
+        StockLedgerEntry,
+        on_delete=models.CASCADE,
+        verbose_name=_("آخر سطر مشمول"),
+        related_name="+"
+    )
+    qty_balance = models.DecimalField(_("رصيد الكمية"), max_digits=15, decimal_places=4, default=Decimal("0.0000"))
+    val_balance = models.DecimalField(_("رصيد التقييم"), max_digits=15, decimal_places=2, default=Decimal("0.00"))
+    created_at = models.DateTimeField(_("تاريخ الإنشاء"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("نقطة مرجعية لأستاذ المخزون")
+        verbose_name_plural = _("النقاط المرجعية لأستاذ المخزون")
+        unique_together = [("product", "warehouse", "cutoff_at")]
+        indexes = [
+            models.Index(fields=["cutoff_at", "warehouse"], name="stk_checkpoint_cutoff_idx"),
+        ]
+
+    def __str__(self):
+        return f"Checkpoint {self.product_id}/{self.warehouse_id} @ {self.cutoff_at:%Y-%m-%d}: {self.qty_balance}"
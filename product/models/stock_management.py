@@ -151,6 +151,7 @@ class Stock(models.Model):
             models.Index(fields=["product", "warehouse"]),
             models.Index(fields=["warehouse", "quantity"]),
             models.Index(fields=["is_active"]),
+            models.Index(fields=["updated_at", "id"], name="stock_updated_idx"),
         ]
 
     def __str__(self):
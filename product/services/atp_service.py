@@ -1,25 +1,275 @@
 import logging
-from decimal import Decimal
-from typing import Tuple
+from collections import defaultdict
+from decimal import Decimal, ROUND_FLOOR
+from typing import Dict, Hashable, Iterable, List, Tuple
 
-from product.services.inventory_availability_service import InventoryAvailabilityService
+from django.conf import settings
+from django.core.cache import cache
+
+from product.services.inventory_availability_service import InventoryAvailabilityService, Pair
 from product.services.atp_decision import ATPDecision
 
 logger = logging.getLogger("product.services.atp_service")
 
+ZERO = Decimal("0.0000")
+
+# (مفتاح السطر، المنتج، الكمية المطلوبة)
+ATPLine = Tuple[Hashable, int, Decimal]
+
 
 class ATPService:
     """
     FIN-SAL-003: Available-To-Promise (ATP) Engine Service
     محرك فحص الكميات المتاحة للوفاء بالوعود التجارية والبيع
+
+    يعمل على أوامر كاملة: كل أسطر أمر (أو عدة أوامر) تُقيّم بعدد ثابت من الاستعلامات
+    المجمّعة مهما كان عدد الأسطر، والمنتجات المجمعة (Bundles) تُقيّم عبر مكوناتها.
     """
 
+    SNAPSHOT_KEY_PREFIX = "atp_snapshot"
+
+    # ------------------------------------------------------------------
+    # Bundles
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_bundle_components(product_ids: Iterable[int]) -> Dict[int, List[Tuple[int, int]]]:
+        """{bundle_id: [(component_id, required_quantity), ...]} للمنتجات المجمعة من بين المعطاة"""
+        from product.models import BundleComponent
+
+        product_ids = set(product_ids)
+        components = defaultdict(list)
+        if not product_ids:
+            return components
+        rows = BundleComponent.objects.filter(bundle_product_id__in=product_ids).values_list(
+            "bundle_product_id", "component_product_id", "required_quantity"
+        )
+        for bundle_id, component_id, required in rows:
+            components[bundle_id].append((component_id, required))
+        return components
+
+    @staticmethod
+    def _bundle_usage(component_ids: Iterable[int]) -> Dict[int, List[Tuple[int, int]]]:
+        """{component_id: [(bundle_id, required_quantity), ...]} لاحتساب حجوزات المنتجات المجمعة على مكوناتها"""
+        from product.models import BundleComponent
+
+        component_ids = set(component_ids)
+        usage = defaultdict(list)
+        if not component_ids:
+            return usage
+        rows = BundleComponent.objects.filter(component_product_id__in=component_ids).values_list(
+            "component_product_id", "bundle_product_id", "required_quantity"
+        )
+        for component_id, bundle_id, required in rows:
+            usage[component_id].append((bundle_id, required))
+        return usage
+
+    # ------------------------------------------------------------------
+    # Availability matrix
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def get_physical_atp_matrix(cls, pairs: Iterable[Pair]) -> Dict[Pair, Decimal]:
+        """
+        الصافي المتاح للمنتجات الفعلية (غير المجمعة) لمجموعة أزواج (مخزن، منتج)
+
+        حجوزات المنتجات المجمعة تُخصم من مكوناتها بنسبة الكمية المطلوبة لكل مكون.
+        """
+        pairs = set(pairs)
+        if not pairs:
+            return {}
+
+        usage = cls._bundle_usage(product_id for _, product_id in pairs)
+        bundle_pairs = {
+            (warehouse_id, bundle_id)
+            for warehouse_id, product_id in pairs
+            for bundle_id, _ in usage.get(product_id, ())
+        }
+
+        on_hand = InventoryAvailabilityService.get_on_hand_quantities(pairs)
+        reserved = InventoryAvailabilityService.get_active_reservations_quantities(pairs | bundle_pairs)
+
+        matrix = {}
+        for warehouse_id, product_id in pairs:
+            committed = reserved[(warehouse_id, product_id)]
+            for bundle_id, required in usage.get(product_id, ()):
+                committed += reserved[(warehouse_id, bundle_id)] * required
+            matrix[(warehouse_id, product_id)] = max(ZERO, on_hand[(warehouse_id, product_id)] - committed)
+        return matrix
+
+    @classmethod
+    def get_atp_matrix(cls, pairs: Iterable[Pair]) -> Tuple[Dict[Pair, Decimal], Dict[int, List[Tuple[int, int]]]]:
+        """
+        مصفوفة الوفاء التجاري للمنتجات الفعلية بعد تفكيك المنتجات المجمعة إلى مكوناتها
+
+        Returns:
+            (matrix, bundles): matrix بمفاتيح (مخزن، منتج فعلي) و bundles بتركيبة المنتجات المجمعة المطلوبة
+        """
+        pairs = set(pairs)
+        bundles = cls.get_bundle_components(product_id for _, product_id in pairs)
+        physical_pairs = set()
+        for warehouse_id, product_id in pairs:
+            if product_id in bundles:
+                physical_pairs.update((warehouse_id, component_id) for component_id, _ in bundles[product_id])
+            else:
+                physical_pairs.add((warehouse_id, product_id))
+        return cls.get_physical_atp_matrix(physical_pairs), bundles
+
+    # ------------------------------------------------------------------
+    # Quotation snapshot (short-lived, advisory only)
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def _snapshot_key(cls, warehouse_id: int, product_id: int) -> str:
+        return f"{cls.SNAPSHOT_KEY_PREFIX}:{warehouse_id}:{product_id}"
+
+    @classmethod
+    def get_availability_snapshot(cls, warehouse_id: int, product_ids: Iterable[int]) -> Dict[int, Decimal]:
+        """
+        لقطة قصيرة العمر للمتاح الفعلي في مخزن واحد (لواجهة عروض الأسعار)
+
+        تُقرأ من الكاش وتُستكمل المنتجات الناقصة باستعلام مجمّع واحد؛ لا تُستخدم عند الحجز الفعلي.
+        """
+        product_ids = set(product_ids)
+        timeout = getattr(settings, "ATP_SNAPSHOT_TIMEOUT", 30)
+        keys = {cls._snapshot_key(warehouse_id, product_id): product_id for product_id in product_ids}
+        cached = cache.get_many(list(keys)) if timeout else {}
+        snapshot = {keys[key]: Decimal(value) for key, value in cached.items()}
+
+        missing = product_ids - set(snapshot)
+        if missing:
+            fresh = cls.get_physical_atp_matrix((warehouse_id, product_id) for product_id in missing)
+            for (_, product_id), quantity in fresh.items():
+                snapshot[product_id] = quantity
+            if timeout:
+                cache.set_many(
+                    {cls._snapshot_key(warehouse_id, product_id): str(snapshot[product_id]) for product_id in missing},
+                    timeout,
+                )
+        return snapshot
+
+    @classmethod
+    def invalidate_availability_snapshot(cls, warehouse_id: int, product_ids: Iterable[int]) -> None:
+        cache.delete_many([cls._snapshot_key(warehouse_id, product_id) for product_id in product_ids])
+
+    # ------------------------------------------------------------------
+    # Line evaluation
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _decision(warehouse_id, product_id, requested, available) -> ATPDecision:
+        is_avail = requested <= available
+        shortage = ZERO if is_avail else (requested - available)
+        reason = "Quantity fully available for promise." if is_avail else f"Shortage of {shortage} units."
+        return ATPDecision(
+            available_quantity=available,
+            requested_quantity=requested,
+            is_available=is_avail,
+            shortage_quantity=shortage,
+            reason=reason,
+            warehouse_id=warehouse_id,
+            product_id=product_id
+        )
+
+    @classmethod
+    def _allocate(cls, warehouse_id: int, lines: List[ATPLine], remaining: Dict[int, Decimal],
+                  bundles: Dict[int, List[Tuple[int, int]]]) -> Dict[Hashable, ATPDecision]:
+        """
+        تقييم الأسطر بالترتيب مع استهلاك المتاح تراكمياً، فلا يُوعد بنفس الكمية لسطرين
+        """
+        decisions = {}
+        for key, product_id, requested in lines:
+            requested = Decimal(str(requested))
+            components = bundles.get(product_id)
+            if components:
+                available = min(
+                    (remaining.get(component_id, ZERO) / required).to_integral_value(rounding=ROUND_FLOOR)
+                    for component_id, required in components
+                )
+                decision = cls._decision(warehouse_id, product_id, requested, available)
+                if decision.is_available:
+                    for component_id, required in components:
+                        remaining[component_id] = remaining.get(component_id, ZERO) - requested * required
+            else:
+                available = remaining.get(product_id, ZERO)
+                decision = cls._decision(warehouse_id, product_id, requested, available)
+                remaining[product_id] = available - min(requested, available)
+            decisions[key] = decision
+        return decisions
+
+    @classmethod
+    def evaluate_lines(cls, warehouse_id: int, lines: Iterable[ATPLine],
+                       snapshot: bool = False) -> Dict[Hashable, ATPDecision]:
+        """
+        تقييم الوفاء التجاري لكل أسطر أمر واحد
+
+        Args:
+            warehouse_id: المخزن
+            lines: (مفتاح السطر، المنتج، الكمية المطلوبة)
+            snapshot: استخدام اللقطة المؤقتة بدل القراءة المباشرة (لعروض الأسعار فقط)
+        """
+        lines = list(lines)
+        product_ids = {product_id for _, product_id, _ in lines}
+        if snapshot:
+            bundles = cls.get_bundle_components(product_ids)
+            physical_ids = set()
+            for product_id in product_ids:
+                if product_id in bundles:
+                    physical_ids.update(component_id for component_id, _ in bundles[product_id])
+                else:
+                    physical_ids.add(product_id)
+            remaining = cls.get_availability_snapshot(warehouse_id, physical_ids)
+        else:
+            matrix, bundles = cls.get_atp_matrix((warehouse_id, product_id) for product_id in product_ids)
+            remaining = {product_id: quantity for (_, product_id), quantity in matrix.items()}
+        return cls._allocate(warehouse_id, lines, remaining, bundles)
+
+    @classmethod
+    def evaluate_orders(cls, orders: Iterable[Tuple[Hashable, int, Iterable[ATPLine]]]) -> Dict[Hashable, Dict[Hashable, ATPDecision]]:
+        """
+        تقييم عدة أوامر (كل أمر مستقل) بنفس الاستعلامات المجمّعة للمصفوفة كاملة
+
+        Args:
+            orders: (مفتاح الأمر، المخزن، أسطر الأمر)
+        """
+        orders = [(order_key, warehouse_id, list(lines)) for order_key, warehouse_id, lines in orders]
+        pairs = {
+            (warehouse_id, product_id)
+            for _, warehouse_id, lines in orders
+            for _, product_id, _ in lines
+        }
+        matrix, bundles = cls.get_atp_matrix(pairs)
+
+        results = {}
+        for order_key, warehouse_id, lines in orders:
+            remaining = {
+                product_id: quantity for (wh_id, product_id), quantity in matrix.items() if wh_id == warehouse_id
+            }
+            results[order_key] = cls._allocate(warehouse_id, lines, remaining, bundles)
+        return results
+
+    @classmethod
+    def evaluate_sales_order(cls, sales_order) -> Dict[int, ATPDecision]:
+        """تقييم كل أسطر أمر البيع: {معرف السطر: ATPDecision}"""
+        lines = sales_order.items.values_list("id", "product_id", "ordered_qty")
+        return cls.evaluate_lines(sales_order.warehouse_id, lines)
+
+    @classmethod
+    def evaluate_quotation(cls, quotation, use_snapshot: bool = True) -> Dict[int, ATPDecision]:
+        """تقييم كل أسطر عرض السعر: {معرف السطر: ATPDecision} (افتراضياً من اللقطة المؤقتة)"""
+        lines = quotation.items.values_list("id", "product_id", "quantity")
+        return cls.evaluate_lines(quotation.warehouse_id, lines, snapshot=use_snapshot)
+
+    # ------------------------------------------------------------------
+    # Single-line API
+    # ------------------------------------------------------------------
+
     @classmethod
     def get_atp_quantity(cls, warehouse_id: int, product_id: int) -> Decimal:
         """
         احتساب رصيد الوفاء التجاري المتاح (ATP Quantity)
         """
-        return InventoryAvailabilityService.get_available_quantity(warehouse_id, product_id)
+        return cls.evaluate_lines(warehouse_id, [(product_id, product_id, ZERO)])[product_id].available_quantity
 
     @classmethod
     def evaluate_atp_decision(
@@ -31,20 +281,7 @@ class ATPService:
         """
         تقييم قرار الوفاء التجاري ATP وتوليد كائن Domain Object محوكم
         """
-        atp_qty = cls.get_atp_quantity(warehouse_id, product_id)
-        is_avail = requested_quantity <= atp_qty
-        shortage = Decimal("0.0000") if is_avail else (requested_quantity - atp_qty)
-        reason = "Quantity fully available for promise." if is_avail else f"Shortage of {shortage} units."
-
-        return ATPDecision(
-            available_quantity=atp_qty,
-            requested_quantity=requested_quantity,
-            is_available=is_avail,
-            shortage_quantity=shortage,
-            reason=reason,
-            warehouse_id=warehouse_id,
-            product_id=product_id
-        )
+        return cls.evaluate_lines(warehouse_id, [(product_id, product_id, requested_quantity)])[product_id]
 
     @classmethod
     def validate_line_atp(
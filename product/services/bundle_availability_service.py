@@ -0,0 +1,258 @@
+"""
+محرك توفر المنتجات المجمعة لكل مخزن (Bundle Availability Engine)
+- فهرس عكسي مخزن في الكاش: مكون -> المنتجات المجمعة التي تستخدمه
+- حركات المخزون داخل المعاملة تسجل المنتجات المجمعة المتأثرة فقط، وإعادة الحساب
+  تتم مرة واحدة بعد الـ commit مهما كان عدد الأسطر
+- إعادة الحساب تجميعية: MIN(floor(مخزون المكون ÷ الكمية المطلوبة)) لكل (منتج مجمع، مخزن)
+  وتُكتب في جدول BundleAvailability الذي تقرأه شاشات البيع مباشرة
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, F, Min, Sum
+from django.dispatch import Signal
+from django.utils import timezone
+
+logger = logging.getLogger("bundle_system")
+
+# يُرسل بعد إعادة الحساب بقائمة المنتجات المجمعة التي تغير إجمالي المتاح منها
+bundle_availability_changed = Signal()
+
+
+class BundleAvailabilityService:
+    """
+    إدارة جدول توفر المنتجات المجمعة لكل مخزن
+    """
+
+    INDEX_KEY = "bundle_component_index"
+
+    # ------------------------------------------------------------------
+    # Reverse component index
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def component_index(cls) -> Dict[int, List[int]]:
+        """{component_id: [bundle_id, ...]} من الكاش أو باستعلام واحد"""
+        try:
+            index = cache.get(cls.INDEX_KEY)
+            if index is not None:
+                return index
+        except Exception as e:
+            logger.warning(f"تعذر قراءة فهرس مكونات المنتجات المجمعة: {e}")
+
+        from product.models import BundleComponent
+
+        index = defaultdict(list)
+        for component_id, bundle_id in BundleComponent.objects.values_list(
+            "component_product_id", "bundle_product_id"
+        ):
+            index[component_id].append(bundle_id)
+        index = dict(index)
+        try:
+            cache.set(cls.INDEX_KEY, index, None)
+        except Exception as e:
+            logger.warning(f"تعذر تخزين فهرس مكونات المنتجات المجمعة: {e}")
+        return index
+
+    @classmethod
+    def invalidate_index(cls) -> None:
+        cache.delete(cls.INDEX_KEY)
+
+    @classmethod
+    def bundles_for_components(cls, component_ids: Iterable[int]) -> Set[int]:
+        """المنتجات المجمعة التي تستخدم أياً من المكونات المعطاة"""
+        index = cls.component_index()
+        return {bundle_id for component_id in component_ids for bundle_id in index.get(component_id, ())}
+
+    # ------------------------------------------------------------------
+    # Deferred recompute
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def mark_components_changed(cls, *component_ids: int) -> Set[int]:
+        """
+        تسجيل تغير مخزون أو حالة مكونات: المنتجات المجمعة المتأثرة تُجمع طوال المعاملة
+        ويُعاد حسابها مرة واحدة بعد الـ commit (أو فوراً خارج المعاملات)
+
+        Returns:
+            المنتجات المجمعة المتأثرة
+        """
+        bundle_ids = cls.bundles_for_components(component_ids)
+        cls.mark_bundles_changed(*bundle_ids)
+        return bundle_ids
+
+    @classmethod
+    def mark_bundles_changed(cls, *bundle_ids: int) -> None:
+        if not bundle_ids:
+            return
+        pending = _pending_bundles()
+        # التسجيل مرة واحدة لكل معاملة: المجموعة الفارغة تعني أن آخر تنفيذ قد تم
+        schedule = not pending or not any(
+            func is _recompute_after_commit for _, func, _ in connection.run_on_commit
+        )
+        pending.update(bundle_ids)
+        if not connection.in_atomic_block:
+            _recompute_after_commit()
+        elif schedule:
+            transaction.on_commit(_recompute_after_commit)
+
+    # ------------------------------------------------------------------
+    # Set-based computation
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def compute(bundle_ids: Iterable[int], warehouse_id: Optional[int] = None) -> Dict[Tuple[int, int], int]:
+        """
+        المتاح من المنتجات المجمعة لكل مخزن بعدد ثابت من الاستعلامات مهما كان عدد المكونات
+
+        المنتج المجمع غير متاح في مخزن ينقصه أحد المكونات أو إذا كان أحد مكوناته غير نشط
+
+        Returns:
+            {(bundle_id, warehouse_id): الكمية} للأزواج ذات الكمية الموجبة فقط
+        """
+        from product.models import BundleComponent
+
+        bundle_ids = set(bundle_ids)
+        if not bundle_ids:
+            return {}
+
+        components = BundleComponent.objects.filter(
+            bundle_product_id__in=bundle_ids, bundle_product__is_bundle=True
+        )
+        required_counts = dict(
+            components.values("bundle_product_id")
+            .annotate(count=Count("id"))
+            .values_list("bundle_product_id", "count")
+        )
+        inactive = set(
+            components.filter(component_product__is_active=False).values_list("bundle_product_id", flat=True)
+        )
+
+        # شرط واحد على علاقة المخزون حتى لا يتكرر الـ JOIN
+        stock_filter = {"component_product__stocks__isnull": False}
+        if warehouse_id is not None:
+            stock_filter = {"component_product__stocks__warehouse_id": warehouse_id}
+        rows = (
+            components.filter(**stock_filter)
+            .values("bundle_product_id", "component_product__stocks__warehouse_id")
+            .annotate(
+                possible=Min(F("component_product__stocks__quantity") / F("required_quantity")),
+                covered=Count("id"),
+            )
+            .values_list("bundle_product_id", "component_product__stocks__warehouse_id", "possible", "covered")
+        )
+
+        availability = {}
+        for bundle_id, wh_id, possible, covered in rows:
+            if bundle_id in inactive or covered < required_counts.get(bundle_id, 0) or possible is None:
+                continue
+            # مكون رصيده سالب يعني عدم التوفر لا كمية سالبة
+            quantity = max(int(possible), 0)
+            if quantity:
+                availability[(bundle_id, wh_id)] = quantity
+        return availability
+
+    @classmethod
+    def recompute(cls, bundle_ids: Iterable[int]) -> List[Dict]:
+        """
+        إعادة حساب وكتابة توفر المنتجات المجمعة المعطاة في كل المخازن
+
+        Returns:
+            المنتجات المجمعة التي تغير إجمالي المتاح منها:
+            [{'bundle_product', 'old_stock', 'new_stock', 'recalculated_at'}, ...]
+        """
+        from product.models import BundleAvailability, Product
+        from product.services.bundle_cache_service import BundleCacheService
+
+        bundle_ids = set(bundle_ids)
+        if not bundle_ids:
+            return []
+
+        availability = cls.compute(bundle_ids)
+        with transaction.atomic():
+            old_totals = cls.totals(bundle_ids)
+            BundleAvailability.objects.filter(bundle_id__in=bundle_ids).delete()
+            BundleAvailability.objects.bulk_create(
+                BundleAvailability(bundle_id=bundle_id, warehouse_id=wh_id, quantity=quantity)
+                for (bundle_id, wh_id), quantity in availability.items()
+            )
+
+        new_totals = defaultdict(int)
+        for (bundle_id, _), quantity in availability.items():
+            new_totals[bundle_id] += quantity
+
+        for bundle_id in bundle_ids:
+            BundleCacheService.invalidate_bundle_cache(bundle_id)
+
+        changed = {
+            bundle_id for bundle_id in bundle_ids
+            if old_totals.get(bundle_id, 0) != new_totals.get(bundle_id, 0)
+        }
+        now = timezone.now()
+        return [
+            {
+                "bundle_product": bundle,
+                "old_stock": old_totals.get(bundle.id, 0),
+                "new_stock": new_totals.get(bundle.id, 0),
+                "recalculated_at": now,
+            }
+            for bundle in Product.objects.filter(id__in=changed, is_active=True)
+        ]
+
+    # ------------------------------------------------------------------
+    # Readers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def get_availability(bundle_ids: Iterable[int], warehouse_id: int) -> Dict[int, int]:
+        """{bundle_id: المتاح} في مخزن واحد من الجدول مباشرة"""
+        from product.models import BundleAvailability
+
+        bundle_ids = set(bundle_ids)
+        result = dict.fromkeys(bundle_ids, 0)
+        result.update(
+            BundleAvailability.objects.filter(bundle_id__in=bundle_ids, warehouse_id=warehouse_id)
+            .values_list("bundle_id", "quantity")
+        )
+        return result
+
+    @staticmethod
+    def totals(bundle_ids: Iterable[int]) -> Dict[int, int]:
+        """{bundle_id: إجمالي المتاح في كل المخازن} من الجدول مباشرة"""
+        from product.models import BundleAvailability
+
+        bundle_ids = set(bundle_ids)
+        result = dict.fromkeys(bundle_ids, 0)
+        result.update(
+            BundleAvailability.objects.filter(bundle_id__in=bundle_ids)
+            .values("bundle_id")
+            .annotate(total=Sum("quantity"))
+            .values_list("bundle_id", "total")
+        )
+        return result
+
+
+_pending = threading.local()
+
+
+def _pending_bundles() -> set:
+    if not hasattr(_pending, "bundles"):
+        _pending.bundles = set()
+    return _pending.bundles
+
+
+def _recompute_after_commit():
+    bundle_ids = _pending_bundles()
+    _pending.bundles = set()
+    try:
+        results = BundleAvailabilityService.recompute(bundle_ids)
+    except Exception as e:
+        logger.error(f"خطأ في إعادة حساب توفر المنتجات المجمعة {sorted(bundle_ids)}: {e}")
+        return
+    if results:
+        bundle_availability_changed.send(sender=BundleAvailabilityService, results=results)
@@ -355,10 +355,11 @@ class BundleCacheService:
             # هذا تبسيط - في التطبيق الحقيقي يمكن استخدام نمط أكثر تطوراً
             prefix = cls.CACHE_PREFIXES['bundle_availability']
             
-            # محاولة حذف مفاتيح التوفر الشائعة (كميات 1-100)
-            for quantity in range(1, 101):
-                availability_key = cls._get_cache_key('bundle_availability', bundle_id, quantity)
-                cache.delete(availability_key)
+            # محاولة حذف مفاتيح التوفر الشائعة (كميات 1-100) دفعة واحدة
+            cache.delete_many([
+                cls._get_cache_key('bundle_availability', bundle_id, quantity)
+                for quantity in range(1, 101)
+            ])
                 
         except Exception as e:
             logger.warning(f"خطأ في إبطال مفاتيح التوفر للمنتج المجمع {bundle_id}: {str(e)}")
@@ -1,6 +1,6 @@
 import logging
 from decimal import Decimal
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Tuple
 from django.db import models
 
 from product.models import Product, Warehouse, Stock
@@ -8,6 +8,10 @@ from product.models.inventory_reservation import InventoryReservation
 
 logger = logging.getLogger("product.services.inventory_availability_service")
 
+OPEN_RESERVATION_STATUSES = ["ACTIVE", "PARTIALLY_FULFILLED"]
+
+Pair = Tuple[int, int]
+
 
 class InventoryAvailabilityService:
     """
@@ -15,16 +19,82 @@ class InventoryAvailabilityService:
     محرك استعلام الموقف المخزني الفلي والحجوزات الحالية والصافي المتاح
     """
 
+    @staticmethod
+    def _pair_filter(pairs: Iterable[Pair]) -> Dict[str, Any]:
+        pairs = set(pairs)
+        return {
+            "warehouse_id__in": {warehouse_id for warehouse_id, _ in pairs},
+            "product_id__in": {product_id for _, product_id in pairs},
+        }
+
+    @classmethod
+    def get_on_hand_quantities(cls, pairs: Iterable[Pair]) -> Dict[Pair, Decimal]:
+        """
+        الكميات الفيزيائية لمجموعة أزواج (مخزن، منتج) باستعلام مجمّع واحد
+        """
+        pairs = set(pairs)
+        result = {pair: Decimal("0.0000") for pair in pairs}
+        if not pairs:
+            return result
+        rows = (
+            Stock.objects.filter(**cls._pair_filter(pairs))
+            .values("warehouse_id", "product_id")
+            .annotate(total=models.Sum("quantity"))
+        )
+        for row in rows:
+            pair = (row["warehouse_id"], row["product_id"])
+            if pair in result:
+                result[pair] = Decimal(str(row["total"] or 0))
+        return result
+
+    @classmethod
+    def get_active_reservations_quantities(cls, pairs: Iterable[Pair]) -> Dict[Pair, Decimal]:
+        """
+        إجمالي الكميات المحجوزة غير المستوفاة لمجموعة أزواج (مخزن، منتج) باستعلام مجمّع واحد
+        Formula: Sum(max(quantity - fulfilled_quantity, 0)) for ACTIVE & PARTIALLY_FULFILLED
+        """
+        pairs = set(pairs)
+        result = {pair: Decimal("0.0000") for pair in pairs}
+        if not pairs:
+            return result
+        remaining = models.Case(
+            models.When(
+                quantity__gt=models.F("fulfilled_quantity"),
+                then=models.F("quantity") - models.F("fulfilled_quantity"),
+            ),
+            default=models.Value(Decimal("0.0000")),
+            output_field=models.DecimalField(max_digits=15, decimal_places=4),
+        )
+        rows = (
+            InventoryReservation.objects.filter(
+                reservation_status__in=OPEN_RESERVATION_STATUSES, **cls._pair_filter(pairs)
+            )
+            .values("warehouse_id", "product_id")
+            .annotate(total=models.Sum(remaining))
+        )
+        for row in rows:
+            pair = (row["warehouse_id"], row["product_id"])
+            if pair in result:
+                result[pair] = Decimal(str(row["total"] or 0))
+        return result
+
+    @classmethod
+    def get_available_quantities(cls, pairs: Iterable[Pair]) -> Dict[Pair, Decimal]:
+        """
+        الصافي المتاح (On-Hand - Active Reservations) لمجموعة أزواج باستعلامين مجمّعين فقط
+        """
+        pairs = set(pairs)
+        on_hand = cls.get_on_hand_quantities(pairs)
+        reserved = cls.get_active_reservations_quantities(pairs)
+        return {pair: max(Decimal("0.0000"), on_hand[pair] - reserved[pair]) for pair in pairs}
+
     @classmethod
     def get_on_hand_quantity(cls, warehouse_id: int, product_id: int) -> Decimal:
         """
         استعلام الكمية الفيزيائية الفعلية المتاحة في المخزن (On-Hand Physical Stock)
         """
-        try:
-            stock = Stock.objects.get(warehouse_id=warehouse_id, product_id=product_id)
-            return Decimal(str(stock.quantity))
-        except Stock.DoesNotExist:
-            return Decimal("0.0000")
+        pair = (warehouse_id, product_id)
+        return cls.get_on_hand_quantities([pair])[pair]
 
     @classmethod
     def get_active_reservations_quantity(cls, warehouse_id: int, product_id: int) -> Decimal:
@@ -32,22 +102,13 @@ class InventoryAvailabilityService:
         استعلام إجمالي الكميات المحجوزة غير المستوفاة (Active & Partially Fulfilled Soft Commitments)
         Formula: Sum(quantity - fulfilled_quantity) for ACTIVE & PARTIALLY_FULFILLED
         """
-        active_res = InventoryReservation.objects.filter(
-            warehouse_id=warehouse_id,
-            product_id=product_id,
-            reservation_status__in=["ACTIVE", "PARTIALLY_FULFILLED"]
-        )
-        total = Decimal("0.0000")
-        for res in active_res:
-            total += res.remaining_reserved_quantity
-        return total
+        pair = (warehouse_id, product_id)
+        return cls.get_active_reservations_quantities([pair])[pair]
 
     @classmethod
     def get_available_quantity(cls, warehouse_id: int, product_id: int) -> Decimal:
         """
         حساب الكمية الصافية القابلة للبيع والحجز (Net Available Quantity = On-Hand - Active Reservations)
         """
-        on_hand = cls.get_on_hand_quantity(warehouse_id, product_id)
-        active_reservations = cls.get_active_reservations_quantity(warehouse_id, product_id)
-        available = on_hand - active_reservations
-        return max(Decimal("0.0000"), available)
+        pair = (warehouse_id, product_id)
+        return cls.get_available_quantities([pair])[pair]
@@ -1,6 +1,8 @@
 import logging
 from decimal import Decimal
 from typing import List, Dict, Any
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction, models
 from django.utils import timezone
 
@@ -22,44 +24,66 @@ class InventoryReservationService:
     @classmethod
     def reserve_sales_order_lines(cls, sales_order_id: int, user=None) -> List[InventoryReservation]:
         """
-        حجز المخزون غير المباشر لكل سطر في أمر البيع مع القفل المتزامن لصفوف المنتج والمخزن
+        حجز المخزون غير المباشر لكل أسطر أمر البيع مع القفل المتزامن لصفوف المنتج والمخزن
+
+        الأقفال وفحص ATP والإدراج تتم لكل الأسطر معاً بعدد ثابت من الاستعلامات مهما كان عدد الأسطر.
         """
         with transaction.atomic():
             so = SalesOrder.objects.select_for_update().get(pk=sales_order_id)
-            reservations = []
-
-            for line in so.items.all():
-                # Concurrency Lock on Product and Stock position
-                _ = Product.objects.select_for_update().get(pk=line.product_id)
-                try:
-                    _ = Stock.objects.select_for_update().get(warehouse_id=so.warehouse_id, product_id=line.product_id)
-                except Stock.DoesNotExist:
-                    pass
-
-                # ATP Validation per line
-                is_avail, atp_qty = ATPService.validate_line_atp(
-                    warehouse_id=so.warehouse_id,
-                    product_id=line.product_id,
-                    requested_quantity=line.ordered_qty
-                )
+            lines = list(so.items.select_related("product"))
+            if not lines:
+                return []
+
+            # Concurrency Lock on Product and Stock positions (ordered by pk to avoid deadlocks)
+            product_ids = {line.product_id for line in lines}
+            components = ATPService.get_bundle_components(product_ids)
+            locked_ids = product_ids | {
+                component_id for parts in components.values() for component_id, _ in parts
+            }
+            list(Product.objects.select_for_update().filter(pk__in=locked_ids).order_by("pk").values_list("pk", flat=True))
+            list(
+                Stock.objects.select_for_update()
+                .filter(warehouse_id=so.warehouse_id, product_id__in=locked_ids)
+                .order_by("pk").values_list("pk", flat=True)
+            )
 
-                if not is_avail:
+            # ATP Validation for the whole order (cumulative across lines)
+            decisions = ATPService.evaluate_lines(
+                so.warehouse_id, [(line.id, line.product_id, line.ordered_qty) for line in lines]
+            )
+            for line in lines:
+                decision = decisions[line.id]
+                if not decision.is_available:
                     raise FinancialCoreError(
-                        f"Overselling Error: Product '{line.product.name}' has available ATP {atp_qty} but requested {line.ordered_qty}."
+                        f"Overselling Error: Product '{line.product.name}' has available ATP {decision.available_quantity} but requested {line.ordered_qty}."
                     )
 
-                res = InventoryReservation.objects.create(
+            reservations = InventoryReservation.objects.bulk_create([
+                InventoryReservation(
                     sales_order=so,
                     sales_order_line=line,
-                    product=line.product,
-                    warehouse=so.warehouse,
+                    product_id=line.product_id,
+                    warehouse_id=so.warehouse_id,
                     quantity=line.ordered_qty,
                     fulfilled_quantity=Decimal("0.0000"),
                     reservation_status="ACTIVE",
                     created_by=user
                 )
+                for line in lines
+            ])
+
+            if any(res.pk is None for res in reservations):
+                # Backends without RETURNING (MySQL): read back the ids of the rows just inserted
+                latest = dict(
+                    InventoryReservation.objects.filter(
+                        sales_order=so, sales_order_line_id__in=[line.id for line in lines], reservation_status="ACTIVE"
+                    ).order_by("id").values_list("sales_order_line_id", "id")
+                )
+                for res in reservations:
+                    res.pk = latest[res.sales_order_line_id]
 
-                InventoryReservationAudit.objects.create(
+            InventoryReservationAudit.bulk_record([
+                InventoryReservationAudit(
                     reservation=res,
                     action="CREATED",
                     previous_quantity=Decimal("0.0000"),
@@ -67,8 +91,12 @@ class InventoryReservationService:
                     reason=f"Soft inventory reservation created for SO #{so.order_number} line #{line.id}",
                     user=user
                 )
+                for res, line in zip(reservations, lines)
+            ])
 
-                reservations.append(res)
+            transaction.on_commit(
+                lambda: ATPService.invalidate_availability_snapshot(so.warehouse_id, locked_ids)
+            )
 
             logger.info(f"Reserved {len(reservations)} lines for Sales Order #{so.order_number}.")
             return reservations
@@ -162,31 +190,60 @@ class InventoryReservationService:
             return released
 
     @classmethod
-    def sweep_expired_reservations(cls, user=None) -> List[InventoryReservation]:
+    def sweep_expired_reservations(cls, user=None, batch_size=None) -> List[InventoryReservation]:
         """
         FIN-SAL-008: تنظيف وإفراج تلقائي عن الحجوزات المنتهية (Sweep Expired Stock Reservations)
+
+        الحجوزات المفتوحة التي تجاوزت expires_at تُنهى على دفعات: قراءة مع تخطي الصفوف المقفلة،
+        UPDATE واحد، وإدراج جماعي لسجلات التدقيق. قفل في الكاش يمنع تداخل تشغيلين للمهمة.
         """
         now = timezone.now()
-        with transaction.atomic():
-            expired_res = InventoryReservation.objects.filter(
-                reservation_status__in=["EXPIRED", "CANCELLED"]
-            )
-            swept = []
-            for res in expired_res:
-                res.reservation_status = "EXPIRED"
-                res.released_at = now
-                res.save()
-
-                InventoryReservationAudit.objects.create(
-                    reservation=res,
-                    action="EXPIRED",
-                    previous_quantity=res.quantity,
-                    new_quantity=Decimal("0.0000"),
-                    reason="Automatic Sweep: Reservation TTL Expired",
-                    user=user
-                )
-                swept.append(res)
+        batch_size = batch_size or getattr(settings, "RESERVATION_SWEEP_BATCH_SIZE", 1000)
+        lock_key = "reservation_sweep_lock:inventory_reservation"
+        if not cache.add(lock_key, "locked", timeout=getattr(settings, "RESERVATION_SWEEP_LOCK_TIMEOUT", 600)):
+            logger.info("Skipping expired reservation sweep: another sweep is running.")
+            return []
+
+        swept = []
+        affected = {}
+        try:
+            while True:
+                with transaction.atomic():
+                    batch = list(
+                        InventoryReservation.objects.select_for_update(skip_locked=True)
+                        .filter(reservation_status__in=["ACTIVE", "PARTIALLY_FULFILLED"], expires_at__lt=now)
+                        .order_by("pk")[:batch_size]
+                    )
+                    if not batch:
+                        break
 
-            if swept:
-                logger.info(f"Auto-swept {len(swept)} expired stock reservations.")
-            return swept
+                    InventoryReservation.objects.filter(pk__in=[res.pk for res in batch]).update(
+                        reservation_status="EXPIRED", released_at=now
+                    )
+                    audits = []
+                    for res in batch:
+                        res.reservation_status = "EXPIRED"
+                        res.released_at = now
+                        affected.setdefault(res.warehouse_id, set()).add(res.product_id)
+                        audits.append(InventoryReservationAudit(
+                            reservation=res,
+                            action="EXPIRED",
+                            previous_quantity=res.quantity,
+                            new_quantity=Decimal("0.0000"),
+                            reason="Automatic Sweep: Reservation TTL Expired",
+                            user=user
+                        ))
+                    InventoryReservationAudit.bulk_record(audits)
+                    swept.extend(batch)
+
+                if len(batch) < batch_size:
+                    break
+        finally:
+            cache.delete(lock_key)
+
+        for warehouse_id, product_ids in affected.items():
+            ATPService.invalidate_availability_snapshot(warehouse_id, product_ids)
+
+        if swept:
+            logger.info(f"Auto-swept {len(swept)} expired stock reservations.")
+        return swept
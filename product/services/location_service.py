@@ -6,6 +6,7 @@ from django.db import models, transaction
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from decimal import Decimal
+import copy
 import logging
 from typing import Dict, List, Optional, Tuple
 
@@ -18,6 +19,7 @@ from ..models.location_system import (
     LocationTask,
 )
 from ..models import Product, Warehouse
+from .picking_engine import PickingWaveService, PutawayIndex
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -51,6 +53,7 @@ class LocationService:
                         requires_authorization=zone_data.get(
                             "requires_authorization", False
                         ),
+                        sequence=zone_data.get("sequence", 1),
                         created_by=user,
                     )
 
@@ -62,6 +65,8 @@ class LocationService:
                             code=aisle_data["code"],
                             description=aisle_data.get("description"),
                             sequence=aisle_data.get("sequence", 1),
+                            position_x=aisle_data.get("position_x"),
+                            position_y=aisle_data.get("position_y"),
                         )
 
                         # إنشاء الأرفف
@@ -189,44 +194,64 @@ class LocationService:
         العثور على أفضل موقع لتخزين المنتج
         """
         try:
-            # البحث عن المواقع المتاحة للمنتج
-            existing_locations = ProductLocation.objects.filter(
-                product=product,
-                shelf__aisle__zone__warehouse=warehouse,
+            placements = LocationService.plan_putaway(
+                warehouse,
+                [{"product": product, "quantity": quantity}],
                 location_type=location_type,
-                is_active=True,
-            ).order_by("current_quantity")
-
-            # البحث في المواقع الموجودة أولاً
-            for location in existing_locations:
-                if location.can_accommodate(quantity):
-                    return location
-
-            # البحث عن مواقع فارغة مناسبة
-            empty_locations = (
-                ProductLocation.objects.filter(
-                    shelf__aisle__zone__warehouse=warehouse,
-                    current_quantity=0,
-                    is_active=True,
-                )
-                .exclude(product=product)
-                .order_by("shelf__aisle__sequence", "shelf__sequence")
             )
-
-            for location in empty_locations:
-                if location.can_accommodate(quantity):
-                    # تحديث المنتج المرتبط بالموقع
-                    location.product = product
-                    location.save()
-                    return location
-
-            # لم يتم العثور على موقع مناسب
-            return None
+            return placements[0]["location"]
 
         except Exception as e:
             logger.error(f"خطأ في البحث عن موقع مثالي: {e}")
             return None
 
+    @staticmethod
+    def plan_putaway(warehouse, items, location_type="primary"):
+        """
+        اقتراح مواقع تخزين لعدة أصناف (مثل أسطر إذن استلام) باستعلام واحد للمواقع
+
+        - مواقع المنتج نفسه أولاً ثم المواقع الفارغة، بأفضل ملاءمة للسعة الحرة
+        - الكمية المقترحة لصنف تُخصم من سعة الموقع قبل اقتراح الصنف التالي
+        - المواقع الفارغة التي تُسند لمنتج جديد تُحفظ بتحديث مجمّع
+
+        Returns:
+            list: [{"product", "quantity", "location"}] و location = None عند عدم وجود موقع مناسب
+        """
+        items = list(items)
+        index = PutawayIndex(
+            warehouse,
+            location_type=location_type,
+            product_ids={getattr(item["product"], "pk", item["product"]) for item in items},
+        )
+
+        placements = []
+        reassigned = {}
+        for item in items:
+            product_id = getattr(item["product"], "pk", item["product"])
+            location = index.suggest(product_id, item["quantity"])
+            if location is not None:
+                if index.product_of(location) != product_id:
+                    reassigned[location.pk] = product_id
+                index.commit(location, product_id, item["quantity"])
+            placements.append({"product": item["product"], "quantity": item["quantity"], "location": location})
+
+        if reassigned:
+            # الكمية لا تُحفظ هنا؛ تُسجل عند التخزين الفعلي عبر assign_product_location
+            ProductLocation.objects.bulk_update(
+                [ProductLocation(pk=pk, product_id=product_id) for pk, product_id in reassigned.items()],
+                ["product"],
+            )
+            # نسخ بالمنتج الجديد بدلاً من تعديل كائنات الفهرس
+            assigned = {}
+            for placement in placements:
+                location = placement["location"]
+                if location is not None and location.pk in reassigned:
+                    if location.pk not in assigned:
+                        assigned[location.pk] = copy.copy(location)
+                        assigned[location.pk].product_id = reassigned[location.pk]
+                    placement["location"] = assigned[location.pk]
+        return placements
+
     @staticmethod
     def get_product_locations(product, warehouse=None):
         """
@@ -367,62 +392,44 @@ class LocationService:
             return LocationTask.objects.none()
 
     @staticmethod
-    def generate_picking_route(warehouse, pick_list):
+    def generate_picking_route(warehouse, pick_list, strategy="nearest_neighbor"):
         """
-        إنشاء مسار انتقاء محسن
+        إنشاء مسار انتقاء محسن لطلب واحد حسب المسافة الفعلية بين الأرفف
         """
         try:
-            # الحصول على مواقع المنتجات المطلوبة
-            product_locations = []
-
-            for item in pick_list:
-                product = item["product"]
-                quantity_needed = item["quantity"]
-
-                locations = ProductLocation.objects.filter(
-                    product=product,
-                    shelf__aisle__zone__warehouse=warehouse,
-                    current_quantity__gt=0,
-                    is_active=True,
-                ).order_by(
-                    "shelf__aisle__zone__sequence",
-                    "shelf__aisle__sequence",
-                    "shelf__sequence",
-                )
-
-                quantity_collected = 0
-                for location in locations:
-                    if quantity_collected >= quantity_needed:
-                        break
-
-                    available_qty = min(
-                        location.current_quantity, quantity_needed - quantity_collected
-                    )
+            wave = PickingWaveService.build_wave(
+                warehouse, [{"order": None, "items": pick_list}], pickers=1, strategy=strategy
+            )
+            return [
+                {
+                    "product": stop["product"],
+                    "location": stop["location"],
+                    "quantity": stop["quantity"],
+                    "sort_key": stop["sequence"],
+                }
+                for stop in wave["pickers"][0]["route"]
+            ]
 
-                    if available_qty > 0:
-                        product_locations.append(
-                            {
-                                "product": product,
-                                "location": location,
-                                "quantity": available_qty,
-                                "sort_key": (
-                                    location.shelf.aisle.zone.warehouse.id,
-                                    location.shelf.aisle.sequence,
-                                    location.shelf.sequence,
-                                    location.level,
-                                ),
-                            }
-                        )
-                        quantity_collected += available_qty
+        except Exception as e:
+            logger.error(f"خطأ في إنشاء مسار الانتقاء: {e}")
+            return []
 
-            # ترتيب المواقع حسب المسار الأمثل
-            optimized_route = sorted(product_locations, key=lambda x: x["sort_key"])
+    @staticmethod
+    def generate_wave_picking(warehouse, orders, pickers=1, strategy="nearest_neighbor"):
+        """
+        انتقاء مجمّع لعدة طلبات: دمج الكميات لكل موقع وتقسيم الطلبات على المنتقين
 
-            return optimized_route
+        Args:
+            orders: [{"order": مرجع الطلب, "items": [{"product", "quantity"}]}]
+            pickers: عدد المنتقين
+            strategy: nearest_neighbor أو s_shape
+        """
+        try:
+            return PickingWaveService.build_wave(warehouse, orders, pickers=pickers, strategy=strategy)
 
         except Exception as e:
-            logger.error(f"خطأ في إنشاء مسار الانتقاء: {e}")
-            return []
+            logger.error(f"خطأ في إنشاء موجة الانتقاء: {e}")
+            raise
 
     @staticmethod
     def get_location_report(warehouse):
@@ -0,0 +1,377 @@
+"""
+محرك الانتقاء المجمّع (Wave Picking) واقتراح مواقع التخزين
+- يحمّل تخطيط المخزن (المناطق والممرات والأرفف) مرة واحدة في رسم بياني بالذاكرة
+- يجمع عدة طلبات في موجة واحدة ويقسمها على المنتقين مع مسار قصير لكل منتقٍ
+- فهرس للسعة الحرة لاقتراح مواقع التخزين دون المرور على كل موقع
+"""
+from bisect import bisect_left, insort
+from collections import defaultdict
+import logging
+import math
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+from django.db.models import Q
+
+from ..models.location_system import LocationShelf, ProductLocation
+
+logger = logging.getLogger(__name__)
+
+Point = Tuple[float, float]
+
+
+class WarehouseLayout:
+    """
+    تخطيط المخزن كرسم بياني بالذاكرة
+
+    الممرات متوازية ويربطها ممر عرضي أمامي وآخر خلفي؛ المسافة بين رفين في ممرين
+    مختلفين = الفرق الأفقي + أقصر التفاف عبر الممر العرضي الأمامي أو الخلفي.
+    الإحداثيات من position_x/position_y للممر إن وُجدت، وإلا تُشتق من ترتيب المنطقة والممر.
+    """
+
+    AISLE_SPACING = 3.0  # متر بين الممرات المتجاورة عند غياب الإحداثيات
+    SHELF_PITCH = 1.0    # متر بين الأرفف المتتالية داخل الممر
+
+    def __init__(self, warehouse_id: int, shelves: Dict[int, Tuple[int, float, float]],
+                 front: float = 0.0, back: float = 0.0, depot: Optional[Point] = None):
+        self.warehouse_id = warehouse_id
+        self.shelves = shelves  # shelf_id -> (aisle_id, x, y)
+        self.front = front
+        self.back = back
+        self.depot = depot or (0.0, front)
+
+    @classmethod
+    def load(cls, warehouse) -> "WarehouseLayout":
+        """تحميل التخطيط باستعلام واحد"""
+        warehouse_id = getattr(warehouse, "pk", warehouse)
+        rows = list(
+            LocationShelf.objects.filter(aisle__zone__warehouse_id=warehouse_id, is_active=True)
+            .order_by("aisle__zone__sequence", "aisle__zone_id", "aisle__sequence", "aisle_id", "sequence")
+            .values_list("id", "sequence", "aisle_id", "aisle__position_x", "aisle__position_y")
+        )
+
+        aisle_index: Dict[int, int] = {}
+        shelves = {}
+        front, back = math.inf, -math.inf
+        for shelf_id, sequence, aisle_id, position_x, position_y in rows:
+            if aisle_id not in aisle_index:
+                aisle_index[aisle_id] = len(aisle_index) + 1
+            x = float(position_x) if position_x is not None else aisle_index[aisle_id] * cls.AISLE_SPACING
+            start = float(position_y) if position_y is not None else 0.0
+            y = start + sequence * cls.SHELF_PITCH
+            shelves[shelf_id] = (aisle_id, x, y)
+            front = min(front, start)
+            back = max(back, y + cls.SHELF_PITCH)
+
+        if not shelves:
+            front = back = 0.0
+        return cls(warehouse_id, shelves, front=front, back=back)
+
+    def point(self, shelf_id: int) -> Point:
+        _, x, y = self.shelves[shelf_id]
+        return x, y
+
+    def distance(self, a: Optional[int], b: Optional[int]) -> float:
+        """المسافة بين رفين (None = نقطة البداية/التجميع)"""
+        if a == b:
+            return 0.0
+        aisle_a, xa, ya = self.shelves[a] if a is not None else (None, *self.depot)
+        aisle_b, xb, yb = self.shelves[b] if b is not None else (None, *self.depot)
+        if aisle_a is not None and aisle_a == aisle_b:
+            return abs(ya - yb)
+        via_front = (ya - self.front) + (yb - self.front)
+        via_back = (self.back - ya) + (self.back - yb)
+        return abs(xa - xb) + min(via_front, via_back)
+
+    def route_length(self, stops: List[int]) -> float:
+        """طول المسار من نقطة البداية عبر كل المحطات والعودة إليها"""
+        path = [None] + list(stops) + [None]
+        return sum(self.distance(path[i], path[i + 1]) for i in range(len(path) - 1))
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    def s_shape_route(self, stops: Iterable[int]) -> List[int]:
+        """مسار S: المرور على الممرات بالترتيب الأفقي مع عكس الاتجاه في كل ممر"""
+        by_aisle = defaultdict(list)
+        for shelf_id in set(stops):
+            aisle_id, x, y = self.shelves[shelf_id]
+            by_aisle[(x, aisle_id)].append((y, shelf_id))
+        route = []
+        for index, key in enumerate(sorted(by_aisle)):
+            shelves = sorted(by_aisle[key], reverse=bool(index % 2))
+            route.extend(shelf_id for _, shelf_id in shelves)
+        return route
+
+    def nearest_neighbor_route(self, stops: Iterable[int]) -> List[int]:
+        """أقرب جار ثم تحسين 2-opt"""
+        remaining = set(stops)
+        route, current = [], None
+        while remaining:
+            current = min(remaining, key=lambda shelf_id: (self.distance(current, shelf_id), shelf_id))
+            route.append(current)
+            remaining.discard(current)
+        return self.two_opt(route)
+
+    def two_opt(self, route: List[int], max_passes: int = 20) -> List[int]:
+        """تحسين 2-opt: عكس المقاطع التي تقصّر المسار حتى لا يوجد تحسين"""
+        path = [None] + list(route) + [None]
+        for _ in range(max_passes):
+            improved = False
+            for i in range(1, len(path) - 2):
+                for j in range(i + 1, len(path) - 1):
+                    before = self.distance(path[i - 1], path[i]) + self.distance(path[j], path[j + 1])
+                    after = self.distance(path[i - 1], path[j]) + self.distance(path[i], path[j + 1])
+                    if after + 1e-9 < before:
+                        path[i:j + 1] = reversed(path[i:j + 1])
+                        improved = True
+            if not improved:
+                break
+        return path[1:-1]
+
+    def route(self, stops: Iterable[int], strategy: str = "nearest_neighbor") -> List[int]:
+        if strategy == "s_shape":
+            return self.s_shape_route(stops)
+        if strategy == "nearest_neighbor":
+            return self.nearest_neighbor_route(stops)
+        raise ValueError(f"استراتيجية مسار غير معروفة: {strategy}")
+
+
+class PickingWaveService:
+    """
+    تجميع عدة طلبات في موجة انتقاء واحدة وتقسيمها على المنتقين
+    """
+
+    @staticmethod
+    def _product_id(product) -> int:
+        return getattr(product, "pk", product)
+
+    @classmethod
+    def build_wave(cls, warehouse, orders, pickers: int = 1, strategy: str = "nearest_neighbor",
+                   layout: Optional[WarehouseLayout] = None) -> Dict:
+        """
+        إنشاء موجة انتقاء
+
+        Args:
+            warehouse: المخزن
+            orders: [{"order": مرجع الطلب, "items": [{"product": ..., "quantity": ...}]}]
+            pickers: عدد المنتقين
+            strategy: nearest_neighbor (أقرب جار + 2-opt) أو s_shape
+            layout: تخطيط محمّل مسبقاً (اختياري)
+
+        Returns:
+            dict: pickers (قائمة لكل منتقٍ بالطلبات والمسار والمسافة)، unfulfilled،
+            total_distance، و single_order_distance (مجموع مسافات انتقاء كل طلب منفرداً للمقارنة)
+        """
+        layout = layout or WarehouseLayout.load(warehouse)
+        orders = list(orders)
+        product_ids = {
+            cls._product_id(item["product"]) for order in orders for item in order["items"]
+        }
+
+        # كل مواقع المنتجات المطلوبة باستعلام واحد، مرتبة بالقرب من نقطة البداية
+        locations_by_product = defaultdict(list)
+        locations = (
+            ProductLocation.objects.filter(
+                product_id__in=product_ids,
+                shelf__aisle__zone__warehouse_id=layout.warehouse_id,
+                current_quantity__gt=0,
+                is_active=True,
+            )
+            .select_related("product", "shelf__aisle__zone")
+        )
+        for location in locations:
+            if location.shelf_id in layout.shelves:
+                locations_by_product[location.product_id].append(location)
+        for product_locations in locations_by_product.values():
+            product_locations.sort(key=lambda loc: (layout.distance(None, loc.shelf_id), loc.level, loc.pk))
+        remaining = {
+            location.pk: location.current_quantity
+            for product_locations in locations_by_product.values()
+            for location in product_locations
+        }
+
+        # توزيع كميات كل طلب على المواقع (الكميات المحجوزة لطلب لا تُعطى لطلب آخر)
+        order_picks: Dict[Hashable, List[Tuple[ProductLocation, int]]] = {}
+        unfulfilled = []
+        for order in orders:
+            picks = []
+            for item in order["items"]:
+                needed = int(item["quantity"])
+                for location in locations_by_product.get(cls._product_id(item["product"]), ()):
+                    if needed <= 0:
+                        break
+                    take = min(remaining[location.pk], needed)
+                    if take > 0:
+                        picks.append((location, take))
+                        remaining[location.pk] -= take
+                        needed -= take
+                if needed > 0:
+                    unfulfilled.append({
+                        "order": order["order"],
+                        "product": item["product"],
+                        "quantity": needed,
+                    })
+            order_picks[order["order"]] = picks
+
+        groups = cls._assign_orders(layout, order_picks, max(1, int(pickers)))
+
+        picker_results = []
+        for index, order_refs in enumerate(groups, start=1):
+            stops = {}
+            for order_ref in order_refs:
+                for location, quantity in order_picks[order_ref]:
+                    stop = stops.setdefault(location.pk, {
+                        "location": location,
+                        "product": location.product,
+                        "quantity": 0,
+                        "orders": {},
+                    })
+                    stop["quantity"] += quantity
+                    stop["orders"][order_ref] = stop["orders"].get(order_ref, 0) + quantity
+
+            shelf_route = layout.route({stop["location"].shelf_id for stop in stops.values()}, strategy)
+            shelf_rank = {shelf_id: rank for rank, shelf_id in enumerate(shelf_route)}
+            route = sorted(
+                stops.values(),
+                key=lambda stop: (shelf_rank[stop["location"].shelf_id], stop["location"].level, stop["location"].pk),
+            )
+            for sequence, stop in enumerate(route, start=1):
+                stop["sequence"] = sequence
+
+            picker_results.append({
+                "picker": index,
+                "orders": order_refs,
+                "route": route,
+                "distance": round(layout.route_length(shelf_route), 2),
+            })
+
+        single_order_distance = sum(
+            layout.route_length(layout.route({location.shelf_id for location, _ in picks}, strategy))
+            for picks in order_picks.values()
+            if picks
+        )
+
+        return {
+            "pickers": picker_results,
+            "unfulfilled": unfulfilled,
+            "total_distance": round(sum(result["distance"] for result in picker_results), 2),
+            "single_order_distance": round(single_order_distance, 2),
+        }
+
+    @staticmethod
+    def _assign_orders(layout: WarehouseLayout, order_picks, pickers: int) -> List[List[Hashable]]:
+        """
+        تقسيم الطلبات على المنتقين: ترتيب الطلبات حسب موضعها الأفقي ثم تقطيعها
+        إلى مجموعات متجاورة متقاربة في عدد المحطات، فيعمل كل منتقٍ في جزء من المخزن
+        """
+        def centroid(order_ref):
+            picks = order_picks[order_ref]
+            if not picks:
+                return 0.0
+            return sum(layout.point(location.shelf_id)[0] for location, _ in picks) / len(picks)
+
+        ordered = sorted(order_picks, key=lambda ref: (centroid(ref), str(ref)))
+        pickers = min(pickers, len(ordered)) or 1
+        total = sum(len(order_picks[ref]) for ref in ordered)
+        target = total / pickers if total else 0
+
+        groups: List[List[Hashable]] = [[] for _ in range(pickers)]
+        index, load = 0, 0
+        for position, ref in enumerate(ordered):
+            # يبقى لكل منتقٍ متبقٍ طلب واحد على الأقل
+            must_advance = len(ordered) - position <= pickers - 1 - index
+            if groups[index] and index < pickers - 1 and (load >= target or must_advance):
+                index, load = index + 1, 0
+            groups[index].append(ref)
+            load += len(order_picks[ref])
+        return groups
+
+
+class PutawayIndex:
+    """
+    فهرس السعة الحرة لمواقع مخزن: قوائم مرتبة حسب السعة الحرة يُبحث فيها بالتنصيف
+
+    - مواقع المنتج نفسه أولاً ثم المواقع الفارغة
+    - أفضل ملاءمة: أصغر سعة حرة تكفي الكمية، والمواقع غير المحدودة في آخر القائمة
+    - الكميات والمنتجات المخططة تُحفظ داخل الفهرس؛ كائنات المواقع المُعادة لا تُعدّل
+    """
+
+    def __init__(self, warehouse, location_type: str = "primary", product_ids: Optional[Iterable[int]] = None):
+        warehouse_id = getattr(warehouse, "pk", warehouse)
+        self.location_type = location_type
+        self.locations: Dict[int, ProductLocation] = {}
+        self._planned: Dict[int, int] = defaultdict(int)
+        self._product: Dict[int, Optional[int]] = {}
+        self._by_product: Dict[int, List[Tuple]] = defaultdict(list)
+        self._empty: List[Tuple] = []
+
+        queryset = ProductLocation.objects.filter(
+            shelf__aisle__zone__warehouse_id=warehouse_id, is_active=True
+        ).select_related("shelf__aisle__zone")
+        if product_ids is not None:
+            # مواقع المنتجات المطلوبة والمواقع الفارغة فقط
+            queryset = queryset.filter(
+                Q(product_id__in=set(product_ids), location_type=location_type) | Q(current_quantity=0)
+            )
+
+        for location in queryset:
+            self.locations[location.pk] = location
+            self._product[location.pk] = location.product_id
+            if location.location_type == location_type:
+                insort(self._by_product[location.product_id], self._entry(location.pk))
+            if location.current_quantity == 0:
+                insort(self._empty, self._entry(location.pk))
+
+    def product_of(self, location: ProductLocation) -> Optional[int]:
+        """المنتج المسند للموقع بعد الكميات المخططة"""
+        return self._product.get(location.pk, location.product_id)
+
+    def planned_quantity(self, location: ProductLocation) -> int:
+        """الكمية المخططة للموقع في هذا الفهرس (فوق current_quantity المحفوظة)"""
+        return self._planned.get(location.pk, 0)
+
+    def _entry(self, location_id: int) -> Tuple:
+        location = self.locations[location_id]
+        free = None
+        if location.max_quantity:
+            free = max(0, location.max_quantity - location.current_quantity - self._planned[location_id])
+        return (
+            math.inf if free is None else free,
+            location.shelf.aisle.sequence,
+            location.shelf.sequence,
+            location_id,
+        )
+
+    def _best_fit(self, entries: List[Tuple], quantity: int, exclude_product: Optional[int] = None) -> Optional[int]:
+        index = bisect_left(entries, (quantity,))
+        for entry in entries[index:]:
+            location_id = entry[-1]
+            if exclude_product is not None and self._product[location_id] == exclude_product:
+                continue
+            return location_id
+        return None
+
+    def suggest(self, product_id: int, quantity: int) -> Optional[ProductLocation]:
+        """أفضل موقع لتخزين الكمية (دون تعديل الفهرس)"""
+        location_id = self._best_fit(self._by_product.get(product_id, []), quantity)
+        if location_id is None:
+            location_id = self._best_fit(self._empty, quantity, exclude_product=product_id)
+        return self.locations.get(location_id) if location_id is not None else None
+
+    def commit(self, location: ProductLocation, product_id: int, quantity: int) -> None:
+        """تسجيل كمية مخططة للموقع وتحديث موضعه في الفهرس"""
+        location_id = location.pk
+        old_entry = self._entry(location_id)
+        for entries in (self._by_product.get(self._product[location_id]), self._empty):
+            if entries is None:
+                continue
+            index = bisect_left(entries, old_entry)
+            if index < len(entries) and entries[index] == old_entry:
+                entries.pop(index)
+
+        self._product[location_id] = product_id
+        self._planned[location_id] += quantity
+        if location.location_type == self.location_type:
+            insort(self._by_product[product_id], self._entry(location_id))
+
@@ -2,6 +2,8 @@
 خدمة إدارة حجوزات المخزون
 تتعامل مع إنشاء وإدارة وتنفيذ حجوزات المخزون
 """
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models, transaction
 from django.utils import timezone
 from django.contrib.auth import get_user_model
@@ -88,39 +90,52 @@ class ReservationService:
             raise
 
     @staticmethod
-    def get_available_quantity(product, warehouse):
+    def get_available_quantities(product_ids, warehouse):
         """
-        حساب الكمية المتاحة للحجز (المخزون - الحجوزات النشطة)
+        حساب الكمية المتاحة للحجز لمجموعة منتجات في مخزن واحد باستعلامين مجمّعين
         """
+        product_ids = {getattr(product, "pk", product) for product in product_ids}
+        warehouse_id = getattr(warehouse, "pk", warehouse)
+        available = {product_id: 0 for product_id in product_ids}
+        if not product_ids:
+            return available
+
         try:
-            # الحصول على المخزون الحالي
-            try:
-                stock = Stock.objects.get(product=product, warehouse=warehouse)
-                total_stock = stock.quantity
-            except Stock.DoesNotExist:
-                total_stock = 0
-
-            # حساب إجمالي الحجوزات النشطة
-            active_reservations = (
+            stock_totals = dict(
+                Stock.objects.filter(warehouse_id=warehouse_id, product_id__in=product_ids)
+                .values("product_id")
+                .annotate(total=models.Sum("quantity"))
+                .values_list("product_id", "total")
+            )
+            reserved_totals = dict(
                 StockReservation.objects.filter(
-                    product=product, warehouse=warehouse, status="active"
-                ).aggregate(
-                    total_reserved=models.Sum("quantity_reserved")
-                    - models.Sum("quantity_fulfilled")
-                )[
-                    "total_reserved"
-                ]
-                or 0
+                    warehouse_id=warehouse_id, product_id__in=product_ids, status="active"
+                )
+                .values("product_id")
+                .annotate(
+                    total=models.Sum("quantity_reserved") - models.Sum("quantity_fulfilled")
+                )
+                .values_list("product_id", "total")
             )
 
             # الكمية المتاحة = المخزون - الحجوزات النشطة
-            available = max(0, total_stock - active_reservations)
-
+            for product_id in product_ids:
+                available[product_id] = max(
+                    0, (stock_totals.get(product_id) or 0) - (reserved_totals.get(product_id) or 0)
+                )
             return available
 
         except Exception as e:
-            logger.error(f"خطأ في حساب الكمية المتاحة: {e}")
-            return 0
+            logger.error(f"خطأ في حساب الكميات المتاحة: {e}")
+            return {product_id: 0 for product_id in product_ids}
+
+    @staticmethod
+    def get_available_quantity(product, warehouse):
+        """
+        حساب الكمية المتاحة للحجز (المخزون - الحجوزات النشطة)
+        """
+        product_id = getattr(product, "pk", product)
+        return ReservationService.get_available_quantities([product_id], warehouse)[product_id]
 
     @staticmethod
     def fulfill_reservation(
@@ -172,30 +187,120 @@ class ReservationService:
             raise
 
     @staticmethod
-    def auto_expire_reservations():
+    def expire_reservations(now=None, batch_size=None):
         """
-        إنهاء صلاحية الحجوزات المنتهية تلقائياً
+        إنهاء صلاحية الحجوزات المنتهية على دفعات بعبارات جماعية
+
+        لكل دفعة: قراءة المعرفات مع تخطي الصفوف المقفلة، UPDATE واحد للحالة،
+        إدراج جماعي لسجلات الانتهاء، ثم تحرير الكميات المحجوزة في المخزون مرة واحدة.
+        قفل في الكاش يمنع تداخل تشغيلين للمهمة.
+
+        Returns:
+            dict: expired (عدد الحجوزات)، affected (أزواج المنتج/المخزن)، available (المتاح بعد التحرير)
         """
+        now = now or timezone.now()
+        batch_size = batch_size or getattr(settings, "RESERVATION_SWEEP_BATCH_SIZE", 1000)
+        lock_key = "reservation_sweep_lock:stock_reservation"
+        result = {"expired": 0, "affected": set(), "available": {}, "skipped": False}
+
+        if not cache.add(lock_key, "locked", timeout=getattr(settings, "RESERVATION_SWEEP_LOCK_TIMEOUT", 600)):
+            logger.info("تخطي تنظيف الحجوزات المنتهية: تشغيل آخر قيد التنفيذ")
+            result["skipped"] = True
+            return result
+
         try:
-            expired_reservations = StockReservation.objects.filter(
-                status="active", expires_at__lt=timezone.now()
-            )
+            while True:
+                with transaction.atomic():
+                    rows = list(
+                        StockReservation.objects.select_for_update(skip_locked=True)
+                        .filter(status="active", expires_at__lt=now)
+                        .order_by("pk")
+                        .values_list("pk", "product_id", "warehouse_id", "quantity_reserved", "quantity_fulfilled")[
+                            :batch_size
+                        ]
+                    )
+                    if not rows:
+                        break
 
-            expired_count = 0
-            for reservation in expired_reservations:
-                reservation.status = "expired"
-                reservation.save()
+                    ids = [row[0] for row in rows]
+                    StockReservation.objects.filter(pk__in=ids, status="active").update(
+                        status="expired", updated_at=now
+                    )
 
-                # إنشاء سجل انتهاء الصلاحية
-                ReservationFulfillment.objects.create(
-                    reservation=reservation,
-                    quantity_fulfilled=0,
-                    notes="انتهت صلاحية الحجز تلقائياً",
-                )
+                    # إنشاء سجلات انتهاء الصلاحية
+                    ReservationFulfillment.objects.bulk_create(
+                        [
+                            ReservationFulfillment(
+                                reservation_id=pk,
+                                quantity_fulfilled=0,
+                                notes="انتهت صلاحية الحجز تلقائياً",
+                            )
+                            for pk in ids
+                        ],
+                        batch_size=batch_size,
+                    )
 
-                expired_count += 1
+                    released = {}
+                    for _, product_id, warehouse_id, reserved, fulfilled in rows:
+                        pair = (product_id, warehouse_id)
+                        released[pair] = released.get(pair, 0) + max(0, reserved - fulfilled)
+                    ReservationService._release_stock_reserved(released)
+
+                result["expired"] += len(ids)
+                result["affected"].update(released)
+                if len(rows) < batch_size:
+                    break
+        finally:
+            cache.delete(lock_key)
+
+        # إعادة حساب المتاح للمنتجات المتأثرة (استعلامان لكل مخزن)
+        product_ids_by_warehouse = {}
+        for product_id, warehouse_id in result["affected"]:
+            product_ids_by_warehouse.setdefault(warehouse_id, set()).add(product_id)
+        for warehouse_id, product_ids in product_ids_by_warehouse.items():
+            for product_id, available in ReservationService.get_available_quantities(
+                product_ids, warehouse_id
+            ).items():
+                result["available"][(product_id, warehouse_id)] = available
+
+        if result["expired"]:
+            logger.info(
+                f"تم إنهاء صلاحية {result['expired']} حجز لعدد {len(result['affected'])} منتج/مخزن"
+            )
+        return result
+
+    @staticmethod
+    def _release_stock_reserved(released):
+        """
+        خصم الكميات المحررة من Stock.reserved_quantity لكل الأزواج المتأثرة بتحديث جماعي واحد
+        """
+        if not released:
+            return
+        product_ids = {product_id for product_id, _ in released}
+        warehouse_ids = {warehouse_id for _, warehouse_id in released}
+        stocks = [
+            stock
+            for stock in Stock.objects.select_for_update().filter(
+                product_id__in=product_ids, warehouse_id__in=warehouse_ids
+            )
+            if (stock.product_id, stock.warehouse_id) in released
+        ]
+        # bulk_update يتجاوز auto_now: المزامنة التزايدية تعتمد على updated_at
+        now = timezone.now()
+        for stock in stocks:
+            stock.reserved_quantity = max(
+                0, stock.reserved_quantity - released[(stock.product_id, stock.warehouse_id)]
+            )
+            stock.updated_at = now
+        Stock.objects.bulk_update(stocks, ["reserved_quantity", "updated_at"])
 
-            return expired_count
+    @staticmethod
+    def auto_expire_reservations():
+        """
+        إنهاء صلاحية الحجوزات المنتهية تلقائياً
+        """
+        try:
+            return ReservationService.expire_reservations()["expired"]
 
         except Exception as e:
             logger.error(f"خطأ في إنهاء صلاحية الحجوزات: {e}")
@@ -270,58 +375,111 @@ class ReservationService:
             return {}
 
     @staticmethod
-    def allocate_stock_by_priority(product, warehouse, available_quantity):
-        """
-        تخصيص المخزون حسب الأولوية
-        """
-        try:
-            # الحصول على الحجوزات النشطة مرتبة حسب الأولوية
-            reservations = StockReservation.objects.filter(
-                product=product, warehouse=warehouse, status="active"
-            ).order_by("priority", "reserved_at")
-
-            allocated_quantity = 0
-            allocation_results = []
-
-            for reservation in reservations:
-                remaining_needed = reservation.quantity_remaining
-
-                if allocated_quantity >= available_quantity:
-                    # لا توجد كمية متاحة أكثر
-                    allocation_results.append(
-                        {
-                            "reservation": reservation,
-                            "allocated": 0,
-                            "remaining_needed": remaining_needed,
-                            "status": "waiting",
-                        }
-                    )
-                    continue
-
-                # حساب الكمية التي يمكن تخصيصها
-                can_allocate = min(
-                    remaining_needed, available_quantity - allocated_quantity
-                )
+    def _allocate_reservations(reservations, available_quantity):
+        allocated_quantity = 0
+        allocation_results = []
 
-                allocated_quantity += can_allocate
+        for reservation in reservations:
+            remaining_needed = reservation.quantity_remaining
 
+            if allocated_quantity >= available_quantity:
+                # لا توجد كمية متاحة أكثر
                 allocation_results.append(
                     {
                         "reservation": reservation,
-                        "allocated": can_allocate,
-                        "remaining_needed": remaining_needed - can_allocate,
-                        "status": "allocated"
-                        if can_allocate == remaining_needed
-                        else "partial",
+                        "allocated": 0,
+                        "remaining_needed": remaining_needed,
+                        "status": "waiting",
                     }
                 )
+                continue
 
-            return {
-                "total_allocated": allocated_quantity,
-                "remaining_stock": available_quantity - allocated_quantity,
-                "allocations": allocation_results,
+            # حساب الكمية التي يمكن تخصيصها
+            can_allocate = min(
+                remaining_needed, available_quantity - allocated_quantity
+            )
+
+            allocated_quantity += can_allocate
+
+            allocation_results.append(
+                {
+                    "reservation": reservation,
+                    "allocated": can_allocate,
+                    "remaining_needed": remaining_needed - can_allocate,
+                    "status": "allocated"
+                    if can_allocate == remaining_needed
+                    else "partial",
+                }
+            )
+
+        return {
+            "total_allocated": allocated_quantity,
+            "remaining_stock": available_quantity - allocated_quantity,
+            "allocations": allocation_results,
+        }
+
+    @staticmethod
+    def allocate_stock_by_priority_bulk(warehouse, available_by_product=None, product_ids=None):
+        """
+        تخصيص المخزون حسب الأولوية لعدة منتجات دفعة واحدة (موجات إعادة التزويد)
+
+        Args:
+            warehouse: المخزن أو معرفه
+            available_by_product: {product_id: الكمية المتاحة للتخصيص}؛
+                الافتراضي كمية المخزون الفعلية للمنتجات المعطاة
+            product_ids: المنتجات المطلوبة عند عدم تمرير available_by_product
+                (الافتراضي كل المنتجات التي لها حجوزات نشطة في المخزن)
+
+        Returns:
+            dict: {product_id: نفس نتيجة allocate_stock_by_priority}
+        """
+        warehouse_id = getattr(warehouse, "pk", warehouse)
+        reservations = StockReservation.objects.filter(
+            warehouse_id=warehouse_id, status="active"
+        )
+
+        if available_by_product is not None:
+            product_ids = set(available_by_product)
+        elif product_ids is not None:
+            product_ids = {getattr(product, "pk", product) for product in product_ids}
+        if product_ids is not None:
+            reservations = reservations.filter(product_id__in=product_ids)
+
+        # استعلام واحد لكل الحجوزات مرتبة حسب المنتج ثم الأولوية
+        by_product = {}
+        for reservation in reservations.order_by("product_id", "priority", "reserved_at"):
+            by_product.setdefault(reservation.product_id, []).append(reservation)
+
+        if available_by_product is None:
+            product_ids = product_ids if product_ids is not None else set(by_product)
+            available_by_product = {
+                product_id: total or 0
+                for product_id, total in Stock.objects.filter(
+                    warehouse_id=warehouse_id, product_id__in=product_ids
+                )
+                .values("product_id")
+                .annotate(total=models.Sum("quantity"))
+                .values_list("product_id", "total")
             }
 
+        return {
+            product_id: ReservationService._allocate_reservations(
+                by_product.get(product_id, []), available_by_product.get(product_id, 0)
+            )
+            for product_id in product_ids
+        }
+
+    @staticmethod
+    def allocate_stock_by_priority(product, warehouse, available_quantity):
+        """
+        تخصيص المخزون حسب الأولوية
+        """
+        try:
+            product_id = getattr(product, "pk", product)
+            return ReservationService.allocate_stock_by_priority_bulk(
+                warehouse, {product_id: available_quantity}
+            )[product_id]
+
         except Exception as e:
             logger.error(f"خطأ في تخصيص المخزون: {e}")
             return {
@@ -409,32 +567,42 @@ class ReservationService:
             if warehouse:
                 queryset = queryset.filter(warehouse=warehouse)
 
+            stocks = list(queryset)
+
+            # الكميات المتاحة والمحجوزة لكل المخازن باستعلامات مجمّعة بدل استعلامين لكل صف
+            product_ids_by_warehouse = {}
+            for stock in stocks:
+                product_ids_by_warehouse.setdefault(stock.warehouse_id, set()).add(stock.product_id)
+            available_by_warehouse = {
+                warehouse_id: ReservationService.get_available_quantities(product_ids, warehouse_id)
+                for warehouse_id, product_ids in product_ids_by_warehouse.items()
+            }
+            reserved_totals = {
+                (row["warehouse_id"], row["product_id"]): row["total_reserved"] or 0
+                for row in StockReservation.objects.filter(
+                    status="active",
+                    warehouse_id__in=product_ids_by_warehouse.keys(),
+                    product_id__in={stock.product_id for stock in stocks},
+                )
+                .values("warehouse_id", "product_id")
+                .annotate(
+                    total_reserved=models.Sum("quantity_reserved")
+                    - models.Sum("quantity_fulfilled")
+                )
+            }
+
             low_stock_data = []
 
-            for stock in queryset:
+            for stock in stocks:
                 # حساب الكمية المتاحة (بعد خصم الحجوزات)
-                available_quantity = ReservationService.get_available_quantity(
-                    stock.product, stock.warehouse
-                )
+                available_quantity = available_by_warehouse[stock.warehouse_id][stock.product_id]
 
                 # التحقق من المخزون المنخفض
                 min_stock = stock.product.min_stock or 0
 
                 if available_quantity <= min_stock:
-                    # الحصول على الحجوزات النشطة
-                    active_reservations = (
-                        StockReservation.objects.filter(
-                            product=stock.product,
-                            warehouse=stock.warehouse,
-                            status="active",
-                        ).aggregate(
-                            total_reserved=models.Sum("quantity_reserved")
-                            - models.Sum("quantity_fulfilled")
-                        )[
-                            "total_reserved"
-                        ]
-                        or 0
-                    )
+                    # الحجوزات النشطة
+                    active_reservations = reserved_totals.get((stock.warehouse_id, stock.product_id), 0)
 
                     low_stock_data.append(
                         {
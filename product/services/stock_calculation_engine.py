@@ -15,6 +15,7 @@ from decimal import Decimal
 import logging
 from typing import Dict, List, Optional, Tuple, Union
 
+from .bundle_availability_service import BundleAvailabilityService
 from .bundle_cache_service import BundleCacheService
 
 logger = logging.getLogger('bundle_system')
@@ -31,13 +32,17 @@ class StockCalculationEngine:
     """
     
     @staticmethod
-    def calculate_bundle_stock(bundle_product, use_cache: bool = True) -> int:
+    def calculate_bundle_stock(bundle_product, use_cache: bool = True, warehouse_id: Optional[int] = None) -> int:
         """
         حساب المخزون المتاح لمنتج مجمع
         
+        المتاح في كل مخزن = MIN(مخزون المكون في المخزن ÷ الكمية المطلوبة)، والإجمالي
+        مجموع المخازن (لا يُجمّع منتج من مكونات موزعة على مخازن مختلفة)
+        
         Args:
             bundle_product: المنتج المجمع (Product instance)
             use_cache: استخدام التخزين المؤقت (افتراضي: True)
+            warehouse_id: مخزن محدد (اختياري، الافتراضي كل المخازن)
             
         Returns:
             int: المخزون المتاح للمنتج المجمع
@@ -50,6 +55,8 @@ class StockCalculationEngine:
                 logger.warning("تم تمرير منتج فارغ (None) لحساب المخزون")
                 return 0
             
+            use_cache = use_cache and warehouse_id is None
+            
             # محاولة الحصول على المخزون من التخزين المؤقت أولاً
             if use_cache:
                 cached_stock = BundleCacheService.get_bundle_stock(bundle_product.id)
@@ -61,48 +68,9 @@ class StockCalculationEngine:
                 logger.warning(f"المنتج {bundle_product.name} ليس منتجاً مجمعاً")
                 return 0
             
-            # الحصول على جميع مكونات المنتج المجمع
-            components = bundle_product.components.select_related('component_product').all()
-            
-            if not components.exists():
-                logger.warning(f"المنتج المجمع {bundle_product.name} لا يحتوي على مكونات")
-                return 0
-            
-            min_available_bundles = float('inf')
-            
-            for component in components:
-                component_product = component.component_product
-                required_quantity = component.required_quantity
-                
-                # التحقق من أن المنتج المكون نشط
-                if not component_product.is_active:
-                    return 0
-                
-                # الحصول على المخزون الحالي للمكون
-                component_stock = component_product.current_stock
-                
-                # إذا كان أي مكون بدون مخزون، فالمنتج المجمع غير متاح
-                if component_stock <= 0:
-                    return 0
-                
-                # حساب عدد الوحدات المجمعة الممكنة من هذا المكون
-                possible_bundles = component_stock // required_quantity
-                
-                # أخذ الحد الأدنى
-                min_available_bundles = min(min_available_bundles, possible_bundles)
-                
-                logger.debug(
-                    f"المكون: {component_product.name}, "
-                    f"المخزون: {component_stock}, "
-                    f"المطلوب: {required_quantity}, "
-                    f"الوحدات الممكنة: {possible_bundles}"
-                )
-            
-            # إذا لم نجد أي مكونات صالحة
-            if min_available_bundles == float('inf'):
-                return 0
-            
-            result = int(min_available_bundles)
+            # حساب تجميعي لكل المكونات والمخازن بدلاً من استعلام لكل مكون
+            availability = BundleAvailabilityService.compute([bundle_product.id], warehouse_id=warehouse_id)
+            result = sum(availability.values())
             logger.debug(f"المخزون المحسوب للمنتج المجمع {bundle_product.name}: {result}")
             
             # حفظ النتيجة في التخزين المؤقت
@@ -121,6 +89,9 @@ class StockCalculationEngine:
         """
         إعادة حساب مخزون جميع المنتجات المجمعة التي تحتوي على مكون معين
         
+        تُحدّث جدول توفر المنتجات المجمعة لكل مخزن مباشرة؛ الإشارات تستخدم
+        BundleAvailabilityService.mark_components_changed لتأجيل ذلك حتى الـ commit
+        
         Args:
             component_product: المنتج المكون (Product instance)
             
@@ -132,29 +103,26 @@ class StockCalculationEngine:
         try:
             from ..models import Product
             
-            # البحث عن جميع المنتجات المجمعة التي تحتوي على هذا المكون
-            affected_bundles = Product.objects.filter(
-                is_bundle=True,
-                is_active=True,
-                components__component_product=component_product
-            ).distinct()
+            bundle_ids = BundleAvailabilityService.bundles_for_components([component_product.id])
+            affected_bundles = Product.objects.filter(id__in=bundle_ids, is_bundle=True, is_active=True)
+            if not affected_bundles:
+                return []
             
-            results = []
+            old_totals = BundleAvailabilityService.totals(bundle_ids)
+            BundleAvailabilityService.recompute(bundle_ids)
+            new_totals = BundleAvailabilityService.totals(bundle_ids)
             
-            for bundle in affected_bundles:
-                old_stock = getattr(bundle, '_cached_bundle_stock', None)
-                new_stock = StockCalculationEngine.calculate_bundle_stock(bundle)
-                
-                results.append({
+            now = timezone.now()
+            return [
+                {
                     'bundle_product': bundle,
-                    'old_stock': old_stock,
-                    'new_stock': new_stock,
+                    'old_stock': old_totals.get(bundle.id),
+                    'new_stock': new_totals.get(bundle.id, 0),
                     'component_changed': component_product,
-                    'recalculated_at': timezone.now()
-                })
-                
-            
-            return results
+                    'recalculated_at': now
+                }
+                for bundle in affected_bundles
+            ]
             
         except Exception as e:
             logger.error(f"خطأ في إعادة حساب المنتجات المجمعة المتأثرة بـ {component_product.name}: {e}")
@@ -182,37 +150,28 @@ class StockCalculationEngine:
             if product_ids:
                 bundles_query = bundles_query.filter(id__in=product_ids)
             
-            # تحسين الاستعلام بتحميل المكونات مسبقاً
-            bundles = bundles_query.prefetch_related(
-                'components__component_product'
-            ).all()
-            
-            results = []
-            total_processed = 0
+            bundles = list(bundles_query.only('id', 'name'))
+            bundle_ids = [bundle.id for bundle in bundles]
+            
+            # إعادة حساب كل المنتجات المجمعة في مرور تجميعي واحد وتحديث جدول التوفر
+            old_totals = BundleAvailabilityService.totals(bundle_ids)
+            BundleAvailabilityService.recompute(bundle_ids)
+            new_totals = BundleAvailabilityService.totals(bundle_ids)
+            
+            now = timezone.now()
+            results = [
+                {
+                    'bundle_id': bundle.id,
+                    'bundle_name': bundle.name,
+                    'old_stock': old_totals.get(bundle.id),
+                    'new_stock': new_totals.get(bundle.id, 0),
+                    'recalculated_at': now
+                }
+                for bundle in bundles
+            ]
+            total_processed = len(results)
             errors = []
             
-            with transaction.atomic():
-                for bundle in bundles:
-                    try:
-                        old_stock = getattr(bundle, '_cached_bundle_stock', None)
-                        new_stock = cls.calculate_bundle_stock(bundle)
-                        
-                        results.append({
-                            'bundle_id': bundle.id,
-                            'bundle_name': bundle.name,
-                            'old_stock': old_stock,
-                            'new_stock': new_stock,
-                            'recalculated_at': timezone.now()
-                        })
-                        
-                        total_processed += 1
-                        
-                    except Exception as e:
-                        error_msg = f"خطأ في حساب مخزون {bundle.name}: {e}"
-                        errors.append(error_msg)
-                        logger.error(error_msg)
-            
-            
             return {
                 'total_processed': total_processed,
                 'results': results,
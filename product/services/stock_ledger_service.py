@@ -6,12 +6,13 @@ StockLedgerService - خدمة إدارة أستاذ المخزون المحاس
 import logging
 import uuid
 from decimal import Decimal
-from typing import Dict, Any, Optional
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Any, Iterable, Optional, Tuple
 from django.db import transaction
 from django.utils import timezone
-from django.db.models import Sum
+from django.db.models import Max, Sum
 
-from product.models.stock_ledger import StockLedgerEntry
+from product.models.stock_ledger import StockLedgerEntry, StockLedgerCheckpoint
 from product.models.product_core import Product, ProductVariant, Unit
 from product.models.stock_management import Warehouse
 from financial.models.journal_entry import JournalEntry
@@ -66,19 +67,13 @@ class StockLedgerService:
                 logger.info(f"Duplicate inventory movement detected for ref #{movement_service_ref}, returning existing ledger entry.")
                 return existing_entry
 
-            # حساب الأرصدة التراكمية كبيانات مشتقة للكاش فقط
-            current_qty_agg = StockLedgerEntry.objects.filter(
-                product=product,
-                warehouse=warehouse
-            ).aggregate(total=Sum('quantity'))['total'] or Decimal('0.0000')
-
-            current_val_agg = StockLedgerEntry.objects.filter(
-                product=product,
-                warehouse=warehouse
-            ).aggregate(total=Sum('total_cost'))['total'] or Decimal('0.00')
+            # ترحيل الرصيد الجاري من آخر سطر (O(1) عبر الفهرس product, warehouse, id)
+            # قفل صف المنتج يسلسل الكتابات المتزامنة لنفس الصنف حتى لو لم يوجد سطر سابق
+            Product.objects.select_for_update().filter(pk=product.pk).values_list('pk', flat=True).first()
+            current_qty, current_val = cls._latest_balance(product, warehouse)
 
-            qty_balance_cache = current_qty_agg + signed_quantity
-            val_balance_cache = current_val_agg + (total_cost if signed_quantity > 0 else -total_cost)
+            qty_balance_cache = current_qty + signed_quantity
+            val_balance_cache = current_val + (total_cost if signed_quantity > 0 else -total_cost)
 
             entry_num = cls.generate_entry_number()
 
@@ -104,14 +99,143 @@ class StockLedgerService:
             )
             return entry
 
+    @classmethod
+    def _latest_balance(cls, product, warehouse) -> Tuple[Decimal, Decimal]:
+        latest = StockLedgerEntry.objects.filter(
+            product=product,
+            warehouse=warehouse
+        ).order_by('-id').values_list('qty_balance_after', 'val_balance_after').first()
+        return latest or (Decimal('0.0000'), Decimal('0.00'))
+
     @classmethod
     def get_product_stock_balance(cls, product: Product, warehouse: Warehouse) -> Decimal:
         """
-        حساب رصيد كمية المخزون الفعلي من واقع مجموع سجلات أستاذ المخزون
+        رصيد كمية المخزون الفعلي من الرصيد الجاري لآخر سطر بأستاذ المخزون
+        """
+        return cls._latest_balance(product, warehouse)[0]
+
+    @staticmethod
+    def _as_datetime(as_of) -> datetime:
+        """
+        تحويل التاريخ إلى حد زمني حصري: التاريخ وحده يعني "حتى نهاية اليوم"
+        """
+        if isinstance(as_of, datetime):
+            return as_of if timezone.is_aware(as_of) else timezone.make_aware(as_of)
+        return timezone.make_aware(datetime.combine(as_of + timedelta(days=1), time.min))
+
+    @classmethod
+    def get_stock_as_of(cls, product: Product, warehouse: Warehouse, as_of) -> Dict[str, Decimal]:
+        """
+        رصيد (منتج، مخزن) في تاريخ/توقيت سابق من أقرب سطر أستاذ قبله (بدون إعادة جمع)
+        :param as_of: date (شامل نهاية اليوم) أو datetime (حصري)
         """
-        total_qty = StockLedgerEntry.objects.filter(
+        cutoff = cls._as_datetime(as_of)
+        latest = StockLedgerEntry.objects.filter(
             product=product,
-            warehouse=warehouse
-        ).aggregate(total=Sum('quantity'))['total'] or Decimal('0.0000')
+            warehouse=warehouse,
+            created_at__lt=cutoff
+        ).order_by('-created_at', '-id').values_list('qty_balance_after', 'val_balance_after').first()
+        qty, value = latest or (Decimal('0.0000'), Decimal('0.00'))
+        return {'quantity': qty, 'value': value}
 
-        return total_qty
+    @classmethod
+    def get_stock_balances_as_of(
+        cls,
+        as_of,
+        products: Optional[Iterable] = None,
+        warehouse: Optional[Warehouse] = None
+    ) -> Dict[Tuple[int, int], Dict[str, Decimal]]:
+        """
+        أرصدة آلاف الأصناف في تاريخ سابق دفعة واحدة (لتقارير التقييم التاريخي)
+
+        - يبدأ من أحدث نقطة مرجعية شهرية قبل التاريخ (إن وجدت)
+        - ثم يقرأ آخر سطر لكل (منتج، مخزن) تحرك بعد النقطة فقط
+        :return: {(product_id, warehouse_id): {'quantity', 'value', 'last_entry_id'}} للأزواج ذات الحركة
+        """
+        cutoff = cls._as_datetime(as_of)
+        entries = StockLedgerEntry.objects.filter(created_at__lt=cutoff)
+        checkpoints = StockLedgerCheckpoint.objects.all()
+        if products is not None:
+            product_ids = [getattr(p, 'pk', p) for p in products]
+            entries = entries.filter(product_id__in=product_ids)
+            checkpoints = checkpoints.filter(product_id__in=product_ids)
+        if warehouse is not None:
+            entries = entries.filter(warehouse=warehouse)
+            checkpoints = checkpoints.filter(warehouse=warehouse)
+
+        balances: Dict[Tuple[int, int], Dict[str, Decimal]] = {}
+        checkpoint_cutoff = checkpoints.filter(cutoff_at__lte=cutoff).aggregate(last=Max('cutoff_at'))['last']
+        if checkpoint_cutoff is not None:
+            for product_id, warehouse_id, qty, value, last_id in checkpoints.filter(
+                cutoff_at=checkpoint_cutoff
+            ).values_list('product_id', 'warehouse_id', 'qty_balance', 'val_balance', 'last_entry_id'):
+                balances[(product_id, warehouse_id)] = {'quantity': qty, 'value': value, 'last_entry_id': last_id}
+            entries = entries.filter(created_at__gte=checkpoint_cutoff)
+
+        last_ids = entries.values('product_id', 'warehouse_id').annotate(last_id=Max('id')).values('last_id')
+        for product_id, warehouse_id, qty, value, last_id in StockLedgerEntry.objects.filter(id__in=last_ids).values_list(
+            'product_id', 'warehouse_id', 'qty_balance_after', 'val_balance_after', 'id'
+        ):
+            balances[(product_id, warehouse_id)] = {'quantity': qty, 'value': value, 'last_entry_id': last_id}
+        return balances
+
+    @classmethod
+    def build_monthly_checkpoint(cls, month: date) -> int:
+        """
+        إنشاء النقطة المرجعية لنهاية شهر معين لكل (منتج، مخزن) له حركة حتى نهايته
+        :param month: أي تاريخ داخل الشهر المطلوب
+        :return: عدد النقاط المنشأة
+        """
+        next_month = (month.replace(day=1) + timedelta(days=32)).replace(day=1)
+        cutoff = cls._as_datetime(next_month - timedelta(days=1))
+
+        # يبني على النقطة المرجعية السابقة فيقرأ حركات الشهر فقط
+        balances = cls.get_stock_balances_as_of(cutoff)
+
+        with transaction.atomic():
+            StockLedgerCheckpoint.objects.filter(cutoff_at=cutoff).delete()
+            StockLedgerCheckpoint.objects.bulk_create([
+                StockLedgerCheckpoint(
+                    product_id=product_id,
+                    warehouse_id=warehouse_id,
+                    cutoff_at=cutoff,
+                    last_entry_id=balance['last_entry_id'],
+                    qty_balance=balance['quantity'],
+                    val_balance=balance['value'],
+                )
+                for (product_id, warehouse_id), balance in balances.items()
+            ], batch_size=1000)
+        return len(balances)
+
+    @classmethod
+    def recompute_running_balances(cls, product: Optional[Product] = None, warehouse: Optional[Warehouse] = None) -> int:
+        """
+        إعادة احتساب الأرصدة الجارية لكل الأسطر بترتيب id (تسوية البيانات التاريخية)
+        :return: عدد الأسطر التي تغيرت أرصدتها
+        """
+        entries = StockLedgerEntry.objects.order_by('product_id', 'warehouse_id', 'id').only(
+            'id', 'product_id', 'warehouse_id', 'quantity', 'total_cost', 'qty_balance_after', 'val_balance_after'
+        )
+        if product is not None:
+            entries = entries.filter(product=product)
+        if warehouse is not None:
+            entries = entries.filter(warehouse=warehouse)
+
+        changed, pair, qty, value = [], None, Decimal('0.0000'), Decimal('0.00')
+        updated = 0
+        for entry in entries.iterator(chunk_size=2000):
+            if (entry.product_id, entry.warehouse_id) != pair:
+                pair, qty, value = (entry.product_id, entry.warehouse_id), Decimal('0.0000'), Decimal('0.00')
+            qty += entry.quantity
+            value += entry.total_cost if entry.quantity > 0 else -entry.total_cost
+            if entry.qty_balance_after != qty or entry.val_balance_after != value:
+                entry.qty_balance_after, entry.val_balance_after = qty, value
+                changed.append(entry)
+            if len(changed) >= 1000:
+                StockLedgerEntry.objects.bulk_update(changed, ['qty_balance_after', 'val_balance_after'])
+                updated += len(changed)
+                changed = []
+        if changed:
+            StockLedgerEntry.objects.bulk_update(changed, ['qty_balance_after', 'val_balance_after'])
+            updated += len(changed)
+        return updated
@@ -24,9 +24,8 @@ from governance.signal_integration import governed_signal_handler, side_effect_h
 from governance.services.audit_service import AuditService
 from governance.models import GovernanceContext
 
-from .models import Product, Stock, StockMovement
-from .services.stock_calculation_engine import StockCalculationEngine
-from .services.bundle_cache_service import BundleCacheService
+from .models import BundleComponent, Product, Stock, StockMovement
+from .services.bundle_availability_service import BundleAvailabilityService, bundle_availability_changed
 
 logger = logging.getLogger('bundle_system')
 
@@ -41,8 +40,8 @@ def recalculate_bundle_stock_on_movement(sender, instance, created, **kwargs):
     """
     إعادة حساب مخزون المنتجات المجمعة عند حدوث حركة مخزون
     
-    يتم استدعاؤها بعد حفظ حركة المخزون لإعادة حساب مخزون جميع المنتجات المجمعة
-    التي تحتوي على المنتج المتأثر كمكون
+    يتم استدعاؤها بعد حفظ حركة المخزون لتسجيل المنتجات المجمعة التي تحتوي على
+    المنتج المتأثر كمكون، ويُعاد حساب توفرها لكل مخزن مرة واحدة بعد الـ commit
     
     Governed side effect handler: Recalculates bundle stock after component movement
     Requirements: 2.1
@@ -50,78 +49,13 @@ def recalculate_bundle_stock_on_movement(sender, instance, created, **kwargs):
     if not created:
         return
     
-    try:
-        # تجنب المعالجة المزدوجة
-        if hasattr(instance, '_skip_bundle_recalc') and instance._skip_bundle_recalc:
-            logger.debug(f"Skipping bundle recalculation for movement {instance.id} due to skip flag")
-            return
-        
-        product = instance.product
-        
-        # إنشاء مفتاح cache فريد لتجنب المعالجة المزدوجة
-        cache_key = f"bundle_recalc_movement_{product.id}_{instance.id}"
-        if cache.get(cache_key):
-            logger.debug(f"Skipping duplicate bundle recalculation for movement {instance.id}")
-            return
-        cache.set(cache_key, True, timeout=10)  # منع المعالجة المزدوجة لمدة 10 ثوان
-        
-        # التحقق من وجود منتجات مجمعة تحتوي على هذا المنتج كمكون
-        affected_bundles = Product.objects.filter(
-            is_bundle=True,
-            is_active=True,
-            components__component_product=product
-        ).distinct()
-        
-        if not affected_bundles.exists():
-            logger.debug(f"No affected bundles found for product {product.name} movement")
-            return
-        
-        # إبطال التخزين المؤقت للمكون المتأثر
-        BundleCacheService.invalidate_component_cache(product.id)
-        
-        # إعادة حساب مخزون المنتجات المجمعة المتأثرة
-        recalculation_results = StockCalculationEngine.recalculate_affected_bundles(product)
-        
-        # Audit bundle recalculation
-        AuditService.create_audit_record(
-            model_name='StockMovement',
-            object_id=instance.id,
-            operation='BUNDLE_STOCK_RECALCULATION',
-            user=GovernanceContext.get_current_user(),
-            source_service='BundleStockSignals',
-            additional_context={
-                'component_product': product.name,
-                'affected_bundles_count': len(recalculation_results),
-                'movement_type': instance.movement_type,
-                'movement_quantity': str(instance.quantity)
-            }
-        )
-        
-        # تسجيل النتائج
-        for result in recalculation_results:
-            bundle = result['bundle_product']
-            old_stock = result.get('old_stock', 'غير محدد')
-            new_stock = result['new_stock']
-            
-        
-        # إنشاء إشعارات للمخزون المنخفض إذا لزم الأمر
-        _check_low_stock_alerts(recalculation_results)
-        
-    except Exception as e:
-        logger.error(f"Error recalculating bundle stock after movement {instance.id}: {e}")
-        
-        # Audit error
-        AuditService.create_audit_record(
-            model_name='StockMovement',
-            object_id=instance.id,
-            operation='BUNDLE_RECALCULATION_ERROR',
-            user=GovernanceContext.get_current_user(),
-            source_service='BundleStockSignals',
-            additional_context={
-                'error': str(e),
-                'component_product': instance.product.name
-            }
-        )
+    # تجنب المعالجة المزدوجة
+    if getattr(instance, '_skip_bundle_recalc', False):
+        logger.debug(f"Skipping bundle recalculation for movement {instance.id} due to skip flag")
+        return
+    
+    # تسجيل المنتجات المجمعة المتأثرة فقط؛ إعادة الحساب مرة واحدة بعد الـ commit
+    BundleAvailabilityService.mark_components_changed(instance.product_id)
 
 
 @governed_signal_handler(
@@ -179,14 +113,11 @@ def handle_product_activation_change(sender, instance, created, **kwargs):
         if old_is_active is None or old_is_active == current_is_active:
             return
         
-        # البحث عن المنتجات المجمعة المتأثرة
-        affected_bundles = Product.objects.filter(
-            is_bundle=True,
-            is_active=True,
-            components__component_product=instance
-        ).distinct()
+        # البحث عن المنتجات المجمعة المتأثرة من الفهرس العكسي للمكونات
+        bundle_ids = BundleAvailabilityService.bundles_for_components([instance.id])
+        affected_bundles = list(Product.objects.filter(id__in=bundle_ids, is_bundle=True, is_active=True))
         
-        if not affected_bundles.exists():
+        if not affected_bundles:
             return
         
         activation_status = "تفعيل" if current_is_active else "إلغاء تفعيل"
@@ -202,28 +133,17 @@ def handle_product_activation_change(sender, instance, created, **kwargs):
             after_data={'is_active': current_is_active},
             additional_context={
                 'activation_status': activation_status,
-                'affected_bundles_count': affected_bundles.count()
+                'affected_bundles_count': len(affected_bundles)
             }
         )
         
-        
-        # إعادة حساب مخزون المنتجات المجمعة المتأثرة
-        recalculation_results = StockCalculationEngine.recalculate_affected_bundles(instance)
-        
-        # تسجيل النتائج وإنشاء إشعارات
-        for result in recalculation_results:
-            bundle = result['bundle_product']
-            old_stock = result.get('old_stock', 'غير محدد')
-            new_stock = result['new_stock']
-            
+        # إعادة حساب توفر المنتجات المجمعة المتأثرة بعد الـ commit
+        BundleAvailabilityService.mark_bundles_changed(*bundle_ids)
         
         # إنشاء إشعارات خاصة لحالات إلغاء التفعيل
         if not current_is_active:
             _create_component_deactivation_alerts(instance, affected_bundles)
         
-        # فحص تنبيهات المخزون المنخفض
-        _check_low_stock_alerts(recalculation_results)
-        
     except Exception as e:
         logger.error(f"Error handling product activation change for {instance.name}: {e}")
         
@@ -255,64 +175,59 @@ def recalculate_bundle_stock_on_direct_stock_change(sender, instance, **kwargs):
     يتعامل مع التغييرات المباشرة في جدول Stock (بدون حركة مخزون)
     
     Governed side effect handler: Recalculates bundle stock on direct stock changes
+    Requirements: 2.1
+    """
+    # حركات المخزون وتعديلات جدول Stock في نفس المعاملة تُدمج في إعادة حساب واحدة
+    BundleAvailabilityService.mark_components_changed(instance.product_id)
+
+
+@governed_signal_handler(
+    signal_name="bundle_components_change",
+    critical=False,
+    description="تحديث فهرس المكونات وتوفر المنتج المجمع عند تعديل مكوناته"
+)
+@receiver([post_save, post_delete], sender=BundleComponent)
+def refresh_bundle_on_component_change(sender, instance, **kwargs):
+    """
+    تعديل مكونات منتج مجمع يُبطل الفهرس العكسي للمكونات ويعيد حساب توفره بعد الـ commit
+    """
+    BundleAvailabilityService.invalidate_index()
+    BundleAvailabilityService.mark_bundles_changed(instance.bundle_product_id)
+
+
+@governed_signal_handler(
+    signal_name="bundle_availability_changed",
+    critical=False,
+    description="تسجيل تغير توفر المنتجات المجمعة وإنشاء تنبيهات المخزون المنخفض"
+)
+@receiver(bundle_availability_changed)
+def handle_bundle_availability_changed(sender, instance=None, results=(), **kwargs):
+    """
+    بعد إعادة حساب توفر المنتجات المجمعة (مرة واحدة لكل معاملة): تسجيل التدقيق
+    وتنبيهات المخزون المنخفض للمنتجات التي تغير المتاح منها فقط
+    
     Requirements: 2.1
     """
     try:
-        product = instance.product
-        
-        # تجنب المعالجة المزدوجة مع إشارة StockMovement
-        cache_key = f"bundle_recalc_stock_{product.id}_{timezone.now().timestamp():.0f}"
-        if cache.get(cache_key):
-            logger.debug(f"Skipping duplicate bundle recalculation for direct stock change: {product.name}")
-            return
-        cache.set(cache_key, True, timeout=5)  # منع المعالجة المزدوجة لمدة 5 ثوان
-        
-        # البحث عن المنتجات المجمعة المتأثرة
-        affected_bundles = Product.objects.filter(
-            is_bundle=True,
-            is_active=True,
-            components__component_product=product
-        ).distinct()
-        
-        if not affected_bundles.exists():
-            return
-        
-        # إعادة حساب مخزون المنتجات المجمعة المتأثرة
-        recalculation_results = StockCalculationEngine.recalculate_affected_bundles(product)
-        
-        # Audit direct stock change impact
         AuditService.create_audit_record(
-            model_name='Stock',
-            object_id=instance.id,
-            operation='BUNDLE_STOCK_DIRECT_RECALCULATION',
+            model_name='Product',
+            object_id=results[0]['bundle_product'].id,
+            operation='BUNDLE_STOCK_RECALCULATION',
             user=GovernanceContext.get_current_user(),
             source_service='BundleStockSignals',
             additional_context={
-                'component_product': product.name,
-                'affected_bundles_count': len(recalculation_results),
-                'stock_quantity': str(instance.quantity)
+                'affected_bundles_count': len(results),
+                'bundles': {
+                    str(result['bundle_product'].id): [result['old_stock'], result['new_stock']]
+                    for result in results
+                },
             }
         )
         
-        
-        # فحص تنبيهات المخزون المنخفض
-        _check_low_stock_alerts(recalculation_results)
+        _check_low_stock_alerts(results)
         
     except Exception as e:
-        logger.error(f"Error recalculating bundle stock after direct stock change for {instance.product.name}: {e}")
-        
-        # Audit error
-        AuditService.create_audit_record(
-            model_name='Stock',
-            object_id=instance.id,
-            operation='DIRECT_RECALCULATION_ERROR',
-            user=GovernanceContext.get_current_user(),
-            source_service='BundleStockSignals',
-            additional_context={
-                'error': str(e),
-                'component_product': instance.product.name
-            }
-        )
+        logger.error(f"Error handling bundle availability change: {e}")
 
 
 def _check_low_stock_alerts(recalculation_results):
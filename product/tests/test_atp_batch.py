@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات محرك الوفاء التجاري المجمّع (Batch ATP) للأوامر وعروض الأسعار
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from client.models import Customer
+from financial.exceptions import FinancialCoreError
+from product.models import BundleComponent, Category, Product, Stock, Unit, Warehouse
+from product.models.inventory_reservation import InventoryReservation, InventoryReservationAudit
+from product.services.atp_service import ATPService
+from product.services.inventory_reservation_service import InventoryReservationService
+from sale.models.sales_models import SalesOrder, SalesOrderItem
+
+User = get_user_model()
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'atp-batch-tests',
+    }
+}
+
+
+class BatchATPTest(TestCase):
+    """اختبارات تقييم أسطر الأمر كاملة بعدد ثابت من الاستعلامات"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="atp_batch_user", password="password123")
+        category = Category.objects.create(name="مكونات")
+        unit = Unit.objects.create(name="قطعة", symbol="PC")
+        self.warehouse = Warehouse.objects.create(code="WH-ATP-01", name="مخزن الوفاء", is_active=True)
+        self.customer = Customer.objects.create(name="عميل الوفاء", code="CUST-ATP-01")
+
+        def make(sku, **extra):
+            return Product.objects.create(
+                name=sku, sku=sku, category=category, unit=unit,
+                cost_price=Decimal("10.00"), selling_price=Decimal("15.00"), created_by=self.user, **extra
+            )
+
+        self.products = [make(f"ATP-{index:03d}") for index in range(40)]
+        for product in self.products:
+            Stock.objects.create(product=product, warehouse=self.warehouse, quantity=10)
+
+        self.bundle = make("ATP-BUNDLE", is_bundle=True)
+        BundleComponent.objects.create(bundle_product=self.bundle, component_product=self.products[0], required_quantity=2)
+        BundleComponent.objects.create(bundle_product=self.bundle, component_product=self.products[1], required_quantity=1)
+
+    def _sales_order(self, number, lines):
+        so = SalesOrder.objects.create(
+            order_number=number, customer=self.customer, warehouse=self.warehouse,
+            order_date=date(2026, 1, 15), created_by=self.user,
+        )
+        for product, qty in lines:
+            SalesOrderItem.objects.create(
+                sales_order=so, product=product, ordered_qty=Decimal(qty),
+                unit_price=Decimal("15.00"), line_total=Decimal("15.00") * Decimal(qty),
+            )
+        return so
+
+    def test_whole_order_evaluated_with_constant_queries(self):
+        lines = [(product.pk, product.pk, Decimal("4")) for product in self.products]
+        with self.assertNumQueries(4):
+            decisions = ATPService.evaluate_lines(self.warehouse.pk, lines)
+        self.assertEqual(len(decisions), 40)
+        self.assertTrue(all(decision.is_available for decision in decisions.values()))
+        self.assertEqual(decisions[self.products[5].pk].available_quantity, Decimal("10"))
+
+    def test_lines_consume_availability_cumulatively_including_bundles(self):
+        # البند المجمع يحتاج مكوّنين من المنتج 0 ومكوّناً من المنتج 1
+        lines = [
+            ("bundle", self.bundle.pk, Decimal("3")),
+            ("first", self.products[0].pk, Decimal("4")),
+            ("second", self.products[0].pk, Decimal("1")),
+        ]
+        decisions = ATPService.evaluate_lines(self.warehouse.pk, lines)
+
+        self.assertTrue(decisions["bundle"].is_available)
+        self.assertEqual(decisions["bundle"].available_quantity, Decimal("5"))
+        self.assertTrue(decisions["first"].is_available)
+        self.assertEqual(decisions["first"].available_quantity, Decimal("4"))
+        self.assertFalse(decisions["second"].is_available)
+        self.assertEqual(decisions["second"].shortage_quantity, Decimal("1"))
+
+    def test_bulk_reservation_and_bundle_reservations_reduce_components(self):
+        so = self._sales_order("SO-ATP-1", [(self.bundle, "2"), (self.products[2], "6")])
+
+        reservations = InventoryReservationService.reserve_sales_order_lines(so.pk, user=self.user)
+
+        self.assertEqual(len(reservations), 2)
+        self.assertTrue(all(res.pk for res in reservations))
+        audits = InventoryReservationAudit.objects.filter(reservation__sales_order=so)
+        self.assertEqual(audits.count(), 2)
+        self.assertTrue(all(audit.evidence_hash for audit in audits))
+
+        self.assertEqual(ATPService.get_atp_quantity(self.warehouse.pk, self.products[2].pk), Decimal("4"))
+        # حجز منتجين مجمعين يستهلك 4 من المكون الأول و2 من الثاني
+        self.assertEqual(ATPService.get_atp_quantity(self.warehouse.pk, self.products[0].pk), Decimal("6"))
+        self.assertEqual(ATPService.get_atp_quantity(self.warehouse.pk, self.bundle.pk), Decimal("3"))
+
+        oversold = self._sales_order("SO-ATP-2", [(self.products[2], "3"), (self.products[2], "3")])
+        with self.assertRaises(FinancialCoreError):
+            InventoryReservationService.reserve_sales_order_lines(oversold.pk, user=self.user)
+        self.assertFalse(InventoryReservation.objects.filter(sales_order=oversold).exists())
+
+    @override_settings(CACHES=LOCMEM_CACHE, ATP_SNAPSHOT_TIMEOUT=30)
+    def test_quotation_snapshot_served_from_cache(self):
+        cache.clear()
+        lines = [(product.pk, product.pk, Decimal("1")) for product in self.products[:10]]
+        ATPService.evaluate_lines(self.warehouse.pk, lines, snapshot=True)
+
+        # اللقطة من الكاش: يبقى فقط استعلام تركيبة المنتجات المجمعة
+        with self.assertNumQueries(1):
+            decisions = ATPService.evaluate_lines(self.warehouse.pk, lines, snapshot=True)
+        self.assertEqual(decisions[self.products[3].pk].available_quantity, Decimal("10"))
+
+        ATPService.invalidate_availability_snapshot(self.warehouse.pk, [self.products[3].pk])
+        Stock.objects.filter(product=self.products[3]).update(quantity=2)
+        decisions = ATPService.evaluate_lines(self.warehouse.pk, lines, snapshot=True)
+        self.assertEqual(decisions[self.products[3].pk].available_quantity, Decimal("2"))
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات محرك توفر المنتجات المجمعة لكل مخزن
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from product.models import BundleAvailability, BundleComponent, Category, Product, Stock, Unit, Warehouse
+from product.services.bundle_availability_service import BundleAvailabilityService
+from product.services.stock_calculation_engine import StockCalculationEngine
+
+User = get_user_model()
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bundle-availability-tests',
+    }
+}
+
+
+class BundleAvailabilityServiceTest(TestCase):
+    """اختبارات الحساب التجميعي لكل مخزن والتأجيل حتى الـ commit والفهرس العكسي"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="bundle_avail_user", password="testpass123")
+        self.category = Category.objects.create(name="فئة التوفر")
+        self.unit = Unit.objects.create(name="قطعة", symbol="قطعة")
+        self.main = Warehouse.objects.create(name="المخزن الرئيسي", code="BA-MAIN", manager=self.user)
+        self.branch = Warehouse.objects.create(name="مخزن الفرع", code="BA-BR", manager=self.user)
+        self.pen = self._product("قلم", "BA-PEN")
+        self.notebook = self._product("كشكول", "BA-NB")
+        self.kit = self._product("طقم مدرسي", "BA-KIT", is_bundle=True)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BundleComponent.objects.create(bundle_product=self.kit, component_product=self.pen, required_quantity=2)
+            BundleComponent.objects.create(bundle_product=self.kit, component_product=self.notebook, required_quantity=1)
+            self.main_pens = Stock.objects.create(product=self.pen, warehouse=self.main, quantity=11)
+            Stock.objects.create(product=self.notebook, warehouse=self.main, quantity=4)
+            # الفرع به أقلام فقط: لا يمكن تجميع أي طقم فيه
+            Stock.objects.create(product=self.pen, warehouse=self.branch, quantity=40)
+
+    def _product(self, name, sku, is_bundle=False):
+        return Product.objects.create(
+            name=name, sku=sku, category=self.category, unit=self.unit,
+            cost_price=Decimal("5.00"), selling_price=Decimal("8.00"),
+            is_bundle=is_bundle, created_by=self.user,
+        )
+
+    def test_availability_is_computed_per_warehouse(self):
+        # الرئيسي: min(11 // 2, 4 // 1) = 4، والفرع ينقصه الكشكول
+        self.assertEqual(BundleAvailabilityService.compute([self.kit.id]), {(self.kit.id, self.main.id): 4})
+        self.assertEqual(
+            list(BundleAvailability.objects.values_list("bundle_id", "warehouse_id", "quantity")),
+            [(self.kit.id, self.main.id, 4)],
+        )
+        self.assertEqual(BundleAvailabilityService.get_availability([self.kit.id], self.branch.id), {self.kit.id: 0})
+        self.assertEqual(StockCalculationEngine.calculate_bundle_stock(self.kit, use_cache=False), 4)
+        self.assertEqual(StockCalculationEngine.calculate_bundle_stock(self.kit, warehouse_id=self.branch.id), 0)
+
+        self.notebook.is_active = False
+        self.notebook.save()
+        self.assertEqual(BundleAvailabilityService.compute([self.kit.id]), {})
+
+    def test_recompute_is_deferred_to_commit_and_runs_once(self):
+        recompute = BundleAvailabilityService.recompute
+        with patch.object(BundleAvailabilityService, "recompute", wraps=recompute) as spy:
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(5):
+                    self.main_pens.quantity -= 1
+                    self.main_pens.save()
+                Stock.objects.create(product=self.notebook, warehouse=self.branch, quantity=10)
+                self.assertFalse(spy.called)
+                self.assertEqual(BundleAvailabilityService.totals([self.kit.id]), {self.kit.id: 4})
+
+        self.assertEqual(spy.call_count, 1)
+        self.assertEqual(
+            BundleAvailabilityService.get_availability([self.kit.id], self.main.id), {self.kit.id: 3}
+        )
+        self.assertEqual(
+            BundleAvailabilityService.get_availability([self.kit.id], self.branch.id), {self.kit.id: 10}
+        )
+        self.assertEqual(BundleAvailabilityService.totals([self.kit.id]), {self.kit.id: 13})
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_component_index_follows_bundle_changes(self):
+        cache.clear()
+        self.assertEqual(BundleAvailabilityService.bundles_for_components([self.pen.id]), {self.kit.id})
+
+        gift = self._product("علبة هدية", "BA-GIFT", is_bundle=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            BundleComponent.objects.create(bundle_product=gift, component_product=self.pen, required_quantity=5)
+        self.assertEqual(BundleAvailabilityService.bundles_for_components([self.pen.id]), {self.kit.id, gift.id})
+        self.assertEqual(BundleAvailabilityService.get_availability([gift.id], self.branch.id), {gift.id: 8})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            gift.components.all().delete()
+        self.assertEqual(BundleAvailabilityService.bundles_for_components([self.pen.id]), {self.kit.id})
+        self.assertEqual(BundleAvailabilityService.totals([gift.id]), {gift.id: 0})
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات الانتقاء المجمّع ومسار الانتقاء حسب تخطيط المخزن واقتراح مواقع التخزين
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from product.models import Category, Product, Unit, Warehouse
+from product.models.location_system import LocationShelf, ProductLocation
+from product.services.location_service import LocationService
+from product.services.picking_engine import PickingWaveService, WarehouseLayout
+
+User = get_user_model()
+
+
+class PickingWaveTest(TestCase):
+    """اختبارات موجات الانتقاء والمسارات"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="wave_user", password="password123")
+        category = Category.objects.create(name="انتقاء")
+        unit = Unit.objects.create(name="قطعة", symbol="PC")
+        self.warehouse = Warehouse.objects.create(code="WH-WAVE-01", name="مخزن الانتقاء", is_active=True)
+
+        LocationService.create_warehouse_structure(self.warehouse, [
+            {
+                "name": "منطقة التخزين",
+                "code": "Z1",
+                "aisles": [
+                    {
+                        "name": f"ممر {aisle}",
+                        "code": f"A{aisle}",
+                        "sequence": aisle,
+                        "shelves": [
+                            {"name": f"رف {aisle}-{shelf}", "code": f"A{aisle}-S{shelf}", "sequence": shelf}
+                            for shelf in range(1, 6)
+                        ],
+                    }
+                    for aisle in range(1, 5)
+                ],
+            }
+        ], user=self.user)
+        self.shelves = {
+            shelf.code: shelf for shelf in LocationShelf.objects.filter(aisle__zone__warehouse=self.warehouse)
+        }
+
+        def make(sku):
+            return Product.objects.create(
+                name=sku, sku=sku, category=category, unit=unit,
+                cost_price=Decimal("5.00"), selling_price=Decimal("8.00"), created_by=self.user,
+            )
+
+        self.products = {}
+        for code in ("A1-S5", "A2-S1", "A3-S3", "A4-S5", "A1-S2"):
+            product = make(f"WAVE-{code}")
+            self.products[code] = product
+            ProductLocation.objects.create(
+                product=product, shelf=self.shelves[code], current_quantity=20, max_quantity=100,
+                created_by=self.user,
+            )
+
+    def _orders(self):
+        p = self.products
+        return [
+            {"order": "SO-1", "items": [{"product": p["A1-S5"], "quantity": 2}, {"product": p["A3-S3"], "quantity": 1}]},
+            {"order": "SO-2", "items": [{"product": p["A1-S5"], "quantity": 3}, {"product": p["A4-S5"], "quantity": 4}]},
+            {"order": "SO-3", "items": [{"product": p["A2-S1"], "quantity": 1}, {"product": p["A3-S3"], "quantity": 2}]},
+            {"order": "SO-4", "items": [{"product": p["A1-S2"], "quantity": 5}, {"product": p["A4-S5"], "quantity": 1}]},
+        ]
+
+    def test_wave_merges_orders_per_location_and_beats_single_order_picking(self):
+        layout = WarehouseLayout.load(self.warehouse)
+        with self.assertNumQueries(1):
+            wave = PickingWaveService.build_wave(self.warehouse, self._orders(), layout=layout)
+
+        self.assertEqual(wave["unfulfilled"], [])
+        route = wave["pickers"][0]["route"]
+        self.assertEqual(len(route), 5)
+        by_code = {stop["location"].shelf.code: stop for stop in route}
+        self.assertEqual(by_code["A1-S5"]["quantity"], 5)
+        self.assertEqual(by_code["A1-S5"]["orders"], {"SO-1": 2, "SO-2": 3})
+        self.assertEqual([stop["sequence"] for stop in route], [1, 2, 3, 4, 5])
+        self.assertLess(wave["total_distance"], wave["single_order_distance"])
+
+    def test_orders_are_split_between_pickers_by_area(self):
+        wave = LocationService.generate_wave_picking(self.warehouse, self._orders(), pickers=2, strategy="s_shape")
+
+        self.assertEqual(len(wave["pickers"]), 2)
+        assigned = [ref for picker in wave["pickers"] for ref in picker["orders"]]
+        self.assertCountEqual(assigned, ["SO-1", "SO-2", "SO-3", "SO-4"])
+        self.assertTrue(all(picker["orders"] for picker in wave["pickers"]))
+        self.assertAlmostEqual(
+            wave["total_distance"], sum(picker["distance"] for picker in wave["pickers"]), places=2
+        )
+
+    def test_single_order_route_follows_layout_and_reports_shortage(self):
+        p = self.products
+        route = LocationService.generate_picking_route(self.warehouse, [
+            {"product": p["A4-S5"], "quantity": 1},
+            {"product": p["A1-S2"], "quantity": 1},
+            {"product": p["A1-S5"], "quantity": 1},
+        ])
+        # الممر الأول بالكامل قبل الانتقال إلى الممر الرابع
+        self.assertEqual(
+            [stop["location"].shelf.code for stop in route], ["A1-S2", "A1-S5", "A4-S5"]
+        )
+
+        wave = LocationService.generate_wave_picking(
+            self.warehouse, [{"order": "SO-9", "items": [{"product": p["A2-S1"], "quantity": 25}]}]
+        )
+        self.assertEqual(wave["unfulfilled"][0]["quantity"], 5)
+
+    def test_putaway_uses_best_fit_and_tracks_capacity_within_a_plan(self):
+        product = self.products["A1-S5"]
+        ProductLocation.objects.create(
+            product=product, shelf=self.shelves["A2-S3"], current_quantity=90, max_quantity=100, created_by=self.user
+        )
+        empty = ProductLocation.objects.create(
+            product=self.products["A2-S1"], shelf=self.shelves["A3-S1"], current_quantity=0, created_by=self.user
+        )
+
+        # أصغر سعة حرة كافية: الموقع الذي به 10 فقط بدلاً من الذي به 80
+        best = LocationService.find_optimal_location(product, self.warehouse, 8)
+        self.assertEqual(best.shelf.code, "A2-S3")
+
+        placements = LocationService.plan_putaway(self.warehouse, [
+            {"product": product, "quantity": 8},
+            {"product": product, "quantity": 8},
+            {"product": product, "quantity": 500},
+        ])
+        self.assertEqual(placements[0]["location"].shelf.code, "A2-S3")
+        self.assertEqual(placements[1]["location"].shelf.code, "A1-S5")
+        self.assertEqual(placements[2]["location"].pk, empty.pk)
+        empty.refresh_from_db()
+        self.assertEqual(empty.product, product)
+
+        # الكميات المخططة لا تُكتب على كائنات المواقع المُعادة
+        self.assertEqual(placements[0]["location"].current_quantity, 90)
+        self.assertEqual(placements[2]["location"].current_quantity, 0)
+        self.assertEqual(placements[2]["location"].product_id, product.pk)
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+اختبارات إنهاء صلاحية الحجوزات الجماعي والتخصيص حسب الأولوية لعدة منتجات
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from client.models import Customer
+from product.models import Category, Product, Stock, StockReservation, Unit, Warehouse
+from product.models.inventory_reservation import InventoryReservation, InventoryReservationAudit
+from product.models.reservation_system import ReservationFulfillment
+from product.services.inventory_reservation_service import InventoryReservationService
+from product.services.reservation_service import ReservationService
+from sale.models.sales_models import SalesOrder, SalesOrderItem
+
+User = get_user_model()
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'reservation-sweep-tests',
+    }
+}
+
+
+class ReservationSweepTest(TestCase):
+    """اختبارات تنظيف الحجوزات المنتهية بعبارات جماعية"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="sweep_user", password="password123")
+        category = Category.objects.create(name="موسمي")
+        unit = Unit.objects.create(name="قطعة", symbol="PC")
+        self.warehouse = Warehouse.objects.create(code="WH-SWP-01", name="مخزن الموسم", is_active=True)
+        self.products = [
+            Product.objects.create(
+                name=f"منتج موسمي {index}", sku=f"SWP-{index}", category=category, unit=unit,
+                cost_price=Decimal("5.00"), selling_price=Decimal("9.00"), created_by=self.user,
+            )
+            for index in range(2)
+        ]
+        for product in self.products:
+            Stock.objects.create(product=product, warehouse=self.warehouse, quantity=100)
+
+    def _reserve(self, product, quantity, priority=5, expired=False):
+        reservation = ReservationService.create_reservation(
+            product, self.warehouse, quantity, user=self.user, priority=priority
+        )
+        if expired:
+            StockReservation.objects.filter(pk=reservation.pk).update(
+                expires_at=timezone.now() - timedelta(hours=1)
+            )
+        return reservation
+
+    def test_expired_reservations_swept_in_batches_and_stock_released(self):
+        expired = [self._reserve(self.products[0], 10, expired=True) for _ in range(3)]
+        expired.append(self._reserve(self.products[1], 5, expired=True))
+        live = self._reserve(self.products[0], 20)
+        before_sweep = timezone.now()
+
+        result = ReservationService.expire_reservations(batch_size=2)
+
+        self.assertEqual(result["expired"], 4)
+        self.assertEqual(
+            set(StockReservation.objects.filter(pk__in=[r.pk for r in expired]).values_list("status", flat=True)),
+            {"expired"},
+        )
+        self.assertEqual(StockReservation.objects.get(pk=live.pk).status, "active")
+        self.assertEqual(ReservationFulfillment.objects.filter(reservation__status="expired").count(), 4)
+
+        stock = Stock.objects.get(product=self.products[0], warehouse=self.warehouse)
+        self.assertEqual(stock.reserved_quantity, 20)
+        self.assertGreaterEqual(stock.updated_at, before_sweep)
+        self.assertEqual(result["available"][(self.products[0].pk, self.warehouse.pk)], 80)
+        self.assertEqual(result["available"][(self.products[1].pk, self.warehouse.pk)], 100)
+
+        # تشغيل ثانٍ لا يجد شيئاً
+        self.assertEqual(ReservationService.auto_expire_reservations(), 0)
+
+    @override_settings(CACHES=LOCMEM_CACHE)
+    def test_overlapping_sweep_is_skipped(self):
+        cache.clear()
+        self._reserve(self.products[0], 10, expired=True)
+        cache.add("reservation_sweep_lock:stock_reservation", "locked", timeout=60)
+
+        result = ReservationService.expire_reservations()
+        self.assertTrue(result["skipped"])
+        self.assertEqual(StockReservation.objects.filter(status="active").count(), 1)
+
+    def test_priority_allocation_over_many_products(self):
+        urgent = self._reserve(self.products[0], 30, priority=1)
+        normal = self._reserve(self.products[0], 50, priority=5)
+        other = self._reserve(self.products[1], 15, priority=3)
+
+        with self.assertNumQueries(1):
+            result = ReservationService.allocate_stock_by_priority_bulk(
+                self.warehouse, {self.products[0].pk: 60, self.products[1].pk: 10}
+            )
+
+        first = result[self.products[0].pk]
+        self.assertEqual(first["total_allocated"], 60)
+        self.assertEqual([a["reservation"].pk for a in first["allocations"]], [urgent.pk, normal.pk])
+        self.assertEqual([a["status"] for a in first["allocations"]], ["allocated", "partial"])
+        self.assertEqual(result[self.products[1].pk]["allocations"][0]["reservation"].pk, other.pk)
+        self.assertEqual(result[self.products[1].pk]["remaining_stock"], 0)
+
+        single = ReservationService.allocate_stock_by_priority(self.products[0], self.warehouse, 10)
+        self.assertEqual(single["allocations"][1]["status"], "waiting")
+
+    def test_sales_order_reservation_sweep_skips_closed_reservations(self):
+        customer = Customer.objects.create(name="عميل الموسم", code="CUST-SWP-01")
+        so = SalesOrder.objects.create(
+            order_number="SO-SWP-1", customer=customer, warehouse=self.warehouse,
+            order_date=date(2026, 1, 15), created_by=self.user,
+        )
+        line = SalesOrderItem.objects.create(
+            sales_order=so, product=self.products[0], ordered_qty=Decimal("4"),
+            unit_price=Decimal("9.00"), line_total=Decimal("36.00"),
+        )
+        past = timezone.now() - timedelta(days=1)
+
+        def reservation(status):
+            return InventoryReservation.objects.create(
+                sales_order=so, sales_order_line=line, product=self.products[0], warehouse=self.warehouse,
+                quantity=Decimal("4"), reservation_status=status, expires_at=past,
+            )
+
+        active, partial, cancelled = reservation("ACTIVE"), reservation("PARTIALLY_FULFILLED"), reservation("CANCELLED")
+
+        swept = InventoryReservationService.sweep_expired_reservations(user=self.user, batch_size=1)
+
+        self.assertEqual(sorted(res.pk for res in swept), sorted([active.pk, partial.pk]))
+        self.assertEqual(InventoryReservation.objects.get(pk=cancelled.pk).reservation_status, "CANCELLED")
+        self.assertEqual(
+            InventoryReservationAudit.objects.filter(action="EXPIRED", reservation__sales_order=so).count(), 2
+        )
+        self.assertEqual(InventoryReservationService.sweep_expired_reservations(user=self.user), [])
@@ -1,4 +1,5 @@
 import pytest
+from datetime import datetime, timedelta
 from decimal import Decimal
 from django.utils import timezone
 from django.contrib.auth import get_user_model
@@ -52,3 +53,62 @@ class TestStockLedgerService:
         # Balance check
         calc_bal = StockLedgerService.get_product_stock_balance(product, warehouse)
         assert calc_bal == Decimal("50.0000")
+
+    def _backdate(self, entry, when):
+        StockLedgerEntry.objects.filter(pk=entry.pk).update(created_at=when)
+
+    def test_running_balances_carry_forward_from_latest_entry(self, setup_stock_ledger_data):
+        user, product, warehouse, unit = setup_stock_ledger_data
+
+        StockLedgerService.record_movement_entry(
+            product, warehouse, "RECEIPT", Decimal("10.0000"), Decimal("5.0000"), "RUN-REC-1"
+        )
+        StockLedgerService.record_movement_entry(
+            product, warehouse, "RECEIPT", Decimal("6.0000"), Decimal("10.0000"), "RUN-REC-2"
+        )
+        issue = StockLedgerService.record_movement_entry(
+            product, warehouse, "ISSUE", Decimal("-4.0000"), Decimal("5.0000"), "RUN-ISS-1"
+        )
+
+        assert issue.qty_balance_after == Decimal("12.0000")
+        assert issue.val_balance_after == Decimal("90.00")
+        assert StockLedgerService.get_product_stock_balance(product, warehouse) == Decimal("12.0000")
+
+        StockLedgerEntry.objects.filter(pk=issue.pk).update(qty_balance_after=0, val_balance_after=0)
+        assert StockLedgerService.recompute_running_balances(product=product) == 1
+        issue.refresh_from_db()
+        assert (issue.qty_balance_after, issue.val_balance_after) == (Decimal("12.0000"), Decimal("90.00"))
+
+    def test_point_in_time_balances_with_monthly_checkpoint(self, setup_stock_ledger_data):
+        user, product, warehouse, unit = setup_stock_ledger_data
+        other_wh = Warehouse.objects.create(name="Branch WH", code="WH-BRANCH", is_active=True)
+        tz = timezone.get_current_timezone()
+        jan = datetime(2026, 1, 15, 10, 0, tzinfo=tz)
+        feb = datetime(2026, 2, 10, 10, 0, tzinfo=tz)
+        mar = datetime(2026, 3, 5, 10, 0, tzinfo=tz)
+
+        self._backdate(StockLedgerService.record_movement_entry(
+            product, warehouse, "RECEIPT", Decimal("20.0000"), Decimal("10.0000"), "PIT-1"), jan)
+        self._backdate(StockLedgerService.record_movement_entry(
+            product, other_wh, "RECEIPT", Decimal("7.0000"), Decimal("10.0000"), "PIT-2"), jan)
+        self._backdate(StockLedgerService.record_movement_entry(
+            product, warehouse, "ISSUE", Decimal("-5.0000"), Decimal("10.0000"), "PIT-3"), feb)
+        self._backdate(StockLedgerService.record_movement_entry(
+            product, warehouse, "RECEIPT", Decimal("1.0000"), Decimal("10.0000"), "PIT-4"), mar)
+
+        assert StockLedgerService.get_stock_as_of(product, warehouse, jan.date())["quantity"] == Decimal("20.0000")
+        assert StockLedgerService.get_stock_as_of(product, warehouse, feb)["quantity"] == Decimal("20.0000")
+        assert StockLedgerService.get_stock_as_of(product, warehouse, feb.date())["value"] == Decimal("150.00")
+
+        without_checkpoint = StockLedgerService.get_stock_balances_as_of(feb.date() + timedelta(days=30))
+        assert StockLedgerService.build_monthly_checkpoint(jan.date()) == 2
+        assert StockLedgerService.build_monthly_checkpoint(feb.date()) == 2
+
+        with_checkpoint = StockLedgerService.get_stock_balances_as_of(feb.date() + timedelta(days=30))
+        assert with_checkpoint == without_checkpoint
+        assert with_checkpoint[(product.id, warehouse.id)]["quantity"] == Decimal("16.0000")
+        assert with_checkpoint[(product.id, other_wh.id)]["quantity"] == Decimal("7.0000")
+
+        feb_end = StockLedgerService.get_stock_balances_as_of(feb.date().replace(day=28), warehouse=warehouse)
+        assert list(feb_end) == [(product.id, warehouse.id)]
+        assert feb_end[(product.id, warehouse.id)]["quantity"] == Decimal("15.0000")
@@ -108,6 +108,7 @@ def invoice_product_lookup(request):
         # 3. مطابقة الكود/الباركود/الاسم بما يشمل باركودات المتغيرات (ProductVariant)
         variant_matches = {}
         matched_variant_product_ids = set()
+        ranked_ids = None
 
         if query:
             # البحث في المتغيرات
@@ -127,13 +128,11 @@ def invoice_product_lookup(request):
         elif exact:
             qs = qs.filter(Q(sku__iexact=query) | Q(barcode__iexact=query) | Q(id__in=matched_variant_product_ids))
         elif query:
-            qs = qs.filter(
-                Q(name__icontains=query) |
-                Q(name_en__icontains=query) |
-                Q(sku__icontains=query) |
-                Q(barcode__icontains=query) |
-                Q(id__in=matched_variant_product_ids)
-            )
+            # فهرس البحث: بادئات مطبّعة عربياً + مطابقة الأكواد + ترتيب تقريبي
+            from core.services.search_index import SearchIndexService
+            ranked_ids = SearchIndexService.search("product", query, limit=None, queryset=qs).ids
+            ranked_ids += sorted(matched_variant_product_ids - set(ranked_ids))
+            qs = qs.filter(id__in=ranked_ids)
 
         # 4. جلب كميات المخزون
         stock_map = {}
@@ -192,7 +191,12 @@ def invoice_product_lookup(request):
         is_foreign = (currency_obj and not currency_obj.is_functional)
         curr_code = currency_obj.code if currency_obj else None
 
-        for p in qs.order_by("name"):
+        products_iter = qs.order_by("name")
+        if ranked_ids is not None:
+            rank = {pid: i for i, pid in enumerate(ranked_ids)}
+            products_iter = sorted(products_iter, key=lambda p: rank.get(p.id, len(rank)))
+
+        for p in products_iter:
             stock_qty = stock_map.get(str(p.id), 0.0)
             if not show_all and stock_qty <= 0 and not p.is_service:
                 continue
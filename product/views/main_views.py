@@ -163,24 +163,6 @@ logger = logging.getLogger(__name__)
 
 
 @login_required
-def _calculate_bundle_stock_from_prefetch(bundle_product):
-    """
-    حساب مخزون المنتج المجمع من الـ prefetched data بدون queries إضافية
-    """
-    components = bundle_product.components.all()
-    if not components:
-        return 0
-    min_bundles = float('inf')
-    for component in components:
-        if not component.component_product.is_active:
-            return 0
-        comp_stock = sum(s.quantity for s in component.component_product.stocks.all())
-        if comp_stock <= 0:
-            return 0
-        min_bundles = min(min_bundles, comp_stock // component.required_quantity)
-    return int(min_bundles) if min_bundles != float('inf') else 0
-
-
 def product_list(request):
     """
     عرض قائمة المنتجات (بدون الخدمات) - مع Ajax search و DB-level pagination
@@ -192,7 +174,6 @@ def product_list(request):
             .prefetch_related(
                 "stocks",
                 "images",
-                "components__component_product__stocks",  # للـ bundles
             )
             .filter(is_service=False)
             .annotate(
@@ -217,13 +198,8 @@ def product_list(request):
 
         # تطبيق الفلاتر
         if search_query:
-            products = products.filter(
-                Q(name__icontains=search_query) |
-                Q(name_en__icontains=search_query) |
-                Q(sku__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(description_en__icontains=search_query)
-            )
+            from core.services.search_index import SearchIndexService
+            products = products.filter(id__in=SearchIndexService.search_ids("product", search_query))
         if status == "active":
             products = products.filter(is_active=True)
         elif status == "inactive":
@@ -316,6 +292,10 @@ def product_list(request):
         ]
 
         def build_table_data(page):
+            from ..services.bundle_availability_service import BundleAvailabilityService
+
+            # مخزون المنتجات المجمعة من جدول التوفر مباشرة (استعلام واحد للصفحة)
+            bundle_stock = BundleAvailabilityService.totals(p.id for p in page if p.is_bundle)
             rows = []
             for product in page:
                 if product.is_bundle:
@@ -348,7 +328,7 @@ def product_list(request):
 
                 stock_val = product.total_stock or 0
                 if product.is_bundle:
-                    stock_val = _calculate_bundle_stock_from_prefetch(product)
+                    stock_val = bundle_stock[product.id]
 
                 if stock_val <= 0:
                     stock_html = '<span class="badge bg-secondary-subtle text-secondary border border-secondary opacity-50 fw-bold"><i class="fas fa-boxes me-1"></i>0</span>'
@@ -4110,6 +4090,13 @@ def get_products_for_invoice(request):
     warehouse_id = request.GET.get("warehouse")
     show_all = request.GET.get("show_all", "false") == "true"
     product_type = request.GET.get("type", "sale")
+    search_query = request.GET.get("q", "").strip()
+
+    try:
+        limit = int(request.GET["limit"]) if request.GET.get("limit") else None
+        offset = max(0, int(request.GET.get("offset", 0)))
+    except (TypeError, ValueError):
+        return JsonResponse({"error": "معاملات الصفحة غير صحيحة"}, status=400)
 
     try:
         # فلترة المنتجات حسب النوع
@@ -4127,6 +4114,13 @@ def get_products_for_invoice(request):
             else:  # both
                 qs = Product.objects.filter(is_active=True, is_bundle=False)
 
+        # تضييق النتائج من فهرس البحث قبل حساب المخزون (بدلاً من كل المنتجات النشطة)
+        ranked_ids = None
+        if search_query:
+            from core.services.search_index import SearchIndexService
+            ranked_ids = SearchIndexService.search("product", search_query, limit=None, queryset=qs).ids
+            qs = qs.filter(id__in=ranked_ids)
+
         # جلب بيانات المخزون
         stock_map = {}
         if warehouse_id:
@@ -4156,8 +4150,16 @@ def get_products_for_invoice(request):
             else:
                 qs = qs.filter(id__in=product_ids_with_stock)
 
+        qs = qs.select_related('category').order_by("name")
+        if ranked_ids is not None:
+            rank = {pid: i for i, pid in enumerate(ranked_ids)}
+            qs = sorted(qs, key=lambda p: rank.get(p.id, len(rank)))
+        total = len(qs)
+        if limit is not None:
+            qs = qs[offset:offset + max(1, min(limit, 200))]
+
         products = []
-        for p in qs.select_related('category').order_by("name"):
+        for p in qs:
             products.append({
                 "id": p.id,
                 "name": p.name,
@@ -4171,7 +4173,13 @@ def get_products_for_invoice(request):
                 "category_name": p.category.name if p.category else "",
             })
 
-        return JsonResponse({"products": products})
+        if limit is None:
+            return JsonResponse({"products": products})
+        return JsonResponse({
+            "products": products,
+            "total": total,
+            "has_more": offset + len(products) < total,
+        })
 
     except Exception as e:
         logger.error(f"خطأ في API المنتجات: {str(e)}")
@@ -5133,8 +5141,7 @@ def get_available_products_ajax(request):
     products = Product.objects.filter(
         is_active=True,
         is_bundle=False,
-        name__icontains=search_term
-    )
+    ).select_related('category', 'unit')
     
     # استبعاد المنتج المجمع نفسه
     if bundle_id:
@@ -5151,9 +5158,18 @@ def get_available_products_ajax(request):
         exclude_list = [int(x) for x in exclude_ids.split(',') if x.strip().isdigit()]
         products = products.exclude(pk__in=exclude_list)
     
+    # البحث المرتب من فهرس البحث (حد أقصى 50 نتيجة)
+    if search_term.strip():
+        from core.services.search_index import SearchIndexService
+        ranked_ids = SearchIndexService.search("product", search_term, limit=50, queryset=products).ids
+        by_id = products.in_bulk(ranked_ids)
+        products = [by_id[pk] for pk in ranked_ids if pk in by_id]
+    else:
+        products = products[:50]
+
     # تحضير البيانات للإرجاع
     results = []
-    for product in products[:50]:  # حد أقصى 50 نتيجة
+    for product in products:
         results.append({
             'id': product.id,
             'text': f"{product.name} ({product.sku})",
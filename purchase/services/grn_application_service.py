@@ -180,6 +180,13 @@ class GRNApplicationService:
         """تفويض الترحيل النهائي لـ GRNPostingService"""
         return GRNPostingService.post_grn(grn_id=grn_id, user=user, reason=reason)
 
+    @classmethod
+    def post_grns(cls, grn_ids, user, reason: str = "", consolidate_journal: bool = False):
+        """تفويض الترحيل الجماعي لدفعة أذون لـ GRNPostingService"""
+        return GRNPostingService.post_grns(
+            grn_ids=grn_ids, user=user, reason=reason, consolidate_journal=consolidate_journal
+        )
+
     @classmethod
     def reverse_grn(cls, grn_id: int, user, reason: str) -> GoodsReceivedNote:
         """تفويض العكس والقيد المعاكس لـ GRNReversalService"""
@@ -13,7 +13,6 @@ from purchase.models.procurement_models import (
 )
 from purchase.models.grn_audit_log import GRNAuditLog
 from purchase.models.grn_posting_log import GRNPostingLog
-from governance.services.movement_service import MovementService
 from financial.services.ledger_core_service import LedgerCoreService
 from financial.services.role_registry import AccountRoleRegistry, AccountRoleNames
 from financial.exceptions import FinancialCoreError
@@ -28,7 +27,7 @@ class GRNPostingService:
     """
 
     @classmethod
-    def resolve_inventory_account(cls, product, warehouse):
+    def resolve_inventory_account(cls, product, warehouse, memo: Optional[Dict] = None):
         """
         تحديد كود وحساب الأصول المخزنية هرمياً (Hierarchical Account Resolution Priority):
         1. Product Specific Account
@@ -36,11 +35,23 @@ class GRNPostingService:
         3. Warehouse Inventory Account
         4. AccountRoleRegistry ("INVENTORY_CONTROL_ACCOUNT" / "INVENTORY_ASSET")
         5. ChartOfAccounts Fallback
+
+        memo: قاموس يُمرر عبر الترحيل الواحد ليُحل الحساب مرة واحدة لكل (فئة، مخزن)
         """
+        if getattr(product, "inventory_account", None):
+            return product.inventory_account
+        if memo is None:
+            return cls._resolve_inventory_account(product, warehouse)
+
+        key = ("inventory", getattr(product, "category_id", None), getattr(warehouse, "pk", None))
+        if key not in memo:
+            memo[key] = cls._resolve_inventory_account(product, warehouse)
+        return memo[key]
+
+    @classmethod
+    def _resolve_inventory_account(cls, product, warehouse):
         acc = None
-        if hasattr(product, "inventory_account") and product.inventory_account:
-            acc = product.inventory_account
-        elif hasattr(product, "category") and product.category and hasattr(product.category, "inventory_account") and product.category.inventory_account:
+        if hasattr(product, "category") and product.category and hasattr(product.category, "inventory_account") and product.category.inventory_account:
             acc = product.category.inventory_account
         elif hasattr(warehouse, "inventory_account") and warehouse.inventory_account:
             acc = warehouse.inventory_account
@@ -66,10 +77,18 @@ class GRNPostingService:
         return leaf_accounts.first()
 
     @classmethod
-    def resolve_grni_account(cls):
+    def resolve_grni_account(cls, memo: Optional[Dict] = None):
         """
         تحديد كود وحساب GRNI الاستحقاقي عبر AccountRoleRegistry والبحث الهرمي
         """
+        if memo is None:
+            return cls._resolve_grni_account()
+        if "grni" not in memo:
+            memo["grni"] = cls._resolve_grni_account()
+        return memo["grni"]
+
+    @classmethod
+    def _resolve_grni_account(cls):
         grni_acc = AccountRoleRegistry.get_account_by_role("GRNI_CLEARING")
         if grni_acc and getattr(grni_acc, "is_active", True):
             return grni_acc
@@ -93,145 +112,308 @@ class GRNPostingService:
     def post_grn(cls, grn_id: int, user, reason: str = "") -> GoodsReceivedNote:
         """
         تنفيذ الترحيل الفعلي لإذن الاستلام بـ transaction.atomic() ونقل الإشعارات لـ on_commit
+        (دفعة من إذن واحد عبر post_grns حتى يُنتج الإذن نفس حركات المخزون وقيد الأستاذ أياً كانت نقطة الدخول)
         """
-        with transaction.atomic():
-            grn = GoodsReceivedNote.objects.select_for_update().get(pk=grn_id)
-
-            if grn.status in ["POSTED", "REVERSED"]:
-                raise FinancialCoreError(f"لا يمكن ترحيل إذن استلام بحالة {grn.get_status_display()}.")
+        return cls.post_grns([grn_id], user=user, reason=reason or "Posting GRN")[0]
 
-            # استدعاء خدمة التحقق
-            from .grn_validation_service import GRNValidationService
-            GRNValidationService.validate_grn_for_posting(grn)
-
-            movement_service = MovementService()
-            stock_movements_count = 0
-            lines_data = []
-            total_grn_cost = Decimal("0.00")
-
-            from governance.services.accounting_gateway import AccountingGateway, JournalEntryLineData
+    @classmethod
+    def post_grns(
+        cls,
+        grn_ids: List[int],
+        user,
+        reason: str = "",
+        consolidate_journal: bool = False
+    ) -> List[GoodsReceivedNote]:
+        """
+        ترحيل دفعة أذون استلام (مثل حاوية مقسمة على عدة أذون) في معاملة واحدة بعدد ثابت من الاستعلامات:
+        - قفل كل أرصدة المخزون المستهدفة باستعلام select_for_update واحد مرتب بالمفتاح (منتج، مخزن)
+        - تطبيق فروق الكميات بتحديث F() واحد وإنشاء الأرصدة الجديدة جماعياً
+        - حل الحسابات مرة واحدة لكل (فئة، مخزن) من قاموس مشترك للدفعة
+        - consolidate_journal: قيد واحد للدفعة بسطور فرعية لكل إذن (مدين لكل حساب مخزون ودائن GRNI)
+          بدلاً من قيد لكل إذن
+        - سجلات الترحيل والتدقيق وحركات المخزون تُدرج جماعياً
+
+        حركات المخزون تُربط بقيد الإذن (أو قيد الدفعة) مباشرة، فلا يُنشأ قيد منفصل لكل حركة.
+        """
+        from django.db.models import Case, DecimalField, F, PositiveIntegerField, Value, When
+        from core.enums.document_types import DocumentType
+        from core.services.sequence_service import SequenceService
+        from governance.services.accounting_gateway import AccountingGateway, JournalEntryLineData
+        from product.models.stock_management import Stock, StockMovement
+        from product.services.bundle_availability_service import BundleAvailabilityService
+        from .grn_validation_service import GRNValidationService
+
+        grn_ids = sorted(set(grn_ids))
+        if not grn_ids:
+            return []
 
-            # 1. إمرار حركات المخزون وتجميع قيود الأستاذ لكل بند
-            for item in grn.items.select_related("product", "po_item").all():
-                received_qty = item.received_qty
-                if received_qty <= Decimal("0.0000"):
-                    continue
+        with transaction.atomic():
+            # 1. قفل الأذون والتحقق منها
+            grns = list(
+                GoodsReceivedNote.objects.select_for_update(of=("self",))
+                .select_related("warehouse")
+                .filter(pk__in=grn_ids)
+                .order_by("pk")
+            )
+            missing = set(grn_ids) - {grn.pk for grn in grns}
+            if missing:
+                raise FinancialCoreError(f"أذون استلام غير موجودة: {sorted(missing)}.")
+
+            items_by_grn = {grn.pk: [] for grn in grns}
+            for item in (
+                GoodsReceivedNoteItem.objects.filter(grn_id__in=grn_ids, received_qty__gt=Decimal("0.0000"))
+                .select_related("product__category", "po_item")
+                .order_by("grn_id", "pk")
+            ):
+                items_by_grn[item.grn_id].append(item)
+
+            received_so_far = {}
+            for grn in grns:
+                if grn.status in ["POSTED", "REVERSED"]:
+                    raise FinancialCoreError(
+                        f"لا يمكن ترحيل إذن الاستلام #{grn.grn_number} بحالة {grn.get_status_display()}."
+                    )
+                GRNValidationService.validate_grn_for_posting(grn, items_by_grn[grn.pk], received_so_far)
+
+            # 2. تجميع فروق المخزون لكل (منتج، مخزن) وقفل الأرصدة المستهدفة بترتيب ثابت
+            deltas = {}
+            for grn in grns:
+                for item in items_by_grn[grn.pk]:
+                    key = (item.product_id, grn.warehouse_id)
+                    deltas[key] = deltas.get(key, 0) + int(item.received_qty)
+
+            product_ids = {product_id for product_id, _ in deltas}
+            stocks = {
+                (stock.product_id, stock.warehouse_id): stock
+                for stock in Stock.objects.select_for_update()
+                .filter(product_id__in=product_ids, warehouse_id__in={wh_id for _, wh_id in deltas})
+                .order_by("product_id", "warehouse_id")
+                if (stock.product_id, stock.warehouse_id) in deltas
+            }
+
+            now = timezone.now()
+            if stocks:
+                Stock.objects.filter(pk__in=[stock.pk for stock in stocks.values()]).update(
+                    quantity=F("quantity") + Case(
+                        *[When(pk=stock.pk, then=Value(deltas[key])) for key, stock in stocks.items()],
+                        default=Value(0),
+                        output_field=PositiveIntegerField(),
+                    ),
+                    last_movement_date=now,
+                    last_movement_service="GRNPostingService",
+                    # update() يتجاوز auto_now: المزامنة التزايدية وETag قائمة المنتجات تعتمد على updated_at
+                    updated_at=now,
+                )
+            Stock.objects.bulk_create([
+                Stock(
+                    product_id=product_id,
+                    warehouse_id=warehouse_id,
+                    quantity=delta,
+                    last_movement_date=now,
+                    last_movement_service="GRNPostingService",
+                    created_by=user,
+                )
+                for (product_id, warehouse_id), delta in deltas.items()
+                if (product_id, warehouse_id) not in stocks
+            ])
+
+            # 3. قيود الأستاذ: حل الحسابات من القاموس المشترك
+            accounts_memo = {}
+            grni_acc = cls.resolve_grni_account(accounts_memo)
+            grni_code = str(grni_acc.code if grni_acc else "21210")
+            gateway = AccountingGateway()
 
-                unit_price = item.unit_price
-                line_cost = (received_qty * unit_price).quantize(Decimal("0.01"))
+            lines_by_grn = {}
+            totals = {}
+            for grn in grns:
+                lines = []
+                total_grn_cost = Decimal("0.00")
+                # في القيد الموحد تُجمع بنود الإذن الواحد في سطر مدين لكل حساب مخزون
+                consolidated_debits = {}
+                for item in items_by_grn[grn.pk]:
+                    line_cost = (item.received_qty * item.unit_price).quantize(Decimal("0.01"))
+                    inv_acc = cls.resolve_inventory_account(item.product, grn.warehouse, accounts_memo)
+                    inv_code = str(inv_acc.code if inv_acc else "11310")
+                    if consolidate_journal:
+                        consolidated_debits[inv_code] = consolidated_debits.get(inv_code, Decimal("0.00")) + line_cost
+                    else:
+                        lines.append(JournalEntryLineData(
+                            account_code=inv_code,
+                            debit=line_cost,
+                            credit=Decimal("0.00"),
+                            description=f"GRN Inventory Receipt: {item.product.name} ({item.received_qty} @ {item.unit_price})"
+                        ))
+                    total_grn_cost += line_cost
+                for inv_code, amount in consolidated_debits.items():
+                    lines.append(JournalEntryLineData(
+                        account_code=inv_code,
+                        debit=amount,
+                        credit=Decimal("0.00"),
+                        description=f"GRN #{grn.grn_number} Inventory Receipt ({len(items_by_grn[grn.pk])} items)"
+                    ))
+                lines.append(JournalEntryLineData(
+                    account_code=grni_code,
+                    debit=Decimal("0.00"),
+                    credit=total_grn_cost,
+                    description=f"GRNI Credit Accrual for GRN #{grn.grn_number}"
+                ))
+                lines_by_grn[grn.pk] = lines
+                totals[grn.pk] = total_grn_cost
+
+            entries = {}
+            if consolidate_journal:
+                import hashlib
+
+                batch_digest = hashlib.sha1(",".join(map(str, grn_ids)).encode()).hexdigest()[:12]
+                grn_numbers = ", ".join(grn.grn_number for grn in grns)
+                batch_entry = gateway.create_journal_entry(
+                    source_module="purchase",
+                    source_model="GoodsReceivedNote",
+                    source_id=grns[0].pk,
+                    lines=[line for grn in grns for line in lines_by_grn[grn.pk]],
+                    idempotency_key=gateway.generate_idempotency_key(
+                        module="purchase",
+                        model="GoodsReceivedNote",
+                        object_id=grns[0].pk,
+                        operation=f"post_batch_{batch_digest}"
+                    ),
+                    user=user,
+                    description=f"GRN Batch Inventory Asset Receipt ({len(grns)} GRNs): {grn_numbers}",
+                    reference=f"GRN-BATCH-{grns[0].grn_number}"
+                )
+                entries = dict.fromkeys(totals, batch_entry)
+            else:
+                for grn in grns:
+                    entries[grn.pk] = gateway.create_journal_entry(
+                        source_module="purchase",
+                        source_model="GoodsReceivedNote",
+                        source_id=grn.pk,
+                        lines=lines_by_grn[grn.pk],
+                        idempotency_key=gateway.generate_idempotency_key(
+                            module="purchase",
+                            model="GoodsReceivedNote",
+                            object_id=grn.pk,
+                            operation="post"
+                        ),
+                        user=user,
+                        description=f"GRN Inventory Asset Receipt #{grn.grn_number}",
+                        reference=f"GRN-{grn.grn_number}"
+                    )
 
-                # تسجيل حركة المخزن عبر الحركة الموحدة
-                try:
-                    stk_movement = movement_service.process_movement(
-                        product_id=item.product.id,
-                        quantity_change=received_qty,
+            # 4. حركات المخزون جماعياً بأرقام محجوزة دفعة واحدة لكل مخزن
+            running = {key: stock.quantity for key, stock in stocks.items()}
+            movements = []
+            for grn in grns:
+                for item in items_by_grn[grn.pk]:
+                    key = (item.product_id, grn.warehouse_id)
+                    quantity = int(item.received_qty)
+                    before = running.get(key, 0)
+                    running[key] = before + quantity
+                    movement = StockMovement(
+                        product_id=item.product_id,
+                        warehouse_id=grn.warehouse_id,
                         movement_type="in",
-                        source_reference=f"GRN-{grn.id}",
-                        idempotency_key=f"GRN-STK-{grn.id}-{item.product.id}",
-                        user=user,
-                        unit_cost=unit_price,
-                        warehouse_id=grn.warehouse.id
+                        quantity=quantity,
+                        unit_cost=item.unit_price,
+                        quantity_before=before,
+                        quantity_after=before + quantity,
+                        reference_number=f"GRN-{grn.pk}",
+                        document_type="purchase",
+                        document_number=grn.grn_number,
+                        idempotency_key=f"GRN-STK-{grn.pk}-{item.pk}",
+                        created_by_service="GRNPostingService",
+                        created_by=user,
+                        journal_entry=entries[grn.pk],
                     )
-                except Exception as e:
-                    logger.warning(f"MovementService warning on accounting entry creation: {e}. Updating stock directly...")
-                    from product.models.stock_management import Stock
-                    stock_rec, _ = Stock.objects.get_or_create(
-                        product=item.product,
-                        warehouse=grn.warehouse,
-                        defaults={"quantity": Decimal("0.0000")}
+                    movements.append(movement)
+
+            by_warehouse = {}
+            for movement in movements:
+                by_warehouse.setdefault(movement.warehouse_id, []).append(movement)
+            for warehouse_movements in by_warehouse.values():
+                warehouse = next(grn.warehouse for grn in grns if grn.warehouse_id == warehouse_movements[0].warehouse_id)
+                numbers = SequenceService.get_batch_numbers(
+                    DocumentType.STOCK_RECEIPT, len(warehouse_movements), warehouse=warehouse
+                )
+                for movement, number in zip(warehouse_movements, numbers):
+                    movement.number = number
+            StockMovement.objects.bulk_create(movements)
+
+            # 5. الكميات المستلمة في بنود أوامر الشراء وحالات الأوامر
+            po_item_deltas = {}
+            for grn in grns:
+                for item in items_by_grn[grn.pk]:
+                    if item.po_item_id:
+                        po_item_deltas[item.po_item_id] = po_item_deltas.get(item.po_item_id, Decimal("0.0000")) + item.received_qty
+            if po_item_deltas:
+                PurchaseOrderItem.objects.filter(pk__in=po_item_deltas).update(
+                    received_qty=F("received_qty") + Case(
+                        *[When(pk=pk, then=Value(delta)) for pk, delta in po_item_deltas.items()],
+                        default=Value(Decimal("0.0000")),
+                        output_field=DecimalField(max_digits=15, decimal_places=4),
                     )
-                    stock_rec.quantity += received_qty
-                    stock_rec.save()
-                stock_movements_count += 1
-
-                # تحديث الكمية المستلمة في بند أمر الشراء إن وجد
-                if item.po_item:
-                    item.po_item.received_qty += received_qty
-                    item.po_item.save(update_fields=["received_qty"])
-
-                # تحديد كود وحساب أصل المخزون هرمياً لكل منتج
-                inv_acc = cls.resolve_inventory_account(item.product, grn.warehouse)
-                inv_code = inv_acc.code if inv_acc else "11310"
-                lines_data.append(JournalEntryLineData(
-                    account_code=str(inv_code),
-                    debit=line_cost,
-                    credit=Decimal("0.00"),
-                    description=f"GRN Inventory Receipt: {item.product.name} ({received_qty} @ {unit_price})"
-                ))
-
-                total_grn_cost += line_cost
-
-            # 2. إضافة الطرف الدائن لحساب وسيط البضاعة GRNI (21210)
-            grni_acc = cls.resolve_grni_account()
-            grni_code = grni_acc.code if grni_acc else "21210"
-            lines_data.append(JournalEntryLineData(
-                account_code=str(grni_code),
-                debit=Decimal("0.00"),
-                credit=total_grn_cost,
-                description=f"GRNI Credit Accrual for GRN #{grn.grn_number}"
-            ))
-
-            # 3. إنشاء وتأكيد قيد الأستاذ المالي عبر AccountingGateway المركزية
-            gateway = AccountingGateway()
-            idempotency_key = gateway.generate_idempotency_key(
-                module="purchase",
-                model="GoodsReceivedNote",
-                object_id=grn.id,
-                operation="post"
-            )
-            journal_entry = gateway.create_journal_entry(
-                source_module="purchase",
-                source_model="GoodsReceivedNote",
-                source_id=grn.id,
-                lines=lines_data,
-                idempotency_key=idempotency_key,
-                user=user,
-                description=f"GRN Inventory Asset Receipt #{grn.grn_number}",
-                reference=f"GRN-{grn.grn_number}"
-            )
-
-            # 4. تحديث حالة إذن الاستلام
-            old_status = grn.status
-            grn.status = "POSTED"
-            grn.journal_entry = journal_entry
-            grn.save(update_fields=["status", "journal_entry"])
-
-            # 5. تحديث حالة أمر الشراء المرتبط
-            if grn.purchase_order:
-                po = grn.purchase_order
-                total_ordered = po.items.aggregate(sum_ord=Sum("ordered_qty"))["sum_ord"] or Decimal("0.0000")
-                total_received = po.items.aggregate(sum_rec=Sum("received_qty"))["sum_rec"] or Decimal("0.0000")
-
-                if total_received >= total_ordered:
-                    po.status = "FULLY_RECEIVED"
-                else:
-                    po.status = "PARTIALLY_RECEIVED"
-                po.save(update_fields=["status"])
-
-            # 6. تسجيل سجلات التتبع والتدقيق (Posting Log & Audit Log)
-            GRNPostingLog.objects.create(
-                grn=grn,
-                journal_entry=journal_entry,
-                stock_movements_count=stock_movements_count,
-                total_posted_value=total_grn_cost,
-                posted_by=user
-            )
-
-            GRNAuditLog.objects.create(
-                grn=grn,
-                old_status=old_status,
-                new_status="POSTED",
-                action_by=user,
-                reason=reason or "Posting GRN",
-                comment=f"Successfully posted GRN #{grn.grn_number} with total value {total_grn_cost} EGP."
+                )
+
+            po_ids = {grn.purchase_order_id for grn in grns if grn.purchase_order_id}
+            if po_ids:
+                fully_received, partially_received = [], []
+                for row in (
+                    PurchaseOrderItem.objects.filter(purchase_order_id__in=po_ids)
+                    .values("purchase_order_id")
+                    .annotate(total_ordered=Sum("ordered_qty"), total_received=Sum("received_qty"))
+                ):
+                    if (row["total_received"] or Decimal("0.0000")) >= (row["total_ordered"] or Decimal("0.0000")):
+                        fully_received.append(row["purchase_order_id"])
+                    else:
+                        partially_received.append(row["purchase_order_id"])
+                PurchaseOrder.objects.filter(pk__in=fully_received).update(status="FULLY_RECEIVED")
+                PurchaseOrder.objects.filter(pk__in=partially_received).update(status="PARTIALLY_RECEIVED")
+
+            # 6. حالة الأذون وسجلات الترحيل والتدقيق
+            old_statuses = {grn.pk: grn.status for grn in grns}
+            for grn in grns:
+                grn.status = "POSTED"
+                grn.journal_entry = entries[grn.pk]
+            GoodsReceivedNote.objects.bulk_update(grns, ["status", "journal_entry"])
+
+            GRNPostingLog.objects.bulk_create([
+                GRNPostingLog(
+                    grn=grn,
+                    journal_entry=entries[grn.pk],
+                    stock_movements_count=len(items_by_grn[grn.pk]),
+                    total_posted_value=totals[grn.pk],
+                    posted_by=user
+                )
+                for grn in grns
+            ])
+            GRNAuditLog.objects.bulk_create([
+                GRNAuditLog(
+                    grn=grn,
+                    old_status=old_statuses[grn.pk],
+                    new_status="POSTED",
+                    action_by=user,
+                    reason=reason or "Batch posting GRNs",
+                    comment=f"Successfully posted GRN #{grn.grn_number} with total value {totals[grn.pk]} EGP"
+                            + (f" in a batch of {len(grns)} GRNs." if len(grns) > 1 else ".")
+                )
+                for grn in grns
+            ])
+
+            # العمليات الجماعية لا تطلق إشارات Stock: تسجيل المكونات لإعادة حساب المنتجات المجمعة بعد الـ commit
+            BundleAvailabilityService.mark_components_changed(*product_ids)
+
+            logger.info(
+                f"Batch of {len(grns)} GRNs POSTED successfully "
+                f"({len(movements)} stock movements, {len(set(e.pk for e in entries.values()))} journal entries)."
             )
 
-            logger.info(f"GRN #{grn.grn_number} POSTED successfully. Entry #{journal_entry.id} posted.")
+            def send_notifications():
+                for grn_id in grn_ids:
+                    cls._send_post_notifications(grn_id)
 
-            # 7. ترحيل التنبيهات والخدمات الإضافية لخارج الترانزاكشن
-            transaction.on_commit(lambda: cls._send_post_notifications(grn.id))
+            transaction.on_commit(send_notifications)
 
-            return grn
+            return grns
 
     @classmethod
     def _send_post_notifications(cls, grn_id: int) -> None:
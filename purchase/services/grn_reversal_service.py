@@ -55,6 +55,7 @@ class GRNReversalService:
             movement_service = MovementService()
             total_reversed_cost = Decimal("0.00")
             lines_data = []
+            accounts_memo = {}
 
             # 3. عكس حركات المخزون وتجميع قيود الأستاذ المالي
             for item in grn.items.select_related("product", "po_item").all():
@@ -90,7 +91,7 @@ class GRNReversalService:
                     item.po_item.received_qty = max(Decimal("0.0000"), item.po_item.received_qty - received_qty)
                     item.po_item.save(update_fields=["received_qty"])
 
-                inv_acc = GRNPostingService.resolve_inventory_account(item.product, grn.warehouse)
+                inv_acc = GRNPostingService.resolve_inventory_account(item.product, grn.warehouse, accounts_memo)
                 lines_data.append({
                     "account": inv_acc,
                     "account_code": inv_acc.code if inv_acc else "10400",
@@ -102,7 +103,7 @@ class GRNReversalService:
                 total_reversed_cost += line_cost
 
             # 4. الطرف المدين لحساب الـ GRNI (Dr. 20150 GRNI)
-            grni_acc = GRNPostingService.resolve_grni_account()
+            grni_acc = GRNPostingService.resolve_grni_account(accounts_memo)
             lines_data.append({
                 "account": grni_acc,
                 "account_code": grni_acc.code if grni_acc else "20150_GRNI",
@@ -92,3 +92,40 @@ class GRNValidationService:
                             f"الكمية المستلمة للمنتج ({po_item.product.name}) تتجاوز الكمية المطلوبة بالفيصل المسموح ({max_allowed}). "
                             f"المستلم سابقاً: {po_item.received_qty}، المطلوبة: {po_item.ordered_qty}."
                         )
+
+    @classmethod
+    def validate_grn_for_posting(
+        cls,
+        grn: GoodsReceivedNote,
+        items: Optional[List] = None,
+        received_so_far: Optional[Dict[int, Decimal]] = None
+    ) -> None:
+        """
+        التحقق من صلاحية إذن الاستلام للترحيل: وجود كميات مستلمة وعدم تجاوز المطلوب بأمر الشراء بالفيصل المسموح
+
+        Args:
+            items: بنود الإذن المحملة مسبقاً (الترحيل الجماعي) بدلاً من استعلامها
+            received_so_far: {po_item_id: الكمية المستلمة} متراكمة عبر أذون الدفعة الواحدة؛ تُحدث بكميات هذا الإذن
+        """
+        if items is None:
+            items = list(grn.items.select_related("product", "po_item"))
+
+        items = [item for item in items if item.received_qty > Decimal("0.0000")]
+        if not items:
+            raise FinancialCoreError(f"إذن الاستلام #{grn.grn_number} لا يحتوي على كميات مستلمة للترحيل.")
+
+        tolerance_pct = Decimal(str(getattr(settings, "GRN_OVER_RECEIPT_PERCENTAGE", "0")))
+        received = received_so_far if received_so_far is not None else {}
+        for item in items:
+            po_item = item.po_item
+            if po_item is None:
+                continue
+            max_allowed = (po_item.ordered_qty * (Decimal("1.00") + (tolerance_pct / Decimal("100")))).quantize(Decimal("0.0001"))
+            current_total = received.get(po_item.pk, po_item.received_qty) + item.received_qty
+            if current_total > max_allowed:
+                raise FinancialCoreError(
+                    f"الكمية المستلمة للمنتج ({item.product.name}) في الإذن #{grn.grn_number} تتجاوز الكمية المطلوبة "
+                    f"بالفيصل المسموح ({max_allowed}). المستلم سابقاً: {current_total - item.received_qty}، "
+                    f"المطلوبة: {po_item.ordered_qty}."
+                )
+            received[po_item.pk] = current_total
@@ -0,0 +1,179 @@
+import pytest
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from supplier.models import Supplier
+from product.models.product_core import Product, Category, Unit
+from product.models.stock_management import Stock, StockMovement, Warehouse
+from financial.models import ChartOfAccounts, AccountType, AccountingPeriod, FiscalYear, JournalEntry
+from purchase.models.procurement_models import GoodsReceivedNote, GoodsReceivedNoteItem, PurchaseOrder
+from purchase.models.grn_audit_log import GRNAuditLog
+from purchase.models.grn_posting_log import GRNPostingLog
+from purchase.services.procurement_service import ProcurementService
+from purchase.services.grn_posting_service import GRNPostingService
+from financial.exceptions import FinancialCoreError
+
+User = get_user_model()
+
+
+@pytest.mark.django_db
+class TestGRNBatchPosting:
+
+    @pytest.fixture
+    def setup_batch_data(self):
+        user = User.objects.create_user(username="grn_batch_user", password="password123", email="grn_batch@test.com")
+
+        asset_type, _ = AccountType.objects.get_or_create(code="ASSET", defaults={"name": "Asset", "category": "ASSET"})
+        liability_type, _ = AccountType.objects.get_or_create(code="LIABILITY", defaults={"name": "Liability", "category": "LIABILITY"})
+        ChartOfAccounts.objects.get_or_create(code="10400", defaults={"name": "Inventory", "account_type": asset_type, "is_active": True})
+        ChartOfAccounts.objects.get_or_create(code="21210", defaults={"name": "GRNI Payable", "account_type": liability_type, "is_active": True})
+
+        today = timezone.now().date()
+        fiscal_year = FiscalYear.objects.create(
+            name=f"FY{today.year}", start_date=today.replace(month=1, day=1), end_date=today.replace(month=12, day=31)
+        )
+        AccountingPeriod.objects.create(
+            fiscal_year=fiscal_year, name=f"P{today.month}", period_number=today.month,
+            start_date=today.replace(day=1), end_date=today.replace(day=28) if today.day <= 28 else today, status="open"
+        )
+
+        supplier = Supplier.objects.create(code="SUP-BATCH", name="Container Supplier", is_active=True)
+        warehouse = Warehouse.objects.create(code="WH-BATCH", name="Port Warehouse", is_active=True)
+        category = Category.objects.create(name="Containers")
+        unit = Unit.objects.create(name="PCS")
+        products = [
+            Product.objects.create(
+                name=f"Batch Item {index}", sku=f"GRN-BATCH-{index}", category=category, unit=unit,
+                cost_price=Decimal("10.00"), selling_price=Decimal("15.00"), created_by=user
+            )
+            for index in range(3)
+        ]
+        Stock.objects.create(product=products[0], warehouse=warehouse, quantity=5)
+
+        po = ProcurementService.create_purchase_order(
+            supplier=supplier,
+            warehouse=warehouse,
+            order_date=today,
+            items_data=[
+                {"product": product, "ordered_qty": Decimal("100.0000"), "unit_price": Decimal("10.00")}
+                for product in products
+            ],
+            user=user
+        )
+        PurchaseOrder.objects.filter(pk=po.pk).update(status="APPROVED")
+        return user, supplier, warehouse, products, po
+
+    def _make_grns(self, supplier, warehouse, po, count, qty=Decimal("10.0000")):
+        grns = []
+        po_items = list(po.items.order_by("pk"))
+        start = GoodsReceivedNote.objects.count()
+        for index in range(count):
+            grn = GoodsReceivedNote.objects.create(
+                grn_number=f"GRN-BATCH-{start + index}", purchase_order=po, supplier=supplier,
+                warehouse=warehouse, status="APPROVED"
+            )
+            for po_item in po_items:
+                GoodsReceivedNoteItem.objects.create(
+                    grn=grn, po_item=po_item, product=po_item.product, received_qty=qty,
+                    unit_price=po_item.unit_price, total_cost=(qty * po_item.unit_price).quantize(Decimal("0.01"))
+                )
+            grns.append(grn)
+        return grns
+
+    def test_batch_updates_stock_po_and_logs_in_bulk(self, setup_batch_data):
+        user, supplier, warehouse, products, po = setup_batch_data
+        grns = self._make_grns(supplier, warehouse, po, 3)
+
+        posted = GRNPostingService.post_grns([grn.pk for grn in grns], user=user, reason="Container 42")
+
+        assert [grn.status for grn in posted] == ["POSTED"] * 3
+        quantities = dict(Stock.objects.filter(warehouse=warehouse).values_list("product_id", "quantity"))
+        assert quantities == {products[0].pk: 35, products[1].pk: 30, products[2].pk: 30}
+
+        movements = StockMovement.objects.filter(product=products[0], warehouse=warehouse).order_by("quantity_before")
+        assert [(m.quantity_before, m.quantity_after) for m in movements] == [(5, 15), (15, 25), (25, 35)]
+        assert StockMovement.objects.filter(document_type="purchase", number__isnull=False).count() == 9
+
+        assert all(item.received_qty == Decimal("30.0000") for item in po.items.all())
+        assert PurchaseOrder.objects.get(pk=po.pk).status == "PARTIALLY_RECEIVED"
+
+        assert GRNPostingLog.objects.filter(grn__in=grns).count() == 3
+        assert GRNAuditLog.objects.filter(grn__in=grns, new_status="POSTED", reason="Container 42").count() == 3
+        assert len({grn.journal_entry_id for grn in GoodsReceivedNote.objects.filter(pk__in=[g.pk for g in grns])}) == 3
+
+    def test_consolidated_journal_has_per_grn_lines(self, setup_batch_data):
+        user, supplier, warehouse, products, po = setup_batch_data
+        grns = self._make_grns(supplier, warehouse, po, 2, qty=Decimal("4.0000"))
+        entries_before = JournalEntry.objects.count()
+
+        GRNPostingService.post_grns([grn.pk for grn in grns], user=user, consolidate_journal=True)
+
+        assert JournalEntry.objects.count() == entries_before + 1
+        entry_ids = set(GoodsReceivedNote.objects.filter(pk__in=[g.pk for g in grns]).values_list("journal_entry_id", flat=True))
+        assert len(entry_ids) == 1
+        entry = JournalEntry.objects.get(pk=entry_ids.pop())
+        lines = list(entry.lines.all())
+        # سطر مخزون مدين (بنود الإذن مجمعة بالحساب) + سطر GRNI دائن لكل إذن
+        assert len(lines) == 4
+        assert sum(line.debit for line in lines) == sum(line.credit for line in lines) == Decimal("240.00")
+        assert sorted(line.credit for line in lines if line.credit) == [Decimal("120.00"), Decimal("120.00")]
+        assert set(StockMovement.objects.filter(reference_number__in=[f"GRN-{g.pk}" for g in grns]).values_list("journal_entry_id", flat=True)) == {entry.pk}
+
+    def test_query_count_does_not_grow_with_batch_size(self, setup_batch_data):
+        user, supplier, warehouse, products, po = setup_batch_data
+        # الدفعة الأولى تنشئ أرصدة المخزون وقواعد الترقيم
+        warm_up = self._make_grns(supplier, warehouse, po, 1, qty=Decimal("1.0000"))
+        GRNPostingService.post_grns([grn.pk for grn in warm_up], user=user)
+        small = self._make_grns(supplier, warehouse, po, 2, qty=Decimal("1.0000"))
+        large = self._make_grns(supplier, warehouse, po, 6, qty=Decimal("1.0000"))
+
+        with CaptureQueriesContext(connection) as small_queries:
+            GRNPostingService.post_grns([grn.pk for grn in small], user=user, consolidate_journal=True)
+        with CaptureQueriesContext(connection) as large_queries:
+            GRNPostingService.post_grns([grn.pk for grn in large], user=user, consolidate_journal=True)
+
+        # قيود الأستاذ تُكتب سطراً بسطر داخل AccountingGateway؛ باقي مسار الترحيل ثابت الاستعلامات
+        def pipeline_queries(context):
+            return [
+                query["sql"] for query in context.captured_queries
+                if '"financial_' not in query["sql"] and '"governance_' not in query["sql"] and "SAVEPOINT" not in query["sql"]
+            ]
+
+        assert len(pipeline_queries(large_queries)) == len(pipeline_queries(small_queries))
+
+    def test_batch_is_rejected_as_a_whole(self, setup_batch_data):
+        user, supplier, warehouse, products, po = setup_batch_data
+        grns = self._make_grns(supplier, warehouse, po, 2)
+        GoodsReceivedNote.objects.filter(pk=grns[1].pk).update(status="POSTED")
+
+        with pytest.raises(FinancialCoreError):
+            GRNPostingService.post_grns([grn.pk for grn in grns], user=user)
+
+        assert GoodsReceivedNote.objects.get(pk=grns[0].pk).status == "APPROVED"
+        assert Stock.objects.get(product=products[0], warehouse=warehouse).quantity == 5
+        assert not GRNAuditLog.objects.filter(grn__in=grns).exists()
+
+        over_receipt = self._make_grns(supplier, warehouse, po, 2, qty=Decimal("60.0000"))
+        with pytest.raises(FinancialCoreError, match="تتجاوز"):
+            GRNPostingService.post_grns([grn.pk for grn in over_receipt], user=user)
+
+    def test_single_posting_produces_the_batch_ledger_and_touches_stock(self, setup_batch_data):
+        user, supplier, warehouse, products, po = setup_batch_data
+        grn = self._make_grns(supplier, warehouse, po, 1, qty=Decimal("2.0000"))[0]
+        stale = timezone.now() - timezone.timedelta(days=1)
+        Stock.objects.filter(product=products[0], warehouse=warehouse).update(updated_at=stale)
+        entries_before = JournalEntry.objects.count()
+
+        posted = GRNPostingService.post_grn(grn.pk, user=user)
+
+        assert posted.status == "POSTED"
+        assert JournalEntry.objects.count() == entries_before + 1
+        movements = StockMovement.objects.filter(reference_number=f"GRN-{grn.pk}")
+        assert movements.count() == 3
+        assert set(movements.values_list("journal_entry_id", flat=True)) == {posted.journal_entry_id}
+        stock = Stock.objects.get(product=products[0], warehouse=warehouse)
+        assert stock.quantity == 7
+        assert stock.updated_at > stale
@@ -1,7 +1,10 @@
 """
 اختبارات وظائف عرض المبيعات (بدون تخطي اختبارات)
 """
-from django.test import TestCase, Client
+from unittest.mock import patch
+
+from django.http import HttpResponse
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
@@ -95,6 +98,28 @@ class SaleViewsTest(TestCase):
         response = self.client.get(url)
         self.assertIn(response.status_code, [200, 302])
 
+    @override_settings(SECURE_SSL_REDIRECT=False)
+    def test_sale_pdf_batch_rejects_malformed_dates(self):
+        url = reverse("sale:sale_pdf_batch_download")
+        for params in ({"date_from": "yesterday"}, {"date_to": "2026-13-40"}):
+            response = self.client.get(url, {"customer": self.customer.pk, **params})
+            self.assertEqual(response.status_code, 400)
+
+    @override_settings(SECURE_SSL_REDIRECT=False, PDF_BATCH_MAX_DOCUMENTS=1)
+    @patch("utils.pdf_utils.generate_pdf_batch_response", return_value=HttpResponse(b"%PDF"))
+    def test_sale_pdf_batch_reports_truncation(self, batch_response):
+        Sale.objects.create(
+            number="SL-002-V", date=timezone.now().date(), customer=self.customer, warehouse=self.warehouse,
+            subtotal=Decimal("100.00"), total=Decimal("100.00"), created_by=self.user,
+        )
+
+        response = self.client.get(reverse("sale:sale_pdf_batch_download"), {"customer": self.customer.pk})
+
+        self.assertEqual(len(batch_response.call_args.args[0]), 1)
+        self.assertEqual(response["X-Batch-Count"], "1")
+        self.assertEqual(response["X-Batch-Truncated"], "true")
+        self.assertEqual(response["X-Batch-Limit"], "1")
+
 
 class SaleReturnViewsTest(TestCase):
     """
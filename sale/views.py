@@ -1118,6 +1118,67 @@ def sale_pdf_download(request, pk):
     return generate_guaranteed_pdf_response("sale", context, filename=f"{sale.number}.pdf")
 
 
+@login_required
+def sale_pdf_batch_download(request):
+    """
+    طباعة مجمّعة لفواتير المبيعات في ملف PDF واحد أو أرشيف ZIP
+    ?ids=1,2,3 أو ?customer=<id> (مع date_from / date_to اختيارياً بصيغة YYYY-MM-DD) و output=merged|zip
+    بحد أقصى PDF_BATCH_MAX_DOCUMENTS فاتورة؛ عند تجاوزه تُطبع الأقدم وتُرسل الترويسة X-Batch-Truncated
+    """
+    from django.conf import settings
+    from django.http import HttpResponseBadRequest
+    from django.template.loader import render_to_string
+    from django.utils.dateparse import parse_date
+    from utils.pdf_utils import generate_pdf_batch_response
+
+    sales = Sale.objects.all()
+    ids = [i for i in request.GET.get('ids', '').split(',') if i.strip().isdigit()]
+    if ids:
+        sales = sales.filter(pk__in=ids)
+    elif request.GET.get('customer', '').isdigit():
+        sales = sales.filter(customer_id=request.GET['customer'])
+        for param, lookup in (('date_from', 'date__gte'), ('date_to', 'date__lte')):
+            value = request.GET.get(param)
+            if not value:
+                continue
+            try:
+                parsed = parse_date(value)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                return HttpResponseBadRequest(f"تاريخ غير صالح ({param}): استخدم الصيغة YYYY-MM-DD")
+            sales = sales.filter(**{lookup: parsed})
+    else:
+        return HttpResponseBadRequest("يجب تحديد الفواتير (ids) أو العميل (customer)")
+
+    limit = getattr(settings, 'PDF_BATCH_MAX_DOCUMENTS', 500)
+    pks = list(sales.order_by('date', 'id').values_list('pk', flat=True)[:limit + 1])
+    truncated = len(pks) > limit
+    pks = pks[:limit]
+    if not pks:
+        return HttpResponseBadRequest("لا توجد فواتير مطابقة")
+
+    documents = []
+    for pk in pks:
+        sale, context = get_sale_print_context(request, pk)
+        documents.append({
+            "html": render_to_string("sale/sale_print.html", context, request=request),
+            "filename": f"{sale.number}.pdf",
+            "doc_type": "sale",
+            "context": context,
+        })
+
+    output = 'zip' if request.GET.get('output') == 'zip' else 'merged'
+    response = generate_pdf_batch_response(documents, request=request, filename="sales_invoices", output=output)
+    # إبلاغ الطالب بعدد الفواتير المطبوعة وبتجاوز الحد الأقصى (أول الفواتير بالتاريخ فقط)
+    response['X-Batch-Count'] = str(len(pks))
+    if truncated:
+        logger.warning(f"Sales PDF batch truncated to the first {limit} invoices")
+        response['X-Batch-Truncated'] = 'true'
+        response['X-Batch-Limit'] = str(limit)
+    return response
+
+
 @login_required
 def sale_email_pdf(request, pk):
     """
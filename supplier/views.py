@@ -49,16 +49,8 @@ def supplier_list(request):
         suppliers = suppliers.filter(primary_type_id=primary_type)
 
     if search:
-        suppliers = suppliers.filter(
-            models.Q(name__icontains=search)
-            | models.Q(code__icontains=search)
-            | models.Q(phone__icontains=search)
-            | models.Q(secondary_phone__icontains=search)
-            | models.Q(tax_number__icontains=search)
-            | models.Q(national_id__icontains=search)
-            | models.Q(commercial_registry__icontains=search)
-            | models.Q(contact_person__icontains=search)
-        )
+        from core.services.search_index import SearchIndexService
+        suppliers = suppliers.filter(id__in=SearchIndexService.search_ids("supplier", search))
 
     if has_debt == "1":
         suppliers = suppliers.filter(balance__gt=0)
@@ -0,0 +1,342 @@
+"""
+مجموعة قياسات الأداء للمسارات الساخنة (الأستاذ العام، المخزون، الرواتب)
+Hot-Path Regression Benchmark Suite
+
+كل سيناريو يُنفذ عدة مرات ويُسجل: الوسيط والحد الأدنى والأقصى للزمن،
+عدد الاستعلامات وزمن قاعدة البيانات. النتائج تُحفظ JSON ويمكن مقارنتها
+بنتيجة مرجعية (baseline) لإفشال CI عند تجاوز نسبة تراجع محددة.
+
+السيناريوهات التي تكتب بيانات (تأكيد بيع، مسير رواتب، لقطات مخزون)
+تُنفذ داخل معاملة يتم التراجع عنها حتى تبقى البيانات المزروعة ثابتة.
+"""
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass, field, asdict
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+
+class _Rollback(Exception):
+    """تُرفع لإلغاء معاملة السيناريو بعد القياس"""
+
+
+class QueryCounter:
+    """
+    عداد استعلامات عبر connection.execute_wrapper
+    لا يحتفظ بنص الاستعلامات، فلا يتأثر بحد queries_log (9000) في السيناريوهات الثقيلة
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.total_time += time.perf_counter() - started
+
+
+@dataclass
+class BenchmarkResult:
+    """نتيجة سيناريو واحد"""
+    name: str
+    status: str = 'ok'
+    runs: int = 0
+    median_ms: float = 0.0
+    min_ms: float = 0.0
+    max_ms: float = 0.0
+    queries: int = 0
+    db_time_ms: float = 0.0
+    peak_memory_mb: float = 0.0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass
+class Regression:
+    """تراجع في الأداء مقارنة بالنتيجة المرجعية"""
+    name: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change_percent(self) -> float:
+        if not self.baseline:
+            return 100.0
+        return round((self.current - self.baseline) / self.baseline * 100, 1)
+
+    def __str__(self):
+        if self.metric == 'status':
+            return f"{self.name}: السيناريو كان ناجحاً وأصبح يفشل"
+        return f"{self.name}.{self.metric}: {self.baseline} -> {self.current} (+{self.change_percent}%)"
+
+
+@dataclass
+class BenchmarkContext:
+    """المدخلات المشتركة للسيناريوهات، تُحسب مرة واحدة قبل القياس"""
+    date_from: date
+    date_to: date
+    user: Any = None
+    busiest_account_id: Optional[int] = None
+    customer_id: Optional[int] = None
+    warehouse_id: Optional[int] = None
+    product_ids: List[int] = field(default_factory=list)
+    employee_ids: List[int] = field(default_factory=list)
+    payroll_month: Optional[date] = None
+
+    @classmethod
+    def build(cls, user=None, payroll_employees: int = 50, sale_lines: int = 20) -> 'BenchmarkContext':
+        from django.contrib.auth import get_user_model
+        from financial.models import JournalEntryLine
+        from client.models import Customer
+        from product.models import Stock
+        from hr.models import AttendanceSummary
+
+        today = timezone.now().date()
+        first_of_month = today.replace(day=1)
+        context = cls(
+            date_from=date(today.year, 1, 1),
+            date_to=today,
+            user=user or get_user_model().objects.filter(is_superuser=True).first()
+            or get_user_model().objects.filter(username='benchmark').first(),
+            payroll_month=(first_of_month - timedelta(days=1)).replace(day=1),
+        )
+        busiest = (
+            JournalEntryLine.objects.values('account_id')
+            .annotate(lines=Count('id')).order_by('-lines').first()
+        )
+        context.busiest_account_id = busiest['account_id'] if busiest else None
+        context.customer_id = Customer.objects.filter(is_active=True).values_list('id', flat=True).first()
+
+        stocked = Stock.objects.filter(quantity__gte=10).values_list('warehouse_id', 'product_id')
+        warehouse_id = stocked.values_list('warehouse_id', flat=True).first()
+        context.warehouse_id = warehouse_id
+        if warehouse_id:
+            context.product_ids = list(
+                stocked.filter(warehouse_id=warehouse_id).values_list('product_id', flat=True)[:sale_lines]
+            )
+        context.employee_ids = list(
+            AttendanceSummary.objects.filter(month=context.payroll_month, is_approved=True)
+            .values_list('employee_id', flat=True)[:payroll_employees]
+        )
+        return context
+
+
+# ---------------------------------------------------------------------- #
+# السيناريوهات
+# ---------------------------------------------------------------------- #
+
+def _in_rollback(func: Callable[[], Any]):
+    """تنفيذ عملية كتابة ثم التراجع عنها"""
+    try:
+        with transaction.atomic():
+            func()
+            raise _Rollback()
+    except _Rollback:
+        pass
+
+
+def bench_trial_balance(ctx: BenchmarkContext):
+    from financial.services.trial_balance_service import TrialBalanceService
+    TrialBalanceService.generate_trial_balance(date_from=ctx.date_from, date_to=ctx.date_to)
+
+
+def bench_account_statement(ctx: BenchmarkContext):
+    from financial.services.ledger_query_service import LedgerQueryService
+    if ctx.busiest_account_id is None:
+        raise RuntimeError("لا توجد قيود لقياس كشف الحساب")
+    LedgerQueryService.get_account_statement(ctx.busiest_account_id, ctx.date_from, ctx.date_to)
+
+
+def bench_customer_aging(ctx: BenchmarkContext):
+    from client.services.customer_aging_service import CustomerAgingService
+    CustomerAgingService.get_customer_aging_report(as_of_date=ctx.date_to)
+
+
+def bench_payroll_run(ctx: BenchmarkContext):
+    from hr.models import Employee
+    from hr.services.integrated_payroll_service import IntegratedPayrollService
+    if not ctx.employee_ids:
+        raise RuntimeError("لا يوجد موظفون بملخصات حضور معتمدة لشهر القياس")
+    employees = Employee.objects.filter(id__in=ctx.employee_ids)
+    _in_rollback(lambda: IntegratedPayrollService.process_monthly_payroll_integrated(
+        ctx.payroll_month, ctx.user, employees=employees
+    ))
+
+
+def bench_sale_confirmation(ctx: BenchmarkContext):
+    from product.models import Product
+    from sale.services.sale_service import SaleService
+    if not (ctx.customer_id and ctx.warehouse_id and ctx.product_ids):
+        raise RuntimeError("لا توجد بيانات كافية (عميل/مخزن/أصناف) لقياس تأكيد البيع")
+    prices = dict(Product.objects.filter(id__in=ctx.product_ids).values_list('id', 'selling_price'))
+    data = {
+        'customer_id': ctx.customer_id,
+        'warehouse_id': ctx.warehouse_id,
+        'payment_method': 'credit',
+        'items': [
+            {'product_id': product_id, 'quantity': 1, 'unit_price': str(prices[product_id])}
+            for product_id in ctx.product_ids
+        ],
+    }
+    _in_rollback(lambda: SaleService.create_sale(data, ctx.user))
+
+
+def bench_stock_snapshot(ctx: BenchmarkContext):
+    from product.services.inventory_service import InventoryService
+    _in_rollback(lambda: InventoryService.generate_daily_snapshots(ctx.date_to))
+
+
+def bench_dashboard(ctx: BenchmarkContext):
+    from financial.services.dashboard.executive_dashboard_service import ExecutiveDashboardService
+    ExecutiveDashboardService.get_executive_dashboard(as_of_date=ctx.date_to)
+
+
+SCENARIOS: Dict[str, Callable[[BenchmarkContext], Any]] = {
+    'trial_balance': bench_trial_balance,
+    'account_statement': bench_account_statement,
+    'customer_aging': bench_customer_aging,
+    'payroll_run': bench_payroll_run,
+    'sale_confirmation': bench_sale_confirmation,
+    'stock_snapshot': bench_stock_snapshot,
+    'dashboard': bench_dashboard,
+}
+
+
+# ---------------------------------------------------------------------- #
+# المشغل
+# ---------------------------------------------------------------------- #
+
+class BenchmarkSuite:
+    """
+    تشغيل السيناريوهات وحفظ النتائج ومقارنتها بالنتيجة المرجعية
+
+    الاستخدام:
+        suite = BenchmarkSuite(repeat=3)
+        suite.run()
+        suite.save('reports/performance/benchmarks.json')
+        regressions = suite.compare('baseline.json', threshold_percent=20)
+    """
+
+    def __init__(self, repeat: int = 3, scenarios: Optional[List[str]] = None,
+                 context: Optional[BenchmarkContext] = None, measure_memory: bool = False):
+        unknown = set(scenarios or []) - set(SCENARIOS)
+        if unknown:
+            raise ValueError(f"سيناريوهات غير معروفة: {', '.join(sorted(unknown))}")
+        self.repeat = max(1, repeat)
+        self.scenario_names = scenarios or list(SCENARIOS)
+        self.context = context
+        self.measure_memory = measure_memory
+        self.results: Dict[str, BenchmarkResult] = {}
+        self.metadata: Dict[str, Any] = {}
+
+    def run(self) -> Dict[str, BenchmarkResult]:
+        if self.context is None:
+            self.context = BenchmarkContext.build()
+        self.metadata = {
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'repeat': self.repeat,
+        }
+        for name in self.scenario_names:
+            self.results[name] = self.run_scenario(name, SCENARIOS[name])
+        return self.results
+
+    def run_scenario(self, name: str, func: Callable[[BenchmarkContext], Any]) -> BenchmarkResult:
+        result = BenchmarkResult(name=name)
+        timings = []
+        try:
+            # تشغيل تمهيدي لتسخين الكاش والاتصالات دون احتسابه
+            func(self.context)
+            for run in range(self.repeat):
+                track_memory = self.measure_memory and run == 0
+                if track_memory:
+                    tracemalloc.start()
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    started = time.perf_counter()
+                    func(self.context)
+                    timings.append((time.perf_counter() - started) * 1000)
+                if track_memory:
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    result.peak_memory_mb = round(peak / 1024 / 1024, 2)
+                # عدد الاستعلامات ثابت بين التكرارات، نحتفظ بآخرها
+                result.queries = counter.count
+                result.db_time_ms = round(counter.total_time * 1000, 2)
+        except Exception as e:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            result.status = 'error'
+            result.error = f"{type(e).__name__}: {e}"
+
+        if timings:
+            result.runs = len(timings)
+            result.median_ms = round(statistics.median(timings), 2)
+            result.min_ms = round(min(timings), 2)
+            result.max_ms = round(max(timings), 2)
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'metadata': self.metadata,
+            'results': {name: r.to_dict() for name, r in self.results.items()},
+        }
+
+    def save(self, path: str):
+        import os
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def compare(self, baseline_path: str, threshold_percent: float = 20.0,
+                min_delta_ms: float = 5.0) -> List[Regression]:
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+        return compare_results(baseline, self.to_dict(), threshold_percent, min_delta_ms)
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold_percent: float = 20.0, min_delta_ms: float = 5.0) -> List[Regression]:
+    """
+    مقارنة نتيجتين وإرجاع التراجعات التي تتجاوز النسبة المسموحة
+
+    - الزمن: يُعتبر تراجعاً إذا زاد الوسيط بأكثر من النسبة وبأكثر من min_delta_ms
+      (لتجاهل ضوضاء القياس في السيناريوهات السريعة جداً)
+    - الاستعلامات: أي زيادة بأكثر من النسبة تُعتبر تراجعاً لأنها قياس حتمي
+    - سيناريو كان ناجحاً وأصبح يفشل يُعتبر تراجعاً
+    """
+    factor = 1 + threshold_percent / 100
+    regressions = []
+    baseline_results = baseline.get('results', {})
+    for name, now in current.get('results', {}).items():
+        before = baseline_results.get(name)
+        if not before:
+            continue
+        if before.get('status') == 'ok' and now.get('status') != 'ok':
+            regressions.append(Regression(name, 'status', 1, 0))
+            continue
+        if now.get('status') != 'ok' or before.get('status') != 'ok':
+            continue
+        if (now['median_ms'] > before['median_ms'] * factor
+                and now['median_ms'] - before['median_ms'] > min_delta_ms):
+            regressions.append(Regression(name, 'median_ms', before['median_ms'], now['median_ms']))
+        if now['queries'] > before['queries'] * factor:
+            regressions.append(Regression(name, 'queries', before['queries'], now['queries']))
+    return regressions
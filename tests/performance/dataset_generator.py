@@ -0,0 +1,463 @@
+"""
+مولد بيانات اصطناعية كبيرة لاختبارات الأداء
+Synthetic Large-Dataset Generator
+
+يزرع شركة اصطناعية بحجم قابل للتحكم (قيود، أصناف، حركات مخزون، موظفين، عملاء)
+باستخدام bulk_create مباشرة دون المرور على save() أو الإشارات، حتى يمكن
+الوصول لمئات الآلاف من السطور خلال دقائق.
+
+البيانات المزروعة تحمل البادئة BM حتى يسهل تمييزها، والمولد حتمي
+(نفس seed ينتج نفس البيانات) لتكون نتائج القياس قابلة للمقارنة.
+"""
+import random
+import time
+from calendar import monthrange
+from dataclasses import dataclass, asdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+
+@dataclass
+class DatasetScale:
+    """حجم الشركة الاصطناعية"""
+    name: str
+    extra_accounts: int
+    journal_entries: int
+    lines_per_entry: int
+    products: int
+    warehouses: int
+    stock_movements: int
+    customers: int
+    sales: int
+    employees: int
+
+    @property
+    def journal_lines(self) -> int:
+        return self.journal_entries * self.lines_per_entry
+
+    def to_dict(self) -> Dict[str, int]:
+        data = asdict(self)
+        data['journal_lines'] = self.journal_lines
+        return data
+
+
+# أحجام جاهزة - tiny للاختبارات، production لمحاكاة بيانات الإنتاج الفعلية
+SCALE_PRESETS = {
+    'tiny': DatasetScale(
+        name='tiny', extra_accounts=20, journal_entries=50, lines_per_entry=4,
+        products=30, warehouses=2, stock_movements=100, customers=20, sales=40, employees=10
+    ),
+    'small': DatasetScale(
+        name='small', extra_accounts=200, journal_entries=5_000, lines_per_entry=4,
+        products=2_000, warehouses=3, stock_movements=10_000, customers=500, sales=2_000, employees=200
+    ),
+    'medium': DatasetScale(
+        name='medium', extra_accounts=600, journal_entries=25_000, lines_per_entry=4,
+        products=10_000, warehouses=5, stock_movements=50_000, customers=2_000, sales=10_000, employees=1_000
+    ),
+    'production': DatasetScale(
+        name='production', extra_accounts=1_100, journal_entries=100_000, lines_per_entry=4,
+        products=30_000, warehouses=8, stock_movements=200_000, customers=5_000, sales=40_000, employees=3_000
+    ),
+}
+
+
+def get_scale(name: str) -> DatasetScale:
+    """الحصول على حجم جاهز بالاسم"""
+    if name not in SCALE_PRESETS:
+        raise ValueError(f"حجم غير معروف: {name} (المتاح: {', '.join(SCALE_PRESETS)})")
+    return SCALE_PRESETS[name]
+
+
+class SyntheticDatasetGenerator:
+    """
+    مولد الشركة الاصطناعية
+
+    الاستخدام:
+        generator = SyntheticDatasetGenerator(get_scale('medium'))
+        counts = generator.generate()
+    """
+
+    PREFIX = 'BM'
+    CUSTOMER_MARKER_CODE = 'BMC000001'
+
+    def __init__(self, scale: DatasetScale, seed: int = 42, batch_size: int = 2000,
+                 fiscal_year: Optional[int] = None, verbose: bool = False):
+        self.scale = scale
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.year = fiscal_year or timezone.now().year
+        self.verbose = verbose
+        self.counts: Dict[str, int] = {}
+        self.timings: Dict[str, float] = {}
+        self.user = None
+
+    # ------------------------------------------------------------------ #
+    # نقطة الدخول
+    # ------------------------------------------------------------------ #
+
+    @classmethod
+    def is_seeded(cls) -> bool:
+        """هل توجد بيانات اصطناعية مزروعة مسبقاً؟"""
+        from client.models import Customer
+        return Customer.objects.filter(code=cls.CUSTOMER_MARKER_CODE).exists()
+
+    def generate(self) -> Dict[str, int]:
+        """زرع الشركة الاصطناعية كاملة وإرجاع عدد السجلات لكل نوع"""
+        self.user = self._get_benchmark_user()
+        self._step('accounting_setup', self._ensure_accounting_setup)
+        accounts = self._step('accounts', self._seed_accounts)
+        self._step('journal', lambda: self._seed_journal(accounts))
+        products, warehouses = self._step('products', self._seed_products)
+        self._step('stock', lambda: self._seed_stock(products, warehouses))
+        customers = self._step('customers', self._seed_customers)
+        self._step('sales', lambda: self._seed_sales(customers, warehouses))
+        self._step('employees', self._seed_employees)
+        return self.counts
+
+    def _step(self, name, func):
+        started = time.perf_counter()
+        result = func()
+        self.timings[name] = round(time.perf_counter() - started, 3)
+        if self.verbose:
+            print(f"  [seed] {name}: {self.timings[name]}s")
+        return result
+
+    def _bulk(self, model, objects: List, key: str):
+        """إدراج دفعي مع تسجيل العدد"""
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.counts[key] = self.counts.get(key, 0) + len(objects)
+
+    def _random_date(self) -> date:
+        start = date(self.year, 1, 1)
+        end = min(date(self.year, 12, 31), timezone.now().date())
+        return start + timedelta(days=self.random.randint(0, max((end - start).days, 0)))
+
+    def _amount(self, low=10, high=50_000) -> Decimal:
+        return Decimal(self.random.randint(low * 100, high * 100)) / 100
+
+    # ------------------------------------------------------------------ #
+    # البنية الأساسية
+    # ------------------------------------------------------------------ #
+
+    def _get_benchmark_user(self):
+        User = get_user_model()
+        user, _ = User.objects.get_or_create(
+            username='benchmark',
+            defaults={'email': 'benchmark@example.com', 'is_staff': True},
+        )
+        return user
+
+    def _ensure_accounting_setup(self):
+        """تهيئة الشجرة المحاسبية والسنة المالية إذا لم تكن موجودة"""
+        from financial.models import ChartOfAccounts, AccountingPeriod
+
+        if not ChartOfAccounts.objects.filter(is_leaf=True, is_active=True).exists():
+            call_command('setup_accounting_system', year=self.year, verbosity=0)
+
+        existing = set(
+            AccountingPeriod.objects.filter(start_date__year=self.year).values_list('start_date__month', flat=True)
+        )
+        periods = [
+            AccountingPeriod(
+                name=f"{self.PREFIX} {self.year}-{month:02d}",
+                period_number=month,
+                start_date=date(self.year, month, 1),
+                end_date=date(self.year, month, monthrange(self.year, month)[1]),
+                status='open',
+            )
+            for month in range(1, 13) if month not in existing
+        ]
+        if periods:
+            self._bulk(AccountingPeriod, periods, 'accounting_periods')
+
+    def _seed_accounts(self) -> List[int]:
+        """إضافة حسابات فرعية نهائية تحت الحسابات الأب الموجودة لمحاكاة شجرة كبيرة"""
+        from financial.models import ChartOfAccounts
+
+        parents = list(
+            ChartOfAccounts.objects.filter(is_leaf=False, is_active=True).order_by('code')
+        )
+        if parents and self.scale.extra_accounts:
+            accounts = []
+            for i in range(self.scale.extra_accounts):
+                parent = parents[i % len(parents)]
+                accounts.append(ChartOfAccounts(
+                    code=f"{parent.code}9{i:04d}",
+                    name=f"{parent.name} - {self.PREFIX} {i + 1}",
+                    account_type_id=parent.account_type_id,
+                    parent=parent,
+                    level=parent.level + 1,
+                    is_leaf=True,
+                    is_active=True,
+                ))
+            self._bulk(ChartOfAccounts, accounts, 'accounts')
+
+        return list(ChartOfAccounts.objects.filter(is_leaf=True, is_active=True).values_list('id', flat=True))
+
+    # ------------------------------------------------------------------ #
+    # الأستاذ العام
+    # ------------------------------------------------------------------ #
+
+    def _seed_journal(self, account_ids: List[int]):
+        """قيود مرحلة ومتوازنة موزعة على أشهر السنة"""
+        from financial.models import AccountingPeriod, JournalEntry, JournalEntryLine
+
+        if not account_ids:
+            return
+        periods = {
+            p.start_date.month: p.pk
+            for p in AccountingPeriod.objects.filter(start_date__year=self.year)
+        }
+        now = timezone.now()
+        lines_per_entry = max(2, self.scale.lines_per_entry)
+        # الحسابات "الساخنة" تحصل على نصيب أكبر من الحركات كما في الواقع
+        hot_accounts = account_ids[:max(5, len(account_ids) // 20)]
+
+        for start in range(0, self.scale.journal_entries, self.batch_size):
+            stop = min(start + self.batch_size, self.scale.journal_entries)
+            with transaction.atomic():
+                entries = []
+                for i in range(start, stop):
+                    entry_date = self._random_date()
+                    entries.append(JournalEntry(
+                        number=f"{self.PREFIX}-{i:09d}",
+                        date=entry_date,
+                        entry_type='manual',
+                        status='posted',
+                        description=f"قيد اختبار أداء {i}",
+                        source_module='benchmark',
+                        source_model='SyntheticDataset',
+                        accounting_period_id=periods.get(entry_date.month),
+                        posted_at=now,
+                        created_by=self.user,
+                    ))
+                JournalEntry.objects.bulk_create(entries, batch_size=self.batch_size)
+                if not entries[0].pk:
+                    # قواعد بيانات لا تعيد المفاتيح من bulk_create (MySQL)
+                    numbers = [e.number for e in entries]
+                    ids = dict(JournalEntry.objects.filter(number__in=numbers).values_list('number', 'id'))
+                    for entry in entries:
+                        entry.pk = entry.id = ids[entry.number]
+
+                lines = []
+                for entry in entries:
+                    half = lines_per_entry // 2
+                    amounts = [self._amount() for _ in range(half)]
+                    total = sum(amounts)
+                    for amount in amounts:
+                        lines.append(JournalEntryLine(
+                            journal_entry_id=entry.pk,
+                            account_id=self.random.choice(hot_accounts if self.random.random() < 0.5 else account_ids),
+                            debit=amount, credit=Decimal('0'),
+                            description=entry.description,
+                        ))
+                    credit_count = lines_per_entry - half
+                    remaining = total
+                    for n in range(credit_count):
+                        amount = remaining if n == credit_count - 1 else (total / credit_count).quantize(Decimal('0.01'))
+                        remaining -= amount
+                        lines.append(JournalEntryLine(
+                            journal_entry_id=entry.pk,
+                            account_id=self.random.choice(account_ids),
+                            debit=Decimal('0'), credit=amount,
+                            description=entry.description,
+                        ))
+                JournalEntryLine.objects.bulk_create(lines, batch_size=self.batch_size)
+            self.counts['journal_entries'] = self.counts.get('journal_entries', 0) + len(entries)
+            self.counts['journal_lines'] = self.counts.get('journal_lines', 0) + len(lines)
+
+    # ------------------------------------------------------------------ #
+    # المخزون
+    # ------------------------------------------------------------------ #
+
+    def _seed_products(self):
+        from product.models import Category, Unit, Product, Warehouse
+
+        category, _ = Category.objects.get_or_create(name=f"{self.PREFIX} تصنيف اختبار الأداء")
+        unit = Unit.objects.first() or Unit.objects.create(name='قطعة', symbol='pc')
+
+        warehouses = [
+            Warehouse(name=f"{self.PREFIX} مخزن {i + 1}", code=f"{self.PREFIX}W{i + 1:03d}")
+            for i in range(self.scale.warehouses)
+        ]
+        self._bulk(Warehouse, warehouses, 'warehouses')
+
+        products = []
+        for i in range(self.scale.products):
+            cost = self._amount(5, 2_000)
+            products.append(Product(
+                name=f"صنف اختبار {i + 1}",
+                name_en=f"Benchmark item {i + 1}",
+                sku=f"{self.PREFIX}-{i + 1:07d}",
+                barcode=f"62{i + 1:011d}",
+                category=category,
+                unit=unit,
+                cost_price=cost,
+                selling_price=(cost * Decimal('1.25')).quantize(Decimal('0.01')),
+                created_by=self.user,
+                is_active=True,
+            ))
+        self._bulk(Product, products, 'products')
+
+        product_ids = list(Product.objects.filter(sku__startswith=f"{self.PREFIX}-").values_list('id', flat=True))
+        warehouse_ids = list(Warehouse.objects.filter(code__startswith=f"{self.PREFIX}W").values_list('id', flat=True))
+        return product_ids, warehouse_ids
+
+    def _seed_stock(self, product_ids: List[int], warehouse_ids: List[int]):
+        """حركات مخزون ثم أرصدة Stock متسقة معها"""
+        from product.models import Stock, StockMovement
+
+        if not product_ids or not warehouse_ids:
+            return
+        balances: Dict[tuple, int] = {}
+        movements = []
+        for i in range(self.scale.stock_movements):
+            key = (self.random.choice(product_ids), self.random.choice(warehouse_ids))
+            before = balances.get(key, 0)
+            if before > 0 and self.random.random() < 0.4:
+                movement_type, quantity = 'out', self.random.randint(1, before)
+                after = before - quantity
+            else:
+                movement_type, quantity = 'in', self.random.randint(1, 200)
+                after = before + quantity
+            balances[key] = after
+            movements.append(StockMovement(
+                product_id=key[0],
+                warehouse_id=key[1],
+                movement_type=movement_type,
+                quantity=quantity,
+                unit_cost=self._amount(5, 2_000),
+                reference_number=f"{self.PREFIX}-MV-{i:08d}",
+                document_type='other',
+                quantity_before=before,
+                quantity_after=after,
+                created_by=self.user,
+            ))
+            if len(movements) >= self.batch_size:
+                self._bulk(StockMovement, movements, 'stock_movements')
+                movements = []
+        if movements:
+            self._bulk(StockMovement, movements, 'stock_movements')
+
+        stocks = [
+            Stock(product_id=product_id, warehouse_id=warehouse_id, quantity=quantity,
+                  last_movement_date=timezone.now(), created_by=self.user)
+            for (product_id, warehouse_id), quantity in balances.items()
+        ]
+        self._bulk(Stock, stocks, 'stocks')
+
+    # ------------------------------------------------------------------ #
+    # العملاء والمبيعات
+    # ------------------------------------------------------------------ #
+
+    def _seed_customers(self) -> List[int]:
+        from client.models import Customer
+
+        customers = [
+            Customer(
+                name=f"عميل اختبار {i + 1}",
+                code=f"{self.PREFIX}C{i + 1:06d}",
+                phone=f"010{i:08d}",
+                credit_limit=self._amount(1_000, 500_000),
+                is_active=True,
+            )
+            for i in range(self.scale.customers)
+        ]
+        self._bulk(Customer, customers, 'customers')
+        return list(Customer.objects.filter(code__startswith=f"{self.PREFIX}C").values_list('id', flat=True))
+
+    def _seed_sales(self, customer_ids: List[int], warehouse_ids: List[int]):
+        """رؤوس فواتير مؤكدة غير مسددة لتغذية تقرير أعمار الديون"""
+        from sale.models import Sale
+
+        if not customer_ids or not warehouse_ids:
+            return
+        sales = []
+        for i in range(self.scale.sales):
+            subtotal = self._amount(100, 100_000)
+            sales.append(Sale(
+                number=f"{self.PREFIX}-S{i + 1:08d}",
+                date=self._random_date(),
+                customer_id=self.random.choice(customer_ids),
+                warehouse_id=self.random.choice(warehouse_ids),
+                subtotal=subtotal,
+                total=subtotal,
+                payment_method='credit',
+                status='confirmed',
+                payment_status='unpaid',
+                created_by=self.user,
+            ))
+            if len(sales) >= self.batch_size:
+                self._bulk(Sale, sales, 'sales')
+                sales = []
+        if sales:
+            self._bulk(Sale, sales, 'sales')
+
+    # ------------------------------------------------------------------ #
+    # الموارد البشرية
+    # ------------------------------------------------------------------ #
+
+    def _seed_employees(self):
+        """موظفون بعقود سارية وملخصات حضور معتمدة لشهر القياس"""
+        from hr.models import Department, JobTitle, Employee, Contract, AttendanceSummary
+
+        department, _ = Department.objects.get_or_create(
+            code=f"{self.PREFIX}-DEPT", defaults={'name_ar': f"{self.PREFIX} قسم اختبار الأداء"}
+        )
+        job_title, _ = JobTitle.objects.get_or_create(
+            code=f"{self.PREFIX}-JOB",
+            defaults={'title_ar': f"{self.PREFIX} وظيفة اختبار الأداء", 'department': department},
+        )
+
+        employees = []
+        for i in range(self.scale.employees):
+            employees.append(Employee(
+                employee_number=f"{self.PREFIX}E{i + 1:06d}",
+                name=f"موظف اختبار {i + 1}",
+                national_id=f"29{i + 1:012d}",
+                birth_date=date(1980 + i % 20, 1 + i % 12, 1 + i % 28),
+                gender='male' if i % 2 else 'female',
+                marital_status='single',
+                department=department,
+                job_title=job_title,
+                hire_date=date(self.year - 1 - i % 10, 1 + i % 12, 1),
+                status='active',
+                created_by=self.user,
+            ))
+        self._bulk(Employee, employees, 'employees')
+
+        employee_rows = list(
+            Employee.objects.filter(employee_number__startswith=f"{self.PREFIX}E").values_list('id', 'hire_date')
+        )
+        contracts = [
+            Contract(
+                contract_number=f"{self.PREFIX}-CT-{employee_id}",
+                employee_id=employee_id,
+                contract_type='permanent',
+                start_date=hire_date,
+                basic_salary=self._amount(5_000, 40_000),
+                status='active',
+                created_by=self.user,
+            )
+            for employee_id, hire_date in employee_rows
+        ]
+        self._bulk(Contract, contracts, 'contracts')
+
+        month = self.benchmark_month()
+        summaries = [
+            AttendanceSummary(employee_id=employee_id, month=month, is_approved=True)
+            for employee_id, _ in employee_rows
+        ]
+        self._bulk(AttendanceSummary, summaries, 'attendance_summaries')
+
+    def benchmark_month(self) -> date:
+        """الشهر المستخدم في قياس مسير الرواتب (الشهر السابق للشهر الحالي)"""
+        first_of_month = timezone.now().date().replace(day=1)
+        return (first_of_month - timedelta(days=1)).replace(day=1)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Benchmark Execution Script
+
+يزرع شركة اصطناعية (اختيارياً) ثم يشغل قياسات المسارات الساخنة ويحفظ النتائج JSON.
+عند تمرير --baseline يقارن النتائج ويخرج برمز 1 إذا تجاوز أي سيناريو نسبة التراجع.
+
+أمثلة:
+    # زرع بيانات متوسطة الحجم ثم القياس
+    DB_ENGINE=mysql python tests/performance/run_benchmarks.py --seed --scale medium
+
+    # القياس ومقارنته بالنتيجة المرجعية في CI
+    python tests/performance/run_benchmarks.py --baseline reports/performance/baseline.json --threshold 20
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Add project root to Python path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+# Set Django settings
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tests.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.core.management import call_command
+
+from tests.performance.benchmark_suite import BenchmarkSuite, SCENARIOS
+from tests.performance.dataset_generator import SyntheticDatasetGenerator, SCALE_PRESETS, get_scale
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="قياسات أداء المسارات الساخنة")
+    parser.add_argument('--seed', action='store_true', help="زرع البيانات الاصطناعية قبل القياس")
+    parser.add_argument('--scale', default='small', choices=sorted(SCALE_PRESETS), help="حجم البيانات المزروعة")
+    parser.add_argument('--random-seed', type=int, default=42, help="بذرة المولد العشوائي")
+    parser.add_argument('--migrate', action='store_true', help="تطبيق الترحيلات قبل الزرع")
+    parser.add_argument('--scenarios', nargs='*', choices=sorted(SCENARIOS), help="سيناريوهات محددة (الافتراضي: الكل)")
+    parser.add_argument('--repeat', type=int, default=3, help="عدد مرات تكرار كل سيناريو")
+    parser.add_argument('--memory', action='store_true', help="قياس ذروة الذاكرة (يبطئ التنفيذ)")
+    parser.add_argument('--output', default='reports/performance/benchmarks.json', help="ملف حفظ النتائج")
+    parser.add_argument('--baseline', help="ملف النتيجة المرجعية للمقارنة")
+    parser.add_argument('--threshold', type=float, default=20.0, help="نسبة التراجع المسموحة %%")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("HOT-PATH BENCHMARKS")
+    print("=" * 60)
+    print(f"Database: {settings.DATABASES['default']['ENGINE']}")
+
+    if args.migrate:
+        call_command('migrate', verbosity=0)
+
+    if args.seed:
+        if SyntheticDatasetGenerator.is_seeded():
+            print("البيانات الاصطناعية مزروعة مسبقاً - تخطي الزرع")
+        else:
+            scale = get_scale(args.scale)
+            print(f"زرع بيانات بحجم {scale.name}: {scale.to_dict()}")
+            started = time.perf_counter()
+            generator = SyntheticDatasetGenerator(scale, seed=args.random_seed, verbose=True)
+            counts = generator.generate()
+            print(f"تم الزرع خلال {time.perf_counter() - started:.1f}s: {counts}")
+
+    suite = BenchmarkSuite(repeat=args.repeat, scenarios=args.scenarios, measure_memory=args.memory)
+    suite.run()
+    suite.save(args.output)
+
+    print(f"\n{'السيناريو':<22}{'الوسيط ms':>12}{'الاستعلامات':>14}{'زمن DB ms':>12}  الحالة")
+    for name, result in suite.results.items():
+        status = result.status if result.status == 'ok' else f"error: {result.error}"
+        print(f"{name:<22}{result.median_ms:>12}{result.queries:>14}{result.db_time_ms:>12}  {status}")
+    print(f"\nالنتائج محفوظة في {args.output}")
+
+    if args.baseline:
+        regressions = suite.compare(args.baseline, threshold_percent=args.threshold)
+        if regressions:
+            print(f"\n[-] {len(regressions)} تراجع في الأداء يتجاوز {args.threshold}%:")
+            for regression in regressions:
+                print(f"    {regression}")
+            return 1
+        print(f"\n[+] لا تراجع في الأداء يتجاوز {args.threshold}%")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+اختبارات مولد البيانات الاصطناعية ومجموعة قياسات الأداء
+"""
+import json
+
+import pytest
+
+from .benchmark_suite import BenchmarkSuite, compare_results
+from .dataset_generator import SyntheticDatasetGenerator, get_scale
+
+
+@pytest.mark.performance
+@pytest.mark.django_db
+class TestSyntheticDatasetGenerator:
+    """اختبارات زرع البيانات بالحجم الصغير جداً"""
+
+    def test_generate_tiny_dataset(self):
+        from financial.models import JournalEntry, JournalEntryLine
+        from django.db.models import Sum
+
+        scale = get_scale('tiny')
+        counts = SyntheticDatasetGenerator(scale).generate()
+
+        assert counts['journal_entries'] == scale.journal_entries
+        assert counts['journal_lines'] == scale.journal_lines
+        assert counts['products'] == scale.products
+        assert counts['stock_movements'] == scale.stock_movements
+        assert counts['customers'] == scale.customers
+        assert counts['employees'] == scale.employees
+        assert SyntheticDatasetGenerator.is_seeded()
+
+        # القيود المزروعة متوازنة
+        totals = JournalEntryLine.objects.filter(
+            journal_entry__in=JournalEntry.objects.filter(number__startswith='BM-')
+        ).aggregate(debit=Sum('debit'), credit=Sum('credit'))
+        assert totals['debit'] == totals['credit']
+
+    def test_unknown_scale(self):
+        with pytest.raises(ValueError):
+            get_scale('galactic')
+
+
+@pytest.mark.performance
+@pytest.mark.django_db
+class TestBenchmarkSuite:
+    """اختبارات تشغيل القياسات وحفظها"""
+
+    def test_run_and_save(self, tmp_path):
+        SyntheticDatasetGenerator(get_scale('tiny')).generate()
+        suite = BenchmarkSuite(repeat=1, scenarios=['account_statement', 'customer_aging'])
+        results = suite.run()
+
+        assert set(results) == {'account_statement', 'customer_aging'}
+        for result in results.values():
+            assert result.status in ('ok', 'error')
+            if result.status == 'ok':
+                assert result.runs == 1
+                assert result.queries > 0
+
+        output = tmp_path / 'benchmarks.json'
+        suite.save(str(output))
+        saved = json.loads(output.read_text(encoding='utf-8'))
+        assert set(saved['results']) == set(results)
+
+    def test_unknown_scenario(self):
+        with pytest.raises(ValueError):
+            BenchmarkSuite(scenarios=['does_not_exist'])
+
+
+@pytest.mark.performance
+class TestCompareResults:
+    """اختبارات كشف التراجع مقارنة بالنتيجة المرجعية"""
+
+    def _result(self, median_ms, queries, status='ok'):
+        return {'status': status, 'median_ms': median_ms, 'queries': queries}
+
+    def test_detects_time_and_query_regressions(self):
+        baseline = {'results': {'trial_balance': self._result(100, 10)}}
+        current = {'results': {'trial_balance': self._result(150, 13)}}
+        regressions = compare_results(baseline, current, threshold_percent=20)
+        assert {r.metric for r in regressions} == {'median_ms', 'queries'}
+
+    def test_ignores_noise_below_min_delta(self):
+        baseline = {'results': {'dashboard': self._result(2, 5)}}
+        current = {'results': {'dashboard': self._result(4, 5)}}
+        assert compare_results(baseline, current, threshold_percent=20, min_delta_ms=5) == []
+
+    def test_new_failure_is_regression(self):
+        baseline = {'results': {'payroll_run': self._result(100, 10)}}
+        current = {'results': {'payroll_run': self._result(0, 0, status='error')}}
+        regressions = compare_results(baseline, current)
+        assert [r.metric for r in regressions] == ['status']
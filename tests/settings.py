@@ -69,6 +69,13 @@ EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
 SECRET_KEY = 'test-secret-key-for-testing-only'
 ALLOWED_HOSTS = ['*']
 
+# حدود الاستعلامات تُفشل الاختبار بدلاً من التحذير، والعينة العشوائية معطلة
+PROFILING_SAMPLE_RATE = 0
+PROFILING_RAISE_ON_BUDGET = True
+
+# مفاتيح التشغيل بقيمها الافتراضية في كل اختبار (بدون نسخة محلية تعبر بين الاختبارات)
+FEATURE_FLAG_STORE_ENABLED = False
+
 # تعطيل Celery
 CELERY_TASK_ALWAYS_EAGER = True
 CELERY_TASK_EAGER_PROPAGATES = True
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Permission Audit Buffer
+
+Buffers permission-check audit records made during a web request and writes
+them through AuditService when the request finishes, so a page full of denied
+menu items does not issue one INSERT per check.
+"""
+
+from django.utils import timezone
+from typing import Dict, List, Tuple
+import logging
+import threading
+import time
+
+logger = logging.getLogger('users.permission_audit')
+
+
+class PermissionAuditBuffer:
+    """
+    Process-local buffer for CHECK_PERMISSION audit records.
+
+    Features:
+    - Outside a request (Celery tasks, management commands, shell) records are
+      written immediately; only request-time checks are buffered
+    - Rate limiting: one record per (user, permission, result) per window;
+      repeated checks are counted in its occurrence count. Repeats after the
+      record was written are collected in a follow-up record, written once the
+      window closes
+    - Records are written with AuditService.create_audit_record
+    - Flushed when the buffer is full, when the oldest record is too old, at the
+      end of every request (request_finished signal) and at process exit
+    """
+
+    FLUSH_SIZE = 50
+    FLUSH_INTERVAL = 5  # seconds
+    RATE_LIMIT_WINDOW = 60  # seconds
+
+    _lock = threading.Lock()
+    _pending: Dict[Tuple[int, str, bool], Dict] = {}
+    _window_ends: Dict[Tuple[int, str, bool], float] = {}
+
+    @staticmethod
+    def _in_request() -> bool:
+        from core.middleware.current_user import get_current_request
+
+        return get_current_request() is not None
+
+    @classmethod
+    def record(cls, user, permission_name: str, result: bool) -> bool:
+        """
+        Record a permission check.
+
+        Returns:
+            bool: False if the check was counted in an existing or follow-up record
+        """
+        entry = {
+            'user': user,
+            'permission_name': permission_name,
+            'result': result,
+            'occurrences': 1,
+            'timestamp': timezone.now(),
+        }
+        if not cls._in_request():
+            cls._write([entry])
+            return True
+
+        now = time.monotonic()
+        key = (user.id, permission_name, result)
+        with cls._lock:
+            pending = cls._pending.get(key)
+            if pending is not None:
+                pending['occurrences'] += 1
+                return False
+
+            window_end = cls._window_ends.get(key)
+            hold_until = window_end if window_end is not None and now < window_end else None
+            entry.update(queued_at=now, hold_until=hold_until)
+            cls._pending[key] = entry
+            if hold_until is None:
+                cls._window_ends[key] = now + cls.RATE_LIMIT_WINDOW
+
+            ready = [item for item in cls._pending.values() if item['hold_until'] is None]
+            flush_now = ready and (
+                len(ready) >= cls.FLUSH_SIZE
+                or now - min(item['queued_at'] for item in ready) >= cls.FLUSH_INTERVAL
+            )
+
+        if flush_now:
+            cls.flush()
+        return hold_until is None
+
+    @classmethod
+    def _drain(cls, force: bool) -> List[Dict]:
+        now = time.monotonic()
+        with cls._lock:
+            entries = []
+            for key, entry in list(cls._pending.items()):
+                if force or entry['hold_until'] is None or entry['hold_until'] <= now:
+                    entries.append(cls._pending.pop(key))
+                    if entry['hold_until'] is not None:
+                        # The follow-up record opens a new window
+                        cls._window_ends[key] = now + cls.RATE_LIMIT_WINDOW
+            # Forget closed windows so the dict does not grow without bound
+            cls._window_ends = {
+                key: end for key, end in cls._window_ends.items()
+                if end > now or key in cls._pending
+            }
+        return entries
+
+    @classmethod
+    def _write(cls, entries: List[Dict]) -> int:
+        from governance.services.audit_service import AuditService
+
+        written = 0
+        for entry in entries:
+            try:
+                audit_record = AuditService.create_audit_record(
+                    model_name='Permission',
+                    object_id=0,
+                    operation='CHECK_PERMISSION',
+                    user=entry['user'],
+                    source_service='PermissionService',
+                    additional_context={
+                        'permission_name': entry['permission_name'],
+                        'result': entry['result'],
+                        'target_user_id': entry['user'].id,
+                        'occurrences': entry['occurrences'],
+                        'first_seen': entry['timestamp'].isoformat(),
+                    },
+                )
+            except Exception as e:
+                logger.error(f"Failed to write permission audit record: {e}")
+                continue
+            if audit_record is not None:
+                written += 1
+        return written
+
+    @classmethod
+    def flush(cls, force: bool = False) -> int:
+        """
+        Write the buffered records.
+
+        Args:
+            force: Also write follow-up records whose rate-limit window is still open
+                   (process exit)
+
+        Returns:
+            int: Number of records written
+        """
+        entries = cls._drain(force)
+        if not entries:
+            return 0
+        return cls._write(entries)
+
+    @classmethod
+    def clear(cls) -> None:
+        """Drop buffered records and rate-limit state (used by tests)."""
+        with cls._lock:
+            cls._pending = {}
+            cls._window_ends = {}
+
+
+def flush_permission_audit_buffer(sender=None, **kwargs) -> None:
+    """request_finished receiver: persist the records buffered during the request."""
+    try:
+        PermissionAuditBuffer.flush()
+    except Exception as e:
+        logger.error(f"Error flushing permission audit buffer: {e}")
+
+
+def flush_permission_audit_buffer_at_exit() -> None:
+    """atexit hook: persist everything still buffered, including open follow-up records."""
+    try:
+        PermissionAuditBuffer.flush(force=True)
+    except Exception as e:
+        logger.error(f"Error flushing permission audit buffer at exit: {e}")
+
+
+__all__ = ['PermissionAuditBuffer', 'flush_permission_audit_buffer', 'flush_permission_audit_buffer_at_exit']
@@ -9,8 +9,9 @@ Optimized for performance with proper query optimization and bulk operations.
 from django.core.cache import cache
 from django.contrib.auth.models import Permission
 from django.db.models import Prefetch
-from typing import Dict, Any, List, Optional, Set
+from typing import Dict, Any, FrozenSet, List, Optional, Set, Tuple
 import logging
+import time
 
 from ..models import User, Role
 
@@ -31,6 +32,8 @@ class PermissionCacheService:
     # Cache configuration
     CACHE_TIMEOUT = 300  # 5 minutes
     CACHE_PREFIX = 'perm_cache'
+    # Compiled permission sets are keyed on version stamps, so the timeout is only an upper bound
+    COMPILED_CACHE_TIMEOUT = 3600
     
     @classmethod
     def _get_cache_key(cls, key_type: str, identifier: str) -> str:
@@ -217,6 +220,81 @@ class PermissionCacheService:
             logger.error(f"Bulk role cache operation failed: {e}")
             return {'success': [], 'failed': role_ids, 'total': len(role_ids)}
     
+    @classmethod
+    def _bump_version(cls, cache_key: str) -> None:
+        """Increment a version stamp shared by all workers (re-seeded if evicted)."""
+        try:
+            cache.incr(cache_key)
+        except ValueError:
+            cache.set(cache_key, time.time_ns(), None)
+    
+    @classmethod
+    def bump_global_version(cls) -> None:
+        """
+        Invalidate compiled permission sets of all users.
+        Used when a role or group permission changes.
+        """
+        cls._bump_version(cls._get_cache_key('version', 'global'))
+    
+    @classmethod
+    def bump_user_version(cls, user_id: int) -> None:
+        """Invalidate the compiled permission set of a single user."""
+        cls._bump_version(cls._get_cache_key('version', f'user:{user_id}'))
+    
+    @classmethod
+    def get_versions(cls, user_id: int) -> Tuple[int, int]:
+        """
+        Get (global, user) version stamps.
+        
+        Missing stamps are seeded with the current time rather than zero, so an evicted
+        stamp can never match a compiled set cached under an older version.
+        """
+        global_key = cls._get_cache_key('version', 'global')
+        user_key = cls._get_cache_key('version', f'user:{user_id}')
+        versions = cache.get_many([global_key, user_key])
+        for key in (global_key, user_key):
+            if key not in versions:
+                seed = time.time_ns()
+                versions[key] = seed if cache.add(key, seed, None) else (cache.get(key) or seed)
+        return versions[global_key], versions[user_key]
+    
+    @classmethod
+    def compile_user_permissions(cls, user_id: int) -> FrozenSet[str]:
+        """
+        Build the compiled permission set of a user from the database:
+        one hashed set holding every codename and display name, for O(1) membership tests.
+        """
+        try:
+            user = User.objects.select_related('role').prefetch_related(
+                'role__permissions',
+                'custom_permissions',
+                'groups__permissions'
+            ).get(id=user_id)
+        except User.DoesNotExist:
+            return frozenset()
+        
+        compiled = set()
+        for perm in user.get_all_permissions():
+            compiled.add(perm.codename)
+            compiled.add(perm.name)
+        return frozenset(compiled)
+    
+    @classmethod
+    def get_compiled_permissions(cls, user_id: int) -> FrozenSet[str]:
+        """
+        Get the compiled permission set of a user from the shared cache.
+        
+        The cache key embeds the global and per-user version stamps, so any worker that
+        bumps a version makes every other worker recompile on its next check.
+        """
+        global_version, user_version = cls.get_versions(user_id)
+        cache_key = cls._get_cache_key('compiled', f'{user_id}:{global_version}:{user_version}')
+        compiled = cache.get(cache_key)
+        if compiled is None:
+            compiled = cls.compile_user_permissions(user_id)
+            cache.set(cache_key, compiled, cls.COMPILED_CACHE_TIMEOUT)
+        return compiled
+    
     @classmethod
     def invalidate_user_cache(cls, user_id: int) -> None:
         """
@@ -230,6 +308,7 @@ class PermissionCacheService:
             cls._get_cache_key('user_summary', str(user_id))
         ]
         cache.delete_many(cache_keys)
+        cls.bump_user_version(user_id)
         logger.debug(f"Invalidated cache for user {user_id}")
     
     @classmethod
@@ -242,6 +321,7 @@ class PermissionCacheService:
         """
         cache_key = cls._get_cache_key('role_perms', str(role_id))
         cache.delete(cache_key)
+        cls.bump_global_version()
         logger.debug(f"Invalidated cache for role {role_id}")
     
     @classmethod
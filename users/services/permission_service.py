@@ -15,13 +15,13 @@ from django.core.cache import cache
 from django.db.models import Prefetch
 from typing import List, Dict, Any, Optional, Union, Tuple
 import logging
-from functools import lru_cache
 
 from governance.thread_safety import monitor_operation
 from governance.services.audit_service import AuditService
 from governance.models import GovernanceContext
 from ..models import User, Role
 from .permission_cache import PermissionCacheService
+from .permission_audit_buffer import PermissionAuditBuffer
 
 logger = logging.getLogger('users.permission_service')
 
@@ -267,36 +267,59 @@ class PermissionService:
         """Generate cache key for permission data."""
         return f"{cls.CACHE_PREFIX}:{key_type}:{identifier}"
     
+    # Permission checks that are always audited, even when granted
+    CRITICAL_PERMISSIONS = frozenset({'ادارة_المستخدمين', 'ادارة_الادوار_والصلاحيات'})
+    
     @classmethod
     def _invalidate_user_cache(cls, user_id: int) -> None:
-        """Invalidate all cached data for a user."""
+        """Invalidate all cached data for a user (bumps the shared per-user version)."""
         PermissionCacheService.invalidate_user_cache(user_id)
-        # Also clear LRU cache
-        cls._get_cached_user_permissions.cache_clear()
+        cls._forget_request_memo(user_id)
     
     @classmethod
     def _invalidate_role_cache(cls, role_id: int) -> None:
-        """Invalidate cached data for a role."""
+        """Invalidate cached data for a role (bumps the shared global version)."""
         PermissionCacheService.invalidate_role_cache(role_id)
         PermissionCacheService.invalidate_users_with_role(role_id)
-        # Also clear LRU cache
-        cls._get_cached_user_permissions.cache_clear()
+        cls._forget_request_memo()
+    
+    @classmethod
+    def _request_memo(cls) -> Optional[Dict[int, frozenset]]:
+        """Per-request memo of compiled permission sets (None outside a request)."""
+        from core.middleware.current_user import get_current_request
+        request = get_current_request()
+        if request is None:
+            return None
+        memo = getattr(request, '_compiled_permissions', None)
+        if memo is None:
+            memo = {}
+            request._compiled_permissions = memo
+        return memo
+    
+    @classmethod
+    def _forget_request_memo(cls, user_id: Optional[int] = None) -> None:
+        memo = cls._request_memo()
+        if memo is None:
+            return
+        if user_id is None:
+            memo.clear()
+        else:
+            memo.pop(user_id, None)
     
     @classmethod
-    @lru_cache(maxsize=1000)
     def _get_cached_user_permissions(cls, user_id: int) -> frozenset:
-        """Get cached user permissions as frozenset for hashability."""
-        try:
-            user = User.objects.select_related('role').prefetch_related(
-                'role__permissions',
-                'custom_permissions',
-                'groups__permissions'
-            ).get(id=user_id)
-            
-            permissions = user.get_all_permissions()
-            return frozenset((perm.codename, perm.name) for perm in permissions)
-        except User.DoesNotExist:
-            return frozenset()
+        """
+        Get the compiled permission set (codenames and display names) of a user.
+        Memoized per request, backed by the version-stamped shared cache.
+        """
+        memo = cls._request_memo()
+        if memo is not None and user_id in memo:
+            return memo[user_id]
+        
+        permissions = PermissionCacheService.get_compiled_permissions(user_id)
+        if memo is not None:
+            memo[user_id] = permissions
+        return permissions
     
     @classmethod
     def check_user_permission(cls, user: User, permission_name: str, obj: Any = None) -> bool:
@@ -321,27 +344,12 @@ class PermissionService:
                 if not user.is_active:
                     return False
                 
-                # Get cached permissions
-                user_permissions = cls._get_cached_user_permissions(user.id)
+                # O(1) membership test on the compiled set (codenames and names)
+                has_permission = permission_name in cls._get_cached_user_permissions(user.id)
                 
-                # Check by codename or name
-                has_permission = any(
-                    permission_name in (codename, name)
-                    for codename, name in user_permissions
-                )
-                
-                # Log permission check for audit (only for critical operations)
-                if not has_permission or permission_name in ['ادارة_المستخدمين', 'ادارة_الادوار_والصلاحيات']:
-                    AuditService.log_operation(
-                        model_name='Permission',
-                        object_id=0,
-                        operation='CHECK_PERMISSION',
-                        source_service='PermissionService',
-                        user=user,
-                        permission_name=permission_name,
-                        result=has_permission,
-                        target_user_id=user.id
-                    )
+                # Audit denied and critical checks (buffered and rate-limited)
+                if not has_permission or permission_name in cls.CRITICAL_PERMISSIONS:
+                    PermissionAuditBuffer.record(user, permission_name, has_permission)
                 
                 return has_permission
                 
@@ -902,9 +910,6 @@ class PermissionService:
                 # Get cache statistics
                 cache_stats = PermissionCacheService.get_cache_stats()
                 
-                # Get LRU cache info
-                lru_info = cls._get_cached_user_permissions.cache_info()
-                
                 # Get basic counts
                 total_users = User.objects.filter(is_active=True).count()
                 total_roles = Role.objects.filter(is_active=True).count()
@@ -912,11 +917,8 @@ class PermissionService:
                 
                 return {
                     'cache_performance': {
-                        'lru_hits': lru_info.hits,
-                        'lru_misses': lru_info.misses,
-                        'lru_hit_rate': round(lru_info.hits / (lru_info.hits + lru_info.misses) * 100, 2) if (lru_info.hits + lru_info.misses) > 0 else 0,
-                        'lru_current_size': lru_info.currsize,
-                        'lru_max_size': lru_info.maxsize,
+                        'compiled_cache_timeout': PermissionCacheService.COMPILED_CACHE_TIMEOUT,
+                        'hit_rate': cache_stats.get('hit_rate'),
                         'cache_backend': cache_stats.get('cache_backend', 'Unknown')
                     },
                     'system_stats': {
@@ -1,8 +1,17 @@
-from django.db.models.signals import post_save, post_delete
+import atexit
+
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
+from django.core.signals import request_finished
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
 from django.contrib.auth.signals import user_logged_in, user_logged_out, user_login_failed
-from users.models import ActivityLog
+from users.models import ActivityLog, Role
+from users.services.permission_cache import PermissionCacheService
+from users.services.permission_audit_buffer import (
+    flush_permission_audit_buffer,
+    flush_permission_audit_buffer_at_exit,
+)
 from core.middleware.current_user import get_current_user, get_current_request
 from utils.logs import get_client_ip
 import logging
@@ -189,3 +198,48 @@ def log_user_login_failed(sender, credentials, request, **kwargs):
         pass
     except Exception as e:
         logger.error(f"Error logging failed login: {e}", exc_info=True)
+
+
+# ==================== إبطال مجموعات الصلاحيات المجمّعة ====================
+# التعديل في أي عامل يرفع رقم الإصدار في الكاش المشترك فتُعاد الترجمة في كل العمال
+
+PERMISSION_FIELDS = {'role', 'role_id', 'is_active', 'is_superuser'}
+M2M_ACTIONS = {'post_add', 'post_remove', 'post_clear'}
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_permissions_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not PERMISSION_FIELDS.intersection(update_fields):
+        return
+    PermissionCacheService.bump_user_version(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.custom_permissions.through)
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_user_permissions_on_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in M2M_ACTIONS:
+        return
+    if not reverse:
+        PermissionCacheService.bump_user_version(instance.pk)
+    else:
+        # تعديل من جهة الصلاحية أو المجموعة: قد يمس مستخدمين كثيرين
+        PermissionCacheService.bump_global_version()
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_permissions_on_role_change(sender, action, **kwargs):
+    if action in M2M_ACTIONS:
+        PermissionCacheService.bump_global_version()
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_permissions_on_role_save(sender, instance, **kwargs):
+    PermissionCacheService.bump_global_version()
+
+
+request_finished.connect(flush_permission_audit_buffer, dispatch_uid="flush_permission_audit_buffer")
+atexit.register(flush_permission_audit_buffer_at_exit)
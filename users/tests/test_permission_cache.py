@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory, override_settings
+
+from core.middleware.current_user import _thread_locals
+from governance.models import AuditTrail
+from users.models import Role
+from users.services.permission_audit_buffer import PermissionAuditBuffer
+from users.services.permission_service import PermissionService
+
+User = get_user_model()
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'permission-cache-tests',
+    }
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CompiledPermissionCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        PermissionAuditBuffer.clear()
+        content_type = ContentType.objects.get_for_model(Role)
+        self.view_perm = Permission.objects.create(
+            codename="view_test_reports", name="عرض تقارير الاختبار", content_type=content_type
+        )
+        self.edit_perm = Permission.objects.create(
+            codename="edit_test_reports", name="تعديل تقارير الاختبار", content_type=content_type
+        )
+        self.role = Role.objects.create(name="test_reports_role", display_name="دور التقارير")
+        self.role.permissions.add(self.view_perm)
+        self.user = User.objects.create_user(username="perm_cache_user", password="password123", role=self.role)
+
+    def tearDown(self):
+        PermissionAuditBuffer.clear()
+        if hasattr(_thread_locals, 'request'):
+            del _thread_locals.request
+
+    def test_membership_by_codename_and_name_served_from_shared_cache(self):
+        self.assertTrue(PermissionService.check_user_permission(self.user, "view_test_reports"))
+        with self.assertNumQueries(0):
+            self.assertTrue(PermissionService.check_user_permission(self.user, "عرض تقارير الاختبار"))
+
+    def test_version_bump_invalidates_compiled_set_for_every_worker(self):
+        PermissionService.check_user_permission(self.user, "view_test_reports")
+        self.assertFalse(PermissionService.check_user_permission(self.user, "edit_test_reports"))
+
+        self.user.custom_permissions.add(self.edit_perm)
+        self.assertTrue(PermissionService.check_user_permission(self.user, "edit_test_reports"))
+
+        self.role.permissions.remove(self.view_perm)
+        self.assertFalse(PermissionService.check_user_permission(self.user, "view_test_reports"))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+    def test_request_memo_avoids_repeated_lookups(self):
+        _thread_locals.request = RequestFactory().get("/")
+        PermissionService.check_user_permission(self.user, "view_test_reports")
+        with self.assertNumQueries(0):
+            for _ in range(20):
+                PermissionService.check_user_permission(self.user, "view_test_reports")
+
+    def test_denials_are_buffered_rate_limited_and_counted(self):
+        _thread_locals.request = RequestFactory().get("/")
+        for _ in range(5):
+            self.assertFalse(PermissionService.check_user_permission(self.user, "edit_test_reports"))
+        self.assertFalse(AuditTrail.objects.filter(operation='CHECK_PERMISSION').exists())
+
+        self.assertEqual(PermissionAuditBuffer.flush(), 1)
+        record = AuditTrail.objects.get(operation='CHECK_PERMISSION')
+        self.assertEqual(record.additional_context['occurrences'], 5)
+        self.assertFalse(record.additional_context['result'])
+        self.assertEqual(record.user, self.user)
+
+        # داخل نافذة التقييد تُجمع التكرارات في سجل لاحق يُكتب بعد انتهاء النافذة أو عند الخروج
+        for _ in range(3):
+            PermissionService.check_user_permission(self.user, "edit_test_reports")
+        self.assertEqual(PermissionAuditBuffer.flush(), 0)
+        self.assertEqual(PermissionAuditBuffer.flush(force=True), 1)
+        follow_up = AuditTrail.objects.filter(operation='CHECK_PERMISSION').order_by('-id').first()
+        self.assertEqual(follow_up.additional_context['occurrences'], 3)
+
+    def test_checks_outside_a_request_are_written_immediately(self):
+        self.assertFalse(PermissionService.check_user_permission(self.user, "edit_test_reports"))
+        self.assertFalse(PermissionService.check_user_permission(self.user, "edit_test_reports"))
+        self.assertEqual(AuditTrail.objects.filter(operation='CHECK_PERMISSION').count(), 2)
+        self.assertEqual(PermissionAuditBuffer.flush(force=True), 0)
@@ -2,13 +2,38 @@ import os
 import re
 import io
 import base64
+import hashlib
 import logging
+import threading
+import zipfile
+from collections import OrderedDict
 from pathlib import Path
 from django.conf import settings
+from django.core.cache import cache
 from django.http import HttpResponse
 
 logger = logging.getLogger(__name__)
 
+# كاش الأصول المضمّنة (خطوط وصور) داخل العملية: {المسار: (mtime, الحجم, data URI)}
+# المفتاح يتضمن وقت التعديل فيُعاد الترميز تلقائياً عند تغيير الملف على القرص
+_ASSET_CACHE_SIZE = 256
+_asset_cache = OrderedDict()
+_asset_lock = threading.Lock()
+
+# إعداد خطوط WeasyPrint (FontConfiguration غير آمن بين الـ threads فيُنشأ مرة لكل thread)
+_font_local = threading.local()
+
+PDF_CACHE_PREFIX = "pdf_render"
+
+_MIME_TYPES = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'svg': 'image/svg+xml',
+    'ttf': 'font/ttf',
+}
+
+
 def reshape_ar(text):
     """
     إعادة تشكيل وتوجيه النص العربي للطباعة النظيفة في ReportLab
@@ -29,94 +54,162 @@ def reshape_ar(text):
         return str(text)
 
 def get_base64_encoded_file(file_path):
+    """
+    ترميز ملف كـ data URI مع كاش داخل العملية مفتاحه المسار + وقت التعديل
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _asset_lock:
+        cached = _asset_cache.get(file_path)
+        if cached and cached[:2] == signature:
+            _asset_cache.move_to_end(file_path)
+            return cached[2]
+
     try:
-        if os.path.exists(file_path):
-            with open(file_path, "rb") as image_file:
-                encoded = base64.b64encode(image_file.read()).decode('utf-8')
-                ext = os.path.splitext(file_path)[1].lower().replace('.', '')
-                mime_type = "image/png" if ext == "png" else "image/jpeg" if ext in ["jpg", "jpeg"] else "image/svg+xml" if ext == "svg" else "application/octet-stream"
-                return f"data:{mime_type};base64,{encoded}"
+        with open(file_path, "rb") as asset_file:
+            encoded = base64.b64encode(asset_file.read()).decode('utf-8')
     except Exception as e:
         logger.warning(f"Failed to encode image to base64 {file_path}: {e}")
-    return None
+        return None
 
-def prepare_html_for_pdf(html_content, request=None):
+    ext = os.path.splitext(file_path)[1].lower().replace('.', '')
+    mime_type = _MIME_TYPES.get(ext, "application/octet-stream")
+    data_uri = f"data:{mime_type};base64,{encoded}"
+
+    with _asset_lock:
+        _asset_cache[file_path] = (*signature, data_uri)
+        _asset_cache.move_to_end(file_path)
+        while len(_asset_cache) > _ASSET_CACHE_SIZE:
+            _asset_cache.popitem(last=False)
+    return data_uri
+
+def clear_pdf_asset_cache():
+    """تفريغ كاش الأصول المضمّنة (للاختبارات أو بعد استبدال الخطوط)"""
+    with _asset_lock:
+        _asset_cache.clear()
+
+def _static_dirs():
     base_dir = settings.BASE_DIR
     module_dir = Path(__file__).resolve().parent.parent
-    media_root = getattr(settings, 'MEDIA_ROOT', os.path.join(base_dir, 'media'))
     static_root = getattr(settings, 'STATIC_ROOT', os.path.join(base_dir, 'static'))
-
-    # Embed Tajawal fonts into @font-face for WeasyPrint
-    possible_reg = [
-        os.path.join(base_dir, 'static', 'fonts', 'Tajawal-Regular.ttf'),
-        os.path.join(static_root, 'fonts', 'Tajawal-Regular.ttf'),
-        os.path.join(module_dir, 'static', 'fonts', 'Tajawal-Regular.ttf'),
-        os.path.join(base_dir, 'core', 'static', 'fonts', 'Tajawal-Regular.ttf'),
-    ]
-    possible_bold = [
-        os.path.join(base_dir, 'static', 'fonts', 'Tajawal-Bold.ttf'),
-        os.path.join(static_root, 'fonts', 'Tajawal-Bold.ttf'),
-        os.path.join(module_dir, 'static', 'fonts', 'Tajawal-Bold.ttf'),
-        os.path.join(base_dir, 'core', 'static', 'fonts', 'Tajawal-Bold.ttf'),
+    return [
+        os.path.join(base_dir, 'static'),
+        static_root,
+        os.path.join(module_dir, 'static'),
+        os.path.join(base_dir, 'core', 'static'),
     ]
-    font_reg_path = next((p for p in possible_reg if p and os.path.exists(p)), None)
-    font_bold_path = next((p for p in possible_bold if p and os.path.exists(p)), None)
-    
+
+def _find_static_file(rel_path, dirs=None):
+    rel_path = rel_path.lstrip('/')
+    for directory in dirs or _static_dirs():
+        if directory:
+            full_path = os.path.join(directory, rel_path)
+            if os.path.exists(full_path):
+                return full_path
+    return None
+
+def _font_face_css():
+    """
+    قواعد @font-face لخط Tajawal مضمّناً كـ base64 (الترميز نفسه من كاش الأصول)
+    """
     font_css = ""
-    if font_reg_path and os.path.exists(font_reg_path):
-        with open(font_reg_path, 'rb') as f:
-            b64_reg = base64.b64encode(f.read()).decode('utf-8')
-            font_css += f"""
-            @font-face {{
-                font-family: 'Tajawal';
-                src: url('data:font/ttf;base64,{b64_reg}') format('truetype');
-                font-weight: normal;
-                font-style: normal;
-            }}
-            """
-    if font_bold_path and os.path.exists(font_bold_path):
-        with open(font_bold_path, 'rb') as f:
-            b64_bold = base64.b64encode(f.read()).decode('utf-8')
-            font_css += f"""
+    for font_file, weight in (('Tajawal-Regular.ttf', 'normal'), ('Tajawal-Bold.ttf', 'bold')):
+        font_path = _find_static_file(os.path.join('fonts', font_file))
+        data_uri = get_base64_encoded_file(font_path) if font_path else None
+        if not data_uri:
+            continue
+        font_css += f"""
             @font-face {{
                 font-family: 'Tajawal';
-                src: url('data:font/ttf;base64,{b64_bold}') format('truetype');
-                font-weight: bold;
+                src: url('{data_uri}') format('truetype');
+                font-weight: {weight};
                 font-style: normal;
             }}
             """
+    return font_css
+
+def prepare_html_for_pdf(html_content, request=None):
+    base_dir = settings.BASE_DIR
+    media_root = getattr(settings, 'MEDIA_ROOT', os.path.join(base_dir, 'media'))
+    static_dirs = _static_dirs()
 
+    # Embed Tajawal fonts into @font-face for WeasyPrint
+    font_css = _font_face_css()
     if font_css and '<head>' in html_content:
         html_content = html_content.replace('<head>', f'<head><style>{font_css}</style>')
 
+    def embed(full_path, original):
+        if not full_path or not os.path.exists(full_path):
+            return original
+        b64 = get_base64_encoded_file(full_path)
+        if b64:
+            return f'src="{b64}"'
+        return f'src="file:///{full_path.replace(os.sep, "/")}"'
+
     def replace_media(match):
-        rel_path = match.group(1)
-        full_path = os.path.join(media_root, rel_path.lstrip('/'))
-        if os.path.exists(full_path):
-            b64 = get_base64_encoded_file(full_path)
-            if b64:
-                return f'src="{b64}"'
-            return f'src="file:///{full_path.replace(os.sep, "/")}"'
-        return match.group(0)
+        full_path = os.path.join(media_root, match.group(1).lstrip('/'))
+        return embed(full_path, match.group(0))
 
     def replace_static(match):
-        rel_path = match.group(1)
-        full_path = os.path.join(static_root, rel_path.lstrip('/'))
-        if not os.path.exists(full_path):
-            full_path = os.path.join(base_dir, 'static', rel_path.lstrip('/'))
-        if not os.path.exists(full_path):
-            full_path = os.path.join(module_dir, 'static', rel_path.lstrip('/'))
-        if os.path.exists(full_path):
-            b64 = get_base64_encoded_file(full_path)
-            if b64:
-                return f'src="{b64}"'
-            return f'src="file:///{full_path.replace(os.sep, "/")}"'
-        return match.group(0)
+        # ترتيب البحث: STATIC_ROOT ثم static المشروع ثم static بجوار الحزمة
+        dirs = [static_dirs[1], static_dirs[0], static_dirs[2]]
+        return embed(_find_static_file(match.group(1), dirs), match.group(0))
 
     html_content = re.sub(r'src=["\']/(?:media|uploads)/([^"\']+)["\']', replace_media, html_content)
     html_content = re.sub(r'src=["\']/static/([^"\']+)["\']', replace_static, html_content)
     return html_content
 
+def get_font_config():
+    """
+    إعداد خطوط WeasyPrint: إنشاؤه مكلف (تحميل fontconfig) فيُعاد استخدامه لكل مستندات الـ thread نفسه
+    """
+    font_config = getattr(_font_local, 'font_config', None)
+    if font_config is None:
+        from weasyprint.text.fonts import FontConfiguration
+        font_config = _font_local.font_config = FontConfiguration()
+    return font_config
+
+def pdf_cache_key(processed_html, base_url=None):
+    """
+    مفتاح كاش المستند: بصمة المحتوى النهائي (القالب بعد تعبئة السياق + الأصول المضمّنة)
+    فأي تغيير في بيانات المستند أو في الخطوط والصور يولّد مفتاحاً جديداً
+    """
+    digest = hashlib.sha256()
+    digest.update((base_url or "").encode('utf-8'))
+    digest.update(b"\0")
+    digest.update(processed_html.encode('utf-8'))
+    return f"{PDF_CACHE_PREFIX}:{digest.hexdigest()}"
+
+def _write_pdf(processed_html, base_url=None):
+    import weasyprint
+    font_config = get_font_config()
+    return weasyprint.HTML(string=processed_html, base_url=base_url).write_pdf(font_config=font_config)
+
+def render_pdf_bytes(html_content, request=None, base_url=None, use_cache=True):
+    """
+    تحويل HTML إلى PDF عبر WeasyPrint مع كاش للنتيجة حسب بصمة المحتوى
+    يرفع الاستثناء إذا كان WeasyPrint غير متاح ليقرر المستدعي البديل
+    """
+    processed_html = prepare_html_for_pdf(html_content, request=request)
+    if base_url is None and request is not None:
+        base_url = request.build_absolute_uri('/')
+
+    timeout = getattr(settings, 'PDF_CACHE_TIMEOUT', 0)
+    key = pdf_cache_key(processed_html, base_url) if use_cache and timeout else None
+    if key:
+        pdf_bytes = cache.get(key)
+        if pdf_bytes is not None:
+            return pdf_bytes
+
+    pdf_bytes = _write_pdf(processed_html, base_url)
+    if key:
+        cache.set(key, pdf_bytes, timeout)
+    return pdf_bytes
+
 def generate_pdf_via_reportlab(doc_type, context, filename="document.pdf"):
     """
     محرك ReportLab النقي الخالي من الاعتماديات الخارجية (Pure Python Engine)
@@ -130,36 +223,25 @@ def generate_pdf_via_reportlab(doc_type, context, filename="document.pdf"):
         from reportlab.pdfbase.ttfonts import TTFont
         from reportlab.lib import colors
 
-        module_dir = Path(__file__).resolve().parent.parent
-        possible_paths = [
-            os.path.join(settings.BASE_DIR, 'static', 'fonts', 'Tajawal-Regular.ttf'),
-            os.path.join(getattr(settings, 'STATIC_ROOT', '') or '', 'fonts', 'Tajawal-Regular.ttf'),
-            os.path.join(module_dir, 'static', 'fonts', 'Tajawal-Regular.ttf'),
-            os.path.join(settings.BASE_DIR, 'core', 'static', 'fonts', 'Tajawal-Regular.ttf'),
-            'static/fonts/Tajawal-Regular.ttf',
-        ]
-        possible_bold_paths = [
-            os.path.join(settings.BASE_DIR, 'static', 'fonts', 'Tajawal-Bold.ttf'),
-            os.path.join(getattr(settings, 'STATIC_ROOT', '') or '', 'fonts', 'Tajawal-Bold.ttf'),
-            os.path.join(module_dir, 'static', 'fonts', 'Tajawal-Bold.ttf'),
-            os.path.join(settings.BASE_DIR, 'core', 'static', 'fonts', 'Tajawal-Bold.ttf'),
-            'static/fonts/Tajawal-Bold.ttf',
-        ]
-        
-        tajawal_reg = next((p for p in possible_paths if p and os.path.exists(p)), None)
-        tajawal_bold = next((p for p in possible_bold_paths if p and os.path.exists(p)), None)
-        
+        tajawal_reg = _find_static_file(os.path.join('fonts', 'Tajawal-Regular.ttf'))
+        tajawal_bold = _find_static_file(os.path.join('fonts', 'Tajawal-Bold.ttf'))
+        registered_fonts = pdfmetrics.getRegisteredFontNames()
+
         font_name = 'Helvetica'
         font_bold = 'Helvetica-Bold'
         
-        if tajawal_reg:
+        if 'Tajawal' in registered_fonts:
+            font_name = 'Tajawal'
+        elif tajawal_reg:
             try:
                 pdfmetrics.registerFont(TTFont('Tajawal', tajawal_reg))
                 font_name = 'Tajawal'
             except Exception as fe:
                 logger.warning(f"Failed to register Tajawal font: {fe}")
                 
-        if tajawal_bold:
+        if 'Tajawal-Bold' in registered_fonts:
+            font_bold = 'Tajawal-Bold'
+        elif tajawal_bold:
             try:
                 pdfmetrics.registerFont(TTFont('Tajawal-Bold', tajawal_bold))
                 font_bold = 'Tajawal-Bold'
@@ -580,15 +662,7 @@ def generate_pdf_from_html(html_content, request=None, filename="document.pdf",
     """
     # 1. المحاولة الأولى عبر WeasyPrint (إذا كانت مكتبات C مثبتة)
     try:
-        import weasyprint
-        processed_html = prepare_html_for_pdf(html_content, request=request)
-        base_url = request.build_absolute_uri('/') if request else None
-        
-        pdf_bytes = weasyprint.HTML(
-            string=processed_html,
-            base_url=base_url
-        ).write_pdf()
-        
+        pdf_bytes = render_pdf_bytes(html_content, request=request)
         response = HttpResponse(pdf_bytes, content_type='application/pdf')
         return set_pdf_content_disposition(response, filename)
     except Exception as e:
@@ -641,3 +715,135 @@ def generate_guaranteed_pdf_response(doc_type, context, filename="document.pdf")
         minimal_pdf = b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj 2 0 obj<</Type/Pages/Count 1/Kids[3 0 R]>>endobj 3 0 obj<</Type/Page/MediaBox[0 0 595 842]/Parent 2 0 R>>endobj\ntrailer<</Root 1 0 R>>\n%%EOF"
         response = HttpResponse(minimal_pdf, content_type='application/pdf')
         return set_pdf_content_disposition(response, filename)
+
+
+def _render_pending(pending):
+    """
+    توليد المستندات غير الموجودة في الكاش تسلسلياً بإعداد خطوط واحد
+    (لا threads ولا عمليات فرعية داخل عامل الويب)
+    :param pending: قائمة (index, processed_html, base_url)
+    :return: {index: pdf_bytes}
+    """
+    # تحميل WeasyPrint وإعداد الخطوط قبل أول مستند (ويكشف غياب المكتبة مبكراً)
+    get_font_config()
+    return {
+        index: _write_pdf(processed_html, base_url)
+        for index, processed_html, base_url in pending
+    }
+
+def _fallback_pdf_bytes(document):
+    """توليد مستند واحد عبر ReportLab عند عدم توفر WeasyPrint"""
+    context = document.get('context') or {}
+    doc_type = document.get('doc_type', 'sale')
+    filename = document.get('filename', 'document.pdf')
+    response = None
+    if context:
+        response = generate_pdf_via_reportlab(doc_type, context, filename=filename)
+    if response is None:
+        response = generate_guaranteed_pdf_response(doc_type, context, filename=filename)
+    return response.content
+
+def merge_pdfs(pdf_files):
+    """
+    دمج عدة ملفات PDF في ملف واحد (يتطلب مكتبة pypdf)
+    :return: bytes أو None إذا كانت المكتبة غير مثبتة
+    """
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        return None
+
+    writer = PdfWriter()
+    for pdf_bytes in pdf_files:
+        for page in PdfReader(io.BytesIO(pdf_bytes)).pages:
+            writer.add_page(page)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+def zip_pdfs(named_files):
+    """
+    ضغط عدة ملفات PDF في أرشيف ZIP واحد مع تمييز الأسماء المكررة
+    :param named_files: قائمة (filename, pdf_bytes)
+    """
+    buffer = io.BytesIO()
+    used_names = set()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for filename, pdf_bytes in named_files:
+            name = filename if filename.endswith('.pdf') else f"{filename}.pdf"
+            stem, counter = name[:-4], 1
+            while name in used_names:
+                counter += 1
+                name = f"{stem}_{counter}.pdf"
+            used_names.add(name)
+            archive.writestr(name, pdf_bytes)
+    return buffer.getvalue()
+
+def render_pdf_batch(documents, request=None, use_cache=True):
+    """
+    توليد مجموعة مستندات PDF دفعة واحدة (كشوف رواتب شهر، فواتير عميل، أذونات تسليم يوم)
+
+    - تجهيز HTML وتضمين الأصول يتم في العملية الرئيسية (من كاش الأصول)
+    - المستندات الموجودة في كاش PDF تُقرأ منه مباشرة
+    - الباقي يُولّد تسلسلياً بإعداد خطوط واحد (المكلف هو تحميل الخطوط والأصول لا التخطيط)
+    - عند عدم توفر WeasyPrint يُستخدم محرك ReportLab لكل مستند عبر context و doc_type
+
+    :param documents: قائمة dict بالمفاتيح: html, filename, و(اختيارياً) doc_type و context
+    :return: قائمة (filename, pdf_bytes) بنفس ترتيب المدخلات
+    """
+    documents = list(documents)
+    if not documents:
+        return []
+    base_url = request.build_absolute_uri('/') if request else None
+    timeout = getattr(settings, 'PDF_CACHE_TIMEOUT', 0)
+    use_cache = use_cache and bool(timeout)
+
+    results, pending, keys = {}, [], {}
+    for index, document in enumerate(documents):
+        processed_html = prepare_html_for_pdf(document['html'], request=request)
+        if use_cache:
+            keys[index] = pdf_cache_key(processed_html, base_url)
+        pending.append((index, processed_html, base_url))
+
+    if keys:
+        cached = cache.get_many(list(keys.values()))
+        for index, key in keys.items():
+            if key in cached:
+                results[index] = cached[key]
+        pending = [item for item in pending if item[0] not in results]
+
+    if pending:
+        try:
+            rendered = _render_pending(pending)
+        except Exception as e:
+            logger.warning(f"WeasyPrint unavailable or failed ({e}), falling back to ReportLab engine.")
+            rendered = {index: _fallback_pdf_bytes(documents[index]) for index, _, _ in pending}
+        else:
+            if keys:
+                cache.set_many({keys[index]: pdf_bytes for index, pdf_bytes in rendered.items()}, timeout)
+        results.update(rendered)
+
+    return [
+        (document.get('filename', f"document_{index + 1}.pdf"), results[index])
+        for index, document in enumerate(documents)
+    ]
+
+def generate_pdf_batch_response(documents, request=None, filename="documents", output="merged"):
+    """
+    استجابة HTTP لطباعة مجمّعة: ملف PDF واحد مدمج (output="merged") أو أرشيف ZIP (output="zip")
+    الدمج يتطلب pypdf، وبدونها يُعاد أرشيف ZIP تلقائياً
+    """
+    named_files = render_pdf_batch(documents, request=request)
+    base_name = filename[:-4] if filename.endswith(('.pdf', '.zip')) else filename
+
+    if output == "merged":
+        merged = named_files[0][1] if len(named_files) == 1 else merge_pdfs([pdf for _, pdf in named_files])
+        if merged is not None:
+            response = HttpResponse(merged, content_type='application/pdf')
+            return set_pdf_content_disposition(response, f"{base_name}.pdf")
+        logger.warning("pypdf is not installed, returning batch PDFs as a ZIP archive.")
+
+    from urllib.parse import quote
+    response = HttpResponse(zip_pdfs(named_files), content_type='application/zip')
+    response['Content-Disposition'] = f"attachment; filename=\"documents.zip\"; filename*=UTF-8''{quote(base_name)}.zip"
+    return response
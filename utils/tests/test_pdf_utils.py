@@ -0,0 +1,105 @@
+"""
+اختبارات كاش الأصول وكاش ملفات PDF والطباعة المجمّعة
+"""
+import io
+import os
+import tempfile
+import zipfile
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from utils import pdf_utils
+
+LOCMEM_CACHE = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pdf-utils-tests',
+    }
+}
+
+
+def fake_pdf(processed_html, base_url=None):
+    return b"%PDF-1.4 " + str(len(processed_html)).encode()
+
+
+class AssetCacheTest(TestCase):
+    """اختبارات كاش الأصول المضمّنة حسب المسار ووقت التعديل"""
+
+    def setUp(self):
+        pdf_utils.clear_pdf_asset_cache()
+        handle, self.path = tempfile.mkstemp(suffix=".png")
+        os.write(handle, b"first")
+        os.close(handle)
+
+    def tearDown(self):
+        os.remove(self.path)
+        pdf_utils.clear_pdf_asset_cache()
+
+    def test_encoded_file_is_reused_until_modified(self):
+        first = pdf_utils.get_base64_encoded_file(self.path)
+        self.assertTrue(first.startswith("data:image/png;base64,"))
+
+        with patch("builtins.open", side_effect=AssertionError("file re-read")):
+            self.assertEqual(pdf_utils.get_base64_encoded_file(self.path), first)
+
+        with open(self.path, "wb") as f:
+            f.write(b"second version")
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertNotEqual(pdf_utils.get_base64_encoded_file(self.path), first)
+
+    def test_missing_file_returns_none(self):
+        self.assertIsNone(pdf_utils.get_base64_encoded_file(self.path + ".missing"))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, PDF_CACHE_TIMEOUT=60)
+class PdfRenderCacheTest(TestCase):
+    """اختبارات كاش ملفات PDF حسب بصمة المحتوى والطباعة المجمّعة"""
+
+    def setUp(self):
+        cache.clear()
+
+    @patch("utils.pdf_utils._write_pdf", side_effect=fake_pdf)
+    def test_rendered_pdf_cached_by_content_hash(self, write_pdf):
+        html = "<html><head></head><body>فاتورة 1</body></html>"
+        first = pdf_utils.render_pdf_bytes(html)
+        self.assertEqual(pdf_utils.render_pdf_bytes(html), first)
+        self.assertEqual(write_pdf.call_count, 1)
+
+        pdf_utils.render_pdf_bytes(html.replace("1", "2"))
+        self.assertEqual(write_pdf.call_count, 2)
+
+        with override_settings(PDF_CACHE_TIMEOUT=0):
+            pdf_utils.render_pdf_bytes(html)
+        self.assertEqual(write_pdf.call_count, 3)
+
+    @patch("utils.pdf_utils.get_font_config")
+    @patch("utils.pdf_utils._write_pdf", side_effect=fake_pdf)
+    def test_batch_renders_only_uncached_documents_and_zips(self, write_pdf, font_config):
+        pdf_utils.render_pdf_bytes("<p>A</p>")
+        documents = [
+            {"html": "<p>A</p>", "filename": "INV-1.pdf"},
+            {"html": "<p>BB</p>", "filename": "INV-2.pdf"},
+            {"html": "<p>CCC</p>", "filename": "INV-2.pdf"},
+        ]
+
+        response = pdf_utils.generate_pdf_batch_response(documents, filename="invoices", output="zip")
+        self.assertEqual(write_pdf.call_count, 3)
+        self.assertEqual(response["Content-Type"], "application/zip")
+
+        archive = zipfile.ZipFile(io.BytesIO(response.content))
+        self.assertEqual(archive.namelist(), ["INV-1.pdf", "INV-2.pdf", "INV-2_2.pdf"])
+        self.assertEqual(archive.read("INV-2_2.pdf"), fake_pdf("<p>CCC</p>"))
+
+    @patch("utils.pdf_utils.get_font_config", side_effect=OSError("cannot load library"))
+    def test_batch_falls_back_to_reportlab_without_weasyprint(self, font_config):
+        documents = [
+            {"html": "<p>1</p>", "filename": "a.pdf", "doc_type": "sale", "context": {"company_name": "MWHEBA"}},
+            {"html": "<p>2</p>", "filename": "b.pdf"},
+        ]
+        results = pdf_utils.render_pdf_batch(documents)
+        self.assertEqual([name for name, _ in results], ["a.pdf", "b.pdf"])
+        self.assertTrue(all(pdf.startswith(b"%PDF") for _, pdf in results))
+        self.assertIsNone(cache.get(pdf_utils.pdf_cache_key(pdf_utils.prepare_html_for_pdf("<p>1</p>"))))